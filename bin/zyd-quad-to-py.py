@@ -7,8 +7,18 @@ with open(sys.argv[1]) as inf:
     lines = [l.strip() for l in inf.readlines() if l.strip()]
 
 rule_name = sys.argv[2]
+npz_name = sys.argv[3]
 
-table = {}
+import numpy
+
+try:
+    npz_file = numpy.load(npz_name)
+except IOError:
+    arrays = {}
+else:
+    arrays = dict((key, npz_file[key]) for key in npz_file.files
+            if not key.startswith(rule_name+"_"))
+    npz_file.close()
 
 i = 0
 while i < len(lines):
@@ -26,16 +36,7 @@ while i < len(lines):
         points.append(data[:-1])
         weights.append(data[-1])
 
-    table[order] = { 
-            "points": points,
-            "weights": weights }
-
-from pprint import pformat
-print "%s = %s" % (rule_name, pformat(table))
-
-print """
+    arrays["%s_%d_points" % (rule_name, order)] = numpy.array(points)
+    arrays["%s_%d_weights" % (rule_name, order)] = numpy.array(weights)
 
-%s = dict(
-    (order, dict((name, numpy.array(ary)) for name, ary in rule.iteritems()))
-    for order, rule in %s.iteritems())
-""" % (rule_name, rule_name)
+numpy.savez_compressed(npz_name, **arrays)
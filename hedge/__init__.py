@@ -27,6 +27,3 @@ import pyublas
 
 # break dependency cycle by importing this first
 import hedge.tools
-
-# make sure hedge.mesh.generators -> hedge.mesh monkeypatch happens
-import hedge.mesh.generator
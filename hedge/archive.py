@@ -0,0 +1,478 @@
+"""Compact on-disk archive for time series of volume fields."""
+
+from __future__ import division
+
+__copyright__ = "Copyright (C) 2026 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+
+
+
+import os
+import numpy
+import hedge.tools
+
+
+
+
+# An archive is a directory holding
+#
+# - mesh.npz: the nodes and the (sub-element) connectivity, written once,
+# - for each field and each chunk of *chunk_size* consecutive outputs,
+#   a file <field>-<chunk number>.npy (raw, memory-mappable) or
+#   <field>-<chunk number>.npz (compressed),
+# - index.json: times, steps and the layout of the fields, rewritten
+#   whenever a chunk is completed.
+
+FORMAT_VERSION = 1
+
+
+
+
+def _get_archive_pathname(pathname, pcontext):
+    if pcontext is None or len(pcontext.ranks) == 1:
+        return pathname
+    else:
+        return "%s-%05d" % (pathname, pcontext.rank)
+
+
+
+
+def _get_chunk_file_name(field_name, chunk_nr, compressed):
+    if compressed:
+        extension = "npz"
+    else:
+        extension = "npy"
+
+    return "%s-%05d.%s" % (field_name, chunk_nr, extension)
+
+
+
+
+def _get_connectivity(discr):
+    """Return an array of shape *(cell_count, dimensions+1)* of node
+    numbers, subdividing each element into simplices through its nodes.
+    """
+    cells = []
+    for eg in discr.element_groups:
+        smi = numpy.array(eg.local_discretization.get_submesh_indices(),
+                dtype=numpy.int32)
+        el_starts = (eg.ranges.start
+                + eg.ranges.el_size*numpy.arange(len(eg.members),
+                    dtype=numpy.int32))
+        cells.append(
+                (el_starts[:, numpy.newaxis, numpy.newaxis]
+                    + smi[numpy.newaxis, :, :])
+                .reshape(-1, smi.shape[1]))
+
+    if not cells:
+        return numpy.zeros((0, discr.dimensions+1), dtype=numpy.int32)
+
+    return numpy.vstack(cells)
+
+
+
+
+# {{{ writer
+
+class FieldArchiveWriter(hedge.tools.Closable):
+    """Appends volume fields at a sequence of times to an archive in the
+    directory *pathname*, to be read back by :class:`FieldArchive`.
+
+    Nodes and connectivity are stored once. Each field is stored in
+    chunks of *chunk_size* consecutive outputs, which are buffered in
+    memory until complete.
+
+    :param dtype: if not *None*, the data type in which fields are
+      stored, such as :class:`numpy.float32` to halve the output volume.
+    :param compress: whether chunks are compressed. Uncompressed chunks
+      are memory-mapped when read.
+    :param pcontext: if given and running on more than one rank, the rank
+      number is appended to *pathname*, so that each rank writes its own
+      archive.
+
+    Usage::
+
+        archive = FieldArchiveWriter(discr, "fields", dtype=numpy.float32)
+        for step in xrange(nsteps):
+            ...
+            archive.add_data([("u", u), ("v", v)], time=t, step=step)
+        archive.close()
+    """
+
+    def __init__(self, discr, pathname, chunk_size=16, dtype=None,
+            compress=True, pcontext=None):
+        hedge.tools.Closable.__init__(self)
+
+        self.pathname = _get_archive_pathname(pathname, pcontext)
+        self.chunk_size = chunk_size
+        self.dtype = dtype
+        self.compress = compress
+
+        os.makedirs(self.pathname)
+
+        numpy.savez(os.path.join(self.pathname, "mesh.npz"),
+                nodes=discr.nodes,
+                cells=_get_connectivity(discr))
+
+        self.times = []
+        self.steps = []
+        self.field_shapes = None
+        self.field_names = None
+
+        self.chunk_count = 0
+        self.buffers = None
+
+    def add_data(self, variables, time=None, step=None):
+        """
+        :param variables: a list of tuples *(name, field)*, where *field*
+          is a volume vector or an object array of volume vectors. The
+          same names must be given at each call.
+        """
+        from hedge.tools import is_obj_array
+
+        names = [name for name, field in variables]
+
+        def as_array(field):
+            if is_obj_array(field):
+                field = numpy.array(list(field))
+            return numpy.asarray(field, dtype=self.dtype)
+
+        fields = [as_array(field) for name, field in variables]
+
+        if self.field_names is None:
+            self.field_names = names
+            self.field_shapes = [field.shape for field in fields]
+            self.buffers = [[] for name in names]
+        elif names != self.field_names:
+            raise ValueError("field names must be the same for each "
+                    "addition to an archive (expected %s, got %s)"
+                    % (", ".join(self.field_names), ", ".join(names)))
+
+        # check all shapes before buffering anything, so that a rejected
+        # addition leaves the buffers consistent
+        for field, shape in zip(fields, self.field_shapes):
+            if field.shape != shape:
+                raise ValueError("field shapes must not change within "
+                        "an archive")
+
+        for buf, field in zip(self.buffers, fields):
+            buf.append(field)
+
+        self.times.append(time)
+        self.steps.append(step)
+
+        if len(self.buffers[0]) == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write the outputs added since the last complete chunk as a
+        (possibly short) chunk, and update the index.
+        """
+        if self.buffers is None or not self.buffers[0]:
+            return
+
+        for name, buf in zip(self.field_names, self.buffers):
+            chunk = numpy.array(buf)
+            chunk_pathname = os.path.join(self.pathname,
+                    _get_chunk_file_name(name, self.chunk_count, self.compress))
+
+            if self.compress:
+                numpy.savez_compressed(chunk_pathname, data=chunk)
+            else:
+                numpy.save(chunk_pathname, chunk)
+
+            del buf[:]
+
+        self.chunk_count += 1
+        self.write_index()
+
+    def write_index(self):
+        index = dict(
+                version=FORMAT_VERSION,
+                times=self.times,
+                steps=self.steps,
+                chunk_size=self.chunk_size,
+                chunk_count=self.chunk_count,
+                compressed=self.compress,
+                fields=[(name, list(shape))
+                    for name, shape in zip(self.field_names, self.field_shapes)])
+
+        # write atomically, so that readers never see a partial index
+        import json
+        index_pathname = os.path.join(self.pathname, "index.json")
+        outf = open(index_pathname+".tmp", "w")
+        try:
+            json.dump(index, outf)
+        finally:
+            outf.close()
+        os.rename(index_pathname+".tmp", index_pathname)
+
+    def do_close(self):
+        self.flush()
+
+# }}}
+
+
+
+
+# {{{ reader
+
+class FieldArchive(object):
+    """Reads an archive written by :class:`FieldArchiveWriter`.
+
+    Only outputs in completed chunks (see :meth:`FieldArchiveWriter.flush`)
+    are visible, so an archive may be read while it is being written.
+
+    .. attribute:: nodes
+    .. attribute:: cells
+
+        The node numbers of the simplices making up the mesh, as an array
+        of shape *(cell_count, dimensions+1)*.
+
+    .. attribute:: times
+    .. attribute:: steps
+    .. attribute:: field_names
+    """
+
+    def __init__(self, pathname):
+        self.pathname = pathname
+
+        import json
+        inf = open(os.path.join(pathname, "index.json"))
+        try:
+            index = json.load(inf)
+        finally:
+            inf.close()
+
+        if index["version"] != FORMAT_VERSION:
+            raise ValueError("unsupported archive format version %d"
+                    % index["version"])
+
+        self.chunk_size = index["chunk_size"]
+        self.chunk_count = index["chunk_count"]
+        self.compressed = index["compressed"]
+        self.field_names = [name for name, shape in index["fields"]]
+
+        # only the outputs stored in completed chunks are available
+        output_count = min(len(index["times"]),
+                self.chunk_size*self.chunk_count)
+        self.times = index["times"][:output_count]
+        self.steps = index["steps"][:output_count]
+
+        from contextlib import closing
+        with closing(numpy.load(os.path.join(pathname, "mesh.npz"))) \
+                as mesh_data:
+            self.nodes = mesh_data["nodes"]
+            self.cells = mesh_data["cells"]
+
+        self.chunk_cache = {}
+
+    def __len__(self):
+        return len(self.times)
+
+    def get_chunk(self, field_name, chunk_nr):
+        try:
+            return self.chunk_cache[field_name, chunk_nr]
+        except KeyError:
+            pass
+
+        chunk_pathname = os.path.join(self.pathname,
+                _get_chunk_file_name(field_name, chunk_nr, self.compressed))
+
+        if self.compressed:
+            # keep only the most recently decompressed chunk of each field
+            for key in list(self.chunk_cache):
+                if key[0] == field_name:
+                    del self.chunk_cache[key]
+
+            from contextlib import closing
+            with closing(numpy.load(chunk_pathname)) as chunk_data:
+                result = chunk_data["data"]
+        else:
+            result = numpy.load(chunk_pathname, mmap_mode="r")
+
+        self.chunk_cache[field_name, chunk_nr] = result
+        return result
+
+    def get_field(self, field_name, output_nr):
+        """Return the field *field_name* of the *output_nr*-th output. For
+        fields given as object arrays, the components are stacked along
+        the first axis.
+        """
+        if field_name not in self.field_names:
+            raise KeyError("no field '%s' in archive" % field_name)
+        if not 0 <= output_nr < len(self):
+            raise IndexError("output number out of range")
+
+        chunk_nr, index_in_chunk = divmod(output_nr, self.chunk_size)
+        return self.get_chunk(field_name, chunk_nr)[index_in_chunk]
+
+    def get_time_series(self, field_name, node_indices):
+        """Return an array of the values of *field_name* at the given node
+        numbers for all outputs, with the output number as first axis.
+        """
+        return numpy.array([
+            self.get_field(field_name, i)[..., node_indices]
+            for i in xrange(len(self))])
+
+# }}}
+
+
+
+
+# {{{ exporters
+
+def export_vtk(archive, output_nr, pathname, compressor=None):
+    """Write the fields of the *output_nr*-th output in *archive* to the
+    VTK XML unstructured grid file *pathname*.
+    """
+    from pyvisfile.vtk import (UnstructuredGrid, DataArray,
+            AppendedDataXMLGenerator,
+            VTK_LINE, VTK_TRIANGLE, VTK_TETRA,
+            VF_LIST_OF_VECTORS, VF_LIST_OF_COMPONENTS)
+
+    dimensions = archive.cells.shape[1]-1
+    vtk_eltype = {1: VTK_LINE, 2: VTK_TRIANGLE, 3: VTK_TETRA}[dimensions]
+
+    grid = UnstructuredGrid(
+            (len(archive.nodes),
+                DataArray("points", archive.nodes,
+                    vector_format=VF_LIST_OF_VECTORS)),
+            numpy.asarray(archive.cells.ravel(), dtype=numpy.int32),
+            cell_types=numpy.empty(len(archive.cells), dtype=numpy.uint8))
+    grid.cell_types[:] = vtk_eltype
+
+    for name in archive.field_names:
+        field = numpy.asarray(archive.get_field(name, output_nr))
+        if field.ndim > 1:
+            from hedge.tools import make_obj_array
+            field = make_obj_array(list(field))
+
+        grid.add_pointdata(DataArray(name, field,
+            vector_format=VF_LIST_OF_COMPONENTS))
+
+    from pytools import assert_not_a_file
+    assert_not_a_file(pathname)
+
+    outf = open(pathname, "w")
+    try:
+        AppendedDataXMLGenerator(compressor)(grid).write(outf)
+    finally:
+        outf.close()
+
+
+
+
+def export_xdmf(archive, pathname):
+    """Write an XDMF description of all outputs in *archive* to
+    *pathname*, together with raw binary data files next to it, for
+    reading by XDMF-capable tools such as ParaView or VisIt.
+
+    Nodes and connectivity are written once and referenced by all
+    outputs.
+    """
+    base_dir = os.path.dirname(os.path.abspath(pathname))
+    base_name = os.path.splitext(os.path.basename(pathname))[0]
+
+    def write_raw(suffix, ary):
+        ary = numpy.ascontiguousarray(ary)
+        file_name = "%s-%s.bin" % (base_name, suffix)
+        ary.tofile(os.path.join(base_dir, file_name))
+
+        number_type, precision = {
+                numpy.dtype(numpy.float32): ("Float", 4),
+                numpy.dtype(numpy.float64): ("Float", 8),
+                numpy.dtype(numpy.int32): ("Int", 4),
+                numpy.dtype(numpy.int64): ("Int", 8),
+                }[ary.dtype]
+
+        return ('<DataItem Format="Binary" Endian="%s" NumberType="%s" '
+                'Precision="%d" Dimensions="%s">%s</DataItem>' % (
+                    {"<": "Little", ">": "Big", "=": "Native"}.get(
+                        ary.dtype.byteorder, "Native"),
+                    number_type, precision,
+                    " ".join(str(n) for n in ary.shape), file_name))
+
+    dimensions = archive.cells.shape[1]-1
+    topology_type = {1: "Polyline", 2: "Triangle", 3: "Tetrahedron"}[dimensions]
+
+    nodes = archive.nodes
+    if dimensions == 1:
+        # XDMF has no one-dimensional geometry type
+        nodes = numpy.hstack([nodes,
+            numpy.zeros((len(nodes), 2), dtype=nodes.dtype)])
+        geometry_type = "XYZ"
+    else:
+        geometry_type = {2: "XY", 3: "XYZ"}[dimensions]
+
+    topology = ('<Topology TopologyType="%s" NumberOfElements="%d" '
+            'NodesPerElement="%d">%s</Topology>' % (
+                topology_type, len(archive.cells), dimensions+1,
+                write_raw("cells", archive.cells)))
+    geometry = '<Geometry GeometryType="%s">%s</Geometry>' % (
+            geometry_type, write_raw("nodes", nodes))
+
+    lines = [
+            '<?xml version="1.0" ?>',
+            '<Xdmf Version="2.0">',
+            '<Domain>',
+            '<Grid Name="TimeSeries" GridType="Collection" '
+            'CollectionType="Temporal">']
+
+    for output_nr, time in enumerate(archive.times):
+        lines.append('<Grid Name="output%d" GridType="Uniform">' % output_nr)
+        if time is not None:
+            lines.append('<Time Value="%r"/>' % time)
+        lines.append(topology)
+        lines.append(geometry)
+
+        for name in archive.field_names:
+            field = numpy.asarray(archive.get_field(name, output_nr))
+            if field.ndim > 1:
+                # XDMF expects vector components last
+                field = field.T
+                attribute_type = "Vector"
+            else:
+                attribute_type = "Scalar"
+
+            lines.append('<Attribute Name="%s" AttributeType="%s" '
+                    'Center="Node">%s</Attribute>' % (
+                        name, attribute_type,
+                        write_raw("%s-%05d" % (name, output_nr), field)))
+
+        lines.append('</Grid>')
+
+    lines.extend(['</Grid>', '</Domain>', '</Xdmf>'])
+
+    outf = open(pathname, "w")
+    try:
+        outf.write("\n".join(lines)+"\n")
+    finally:
+        outf.close()
+
+# }}}
+
+
+
+
+# vim: foldmethod=marker
@@ -25,11 +25,6 @@ THE SOFTWARE.
 
 
 
-import hedge.discretization
-import hedge.mesh
-
-
-
 
 # {{{ base run context --------------------------------------------------------
 class RunContext(object):
@@ -129,7 +124,10 @@ class SerialRunContext(RunContext):
 
 
 class CPURunContext(SerialRunContext):
-    from hedge.backends.jit import Discretization as discr_class
+    @property
+    def discr_class(self):
+        from hedge.backends.jit import Discretization
+        return Discretization
 
     def make_timer(self, name, description=None):
         from pytools.log import IntervalTimer
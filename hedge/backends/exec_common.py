@@ -64,6 +64,12 @@ class ExecutionMapperBase(hedge.optemplate.Evaluator,
         return (self.discr.inverse_metric_derivatives(expr.quadrature_tag)
                     [expr.xyz_axis][expr.rst_axis])
 
+    def map_node_coordinate_component(self, expr):
+        if expr.quadrature_tag is not None:
+            raise NotImplementedError("node coordinates on quad. grids")
+        return self.discr.volume_node_coordinates(
+                kind=self.discr.compute_kind)[expr.axis]
+
     def map_call(self, expr):
         from pymbolic.primitives import Variable
         assert isinstance(expr.function, Variable)
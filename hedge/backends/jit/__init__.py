@@ -30,6 +30,7 @@ THE SOFTWARE.
 import hedge.discretization
 import hedge.optemplate
 from hedge.backends.exec_common import ExecutionMapperBase
+from hedge.tools.ensemble import EnsembleVector
 import numpy
 
 
@@ -45,8 +46,18 @@ class ExecutionMapper(ExecutionMapperBase):
     def exec_vector_expr_assign(self, insn):
         if self.discr.instrumented:
             def stats_callback(n, vec_expr):
-                self.discr.vector_math_flop_counter.add(n*insn.flop_count())
-                return self.discr.vector_math_timer
+                discr = self.discr
+                discr.vector_math_flop_counter.add(n*insn.flop_count())
+
+                # results are freshly allocated
+                result_count = len(vec_expr.result_names())
+                discr.vector_alloc_counter.add(result_count)
+
+                discr.vector_math_byte_counter.add(
+                        n*numpy.dtype(discr.default_scalar_type).itemsize
+                        * (len(vec_expr.vector_deps) + result_count))
+
+                return discr.vector_math_timer
         else:
             stats_callback = None
 
@@ -58,7 +69,10 @@ class ExecutionMapper(ExecutionMapperBase):
             return zip(compiled.result_names(),
                     compiled(self, stats_callback)), []
 
-    def exec_flux_batch_assign(self, insn):
+    def get_flux_batch_args(self, insn):
+        """Evaluate and type-unify the field arguments of the flux batch
+        *insn*. Returns a tuple *(args, max_dtype)*.
+        """
         from pymbolic.primitives import is_zero
 
         class ZeroSpec:
@@ -95,26 +109,73 @@ class ExecutionMapper(ExecutionMapperBase):
                 return self.discr.volume_zeros(
                         dtype=max_dtype)
             elif isinstance(arg, numpy.ndarray):
-                return numpy.asarray(arg, dtype=max_dtype)
+                # (keep ensembles marked as such)
+                return numpy.asanyarray(arg, dtype=max_dtype)
             else:
                 return arg
 
-        args = [cast_arg(arg) for arg in args]
+        return [cast_arg(arg) for arg in args], max_dtype
 
+    def get_flux_batch_face_groups(self, insn):
         if insn.quadrature_tag is None:
             if insn.is_boundary:
-                face_groups = self.discr.get_boundary(insn.repr_op.boundary_tag)\
+                return self.discr.get_boundary(insn.repr_op.boundary_tag)\
                         .face_groups
             else:
-                face_groups = self.discr.face_groups
+                return self.discr.face_groups
         else:
             if insn.is_boundary:
-                face_groups = self.discr.get_boundary(insn.repr_op.boundary_tag)\
+                return self.discr.get_boundary(insn.repr_op.boundary_tag)\
                         .get_quadrature_info(insn.quadrature_tag).face_groups
             else:
-                face_groups = self.discr.get_quadrature_info(insn.quadrature_tag) \
+                return self.discr.get_quadrature_info(insn.quadrature_tag) \
                         .face_groups
 
+    def lift_flux_batch(self, insn, fg, all_fluxes_on_faces, out_shape=()):
+        """Lift (or apply the face mass matrix to) each of the
+        *all_fluxes_on_faces* gathered on face group *fg*. Returns a
+        list of *(name, result)* tuples.
+        """
+        result = []
+
+        for name, flux_bdg, fluxes_on_faces in zip(insn.names, insn.expressions,
+                all_fluxes_on_faces):
+
+            if insn.quadrature_tag is None:
+                if flux_bdg.op.is_lift:
+                    mat = fg.ldis_loc.lifting_matrix()
+                    scaling = fg.local_el_inverse_jacobians
+                else:
+                    mat = fg.ldis_loc.multi_face_mass_matrix()
+                    scaling = None
+            else:
+                assert not flux_bdg.op.is_lift
+                mat = fg.ldis_loc_quad_info.multi_face_mass_matrix()
+                scaling = None
+
+            out = self.discr.volume_zeros(out_shape,
+                    dtype=fluxes_on_faces.dtype)
+            if isinstance(fluxes_on_faces, EnsembleVector):
+                out = out.view(EnsembleVector)
+            self.executor.lift_flux(fg, mat, scaling, fluxes_on_faces, out)
+
+            if self.discr.instrumented:
+                from hedge.tools import lift_flops, lift_bytes
+
+                # correct for quadrature, too.
+                self.discr.lift_flop_counter.add(lift_flops(fg))
+                self.discr.lift_byte_counter.add(lift_bytes(self.discr, fg))
+
+            result.append((name, out))
+
+        return result
+
+    def exec_flux_batch_assign(self, insn):
+        from hedge.backends.jit.flux import set_face_data_args
+
+        args, max_dtype = self.get_flux_batch_args(insn)
+        face_groups = self.get_flux_batch_face_groups(insn)
+
         result = []
 
         for fg in face_groups:
@@ -138,39 +199,17 @@ class ExecutionMapper(ExecutionMapperBase):
             for i, fof in enumerate(all_fluxes_on_faces):
                 setattr(arg_struct, "flux%d_on_faces" % i, fof)
 
+            set_face_data_args(arg_struct, fg)
+
             # make sure everything ended up in Boost.Python attributes
             # (i.e. empty __dict__)
             assert not arg_struct.__dict__, arg_struct.__dict__.keys()
 
             # perform gather
-            func(fg, arg_struct)
+            func(arg_struct)
 
             # do lift, produce output
-            for name, flux_bdg, fluxes_on_faces in zip(insn.names, insn.expressions,
-                    all_fluxes_on_faces):
-
-                if insn.quadrature_tag is None:
-                    if flux_bdg.op.is_lift:
-                        mat = fg.ldis_loc.lifting_matrix()
-                        scaling = fg.local_el_inverse_jacobians
-                    else:
-                        mat = fg.ldis_loc.multi_face_mass_matrix()
-                        scaling = None
-                else:
-                    assert not flux_bdg.op.is_lift
-                    mat = fg.ldis_loc_quad_info.multi_face_mass_matrix()
-                    scaling = None
-
-                out = self.discr.volume_zeros(dtype=fluxes_on_faces.dtype)
-                self.executor.lift_flux(fg, mat, scaling, fluxes_on_faces, out)
-
-                if self.discr.instrumented:
-                    from hedge.tools import lift_flops
-
-                    # correct for quadrature, too.
-                    self.discr.lift_flop_counter.add(lift_flops(fg))
-
-                result.append((name, out))
+            result.extend(self.lift_flux_batch(insn, fg, all_fluxes_on_faces))
 
         if not face_groups:
             # No face groups? Still assign context variables.
@@ -186,6 +225,55 @@ class ExecutionMapper(ExecutionMapperBase):
 
     exec_quad_diff_batch_assign = exec_diff_batch_assign
 
+    def exec_quadrature_kernel_assign(self, insn):
+        discr = self.discr
+
+        from hedge.tools import is_zero
+        inputs = [self.rec(input_expr) for input_expr in insn.inputs]
+        inputs = [discr.volume_zeros() if is_zero(inp) else inp
+                for inp in inputs]
+
+        geometric_factors, scalar_parameters = insn.get_leaves()
+        scalars = [self.rec(sp) for sp in scalar_parameters]
+
+        from hedge.backends.vector_expr import simple_result_dtype_getter
+        dtype = simple_result_dtype_getter(
+                dict(zip(insn.inputs, [inp.dtype for inp in inputs])),
+                dict(zip(scalar_parameters,
+                    [numpy.array(s).dtype for s in scalars])),
+                insn.get_constant_dtypes())
+
+        from pytools import to_uncomplex_dtype
+        inputs = [numpy.asarray(inp, dtype=dtype) for inp in inputs]
+        geometric_factors = [
+                numpy.asarray(self.rec(gf), dtype=to_uncomplex_dtype(dtype))
+                for gf in geometric_factors]
+
+        results = [discr.volume_zeros(dtype=dtype) for name in insn.names]
+
+        from hedge.backends.jit.quadrature import set_element_group_args
+        for eg in discr.element_groups:
+            kernel = insn.get_kernel(discr, eg, dtype)
+
+            arg_struct = kernel.ArgStruct()
+            for i, inp in enumerate(inputs):
+                setattr(arg_struct, "input%d" % i, inp)
+            for i, gf in enumerate(geometric_factors):
+                setattr(arg_struct, "geo%d" % i, gf)
+            for i, scalar in enumerate(scalars):
+                setattr(arg_struct, "scalar%d" % i, scalar)
+            for i, res in enumerate(results):
+                setattr(arg_struct, "result%d" % i, res)
+            set_element_group_args(arg_struct, insn, eg, dtype)
+
+            # make sure everything ended up in Boost.Python attributes
+            # (i.e. empty __dict__)
+            assert not arg_struct.__dict__, arg_struct.__dict__.keys()
+
+            kernel.apply(arg_struct)
+
+        return zip(insn.names, results), []
+
     # }}}
 
     # {{{ expression mappings -------------------------------------------------
@@ -327,6 +415,151 @@ class ExecutionMapper(ExecutionMapperBase):
 
 # }}}
 
+# {{{ ensemble exec mapper ----------------------------------------------------
+class _EnsembleMemberContext(object):
+    """A read-only view of an ensemble execution context that shows
+    only one ensemble member.
+    """
+
+    def __init__(self, context, member):
+        self.context = context
+        self.member = member
+
+    def __getitem__(self, name):
+        from hedge.tools.ensemble import ensemble_member
+        return ensemble_member(self.context[name], self.member)
+
+    def __contains__(self, name):
+        return name in self.context
+
+
+
+
+class EnsembleExecutionMapper(ExecutionMapper):
+    """Executes an operator on an ensemble of independent states at once.
+
+    Context values that are
+    :class:`hedge.tools.ensemble.EnsembleVector` instances (or object arrays
+    of them) carry one value per ensemble member; all other values are
+    shared by all members.
+
+    Differentiation and flux lifting are carried out for all members in a
+    single pass through the volume, so that each element matrix is reused
+    across the ensemble. Other instructions (vector math, element-local
+    operators, flux gathers, fused quadrature kernels) run member by
+    member.
+    """
+
+    def __init__(self, context, executor, ensemble_size):
+        ExecutionMapper.__init__(self, context, executor)
+        self.ensemble_size = ensemble_size
+
+    def member_mapper(self, member):
+        return ExecutionMapper(
+                _EnsembleMemberContext(self.context, member),
+                self.executor)
+
+    def exec_member_by_member(self, insn):
+        from hedge.tools.ensemble import make_ensemble
+
+        member_assignments = []
+        for member in xrange(self.ensemble_size):
+            assignments, futures = insn.get_executor_method(
+                    self.member_mapper(member))(insn)
+
+            # Futures can't be merged across members, so wait for each
+            # member's futures before moving on to the next member.
+            assignments = list(assignments)
+            futures = list(futures)
+            while futures:
+                new_assignments, new_futures = futures.pop(0)()
+                assignments.extend(new_assignments)
+                futures.extend(new_futures)
+
+            member_assignments.append(dict(assignments))
+
+        result = []
+        for name in member_assignments[0]:
+            values = [ma[name] for ma in member_assignments]
+
+            from hedge.tools import is_zero
+            from pytools import all
+            if all(is_zero(v) for v in values):
+                result.append((name, 0))
+            else:
+                result.append((name, make_ensemble(values)))
+
+        return result, []
+
+    exec_assign = exec_member_by_member
+    exec_vector_expr_assign = exec_member_by_member
+    exec_quadrature_kernel_assign = exec_member_by_member
+
+    def exec_diff_batch_assign(self, insn):
+        field = self.rec(insn.field)
+        if not isinstance(field, EnsembleVector):
+            return ExecutionMapper.exec_diff_batch_assign(self, insn)
+
+        rst_diff = self.executor.ensemble_diff(insn.operators, field)
+
+        return [(name, diff) for name, diff in zip(insn.names, rst_diff)], []
+
+    exec_quad_diff_batch_assign = exec_diff_batch_assign
+
+    def exec_flux_batch_assign(self, insn):
+        from hedge.tools.ensemble import ensemble_member
+        from hedge.backends.jit.flux import set_face_data_args
+
+        args, max_dtype = self.get_flux_batch_args(insn)
+        scalar_args = [self.rec(scalar_arg_expr)
+                for scalar_arg_expr in insn.flux_var_info.scalar_parameters]
+        face_groups = self.get_flux_batch_face_groups(insn)
+
+        result = []
+
+        for fg in face_groups:
+            module = insn.get_module(self.discr, max_dtype)
+            func = module.gather_flux
+
+            fof_shape = (self.ensemble_size,
+                    fg.face_count*fg.face_length()*fg.element_count())
+            all_fluxes_on_faces = [
+                    numpy.zeros(fof_shape, dtype=max_dtype)
+                    .view(EnsembleVector)
+                    for f in insn.expressions]
+
+            # Gathers have no matrix to reuse--run them for each member,
+            # writing straight into the member's slice of the face vectors.
+            for member in xrange(self.ensemble_size):
+                arg_struct = module.ArgStruct()
+                for arg_name, arg in zip(insn.flux_var_info.arg_names, args):
+                    setattr(arg_struct, arg_name, ensemble_member(arg, member))
+                for arg_num, scalar_arg in enumerate(scalar_args):
+                    setattr(arg_struct,
+                            "_scalar_arg_%d" % arg_num,
+                            ensemble_member(scalar_arg, member))
+                for i, fof in enumerate(all_fluxes_on_faces):
+                    setattr(arg_struct, "flux%d_on_faces" % i,
+                            ensemble_member(fof, member))
+
+                set_face_data_args(arg_struct, fg)
+
+                assert not arg_struct.__dict__, arg_struct.__dict__.keys()
+
+                func(arg_struct)
+
+            result.extend(self.lift_flux_batch(insn, fg, all_fluxes_on_faces,
+                out_shape=(self.ensemble_size,)))
+
+        if not face_groups:
+            for name, flux_bdg in zip(insn.names, insn.expressions):
+                result.append((name, self.discr.volume_zeros(
+                    (self.ensemble_size,)).view(EnsembleVector)))
+
+        return result, []
+
+# }}}
+
 # {{{ executor ----------------------------------------------------------------
 class Executor(object):
     def __init__(self, discr, optemplate, post_bind_mapper, type_hints):
@@ -374,11 +607,13 @@ class Executor(object):
                     for f in choices)
 
         from hedge.backends.jit.diff import JitDifferentiator
+        self.jit_diff = JitDifferentiator(discr)
         self.diff = pick_faster_func(bench_diff,
-                [self.diff_builtin, JitDifferentiator(discr)])
+                [self.diff_builtin, self.jit_diff])
         from hedge.backends.jit.lift import JitLifter
+        self.jit_lift = JitLifter(discr)
         self.lift_flux = pick_faster_func(bench_lift,
-                [self.lift_flux, JitLifter(discr)])
+                [self.lift_flux, self.jit_lift])
 
     def compile_optemplate(self, discr, optemplate, post_bind_mapper,
             type_hints):
@@ -411,7 +646,8 @@ class Executor(object):
         from hedge.tools import time_count_flop
 
         from hedge.tools import \
-                diff_rst_flops, diff_rescale_one_flops, mass_flops
+                diff_rst_flops, diff_rescale_one_flops, mass_flops, \
+                diff_rst_bytes, mass_bytes
 
         if discr.quad_min_degrees:
             from warnings import warn
@@ -423,7 +659,9 @@ class Executor(object):
                         discr.diff_timer,
                         discr.diff_counter,
                         discr.diff_flop_counter,
-                        diff_rst_flops(discr))
+                        diff_rst_flops(discr),
+                        byte_counter=discr.diff_byte_counter,
+                        byte_count=diff_rst_bytes(discr))
 
         self.do_elementwise_linear = \
                 time_count_flop(
@@ -431,7 +669,9 @@ class Executor(object):
                         discr.el_local_timer,
                         discr.el_local_counter,
                         discr.el_local_flop_counter,
-                        mass_flops(discr))
+                        mass_flops(discr),
+                        byte_counter=discr.el_local_byte_counter,
+                        byte_count=mass_bytes(discr))
 
         self.lift_flux = \
                 time_and_count_function(
@@ -440,6 +680,10 @@ class Executor(object):
                         discr.lift_counter)
 
     def lift_flux(self, fgroup, matrix, scaling, field, out):
+        if isinstance(field, EnsembleVector):
+            # only the JIT lifter knows about ensembles
+            return self.jit_lift(fgroup, matrix, scaling, field, out)
+
         from hedge._internal import lift_flux
         from pytools import to_uncomplex_dtype
         lift_flux(fgroup,
@@ -465,6 +709,12 @@ class Executor(object):
 
         return [self.diff_rst(op, field) for op in operators]
 
+    def ensemble_diff(self, operators, field):
+        """Like :meth:`diff_builtin`, but for an
+        :class:`hedge.tools.ensemble.EnsembleVector` *field*.
+        """
+        return self.jit_diff(operators, field)
+
     def do_elementwise_linear(self, op, field, out):
         for eg in self.discr.element_groups:
             try:
@@ -486,20 +736,38 @@ class Executor(object):
                         coeffs, matrix, field, out)
 
     def __call__(self, **context):
-        return self.code.execute(
-                self.discr.exec_mapper_class(context, self))
+        """Evaluate the operator on the fields and parameters given in
+        *context*.
+
+        If any of the values in *context* are (or contain)
+        :class:`hedge.tools.ensemble.EnsembleVector` instances, the operator
+        is applied to each member of the ensemble, and ensemble results
+        are returned. See :func:`hedge.tools.ensemble.make_ensemble`.
+        """
+        from hedge.tools.ensemble import ensemble_size
+        ens_size = ensemble_size(context.values())
+
+        if ens_size is None:
+            return self.code.execute(
+                    self.discr.exec_mapper_class(context, self))
+        else:
+            return self.code.execute(
+                    self.discr.ensemble_exec_mapper_class(
+                        context, self, ens_size))
 
 # }}}
 
 # {{{ discretization ----------------------------------------------------------
 class Discretization(hedge.discretization.Discretization):
     exec_mapper_class = ExecutionMapper
+    ensemble_exec_mapper_class = EnsembleExecutionMapper
     executor_class = Executor
 
     @classmethod
     def all_debug_flags(cls):
         return hedge.discretization.Discretization.all_debug_flags() | set([
             "jit_dont_optimize_large_exprs",
+            "jit_dont_fuse_quadrature",
             ])
 
     @classmethod
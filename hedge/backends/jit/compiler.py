@@ -27,11 +27,15 @@ THE SOFTWARE.
 
 
 
+import numpy
 import hedge.discretization
 import hedge.optemplate
-from pytools import memoize_method
+from pytools import memoize_method, Record
+from pymbolic.mapper import CSECachingMapperMixin
+from hedge.optemplate import IdentityMapper
+from hedge.optemplate.mappers import CombineMapper, CollectorMixin
 from hedge.compiler import OperatorCompilerBase, FluxBatchAssign, \
-        Assign
+        Assign, Instruction
 
 
 
@@ -106,7 +110,8 @@ class CompiledFluxBatchAssign(FluxBatchAssign):
                     discr, dtype)
 
             if discr.instrumented:
-                from hedge.tools import time_count_flop, gather_flops
+                from hedge.tools import time_count_flop, gather_flops, \
+                        gather_bytes
                 mod.gather_flux = \
                         time_count_flop(
                                 mod.gather_flux,
@@ -115,7 +120,12 @@ class CompiledFluxBatchAssign(FluxBatchAssign):
                                 discr.gather_flop_counter,
                                 len(self.expressions)
                                 * gather_flops(discr, self.quadrature_tag)
-                                * len(self.flux_var_info.arg_names))
+                                * len(self.flux_var_info.arg_names),
+                                byte_counter=discr.gather_byte_counter,
+                                byte_count=gather_bytes(discr,
+                                    len(self.flux_var_info.arg_names),
+                                    len(self.expressions),
+                                    self.quadrature_tag))
 
         else:
             mod = get_boundary_flux_mod(
@@ -131,6 +141,204 @@ class CompiledFluxBatchAssign(FluxBatchAssign):
 
 
 
+class QuadratureKernelAssign(Instruction):
+    """Applies the quadrature stiffness and mass operators in
+    :attr:`operators` to pointwise expressions of volume fields
+    upsampled to a quadrature grid, in a single element-local pass that
+    never stores data on the quadrature grid.
+
+    :ivar names: one name per output.
+    :ivar operators: one
+      :class:`hedge.optemplate.operators.ReferenceQuadratureStiffnessTOperator`
+      or :class:`hedge.optemplate.operators.ReferenceQuadratureMassOperator`
+      per output.
+    :ivar field_indices: the index into :attr:`fields` of the operand
+      of each output.
+    :ivar fields: pointwise expressions on the quadrature grid. Volume data
+      enters these only through
+      :class:`hedge.optemplate.operators.QuadratureGridUpsampler` bindings
+      of the expressions in :attr:`inputs`.
+    :ivar inputs: the volume expressions being upsampled.
+    :ivar quadrature_tag:
+    """
+
+    def get_assignees(self):
+        return set(self.names)
+
+    @memoize_method
+    def get_dependencies(self):
+        dep_mapper = self.dep_mapper_factory()
+
+        from operator import or_
+        return reduce(or_, (dep_mapper(field) for field in self.fields))
+
+    @memoize_method
+    def get_leaves(self):
+        """Return a tuple *(geometric_factors, scalar_parameters)* of the
+        quadrature-grid geometric factors and scalar parameters used in
+        :attr:`fields`.
+        """
+        from hedge.optemplate.primitives import ScalarParameter
+        from hedge.optemplate.mappers import (
+                DependencyMapper, GeometricFactorCollector)
+
+        geometric_factors = set()
+        scalar_parameters = set()
+        dep_mapper = DependencyMapper(
+                include_operator_bindings=False,
+                include_calls="descend_args")
+        gfc = GeometricFactorCollector()
+        for field in self.fields:
+            geometric_factors |= gfc(field)
+            scalar_parameters |= set(dep for dep in dep_mapper(field)
+                    if isinstance(dep, ScalarParameter))
+
+        return (sorted(geometric_factors, key=str),
+                sorted(scalar_parameters, key=str))
+
+    @memoize_method
+    def get_constant_dtypes(self):
+        from hedge.backends.vector_expr import ConstantGatherMapper
+        return [numpy.array(const).dtype
+                for field in self.fields
+                for const in ConstantGatherMapper()(field)]
+
+    @memoize_method
+    def flop_count(self):
+        from hedge.optemplate import FlopCounter
+        return sum(FlopCounter()(field) for field in self.fields)
+
+    @memoize_method
+    def get_kernel_matrices(self, eg, dtype):
+        from hedge.backends.jit.quadrature import get_kernel_matrices
+        return get_kernel_matrices(self, eg, dtype)
+
+    @memoize_method
+    def get_kernel(self, discr, eg, dtype):
+        from hedge.backends.jit.quadrature import make_quadrature_kernel
+        kernel = make_quadrature_kernel(self, discr, eg, dtype)
+
+        if discr.instrumented:
+            from hedge.tools import time_count_flop
+
+            ldis = eg.local_discretization
+            quad_node_count = eg.quadrature_info[self.quadrature_tag] \
+                    .ldis_quad_info.node_count()
+            geometric_factors, scalar_parameters = self.get_leaves()
+
+            kernel.apply = time_count_flop(kernel.apply,
+                    discr.diff_timer, discr.diff_counter,
+                    discr.diff_flop_counter,
+                    flops=len(eg.members)*(
+                        # upsampling
+                        2*quad_node_count*ldis.node_count()*len(self.inputs)
+                        # pointwise expressions
+                        + quad_node_count*self.flop_count()
+                        # stiffness and mass
+                        + 2*ldis.node_count()*quad_node_count
+                        * len(self.names)),
+                    increment=len(self.names),
+                    byte_counter=discr.diff_byte_counter,
+                    # read the inputs and geometric factors, write the
+                    # results
+                    byte_count=numpy.dtype(dtype).itemsize*len(eg.members)*(
+                        ldis.node_count()*len(self.inputs)
+                        + quad_node_count*len(geometric_factors)
+                        + ldis.node_count()*len(self.names)))
+
+        return kernel
+
+    def __str__(self):
+        lines = []
+        lines.append("{ /* quadrature kernel */")
+        for name, op, field_idx in zip(
+                self.names, self.operators, self.field_indices):
+            lines.append("  %s <- %s(%s)" % (
+                name, op, self.fields[field_idx]))
+        lines.append("}")
+        return "\n".join(lines)
+
+    def get_executor_method(self, executor):
+        return executor.exec_quadrature_kernel_assign
+
+
+
+
+
+# }}}
+
+# {{{ quadrature kernel planning ----------------------------------------------
+class _NotFusable(Exception):
+    pass
+
+
+
+
+class _QuadratureKernelBatch(Record):
+    """
+    :ivar quadrature_tag:
+    :ivar bindings: the quadrature stiffness and mass operator bindings
+      evaluated by one :class:`QuadratureKernelAssign`.
+    :ivar upsamplers: the upsampler bindings their operands depend on.
+    """
+
+
+
+
+class _QuadratureKernelLeafCollector(
+        CSECachingMapperMixin, CollectorMixin, CombineMapper):
+    """Return the set of
+    :class:`hedge.optemplate.operators.QuadratureGridUpsampler` bindings
+    in a pointwise expression on the quadrature grid *quadrature_tag*.
+    Raise :exc:`_NotFusable` if the expression depends on anything else
+    that varies across the grid, apart from geometric factors.
+    """
+
+    def __init__(self, quadrature_tag):
+        self.quadrature_tag = quadrature_tag
+
+    map_common_subexpression_uncached = \
+            CombineMapper.map_common_subexpression
+
+    def map_operator_binding(self, expr):
+        from hedge.optemplate.operators import QuadratureGridUpsampler
+        if (isinstance(expr.op, QuadratureGridUpsampler)
+                and expr.op.quadrature_tag == self.quadrature_tag):
+            return set([expr])
+        else:
+            raise _NotFusable
+
+    def map_jacobian(self, expr):
+        if expr.quadrature_tag != self.quadrature_tag:
+            raise _NotFusable
+        return set()
+
+    map_forward_metric_derivative = map_jacobian
+    map_inverse_metric_derivative = map_jacobian
+
+    def map_variable(self, expr):
+        raise _NotFusable
+
+    map_subscript = map_variable
+    map_normal_component = map_variable
+    map_node_coordinate_component = map_variable
+    map_boundary_pair = map_variable
+    map_whole_domain_flux = map_variable
+    map_flux_exchange = map_variable
+
+
+
+
+class _UpsamplerSubstitutor(CSECachingMapperMixin, IdentityMapper):
+    def __init__(self, substitutions):
+        IdentityMapper.__init__(self)
+        self.substitutions = substitutions
+
+    map_common_subexpression_uncached = \
+            IdentityMapper.map_common_subexpression
+
+    def map_operator_binding(self, expr):
+        return self.substitutions[expr]
 
 # }}}
 
@@ -169,14 +377,147 @@ class OperatorCompiler(OperatorCompilerBase):
         from hedge.optemplate import IdentityMapper
         return IdentityMapper.map_operator_binding(self, flux_bind)
 
+    def __call__(self, expr, type_hints={}):
+        if "jit_dont_fuse_quadrature" in self.discr.debug:
+            self.quad_kernel_batches = {}
+        else:
+            self.quad_kernel_batches = self.plan_quadrature_kernels(expr)
+
+        return OperatorCompilerBase.__call__(self, expr, type_hints)
+
     def map_operator_binding(self, expr, name_hint=None):
         from hedge.optemplate import FluxOperatorBase
-        if isinstance(expr.op, FluxOperatorBase):
+        if expr in self.quad_kernel_batches:
+            return self.map_quadrature_kernel_binding(expr)
+        elif isinstance(expr.op, FluxOperatorBase):
             return self.map_planned_flux(expr)
         else:
             return OperatorCompilerBase.map_operator_binding(
                     self, expr, name_hint=name_hint)
 
+    # {{{ quadrature kernels
+    def plan_quadrature_kernels(self, expr):
+        """Find the quadrature stiffness and mass operators in *expr* whose
+        operands are pointwise functions of upsampled volume data, and
+        group them into batches evaluated by one
+        :class:`QuadratureKernelAssign` each.
+
+        :returns: a dictionary mapping each such operator binding to its
+          :class:`_QuadratureKernelBatch`.
+        """
+        from hedge.optemplate.operators import (
+                ReferenceQuadratureStiffnessTOperator,
+                ReferenceQuadratureMassOperator)
+        from hedge.optemplate.mappers import BoundOperatorCollector
+
+        candidate_collector = BoundOperatorCollector(
+                (ReferenceQuadratureStiffnessTOperator,
+                    ReferenceQuadratureMassOperator))
+
+        upsamplers = {}
+        for binding in candidate_collector(expr):
+            try:
+                binding_upsamplers = _QuadratureKernelLeafCollector(
+                        binding.op.quadrature_tag)(binding.field)
+            except _NotFusable:
+                continue
+
+            if binding_upsamplers:
+                upsamplers[binding] = binding_upsamplers
+
+        # A kernel cannot evaluate an operator whose upsampled inputs depend
+        # on the result of another operator in the same kernel. Each
+        # operator gets a level one higher than any fused operator its
+        # inputs depend on, and only operators of the same level are
+        # batched together.
+        levels = {}
+
+        def get_level(binding):
+            try:
+                return levels[binding]
+            except KeyError:
+                pass
+
+            level = 0
+            for ups in upsamplers[binding]:
+                for dep in candidate_collector(ups.field):
+                    if dep in upsamplers:
+                        level = max(level, get_level(dep)+1)
+
+            levels[binding] = level
+            return level
+
+        bindings_by_key = {}
+        for binding in upsamplers:
+            bindings_by_key.setdefault(
+                    (binding.op.quadrature_tag, get_level(binding)), []) \
+                            .append(binding)
+
+        from pytools import flatten
+
+        result = {}
+        for (quad_tag, level), bindings in bindings_by_key.iteritems():
+            batch = _QuadratureKernelBatch(
+                    quadrature_tag=quad_tag,
+                    bindings=sorted(bindings, key=str),
+                    upsamplers=sorted(
+                        set(flatten(upsamplers[b] for b in bindings)),
+                        key=str))
+
+            for binding in bindings:
+                result[binding] = batch
+
+        return result
+
+    def map_quadrature_kernel_binding(self, expr):
+        try:
+            return self.expr_to_var[expr]
+        except KeyError:
+            pass
+
+        batch = self.quad_kernel_batches[expr]
+
+        inputs = []
+        substitutions = {}
+        for ups in batch.upsamplers:
+            input_var = self.assign_to_new_var(self.rec(ups.field))
+            if input_var not in inputs:
+                inputs.append(input_var)
+            substitutions[ups] = ups.op(input_var)
+
+        substitutor = _UpsamplerSubstitutor(substitutions)
+
+        fields = []
+        field_indices = []
+        field_to_index = {}
+        for binding in batch.bindings:
+            try:
+                field_idx = field_to_index[binding.field]
+            except KeyError:
+                field_idx = field_to_index[binding.field] = len(fields)
+                fields.append(substitutor(binding.field))
+
+            field_indices.append(field_idx)
+
+        names = [self.get_var_name() for binding in batch.bindings]
+
+        self.code.append(QuadratureKernelAssign(
+            names=names,
+            operators=[binding.op for binding in batch.bindings],
+            field_indices=field_indices,
+            fields=fields,
+            inputs=inputs,
+            quadrature_tag=batch.quadrature_tag,
+            dep_mapper_factory=self.dep_mapper_factory))
+
+        from pymbolic import var
+        for name, binding in zip(names, batch.bindings):
+            self.expr_to_var[binding] = var(name)
+
+        return self.expr_to_var[expr]
+
+    # }}}
+
     # {{{ flux compilation
     def make_flux_batch_assign(self, names, expressions, repr_op):
         from hedge.optemplate.operators import (
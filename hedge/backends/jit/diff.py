@@ -39,10 +39,14 @@ class JitDifferentiator:
 
     # {{{ code generation
     @memoize_method
-    def make_diff(self, elgroup, dtype, shape):
+    def make_diff(self, elgroup, dtype, shape, ensemble_size=None):
         """
         :param shape: If non-square, the resulting code takes two element_ranges
           arguments and supports non-square matrices.
+        :param ensemble_size: If not *None*, the resulting code differentiates
+          an ensemble of this many fields, stored as consecutive volume
+          vectors. Each differentiation matrix entry is then loaded once
+          and applied to all members.
         """
         from hedge._internal import UniformElementRanges
         assert isinstance(elgroup.ranges, UniformElementRanges)
@@ -76,6 +80,7 @@ class JitDifferentiator:
             Define("ROW_COUNT", shape[0]),
             Define("COL_COUNT", shape[1]),
             Define("DIMENSIONS", discr.dimensions),
+            Define("ENSEMBLE_SIZE", ensemble_size or 1),
             Line(),
             Typedef(POD(dtype, "value_type")),
             Typedef(POD(to_uncomplex_dtype(dtype), "uncomplex_type")),
@@ -108,7 +113,7 @@ class JitDifferentiator:
                 Value("numpy_array<%s>::%siterator" % (tpname, const), name+"_it"),
                 "%s.begin()" % name)
 
-        fbody = Block([
+        setup = [
             If("ROW_COUNT != diffmat_rst%d.size1()" % i,
                 S('throw(std::runtime_error("unexpected matrix size"))'))
             for i in range(discr.dimensions)
@@ -131,20 +136,22 @@ class JitDifferentiator:
             for i in range(discr.dimensions)
             ]+[
             Line(),
+            ]
         # }}}
 
         # {{{ computation
-            For("element_number_t eg_el_nr = 0",
-                "eg_el_nr < to_ers.size()",
-                "++eg_el_nr",
-                Block([
-                    Initializer(
-                        Value("node_number_t", "from_el_base"),
-                        "from_ers.start() + eg_el_nr*COL_COUNT"),
-                    Initializer(
-                        Value("node_number_t", "to_el_base"),
-                        "to_ers.start() + eg_el_nr*ROW_COUNT"),
-                    Line(),
+        el_bases = [
+                Initializer(
+                    Value("node_number_t", "from_el_base"),
+                    "from_ers.start() + eg_el_nr*COL_COUNT"),
+                Initializer(
+                    Value("node_number_t", "to_el_base"),
+                    "to_ers.start() + eg_el_nr*ROW_COUNT"),
+                Line(),
+                ]
+
+        if ensemble_size is None:
+            el_loop_body = el_bases + [
                     For("unsigned i = 0",
                         "i < ROW_COUNT",
                         "++i",
@@ -171,7 +178,80 @@ class JitDifferentiator:
                             for rst in range(discr.dimensions)
                             ])
                         )
-                    ])
+                    ]
+        else:
+            # Ensemble members are consecutive volume vectors. The member
+            # loop is innermost so that each matrix entry is reused for
+            # all members while it sits in a register.
+            setup.extend([
+                Initializer(Const(Value("node_number_t", "from_stride")),
+                    "field.size() / ENSEMBLE_SIZE"),
+                Initializer(Const(Value("node_number_t", "to_stride")),
+                    "result0.size() / ENSEMBLE_SIZE"),
+                Line(),
+                ])
+
+            el_loop_body = el_bases + [
+                    For("unsigned i = 0",
+                        "i < ROW_COUNT",
+                        "++i",
+                        Block([
+                            Value("value_type",
+                                "drst_%d[ENSEMBLE_SIZE]" % rst)
+                            for rst in range(discr.dimensions)
+                            ]+[
+                            For("unsigned b = 0",
+                                "b < ENSEMBLE_SIZE",
+                                "++b",
+                                Block([
+                                    Assign("drst_%d[b]" % rst, 0)
+                                    for rst in range(discr.dimensions)
+                                    ])),
+                            Line(),
+                            For("unsigned j = 0",
+                                "j < COL_COUNT",
+                                "++j",
+                                Block([
+                                    Initializer(
+                                        Const(Value("uncomplex_type",
+                                            "dmat_%d" % rst)),
+                                        "diffmat_rst%d(i, j)" % rst)
+                                    for rst in range(discr.dimensions)
+                                    ]+[
+                                    Line(),
+                                    For("unsigned b = 0",
+                                        "b < ENSEMBLE_SIZE",
+                                        "++b",
+                                        Block([
+                                            Initializer(
+                                                Const(Value("value_type", "fld")),
+                                                "field_it[b*from_stride"
+                                                "+from_el_base+j]")
+                                            ]+[
+                                            S("drst_%(rst)d[b] += dmat_%(rst)d*fld"
+                                                % {"rst": rst})
+                                            for rst in range(discr.dimensions)
+                                            ]))
+                                    ])
+                                ),
+                            Line(),
+                            For("unsigned b = 0",
+                                "b < ENSEMBLE_SIZE",
+                                "++b",
+                                Block([
+                                    Assign("result%d_it[b*to_stride+to_el_base+i]"
+                                        % rst, "drst_%d[b]" % rst)
+                                    for rst in range(discr.dimensions)
+                                    ]))
+                            ])
+                        )
+                    ]
+
+        fbody = Block(setup + [
+            For("element_number_t eg_el_nr = 0",
+                "eg_el_nr < to_ers.size()",
+                "++eg_el_nr",
+                Block(el_loop_body)
                 )
             ])
         # }}}
@@ -191,14 +271,20 @@ class JitDifferentiator:
             compiled_func = time_count_flop(compiled_func,
                     discr.diff_timer, discr.diff_counter,
                     discr.diff_flop_counter,
-                    flops=discr.dimensions*(
+                    flops=(ensemble_size or 1)*discr.dimensions*(
                         2 # mul+add
                         * ldis.node_count() * len(elgroup.members)
                         * ldis.node_count()
                         +
                         2 * discr.dimensions
                         * len(elgroup.members) * ldis.node_count()),
-                    increment=discr.dimensions)
+                    increment=discr.dimensions,
+                    byte_counter=discr.diff_byte_counter,
+                    # read the operand, write one result per axis
+                    byte_count=(ensemble_size or 1)
+                    * numpy.dtype(discr.default_scalar_type).itemsize
+                    * len(elgroup.members) * ldis.node_count()
+                    * (1 + discr.dimensions))
 
         return compiled_func
         # }}}
@@ -209,7 +295,15 @@ class JitDifferentiator:
         # pick a "representative operator"
         rep_op = operators[0]
 
-        result = [self.discr.volume_zeros(dtype=field.dtype) 
+        from hedge.tools.ensemble import EnsembleVector
+        if isinstance(field, EnsembleVector):
+            ensemble_size = field.shape[0]
+            shape = (ensemble_size,)
+        else:
+            ensemble_size = None
+            shape = ()
+
+        result = [self.discr.volume_zeros(shape, dtype=field.dtype)
                 for i in range(self.discr.dimensions)]
         from hedge.tools import is_zero
         if not is_zero(field):
@@ -222,9 +316,12 @@ class JitDifferentiator:
                         + result)
 
                 diff_routine = self.make_diff(eg, field.dtype,
-                        matrices[0].shape)
+                        matrices[0].shape, ensemble_size)
                 diff_routine(*args)
 
+        if ensemble_size is not None:
+            result = [r.view(EnsembleVector) for r in result]
+
         return [result[op.rst_axis] for op in operators]
     # }}}
 
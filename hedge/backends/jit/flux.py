@@ -68,25 +68,26 @@ class FluxToCodeMapper(CCodeMapper):
         CCodeMapper.__init__(self, repr, reverse=False)
 
     def map_normal(self, expr, enclosing_prec):
-        return "uncomplex_type(fp.int_side.normal[%d])" % (expr.axis)
+        return "uncomplex_type(normals_it[%d*args.face_pair_count+f])" % (
+                expr.axis)
 
     def map_element_jacobian(self, expr, enclosing_prec):
         if expr.is_interior:
-            return "uncomplex_type(fp.int_side.element_jacobian)"
+            return "uncomplex_type(int_element_jacobians_it[f])"
         else:
-            return "uncomplex_type(fp.ext_side.element_jacobian)"
+            return "uncomplex_type(ext_element_jacobians_it[f])"
 
     def map_face_jacobian(self, expr, enclosing_prec):
-        return "uncomplex_type(fp.int_side.face_jacobian)"
+        return "uncomplex_type(face_jacobians_it[f])"
 
     def map_element_order(self, expr, enclosing_prec):
         if expr.is_interior:
-            return "uncomplex_type(fp.int_side.order)"
+            return "uncomplex_type(int_orders_it[f])"
         else:
-            return "uncomplex_type(fp.ext_side.order)"
+            return "uncomplex_type(ext_orders_it[f])"
 
     def map_local_mesh_size(self, expr, enclosing_prec):
-        return "uncomplex_type(fp.int_side.h)"
+        return "uncomplex_type(h_it[f])"
 
     def map_function_symbol(self, expr, enclosing_prec):
         from hedge.flux import FluxFunctionSymbol, \
@@ -233,25 +234,74 @@ def get_flux_toolchain(discr, fluxes):
 
 
 
+# face data -------------------------------------------------------------------
+FACE_INDEX_ARRAYS = ["int_gather", "ext_gather", "int_write", "ext_write"]
+FACE_FLOAT_ARRAYS = ["normals", "face_jacobians",
+        "int_element_jacobians", "ext_element_jacobians",
+        "int_orders", "ext_orders", "h"]
+
+
+
+
+def get_face_data_fields():
+    """Return :mod:`cgen` declarations of the argument structure members
+    holding the face data of
+    :meth:`hedge.discretization.data.StraightFaceGroup.get_flat_face_data`.
+    """
+    from cgen import Value
+    return ([Value("numpy_array<npy_uint>", name)
+        for name in FACE_INDEX_ARRAYS]
+        + [Value("numpy_array<double>", name)
+            for name in FACE_FLOAT_ARRAYS]
+        + [Value("unsigned", "face_pair_count"),
+            Value("unsigned", "face_length")])
+
+
+
+
+def get_face_data_iterators():
+    from cgen import Initializer, Const, Value
+    return ([Initializer(
+        Const(Value("numpy_array<npy_uint>::const_iterator", "%s_it" % name)),
+        "args.%s.begin()" % name)
+        for name in FACE_INDEX_ARRAYS]
+        + [Initializer(
+            Const(Value("numpy_array<double>::const_iterator", "%s_it" % name)),
+            "args.%s.begin()" % name)
+            for name in FACE_FLOAT_ARRAYS])
+
+
+
+
+def set_face_data_args(arg_struct, fg):
+    """Store the face data of the face group *fg* in the argument
+    structure *arg_struct* of a flux gather module.
+    """
+    face_data = fg.get_flat_face_data()
+    for name in (FACE_INDEX_ARRAYS + FACE_FLOAT_ARRAYS
+            + ["face_pair_count", "face_length"]):
+        setattr(arg_struct, name, getattr(face_data, name))
+
+
+
+
 def get_interior_flux_mod(fluxes, fvi, discr, dtype):
     from cgen import \
             FunctionDeclaration, FunctionBody, \
             Const, Reference, Value, MaybeUnused, Typedef, POD, \
             Statement, Include, Line, Block, Initializer, Assign, \
-            CustomLoop, For, Struct
+            For, Struct
 
     from codepy.bpl import BoostPythonModule
     mod = BoostPythonModule()
 
-    from pytools import to_uncomplex_dtype, flatten
+    from pytools import to_uncomplex_dtype
 
     S = Statement
     mod.add_to_preamble([
         Include("cstdlib"),
         Include("algorithm"),
         Line(),
-        Include("boost/foreach.hpp"),
-        Line(),
         Include("hedge/face_operators.hpp"),
         ])
 
@@ -274,17 +324,14 @@ def get_interior_flux_mod(fluxes, fvi, discr, dtype):
         Value("value_type" if scalar_par.is_complex else "uncomplex_type",
             "_scalar_arg_%d" % i)
         for i, scalar_par in enumerate(fvi.scalar_parameters)
-        ])
+        ]+get_face_data_fields())
 
     mod.add_struct(arg_struct, "ArgStruct")
     mod.add_to_module([Line()])
 
     fdecl = FunctionDeclaration(
             Value("void", "gather_flux"),
-            [
-                Const(Reference(Value("face_group<face_pair<straight_face> >", "fg"))),
-                Reference(Value("arg_struct", "args"))
-                ])
+            [Reference(Value("arg_struct", "args"))])
 
     from pymbolic.mapper.stringifier import PREC_PRODUCT
 
@@ -292,13 +339,13 @@ def get_interior_flux_mod(fluxes, fvi, discr, dtype):
         f2cm = FluxToCodeMapper()
 
         result = [
-                Assign("fof%d_it[%s_fof_base+%s]" % (flux_idx, where, tgt_idx),
-                    "uncomplex_type(fp.int_side.face_jacobian) * " +
+                Assign("fof%d_it[%s_write_it[k]]" % (flux_idx, where),
+                    "uncomplex_type(face_jacobians_it[f]) * " +
                     flux_to_code(f2cm, is_flipped, flux_idx, fvi, flux.op.flux, PREC_PRODUCT))
                 for flux_idx, flux in enumerate(fluxes)
-                for where, is_flipped, tgt_idx in [
-                    ("int_side", False, "i"),
-                    ("ext_side", True, "ext_native_write_map[i]")
+                for where, is_flipped in [
+                    ("int", False),
+                    ("ext", True)
                     ]]
 
         return [
@@ -317,36 +364,25 @@ def get_interior_flux_mod(fluxes, fvi, discr, dtype):
         for arg_name in fvi.arg_names
         ]+[
         Line(),
-        CustomLoop("BOOST_FOREACH(const face_pair<straight_face> &fp, fg.face_pairs)", Block(
-            list(flatten([
-            Initializer(Value("node_number_t", "%s_ebi" % where),
-                "fp.%s.el_base_index" % where),
-            Initializer(Value("index_lists_t::const_iterator", "%s_idx_list" % where),
-                "fg.index_list(fp.%s.face_index_list_number)" % where),
-            Initializer(Value("node_number_t", "%s_fof_base" % where),
-                "fg.face_length()*(fp.%(where)s.local_el_number*fg.face_count"
-                " + fp.%(where)s.face_id)" % {"where": where}),
-            Line(),
-            ]
-            for where in ["int_side", "ext_side"]
-            ))+[
-            Initializer(Value("index_lists_t::const_iterator", "ext_native_write_map"),
-                "fg.index_list(fp.ext_native_write_map)"),
-            Line(),
+        ]+get_face_data_iterators()+[
+        Line(),
+        For(
+            "unsigned f = 0",
+            "f < args.face_pair_count",
+            "++f",
             For(
-                "unsigned i = 0",
-                "i < fg.face_length()",
-                "++i",
+                "unsigned k = f*args.face_length",
+                "k < (f+1)*args.face_length",
+                "++k",
                 Block(
                     [
-                    Initializer(MaybeUnused(Value("node_number_t", "%s_idx" % where)),
-                        "%(where)s_ebi + %(where)s_idx_list[i]"
-                        % {"where": where})
-                    for where in ["int_side", "ext_side"]
+                    Initializer(MaybeUnused(Value("node_number_t", "%s_side_idx" % where)),
+                        "%s_gather_it[k]" % where)
+                    for where in ["int", "ext"]
                     ]+gen_flux_code()
                     )
                 )
-            ]))
+            )
         ])
     mod.add_function(FunctionBody(fdecl, fbody))
 
@@ -364,9 +400,9 @@ def get_boundary_flux_mod(fluxes, fvi, discr, dtype):
             FunctionDeclaration, FunctionBody, Typedef, Struct, \
             Const, Reference, Value, POD, MaybeUnused, \
             Statement, Include, Line, Block, Initializer, Assign, \
-            CustomLoop, For
+            For
 
-    from pytools import to_uncomplex_dtype, flatten
+    from pytools import to_uncomplex_dtype
 
     from codepy.bpl import BoostPythonModule
     mod = BoostPythonModule()
@@ -375,8 +411,6 @@ def get_boundary_flux_mod(fluxes, fvi, discr, dtype):
         Include("cstdlib"),
         Include("algorithm"),
         Line(),
-        Include("boost/foreach.hpp"),
-        Line(),
         Include("hedge/face_operators.hpp"),
         ])
 
@@ -395,17 +429,14 @@ def get_boundary_flux_mod(fluxes, fvi, discr, dtype):
         ]+[
         Value("numpy_array<value_type>", arg_name)
         for arg_name in fvi.arg_names
-        ])
+        ]+get_face_data_fields())
 
     mod.add_struct(arg_struct, "ArgStruct")
     mod.add_to_module([Line()])
 
     fdecl = FunctionDeclaration(
                 Value("void", "gather_flux"),
-                [
-                    Const(Reference(Value("face_group<face_pair<straight_face> >" , "fg"))),
-                    Reference(Value("arg_struct", "args"))
-                    ])
+                [Reference(Value("arg_struct", "args"))])
 
     from pymbolic.mapper.stringifier import PREC_PRODUCT
 
@@ -413,8 +444,8 @@ def get_boundary_flux_mod(fluxes, fvi, discr, dtype):
         f2cm = FluxToCodeMapper()
 
         result = [
-                Assign("fof%d_it[loc_fof_base+i]" % flux_idx,
-                    "uncomplex_type(fp.int_side.face_jacobian) * " +
+                Assign("fof%d_it[int_write_it[k]]" % flux_idx,
+                    "uncomplex_type(face_jacobians_it[f]) * " +
                     flux_to_code(f2cm, False, flux_idx, fvi, flux.op.flux, PREC_PRODUCT))
                 for flux_idx, flux in enumerate(fluxes)
                 ]
@@ -436,36 +467,26 @@ def get_boundary_flux_mod(fluxes, fvi, discr, dtype):
         for arg_name in fvi.arg_names
         ]+[
         Line(),
-        CustomLoop("BOOST_FOREACH(const face_pair<straight_face> &fp, fg.face_pairs)", Block(
-            list(flatten([
-            Initializer(Value("node_number_t", "%s_ebi" % where),
-                "fp.%s.el_base_index" % where),
-            Initializer(Value("index_lists_t::const_iterator", "%s_idx_list" % where),
-                "fg.index_list(fp.%s.face_index_list_number)" % where),
-            Line(),
-            ]
-            for where in ["int_side", "ext_side"]
-            ))+[
-            Line(),
-            Initializer(Value("node_number_t", "loc_fof_base"),
-                "fg.face_length()*(fp.%(where)s.local_el_number*fg.face_count"
-                " + fp.%(where)s.face_id)" % {"where": "int_side"}),
-            Line(),
+        ]+get_face_data_iterators()+[
+        Line(),
+        For(
+            "unsigned f = 0",
+            "f < args.face_pair_count",
+            "++f",
             For(
-                "unsigned i = 0",
-                "i < fg.face_length()",
-                "++i",
+                "unsigned k = f*args.face_length",
+                "k < (f+1)*args.face_length",
+                "++k",
                 Block(
                     [
                     Initializer(MaybeUnused(
-                        Value("node_number_t", "%s_idx" % where)),
-                        "%(where)s_ebi + %(where)s_idx_list[i]"
-                        % {"where": where})
-                    for where in ["int_side", "ext_side"]
+                        Value("node_number_t", "%s_side_idx" % where)),
+                        "%s_gather_it[k]" % where)
+                    for where in ["int", "ext"]
                     ]+gen_flux_code()
                     )
                 )
-            ]))
+            )
         ])
 
     mod.add_function(FunctionBody(fdecl, fbody))
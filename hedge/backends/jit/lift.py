@@ -37,7 +37,13 @@ class JitLifter:
         self.discr = discr
 
     @memoize_method
-    def make_lift(self, fgroup, with_scale, dtype):
+    def make_lift(self, fgroup, with_scale, dtype, ensemble_size=None):
+        """
+        :param ensemble_size: If not *None*, the resulting code lifts the
+          fluxes of an ensemble of this many fields, stored as consecutive
+          face and volume vectors. Each lifting matrix entry is then loaded
+          once and applied to all members.
+        """
         discr = self.discr
         from cgen import (
                 FunctionDeclaration, FunctionBody, Typedef,
@@ -66,6 +72,7 @@ class JitLifter:
             Define("DOFS_PER_EL", fgroup.ldis_loc.node_count()),
             Define("FACES_PER_EL", fgroup.ldis_loc.face_count()),
             Define("DIMENSIONS", discr.dimensions),
+            Define("ENSEMBLE_SIZE", ensemble_size or 1),
             Line(),
             Typedef(POD(dtype, "value_type")),
             Typedef(POD(to_uncomplex_dtype(dtype), "uncomplex_type")),
@@ -102,22 +109,19 @@ class JitLifter:
                 Value("numpy_array<%s>::%siterator" % (tpname, const), name+"_it"),
                 "%s.begin()" % name)
 
-        fbody = Block([
-            make_it("field"),
-            make_it("result", is_const=False),
-            ]+if_(with_scale, make_it("elwise_post_scaling", tpname="double"))+[
-            Line(),
-            For("unsigned fg_el_nr = 0",
-                "fg_el_nr < fg.element_count()",
-                "++fg_el_nr",
-                Block([
-                    Initializer(
-                        Value("node_number_t", "dest_el_base"),
-                        "fg.local_el_write_base[fg_el_nr]"),
-                    Initializer(
-                        Value("node_number_t", "src_el_base"),
-                        "FACES_PER_EL*fg.face_length()*fg_el_nr"),
-                    Line(),
+        el_bases = [
+                Initializer(
+                    Value("node_number_t", "dest_el_base"),
+                    "fg.local_el_write_base[fg_el_nr]"),
+                Initializer(
+                    Value("node_number_t", "src_el_base"),
+                    "FACES_PER_EL*fg.face_length()*fg_el_nr"),
+                Line(),
+                ]
+
+        if ensemble_size is None:
+            strides = []
+            el_loop_body = el_bases + [
                     For("unsigned i = 0",
                         "i < DOFS_PER_EL",
                         "++i",
@@ -136,8 +140,69 @@ class JitLifter:
                                 Assign("result_it[dest_el_base+i]", "tmp"))
                             )
                         ),
-                    ]+if_(with_scale, S("elwise_post_scaling_it++"))
-                    )
+                    ]
+        else:
+            # Ensemble members are consecutive face/volume vectors. The
+            # member loop is innermost so that each matrix entry is reused
+            # for all members while it sits in a register.
+            strides = [
+                Initializer(Const(Value("node_number_t", "src_stride")),
+                    "field.size() / ENSEMBLE_SIZE"),
+                Initializer(Const(Value("node_number_t", "dest_stride")),
+                    "result.size() / ENSEMBLE_SIZE"),
+                Line(),
+                ]
+
+            el_loop_body = el_bases + [
+                    For("unsigned i = 0",
+                        "i < DOFS_PER_EL",
+                        "++i",
+                        Block([
+                            Value("value_type", "tmp[ENSEMBLE_SIZE]"),
+                            For("unsigned b = 0",
+                                "b < ENSEMBLE_SIZE",
+                                "++b",
+                                Assign("tmp[b]", 0)),
+                            Line(),
+                            For("unsigned j = 0",
+                                "j < FACES_PER_EL*fg.face_length()",
+                                "++j",
+                                Block([
+                                    Initializer(
+                                        Const(Value("uncomplex_type", "mat_ij")),
+                                        "matrix(i, j)"),
+                                    For("unsigned b = 0",
+                                        "b < ENSEMBLE_SIZE",
+                                        "++b",
+                                        S("tmp[b] += mat_ij"
+                                            "*field_it[b*src_stride+src_el_base+j]")
+                                        )
+                                    ])
+                                ),
+                            Line(),
+                            For("unsigned b = 0",
+                                "b < ENSEMBLE_SIZE",
+                                "++b",
+                                if_(with_scale,
+                                    Assign("result_it[b*dest_stride+dest_el_base+i]",
+                                        "tmp[b] * value_type(*elwise_post_scaling_it)"),
+                                    Assign("result_it[b*dest_stride+dest_el_base+i]",
+                                        "tmp[b]"))[0])
+                            ])
+                        ),
+                    ]
+
+        fbody = Block([
+            make_it("field"),
+            make_it("result", is_const=False),
+            ]+if_(with_scale, make_it("elwise_post_scaling", tpname="double"))+[
+            Line(),
+            ]+strides+[
+            For("unsigned fg_el_nr = 0",
+                "fg_el_nr < fg.element_count()",
+                "++fg_el_nr",
+                Block(el_loop_body
+                    +if_(with_scale, S("elwise_post_scaling_it++")))
                 )
             ])
 
@@ -159,6 +224,13 @@ class JitLifter:
         if scaling is not None:
             args.append(scaling)
 
+        from hedge.tools.ensemble import EnsembleVector
+        if isinstance(field, EnsembleVector):
+            ensemble_size = field.shape[0]
+        else:
+            ensemble_size = None
+
         self.make_lift(fgroup, 
                 with_scale=scaling is not None, 
-                dtype=field.dtype)(*args)
+                dtype=field.dtype,
+                ensemble_size=ensemble_size)(*args)
@@ -0,0 +1,353 @@
+"""Fused quadrature kernels for the JIT backend."""
+
+from __future__ import division
+
+__copyright__ = "Copyright (C) 2026 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+
+
+
+import numpy
+
+
+
+
+# {{{ test matrices
+
+def get_test_matrix(op, eg):
+    """Return the matrix that maps quadrature-grid data to the result of
+    *op* on one element of the element group *eg*.
+    """
+    from hedge.optemplate.operators import (
+            ReferenceQuadratureStiffnessTOperator,
+            ReferenceQuadratureMassOperator)
+
+    if isinstance(op, ReferenceQuadratureStiffnessTOperator):
+        return op.matrices(eg)[op.rst_axis]
+    elif isinstance(op, ReferenceQuadratureMassOperator):
+        return eg.quadrature_info[op.quadrature_tag] \
+                .ldis_quad_info.mass_matrix()
+    else:
+        raise TypeError("unsupported quadrature kernel operator: %s" % op)
+
+
+
+
+def get_distinct_operators(insn):
+    """Return a list of the distinct operators of the
+    :class:`hedge.backends.jit.compiler.QuadratureKernelAssign` *insn* and,
+    for each of its outputs, the index of its operator in that list.
+    """
+    operators = []
+    op_indices = []
+    for op in insn.operators:
+        try:
+            op_idx = operators.index(op)
+        except ValueError:
+            op_idx = len(operators)
+            operators.append(op)
+
+        op_indices.append(op_idx)
+
+    return operators, op_indices
+
+# }}}
+
+
+
+
+# {{{ code generation
+
+def _get_upsamplers(field):
+    from hedge.optemplate.operators import QuadratureGridUpsampler
+    from hedge.optemplate.mappers import BoundOperatorCollector
+    return BoundOperatorCollector(QuadratureGridUpsampler)(field)
+
+
+
+
+def make_quadrature_kernel(insn, discr, eg, dtype):
+    """Generate and compile a module whose *apply* function evaluates the
+    :class:`hedge.backends.jit.compiler.QuadratureKernelAssign` *insn* on
+    the element group *eg*.
+
+    For each element, the inputs are interpolated to the quadrature nodes,
+    where the pointwise expressions are evaluated into an element-local
+    buffer, to which the test matrices of the operators are then applied.
+    Quadrature-grid data thus never leaves the element being processed.
+    """
+    from cgen import (
+            FunctionDeclaration, FunctionBody, Typedef, Struct,
+            Const, Reference, Value, POD,
+            Statement, Include, Line, Block, Initializer, Assign,
+            For, Define)
+    from pytools import to_uncomplex_dtype
+
+    from codepy.bpl import BoostPythonModule
+    mod = BoostPythonModule()
+
+    ldis_quad_info = eg.quadrature_info[insn.quadrature_tag].ldis_quad_info
+    geometric_factors, scalar_parameters = insn.get_leaves()
+    operators, op_indices = get_distinct_operators(insn)
+
+    # {{{ preamble
+    S = Statement
+    mod.add_to_preamble([
+        Include("hedge/volume_operators.hpp"),
+        ])
+
+    mod.add_to_module([
+        S("using namespace hedge"),
+        S("using namespace pyublas"),
+        Line(),
+        Define("VOL_NODES", eg.local_discretization.node_count()),
+        Define("QUAD_NODES", ldis_quad_info.node_count()),
+        Define("FIELD_COUNT", len(insn.fields)),
+        Line(),
+        Typedef(POD(dtype, "value_type")),
+        Typedef(POD(to_uncomplex_dtype(dtype), "uncomplex_type")),
+        Line(),
+        ])
+
+    arg_struct = Struct("arg_struct", [
+        Value("numpy_array<value_type>", "input%d" % i)
+        for i in range(len(insn.inputs))
+        ]+[
+        Value("numpy_array<uncomplex_type>", "geo%d" % i)
+        for i in range(len(geometric_factors))
+        ]+[
+        Value("value_type", "scalar%d" % i)
+        for i in range(len(scalar_parameters))
+        ]+[
+        Value("numpy_array<value_type>", "result%d" % i)
+        for i in range(len(insn.names))
+        ]+[
+        Value("numpy_array<uncomplex_type>", "interp_matrix"),
+        ]+[
+        Value("numpy_array<uncomplex_type>", "test_matrix%d" % i)
+        for i in range(len(operators))
+        ]+[
+        Value("node_number_t", "vol_start"),
+        Value("node_number_t", "quad_start"),
+        Value("element_number_t", "element_count"),
+        ])
+
+    mod.add_struct(arg_struct, "ArgStruct")
+    mod.add_to_module([Line()])
+
+    fdecl = FunctionDeclaration(
+            Value("void", "apply"),
+            [Reference(Value("arg_struct", "args"))])
+    # }}}
+
+    # {{{ pointwise expressions
+    from pymbolic import var
+    from pymbolic.mapper.stringifier import PREC_NONE
+    from pymbolic.mapper.c_code import CCodeMapper
+    from hedge.backends.vector_expr import DefaultingSubstitutionMapper
+
+    subst_map = dict(
+            [(ups, var("hedge_u%d" % insn.inputs.index(ups.field)))
+                for field in insn.fields
+                for ups in _get_upsamplers(field)]
+            +[(gf, var("hedge_g%d" % i))
+                for i, gf in enumerate(geometric_factors)]
+            +[(sp, var("hedge_s%d" % i))
+                for i, sp in enumerate(scalar_parameters)])
+
+    def subst_func(expr):
+        try:
+            return subst_map[expr]
+        except KeyError:
+            return None
+
+    def real_const_mapper(num):
+        # Make sure we do not generate integers or doubles by accident.
+        r = repr(num)
+        if "." not in r or dtype == numpy.float32:
+            return "uncomplex_type(%s)" % r
+        else:
+            return r
+
+    code_mapper = CCodeMapper(constant_mapper=real_const_mapper,
+            cse_prefix="hedge_cse")
+    subst_mapper = DefaultingSubstitutionMapper(subst_func)
+
+    field_code = [code_mapper(subst_mapper(field), PREC_NONE)
+            for field in insn.fields]
+    # }}}
+
+    # {{{ computation
+    def make_it(name, tpname="value_type", is_const=True):
+        if is_const:
+            const = "const_"
+        else:
+            const = ""
+
+        return Initializer(
+                Value("numpy_array<%s>::%siterator" % (tpname, const),
+                    name+"_it"),
+                "args.%s.begin()" % name)
+
+    setup = ([
+        make_it("input%d" % i) for i in range(len(insn.inputs))
+        ]+[
+        make_it("geo%d" % i, "uncomplex_type")
+        for i in range(len(geometric_factors))
+        ]+[
+        make_it("result%d" % i, is_const=False)
+        for i in range(len(insn.names))
+        ]+[
+        make_it("interp_matrix", "uncomplex_type"),
+        ]+[
+        make_it("test_matrix%d" % i, "uncomplex_type")
+        for i in range(len(operators))
+        ]+[
+        Initializer(Const(Value("value_type", "hedge_s%d" % i)),
+            "args.scalar%d" % i)
+        for i in range(len(scalar_parameters))
+        ]+[Line()])
+
+    # interpolate inputs to one quadrature node, evaluate the pointwise
+    # expressions there
+    quad_node_body = ([
+        Initializer(Value("value_type", "hedge_u%d" % i), 0)
+        for i in range(len(insn.inputs))
+        ]+[
+        For("unsigned j = 0", "j < VOL_NODES", "++j",
+            Block([
+                Initializer(Const(Value("uncomplex_type", "interp")),
+                    "interp_matrix_it[q*VOL_NODES+j]"),
+                ]+[
+                S("hedge_u%d += interp*input%d_it[vol_base+j]" % (i, i))
+                for i in range(len(insn.inputs))
+                ])),
+        Line(),
+        ]+[
+        Initializer(Const(Value("uncomplex_type", "hedge_g%d" % i)),
+            "geo%d_it[quad_base+q]" % i)
+        for i in range(len(geometric_factors))
+        ]+[
+        Initializer(Const(Value("value_type", cse_name)), cse_str)
+        for cse_name, cse_str in code_mapper.cse_name_list
+        ]+[
+        Assign("fields_on_quad[%d][q]" % i, code)
+        for i, code in enumerate(field_code)
+        ])
+
+    # apply the test matrices to the quadrature-grid data of the element
+    vol_node_body = ([
+        Initializer(Value("value_type", "res%d" % i), 0)
+        for i in range(len(insn.names))
+        ]+[
+        For("unsigned q = 0", "q < QUAD_NODES", "++q",
+            Block([
+                S("res%d += test_matrix%d_it[i*QUAD_NODES+q]"
+                    "*fields_on_quad[%d][q]" % (i, op_idx, field_idx))
+                for i, (op_idx, field_idx) in enumerate(
+                    zip(op_indices, insn.field_indices))
+                ])),
+        Line(),
+        ]+[
+        Assign("result%d_it[vol_base+i]" % i, "res%d" % i)
+        for i in range(len(insn.names))
+        ])
+
+    el_loop_body = [
+            Initializer(Const(Value("node_number_t", "vol_base")),
+                "args.vol_start + eg_el_nr*VOL_NODES"),
+            Initializer(Const(Value("node_number_t", "quad_base")),
+                "args.quad_start + eg_el_nr*QUAD_NODES"),
+            Line(),
+            Value("value_type", "fields_on_quad[FIELD_COUNT][QUAD_NODES]"),
+            Line(),
+            For("unsigned q = 0", "q < QUAD_NODES", "++q",
+                Block(quad_node_body)),
+            Line(),
+            For("unsigned i = 0", "i < VOL_NODES", "++i",
+                Block(vol_node_body)),
+            ]
+
+    fbody = Block(setup + [
+        For("element_number_t eg_el_nr = 0",
+            "eg_el_nr < args.element_count",
+            "++eg_el_nr",
+            Block(el_loop_body))
+        ])
+    # }}}
+
+    mod.add_function(FunctionBody(fdecl, fbody))
+
+    #print "----------------------------------------------------------------"
+    #print mod.generate()
+    #raw_input()
+
+    return mod.compile(discr.toolchain)
+
+# }}}
+
+
+
+
+# {{{ invocation
+
+def get_kernel_matrices(insn, eg, dtype):
+    """Return a tuple *(interp_matrix, test_matrices)* of the flattened
+    matrices taken by a kernel made by :func:`make_quadrature_kernel`.
+    """
+    from pytools import to_uncomplex_dtype
+    uncomplex_dtype = to_uncomplex_dtype(dtype)
+
+    def flatten_matrix(matrix):
+        return numpy.ascontiguousarray(matrix, dtype=uncomplex_dtype).ravel()
+
+    operators, op_indices = get_distinct_operators(insn)
+    return (
+            flatten_matrix(eg.quadrature_info[insn.quadrature_tag]
+                .ldis_quad_info.volume_up_interpolation_matrix()),
+            [flatten_matrix(get_test_matrix(op, eg)) for op in operators])
+
+
+
+
+def set_element_group_args(arg_struct, insn, eg, dtype):
+    """Set the matrix and element range members of the argument structure
+    *arg_struct* of a kernel made by :func:`make_quadrature_kernel`.
+    """
+    interp_matrix, test_matrices = insn.get_kernel_matrices(eg, dtype)
+
+    arg_struct.interp_matrix = interp_matrix
+    for i, test_matrix in enumerate(test_matrices):
+        setattr(arg_struct, "test_matrix%d" % i, test_matrix)
+
+    arg_struct.vol_start = eg.ranges.start
+    arg_struct.quad_start = eg.quadrature_info[insn.quadrature_tag] \
+            .ranges.start
+    arg_struct.element_count = len(eg.ranges)
+
+# }}}
+
+
+
+
+# vim: foldmethod=marker
@@ -59,6 +59,11 @@ class RankData(pytools.Record):
     def reordered_by(self, *args, **kwargs):
         old_el_numbers = self.mesh.get_reorder_oldnumbers(*args, **kwargs)
         mesh = self.mesh.reordered(old_el_numbers)
+
+        if self.old_el_numbers is not None:
+            # compose with the previous reordering
+            old_el_numbers = [self.old_el_numbers[i] for i in old_el_numbers]
+
         return self.copy(
                 mesh=mesh,
                 old_el_numbers=old_el_numbers
@@ -232,6 +237,21 @@ class ReceiveCompletionFuture(MPICompletionFuture):
 
 
 
+class AllreduceCompletionFuture(MPICompletionFuture):
+    def __init__(self, comm, local_values):
+        self.local_values = local_values
+        self.reduced_values = numpy.empty_like(local_values)
+
+        MPICompletionFuture.__init__(self,
+                comm.Iallreduce(local_values, self.reduced_values,
+                    op=mpi.SUM))
+
+    def finish(self, status):
+        return self.reduced_values
+
+
+
+
 class BoundaryConvertFuture(Future):
     def __init__(self, pdiscr, rank, indices_and_names, recv_vec):
         self.pdiscr = pdiscr
@@ -362,6 +382,12 @@ class ParallelDiscretization(hedge.discretization.TimestepCalculator):
         kwargs["debug"] = debug - self.debug
         kwargs["run_context"] = rcon
 
+        # Reorder here rather than in the subdiscretization, so that
+        # global2local_elements below refers to the reordered mesh.
+        mesh_reordering = kwargs.pop("mesh_reordering", None)
+        if mesh_reordering is not None:
+            rank_data = rank_data.reordered_by(mesh_reordering)
+
         self.subdiscr = subdiscr_class(rank_data.mesh, *args, **kwargs)
         self.subdiscr.exec_mapper_class = make_custom_exec_mapper_class(
                 self.subdiscr.exec_mapper_class)
@@ -605,6 +631,24 @@ class ParallelDiscretization(hedge.discretization.TimestepCalculator):
         return self.context.communicator.allreduce(
                 self.subdiscr.nodewise_inner_product(a, b))
 
+    def nodewise_dot_products_async(self, pairs):
+        local_values = numpy.array([
+            self.subdiscr.nodewise_dot_product(a, b)
+            for a, b in pairs])
+
+        comm = self.context.communicator
+        if not hasattr(comm, "Iallreduce"):
+            # MPI < 3: no non-blocking collectives
+            from hedge.tools.futures import ImmediateFuture
+            return ImmediateFuture(comm.allreduce(local_values))
+
+        return AllreduceCompletionFuture(comm, local_values)
+
+    def integrals_async(self, volume_vectors):
+        integral_projection = self.subdiscr._mass_integral_projection()
+        return self.nodewise_dot_products_async(
+                [(integral_projection, vec) for vec in volume_vectors])
+
     def norm(self, volume_vector, p=2):
         def add_norms(x, y):
             return (x**p + y**p)**(1/p)
@@ -629,11 +673,21 @@ class ParallelDiscretization(hedge.discretization.TimestepCalculator):
                 op=mpi.MIN)
 
     # compilation -------------------------------------------------------------
+    @pytools.memoize_method
+    def _get_flux_communication_post_bind_mapper(self, post_bind_mapper):
+        # memoized, so that the executor cache of the subdiscretization
+        # recognizes repeated compilations of the same optemplate
+        def mpi_post_bind_mapper(optemplate):
+            fci = FluxCommunicationInserter(self.neighbor_ranks)
+            return fci(post_bind_mapper(optemplate))
+
+        return mpi_post_bind_mapper
+
     def compile(self, optemplate, post_bind_mapper=lambda x:x, type_hints={} ):
-        fci = FluxCommunicationInserter(self.neighbor_ranks)
         return self.subdiscr.compile(
                 optemplate,
-                post_bind_mapper=lambda x: fci(post_bind_mapper(x)),
+                post_bind_mapper=self._get_flux_communication_post_bind_mapper(
+                    post_bind_mapper),
                 type_hints=type_hints)
 
 
@@ -57,6 +57,7 @@ class DefaultingSubstitutionMapper(
 
     map_forward_metric_derivative = map_jacobian
     map_inverse_metric_derivative = map_jacobian
+    map_node_coordinate_component = map_jacobian
 
     def map_scalar_parameter(self, expr):
         return pymbolic.mapper.substitutor.SubstitutionMapper.map_variable(
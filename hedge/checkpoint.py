@@ -0,0 +1,366 @@
+"""Checkpointing and restarting of simulations."""
+
+from __future__ import division
+
+__copyright__ = "Copyright (C) 2026 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+
+
+
+import os
+import numpy
+from pytools import Record
+
+
+
+
+# A checkpoint is a directory holding, for each rank,
+#
+# - rank-<rank>.bin: the raw contents of all numerical arrays in the state,
+#   each aligned to ARRAY_ALIGNMENT bytes,
+# - rank-<rank>.pickle: everything else, with arrays replaced by
+#   references into the .bin file. This is written last, so that its
+#   presence marks a complete checkpoint.
+#
+# Both files are written under a temporary name and renamed into place, so
+# that a process that has mapped the .bin file of an earlier checkpoint
+# keeps seeing it intact.
+
+FORMAT_VERSION = 1
+ARRAY_ALIGNMENT = 64
+
+
+
+
+# {{{ packing of arrays
+
+class _ArrayReference(object):
+    def __init__(self, number):
+        self.number = number
+
+
+
+
+class _ObjectArray(object):
+    def __init__(self, shape, entries):
+        self.shape = shape
+        self.entries = entries
+
+
+
+
+def _pack(value, arrays):
+    """Return a copy of *value* with all numerical arrays replaced by
+    :class:`_ArrayReference` instances into *arrays*, to which they are
+    appended. Lists, tuples, dictionaries and object arrays are traversed.
+    """
+    if isinstance(value, numpy.ndarray):
+        if value.dtype == object:
+            return _ObjectArray(value.shape,
+                    [_pack(entry, arrays) for entry in value.flat])
+        else:
+            arrays.append(value)
+            return _ArrayReference(len(arrays)-1)
+    elif isinstance(value, list):
+        return [_pack(entry, arrays) for entry in value]
+    elif isinstance(value, tuple):
+        return tuple(_pack(entry, arrays) for entry in value)
+    elif isinstance(value, dict):
+        return dict((key, _pack(entry, arrays))
+                for key, entry in value.iteritems())
+    else:
+        return value
+
+
+
+
+def _unpack(value, arrays):
+    if isinstance(value, _ArrayReference):
+        return arrays[value.number]
+    elif isinstance(value, _ObjectArray):
+        result = numpy.empty(len(value.entries), dtype=object)
+        for i, entry in enumerate(value.entries):
+            result[i] = _unpack(entry, arrays)
+        return result.reshape(value.shape)
+    elif isinstance(value, list):
+        return [_unpack(entry, arrays) for entry in value]
+    elif isinstance(value, tuple):
+        return tuple(_unpack(entry, arrays) for entry in value)
+    elif isinstance(value, dict):
+        return dict((key, _unpack(entry, arrays))
+                for key, entry in value.iteritems())
+    else:
+        return value
+
+# }}}
+
+
+
+
+# {{{ log manager state
+
+# attributes of log quantities that carry over from one tick to the next,
+# such as the step number of :class:`pytools.log.TimestepCounter` and the
+# time of :class:`pytools.log.SimulationTime`
+_LOG_QUANTITY_STATE_ATTRIBUTES = ["steps", "t", "dt"]
+
+
+
+
+def _get_log_quantities(logmgr):
+    result = {}
+    for gd in logmgr.before_gather_descriptors + logmgr.after_gather_descriptors:
+        quantity = gd.quantity
+        try:
+            name = quantity.name
+        except AttributeError:
+            name = tuple(quantity.names)
+
+        result[name] = quantity
+
+    return result
+
+
+
+
+def _get_logmgr_state(logmgr):
+    quantity_states = {}
+    for name, quantity in _get_log_quantities(logmgr).iteritems():
+        state = dict((attr, getattr(quantity, attr))
+                for attr in _LOG_QUANTITY_STATE_ATTRIBUTES
+                if hasattr(quantity, attr))
+        if state:
+            quantity_states[name] = state
+
+    return dict(tick_count=logmgr.tick_count, quantities=quantity_states)
+
+
+
+
+def _set_logmgr_state(logmgr, state):
+    logmgr.tick_count = state["tick_count"]
+
+    quantities = _get_log_quantities(logmgr)
+    for name, quantity_state in state["quantities"].iteritems():
+        if name in quantities:
+            for attr, value in quantity_state.iteritems():
+                setattr(quantities[name], attr, value)
+
+# }}}
+
+
+
+
+def _get_rank_pathname(pathname, rank, suffix):
+    return os.path.join(pathname, "rank-%05d.%s" % (rank, suffix))
+
+
+
+
+def _get_rank_info(rcon):
+    if rcon is None:
+        return 0, 1
+    else:
+        return rcon.rank, len(rcon.ranks)
+
+
+
+
+def write_checkpoint(pathname, fields, t, step, stepper=None, logmgr=None,
+        mesh_data=None, extra=None, rcon=None):
+    """Write the state of a simulation to the directory *pathname*, to be
+    restored by :func:`read_checkpoint`.
+
+    Each rank writes its own files and should call this function with the
+    state of its part of the simulation.
+
+    :param fields: a volume vector, an object array of them, or any
+      nesting of lists, tuples and dictionaries of those.
+    :param stepper: a :class:`hedge.timestep.base.TimeStepper`, whose
+      history of right-hand sides and other state is saved.
+    :param logmgr: a :class:`pytools.log.LogManager`, whose tick count and
+      the state of its time step counter and simulation time are saved.
+    :param mesh_data: if given, the mesh data of this rank (as passed to
+      :meth:`hedge.backends.RunContext.make_discretization`). Storing it
+      allows restarts to skip mesh generation and partitioning.
+    :param extra: a dictionary of further picklable state, such as the
+      current time step of an adaptive time stepper.
+    """
+    rank, rank_count = _get_rank_info(rcon)
+
+    try:
+        os.makedirs(pathname)
+    except OSError:
+        # another rank may have been first
+        if not os.path.isdir(pathname):
+            raise
+
+    state = dict(
+            fields=fields,
+            t=t,
+            step=step,
+            extra=extra)
+    if stepper is not None:
+        state["stepper"] = stepper.get_checkpoint_state()
+    if logmgr is not None:
+        state["logmgr"] = _get_logmgr_state(logmgr)
+
+    arrays = []
+    packed_state = _pack(state, arrays)
+
+    # The previous checkpoint of this rank is about to be replaced--mark
+    # it as incomplete first, so that a crash while writing doesn't leave
+    # its layout pointing into new data.
+    meta_pathname = _get_rank_pathname(pathname, rank, "pickle")
+    if os.path.exists(meta_pathname):
+        os.unlink(meta_pathname)
+
+    # {{{ write array data
+
+    layout = []
+    bin_pathname = _get_rank_pathname(pathname, rank, "bin")
+    outf = open(bin_pathname+".tmp", "wb")
+    try:
+        offset = 0
+        for ary in arrays:
+            ary = numpy.ascontiguousarray(ary)
+
+            padding = -offset % ARRAY_ALIGNMENT
+            outf.write("\0"*padding)
+            offset += padding
+
+            layout.append((offset, ary.dtype.str, ary.shape))
+            ary.tofile(outf)
+            offset += ary.nbytes
+    finally:
+        outf.close()
+
+    # Renaming (rather than overwriting) leaves existing mappings of the
+    # old file valid.
+    os.rename(bin_pathname+".tmp", bin_pathname)
+
+    # }}}
+
+    from cPickle import dump, HIGHEST_PROTOCOL
+
+    outf = open(meta_pathname+".tmp", "wb")
+    try:
+        dump(dict(
+            version=FORMAT_VERSION,
+            rank_count=rank_count,
+            layout=layout,
+            state=packed_state,
+            mesh_data=mesh_data), outf, HIGHEST_PROTOCOL)
+    finally:
+        outf.close()
+
+    os.rename(meta_pathname+".tmp", meta_pathname)
+
+
+
+
+class Checkpoint(Record):
+    """The state read by :func:`read_checkpoint`.
+
+    .. attribute:: fields
+    .. attribute:: t
+    .. attribute:: step
+    .. attribute:: mesh_data
+
+        The mesh data of this rank, or *None* if it was not saved.
+
+    .. attribute:: extra
+    """
+
+
+
+
+def read_checkpoint(pathname, stepper=None, logmgr=None, rcon=None):
+    """Read the state of a simulation written by :func:`write_checkpoint`.
+
+    Arrays are memory-mapped copy-on-write, so that only the parts of the
+    state actually used are read, and modifying them leaves the checkpoint
+    intact. Continuing from a checkpoint reproduces the uninterrupted run
+    bit for bit.
+
+    :param stepper: if given, a time stepper constructed with the same
+      arguments as the one passed to :func:`write_checkpoint`. Its state is
+      restored in place.
+    :param logmgr: if given, a log manager with the same quantities as
+      the one passed to :func:`write_checkpoint`. Its tick count and the
+      state of its quantities are restored in place.
+    :returns: a :class:`Checkpoint`.
+    """
+    rank, rank_count = _get_rank_info(rcon)
+
+    from cPickle import load
+
+    inf = open(_get_rank_pathname(pathname, rank, "pickle"), "rb")
+    try:
+        meta = load(inf)
+    finally:
+        inf.close()
+
+    if meta["version"] != FORMAT_VERSION:
+        raise ValueError("unsupported checkpoint format version %d"
+                % meta["version"])
+    if meta["rank_count"] != rank_count:
+        raise ValueError("checkpoint was written by %d ranks, "
+                "cannot restart on %d" % (meta["rank_count"], rank_count))
+
+    # {{{ map array data
+
+    bin_pathname = _get_rank_pathname(pathname, rank, "bin")
+    if os.path.getsize(bin_pathname):
+        data = numpy.memmap(bin_pathname, dtype=numpy.uint8, mode="c") \
+                .view(numpy.ndarray)
+    else:
+        # empty files cannot be mapped
+        data = numpy.zeros(0, dtype=numpy.uint8)
+
+    arrays = []
+    for offset, dtype, shape in meta["layout"]:
+        dtype = numpy.dtype(dtype)
+        nbytes = dtype.itemsize*int(numpy.prod(shape))
+        arrays.append(data[offset:offset+nbytes].view(dtype).reshape(shape))
+
+    # }}}
+
+    state = _unpack(meta["state"], arrays)
+
+    if stepper is not None:
+        stepper.set_checkpoint_state(state["stepper"])
+    if logmgr is not None:
+        _set_logmgr_state(logmgr, state["logmgr"])
+
+    return Checkpoint(
+            fields=state["fields"],
+            t=state["t"],
+            step=state["step"],
+            mesh_data=meta["mesh_data"],
+            extra=state["extra"])
+
+
+
+
+# vim: foldmethod=marker
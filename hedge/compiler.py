@@ -346,22 +346,23 @@ class Code(object):
         pass
 
     @memoize_method
-    def get_next_step(self, available_names, done_insns):
-        from pytools import all, argmax2
-        available_insns = [
-                (insn, insn.priority) for insn in self.instructions
-                if insn not in done_insns
-                and all(dep.name in available_names
-                    for dep in insn.get_dependencies())]
-
-        if not available_insns:
-            raise self.NoInstructionAvailable
-
-        from pytools import flatten
-        discardable_vars = set(available_names) - set(flatten(
-            [dep.name for dep in insn.get_dependencies()]
-            for insn in self.instructions
-            if insn not in done_insns))
+    def get_dependency_graph(self):
+        """Return a tuple *(insn_dep_names, name_to_consumers, result_names)*.
+
+        *insn_dep_names* is a list of the sets of variable names each entry
+        of :attr:`instructions` depends on. *name_to_consumers* maps a
+        variable name to the indices of the instructions depending on it.
+        *result_names* is the set of names referenced by :attr:`result`,
+        which must never be discarded.
+        """
+        insn_dep_names = [
+                frozenset(dep.name for dep in insn.get_dependencies())
+                for insn in self.instructions]
+
+        name_to_consumers = {}
+        for insn_idx, dep_names in enumerate(insn_dep_names):
+            for name in dep_names:
+                name_to_consumers.setdefault(name, []).append(insn_idx)
 
         # {{{ make sure results do not get discarded
         from hedge.tools import with_object_array_or_scalar
@@ -369,7 +370,9 @@ class Code(object):
         from hedge.optemplate.mappers import DependencyMapper
         dm = DependencyMapper(composite_leaves=False)
 
-        def remove_result_variable(result_expr):
+        result_names = set()
+
+        def add_result_variable(result_expr):
             # The extra dependency mapper run is necessary
             # because, for instance, subscripts can make it
             # into the result expression, which then does
@@ -378,12 +381,89 @@ class Code(object):
             for var in dm(result_expr):
                 from pymbolic.primitives import Variable
                 assert isinstance(var, Variable)
-                discardable_vars.discard(var.name)
+                result_names.add(var.name)
 
-        with_object_array_or_scalar(remove_result_variable, self.result)
+        with_object_array_or_scalar(add_result_variable, self.result)
         # }}}
 
-        return argmax2(available_insns), discardable_vars
+        return insn_dep_names, name_to_consumers, frozenset(result_names)
+
+    class DynamicScheduler(object):
+        """Keeps track of the instructions that are ready to run and of
+        the variables that are no longer needed, updating both as names
+        become available and instructions get scheduled.
+
+        Each instruction is only looked at when one of its dependencies
+        becomes available, so that scheduling a whole instruction stream
+        takes time proportional to the size of its dependency graph
+        (times a logarithmic factor for the priority queue).
+        """
+
+        def __init__(self, code, available_names):
+            self.code = code
+            (self.insn_dep_names, self.name_to_consumers,
+                    self.result_names) = code.get_dependency_graph()
+
+            self.missing_dep_counts = [
+                    len(dep_names) for dep_names in self.insn_dep_names]
+            self.pending_consumer_counts = dict(
+                    (name, len(consumers))
+                    for name, consumers in self.name_to_consumers.iteritems())
+
+            self.available_names = set()
+            self.discardable_names = set()
+
+            # entries are (-priority, insn_idx), so that among the
+            # instructions of highest priority, the first one is picked
+            self.ready_queue = []
+
+            from heapq import heappush
+            for insn_idx, missing_count in enumerate(self.missing_dep_counts):
+                if not missing_count:
+                    heappush(self.ready_queue,
+                            (-code.instructions[insn_idx].priority, insn_idx))
+
+            self.add_available_names(available_names)
+
+        def add_available_names(self, names):
+            from heapq import heappush
+            for name in names:
+                if name not in self.available_names:
+                    self.available_names.add(name)
+
+                    for insn_idx in self.name_to_consumers.get(name, []):
+                        self.missing_dep_counts[insn_idx] -= 1
+                        if not self.missing_dep_counts[insn_idx]:
+                            heappush(self.ready_queue, (
+                                -self.code.instructions[insn_idx].priority,
+                                insn_idx))
+
+                if (not self.pending_consumer_counts.get(name)
+                        and name not in self.result_names):
+                    self.discardable_names.add(name)
+
+        def get_next_step(self):
+            """Return a tuple *(insn, discardable_vars)* of the instruction
+            to run next and the set of variables that may be deleted before
+            running it. Raise :exc:`Code.NoInstructionAvailable` if no
+            instruction can currently be run.
+            """
+            if not self.ready_queue:
+                raise Code.NoInstructionAvailable
+
+            from heapq import heappop
+            neg_priority, insn_idx = heappop(self.ready_queue)
+
+            discardable_vars = self.discardable_names
+            self.discardable_names = set()
+
+            for name in self.insn_dep_names[insn_idx]:
+                self.pending_consumer_counts[name] -= 1
+                if (not self.pending_consumer_counts[name]
+                        and name not in self.result_names):
+                    self.discardable_names.add(name)
+
+            return self.code.instructions[insn_idx], discardable_vars
 
     def execute_dynamic(self, exec_mapper, pre_assign_check=None):
         """Execute the instruction stream, make all scheduling decisions
@@ -399,6 +479,8 @@ class Code(object):
 
         force_future = False
 
+        scheduler = self.DynamicScheduler(self, context.keys())
+
         while True:
             insn = None
             discardable_vars = []
@@ -424,10 +506,7 @@ class Code(object):
             # if no future got processed, pick the next insn
             if insn is None:
                 try:
-                    insn, discardable_vars = self.get_next_step(
-                            frozenset(context.keys()),
-                            frozenset(done_insns))
-
+                    insn, discardable_vars = scheduler.get_next_step()
                 except self.NoInstructionAvailable:
                     if futures:
                         # no insn ready: we need a future to complete to continue
@@ -450,6 +529,9 @@ class Code(object):
 
                     context[target] = value
 
+                scheduler.add_available_names(
+                        target for target, value in assignments)
+
                 futures.extend(new_futures)
 
                 schedule.append((discardable_vars, insn, len(new_futures)))
@@ -874,135 +956,196 @@ class OperatorCompilerBase(IdentityMapper):
 
     # {{{ assignment aggregration pass ----------------------------------------
     def aggregate_assignments(self, instructions, result):
+        """Merge :class:`Assign` instructions into multi-assignments.
+
+        Every instruction is assigned a *stage*, the length of the longest
+        dependency chain leading up to it, where links between aggregatable
+        assignments of equal priority do not count. Any path between two
+        assignments of the same stage and priority thus consists only of
+        such assignments, so that merging assignments of one stage and
+        priority cannot introduce cycles. Within a stage and priority,
+        assignments are merged if they share a dependency or one depends on
+        the other (as found by union-find), and the merged assignments are
+        split to respect :attr:`max_vectors_in_batch_expr`. All of this
+        takes time (nearly) linear in the size of the dependency graph.
+        """
         from pymbolic.primitives import Variable
 
         # aggregation helpers -------------------------------------------------
-        def get_complete_origins_set(insn, skip_levels=0):
-            if skip_levels < 0:
-                skip_levels = 0
-
-            result = set()
-            for dep in insn.get_dependencies():
-                if isinstance(dep, Variable):
-                    dep_origin = origins_map.get(dep.name, None)
-                    if dep_origin is not None:
-                        if skip_levels <= 0:
-                            result.add(dep_origin)
-                        result |= get_complete_origins_set(
-                                dep_origin, skip_levels-1)
-
-            return result
-
-        var_assignees_cache = {}
-        def get_var_assignees(insn):
-            try:
-                return var_assignees_cache[insn]
-            except KeyError:
-                result = set(Variable(assignee)
-                        for assignee in insn.get_assignees())
-                var_assignees_cache[insn] = result
-                return result
-
-        def aggregate_two_assignments(ass_1, ass_2):
-            names = ass_1.names + ass_2.names
+        def is_aggregatable(insn):
+            # zero-flop-count and zero assigns are left alone--no need to
+            # bother with those
+            from hedge.tools import is_zero
+            return (isinstance(insn, Assign)
+                    and insn.flop_count() != 0
+                    and not any(is_zero(expr) for expr in insn.exprs))
 
-            from pymbolic.primitives import Variable
-            deps = (ass_1.get_dependencies() | ass_2.get_dependencies()) \
+        def aggregate_assigns(assigns):
+            if len(assigns) == 1:
+                return assigns[0]
+
+            names = sum((ass.names for ass in assigns), [])
+
+            from operator import or_
+            deps = reduce(or_, (ass.get_dependencies() for ass in assigns)) \
                     - set(Variable(name) for name in names)
 
             return Assign(
-                    names=names, exprs=ass_1.exprs + ass_2.exprs,
+                    names=names,
+                    exprs=sum((ass.exprs for ass in assigns), []),
                     _dependencies=deps,
                     dep_mapper_factory=self.dep_mapper_factory,
-                    priority=max(ass_1.priority, ass_2.priority))
+                    priority=max(ass.priority for ass in assigns))
+
+        class BatchVectorCounter(object):
+            """Keeps track of the number of vectors referenced by a
+            (prospective) multi-assignment.
+            """
+            def __init__(self):
+                self.names = set()
+                self.deps = set()
+
+            def count_with(self, ass):
+                names = self.names | ass.get_assignees()
+                deps = (self.deps | ass.get_dependencies(each_vector=True)) \
+                        - set(Variable(name) for name in names)
+                return len(names) + len(deps), names, deps
+
+            def add(self, names, deps):
+                self.names = names
+                self.deps = deps
+
+        # {{{ dependency graph
 
-        # main aggregation pass -----------------------------------------------
         origins_map = dict(
-                    (assignee, insn)
-                    for insn in instructions
+                    (assignee, insn_idx)
+                    for insn_idx, insn in enumerate(instructions)
                     for assignee in insn.get_assignees())
 
-        from pytools import partition
-        unprocessed_assigns, other_insns = partition(
-                lambda insn: isinstance(insn, Assign),
-                instructions)
+        insn_deps = [insn.get_dependencies() for insn in instructions]
+        insn_preds = [
+                set(origins_map[dep.name] for dep in deps
+                    if isinstance(dep, Variable) and dep.name in origins_map)
+                for deps in insn_deps]
+
+        insn_succs = [[] for insn in instructions]
+        for insn_idx, preds in enumerate(insn_preds):
+            for pred_idx in preds:
+                insn_succs[pred_idx].append(insn_idx)
+
+        aggregatable = [is_aggregatable(insn) for insn in instructions]
+
+        # }}}
 
-        # filter out zero-flop-count assigns--no need to bother with those
-        processed_assigns, unprocessed_assigns = partition(
-                lambda ass: ass.flop_count() == 0,
-                unprocessed_assigns)
+        # {{{ topological sort, staging
 
-        # filter out zero assignments
-        from pytools import any
-        from hedge.tools import is_zero
+        missing_pred_counts = [len(preds) for preds in insn_preds]
+        topo_order = [insn_idx
+                for insn_idx, missing_count in enumerate(missing_pred_counts)
+                if not missing_count]
+        stages = [0]*len(instructions)
 
         i = 0
+        while i < len(topo_order):
+            insn_idx = topo_order[i]
+            i += 1
+
+            for succ_idx in insn_succs[insn_idx]:
+                if (aggregatable[insn_idx] and aggregatable[succ_idx]
+                        and instructions[insn_idx].priority
+                        == instructions[succ_idx].priority):
+                    succ_stage = stages[insn_idx]
+                else:
+                    succ_stage = stages[insn_idx] + 1
 
-        while i < len(unprocessed_assigns):
-            my_assign = unprocessed_assigns[i]
-            if any(is_zero(expr) for expr in my_assign.exprs):
-                processed_assigns.append(unprocessed_assigns.pop())
-            else:
-                i += 1
+                stages[succ_idx] = max(stages[succ_idx], succ_stage)
 
-        # greedy aggregation
-        while unprocessed_assigns:
-            my_assign = unprocessed_assigns.pop()
-
-            my_deps = my_assign.get_dependencies()
-            my_assignees = get_var_assignees(my_assign)
-
-            agg_candidates = []
-            for i, other_assign in enumerate(unprocessed_assigns):
-                other_deps = other_assign.get_dependencies()
-                other_assignees = get_var_assignees(other_assign)
-
-                if ((my_deps & other_deps
-                        or my_deps & other_assignees
-                        or other_deps & my_assignees)
-                        and my_assign.priority == other_assign.priority):
-                    agg_candidates.append((i, other_assign))
-
-            did_work = False
-
-            if agg_candidates:
-                my_indirect_origins = get_complete_origins_set(
-                        my_assign, skip_levels=1)
-
-                for other_assign_index, other_assign in agg_candidates:
-                    if self.max_vectors_in_batch_expr is not None:
-                        new_assignee_count = len(
-                                set(my_assign.get_assignees())
-                                | set(other_assign.get_assignees()))
-                        new_dep_count = len(
-                                my_assign.get_dependencies(
-                                    each_vector=True)
-                                | other_assign.get_dependencies(
-                                    each_vector=True))
-
-                        if (new_assignee_count + new_dep_count \
-                                > self.max_vectors_in_batch_expr):
-                            continue
-
-                    other_indirect_origins = get_complete_origins_set(
-                            other_assign, skip_levels=1)
-
-                    if (my_assign not in other_indirect_origins and
-                            other_assign not in my_indirect_origins):
-                        did_work = True
-
-                        # aggregate the two assignments
-                        new_assignment = aggregate_two_assignments(
-                                my_assign, other_assign)
-                        del unprocessed_assigns[other_assign_index]
-                        unprocessed_assigns.append(new_assignment)
-                        for assignee in new_assignment.get_assignees():
-                            origins_map[assignee] = new_assignment
+                missing_pred_counts[succ_idx] -= 1
+                if not missing_pred_counts[succ_idx]:
+                    topo_order.append(succ_idx)
 
-                        break
+        if len(topo_order) < len(instructions):
+            raise RuntimeError("instruction stream has cyclic dependencies")
+
+        # }}}
 
-            if not did_work:
-                processed_assigns.append(my_assign)
+        # {{{ union-find aggregation within stages
+
+        parents = range(len(instructions))
+
+        def find(insn_idx):
+            root = insn_idx
+            while parents[root] != root:
+                root = parents[root]
+            while parents[insn_idx] != root:
+                parents[insn_idx], insn_idx = root, parents[insn_idx]
+            return root
+
+        def union(idx_a, idx_b):
+            parents[find(idx_a)] = find(idx_b)
+
+        def stage_key(insn_idx):
+            return stages[insn_idx], instructions[insn_idx].priority
+
+        first_user = {}
+        for insn_idx in topo_order:
+            if not aggregatable[insn_idx]:
+                continue
+
+            key = stage_key(insn_idx)
+
+            for pred_idx in insn_preds[insn_idx]:
+                if aggregatable[pred_idx] and stage_key(pred_idx) == key:
+                    union(insn_idx, pred_idx)
+
+            for dep in insn_deps[insn_idx]:
+                user_idx = first_user.setdefault(key + (dep,), insn_idx)
+                if user_idx != insn_idx:
+                    union(insn_idx, user_idx)
+
+        # Merge along the topological order. Since all dependencies within
+        # a group point forward in this order, splitting a group into
+        # consecutive runs does not create cycles either.
+        batches = {}
+        batch_counters = {}
+        processed_assigns = []
+        other_insns = []
+
+        for insn_idx in topo_order:
+            insn = instructions[insn_idx]
+
+            if not aggregatable[insn_idx]:
+                if isinstance(insn, Assign):
+                    processed_assigns.append([insn])
+                else:
+                    other_insns.append(insn)
+                continue
+
+            root = find(insn_idx)
+            batch = batches.get(root)
+
+            if batch is not None and self.max_vectors_in_batch_expr is not None:
+                counter = batch_counters[root]
+                vector_count, names, deps = counter.count_with(insn)
+                if vector_count > self.max_vectors_in_batch_expr:
+                    batch = None
+                else:
+                    counter.add(names, deps)
+
+            if batch is None:
+                batch = batches[root] = []
+                processed_assigns.append(batch)
+
+                if self.max_vectors_in_batch_expr is not None:
+                    counter = batch_counters[root] = BatchVectorCounter()
+                    counter.add(*counter.count_with(insn)[1:])
+
+            batch.append(insn)
+
+        processed_assigns = [aggregate_assigns(batch)
+                for batch in processed_assigns]
+
+        # }}}
 
         externally_used_names = set(
                 expr
@@ -1027,35 +1170,35 @@ class OperatorCompilerBase(IdentityMapper):
                             isinstance(dep, Variable)) & my_assignees)
                     for name, expr in names_exprs]
 
-            ordered_names_exprs = []
-            available_names = set()
-
-            while names_exprs_deps:
-                schedulable = []
-
-                i = 0
-                while i < len(names_exprs_deps):
-                    name, expr, deps = names_exprs_deps[i]
-
-                    unsatisfied_deps = deps - available_names
-
-                    if not unsatisfied_deps:
-                        schedulable.append((str(expr), name, expr))
-                        del names_exprs_deps[i]
+            # Within each multi-assignment, order the assignments by the
+            # length of the longest chain of dependencies leading up to
+            # them, and by their string form within one such level, so that
+            # they come out in a constant order.
+            name_to_level = {}
+            keyed_names_exprs = []
+
+            unleveled = names_exprs_deps
+            while unleveled:
+                postponed = []
+                for name, expr, deps in unleveled:
+                    if all(dep in name_to_level for dep in deps):
+                        level = max(
+                                [name_to_level[dep] + 1 for dep in deps] or [0])
+                        name_to_level[name] = level
+                        keyed_names_exprs.append(((level, str(expr)), name, expr))
                     else:
-                        i += 1
-
-                # make sure these come out in a constant order
-                schedulable.sort()
+                        postponed.append((name, expr, deps))
 
-                if schedulable:
-                    for key, name, expr in schedulable:
-                        ordered_names_exprs.append((name, expr))
-                        available_names.add(name)
-                else:
+                if len(postponed) == len(unleveled):
                     raise RuntimeError("aggregation resulted in an "
                             "impossible assignment")
 
+                unleveled = postponed
+
+            keyed_names_exprs.sort()
+            ordered_names_exprs = [(name, expr)
+                    for key, name, expr in keyed_names_exprs]
+
             return self.finalize_multi_assign(
                     names=[name for name, expr in ordered_names_exprs],
                     exprs=[expr for name, expr in ordered_names_exprs],
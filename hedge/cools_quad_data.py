@@ -1,1804 +0,0 @@
-# Cubature formulae from:
-#
-# Cools, R. "Monomial Cubature Rules Since "Stroud": A Compilation--Part 2." 
-# J. Comput. Appl. Math. 112, 21-27, 1999.
-#
-# Cools, R. "Encyclopaedia of Cubature Formulas." 
-# http://www.cs.kuleuven.ac.be/~nines/research/ecf/ecf.html
-
-import numpy as np
-
-triangle_table = {
-        1: [[-0.333333333333333,-0.333333333333333,2.000000000000000]],
-        2: 
-        [
-            [-0.666666666666667,-0.666666666666667,0.666666666666667],
-            [0.333333333333333,-0.666666666666667,0.666666666666667],
-            [-0.666666666666667,0.333333333333333,0.666666666666667],
-            ],
-        3: [
-            [-0.816847572980458,-0.816847572980458,0.219903487310644],
-            [0.633695145960917,-0.816847572980459,0.219903487310644],
-            [-0.816847572980459,0.633695145960917,0.219903487310644],
-            [-0.108103018168070,-0.108103018168070,0.446763179356023],
-            [-0.783793963663860,-0.108103018168070,0.446763179356023],
-            [-0.108103018168070,-0.783793963663860,0.446763179356023],
-            ],
-        4: [
-            [-0.816847572980458,-0.816847572980458,0.219903487310644],
-            [0.633695145960917,-0.816847572980459,0.219903487310644],
-            [-0.816847572980459,0.633695145960917,0.219903487310644],
-            [-0.108103018168070,-0.108103018168070,0.446763179356023],
-            [-0.783793963663860,-0.108103018168070,0.446763179356023],
-            [-0.108103018168070,-0.783793963663860,0.446763179356023],
-            ],
-        5: [
-            [-0.333333333333333,-0.333333333333333,0.450000000000000],
-            [-0.059715871789770,-0.059715871789770,0.264788305577012],
-            [-0.880568256420460,-0.059715871789770,0.264788305577012],
-            [-0.059715871789770,-0.880568256420460,0.264788305577012],
-            [-0.797426985353087,-0.797426985353087,0.251878361089654],
-            [0.594853970706175,-0.797426985353087,0.251878361089654],
-            [-0.797426985353087,0.594853970706175,0.251878361089654],
-            ],
-        6: [
-            [-0.501426509658179,-0.501426509658179,0.233572551452759],
-            [0.002853019316358,-0.501426509658179,0.233572551452759],
-            [-0.501426509658179,0.002853019316358,0.233572551452759],
-            [-0.873821971016996,-0.873821971016996,0.101689812740414],
-            [0.747643942033991,-0.873821971016996,0.101689812740414],
-            [-0.873821971016996,0.747643942033991,0.101689812740414],
-            [-0.379295097932431,-0.893709900310366,0.165702151236747],
-            [-0.893709900310366,-0.379295097932431,0.165702151236747],
-            [0.273004998242797,-0.893709900310366,0.165702151236747],
-            [-0.893709900310366,0.273004998242797,0.165702151236747],
-            [0.273004998242797,-0.379295097932431,0.165702151236747],
-            [-0.379295097932431,0.273004998242797,0.165702151236747],
-            ],
-        7: [
-            [-0.158765070723907,-0.158765070723907,0.278402959350494],
-            [-0.682469858552186,-0.158765070723907,0.278402959350494],
-            [-0.158765070723907,-0.682469858552186,0.278402959350494],
-            [-0.901937632421608,-0.901937632421608,0.063653882657145],
-            [0.803875264843215,-0.901937632421608,0.063653882657145],
-            [-0.901937632421608,0.803875264843215,0.063653882657145],
-            [-0.696696002590528,-0.696696002590528,0.168642646759703],
-            [0.393392005181056,-0.696696002590528,0.168642646759703],
-            [-0.696696002590528,0.393392005181056,0.168642646759703],
-            [0.348275575962283,-0.375762055856278,0.077983588949662],
-            [-0.375762055856278,0.348275575962283,0.077983588949662],
-            [-0.972513520106005,-0.375762055856278,0.077983588949662],
-            [-0.375762055856278,-0.972513520106005,0.077983588949662],
-            [-0.972513520106005,0.348275575962283,0.077983588949662],
-            [0.348275575962283,-0.972513520106005,0.077983588949662],
-            ],
-        8: [
-                [-0.333333333333333,-0.333333333333333,0.288631215355574],
-                [-0.081414823414554,-0.081414823414554,0.190183268534569],
-                [-0.837170353170893,-0.081414823414554,0.190183268534569],
-                [-0.081414823414554,-0.837170353170893,0.190183268534569],
-                [-0.658861384496480,-0.658861384496480,0.206434741069437],
-                [0.317722768992959,-0.658861384496480,0.206434741069437],
-                [-0.658861384496480,0.317722768992959,0.206434741069437],
-                [-0.898905543365938,-0.898905543365938,0.064916995246396],
-                [0.797811086731876,-0.898905543365938,0.064916995246396],
-                [-0.898905543365938,0.797811086731876,0.064916995246396],
-                [-0.473774340730724,0.456984785910809,0.054460628348870],
-                [0.456984785910809,-0.473774340730724,0.054460628348870],
-                [-0.983210445180085,0.456984785910809,0.054460628348870],
-                [0.456984785910809,-0.983210445180085,0.054460628348870],
-                [-0.983210445180085,-0.473774340730724,0.054460628348870],
-                [-0.473774340730724,-0.983210445180085,0.054460628348870],
-                ],
-        9: [
-                [-0.333333333333333,-0.333333333333333,0.194271592565598],
-                [-0.020634961602525,-0.020634961602525,0.062669400454278],
-                [-0.958730076794950,-0.020634961602525,0.062669400454278],
-                [-0.020634961602525,-0.958730076794950,0.062669400454278],
-                [-0.125820817014127,-0.125820817014127,0.155655082009549],
-                [-0.748358365971746,-0.125820817014127,0.155655082009549],
-                [-0.125820817014127,-0.748358365971746,0.155655082009549],
-                [-0.623592928761935,-0.623592928761935,0.159295477854420],
-                [0.247185857523869,-0.623592928761935,0.159295477854420],
-                [-0.623592928761935,0.247185857523869,0.159295477854420],
-                [-0.910540973211095,-0.910540973211095,0.051155351317396],
-                [0.821081946422189,-0.910540973211095,0.051155351317396],
-                [-0.910540973211095,0.821081946422189,0.051155351317396],
-                [0.482397197568996,-0.556074021678469,0.086567078754579],
-                [-0.556074021678469,0.482397197568996,0.086567078754579],
-                [-0.926323175890527,-0.556074021678469,0.086567078754579],
-                [-0.556074021678469,-0.926323175890527,0.086567078754579],
-                [-0.926323175890527,0.482397197568996,0.086567078754579],
-                [0.482397197568996,-0.926323175890527,0.086567078754579],
-                ],
-        10: [
-                [-0.333333333333333,-0.333333333333333,0.167046799610393],
-                [-0.004269134091050,-0.004269134091050,0.014459701184113],
-                [-0.991461731817899,-0.004269134091050,0.014459701184113],
-                [-0.004269134091050,-0.991461731817899,0.014459701184113],
-                [-0.143975100541888,-0.143975100541888,0.148984355841961],
-                [-0.712049798916225,-0.143975100541888,0.148984355841961],
-                [-0.143975100541888,-0.712049798916225,0.148984355841961],
-                [-0.630487174513551,-0.630487174513551,0.157292946806217],
-                [0.260974349027102,-0.630487174513551,0.157292946806217],
-                [-0.630487174513551,0.260974349027102,0.157292946806217],
-                [-0.959037562856645,-0.959037562856645,0.013856646174215],
-                [0.918075125713290,-0.959037562856645,0.013856646174215],
-                [-0.959037562856645,0.918075125713290,0.013856646174215],
-                [-0.726852847487933,0.656846867693389,0.059036640669559],
-                [0.656846867693389,-0.726852847487933,0.059036640669559],
-                [-0.929994020205456,0.656846867693389,0.059036640669559],
-                [0.656846867693389,-0.929994020205456,0.059036640669559],
-                [-0.929994020205456,-0.726852847487933,0.059036640669559],
-                [-0.726852847487933,-0.929994020205456,0.059036640669559],
-                [-0.334512798822723,0.259414658305837,0.079158734392122],
-                [0.259414658305837,-0.334512798822723,0.079158734392122],
-                [-0.924901859483115,0.259414658305837,0.079158734392122],
-                [0.259414658305837,-0.924901859483115,0.079158734392122],
-                [-0.924901859483115,-0.334512798822723,0.079158734392122],
-                [-0.334512798822723,-0.924901859483115,0.079158734392122],
-                ],
-        11: [
-                [-0.333333333333333,-0.333333333333333,0.171542269659139],
-                [-0.008227986519701,-0.008227986519701,0.033232309648099],
-                [-0.983544026960598,-0.008227986519701,0.033232309648099],
-                [-0.008227986519701,-0.983544026960598,0.033232309648099],
-                [-0.123062767323470,-0.123062767323470,0.134650934561697],
-                [-0.753874465353061,-0.123062767323470,0.134650934561697],
-                [-0.123062767323470,-0.753874465353061,0.134650934561697],
-                [-0.579583807314522,-0.579583807314522,0.141045284213931],
-                [0.159167614629044,-0.579583807314522,0.141045284213931],
-                [-0.579583807314522,0.159167614629044,0.141045284213931],
-                [-0.794793191450311,-0.794793191450311,0.077255352409353],
-                [0.589586382900622,-0.794793191450311,0.077255352409353],
-                [-0.794793191450311,0.589586382900622,0.077255352409353],
-                [-0.943045809035533,-0.943045809035533,0.020851693311810],
-                [0.886091618071066,-0.943045809035533,0.020851693311810],
-                [-0.943045809035533,0.886091618071066,0.020851693311810],
-                [-0.701412405190965,0.686811031831200,0.020556454130106],
-                [0.686811031831200,-0.701412405190965,0.020556454130106],
-                [-0.985398626640235,0.686811031831200,0.020556454130106],
-                [0.686811031831200,-0.985398626640235,0.020556454130106],
-                [-0.985398626640235,-0.701412405190966,0.020556454130106],
-                [-0.701412405190966,-0.985398626640235,0.020556454130106],
-                [-0.420944470627256,0.328932876191794,0.080668713854259],
-                [0.328932876191794,-0.420944470627256,0.080668713854259],
-                [-0.907988405564538,0.328932876191794,0.080668713854259],
-                [0.328932876191794,-0.907988405564538,0.080668713854259],
-                [-0.907988405564538,-0.420944470627256,0.080668713854259],
-                [-0.420944470627256,-0.907988405564538,0.080668713854259],
-                ],
-        12: [
-                [-0.115127288420454,-0.115127288420454,0.088694050812375],
-                [-0.769745423159092,-0.115127288420454,0.088694050812375],
-                [-0.115127288420454,-0.769745423159092,0.088694050812375],
-                [-0.241326933740970,-0.241326933740970,0.083486638970495],
-                [-0.517346132518060,-0.241326933740970,0.083486638970495],
-                [-0.241326933740970,-0.517346132518060,0.083486638970495],
-                [-0.773435586772427,-0.773435586772427,0.061949370456958],
-                [0.546871173544855,-0.773435586772427,0.061949370456958],
-                [-0.773435586772427,0.546871173544855,0.061949370456958],
-                [-0.550360151853422,-0.550360151853422,0.096926744607805],
-                [0.100720303706844,-0.550360151853422,0.096926744607805],
-                [-0.550360151853422,0.100720303706844,0.096926744607805],
-                [-0.949850839686919,-0.949850839686919,0.016284715813394],
-                [0.899701679373837,-0.949850839686919,0.016284715813394],
-                [-0.949850839686919,0.899701679373837,0.016284715813394],
-                [-0.023247583079632,-0.023247583079632,0.047730162209543],
-                [-0.953504833840737,-0.023247583079632,0.047730162209543],
-                [-0.023247583079632,-0.953504833840737,0.047730162209543],
-                [0.701114686742190,-0.956341185792092,0.030740478172077],
-                [-0.956341185792092,0.701114686742190,0.030740478172077],
-                [-0.744773500950097,-0.956341185792092,0.030740478172077],
-                [-0.956341185792092,-0.744773500950097,0.030740478172077],
-                [-0.744773500950097,0.701114686742189,0.030740478172077],
-                [0.701114686742189,-0.744773500950097,0.030740478172077],
-                [0.280974603820889,-0.820754518409649,0.073364295183933],
-                [-0.820754518409649,0.280974603820889,0.073364295183933],
-                [-0.460220085411240,-0.820754518409649,0.073364295183933],
-                [-0.820754518409649,-0.460220085411240,0.073364295183933],
-                [-0.460220085411240,0.280974603820889,0.073364295183933],
-                [0.280974603820889,-0.460220085411240,0.073364295183933],
-                [0.380092839755442,-0.412599349012509,0.031692718542038],
-                [-0.412599349012509,0.380092839755442,0.031692718542038],
-                [-0.967493490742933,-0.412599349012509,0.031692718542038],
-                [-0.412599349012509,-0.967493490742933,0.031692718542038],
-                [-0.967493490742933,0.380092839755442,0.031692718542038],
-                [0.380092839755442,-0.967493490742933,0.031692718542038],
-                ],
-        13: [
-                [-0.333333333333333,-0.333333333333333,0.097649880256618],
-                [-0.178369512906405,-0.178369512906405,0.090830392435257],
-                [-0.643260974187191,-0.178369512906405,0.090830392435257],
-                [-0.178369512906405,-0.643260974187191,0.090830392435257],
-                [-0.542160866418819,-0.542160866418819,0.093688172298398],
-                [0.084321732837639,-0.542160866418819,0.093688172298398],
-                [-0.542160866418819,0.084321732837639,0.093688172298398],
-                [-0.771083702251175,-0.771083702251175,0.062636625766914],
-                [0.542167404502350,-0.771083702251175,0.062636625766914],
-                [-0.771083702251175,0.542167404502350,0.062636625766914],
-                [-0.951222762153923,-0.951222762153923,0.015384123058757],
-                [0.902445524307847,-0.951222762153923,0.015384123058757],
-                [-0.951222762153923,0.902445524307847,0.015384123058757],
-                [-0.071124044893491,-0.071124044893491,0.063336411850675],
-                [-0.857751910213018,-0.071124044893491,0.063336411850675],
-                [-0.071124044893491,-0.857751910213018,0.063336411850675],
-                [0.089497598920545,-0.972567007080596,0.017363112895214],
-                [-0.972567007080596,0.089497598920545,0.017363112895214],
-                [-0.116930591839948,-0.972567007080596,0.017363112895214],
-                [-0.972567007080596,-0.116930591839948,0.017363112895214],
-                [-0.116930591839948,0.089497598920545,0.017363112895214],
-                [0.089497598920545,-0.116930591839948,0.017363112895214],
-                [0.708303576893352,-0.752827405974001,0.030203519313196],
-                [-0.752827405974001,0.708303576893352,0.030203519313196],
-                [-0.955476170919351,-0.752827405974001,0.030203519313196],
-                [-0.752827405974001,-0.955476170919351,0.030203519313196],
-                [-0.955476170919351,0.708303576893352,0.030203519313196],
-                [0.708303576893352,-0.955476170919351,0.030203519313196],
-                [0.400693795223418,-0.438009873048077,0.032954120635442],
-                [-0.438009873048077,0.400693795223418,0.032954120635442],
-                [-0.962683922175342,-0.438009873048076,0.032954120635442],
-                [-0.438009873048076,-0.962683922175342,0.032954120635442],
-                [-0.962683922175342,0.400693795223419,0.032954120635442],
-                [0.400693795223419,-0.962683922175342,0.032954120635442],
-                [-0.461147708177324,-0.809703416305633,0.073599737741711],
-                [-0.809703416305633,-0.461147708177324,0.073599737741711],
-                [0.270851124482956,-0.809703416305633,0.073599737741711],
-                [-0.809703416305633,0.270851124482956,0.073599737741711],
-                [0.270851124482956,-0.461147708177324,0.073599737741711],
-                [-0.461147708177324,0.270851124482956,0.073599737741711],
-                ],
-        14: [
-                [-0.333333333333333,-0.333333333333333,0.086016161940337],
-                [-0.031437623162377,-0.031437623162377,0.020861042581505],
-                [-0.937124753675245,-0.031437623162377,0.020861042581505],
-                [-0.031437623162377,-0.937124753675245,0.020861042581505],
-                [-0.190179067155837,-0.190179067155837,0.084906577433761],
-                [-0.619641865688325,-0.190179067155837,0.084906577433761],
-                [-0.190179067155837,-0.619641865688325,0.084906577433761],
-                [-0.544945017724160,-0.544945017724160,0.094412955694385],
-                [0.089890035448320,-0.544945017724160,0.094412955694385],
-                [-0.544945017724160,0.089890035448320,0.094412955694385],
-                [-0.829084434528895,-0.829084434528895,0.036931420530108],
-                [0.658168869057790,-0.829084434528895,0.036931420530108],
-                [-0.829084434528895,0.658168869057790,0.036931420530108],
-                [-0.961731843229187,-0.961731843229187,0.009566859223433],
-                [0.923463686458374,-0.961731843229187,0.009566859223433],
-                [-0.961731843229187,0.923463686458374,0.009566859223433],
-                [-0.228055909294146,0.200257489743243,0.023873332102599],
-                [0.200257489743243,-0.228055909294146,0.023873332102599],
-                [-0.972201580449098,0.200257489743243,0.023873332102599],
-                [0.200257489743243,-0.972201580449098,0.023873332102599],
-                [-0.972201580449097,-0.228055909294146,0.023873332102599],
-                [-0.228055909294146,-0.972201580449097,0.023873332102599],
-                [-0.801926305237733,0.769518568627872,0.018006541968931],
-                [0.769518568627872,-0.801926305237733,0.018006541968931],
-                [-0.967592263390139,0.769518568627872,0.018006541968931],
-                [0.769518568627872,-0.967592263390139,0.018006541968931],
-                [-0.967592263390139,-0.801926305237733,0.018006541968931],
-                [-0.801926305237733,-0.967592263390139,0.018006541968931],
-                [-0.544893784145096,0.504355701557747,0.030117913357456],
-                [0.504355701557747,-0.544893784145096,0.030117913357456],
-                [-0.959461917412651,0.504355701557747,0.030117913357456],
-                [0.504355701557747,-0.959461917412651,0.030117913357456],
-                [-0.959461917412651,-0.544893784145095,0.030117913357456],
-                [-0.544893784145095,-0.959461917412651,0.030117913357456],
-                [-0.288429073961769,0.109399611316741,0.067035335144205],
-                [0.109399611316741,-0.288429073961769,0.067035335144205],
-                [-0.820970537354972,0.109399611316741,0.067035335144205],
-                [0.109399611316741,-0.820970537354972,0.067035335144205],
-                [-0.820970537354972,-0.288429073961769,0.067035335144205],
-                [-0.288429073961769,-0.820970537354972,0.067035335144205],
-                [-0.593507885280605,0.397658756992448,0.056624756038490],
-                [0.397658756992448,-0.593507885280605,0.056624756038490],
-                [-0.804150871711842,0.397658756992447,0.056624756038490],
-                [0.397658756992447,-0.804150871711842,0.056624756038490],
-                [-0.804150871711842,-0.593507885280605,0.056624756038490],
-                [-0.593507885280605,-0.804150871711842,0.056624756038490],
-                ],
-        15: [
-                [-0.083438407261750,-0.083438407261750,0.065323637697611],
-                [-0.833123185476500,-0.083438407261750,0.065323637697611],
-                [-0.083438407261750,-0.833123185476500,0.065323637697611],
-                [-0.192779070841739,-0.192779070841739,0.054825636062729],
-                [-0.614441858316522,-0.192779070841739,0.054825636062729],
-                [-0.192779070841739,-0.614441858316522,0.054825636062729],
-                [-0.413605664173949,-0.413605664173949,0.053020073197407],
-                [-0.172788671652101,-0.413605664173949,0.053020073197407],
-                [-0.413605664173949,-0.172788671652101,0.053020073197407],
-                [-0.707064426114454,-0.707064426114454,0.058431924272972],
-                [0.414128852228908,-0.707064426114454,0.058431924272972],
-                [-0.707064426114454,0.414128852228908,0.058431924272972],
-                [-0.887274264668793,-0.887274264668793,0.021169216132488],
-                [0.774548529337586,-0.887274264668793,0.021169216132488],
-                [-0.887274264668793,0.774548529337586,0.021169216132488],
-                [-0.966849746283259,-0.966849746283259,0.007229286128184],
-                [0.933699492566519,-0.966849746283259,0.007229286128184],
-                [-0.966849746283259,0.933699492566519,0.007229286128184],
-                [-0.520930891690411,0.501106485071962,0.017055496203419],
-                [0.501106485071962,-0.520930891690411,0.017055496203419],
-                [-0.980175593381550,0.501106485071962,0.017055496203419],
-                [0.501106485071962,-0.980175593381550,0.017055496203419],
-                [-0.980175593381550,-0.520930891690411,0.017055496203419],
-                [-0.520930891690411,-0.980175593381550,0.017055496203419],
-                [-0.190242385363320,0.158634844102864,0.027832353033384],
-                [0.158634844102864,-0.190242385363320,0.027832353033384],
-                [-0.968392458739544,0.158634844102864,0.027832353033384],
-                [0.158634844102864,-0.968392458739544,0.027832353033384],
-                [-0.968392458739544,-0.190242385363320,0.027832353033384],
-                [-0.190242385363320,-0.968392458739544,0.027832353033384],
-                [-0.809995773773910,0.799708556139969,0.008583865881470],
-                [0.799708556139969,-0.809995773773910,0.008583865881470],
-                [-0.989712782366059,0.799708556139969,0.008583865881470],
-                [0.799708556139969,-0.989712782366059,0.008583865881470],
-                [-0.989712782366059,-0.809995773773910,0.008583865881470],
-                [-0.809995773773910,-0.989712782366059,0.008583865881470],
-                [-0.700493785355452,0.602649133849474,0.032470658563550],
-                [0.602649133849474,-0.700493785355452,0.032470658563550],
-                [-0.902155348494022,0.602649133849474,0.032470658563550],
-                [0.602649133849474,-0.902155348494022,0.032470658563550],
-                [-0.902155348494023,-0.700493785355452,0.032470658563550],
-                [-0.700493785355452,-0.902155348494023,0.032470658563550],
-                [-0.426160775117330,0.288623277852292,0.051214681842525],
-                [0.288623277852292,-0.426160775117330,0.051214681842525],
-                [-0.862462502734962,0.288623277852292,0.051214681842525],
-                [0.288623277852292,-0.862462502734962,0.051214681842525],
-                [-0.862462502734962,-0.426160775117330,0.051214681842525],
-                [-0.426160775117330,-0.862462502734962,0.051214681842525],
-                [-0.436328663801831,0.099519827552432,0.066176391063291],
-                [0.099519827552432,-0.436328663801831,0.066176391063291],
-                [-0.663191163750602,0.099519827552432,0.066176391063291],
-                [0.099519827552432,-0.663191163750602,0.066176391063291],
-                [-0.663191163750602,-0.436328663801831,0.066176391063291],
-                [-0.436328663801831,-0.663191163750602,0.066176391063291],
-        ],
-        16: [
-        [-0.333333333333333,-0.333333333333333,0.092421202321849],
-        [-0.015796436959213,-0.015796436959213,0.027991652734724],
-        [-0.968407126081574,-0.015796436959213,0.027991652734724],
-        [-0.015796436959213,-0.968407126081574,0.027991652734724],
-        [-0.087376299046785,-0.087376299046785,0.036406763596424],
-        [-0.825247401906431,-0.087376299046785,0.036406763596424],
-        [-0.087376299046785,-0.825247401906431,0.036406763596424],
-        [-0.640498098534045,-0.640498098534045,0.062729423327251],
-        [0.280996197068091,-0.640498098534045,0.062729423327251],
-        [-0.640498098534045,0.280996197068091,0.062729423327251],
-        [-0.828211591878549,-0.828211591878549,0.032217170192673],
-        [0.656423183757099,-0.828211591878549,0.032217170192673],
-        [-0.828211591878549,0.656423183757099,0.032217170192673],
-        [-0.977882767295650,-0.977882767295650,0.003676792575648],
-        [0.955765534591299,-0.977882767295650,0.003676792575648],
-        [-0.977882767295650,0.955765534591299,0.003676792575648],
-        [-0.648594849699253,0.619534954455185,0.019075686313307],
-        [0.619534954455185,-0.648594849699253,0.019075686313307],
-        [-0.970940104755933,0.619534954455185,0.019075686313307],
-        [0.619534954455185,-0.970940104755933,0.019075686313307],
-        [-0.970940104755933,-0.648594849699253,0.019075686313307],
-        [-0.648594849699253,-0.970940104755933,0.019075686313307],
-        [-0.355089058161032,0.324703448463838,0.025111336723323],
-        [0.324703448463838,-0.355089058161032,0.025111336723323],
-        [-0.969614390302806,0.324703448463838,0.025111336723323],
-        [0.324703448463838,-0.969614390302806,0.025111336723323],
-        [-0.969614390302806,-0.355089058161032,0.025111336723323],
-        [-0.355089058161032,-0.969614390302806,0.025111336723323],
-        [-0.863082725186344,0.829810165174004,0.014134510743040],
-        [0.829810165174004,-0.863082725186344,0.014134510743040],
-        [-0.966727439987660,0.829810165174004,0.014134510743040],
-        [0.829810165174004,-0.966727439987660,0.014134510743040],
-        [-0.966727439987660,-0.863082725186344,0.014134510743040],
-        [-0.863082725186344,-0.966727439987660,0.014134510743040],
-        [-0.650110471151428,0.511910525190604,0.025255543672496],
-        [0.511910525190604,-0.650110471151428,0.025255543672496],
-        [-0.861800054039176,0.511910525190604,0.025255543672496],
-        [0.511910525190604,-0.861800054039176,0.025255543672496],
-        [-0.861800054039176,-0.650110471151428,0.025255543672496],
-        [-0.650110471151428,-0.861800054039176,0.025255543672496],
-        [-0.282624366842035,0.131065359625217,0.038432852520849],
-        [0.131065359625217,-0.282624366842035,0.038432852520849],
-        [-0.848440992783182,0.131065359625217,0.038432852520849],
-        [0.131065359625217,-0.848440992783182,0.038432852520849],
-        [-0.848440992783182,-0.282624366842035,0.038432852520849],
-        [-0.282624366842035,-0.848440992783182,0.038432852520849],
-        [-0.500121711290305,0.333566061453817,0.032993291211606],
-        [0.333566061453817,-0.500121711290305,0.032993291211606],
-        [-0.833444350163512,0.333566061453817,0.032993291211606],
-        [0.333566061453817,-0.833444350163512,0.032993291211606],
-[-0.833444350163512,-0.500121711290305,0.032993291211606],
-[-0.500121711290305,-0.833444350163512,0.032993291211606],
-[-0.353308953197778,-0.027538833736648,0.081415677215044],
-[-0.027538833736648,-0.353308953197778,0.081415677215044],
-[-0.619152213065573,-0.027538833736648,0.081415677215044],
-[-0.027538833736648,-0.619152213065573,0.081415677215044],
-[-0.619152213065573,-0.353308953197778,0.081415677215044],
-[-0.353308953197778,-0.619152213065573,0.081415677215044],
-],
-17: [
-        [-0.013565183960096,-0.013565183960096,0.022448424077156],
-        [-0.972869632079808,-0.013565183960096,0.022448424077156],
-        [-0.013565183960096,-0.972869632079808,0.022448424077156],
-        [-0.918012666387151,-0.918012666387151,0.011377816766740],
-        [0.836025332774302,-0.918012666387151,0.011377816766740],
-        [-0.918012666387151,0.836025332774302,0.011377816766740],
-        [-0.469265478050798,-0.469265478050798,0.056148078797670],
-        [-0.061469043898404,-0.469265478050798,0.056148078797670],
-        [-0.469265478050798,-0.061469043898404,0.056148078797670],
-        [-0.278161974512876,-0.278161974512876,0.031804753050686],
-        [-0.443676050974249,-0.278161974512876,0.031804753050686],
-        [-0.278161974512876,-0.443676050974249,0.031804753050686],
-        [-0.743831619059579,-0.743831619059579,0.042944604159838],
-        [0.487663238119159,-0.743831619059579,0.042944604159838],
-        [-0.743831619059579,0.487663238119159,0.042944604159838],
-        [-0.975086972700342,-0.975086972700342,0.004138336267131],
-        [0.950173945400684,-0.975086972700342,0.004138336267131],
-        [-0.975086972700342,0.950173945400684,0.004138336267131],
-        [-0.331485915788080,0.305875449252880,0.020094111670483],
-        [0.305875449252880,-0.331485915788080,0.020094111670483],
-        [-0.974389533464800,0.305875449252880,0.020094111670483],
-        [0.305875449252880,-0.974389533464800,0.020094111670483],
-        [-0.974389533464800,-0.331485915788080,0.020094111670483],
-        [-0.331485915788080,-0.974389533464800,0.020094111670483],
-        [-0.617368143234940,0.598534426856625,0.013023443943004],
-        [0.598534426856625,-0.617368143234940,0.013023443943004],
-        [-0.981166283621686,0.598534426856625,0.013023443943004],
-        [0.598534426856625,-0.981166283621686,0.013023443943004],
-        [-0.981166283621686,-0.617368143234940,0.013023443943004],
-        [-0.617368143234940,-0.981166283621686,0.013023443943004],
-        [-0.846737941679184,0.837351785097968,0.005856954369545],
-        [0.837351785097968,-0.846737941679184,0.005856954369545],
-        [-0.990613843418784,0.837351785097968,0.005856954369545],
-        [0.837351785097968,-0.990613843418784,0.005856954369545],
-        [-0.990613843418784,-0.846737941679184,0.005856954369545],
-        [-0.846737941679184,-0.990613843418784,0.005856954369545],
-        [-0.530582382227094,0.412831673770520,0.037746172643499],
-        [0.412831673770520,-0.530582382227094,0.037746172643499],
-        [-0.882249291543426,0.412831673770520,0.037746172643499],
-        [0.412831673770520,-0.882249291543426,0.037746172643499],
-        [-0.882249291543426,-0.530582382227094,0.037746172643499],
-        [-0.530582382227094,-0.882249291543426,0.037746172643499],
-        [-0.230167008731505,0.092655855430620,0.048362752988591],
-        [0.092655855430620,-0.230167008731505,0.048362752988591],
-        [-0.862488846699115,0.092655855430620,0.048362752988591],
-        [0.092655855430620,-0.862488846699115,0.048362752988591],
-        [-0.862488846699115,-0.230167008731505,0.048362752988591],
-        [-0.230167008731505,-0.862488846699115,0.048362752988591],
-        [-0.769841956364772,0.681416462088999,0.023467126169388],
-        [0.681416462088999,-0.769841956364772,0.023467126169388],
-[-0.911574505724228,0.681416462088999,0.023467126169388],
-[0.681416462088999,-0.911574505724228,0.023467126169388],
-[-0.911574505724228,-0.769841956364772,0.023467126169388],
-[-0.769841956364772,-0.911574505724228,0.023467126169388],
-[-0.502901760016855,0.206946937904245,0.054703428836887],
-[0.206946937904245,-0.502901760016855,0.054703428836887],
-[-0.704045177887389,0.206946937904245,0.054703428836887],
-[0.206946937904245,-0.704045177887389,0.054703428836887],
-[-0.704045177887389,-0.502901760016855,0.054703428836887],
-[-0.502901760016855,-0.704045177887389,0.054703428836887],
-[-0.258115377755090,-0.067105414124881,0.045648336152327],
-[-0.067105414124881,-0.258115377755090,0.045648336152327],
-[-0.674779208120030,-0.067105414124880,0.045648336152327],
-[-0.067105414124880,-0.674779208120030,0.045648336152327],
-[-0.674779208120030,-0.258115377755090,0.045648336152327],
-[-0.258115377755090,-0.674779208120030,0.045648336152327],
-],
-18: [
-        [-0.333333333333333,-0.333333333333333,0.044365924378076],
-        [-0.012131216528029,-0.012131216528029,0.019118866558615],
-        [-0.975737566943942,-0.012131216528029,0.019118866558615],
-        [-0.012131216528029,-0.975737566943942,0.019118866558615],
-        [-0.230136518749796,-0.230136518749796,0.049294282264207],
-        [-0.539726962500408,-0.230136518749796,0.049294282264207],
-        [-0.230136518749796,-0.539726962500408,0.049294282264207],
-        [-0.499402807850562,-0.499402807850562,0.060654125981259],
-        [-0.001194384298875,-0.499402807850563,0.060654125981259],
-        [-0.499402807850563,-0.001194384298875,0.060654125981259],
-        [-0.710045241598598,-0.710045241598598,0.031366231844497],
-        [0.420090483197196,-0.710045241598598,0.031366231844497],
-        [-0.710045241598598,0.420090483197196,0.031366231844497],
-        [-0.903019171569391,-0.903019171569391,0.016173035699059],
-        [0.806038343138783,-0.903019171569391,0.016173035699059],
-        [-0.903019171569391,0.806038343138783,0.016173035699059],
-        [-0.972866921676664,-0.972866921676664,0.004750076743416],
-        [0.945733843353328,-0.972866921676664,0.004750076743416],
-        [-0.972866921676664,0.945733843353328,0.004750076743416],
-        [-0.859848143426920,0.852682278520227,0.004329998364046],
-        [0.852682278520227,-0.859848143426920,0.004329998364046],
-        [-0.992834135093306,0.852682278520227,0.004329998364046],
-        [0.852682278520227,-0.992834135093306,0.004329998364046],
-        [-0.992834135093306,-0.859848143426920,0.004329998364046],
-        [-0.859848143426920,-0.992834135093306,0.004329998364046],
-        [-0.592208428296456,0.573110619333459,0.012300136592151],
-        [0.573110619333459,-0.592208428296456,0.012300136592151],
-        [-0.980902191037003,0.573110619333459,0.012300136592151],
-        [0.573110619333459,-0.980902191037003,0.012300136592151],
-        [-0.980902191037003,-0.592208428296456,0.012300136592151],
-        [-0.592208428296456,-0.980902191037003,0.012300136592151],
-        [-0.316660705097116,0.294011442575493,0.017146550496094],
-        [0.294011442575493,-0.316660705097116,0.017146550496094],
-        [-0.977350737478378,0.294011442575493,0.017146550496094],
-        [0.294011442575493,-0.977350737478378,0.017146550496094],
-        [-0.977350737478378,-0.316660705097116,0.017146550496094],
-        [-0.316660705097116,-0.977350737478378,0.017146550496094],
-        [-0.762708275393600,0.720805143081058,0.010992784367686],
-        [0.720805143081058,-0.762708275393600,0.010992784367686],
-        [-0.958096867687458,0.720805143081058,0.010992784367686],
-        [0.720805143081058,-0.958096867687458,0.010992784367686],
-        [-0.958096867687458,-0.762708275393600,0.010992784367686],
-        [-0.762708275393600,-0.958096867687458,0.010992784367686],
-        [-0.499464753852078,0.389673957377540,0.033988423627451],
-        [0.389673957377540,-0.499464753852078,0.033988423627451],
-        [-0.890209203525462,0.389673957377540,0.033988423627451],
-        [0.389673957377540,-0.890209203525462,0.033988423627451],
-        [-0.890209203525462,-0.499464753852078,0.033988423627451],
-        [-0.499464753852078,-0.890209203525462,0.033988423627451],
-        [-0.730193961187213,0.595225312221749,0.025768775250048],
-[0.595225312221749,-0.730193961187213,0.025768775250048],
-[-0.865031351034536,0.595225312221749,0.025768775250048],
-[0.595225312221749,-0.865031351034536,0.025768775250048],
-[-0.865031351034535,-0.730193961187213,0.025768775250048],
-[-0.730193961187213,-0.865031351034535,0.025768775250048],
-[-0.213662181077459,0.092159471784540,0.040023698716305],
-[0.092159471784540,-0.213662181077459,0.040023698716305],
-[-0.878497290707081,0.092159471784540,0.040023698716305],
-[0.092159471784540,-0.878497290707081,0.040023698716305],
-[-0.878497290707081,-0.213662181077459,0.040023698716305],
-[-0.213662181077459,-0.878497290707081,0.040023698716305],
-[-0.268906542375276,-0.010964677486621,0.045277248097616],
-[-0.010964677486621,-0.268906542375276,0.045277248097616],
-[-0.720128780138103,-0.010964677486621,0.045277248097616],
-[-0.010964677486621,-0.720128780138103,0.045277248097616],
-[-0.720128780138103,-0.268906542375276,0.045277248097616],
-[-0.268906542375276,-0.720128780138103,0.045277248097616],
-[-0.507963230765286,0.233062121320884,0.045433087546729],
-[0.233062121320884,-0.507963230765286,0.045433087546729],
-[-0.725098890555598,0.233062121320884,0.045433087546729],
-[0.233062121320884,-0.725098890555598,0.045433087546729],
-[-0.725098890555598,-0.507963230765286,0.045433087546729],
-[-0.507963230765286,-0.725098890555598,0.045433087546729],
-],
-19: [
-        [-0.333333333333333,-0.333333333333333,0.041424760048010],
-        [-0.121193890022463,-0.121193890022463,0.031784855337689],
-        [-0.757612219955075,-0.121193890022463,0.031784855337689],
-        [-0.121193890022463,-0.757612219955075,0.031784855337689],
-        [-0.227921589064499,-0.227921589064499,0.048406599909930],
-        [-0.544156821871001,-0.227921589064499,0.048406599909930],
-        [-0.227921589064499,-0.544156821871001,0.048406599909930],
-        [-0.480832787187258,-0.480832787187258,0.048177661858475],
-        [-0.038334425625484,-0.480832787187258,0.048177661858475],
-        [-0.480832787187258,-0.038334425625484,0.048177661858475],
-        [-0.607587000462791,-0.607587000462791,0.042691162490028],
-        [0.215174000925582,-0.607587000462791,0.042691162490028],
-        [-0.607587000462791,0.215174000925582,0.042691162490028],
-        [-0.728032884013154,-0.728032884013154,0.031889013978028],
-        [0.456065768026307,-0.728032884013154,0.031889013978028],
-        [-0.728032884013154,0.456065768026307,0.031889013978028],
-        [-0.884999963315497,-0.884999963315497,0.015529272923518],
-        [0.769999926630994,-0.884999963315497,0.015529272923518],
-        [-0.884999963315497,0.769999926630994,0.015529272923518],
-        [-0.973927705240279,-0.973927705240279,0.004442852871415],
-        [0.947855410480559,-0.973927705240279,0.004442852871415],
-        [-0.973927705240279,0.947855410480559,0.004442852871415],
-        [-0.419340397282846,0.418549313572482,0.004599409024561],
-        [0.418549313572482,-0.419340397282846,0.004599409024561],
-        [-0.999208916289636,0.418549313572482,0.004599409024561],
-        [0.418549313572482,-0.999208916289636,0.004599409024561],
-        [-0.999208916289636,-0.419340397282846,0.004599409024561],
-        [-0.419340397282846,-0.999208916289636,0.004599409024561],
-        [-0.154285565801825,0.131285016869205,0.016608327001253],
-        [0.131285016869205,-0.154285565801825,0.016608327001253],
-        [-0.976999451067380,0.131285016869205,0.016608327001253],
-        [0.131285016869205,-0.976999451067380,0.016608327001253],
-        [-0.976999451067380,-0.154285565801825,0.016608327001253],
-        [-0.154285565801825,-0.976999451067380,0.016608327001253],
-        [-0.864328042937615,0.842262778125134,0.008508350664254],
-        [0.842262778125134,-0.864328042937615,0.008508350664254],
-        [-0.977934735187519,0.842262778125134,0.008508350664254],
-        [0.842262778125134,-0.977934735187519,0.008508350664254],
-        [-0.977934735187519,-0.864328042937615,0.008508350664254],
-        [-0.864328042937615,-0.977934735187519,0.008508350664254],
-        [-0.676980679779850,0.654351228666662,0.012752760516072],
-        [0.654351228666662,-0.676980679779850,0.012752760516072],
-        [-0.977370548886812,0.654351228666662,0.012752760516072],
-        [0.654351228666662,-0.977370548886812,0.012752760516072],
-        [-0.977370548886812,-0.676980679779850,0.012752760516072],
-        [-0.676980679779850,-0.977370548886812,0.012752760516072],
-        [-0.451038034994882,0.391933493150074,0.024864731137205],
-        [0.391933493150074,-0.451038034994882,0.024864731137205],
-        [-0.940895458155192,0.391933493150074,0.024864731137205],
-        [0.391933493150074,-0.940895458155192,0.024864731137205],
-[-0.940895458155192,-0.451038034994882,0.024864731137205],
-[-0.451038034994882,-0.940895458155192,0.024864731137205],
-[-0.755079003035426,0.643775758022122,0.012779469878381],
-[0.643775758022122,-0.755079003035426,0.012779469878381],
-[-0.888696754986697,0.643775758022122,0.012779469878381],
-[0.643775758022122,-0.888696754986697,0.012779469878381],
-[-0.888696754986697,-0.755079003035426,0.012779469878381],
-[-0.755079003035426,-0.888696754986697,0.012779469878381],
-[-0.668500025831376,0.544622467980326,0.017801502950615],
-[0.544622467980326,-0.668500025831376,0.017801502950615],
-[-0.876122442148950,0.544622467980326,0.017801502950615],
-[0.544622467980326,-0.876122442148950,0.017801502950615],
-[-0.876122442148950,-0.668500025831376,0.017801502950615],
-[-0.668500025831376,-0.876122442148950,0.017801502950615],
-[-0.205954158284095,0.090524206162520,0.035738233266717],
-[0.090524206162520,-0.205954158284095,0.035738233266717],
-[-0.884570047878425,0.090524206162520,0.035738233266717],
-[0.090524206162520,-0.884570047878425,0.035738233266717],
-[-0.884570047878425,-0.205954158284095,0.035738233266717],
-[-0.205954158284095,-0.884570047878425,0.035738233266717],
-[-0.488476686471250,0.295757669634562,0.038344199404453],
-[0.295757669634562,-0.488476686471250,0.038344199404453],
-[-0.807280983163311,0.295757669634562,0.038344199404453],
-[0.295757669634562,-0.807280983163311,0.038344199404453],
-[-0.807280983163311,-0.488476686471250,0.038344199404453],
-[-0.488476686471250,-0.807280983163311,0.038344199404453],
-[-0.342507806805715,0.042214391480752,0.042971513130613],
-[0.042214391480752,-0.342507806805715,0.042971513130613],
-[-0.699706584675037,0.042214391480751,0.042971513130613],
-[0.042214391480751,-0.699706584675037,0.042971513130613],
-[-0.699706584675037,-0.342507806805715,0.042971513130613],
-[-0.342507806805715,-0.699706584675037,0.042971513130613],
-],
-20: [
-        [-0.333333333333333,-0.333333333333333,0.055220853995399],
-        [-0.001500649324429,-0.001500649324429,0.003558059094653],
-        [-0.996998701351142,-0.001500649324429,0.003558059094653],
-        [-0.001500649324429,-0.996998701351142,0.003558059094653],
-        [-0.094139751938951,-0.094139751938951,0.040224796227922],
-        [-0.811720496122098,-0.094139751938951,0.040224796227922],
-        [-0.094139751938951,-0.811720496122098,0.040224796227922],
-        [-0.204472124089526,-0.204472124089526,0.053635694518663],
-        [-0.591055751820947,-0.204472124089526,0.053635694518663],
-        [-0.204472124089526,-0.591055751820947,0.053635694518663],
-        [-0.470999594934425,-0.470999594934425,0.049046267603004],
-        [-0.058000810131149,-0.470999594934425,0.049046267603004],
-        [-0.470999594934425,-0.058000810131149,0.049046267603004],
-        [-0.577962071815846,-0.577962071815846,0.032789156821391],
-        [0.155924143631693,-0.577962071815846,0.032789156821391],
-        [-0.577962071815846,0.155924143631693,0.032789156821391],
-        [-0.784528785657457,-0.784528785657457,0.029591814797299],
-        [0.569057571314915,-0.784528785657457,0.029591814797299],
-        [-0.784528785657457,0.569057571314915,0.029591814797299],
-        [-0.921861824324395,-0.921861824324395,0.009158564555409],
-        [0.843723648648789,-0.921861824324395,0.009158564555409],
-        [-0.921861824324395,0.843723648648789,0.009158564555409],
-        [-0.977651240541341,-0.977651240541341,0.003303653031152],
-        [0.955302481082681,-0.977651240541341,0.003303653031152],
-        [-0.977651240541341,0.955302481082681,0.003303653031152],
-        [-0.872900668183296,0.862201431808621,0.004698341817151],
-        [0.862201431808621,-0.872900668183296,0.004698341817151],
-        [-0.989300763625325,0.862201431808621,0.004698341817151],
-        [0.862201431808621,-0.989300763625325,0.004698341817151],
-        [-0.989300763625325,-0.872900668183295,0.004698341817151],
-        [-0.872900668183295,-0.989300763625325,0.004698341817151],
-        [-0.685786162118586,0.669876527986188,0.008931851508364],
-        [0.669876527986188,-0.685786162118586,0.008931851508364],
-        [-0.984090365867602,0.669876527986188,0.008931851508364],
-        [0.669876527986188,-0.984090365867602,0.008931851508364],
-        [-0.984090365867602,-0.685786162118586,0.008931851508364],
-        [-0.685786162118586,-0.984090365867602,0.008931851508364],
-        [-0.208715771271252,0.187870974708724,0.012199133615816],
-        [0.187870974708724,-0.208715771271252,0.012199133615816],
-        [-0.979155203437472,0.187870974708724,0.012199133615816],
-        [0.187870974708724,-0.979155203437472,0.012199133615816],
-        [-0.979155203437472,-0.208715771271252,0.012199133615816],
-        [-0.208715771271252,-0.979155203437472,0.012199133615816],
-        [-0.453664858574179,0.431736028981932,0.013782162654376],
-        [0.431736028981932,-0.453664858574179,0.013782162654376],
-        [-0.978071170407753,0.431736028981932,0.013782162654376],
-        [0.431736028981932,-0.978071170407753,0.013782162654376],
-        [-0.978071170407753,-0.453664858574179,0.013782162654376],
-        [-0.453664858574179,-0.978071170407753,0.013782162654376],
-        [-0.796429235029966,0.719295810859041,0.015994950144956],
-[0.719295810859041,-0.796429235029966,0.015994950144956],
-[-0.922866575829075,0.719295810859041,0.015994950144956],
-[0.719295810859041,-0.922866575829075,0.015994950144956],
-[-0.922866575829075,-0.796429235029966,0.015994950144956],
-[-0.796429235029966,-0.922866575829075,0.015994950144956],
-[-0.106682901647172,0.035521886012736,0.014772268570672],
-[0.035521886012736,-0.106682901647172,0.014772268570672],
-[-0.928838984365563,0.035521886012736,0.014772268570672],
-[0.035521886012736,-0.928838984365563,0.014772268570672],
-[-0.928838984365564,-0.106682901647172,0.014772268570672],
-[-0.106682901647172,-0.928838984365564,0.014772268570672],
-[-0.601978411700994,0.502636778975466,0.025598663757297],
-[0.502636778975466,-0.601978411700994,0.025598663757297],
-[-0.900658367274472,0.502636778975466,0.025598663757297],
-[0.502636778975466,-0.900658367274472,0.025598663757297],
-[-0.900658367274472,-0.601978411700994,0.025598663757297],
-[-0.601978411700994,-0.900658367274472,0.025598663757297],
-[-0.351477632615435,0.234438182446771,0.034516142351393],
-[0.234438182446771,-0.351477632615435,0.034516142351393],
-[-0.882960549831337,0.234438182446771,0.034516142351393],
-[0.234438182446771,-0.882960549831337,0.034516142351393],
-[-0.882960549831337,-0.351477632615435,0.034516142351393],
-[-0.351477632615435,-0.882960549831337,0.034516142351393],
-[-0.582937273579734,0.339941699570946,0.037345891805871],
-[0.339941699570946,-0.582937273579734,0.037345891805871],
-[-0.757004425991211,0.339941699570946,0.037345891805871],
-[0.339941699570946,-0.757004425991211,0.037345891805871],
-[-0.757004425991211,-0.582937273579734,0.037345891805871],
-[-0.582937273579734,-0.757004425991211,0.037345891805871],
-[-0.353658866927485,0.072237177039608,0.045636448116791],
-[0.072237177039608,-0.353658866927485,0.045636448116791],
-[-0.718578310112123,0.072237177039608,0.045636448116791],
-[0.072237177039608,-0.718578310112123,0.045636448116791],
-[-0.718578310112123,-0.353658866927485,0.045636448116791],
-[-0.353658866927485,-0.718578310112123,0.045636448116791],
-],
-21: [
-        [-0.006427416686680,-0.006427416686680,0.009411977990382],
-        [-0.987145166626641,-0.006427416686680,0.009411977990382],
-        [-0.006427416686680,-0.987145166626641,0.009411977990382],
-        [-0.037371238381685,-0.037371238381685,0.023551229711283],
-        [-0.925257523236629,-0.037371238381685,0.023551229711283],
-        [-0.037371238381685,-0.925257523236629,0.023551229711283],
-        [-0.101972641308225,-0.101972641308225,0.041353961937512],
-        [-0.796054717383551,-0.101972641308225,0.041353961937512],
-        [-0.101972641308225,-0.796054717383551,0.041353961937512],
-        [-0.405469125577621,-0.405469125577621,0.045947520102707],
-        [-0.189061748844758,-0.405469125577621,0.045947520102707],
-        [-0.405469125577621,-0.189061748844758,0.045947520102707],
-        [-0.556282620757932,-0.556282620757932,0.047724273523632],
-        [0.112565241515865,-0.556282620757932,0.047724273523632],
-        [-0.556282620757932,0.112565241515865,0.047724273523632],
-        [-0.787490889149774,-0.787490889149774,0.019906824503099],
-        [0.574981778299548,-0.787490889149774,0.019906824503099],
-        [-0.787490889149774,0.574981778299548,0.019906824503099],
-        [-0.892713038713217,-0.892713038713217,0.014287994054933],
-        [0.785426077426434,-0.892713038713217,0.014287994054933],
-        [-0.892713038713217,0.785426077426434,0.014287994054933],
-        [-0.975095902008750,0.956581360464913,0.001538784565604],
-        [0.956581360464913,-0.975095902008750,0.001538784565604],
-        [-0.981485458456163,0.956581360464913,0.001538784565604],
-        [0.956581360464913,-0.981485458456163,0.001538784565604],
-        [-0.981485458456163,-0.975095902008750,0.001538784565604],
-        [-0.975095902008750,-0.981485458456163,0.001538784565604],
-        [-0.734190363492767,0.718759150923754,0.007257720730941],
-        [0.718759150923754,-0.734190363492767,0.007257720730941],
-        [-0.984568787430988,0.718759150923754,0.007257720730941],
-        [0.718759150923754,-0.984568787430988,0.007257720730941],
-        [-0.984568787430988,-0.734190363492767,0.007257720730941],
-        [-0.734190363492767,-0.984568787430988,0.007257720730941],
-        [-0.279909645448207,0.260066127858194,0.013303360825119],
-        [0.260066127858194,-0.279909645448207,0.013303360825119],
-        [-0.980156482409987,0.260066127858194,0.013303360825119],
-        [0.260066127858194,-0.980156482409987,0.013303360825119],
-        [-0.980156482409987,-0.279909645448207,0.013303360825119],
-        [-0.279909645448207,-0.980156482409987,0.013303360825119],
-        [-0.527626383829046,0.508213994286434,0.011413497063052],
-        [0.508213994286434,-0.527626383829046,0.011413497063052],
-        [-0.980587610457388,0.508213994286434,0.011413497063052],
-        [0.508213994286434,-0.980587610457388,0.011413497063052],
-        [-0.980587610457388,-0.527626383829046,0.011413497063052],
-        [-0.527626383829046,-0.980587610457388,0.011413497063052],
-        [-0.887945885434766,0.867094084690673,0.006552521291655],
-        [0.867094084690673,-0.887945885434766,0.006552521291655],
-        [-0.979148199255907,0.867094084690673,0.006552521291655],
-        [0.867094084690673,-0.979148199255907,0.006552521291655],
-        [-0.979148199255907,-0.887945885434766,0.006552521291655],
-[-0.887945885434766,-0.979148199255907,0.006552521291655],
-[-0.738154400021390,0.655149643679198,0.017432381135646],
-[0.655149643679198,-0.738154400021390,0.017432381135646],
-[-0.916995243657807,0.655149643679198,0.017432381135646],
-[0.655149643679198,-0.916995243657807,0.017432381135646],
-[-0.916995243657807,-0.738154400021390,0.017432381135646],
-[-0.738154400021390,-0.916995243657807,0.017432381135646],
-[-0.296840355384531,0.194393499586184,0.027402609499462],
-[0.194393499586184,-0.296840355384531,0.027402609499462],
-[-0.897553144201652,0.194393499586184,0.027402609499462],
-[0.194393499586184,-0.897553144201652,0.027402609499462],
-[-0.897553144201652,-0.296840355384531,0.027402609499462],
-[-0.296840355384531,-0.897553144201652,0.027402609499462],
-[-0.531632641825188,0.431035654635683,0.025014173853794],
-[0.431035654635683,-0.531632641825188,0.025014173853794],
-[-0.899403012810496,0.431035654635683,0.025014173853794],
-[0.431035654635683,-0.899403012810496,0.025014173853794],
-[-0.899403012810496,-0.531632641825188,0.025014173853794],
-[-0.531632641825188,-0.899403012810496,0.025014173853794],
-[-0.682130525363537,0.500223407469218,0.008690112508894],
-[0.500223407469218,-0.682130525363537,0.008690112508894],
-[-0.818092882105681,0.500223407469218,0.008690112508894],
-[0.500223407469218,-0.818092882105681,0.008690112508894],
-[-0.818092882105681,-0.682130525363537,0.008690112508894],
-[-0.682130525363537,-0.818092882105681,0.008690112508894],
-[-0.376270450471865,0.138207573987544,0.037386369243416],
-[0.138207573987544,-0.376270450471865,0.037386369243416],
-[-0.761937123515678,0.138207573987544,0.037386369243416],
-[0.138207573987544,-0.761937123515678,0.037386369243416],
-[-0.761937123515678,-0.376270450471865,0.037386369243416],
-[-0.376270450471865,-0.761937123515678,0.037386369243416],
-[-0.590719081005038,0.339375331943743,0.032509611084921],
-[0.339375331943743,-0.590719081005038,0.032509611084921],
-[-0.748656250938705,0.339375331943743,0.032509611084921],
-[0.339375331943743,-0.748656250938705,0.032509611084921],
-[-0.748656250938705,-0.590719081005038,0.032509611084921],
-[-0.590719081005038,-0.748656250938705,0.032509611084921],
-[-0.305527033262063,-0.081590222620926,0.043740300619054],
-[-0.081590222620926,-0.305527033262063,0.043740300619054],
-[-0.612882744117011,-0.081590222620926,0.043740300619054],
-[-0.081590222620926,-0.612882744117011,0.043740300619054],
-[-0.612882744117011,-0.305527033262063,0.043740300619054],
-[-0.305527033262063,-0.612882744117011,0.043740300619054],
-],
-22: [
-        [-0.333333333333333,-0.333333333333333,0.052134891986775],
-        [-0.005980679319437,-0.005980679319437,0.002127559342619],
-        [-0.988038641361126,-0.005980679319437,0.002127559342619],
-        [-0.005980679319437,-0.988038641361126,0.002127559342619],
-        [-0.112289615572167,-0.112289615572167,0.040243429730281],
-        [-0.775420768855665,-0.112289615572167,0.040243429730281],
-        [-0.112289615572167,-0.775420768855665,0.040243429730281],
-        [-0.209082673923590,-0.209082673923590,0.048340550896214],
-        [-0.581834652152820,-0.209082673923590,0.048340550896214],
-        [-0.209082673923590,-0.581834652152820,0.048340550896214],
-        [-0.467712894350161,-0.467712894350161,0.047378470721283],
-        [-0.064574211299679,-0.467712894350161,0.047378470721283],
-        [-0.467712894350161,-0.064574211299679,0.047378470721283],
-        [-0.616276252022817,-0.616276252022817,0.040231109011798],
-        [0.232552504045635,-0.616276252022817,0.040231109011798],
-        [-0.616276252022817,0.232552504045635,0.040231109011798],
-        [-0.755246756631224,-0.755246756631224,0.027899919845537],
-        [0.510493513262448,-0.755246756631224,0.027899919845537],
-        [-0.755246756631224,0.510493513262448,0.027899919845537],
-        [-0.893562558892192,-0.893562558892192,0.012350949744993],
-        [0.787125117784384,-0.893562558892192,0.012350949744993],
-        [-0.893562558892192,0.787125117784384,0.012350949744993],
-        [-0.943105536827199,-0.943105536827199,0.003039705316805],
-        [0.886211073654399,-0.943105536827199,0.003039705316805],
-        [-0.943105536827199,0.886211073654399,0.003039705316805],
-        [-0.991786296535875,-0.991786296535875,0.000691671630889],
-        [0.983572593071750,-0.991786296535875,0.000691671630889],
-        [-0.991786296535875,0.983572593071750,0.000691671630889],
-        [-0.413667191986728,0.401491377065593,0.008022198405286],
-        [0.401491377065593,-0.413667191986728,0.008022198405286],
-        [-0.987824185078864,0.401491377065593,0.008022198405286],
-        [0.401491377065593,-0.987824185078864,0.008022198405286],
-        [-0.987824185078865,-0.413667191986728,0.008022198405286],
-        [-0.413667191986728,-0.987824185078865,0.008022198405286],
-        [-0.932052869826067,0.918490219898898,0.003090974933637],
-        [0.918490219898898,-0.932052869826067,0.003090974933637],
-        [-0.986437350072830,0.918490219898898,0.003090974933637],
-        [0.918490219898898,-0.986437350072830,0.003090974933637],
-        [-0.986437350072830,-0.932052869826067,0.003090974933637],
-        [-0.932052869826067,-0.986437350072830,0.003090974933637],
-        [-0.640599464469824,0.623868058857117,0.008631214056178],
-        [0.623868058857117,-0.640599464469824,0.008631214056178],
-        [-0.983268594387293,0.623868058857116,0.008631214056178],
-        [0.623868058857116,-0.983268594387293,0.008631214056178],
-        [-0.983268594387293,-0.640599464469824,0.008631214056178],
-        [-0.640599464469824,-0.983268594387293,0.008631214056178],
-        [-0.158411570812104,0.140890429939385,0.010897457944070],
-        [0.140890429939385,-0.158411570812104,0.010897457944070],
-        [-0.982478859127282,0.140890429939385,0.010897457944070],
-        [0.140890429939385,-0.982478859127282,0.010897457944070],
-[-0.982478859127282,-0.158411570812104,0.010897457944070],
-[-0.158411570812104,-0.982478859127282,0.010897457944070],
-[-0.814806216564922,0.793459188393794,0.008001551263950],
-[0.793459188393794,-0.814806216564922,0.008001551263950],
-[-0.978652971828873,0.793459188393795,0.008001551263950],
-[0.793459188393795,-0.978652971828873,0.008001551263950],
-[-0.978652971828873,-0.814806216564922,0.008001551263950],
-[-0.814806216564922,-0.978652971828873,0.008001551263950],
-[-0.363960589331557,0.295112627690632,0.017745434082141],
-[0.295112627690632,-0.363960589331557,0.017745434082141],
-[-0.931152038359075,0.295112627690632,0.017745434082141],
-[0.295112627690632,-0.931152038359075,0.017745434082141],
-[-0.931152038359075,-0.363960589331557,0.017745434082141],
-[-0.363960589331557,-0.931152038359075,0.017745434082141],
-[-0.570323384314285,0.491002374048080,0.017950672107247],
-[0.491002374048080,-0.570323384314285,0.017950672107247],
-[-0.920678989733795,0.491002374048080,0.017950672107247],
-[0.491002374048080,-0.920678989733795,0.017950672107247],
-[-0.920678989733795,-0.570323384314285,0.017950672107247],
-[-0.570323384314285,-0.920678989733795,0.017950672107247],
-[-0.134636707603169,0.047157943371727,0.019228676191702],
-[0.047157943371727,-0.134636707603169,0.019228676191702],
-[-0.912521235768557,0.047157943371727,0.019228676191702],
-[0.047157943371727,-0.912521235768557,0.019228676191702],
-[-0.912521235768557,-0.134636707603169,0.019228676191702],
-[-0.134636707603169,-0.912521235768557,0.019228676191702],
-[-0.752804662376914,0.649201355096884,0.019100455942623],
-[0.649201355096884,-0.752804662376914,0.019100455942623],
-[-0.896396692719970,0.649201355096884,0.019100455942623],
-[0.649201355096884,-0.896396692719970,0.019100455942623],
-[-0.896396692719970,-0.752804662376914,0.019100455942623],
-[-0.752804662376914,-0.896396692719970,0.019100455942623],
-[-0.328638645186542,0.161176552903625,0.028083739150636],
-[0.161176552903625,-0.328638645186542,0.028083739150636],
-[-0.832537907717083,0.161176552903625,0.028083739150636],
-[0.161176552903625,-0.832537907717083,0.028083739150636],
-[-0.832537907717083,-0.328638645186542,0.028083739150636],
-[-0.328638645186542,-0.832537907717083,0.028083739150636],
-[-0.559939069093864,0.361861076343249,0.031874915632607],
-[0.361861076343249,-0.559939069093864,0.031874915632607],
-[-0.801922007249385,0.361861076343249,0.031874915632607],
-[0.361861076343249,-0.801922007249385,0.031874915632607],
-[-0.801922007249385,-0.559939069093864,0.031874915632607],
-[-0.559939069093864,-0.801922007249385,0.031874915632607],
-[-0.388196135129182,0.068617773977901,0.040865211838584],
-[0.068617773977901,-0.388196135129182,0.040865211838584],
-[-0.680421638848718,0.068617773977901,0.040865211838584],
-[0.068617773977901,-0.680421638848718,0.040865211838584],
-[-0.680421638848718,-0.388196135129182,0.040865211838584],
-[-0.388196135129182,-0.680421638848718,0.040865211838584],
-],
-23: [
-        [-0.333333333333333,-0.333333333333333,0.049993627092845],
-        [-0.023538910955543,-0.023538910955543,0.008227775544650],
-        [-0.952922178088914,-0.023538910955543,0.008227775544650],
-        [-0.023538910955543,-0.952922178088914,0.008227775544650],
-        [-0.112255282121933,-0.112255282121933,0.037662477311797],
-        [-0.775489435756134,-0.112255282121933,0.037662477311797],
-        [-0.112255282121933,-0.775489435756134,0.037662477311797],
-        [-0.212088442838205,-0.212088442838205,0.046916667243031],
-        [-0.575823114323591,-0.212088442838205,0.046916667243031],
-        [-0.212088442838205,-0.575823114323591,0.046916667243031],
-        [-0.467032671065063,-0.467032671065063,0.047191879210718],
-        [-0.065934657869875,-0.467032671065063,0.047191879210718],
-        [-0.467032671065063,-0.065934657869875,0.047191879210718],
-        [-0.602458675644835,-0.602458675644835,0.039689081561875],
-        [0.204917351289670,-0.602458675644835,0.039689081561875],
-        [-0.602458675644835,0.204917351289670,0.039689081561875],
-        [-0.729340080155585,-0.729340080155585,0.029223692430473],
-        [0.458680160311169,-0.729340080155585,0.029223692430473],
-        [-0.729340080155585,0.458680160311169,0.029223692430473],
-        [-0.835032835950571,-0.835032835950571,0.018566057479642],
-        [0.670065671901142,-0.835032835950571,0.018566057479642],
-        [-0.835032835950571,0.670065671901142,0.018566057479642],
-        [-0.916650365183127,-0.916650365183127,0.008784960019827],
-        [0.833300730366254,-0.916650365183127,0.008784960019827],
-        [-0.916650365183127,0.833300730366254,0.008784960019827],
-        [-0.982250743407210,-0.982250743407210,0.002061552741126],
-        [0.964501486814420,-0.982250743407210,0.002061552741126],
-        [-0.982250743407210,0.964501486814420,0.002061552741126],
-        [-0.105601712649592,0.098292547426640,0.004448377162851],
-        [0.098292547426640,-0.105601712649592,0.004448377162851],
-        [-0.992690834777047,0.098292547426640,0.004448377162851],
-        [0.098292547426640,-0.992690834777047,0.004448377162851],
-        [-0.992690834777047,-0.105601712649592,0.004448377162851],
-        [-0.105601712649592,-0.992690834777047,0.004448377162851],
-        [-0.775227228315076,0.773362241907340,0.002318973002522],
-        [0.773362241907340,-0.775227228315076,0.002318973002522],
-        [-0.998135013592264,0.773362241907340,0.002318973002522],
-        [0.773362241907340,-0.998135013592264,0.002318973002522],
-        [-0.998135013592264,-0.775227228315076,0.002318973002522],
-        [-0.775227228315076,-0.998135013592264,0.002318973002522],
-        [-0.399056075238285,0.392811698367078,0.005127488569570],
-        [0.392811698367078,-0.399056075238285,0.005127488569570],
-        [-0.993755623128794,0.392811698367078,0.005127488569570],
-        [0.392811698367078,-0.993755623128794,0.005127488569570],
-        [-0.993755623128794,-0.399056075238285,0.005127488569570],
-        [-0.399056075238285,-0.993755623128794,0.005127488569570],
-        [-0.907633572417643,0.891831436837026,0.004167853762943],
-        [0.891831436837026,-0.907633572417643,0.004167853762943],
-        [-0.984197864419384,0.891831436837026,0.004167853762943],
-        [0.891831436837026,-0.984197864419384,0.004167853762943],
-[-0.984197864419383,-0.907633572417642,0.004167853762943],
-[-0.907633572417642,-0.984197864419383,0.004167853762943],
-[-0.610008084404048,0.588812673873118,0.010245094978581],
-[0.588812673873118,-0.610008084404048,0.010245094978581],
-[-0.978804589469070,0.588812673873118,0.010245094978581],
-[0.588812673873118,-0.978804589469070,0.010245094978581],
-[-0.978804589469070,-0.610008084404048,0.010245094978581],
-[-0.610008084404048,-0.978804589469070,0.010245094978581],
-[-0.243171741354056,0.207960140279272,0.012823590639281],
-[0.207960140279272,-0.243171741354056,0.012823590639281],
-[-0.964788398925216,0.207960140279272,0.012823590639281],
-[0.207960140279272,-0.964788398925216,0.012823590639281],
-[-0.964788398925216,-0.243171741354055,0.012823590639281],
-[-0.243171741354055,-0.964788398925216,0.012823590639281],
-[-0.789506197850739,0.739925802118596,0.011635516794817],
-[0.739925802118596,-0.789506197850739,0.011635516794817],
-[-0.950419604267857,0.739925802118596,0.011635516794817],
-[0.739925802118596,-0.950419604267857,0.011635516794817],
-[-0.950419604267857,-0.789506197850739,0.011635516794817],
-[-0.789506197850739,-0.950419604267857,0.011635516794817],
-[-0.455884762353173,0.385117794610837,0.019844273900077],
-[0.385117794610837,-0.455884762353173,0.019844273900077],
-[-0.929233032257664,0.385117794610837,0.019844273900077],
-[0.385117794610837,-0.929233032257664,0.019844273900077],
-[-0.929233032257664,-0.455884762353173,0.019844273900077],
-[-0.455884762353173,-0.929233032257664,0.019844273900077],
-[-0.112482048478797,0.019740291196956,0.011754407449188],
-[0.019740291196956,-0.112482048478797,0.011754407449188],
-[-0.907258242718159,0.019740291196956,0.011754407449188],
-[0.019740291196956,-0.907258242718159,0.011754407449188],
-[-0.907258242718159,-0.112482048478797,0.011754407449188],
-[-0.112482048478797,-0.907258242718159,0.011754407449188],
-[-0.664205324633765,0.550530931038120,0.021600208906600],
-[0.550530931038120,-0.664205324633765,0.021600208906600],
-[-0.886325606404355,0.550530931038120,0.021600208906600],
-[0.550530931038120,-0.886325606404355,0.021600208906600],
-[-0.886325606404354,-0.664205324633765,0.021600208906600],
-[-0.664205324633765,-0.886325606404354,0.021600208906600],
-[-0.295594853518405,0.152149871080588,0.028495796363599],
-[0.152149871080588,-0.295594853518405,0.028495796363599],
-[-0.856555017562183,0.152149871080588,0.028495796363599],
-[0.152149871080588,-0.856555017562183,0.028495796363599],
-[-0.856555017562183,-0.295594853518405,0.028495796363599],
-[-0.295594853518405,-0.856555017562183,0.028495796363599],
-[-0.525935282564036,0.319991164262401,0.031988381018369],
-[0.319991164262401,-0.525935282564036,0.031988381018369],
-[-0.794055881698366,0.319991164262401,0.031988381018369],
-[0.319991164262401,-0.794055881698366,0.031988381018369],
-[-0.794055881698366,-0.525935282564036,0.031988381018369],
-[-0.525935282564036,-0.794055881698366,0.031988381018369],
-[-0.368673747852155,0.056982821883363,0.041389027831224],
-[0.056982821883363,-0.368673747852155,0.041389027831224],
-[-0.688309074031208,0.056982821883363,0.041389027831224],
-[0.056982821883363,-0.688309074031208,0.041389027831224],
-[-0.688309074031208,-0.368673747852155,0.041389027831224],
-[-0.368673747852155,-0.688309074031208,0.041389027831224],
-],
-24: [
-        [-0.333333333333333,-0.333333333333333,0.031330242175782],
-        [-0.031382760283421,-0.031382760283421,0.014717653847587],
-        [-0.937234479433159,-0.031382760283421,0.014717653847587],
-        [-0.031382760283421,-0.937234479433159,0.014717653847587],
-        [-0.120096233850662,-0.120096233850662,0.030963348398970],
-        [-0.759807532298676,-0.120096233850662,0.030963348398970],
-        [-0.120096233850662,-0.759807532298676,0.030963348398970],
-        [-0.217343938317536,-0.217343938317536,0.037986940843648],
-        [-0.565312123364928,-0.217343938317536,0.037986940843648],
-        [-0.217343938317536,-0.565312123364928,0.037986940843648],
-        [-0.429818284439074,-0.429818284439074,0.033466254011049],
-        [-0.140363431121852,-0.429818284439074,0.033466254011049],
-        [-0.429818284439074,-0.140363431121852,0.033466254011049],
-        [-0.522392801883300,-0.522392801883300,0.029203686754054],
-        [0.044785603766601,-0.522392801883300,0.029203686754054],
-        [-0.522392801883300,0.044785603766601,0.029203686754054],
-        [-0.704274510649686,-0.704274510649686,0.022147482605586],
-        [0.408549021299373,-0.704274510649686,0.022147482605586],
-        [-0.704274510649686,0.408549021299373,0.022147482605586],
-        [-0.843105586121546,-0.843105586121546,0.015827753677335],
-        [0.686211172243092,-0.843105586121546,0.015827753677335],
-        [-0.843105586121546,0.686211172243092,0.015827753677335],
-        [-0.936285318267427,-0.936285318267427,0.005897827695084],
-        [0.872570636534854,-0.936285318267427,0.005897827695084],
-        [-0.936285318267427,0.872570636534854,0.005897827695084],
-        [-0.983008712604130,-0.983008712604130,0.001905131297570],
-        [0.966017425208259,-0.983008712604130,0.001905131297570],
-        [-0.983008712604130,0.966017425208259,0.001905131297570],
-        [-0.133936561710478,0.120327965916980,0.008627443386199],
-        [0.120327965916980,-0.133936561710478,0.008627443386199],
-        [-0.986391404206501,0.120327965916980,0.008627443386199],
-        [0.120327965916980,-0.986391404206501,0.008627443386199],
-        [-0.986391404206501,-0.133936561710478,0.008627443386199],
-        [-0.133936561710478,-0.986391404206501,0.008627443386199],
-        [-0.589559941056661,0.574991625876557,0.007292016855628],
-        [0.574991625876557,-0.589559941056661,0.007292016855628],
-        [-0.985431684819897,0.574991625876557,0.007292016855628],
-        [0.574991625876557,-0.985431684819897,0.007292016855628],
-        [-0.985431684819897,-0.589559941056661,0.007292016855628],
-        [-0.589559941056661,-0.985431684819897,0.007292016855628],
-        [-0.375079684130172,0.361371712031196,0.008117703702749],
-        [0.361371712031196,-0.375079684130172,0.008117703702749],
-        [-0.986292027901024,0.361371712031196,0.008117703702749],
-        [0.361371712031196,-0.986292027901024,0.008117703702749],
-        [-0.986292027901024,-0.375079684130172,0.008117703702749],
-        [-0.375079684130172,-0.986292027901024,0.008117703702749],
-        [-0.906832105591067,0.897244066241012,0.002858359515171],
-        [0.897244066241012,-0.906832105591067,0.002858359515171],
-        [-0.990411960649945,0.897244066241012,0.002858359515171],
-        [0.897244066241012,-0.990411960649945,0.002858359515171],
-[-0.990411960649945,-0.906832105591067,0.002858359515171],
-[-0.906832105591067,-0.990411960649945,0.002858359515171],
-[-0.768281564078976,0.757477531703546,0.004596788633153],
-[0.757477531703546,-0.768281564078976,0.004596788633153],
-[-0.989195967624570,0.757477531703546,0.004596788633153],
-[0.757477531703546,-0.989195967624570,0.004596788633153],
-[-0.989195967624570,-0.768281564078975,0.004596788633153],
-[-0.768281564078975,-0.989195967624570,0.004596788633153],
-[-0.498678726055310,0.424585822926150,0.017097477649229],
-[0.424585822926150,-0.498678726055310,0.017097477649229],
-[-0.925907096870839,0.424585822926150,0.017097477649229],
-[0.424585822926150,-0.925907096870839,0.017097477649229],
-[-0.925907096870839,-0.498678726055310,0.017097477649229],
-[-0.498678726055310,-0.925907096870839,0.017097477649229],
-[-0.279607664483490,0.208396882316209,0.018575372163249],
-[0.208396882316209,-0.279607664483490,0.018575372163249],
-[-0.928789217832719,0.208396882316209,0.018575372163249],
-[0.208396882316209,-0.928789217832719,0.018575372163249],
-[-0.928789217832719,-0.279607664483490,0.018575372163249],
-[-0.279607664483490,-0.928789217832719,0.018575372163249],
-[-0.837737372642508,0.780926628976898,0.008711688567270],
-[0.780926628976898,-0.837737372642508,0.008711688567270],
-[-0.943189256334389,0.780926628976898,0.008711688567270],
-[0.780926628976898,-0.943189256334389,0.008711688567270],
-[-0.943189256334389,-0.837737372642508,0.008711688567270],
-[-0.837737372642508,-0.943189256334389,0.008711688567270],
-[-0.693711793201882,0.625024627714433,0.013292883787775],
-[0.625024627714433,-0.693711793201882,0.013292883787775],
-[-0.931312834512551,0.625024627714433,0.013292883787775],
-[0.625024627714433,-0.931312834512551,0.013292883787775],
-[-0.931312834512551,-0.693711793201882,0.013292883787775],
-[-0.693711793201882,-0.931312834512551,0.013292883787775],
-[0.004700993829951,-0.135567929734853,0.012281001510740],
-[-0.135567929734853,0.004700993829951,0.012281001510740],
-[-0.869133064095098,-0.135567929734853,0.012281001510740],
-[-0.135567929734853,-0.869133064095098,0.012281001510740],
-[-0.869133064095098,0.004700993829951,0.012281001510740],
-[0.004700993829951,-0.869133064095098,0.012281001510740],
-[-0.521976982650353,0.349105045944945,0.021820885555420],
-[0.349105045944945,-0.521976982650353,0.021820885555420],
-[-0.827128063294591,0.349105045944945,0.021820885555420],
-[0.349105045944945,-0.827128063294591,0.021820885555420],
-[-0.827128063294591,-0.521976982650353,0.021820885555420],
-[-0.521976982650353,-0.827128063294591,0.021820885555420],
-[-0.326968721136217,0.144732602043697,0.027371090249668],
-[0.144732602043697,-0.326968721136217,0.027371090249668],
-[-0.817763880907480,0.144732602043697,0.027371090249668],
-[0.144732602043697,-0.817763880907480,0.027371090249668],
-[-0.817763880907480,-0.326968721136217,0.027371090249668],
-[-0.326968721136217,-0.817763880907480,0.027371090249668],
-[-0.696116803866709,0.531011336134871,0.018737543889147],
-[0.531011336134871,-0.696116803866709,0.018737543889147],
-[-0.834894532268162,0.531011336134871,0.018737543889147],
-[0.531011336134871,-0.834894532268162,0.018737543889147],
-[-0.834894532268162,-0.696116803866709,0.018737543889147],
-[-0.696116803866709,-0.834894532268162,0.018737543889147],
-[-0.536404917748559,0.226734558438523,0.028700757241388],
-[0.226734558438523,-0.536404917748559,0.028700757241388],
-[-0.690329640689964,0.226734558438523,0.028700757241388],
-[0.226734558438523,-0.690329640689964,0.028700757241388],
-[-0.690329640689964,-0.536404917748559,0.028700757241388],
-[-0.536404917748559,-0.690329640689964,0.028700757241388],
-[-0.344489563789357,0.009282127094255,0.033972574031807],
-[0.009282127094255,-0.344489563789357,0.033972574031807],
-[-0.664792563304898,0.009282127094255,0.033972574031807],
-[0.009282127094255,-0.664792563304898,0.033972574031807],
-[-0.664792563304898,-0.344489563789357,0.033972574031807],
-[-0.344489563789357,-0.664792563304898,0.033972574031807],
-],
-25: [
-        [-0.027946483073174,-0.027946483073174,0.016011163760041],
-        [-0.944107033853652,-0.027946483073174,0.016011163760041],
-        [-0.027946483073174,-0.944107033853652,0.016011163760041],
-        [-0.131178601327651,-0.131178601327651,0.031894153664781],
-        [-0.737642797344697,-0.131178601327651,0.031894153664781],
-        [-0.131178601327651,-0.737642797344697,0.031894153664781],
-        [-0.220221729512072,-0.220221729512072,0.026218282461591],
-        [-0.559556540975855,-0.220221729512072,0.026218282461591],
-        [-0.220221729512072,-0.559556540975855,0.026218282461591],
-        [-0.403113531960391,-0.403113531960391,0.039166001931271],
-        [-0.193772936079218,-0.403113531960391,0.039166001931271],
-        [-0.403113531960391,-0.193772936079218,0.039166001931271],
-        [-0.531911655325256,-0.531911655325256,0.032941770883075],
-        [0.063823310650513,-0.531911655325256,0.032941770883075],
-        [-0.531911655325256,0.063823310650513,0.032941770883075],
-        [-0.697063330781965,-0.697063330781965,0.017094558148184],
-        [0.394126661563930,-0.697063330781965,0.017094558148184],
-        [-0.697063330781965,0.394126661563930,0.017094558148184],
-        [-0.774532212908013,-0.774532212908013,0.016323771714453],
-        [0.549064425816026,-0.774532212908013,0.016323771714453],
-        [-0.774532212908013,0.549064425816026,0.016323771714453],
-        [-0.844568615816947,-0.844568615816947,0.012242293079968],
-        [0.689137231633895,-0.844568615816948,0.012242293079968],
-        [-0.844568615816948,0.689137231633895,0.012242293079968],
-        [-0.930213812771406,-0.930213812771406,0.005816996529873],
-        [0.860427625542812,-0.930213812771406,0.005816996529873],
-        [-0.930213812771406,0.860427625542812,0.005816996529873],
-        [-0.985483630758135,-0.985483630758135,0.001384550491324],
-        [0.970967261516271,-0.985483630758135,0.001384550491324],
-        [-0.985483630758135,0.970967261516271,0.001384550491324],
-        [-0.545571095693272,0.542986390284387,0.002496578398555],
-        [0.542986390284387,-0.545571095693272,0.002496578398555],
-        [-0.997415294591116,0.542986390284387,0.002496578398555],
-        [0.542986390284387,-0.997415294591116,0.002496578398555],
-        [-0.997415294591116,-0.545571095693272,0.002496578398555],
-        [-0.545571095693272,-0.997415294591116,0.002496578398555],
-        [-0.129978890292857,0.119179487748624,0.006809505817606],
-        [0.119179487748624,-0.129978890292857,0.006809505817606],
-        [-0.989200597455768,0.119179487748624,0.006809505817606],
-        [0.119179487748624,-0.989200597455768,0.006809505817606],
-        [-0.989200597455768,-0.129978890292857,0.006809505817606],
-        [-0.129978890292857,-0.989200597455768,0.006809505817606],
-        [-0.359380801455591,0.346612795387641,0.006719308652128],
-        [0.346612795387641,-0.359380801455591,0.006719308652128],
-        [-0.987231993932050,0.346612795387641,0.006719308652128],
-        [0.346612795387641,-0.987231993932050,0.006719308652128],
-        [-0.987231993932050,-0.359380801455591,0.006719308652128],
-        [-0.359380801455591,-0.987231993932050,0.006719308652128],
-        [-0.816499355439990,0.806442932436004,0.003432313078994],
-        [0.806442932436004,-0.816499355439990,0.003432313078994],
-[-0.989943576996014,0.806442932436004,0.003432313078994],
-[0.806442932436004,-0.989943576996014,0.003432313078994],
-[-0.989943576996014,-0.816499355439990,0.003432313078994],
-[-0.816499355439990,-0.989943576996014,0.003432313078994],
-[-0.923978328282551,0.910324811038988,0.002961712633431],
-[0.910324811038988,-0.923978328282551,0.002961712633431],
-[-0.986346482756436,0.910324811038988,0.002961712633431],
-[0.910324811038988,-0.986346482756436,0.002961712633431],
-[-0.986346482756436,-0.923978328282551,0.002961712633431],
-[-0.923978328282551,-0.986346482756436,0.002961712633431],
-[-0.685149563029377,0.665117163749518,0.007022625221457],
-[0.665117163749518,-0.685149563029377,0.007022625221457],
-[-0.979967600720141,0.665117163749517,0.007022625221457],
-[0.665117163749517,-0.979967600720141,0.007022625221457],
-[-0.979967600720141,-0.685149563029376,0.007022625221457],
-[-0.685149563029376,-0.979967600720141,0.007022625221457],
-[-0.520220680442934,0.468705054096154,0.014787100299413],
-[0.468705054096154,-0.520220680442934,0.014787100299413],
-[-0.948484373653220,0.468705054096154,0.014787100299413],
-[0.468705054096154,-0.948484373653220,0.014787100299413],
-[-0.948484373653220,-0.520220680442934,0.014787100299413],
-[-0.520220680442934,-0.948484373653220,0.014787100299413],
-[-0.276113763747879,0.215657967508047,0.015966174954753],
-[0.215657967508047,-0.276113763747879,0.015966174954753],
-[-0.939544203760168,0.215657967508047,0.015966174954753],
-[0.215657967508047,-0.939544203760168,0.015966174954753],
-[-0.939544203760168,-0.276113763747879,0.015966174954753],
-[-0.276113763747879,-0.939544203760168,0.015966174954753],
-[-0.832896078090343,0.771886097876019,0.008711925226316],
-[0.771886097876019,-0.832896078090343,0.008711925226316],
-[-0.938990019785676,0.771886097876019,0.008711925226316],
-[0.771886097876019,-0.938990019785676,0.008711925226316],
-[-0.938990019785676,-0.832896078090343,0.008711925226316],
-[-0.832896078090343,-0.938990019785676,0.008711925226316],
-[-0.703113558535164,0.611200463810025,0.014730113402836],
-[0.611200463810025,-0.703113558535164,0.014730113402836],
-[-0.908086905274861,0.611200463810025,0.014730113402836],
-[0.611200463810025,-0.908086905274861,0.014730113402836],
-[-0.908086905274861,-0.703113558535164,0.014730113402836],
-[-0.703113558535164,-0.908086905274861,0.014730113402836],
-[-0.432520582544930,0.297634981464375,0.021927145692839],
-[0.297634981464375,-0.432520582544930,0.021927145692839],
-[-0.865114398919445,0.297634981464375,0.021927145692839],
-[0.297634981464375,-0.865114398919445,0.021927145692839],
-[-0.865114398919445,-0.432520582544930,0.021927145692839],
-[-0.432520582544930,-0.865114398919445,0.021927145692839],
-[-0.186201249762425,0.046111066930604,0.023499923487082],
-[0.046111066930604,-0.186201249762425,0.023499923487082],
-[-0.859909817168179,0.046111066930604,0.023499923487082],
-[0.046111066930604,-0.859909817168179,0.023499923487082],
-[-0.859909817168179,-0.186201249762425,0.023499923487082],
-[-0.186201249762425,-0.859909817168179,0.023499923487082],
-[-0.611772025950215,0.443948976669982,0.020031201427597],
-[0.443948976669982,-0.611772025950215,0.020031201427597],
-[-0.832176950719767,0.443948976669982,0.020031201427597],
-[0.443948976669982,-0.832176950719767,0.020031201427597],
-[-0.832176950719767,-0.611772025950215,0.020031201427597],
-[-0.611772025950215,-0.832176950719767,0.020031201427597],
-[-0.351731305998594,0.110980234644288,0.026619281575257],
-[0.110980234644288,-0.351731305998594,0.026619281575257],
-[-0.759248928645695,0.110980234644288,0.026619281575257],
-[0.110980234644288,-0.759248928645695,0.026619281575257],
-[-0.759248928645695,-0.351731305998594,0.026619281575257],
-[-0.351731305998594,-0.759248928645695,0.026619281575257],
-[-0.541445032888038,0.245311234573305,0.028308893010452],
-[0.245311234573305,-0.541445032888038,0.028308893010452],
-[-0.703866201685267,0.245311234573305,0.028308893010452],
-[0.245311234573305,-0.703866201685267,0.028308893010452],
-[-0.703866201685267,-0.541445032888038,0.028308893010452],
-[-0.541445032888038,-0.703866201685267,0.028308893010452],
-[-0.348763754808032,-0.034779976926618,0.029762759122336],
-[-0.034779976926618,-0.348763754808032,0.029762759122336],
-[-0.616456268265350,-0.034779976926618,0.029762759122336],
-[-0.034779976926618,-0.616456268265350,0.029762759122336],
-[-0.616456268265350,-0.348763754808032,0.029762759122336],
-[-0.348763754808032,-0.616456268265350,0.029762759122336],
-],
-26: [
-        [-0.027285103318006,-0.027285103318006,0.005361616431413],
-        [-0.945429793363989,-0.027285103318006,0.005361616431413],
-        [-0.027285103318006,-0.945429793363989,0.005361616431413],
-        [-0.068629018183452,-0.068629018183452,0.012732191427031],
-        [-0.862741963633096,-0.068629018183452,0.012732191427031],
-        [-0.068629018183452,-0.862741963633096,0.012732191427031],
-        [-0.136174624247252,-0.136174624247252,0.029707048808635],
-        [-0.727650751505495,-0.136174624247252,0.029707048808635],
-        [-0.136174624247252,-0.727650751505495,0.029707048808635],
-        [-0.214440393597162,-0.214440393597162,0.026709487358142],
-        [-0.571119212805675,-0.214440393597162,0.026709487358142],
-        [-0.214440393597162,-0.571119212805675,0.026709487358142],
-        [-0.392927303733924,-0.392927303733924,0.031691197689589],
-        [-0.214145392532152,-0.392927303733924,0.031691197689589],
-        [-0.392927303733924,-0.214145392532152,0.031691197689589],
-        [-0.541283541373341,-0.541283541373341,0.028281596577704],
-        [0.082567082746682,-0.541283541373341,0.028281596577704],
-        [-0.541283541373341,0.082567082746682,0.028281596577704],
-        [-0.710171670270578,-0.710171670270578,0.022460561269283],
-        [0.420343340541156,-0.710171670270578,0.022460561269283],
-        [-0.710171670270578,0.420343340541156,0.022460561269283],
-        [-0.832251071789951,-0.832251071789951,0.013160382318625],
-        [0.664502143579902,-0.832251071789951,0.013160382318625],
-        [-0.832251071789951,0.664502143579902,0.013160382318625],
-        [-0.931928355163542,-0.931928355163542,0.005828465225510],
-        [0.863856710327084,-0.931928355163542,0.005828465225510],
-        [-0.931928355163542,0.863856710327084,0.005828465225510],
-        [-0.987078078630829,-0.987078078630829,0.001098762787251],
-        [0.974156157261657,-0.987078078630829,0.001098762787251],
-        [-0.987078078630829,0.974156157261657,0.001098762787251],
-        [-0.932113855389598,0.919072286067742,0.002557622023150],
-        [0.919072286067742,-0.932113855389598,0.002557622023150],
-        [-0.986958430678145,0.919072286067742,0.002557622023150],
-        [0.919072286067742,-0.986958430678145,0.002557622023150],
-        [-0.986958430678145,-0.932113855389597,0.002557622023150],
-        [-0.932113855389597,-0.986958430678145,0.002557622023150],
-        [-0.331832115907669,0.318412220533634,0.007088900226242],
-        [0.318412220533634,-0.331832115907669,0.007088900226242],
-        [-0.986580104625965,0.318412220533634,0.007088900226242],
-        [0.318412220533634,-0.986580104625965,0.007088900226242],
-        [-0.986580104625965,-0.331832115907669,0.007088900226242],
-        [-0.331832115907669,-0.986580104625965,0.007088900226242],
-        [-0.117284648816543,0.105635324925259,0.006588000446609],
-        [0.105635324925259,-0.117284648816543,0.006588000446609],
-        [-0.988350676108717,0.105635324925259,0.006588000446609],
-        [0.105635324925259,-0.988350676108717,0.006588000446609],
-        [-0.988350676108717,-0.117284648816543,0.006588000446609],
-        [-0.117284648816543,-0.988350676108717,0.006588000446609],
-        [-0.528179583523521,0.515363521190658,0.006069708653929],
-        [0.515363521190658,-0.528179583523521,0.006069708653929],
-[-0.987183937667137,0.515363521190658,0.006069708653929],
-[0.515363521190658,-0.987183937667137,0.006069708653929],
-[-0.987183937667137,-0.528179583523521,0.006069708653929],
-[-0.528179583523521,-0.987183937667137,0.006069708653929],
-[-0.698183069548291,0.685666877859863,0.004942128706706],
-[0.685666877859863,-0.698183069548291,0.004942128706706],
-[-0.987483808311572,0.685666877859863,0.004942128706706],
-[0.685666877859863,-0.987483808311572,0.004942128706706],
-[-0.987483808311572,-0.698183069548291,0.004942128706706],
-[-0.698183069548291,-0.987483808311572,0.004942128706706],
-[-0.834663613179069,0.821127985248516,0.004076340070443],
-[0.821127985248516,-0.834663613179069,0.004076340070443],
-[-0.986464372069447,0.821127985248516,0.004076340070443],
-[0.821127985248516,-0.986464372069447,0.004076340070443],
-[-0.986464372069447,-0.834663613179069,0.004076340070443],
-[-0.834663613179069,-0.986464372069447,0.004076340070443],
-[-0.700166221086294,0.634916644768372,0.011120280239045],
-[0.634916644768372,-0.700166221086294,0.011120280239045],
-[-0.934750423682077,0.634916644768372,0.011120280239045],
-[0.634916644768372,-0.934750423682077,0.011120280239045],
-[-0.934750423682078,-0.700166221086294,0.011120280239045],
-[-0.700166221086294,-0.934750423682078,0.011120280239045],
-[-0.160245113591115,0.096801406370527,0.012755358640694],
-[0.096801406370527,-0.160245113591115,0.012755358640694],
-[-0.936556292779412,0.096801406370527,0.012755358640694],
-[0.096801406370527,-0.936556292779412,0.012755358640694],
-[-0.936556292779412,-0.160245113591115,0.012755358640694],
-[-0.160245113591115,-0.936556292779412,0.012755358640694],
-[-0.348814552390868,0.279444440434072,0.014549157045387],
-[0.279444440434072,-0.348814552390868,0.014549157045387],
-[-0.930629888043204,0.279444440434072,0.014549157045387],
-[0.279444440434072,-0.930629888043204,0.014549157045387],
-[-0.930629888043204,-0.348814552390868,0.014549157045387],
-[-0.348814552390868,-0.930629888043204,0.014549157045387],
-[-0.835149343614232,0.764834325997890,0.009121880355576],
-[0.764834325997890,-0.835149343614232,0.009121880355576],
-[-0.929684982383659,0.764834325997890,0.009121880355576],
-[0.764834325997890,-0.929684982383659,0.009121880355576],
-[-0.929684982383659,-0.835149343614232,0.009121880355576],
-[-0.835149343614232,-0.929684982383659,0.009121880355576],
-[-0.534046892746188,0.466663082505331,0.013582808914065],
-[0.466663082505331,-0.534046892746188,0.013582808914065],
-[-0.932616189759143,0.466663082505331,0.013582808914065],
-[0.466663082505331,-0.932616189759143,0.013582808914065],
-[-0.932616189759143,-0.534046892746188,0.013582808914065],
-[-0.534046892746188,-0.932616189759143,0.013582808914065],
-[-0.704373154566392,0.546726033293271,0.015585248954434],
-[0.546726033293271,-0.704373154566392,0.015585248954434],
-[-0.842352878726879,0.546726033293271,0.015585248954434],
-[0.546726033293271,-0.842352878726879,0.015585248954434],
-[-0.842352878726879,-0.704373154566392,0.015585248954434],
-[-0.704373154566392,-0.842352878726879,0.015585248954434],
-[-0.220224863280788,0.060870104244893,0.018960151369388],
-[0.060870104244893,-0.220224863280788,0.018960151369388],
-[-0.840645240964104,0.060870104244893,0.018960151369388],
-[0.060870104244893,-0.840645240964104,0.018960151369388],
-[-0.840645240964104,-0.220224863280788,0.018960151369388],
-[-0.220224863280788,-0.840645240964104,0.018960151369388],
-[-0.394989254221112,0.230609434358343,0.019206200353033],
-[0.230609434358343,-0.394989254221112,0.019206200353033],
-[-0.835620180137232,0.230609434358343,0.019206200353033],
-[0.230609434358343,-0.835620180137232,0.019206200353033],
-[-0.835620180137232,-0.394989254221112,0.019206200353033],
-[-0.394989254221112,-0.835620180137232,0.019206200353033],
-[-0.557563751773578,0.393274056332418,0.018121839059318],
-[0.393274056332418,-0.557563751773578,0.018121839059318],
-[-0.835710304558840,0.393274056332418,0.018121839059318],
-[0.393274056332418,-0.835710304558840,0.018121839059318],
-[-0.835710304558840,-0.557563751773578,0.018121839059318],
-[-0.557563751773578,-0.835710304558840,0.018121839059318],
-[-0.350522450436603,0.060630141977535,0.028403705951863],
-[0.060630141977535,-0.350522450436603,0.028403705951863],
-[-0.710107691540932,0.060630141977535,0.028403705951863],
-[0.060630141977535,-0.710107691540932,0.028403705951863],
-[-0.710107691540932,-0.350522450436603,0.028403705951863],
-[-0.350522450436603,-0.710107691540932,0.028403705951863],
-[-0.544246685468649,0.246315777233803,0.026986162760930],
-[0.246315777233803,-0.544246685468649,0.026986162760930],
-[-0.702069091765154,0.246315777233803,0.026986162760930],
-[0.246315777233803,-0.702069091765154,0.026986162760930],
-[-0.702069091765154,-0.544246685468649,0.026986162760930],
-[-0.544246685468649,-0.702069091765154,0.026986162760930],
-[-0.373996265063702,-0.064072130507071,0.025102184615930],
-[-0.064072130507071,-0.373996265063702,0.025102184615930],
-[-0.561931604429227,-0.064072130507071,0.025102184615930],
-[-0.064072130507071,-0.561931604429227,0.025102184615930],
-[-0.561931604429227,-0.373996265063702,0.025102184615930],
-[-0.373996265063702,-0.561931604429227,0.025102184615930],
-],
-27: [
-        [-0.333333333333333,-0.333333333333333,0.029215421142604],
-        [-0.029244446609137,-0.029244446609137,0.013615273717612],
-        [-0.941511106781726,-0.029244446609137,0.013615273717612],
-        [-0.029244446609137,-0.941511106781726,0.013615273717612],
-        [-0.132843721814340,-0.132843721814340,0.030951102870660],
-        [-0.734312556371321,-0.132843721814340,0.030951102870660],
-        [-0.132843721814340,-0.734312556371321,0.030951102870660],
-        [-0.224940014502969,-0.224940014502969,0.031733186724762],
-        [-0.550119970994063,-0.224940014502969,0.031733186724762],
-        [-0.224940014502969,-0.550119970994063,0.031733186724762],
-        [-0.427786783949924,-0.427786783949924,0.031559855928489],
-        [-0.144426432100151,-0.427786783949924,0.031559855928489],
-        [-0.427786783949924,-0.144426432100151,0.031559855928489],
-        [-0.532776206162091,-0.532776206162091,0.027863700370354],
-        [0.065552412324182,-0.532776206162091,0.027863700370354],
-        [-0.532776206162091,0.065552412324182,0.027863700370354],
-        [-0.690368113175391,-0.690368113175391,0.019750305737275],
-        [0.380736226350782,-0.690368113175391,0.019750305737275],
-        [-0.690368113175391,0.380736226350782,0.019750305737275],
-        [-0.781499070170348,-0.781499070170348,0.015635498945203],
-        [0.562998140340695,-0.781499070170348,0.015635498945203],
-        [-0.781499070170348,0.562998140340695,0.015635498945203],
-        [-0.862704525220276,-0.862704525220276,0.010432865446986],
-        [0.725409050440551,-0.862704525220276,0.010432865446986],
-        [-0.862704525220276,0.725409050440551,0.010432865446986],
-        [-0.932961091535336,-0.932961091535336,0.005852724472600],
-        [0.865922183070671,-0.932961091535336,0.005852724472600],
-        [-0.932961091535336,0.865922183070671,0.005852724472600],
-        [-0.986811381964774,-0.986811381964774,0.001134879007165],
-        [0.973622763929549,-0.986811381964774,0.001134879007165],
-        [-0.986811381964774,0.973622763929549,0.001134879007165],
-        [-0.717055503863097,0.716419063026126,0.001375795459783],
-        [0.716419063026126,-0.717055503863097,0.001375795459783],
-        [-0.999363559163030,0.716419063026126,0.001375795459783],
-        [0.716419063026126,-0.999363559163030,0.001375795459783],
-        [-0.999363559163030,-0.717055503863097,0.001375795459783],
-        [-0.717055503863097,-0.999363559163030,0.001375795459783],
-        [-0.838822221132805,0.827544031058903,0.003088879415937],
-        [0.827544031058903,-0.838822221132805,0.003088879415937],
-        [-0.988721809926098,0.827544031058903,0.003088879415937],
-        [0.827544031058903,-0.988721809926098,0.003088879415937],
-        [-0.988721809926098,-0.838822221132805,0.003088879415937],
-        [-0.838822221132805,-0.988721809926098,0.003088879415937],
-        [-0.537630806497654,0.526128943172145,0.005625149324346],
-        [0.526128943172145,-0.537630806497654,0.005625149324346],
-        [-0.988498136674491,0.526128943172145,0.005625149324346],
-        [0.526128943172145,-0.988498136674491,0.005625149324346],
-        [-0.988498136674491,-0.537630806497654,0.005625149324346],
-        [-0.537630806497654,-0.988498136674491,0.005625149324346],
-        [-0.113842988120976,0.103273580134309,0.005913105372899],
-[0.103273580134309,-0.113842988120976,0.005913105372899],
-[-0.989430592013333,0.103273580134310,0.005913105372899],
-[0.103273580134310,-0.989430592013333,0.005913105372899],
-[-0.989430592013333,-0.113842988120976,0.005913105372899],
-[-0.113842988120976,-0.989430592013333,0.005913105372899],
-[-0.330849908839651,0.320515152715889,0.005565783438844],
-[0.320515152715889,-0.330849908839651,0.005565783438844],
-[-0.989665243876238,0.320515152715889,0.005565783438844],
-[0.320515152715889,-0.989665243876238,0.005565783438844],
-[-0.989665243876238,-0.330849908839651,0.005565783438844],
-[-0.330849908839651,-0.989665243876238,0.005565783438844],
-[-0.931869179489789,0.919222453867072,0.002449540456172],
-[0.919222453867072,-0.931869179489789,0.002449540456172],
-[-0.987353274377283,0.919222453867072,0.002449540456172],
-[0.919222453867072,-0.987353274377283,0.002449540456172],
-[-0.987353274377283,-0.931869179489789,0.002449540456172],
-[-0.931869179489789,-0.987353274377283,0.002449540456172],
-[-0.695123977280935,0.663705924287710,0.007906643758942],
-[0.663705924287710,-0.695123977280935,0.007906643758942],
-[-0.968581947006775,0.663705924287710,0.007906643758942],
-[0.663705924287710,-0.968581947006775,0.007906643758942],
-[-0.968581947006775,-0.695123977280935,0.007906643758942],
-[-0.695123977280935,-0.968581947006775,0.007906643758942],
-[-0.831869809255826,0.777736654895860,0.007221969465327],
-[0.777736654895860,-0.831869809255826,0.007221969465327],
-[-0.945866845640035,0.777736654895860,0.007221969465327],
-[0.777736654895860,-0.945866845640035,0.007221969465327],
-[-0.945866845640035,-0.831869809255826,0.007221969465327],
-[-0.831869809255826,-0.945866845640035,0.007221969465327],
-[-0.423211420319719,0.374995160760160,0.008707930088036],
-[0.374995160760160,-0.423211420319719,0.008707930088036],
-[-0.951783740440441,0.374995160760160,0.008707930088036],
-[0.374995160760160,-0.951783740440441,0.008707930088036],
-[-0.951783740440441,-0.423211420319719,0.008707930088036],
-[-0.423211420319719,-0.951783740440441,0.008707930088036],
-[-0.223962554104902,0.171509638849087,0.011256464740666],
-[0.171509638849087,-0.223962554104902,0.011256464740666],
-[-0.947547084744185,0.171509638849087,0.011256464740666],
-[0.171509638849087,-0.947547084744185,0.011256464740666],
-[-0.947547084744185,-0.223962554104902,0.011256464740666],
-[-0.223962554104902,-0.947547084744185,0.011256464740666],
-[-0.566926820194262,0.490923426439871,0.013269437724243],
-[0.490923426439871,-0.566926820194262,0.013269437724243],
-[-0.923996606245609,0.490923426439871,0.013269437724243],
-[0.490923426439871,-0.923996606245609,0.013269437724243],
-[-0.923996606245609,-0.566926820194262,0.013269437724243],
-[-0.566926820194262,-0.923996606245609,0.013269437724243],
-[-0.350787336349322,0.245677528944182,0.013046146795576],
-[0.245677528944182,-0.350787336349322,0.013046146795576],
-[-0.894890192594860,0.245677528944182,0.013046146795576],
-[0.245677528944182,-0.894890192594860,0.013046146795576],
-[-0.894890192594860,-0.350787336349322,0.013046146795576],
-[-0.350787336349322,-0.894890192594860,0.013046146795576],
-[-0.729613610936203,0.622255871516285,0.012947418329903],
-[0.622255871516285,-0.729613610936203,0.012947418329903],
-[-0.892642260580081,0.622255871516285,0.012947418329903],
-[0.622255871516285,-0.892642260580081,0.012947418329903],
-[-0.892642260580081,-0.729613610936203,0.012947418329903],
-[-0.729613610936203,-0.892642260580081,0.012947418329903],
-[-0.176209680235251,0.035410146457445,0.021313811627966],
-[0.035410146457445,-0.176209680235251,0.021313811627966],
-[-0.859200466222194,0.035410146457445,0.021313811627966],
-[0.035410146457445,-0.859200466222194,0.021313811627966],
-[-0.859200466222194,-0.176209680235251,0.021313811627966],
-[-0.176209680235251,-0.859200466222194,0.021313811627966],
-[-0.469171656648510,0.304686011244002,0.017176891528936],
-[0.304686011244002,-0.469171656648510,0.017176891528936],
-[-0.835514354595492,0.304686011244002,0.017176891528936],
-[0.304686011244002,-0.835514354595492,0.017176891528936],
-[-0.835514354595492,-0.469171656648510,0.017176891528936],
-[-0.469171656648510,-0.835514354595492,0.017176891528936],
-[-0.623736093891471,0.443479545725970,0.017763399981969],
-[0.443479545725970,-0.623736093891471,0.017763399981969],
-[-0.819743451834499,0.443479545725970,0.017763399981969],
-[0.443479545725970,-0.819743451834499,0.017763399981969],
-[-0.819743451834499,-0.623736093891471,0.017763399981969],
-[-0.623736093891471,-0.819743451834499,0.017763399981969],
-[-0.336632062394500,0.104847567508036,0.023828398561090],
-[0.104847567508036,-0.336632062394500,0.023828398561090],
-[-0.768215505113536,0.104847567508036,0.023828398561090],
-[0.104847567508036,-0.768215505113536,0.023828398561090],
-[-0.768215505113536,-0.336632062394500,0.023828398561090],
-[-0.336632062394500,-0.768215505113536,0.023828398561090],
-[-0.530404689974552,0.224195004863778,0.026764788789016],
-[0.224195004863778,-0.530404689974552,0.026764788789016],
-[-0.693790314889227,0.224195004863778,0.026764788789016],
-[0.224195004863778,-0.693790314889227,0.026764788789016],
-[-0.693790314889227,-0.530404689974552,0.026764788789016],
-[-0.530404689974552,-0.693790314889227,0.026764788789016],
-[-0.350831684137242,-0.019508133770036,0.028977845006028],
-[-0.019508133770036,-0.350831684137242,0.028977845006028],
-[-0.629660182092722,-0.019508133770036,0.028977845006028],
-[-0.019508133770036,-0.629660182092722,0.028977845006028],
-[-0.629660182092722,-0.350831684137242,0.028977845006028],
-[-0.350831684137242,-0.629660182092722,0.028977845006028],
-],
-28: [
-        [-0.988064607832230,0.987992518020485,0.000005678109445],
-        [-0.937649986705898,0.937273392400706,0.000067869690329],
-        [-0.849117911767581,0.848206583410427,0.000250117104238],
-        [-0.726072255922453,0.724417731360170,0.000591434111178],
-        [-0.573547944561595,0.570972172608539,0.001096877668021],
-        [-0.397788705468703,0.394151347077563,0.001734258212849],
-        [-0.205989917758162,0.201194093997435,0.002437321168702],
-        [-0.006003740989757,0.000000000000000,0.003114968848543],
-        [0.193982435778648,-0.201194093997435,0.003665090319212],
-        [0.385781223489189,-0.394151347077563,0.003990796070869],
-        [0.561540462582081,-0.570972172608539,0.004016439454972],
-        [0.714064773942939,-0.724417731360170,0.003700816722647],
-        [0.837110429788067,-0.848206583410427,0.003045376334904],
-        [0.925642504726384,-0.937273392400706,0.002096114396383],
-        [0.976057125852715,-0.987992518020485,0.000940083783827],
-        [-0.988369112325678,0.987992518020485,0.000012991999963],
-        [-0.939240706051164,0.937273392400706,0.000155291655212],
-        [-0.852967326449712,0.848206583410427,0.000572289322752],
-        [-0.733060901773317,0.724417731360170,0.001353251821662],
-        [-0.584427902697520,0.570972172608539,0.002509749901695],
-        [-0.413152762435777,0.394151347077563,0.003968131092565],
-        [-0.226247286304345,0.201194093997435,0.005576799256556],
-        [-0.031363303799647,0.000000000000000,0.007127315095696],
-        [0.163520678705051,-0.201194093997435,0.008386040063107],
-        [0.350426154836483,-0.394151347077563,0.009131282674963],
-        [0.521701295098226,-0.570972172608539,0.009189956930633],
-        [0.670334294174023,-0.724417731360170,0.008467785129237],
-        [0.790240718850418,-0.848206583410427,0.006968081473429],
-        [0.876514098451870,-0.937273392400706,0.004796088983887],
-        [0.925642504726384,-0.987992518020485,0.002150992086750],
-        [-0.988903846377640,0.987992518020485,0.000019785289042],
-        [-0.942034135439991,0.937273392400706,0.000236490940043],
-        [-0.859727204070395,0.848206583410427,0.000871529379538],
-        [-0.745333518414343,0.724417731360170,0.002060843481789],
-        [-0.603533972474414,0.570972172608539,0.003822054138805],
-        [-0.440133265559207,0.394151347077563,0.006042997294437],
-        [-0.261820832829464,0.201194093997435,0.008492809847469],
-        [-0.075896708294786,0.000000000000000,0.010854063244177],
-        [0.110027416239891,-0.201194093997435,0.012770953436328],
-        [0.288339848969634,-0.394151347077563,0.013905870348620],
-        [0.451740555884842,-0.570972172608539,0.013995224344240],
-        [0.593540101824770,-0.724417731360170,0.012895441564853],
-        [0.707933787480822,-0.848206583410427,0.010611569151594],
-        [0.790240718850418,-0.937273392400706,0.007303879856139],
-        [0.837110429788067,-0.987992518020485,0.003275708150100],
-        [-0.989647042582769,0.987992518020485,0.000025769562269],
-        [-0.945916562813853,0.937273392400706,0.000308020165519],
-        [-0.869122370464600,0.848206583410427,0.001135132803359],
-        [-0.762390524754508,0.724417731360170,0.002684167732828],
-        [-0.630088403599617,0.570972172608539,0.004978075474027],
-[-0.477631920189938,0.394151347077563,0.007870766747028],
-[-0.311262465886975,0.201194093997435,0.011061551425453],
-[-0.137791134319915,0.000000000000000,0.014136991279319],
-[0.035680197247145,-0.201194093997435,0.016633665503545],
-[0.202049651550108,-0.394151347077563,0.018111850228555],
-[0.354506134959787,-0.570972172608539,0.018228230300094],
-[0.486808256114678,-0.724417731360170,0.016795806403939],
-[0.593540101824770,-0.848206583410427,0.013821152243283],
-[0.670334294174023,-0.937273392400706,0.009513016785380],
-[0.714064773942939,-0.987992518020485,0.004266481271556],
-[-0.990568289973542,0.987992518020485,0.000030699031605],
-[-0.950729122489687,0.937273392400706,0.000366941459749],
-[-0.880768383276303,0.848206583410427,0.001352272787635],
-[-0.783533962351248,0.724417731360170,0.003197623195991],
-[-0.663004610946658,0.570972172608539,0.005930333418609],
-[-0.524114312723242,0.394151347077563,0.009376368701824],
-[-0.372549075177309,0.201194093997435,0.013177519790991],
-[-0.214513913695731,0.000000000000000,0.016841261700383],
-[-0.056478752214152,-0.201194093997435,0.019815525683434],
-[0.095086485331781,-0.394151347077563,0.021576472924861],
-[0.233976783555196,-0.570972172608539,0.021715115384404],
-[0.354506134959787,-0.724417731360170,0.020008682578130],
-[0.451740555884842,-0.848206583410427,0.016465005695410],
-[0.521701295098226,-0.937273392400706,0.011332765372579],
-[0.561540462582081,-0.987992518020485,0.005082618091388],
-[-0.991629876411625,0.987992518020485,0.000034371743072],
-[-0.956274807758919,0.937273392400706,0.000410840893588],
-[-0.894188501892071,0.848206583410427,0.001514053388316],
-[-0.807898304472545,0.724417731360170,0.003580174265665],
-[-0.700935138254217,0.570972172608539,0.006639815197344],
-[-0.577677642201529,0.394151347077563,0.010498120595869],
-[-0.443171835046505,0.201194093997435,0.014754026459451],
-[-0.302924326461218,0.000000000000000,0.018856084049129],
-[-0.162676817875932,-0.201194093997435,0.022186177283618],
-[-0.028171010720908,-0.394151347077563,0.024157797330925],
-[0.095086485331781,-0.570972172608539,0.024313026429341],
-[0.202049651550108,-0.724417731360170,0.022402442709917],
-[0.288339848969634,-0.848206583410427,0.018434814254740],
-[0.350426154836483,-0.937273392400706,0.012688572873940],
-[0.385781223489189,-0.987992518020485,0.005690682540646],
-[-0.992788341781213,0.987992518020485,0.000036637297986],
-[-0.962326584707617,0.937273392400706,0.000437920771488],
-[-0.908833322242456,0.848206583410427,0.001613849639200],
-[-0.834486103249711,0.724417731360170,0.003816155355883],
-[-0.742327153788413,0.570972172608539,0.007077467309460],
-[-0.636129088126634,0.394151347077563,0.011190086338209],
-[-0.520239531729724,0.201194093997435,0.015726512989614],
-[-0.399402953001283,0.000000000000000,0.020098950720122],
-[-0.278566374272841,-0.201194093997435,0.023648541379510],
-[-0.162676817875932,-0.394151347077563,0.025750117404859],
-[-0.056478752214152,-0.570972172608539,0.025915578164965],
-[0.035680197247145,-0.724417731360170,0.023879061573116],
-[0.110027416239891,-0.848206583410427,0.019649913644597],
-[0.163520678705051,-0.937273392400706,0.013524918548175],
-[0.193982435778648,-0.987992518020485,0.006065774189928],
-[-0.993996259010243,0.987992518020485,0.000037402932316],
-[-0.968636696200353,0.937273392400706,0.000447072297244],
-[-0.924103291705214,0.848206583410427,0.001647575343713],
-[-0.862208865680085,0.724417731360170,0.003895904128496],
-[-0.785486086304269,0.570972172608539,0.007225369917846],
-[-0.697075673538782,0.394151347077563,0.011423933120557],
-[-0.600597046998717,0.201194093997435,0.016055160539688],
-[-0.500000000000000,0.000000000000000,0.020518972050826],
-[-0.399402953001283,-0.201194093997435,0.024142740900556],
-[-0.302924326461218,-0.394151347077563,0.026288234977700],
-[-0.214513913695731,-0.570972172608539,0.026457153482920],
-[-0.137791134319915,-0.724417731360170,0.024378078430143],
-[-0.075896708294786,-0.848206583410427,0.020060551144640],
-[-0.031363303799647,-0.937273392400706,0.013807557894147],
-[-0.006003740989757,-0.987992518020485,0.006192534764769],
-[-0.995204176239272,0.987992518020485,0.000036637297986],
-[-0.974946807693089,0.937273392400706,0.000437920771488],
-[-0.939373261167971,0.848206583410427,0.001613849639200],
-[-0.889931628110459,0.724417731360170,0.003816155355883],
-[-0.828645018820126,0.570972172608539,0.007077467309460],
-[-0.758022258950930,0.394151347077563,0.011190086338209],
-[-0.680954562267710,0.201194093997435,0.015726512989614],
-[-0.600597046998717,0.000000000000000,0.020098950720122],
-[-0.520239531729724,-0.201194093997435,0.023648541379510],
-[-0.443171835046505,-0.394151347077563,0.025750117404859],
-[-0.372549075177309,-0.570972172608539,0.025915578164965],
-[-0.311262465886975,-0.724417731360170,0.023879061573116],
-[-0.261820832829464,-0.848206583410427,0.019649913644597],
-[-0.226247286304345,-0.937273392400706,0.013524918548175],
-[-0.205989917758162,-0.987992518020485,0.006065774189928],
-[-0.996362641608860,0.987992518020485,0.000034371743072],
-[-0.980998584641787,0.937273392400706,0.000410840893588],
-[-0.954018081518357,0.848206583410427,0.001514053388316],
-[-0.916519426887625,0.724417731360170,0.003580174265665],
-[-0.870037034354322,0.570972172608539,0.006639815197344],
-[-0.816473704876034,0.394151347077563,0.010498120595869],
-[-0.758022258950930,0.201194093997435,0.014754026459451],
-[-0.697075673538782,0.000000000000000,0.018856084049129],
-[-0.636129088126634,-0.201194093997435,0.022186177283618],
-[-0.577677642201529,-0.394151347077563,0.024157797330925],
-[-0.524114312723242,-0.570972172608539,0.024313026429341],
-[-0.477631920189938,-0.724417731360170,0.022402442709917],
-[-0.440133265559207,-0.848206583410427,0.018434814254740],
-[-0.413152762435777,-0.937273392400706,0.012688572873940],
-[-0.397788705468703,-0.987992518020485,0.005690682540646],
-[-0.997424228046943,0.987992518020485,0.000030699031605],
-[-0.986544269911019,0.937273392400706,0.000366941459749],
-[-0.967438200134124,0.848206583410427,0.001352272787635],
-[-0.940883769008922,0.724417731360170,0.003197623195991],
-[-0.907967561661881,0.570972172608539,0.005930333418609],
-[-0.870037034354322,0.394151347077563,0.009376368701824],
-[-0.828645018820126,0.201194093997435,0.013177519790991],
-[-0.785486086304269,0.000000000000000,0.016841261700383],
-[-0.742327153788413,-0.201194093997435,0.019815525683434],
-[-0.700935138254217,-0.394151347077563,0.021576472924861],
-[-0.663004610946658,-0.570972172608539,0.021715115384404],
-[-0.630088403599617,-0.724417731360170,0.020008682578130],
-[-0.603533972474414,-0.848206583410427,0.016465005695410],
-[-0.584427902697520,-0.937273392400706,0.011332765372579],
-[-0.573547944561595,-0.987992518020485,0.005082618091388],
-[-0.998345475437717,0.987992518020485,0.000025769562269],
-[-0.991356829586853,0.937273392400706,0.000308020165519],
-[-0.979084212945827,0.848206583410427,0.001135132803359],
-[-0.962027206605662,0.724417731360170,0.002684167732828],
-[-0.940883769008922,0.570972172608539,0.004978075474027],
-[-0.916519426887625,0.394151347077563,0.007870766747028],
-[-0.889931628110459,0.201194093997435,0.011061551425453],
-[-0.862208865680085,0.000000000000000,0.014136991279319],
-[-0.834486103249711,-0.201194093997435,0.016633665503545],
-[-0.807898304472545,-0.394151347077563,0.018111850228555],
-[-0.783533962351248,-0.570972172608539,0.018228230300094],
-[-0.762390524754508,-0.724417731360170,0.016795806403939],
-[-0.745333518414343,-0.848206583410427,0.013821152243283],
-[-0.733060901773317,-0.937273392400706,0.009513016785380],
-[-0.726072255922453,-0.987992518020485,0.004266481271556],
-[-0.999088671642846,0.987992518020485,0.000019785289042],
-[-0.995239256960715,0.937273392400706,0.000236490940043],
-[-0.988479379340032,0.848206583410427,0.000871529379538],
-[-0.979084212945827,0.724417731360170,0.002060843481789],
-[-0.967438200134124,0.570972172608539,0.003822054138805],
-[-0.954018081518357,0.394151347077563,0.006042997294437],
-[-0.939373261167971,0.201194093997435,0.008492809847469],
-[-0.924103291705214,0.000000000000000,0.010854063244177],
-[-0.908833322242456,-0.201194093997435,0.012770953436328],
-[-0.894188501892071,-0.394151347077563,0.013905870348620],
-[-0.880768383276303,-0.570972172608539,0.013995224344240],
-[-0.869122370464600,-0.724417731360170,0.012895441564853],
-[-0.859727204070395,-0.848206583410427,0.010611569151594],
-[-0.852967326449712,-0.937273392400706,0.007303879856139],
-[-0.849117911767581,-0.987992518020485,0.003275708150100],
-[-0.999623405694808,0.987992518020485,0.000012991999963],
-[-0.998032686349542,0.937273392400706,0.000155291655212],
-[-0.995239256960715,0.848206583410427,0.000572289322752],
-[-0.991356829586853,0.724417731360170,0.001353251821662],
-[-0.986544269911019,0.570972172608539,0.002509749901695],
-[-0.980998584641787,0.394151347077563,0.003968131092565],
-[-0.974946807693089,0.201194093997435,0.005576799256556],
-[-0.968636696200353,0.000000000000000,0.007127315095696],
-[-0.962326584707617,-0.201194093997435,0.008386040063107],
-[-0.956274807758919,-0.394151347077563,0.009131282674963],
-[-0.950729122489687,-0.570972172608539,0.009189956930633],
-[-0.945916562813853,-0.724417731360170,0.008467785129237],
-[-0.942034135439991,-0.848206583410427,0.006968081473429],
-[-0.939240706051164,-0.937273392400706,0.004796088983887],
-[-0.937649986705898,-0.987992518020485,0.002150992086750],
-[-0.999927910188256,0.987992518020485,0.000005678109445],
-[-0.999623405694808,0.937273392400706,0.000067869690329],
-[-0.999088671642846,0.848206583410427,0.000250117104238],
-[-0.998345475437717,0.724417731360170,0.000591434111178],
-[-0.997424228046943,0.570972172608539,0.001096877668021],
-[-0.996362641608860,0.394151347077563,0.001734258212849],
-[-0.995204176239272,0.201194093997435,0.002437321168702],
-[-0.993996259010243,0.000000000000000,0.003114968848543],
-[-0.992788341781213,-0.201194093997435,0.003665090319212],
-[-0.991629876411625,-0.394151347077563,0.003990796070869],
-[-0.990568289973542,-0.570972172608539,0.004016439454972],
-[-0.989647042582769,-0.724417731360170,0.003700816722647],
-[-0.988903846377640,-0.848206583410427,0.003045376334904],
-[-0.988369112325678,-0.937273392400706,0.002096114396383],
-[-0.988064607832230,-0.987992518020485,0.000940083783827],
-],
-}
-
-triangle_table = dict(
-        (o, np.array(v)) for o, v in triangle_table.iteritems())
-
-
-triangle_table = dict(
-        (o, {"points": v[:,:-1], "weights": v[:, -1]})
-            for o, v in triangle_table.iteritems())
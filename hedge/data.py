@@ -33,7 +33,23 @@ from pytools import memoize_method
 
 
 # helpers ---------------------------------------------------------------------
+def vectorized(f):
+    """Mark the function *f* as following the vectorized interpolation
+    protocol of
+    :meth:`hedge.discretization.Discretization.interpolate_volume_function`,
+    i.e. as accepting all nodes at once. Usable as a decorator.
+
+    Callable classes may instead set a class attribute *is_vectorized*.
+    """
+    f.is_vectorized = True
+    return f
+
+
+
+
 class _ConstantFunctionContainer:
+    is_vectorized = True
+
     def __init__(self, value):
         self.value = value
 
@@ -41,8 +57,12 @@ class _ConstantFunctionContainer:
     def shape(self):
         return self.value.shape
 
-    def __call__(self, x, el):
-        return self.value
+    def __call__(self, nodes, el_ids):
+        from pytools.obj_array import is_obj_array
+        if is_obj_array(self.value):
+            return self.value
+        else:
+            return numpy.asarray(self.value)[..., numpy.newaxis]
 
 
 
@@ -213,6 +233,19 @@ def make_tdep_given(x):
 
 
 
+def as_time_dependent_given_function(f):
+    """Return *f* if it already implements :class:`ITimeDependentGivenFunction`
+    (or is *None*). Otherwise, wrap the function *f(x, el, t)* in a
+    :class:`TimeDependentGivenFunction`.
+    """
+    if f is None or hasattr(f, "boundary_interpolant"):
+        return f
+    else:
+        return TimeDependentGivenFunction(f)
+
+
+
+
 class TimeHarmonicGivenFunction(ITimeDependentGivenFunction):
     """Modulates an :class:`ITimeDependentGivenFunction` by a sine
     in time.
@@ -270,6 +303,10 @@ class TimeIntervalGivenFunction(ITimeDependentGivenFunction):
 class TimeDependentGivenFunction(ITimeDependentGivenFunction):
     """Adapts a function :math:`f(x,t)` into the
     :class:`GivenFunction` framework.
+
+    *f* is called as *f(x, el, t)*. If it is marked by :func:`vectorized`,
+    *x* and *el* are the arrays of all node coordinates and element ids,
+    as in :meth:`hedge.discretization.Discretization.interpolate_volume_function`.
     """
     def __init__(self, f):
         self.f = f
@@ -287,6 +324,10 @@ class TimeDependentGivenFunction(ITimeDependentGivenFunction):
         def shape(self):
             return self.f.shape
 
+        @property
+        def is_vectorized(self):
+            return getattr(self.f, "is_vectorized", False)
+
         def __call__(self, x, el):
             return self.f(x, el, self.t)
 
@@ -305,10 +346,34 @@ class CompiledExpressionData(
         ITimeDependentGivenFunction,
         IFieldDependentGivenFunction,
         ):
+    """Data given by symbolic expressions in time *t*, the node
+    coordinates *x* and, optionally, a number of *fields*.
+
+    :arg expressions_getter: a function accepting the keyword
+      arguments *t*, *x* and *fields* and returning an expression (or
+      an object array of expressions) built from them.
+
+    Operators may splice these expressions into their own operator
+    template using :meth:`get_op_template`, so that they are evaluated
+    as part of the compiled operator.
+    """
+
     def __init__(self, expressions_getter, arg_count=0):
         self.expressions_getter = expressions_getter
         self.arg_count = arg_count
 
+    def get_op_template(self, x, fields=[]):
+        """Return the expressions as an operator template, with time
+        represented by the :class:`hedge.optemplate.ScalarParameter`
+        *t*.
+
+        :arg x: an object array of node coordinates, e.g. from
+          :func:`hedge.optemplate.make_nodes`, possibly boundarized.
+        """
+        from hedge.optemplate.primitives import ScalarParameter
+        return self.expressions_getter(
+                t=ScalarParameter("t"), x=x, fields=fields)
+
     @memoize_method
     def make_func(self, discr, boundary_tag=None):
         from pymbolic import var
@@ -318,13 +383,11 @@ class CompiledExpressionData(
             return make_obj_array(
                     [var("%s%d" % (basename, i)) for i in range(self.dimensions)])
 
-        from hedge.optemplate.primitives  import ScalarParameter
         from hedge.optemplate.tools import make_vector_field
 
         x = make_vector_field("x", discr.dimensions)
         fields = make_vector_field("fields", self.arg_count)
-        exprs = self.expressions_getter(
-                t=ScalarParameter("t"), x=x, fields=fields)
+        exprs = self.get_op_template(x, fields)
 
         from hedge.optemplate.mappers.type_inference import (
                 type_info, NodalRepresentation)
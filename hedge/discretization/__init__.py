@@ -73,6 +73,132 @@ class _PointEvaluator(object):
 
 
 
+class _BulkPointLocator(object):
+    """Finds the elements containing many points at once.
+
+    Elements are binned into a uniform grid of cells by their bounding
+    boxes. Each point then only tests the elements in its own cell, and
+    all points are tested simultaneously in unit coordinates.
+
+    :ivar element_groups: a list containing, for each candidate element,
+      the element group it belongs to.
+    """
+
+    def __init__(self, discr, cells_per_axis=None):
+        self.discr = discr
+        dims = discr.dimensions
+        mesh = discr.mesh
+
+        els_and_groups = [(el, eg_nr, el_nr)
+                for eg_nr, eg in enumerate(discr.element_groups)
+                for el_nr, el in enumerate(eg.members)]
+        self.group_numbers = numpy.array(
+                [eg_nr for el, eg_nr, el_nr in els_and_groups],
+                dtype=numpy.intp)
+        self.group_element_numbers = numpy.array(
+                [el_nr for el, eg_nr, el_nr in els_and_groups],
+                dtype=numpy.intp)
+
+        self.inverse_matrices = numpy.array(
+                [el.inverse_map.matrix for el, eg_nr, el_nr in els_and_groups])
+        self.inverse_vectors = numpy.array(
+                [el.inverse_map.vector for el, eg_nr, el_nr in els_and_groups])
+
+        el_count = len(els_and_groups)
+
+        # {{{ bin element bounding boxes into grid cells
+
+        points = numpy.asarray(mesh.points)
+        bbox_min = numpy.empty((el_count, dims))
+        bbox_max = numpy.empty((el_count, dims))
+        for i, (el, eg_nr, el_nr) in enumerate(els_and_groups):
+            el_points = points[el.vertex_indices]
+            bbox_min[i] = numpy.min(el_points, axis=0)
+            bbox_max[i] = numpy.max(el_points, axis=0)
+
+        if cells_per_axis is None:
+            cells_per_axis = max(1, int(el_count**(1/dims)))
+
+        self.cells_per_axis = cells_per_axis
+        self.grid_min, grid_max = mesh.bounding_box()
+        self.cell_size = (grid_max - self.grid_min)/cells_per_axis
+        self.cell_size[self.cell_size == 0] = 1
+
+        low_cells = self.cells_of(bbox_min)
+        high_cells = self.cells_of(bbox_max)
+        spans = high_cells - low_cells + 1
+
+        cell_nrs = []
+        el_nrs = []
+        from pytools import indices_in_shape
+        for offset in indices_in_shape(tuple(numpy.max(spans, axis=0))):
+            offset = numpy.array(offset, dtype=numpy.intp)
+            covered = numpy.nonzero(numpy.all(offset < spans, axis=1))[0]
+            cell_nrs.append(self.flat_cell_numbers(
+                low_cells[covered] + offset))
+            el_nrs.append(covered)
+
+        cell_nrs = numpy.hstack(cell_nrs)
+        el_nrs = numpy.hstack(el_nrs)
+
+        order = numpy.argsort(cell_nrs, kind="mergesort")
+        self.cell_elements = el_nrs[order]
+        self.cell_counts = numpy.bincount(cell_nrs,
+                minlength=cells_per_axis**dims)
+        self.cell_starts = numpy.cumsum(self.cell_counts) - self.cell_counts
+
+        # }}}
+
+    def cells_of(self, points):
+        cells = numpy.floor(
+                (points - self.grid_min)/self.cell_size).astype(numpy.intp)
+        return numpy.clip(cells, 0, self.cells_per_axis-1)
+
+    def flat_cell_numbers(self, cells):
+        result = numpy.zeros(len(cells), dtype=numpy.intp)
+        for axis in range(cells.shape[1]):
+            result = result*self.cells_per_axis + cells[:, axis]
+        return result
+
+    def __call__(self, points, thresh=0):
+        """Return a tuple *(el_nrs, unit_points)*. *el_nrs* gives the
+        candidate element containing each of *points* (an array of shape
+        *(point_count, dimensions)*), or -1 if no element was found.
+        *unit_points* gives the points in that element's unit coordinates.
+        """
+        points = numpy.asarray(points, dtype=numpy.float64)
+        point_count, dims = points.shape
+
+        cells = self.flat_cell_numbers(self.cells_of(points))
+        counts = self.cell_counts[cells]
+        starts = self.cell_starts[cells]
+
+        el_nrs = numpy.empty(point_count, dtype=numpy.intp)
+        el_nrs.fill(-1)
+        unit_points = numpy.empty((point_count, dims))
+
+        for i in xrange(numpy.max(counts) if point_count else 0):
+            active = numpy.nonzero((el_nrs == -1) & (counts > i))[0]
+            if not len(active):
+                break
+
+            candidates = self.cell_elements[starts[active]+i]
+            unit = (numpy.einsum("nij,nj->ni",
+                self.inverse_matrices[candidates], points[active])
+                + self.inverse_vectors[candidates])
+
+            # see hedge.mesh.element.SimplicialElement.contains_point
+            inside = (numpy.all(unit >= -1-thresh, axis=1)
+                    & (numpy.sum(unit, axis=1) <= -(dims-2)+thresh))
+
+            el_nrs[active[inside]] = candidates[inside]
+            unit_points[active[inside]] = unit[inside]
+
+        return el_nrs, unit_points
+
+
+
+
 # {{{ timestep calculator (deprecated)
 class TimestepCalculator(object):
     def dt_factor(self, max_system_ev, order=1,
@@ -215,13 +341,18 @@ class Discretization(TimestepCalculator):
     # {{{ construction / finalization
     def __init__(self, mesh, local_discretization=None,
             order=None, quad_min_degrees={},
-            debug=set(), default_scalar_type=numpy.float64, run_context=None):
+            debug=set(), default_scalar_type=numpy.float64, run_context=None,
+            mesh_reordering=None):
         """
         :param quad_min_degrees: A mapping from quadrature tags to the degrees to
           which the desired quadrature is supposed to be exact.
         :param debug: A set of strings indicating which debug checks should
           be activated. See validity check below for the currently defined
           set of debug flags.
+        :param mesh_reordering: If not *None*, a method accepted by
+          :meth:`hedge.mesh.ConformalMesh.reordered_by`. The mesh is then
+          reordered accordingly before element and face groups are built,
+          and :attr:`mesh` refers to the reordered mesh.
         """
 
         self.run_context = run_context
@@ -229,6 +360,9 @@ class Discretization(TimestepCalculator):
         if not isinstance(mesh, hedge.mesh.Mesh):
             raise TypeError("mesh must be of type hedge.mesh.Mesh")
 
+        if mesh_reordering is not None:
+            mesh = mesh.reordered_by(mesh_reordering)
+
         self.mesh = mesh
 
         local_discretization = self.get_local_discretization(
@@ -256,6 +390,7 @@ class Discretization(TimestepCalculator):
         self.default_scalar_type = default_scalar_type
 
         self.exec_functions = {}
+        self.executor_cache = {}
 
         self._build_element_groups_and_nodes(local_discretization)
         self._calculate_local_matrices()
@@ -314,6 +449,21 @@ class Discretization(TimestepCalculator):
         self.vector_math_flop_counter = EventCounter("n_flops_vector_math",
                 "Number of floating point operations in vector math")
 
+        self.gather_byte_counter = EventCounter("n_bytes_gather",
+                "Estimated number of bytes moved in gather")
+        self.lift_byte_counter = EventCounter("n_bytes_lift",
+                "Estimated number of bytes moved in lift")
+        self.el_local_byte_counter = EventCounter("n_bytes_el_local",
+                "Estimated number of bytes moved in element-local operator "
+                "(without lift)")
+        self.diff_byte_counter = EventCounter("n_bytes_diff",
+                "Estimated number of bytes moved in diff operator")
+        self.vector_math_byte_counter = EventCounter("n_bytes_vector_math",
+                "Estimated number of bytes moved in vector math")
+
+        self.vector_alloc_counter = EventCounter("n_vector_alloc",
+                "Number of volume vector allocations")
+
         self.interpolant_counter = EventCounter("n_interp",
                 "Number of interpolant evaluations")
 
@@ -334,6 +484,14 @@ class Discretization(TimestepCalculator):
         mgr.add_quantity(self.diff_flop_counter)
         mgr.add_quantity(self.vector_math_flop_counter)
 
+        mgr.add_quantity(self.gather_byte_counter)
+        mgr.add_quantity(self.lift_byte_counter)
+        mgr.add_quantity(self.el_local_byte_counter)
+        mgr.add_quantity(self.diff_byte_counter)
+        mgr.add_quantity(self.vector_math_byte_counter)
+
+        mgr.add_quantity(self.vector_alloc_counter)
+
         mgr.add_quantity(self.interpolant_counter)
         mgr.add_quantity(self.interpolant_timer)
 
@@ -350,6 +508,12 @@ class Discretization(TimestepCalculator):
                         self.interpolant_timer,
                         self.interpolant_counter)
 
+        from hedge.tools import count_calls
+        self.volume_empty = count_calls(
+                self.volume_empty, self.vector_alloc_counter)
+        self.volume_zeros = count_calls(
+                self.volume_zeros, self.vector_alloc_counter)
+
         from pytools import single_valued
         try:
             order = single_valued(eg.local_discretization.order
@@ -487,6 +651,19 @@ class Discretization(TimestepCalculator):
 
             return vol_jac
 
+    @memoize_method
+    def volume_node_coordinates(self, kind="numpy"):
+        """Return an object array of full-volume vectors, one per
+        coordinate axis, containing the node coordinates.
+        """
+        from hedge.tools import make_obj_array
+        return self.convert_volume(
+                make_obj_array([
+                    numpy.array(self.nodes[:,i],
+                        dtype=self.default_scalar_type)
+                    for i in range(self.dimensions)]),
+                kind=kind)
+
     @memoize_method
     def inverse_metric_derivatives(self, quadrature_tag=None, kind="numpy"):
         """Return a list of lists of full-volume vectors,
@@ -596,65 +773,164 @@ class Discretization(TimestepCalculator):
         # This unification happens below.
         f.h = abs(el.map.jacobian() / f.face_jacobian)
 
-    def _build_interior_face_groups(self):
+    def _match_face_vertices(self, ldis, el_ids_l, face_nrs_l,
+            el_ids_n, face_nrs_n):
+        """Match up the vertices of the faces *face_nrs_l* of the elements
+        *el_ids_l* with those of the faces *face_nrs_n* of the elements
+        *el_ids_n*. All arguments are integer arrays of the same length.
+
+        Returns a tuple *(vert_perms, periodic_axes)*. *vert_perms* is an
+        integer array of shape *(face_count, face_vertex_count)* giving,
+        for each neighbor face vertex, its position among the local face
+        vertices, in the form taken by
+        :meth:`hedge.discretization.local.LocalDiscretization.get_face_index_shuffle_lookup_map`.
+        *periodic_axes* holds the axis along which each pair of faces
+        is periodically identified, or -1.
+        """
         from hedge.discretization.local import FaceVertexMismatch
-        from hedge.discretization.data import StraightFaceGroup
-        fg_type = StraightFaceGroup
-        fg = fg_type(double_sided=True,
-                debug="ilist_generation" in self.debug)
 
-        all_ldis_l = []
-        all_ldis_n = []
+        el_vertices = self._element_vertex_indices()
+        face_vertex_nrs = numpy.array(
+                ldis.geometry.face_vertices(range(self.dimensions+1)),
+                dtype=numpy.intp)
 
-        debug_node_perm = "node_permutation" in self.debug
+        vertices_l = el_vertices[
+                el_ids_l[:, numpy.newaxis], face_vertex_nrs[face_nrs_l]]
+        vertices_n = el_vertices[
+                el_ids_n[:, numpy.newaxis], face_vertex_nrs[face_nrs_n]]
 
-        # find and match node indices along faces
-        for i, (local_face, neigh_face) in enumerate(self.mesh.interfaces):
-            e_l, fi_l = local_face
-            e_n, fi_n = neigh_face
+        def find_matches():
+            # shape: (face_count, neighbor face vertex, local face vertex)
+            matches = (vertices_n[:, :, numpy.newaxis]
+                    == vertices_l[:, numpy.newaxis, :])
+            return matches, matches.any(axis=2).all(axis=1)
 
-            eslice_l, ldis_l = self.find_el_data(e_l.id)
-            eslice_n, ldis_n = self.find_el_data(e_n.id)
+        matches, is_matched = find_matches()
 
-            all_ldis_l.append(ldis_l)
-            all_ldis_n.append(ldis_n)
+        # Faces whose vertices are not a permutation of each other
+        # can only arise from periodicity.
+        periodic_axes = numpy.empty(len(el_ids_l), dtype=numpy.intp)
+        periodic_axes.fill(-1)
 
-            vertices_l = e_l.faces[fi_l]
-            vertices_n = e_n.faces[fi_n]
+        for i in numpy.nonzero(~is_matched)[0]:
+            try:
+                vertices_n[i], periodic_axes[i] = \
+                        self.mesh.periodic_opposite_faces[tuple(vertices_n[i])]
+            except KeyError:
+                raise FaceVertexMismatch("face vertices do not match")
 
-            findices_l = ldis_l.face_indices()[fi_l]
-            findices_n = ldis_n.face_indices()[fi_n]
+        if not is_matched.all():
+            matches, is_matched = find_matches()
+            if not is_matched.all():
+                raise FaceVertexMismatch("face vertices do not match")
 
-            try:
-                findices_shuffle_op_n = \
-                        ldis_l.get_face_index_shuffle_to_match(
-                        vertices_l, vertices_n)
+        return numpy.argmax(matches, axis=2), periodic_axes
+
+    @memoize_method
+    def _element_vertex_indices(self):
+        """Return an array of shape *(element_count, vertex_count)* holding
+        the vertex indices of each element.
+        """
+        return numpy.array([el.vertex_indices for el in self.mesh.elements],
+                dtype=numpy.intp)
 
-            except FaceVertexMismatch:
-                # This happens if vertices_l is not a permutation
-                # of vertices_n. Periodicity is the only reason why
-                # that would be so.
+    def _build_interior_face_groups(self):
+        from hedge.discretization.data import StraightFaceGroup
+        fg = StraightFaceGroup(double_sided=True,
+                debug="ilist_generation" in self.debug)
 
-                vertices_n, periodic_axis = self.mesh.periodic_opposite_faces[
-                        vertices_n]
+        interfaces = self.mesh.interfaces
+        if not interfaces:
+            self.face_groups = []
+            return
 
-                findices_shuffle_op_n = \
-                        ldis_l.get_face_index_shuffle_to_match(
-                                vertices_l, vertices_n)
-            else:
-                periodic_axis = None
+        from pytools import single_valued
+        ldis = single_valued(
+                eg.local_discretization for eg in self.element_groups)
+
+        def get_side_array(side, what):
+            return numpy.fromiter(
+                    (what(el_face[side]) for el_face in interfaces),
+                    dtype=numpy.intp, count=len(interfaces))
+
+        el_ids_l = get_side_array(0, lambda (el, fi): el.id)
+        face_nrs_l = get_side_array(0, lambda (el, fi): fi)
+        el_ids_n = get_side_array(1, lambda (el, fi): el.id)
+        face_nrs_n = get_side_array(1, lambda (el, fi): fi)
+
+        el_base_indices_l = self._element_base_indices()[el_ids_l]
+        el_base_indices_n = self._element_base_indices()[el_ids_n]
+
+        vert_perms, periodic_axes = self._match_face_vertices(ldis,
+                el_ids_l, face_nrs_l, el_ids_n, face_nrs_n)
+
+        # {{{ register one set of index lists per distinct face pairing
+
+        # Face pairs are classified by (neighbor face number, vertex
+        # permutation), encoded as a single integer. The number of
+        # distinct classes is bounded by the reference element's symmetry.
+        face_vertex_count = vert_perms.shape[1]
+        perm_codes = numpy.dot(vert_perms,
+                face_vertex_count**numpy.arange(face_vertex_count))
+        pairing_codes = face_nrs_n*face_vertex_count**face_vertex_count \
+                + perm_codes
+
+        face_indices = ldis.face_indices()
+        shuffle_lookup_map = ldis.get_face_index_shuffle_lookup_map()
+
+        unique_face_nrs_l, face_nr_l_classes = numpy.unique(
+                face_nrs_l, return_inverse=True)
+        int_ilist_numbers = numpy.array([
+            fg.register_face_index_list(
+                identifier=fi_l,
+                generator=lambda: face_indices[fi_l])
+            for fi_l in unique_face_nrs_l], dtype=numpy.intp)
 
-            # create and fill the face pair
-            fp = fg_type.FacePair()
+        unique_pairing_codes, first_with_pairing, pairing_classes = \
+                numpy.unique(pairing_codes,
+                        return_index=True, return_inverse=True)
 
-            fp.int_side.el_base_index = eslice_l.start
-            fp.ext_side.el_base_index = eslice_n.start
+        from pytools import get_write_to_map_from_permutation
 
-            self._set_face_pair_index_data(fg, fp, fi_l, fi_n,
-                    findices_l, findices_n, findices_shuffle_op_n)
+        ext_ilist_numbers = []
+        ext_write_map_numbers = []
+        ext_index_lists = []
+        for i in first_with_pairing:
+            fi_n = face_nrs_n[i]
+            shuffle = shuffle_lookup_map[tuple(vert_perms[i])]
+            shuffled_face_indices = shuffle(face_indices[fi_n])
+
+            ext_ilist_numbers.append(fg.register_face_index_list(
+                identifier=(fi_n, shuffle),
+                generator=lambda: shuffled_face_indices))
+            ext_write_map_numbers.append(fg.register_face_index_list(
+                identifier=(fi_n, shuffle, "wtm"),
+                generator=lambda: get_write_to_map_from_permutation(
+                    shuffled_face_indices, face_indices[fi_n])))
+            ext_index_lists.append(shuffled_face_indices)
+
+        int_ilist_numbers = int_ilist_numbers[face_nr_l_classes]
+        ext_ilist_numbers = numpy.array(
+                ext_ilist_numbers, dtype=numpy.intp)[pairing_classes]
+        ext_write_map_numbers = numpy.array(
+                ext_write_map_numbers, dtype=numpy.intp)[pairing_classes]
 
-            self._set_flux_face_data(fp.int_side, ldis_l, local_face)
-            self._set_flux_face_data(fp.ext_side, ldis_n, neigh_face)
+        # }}}
+
+        # {{{ create and fill the face pairs
+
+        for i, (local_face, neigh_face) in enumerate(interfaces):
+            fp = fg.FacePair()
+
+            fp.int_side.el_base_index = int(el_base_indices_l[i])
+            fp.ext_side.el_base_index = int(el_base_indices_n[i])
+
+            fp.int_side.face_index_list_number = int(int_ilist_numbers[i])
+            fp.ext_side.face_index_list_number = int(ext_ilist_numbers[i])
+            fp.ext_native_write_map = int(ext_write_map_numbers[i])
+
+            self._set_flux_face_data(fp.int_side, ldis, local_face)
+            self._set_flux_face_data(fp.ext_side, ldis, neigh_face)
 
             # unify h across the faces
             fp.int_side.h = fp.ext_side.h = max(fp.int_side.h, fp.ext_side.h)
@@ -668,29 +944,23 @@ class Discretization(TimestepCalculator):
 
             fg.face_pairs.append(fp)
 
-            # check that nodes match up
-            if (debug_node_perm
-                    and ldis_l.has_facial_nodes
-                    and ldis_n.has_facial_nodes):
-                findices_shuffled_n = findices_shuffle_op_n(findices_n)
+        # }}}
 
-                for i, j in zip(findices_l, findices_shuffled_n):
-                    dist = self.nodes[eslice_l.start + i] \
-                            - self.nodes[eslice_n.start + j]
-                    if periodic_axis is not None:
-                        dist[periodic_axis] = 0
-                    assert la.norm(dist) < 1e-14
+        # check that nodes match up
+        if "node_permutation" in self.debug and ldis.has_facial_nodes:
+            int_nodes = el_base_indices_l[:, numpy.newaxis] + numpy.array(
+                    face_indices, dtype=numpy.intp)[face_nrs_l]
+            ext_nodes = el_base_indices_n[:, numpy.newaxis] + numpy.array(
+                    ext_index_lists, dtype=numpy.intp)[pairing_classes]
 
-        if len(fg.face_pairs):
-            from pytools import single_valued
-            ldis_l = single_valued(all_ldis_l)
-            ldis_n = single_valued(all_ldis_n)
+            dist = self.nodes[int_nodes] - self.nodes[ext_nodes]
+            periodic = numpy.nonzero(periodic_axes >= 0)[0]
+            dist[periodic, :, periodic_axes[periodic]] = 0
+            assert numpy.max(numpy.sum(dist**2, axis=-1)) < 1e-28
 
-            fg.commit(self, ldis_l, ldis_n)
+        fg.commit(self, ldis, ldis)
 
-            self.face_groups = [fg]
-        else:
-            self.face_groups = []
+        self.face_groups = [fg]
 
     # }}}
 
@@ -698,6 +968,17 @@ class Discretization(TimestepCalculator):
     def is_boundary_tag_nonempty(self, tag):
         return bool(self.mesh.tag_to_boundary.get(tag, []))
 
+    @memoize_method
+    def _element_base_indices(self):
+        """Return an array mapping element ids to the index of the
+        first volume node of the element.
+        """
+        result = numpy.empty(len(self.mesh.elements), dtype=numpy.intp)
+        for eg in self.element_groups:
+            result[eg.member_nrs] = eg.ranges.start + (
+                    eg.ranges.el_size*numpy.arange(len(eg.members)))
+        return result
+
     @memoize_method
     def get_boundary(self, tag):
         """Get a Boundary instance for a given `tag'.
@@ -707,37 +988,62 @@ class Discretization(TimestepCalculator):
         (Otherwise get_boundary would unnecessarily become non-local when run
         in parallel.)
         """
-        from hedge.discretization.data  import StraightFaceGroup
-        nodes = []
-        vol_indices = []
-        fg_type = StraightFaceGroup
-        face_group = fg_type(double_sided=False,
+        from hedge.discretization.data import StraightFaceGroup, Boundary
+        el_faces = self.mesh.tag_to_boundary.get(tag, [])
+        face_group = StraightFaceGroup(double_sided=False,
                 debug="ilist_generation" in self.debug)
-        ldis = None # if this boundary is empty, we might as well have no ldis
-        el_face_to_face_group_and_face_pair = {}
-
-        for ef in self.mesh.tag_to_boundary.get(tag, []):
-            el, face_nr = ef
 
-            el_slice, ldis = self.find_el_data(el.id)
-            face_indices = ldis.face_indices()[face_nr]
-            face_indices_ary = numpy.array(face_indices, dtype=numpy.intp)
-
-            f_start = len(nodes)
-            nodes.extend(self.nodes[el_slice.start + face_indices_ary])
-            vol_indices.extend(el_slice.start + face_indices_ary)
+        if not el_faces:
+            return Boundary(
+                    discr=self,
+                    nodes=numpy.empty((0, self.dimensions)),
+                    vol_indices=[],
+                    face_groups=[],
+                    fg_ranges=[],
+                    face_normals=numpy.empty((0, self.dimensions)))
 
-            # create the face pair
+        from pytools import single_valued
+        ldis = single_valued(
+                self.find_el_discretization(el.id) for el, face_nr in el_faces)
+
+        el_ids = numpy.fromiter((el.id for el, face_nr in el_faces),
+                dtype=numpy.intp, count=len(el_faces))
+        face_nrs = numpy.fromiter((face_nr for el, face_nr in el_faces),
+                dtype=numpy.intp, count=len(el_faces))
+        el_base_indices = self._element_base_indices()[el_ids]
+
+        # shape: (face_count, face_node_count)
+        face_indices = ldis.face_indices()
+        vol_indices = (el_base_indices[:, numpy.newaxis]
+                + numpy.array(face_indices, dtype=numpy.intp)[face_nrs])
+        face_node_count = vol_indices.shape[1]
+        vol_indices = vol_indices.ravel()
+
+        # create the face pairs
+        int_ilist_numbers = {}
+        ext_ilist_number = None
+
+        for i, (el, face_nr) in enumerate(el_faces):
             fp = face_group.FacePair()
-            fp.int_side.el_base_index = el_slice.start
-            fp.ext_side.el_base_index = f_start
-            fp.int_side.face_index_list_number = face_group.register_face_index_list(
-                    identifier=face_nr,
-                    generator=lambda: face_indices)
-            fp.ext_side.face_index_list_number = face_group.register_face_index_list(
-                    identifier=(),
-                    generator=lambda: tuple(xrange(len(face_indices))))
-            self._set_flux_face_data(fp.int_side, ldis, ef)
+            fp.int_side.el_base_index = int(el_base_indices[i])
+            fp.ext_side.el_base_index = i*face_node_count
+
+            try:
+                fp.int_side.face_index_list_number = int_ilist_numbers[face_nr]
+            except KeyError:
+                fp.int_side.face_index_list_number = \
+                        int_ilist_numbers[face_nr] = \
+                        face_group.register_face_index_list(
+                                identifier=face_nr,
+                                generator=lambda: face_indices[face_nr])
+
+            if ext_ilist_number is None:
+                ext_ilist_number = face_group.register_face_index_list(
+                        identifier=(),
+                        generator=lambda: tuple(xrange(face_node_count)))
+            fp.ext_side.face_index_list_number = ext_ilist_number
+
+            self._set_flux_face_data(fp.int_side, ldis, (el, face_nr))
 
             # check that all property assigns found their C++-side slots
             assert len(fp.__dict__) == 0
@@ -746,36 +1052,25 @@ class Discretization(TimestepCalculator):
 
             face_group.face_pairs.append(fp)
 
-            # and make it possible to find it later
-            el_face_to_face_group_and_face_pair[ef] = \
-                    face_group, len(face_group.face_pairs)-1
-
-        if ldis is not None:
-            face_group.commit(self, ldis, ldis)
-            face_groups = [face_group]
-        else:
-            face_groups = []
+        face_group.commit(self, ldis, ldis)
 
         from hedge._internal import UniformElementRanges
         fg_ranges = [UniformElementRanges(
             0, # FIXME: need to vary element starts
-            fg.ldis_loc.face_node_count(), len(face_group.face_pairs))
-            for fg in face_groups]
-
-        nodes_ary = numpy.array(nodes)
-        nodes_ary.shape = (len(nodes), self.dimensions)
+            face_node_count, len(face_group.face_pairs))]
 
-        from hedge.discretization.data import Boundary
-        bdry = Boundary(
+        return Boundary(
                 discr=self,
-                nodes=nodes_ary,
+                nodes=self.nodes[vol_indices],
                 vol_indices=vol_indices,
-                face_groups=face_groups,
+                face_groups=[face_group],
                 fg_ranges=fg_ranges,
-                el_face_to_face_group_and_face_pair=
-                el_face_to_face_group_and_face_pair)
-
-        return bdry
+                el_face_to_face_group_and_face_pair=dict(
+                    (el_face, (face_group, i))
+                    for i, el_face in enumerate(el_faces)),
+                face_normals=numpy.array(
+                    [el.face_normals[face_nr] for el, face_nr in el_faces],
+                    dtype=numpy.float64))
 
     # }}}
 
@@ -967,10 +1262,73 @@ class Discretization(TimestepCalculator):
             dtype = self.default_scalar_type
         return numpy.zeros(shape + (len(self.nodes),), dtype)
 
+    @memoize_method
+    def _node_element_ids(self):
+        """Return an array holding the id of the containing element for
+        each volume node.
+        """
+        result = numpy.empty(len(self.nodes), dtype=numpy.intp)
+        for eg in self.element_groups:
+            result[eg.ranges.start:eg.ranges.start+eg.ranges.total_size] = \
+                    numpy.repeat(eg.member_nrs, eg.ranges.el_size)
+        return result
+
+    @memoize_method
+    def _boundary_node_element_ids(self, tag):
+        return self._node_element_ids()[
+                numpy.array(self.get_boundary(tag).vol_indices,
+                    dtype=numpy.intp)]
+
+    @staticmethod
+    def _vectorized_result_to_array(result, node_count, dtype):
+        """Turn the result of a vectorized function (see
+        :meth:`interpolate_volume_function`) into an array of shape
+        ``shape + (node_count,)``.
+        """
+        from pytools.obj_array import is_obj_array
+        if is_obj_array(result):
+            from pytools import indices_in_shape
+            out = numpy.empty(result.shape + (node_count,), dtype)
+            for i in indices_in_shape(result.shape):
+                out[i] = result[i]
+            return out
+
+        result = numpy.asarray(result)
+        if result.ndim == 0:
+            shape = ()
+        else:
+            shape = result.shape[:-1]
+
+        out = numpy.empty(shape + (node_count,), dtype)
+        out[...] = result
+        return out
+
     def interpolate_volume_function(self, f, dtype=None, kind=None):
+        """Interpolate the function *f* onto the volume nodes.
+
+        If *f* has a true attribute *is_vectorized* (see
+        :func:`hedge.data.vectorized`), it is called once as
+        *f(nodes, el_ids)*, where *nodes* is the *(node_count, dimensions)*
+        array of node coordinates and *el_ids* is an array of the ids of
+        the elements containing the nodes. It must then return an array
+        of shape ``shape + (node_count,)`` (or one that broadcasts to it).
+
+        Otherwise, *f* is called as *f(x, el)* for each node, and its
+        *shape* attribute, if present, gives the shape of its value.
+        """
         if kind is None:
             kind = self.compute_kind
 
+        if dtype is None:
+            dtype = self.default_scalar_type
+
+        if getattr(f, "is_vectorized", False):
+            return self.convert_volume(
+                    self._vectorized_result_to_array(
+                        f(self.nodes, self._node_element_ids()),
+                        len(self.nodes), dtype),
+                    kind=kind)
+
         try:
             # are we interpolating many fields at once?
             shape = f.shape
@@ -1004,9 +1362,24 @@ class Discretization(TimestepCalculator):
         return numpy.zeros(shape + (len(self.get_boundary(tag).nodes),), dtype)
 
     def interpolate_boundary_function(self, f, tag, dtype=None, kind=None):
+        """Interpolate the function *f* onto the nodes of the boundary
+        tagged *tag*. See :meth:`interpolate_volume_function` for the
+        calling conventions of *f*.
+        """
         if kind is None:
             kind = self.compute_kind
 
+        if dtype is None:
+            dtype = self.default_scalar_type
+
+        if getattr(f, "is_vectorized", False):
+            bdry = self.get_boundary(tag)
+            return self.convert_boundary(
+                    self._vectorized_result_to_array(
+                        f(bdry.nodes, self._boundary_node_element_ids(tag)),
+                        len(bdry.nodes), dtype),
+                    tag, kind)
+
         try:
             # are we interpolating many fields at once?
             shape = f.shape
@@ -1026,14 +1399,14 @@ class Discretization(TimestepCalculator):
         if kind is None:
             kind = self.compute_kind
 
-        result = self.boundary_zeros(shape=(self.dimensions,),
-                tag=tag, dtype=dtype, kind="numpy")
-        for fg in self.get_boundary(tag).face_groups:
-            for face_pair in fg.face_pairs:
-                oeb = face_pair.ext_side.el_base_index
-                opp_index_list = fg.index_lists[face_pair.ext_side.face_index_list_number]
-                for i in opp_index_list:
-                    result[:,oeb+i] = face_pair.int_side.normal
+        if dtype is None:
+            dtype = self.default_scalar_type
+
+        # each face's nodes are contiguous in the boundary vector
+        bdry = self.get_boundary(tag)
+        face_node_count = len(bdry.nodes) // max(len(bdry.face_normals), 1)
+        result = numpy.repeat(bdry.face_normals.T, face_node_count,
+                axis=1).astype(dtype)
 
         return self.convert_boundary(result, tag, kind)
 
@@ -1109,6 +1482,26 @@ class Discretization(TimestepCalculator):
     def nodewise_dot_product(self, a, b):
         return numpy.dot(a, b)
 
+    def nodewise_dot_products_async(self, pairs):
+        """Return a :class:`hedge.tools.futures.Future` of an array
+        containing the dot products of all vector pairs *(a, b)* in *pairs*.
+        Distributed discretizations combine these into a single
+        non-blocking reduction.
+        """
+        from hedge.tools.futures import ImmediateFuture
+        return ImmediateFuture(numpy.array(
+            [self.nodewise_dot_product(a, b) for a, b in pairs]))
+
+    def integrals_async(self, volume_vectors):
+        """Return a :class:`hedge.tools.futures.Future` of an array
+        containing the volume integrals of all *volume_vectors*.
+        Distributed discretizations combine these into a single
+        non-blocking reduction.
+        """
+        integral_projection = self._mass_integral_projection()
+        return self.nodewise_dot_products_async(
+                [(integral_projection, vec) for vec in volume_vectors])
+
     def _integral_projection(self):
         """Find a vector :math:`v` such that
         :math:`v\cdot M u=\int u`."""
@@ -1268,27 +1661,106 @@ class Discretization(TimestepCalculator):
                 "point %s not found. Consider changing threshold."
                 % point)
 
+    @memoize_method
+    def get_point_locator(self):
+        return _BulkPointLocator(self)
+
+    def get_point_interpolation_matrix(self, points, thresh=0):
+        """Return a :class:`scipy.sparse.csr_matrix` that maps nodal values
+        on this discretization to their values at *points*, an array of
+        shape *(point_count, dimensions)*.
+
+        The matrix may be reused for any number of fields. Several fields
+        (or time steps) may be interpolated in one product by stacking
+        them as columns.
+
+        :param thresh: tolerance for points slightly outside of the mesh,
+          see :meth:`hedge.mesh.element.SimplicialElement.contains_point`.
+        """
+        points = numpy.asarray(points)
+        locator = self.get_point_locator()
+        el_nrs, unit_points = locator(points, thresh)
+
+        missing = numpy.nonzero(el_nrs == -1)[0]
+        if len(missing):
+            raise RuntimeError(
+                    "point %s not found (%d points total). "
+                    "Consider changing threshold."
+                    % (points[missing[0]], len(missing)))
+
+        rows = []
+        columns = []
+        values = []
+
+        for eg_nr, eg in enumerate(self.element_groups):
+            in_group = numpy.nonzero(
+                    locator.group_numbers[el_nrs] == eg_nr)[0]
+            if not len(in_group):
+                continue
+
+            ldis = eg.local_discretization
+
+            # interpolation coefficients: V_points V^{-1}
+            point_vdm = ldis.vandermonde_at(unit_points[in_group])
+            coefficients = la.solve(ldis.vandermonde().T, point_vdm.T).T
+
+            el_dofs = eg.el_array_from_volume(
+                    numpy.arange(len(self), dtype=numpy.intp))[
+                            locator.group_element_numbers[el_nrs[in_group]]]
+
+            rows.append(numpy.repeat(in_group, el_dofs.shape[1]))
+            columns.append(el_dofs.ravel())
+            values.append(coefficients.ravel())
+
+        from scipy.sparse import coo_matrix
+        return coo_matrix(
+                (numpy.hstack(values),
+                    (numpy.hstack(rows), numpy.hstack(columns))),
+                shape=(len(points), len(self))).tocsr()
+
+    def get_regrid_matrix(self, new_discr, thresh=0):
+        """Return a sparse matrix mapping nodal values on this
+        discretization to nodal values on *new_discr*. See
+        :meth:`get_point_interpolation_matrix`.
+        """
+        return self.get_point_interpolation_matrix(new_discr.nodes, thresh)
+
     def get_regrid_values(self, field_in, new_discr, dtype=None, 
             use_btree=True, thresh=0):
         """:param field_in: nodal values on old grid.
         :param new_discr: new discretization.
-        :param use_btree: bool to decide if a spatial binary tree will be used.
+        :param use_btree: ignored, retained for compatibility.
+
+        To regrid repeatedly, e.g. at every time step, obtain the
+        matrix from :meth:`get_regrid_matrix` once and reuse it.
         """
 
         if self.get_kind(field_in)!= "numpy":
             raise NotImplementedError(
                     "get_regrid_values needs numpy input field")
 
-        def regrid(scalar_field):
+        regrid_mat = self.get_regrid_matrix(new_discr, thresh)
+
+        from pytools.obj_array import is_obj_array, log_shape
+        if is_obj_array(field_in):
+            from pytools import indices_in_shape
+            ls = log_shape(field_in)
+            indices = list(indices_in_shape(ls))
+
+            # regrid all components in a single product
+            values = regrid_mat * numpy.array(
+                    [field_in[i] for i in indices]).T
+
+            result = numpy.empty(ls, dtype=object)
+            for col, i in enumerate(indices):
+                result[i] = new_discr.volume_empty(dtype=dtype, kind="numpy")
+                result[i][:] = values[:, col]
+            return result
+        else:
             result = new_discr.volume_empty(dtype=dtype, kind="numpy")
-            for ii in range(len(new_discr.nodes)):
-                pe = self.get_point_evaluator(new_discr.nodes[ii], use_btree, thresh)
-                result[ii] = pe(scalar_field)
+            result[:] = regrid_mat * field_in
             return result
 
-        from pytools.obj_array import with_object_array_or_scalar
-        return with_object_array_or_scalar(regrid, field_in)
-
     @memoize_method
     def get_spatial_btree(self):
         from pytools.spatial_btree import SpatialBinaryTreeBucket
@@ -1305,6 +1777,25 @@ class Discretization(TimestepCalculator):
     # {{{ op template execution -----------------------------------------------
     def compile(self, optemplate, post_bind_mapper=lambda x: x,
             type_hints={}):
+        """Return an executor evaluating *optemplate* on this discretization.
+
+        Executors are kept in :attr:`executor_cache`. Compiling an operator
+        template that is structurally equal to one compiled earlier, with the
+        same *post_bind_mapper* and *type_hints*, returns the earlier
+        executor, so that repeatedly binding the same operator (as in
+        :meth:`hedge.optemplate.Operator.apply`) is cheap.
+        """
+        from hedge.optemplate.tools import optemplate_cache_key
+        try:
+            cache_key = (optemplate_cache_key(optemplate), post_bind_mapper,
+                    frozenset(type_hints.iteritems()), self.instrumented)
+            return self.executor_cache[cache_key]
+        except KeyError:
+            pass
+        except (TypeError, ValueError):
+            # some part of the template is not hashable
+            cache_key = None
+
         from hedge.optemplate.mappers import QuadratureUpsamplerRemover
         optemplate = QuadratureUpsamplerRemover(self.quad_min_degrees)(
                 optemplate)
@@ -1317,6 +1808,10 @@ class Discretization(TimestepCalculator):
 
         if self.instrumented:
             ex.instrument()
+
+        if cache_key is not None:
+            self.executor_cache[cache_key] = ex
+
         return ex
 
     def add_function(self, name, func):
@@ -1498,6 +1993,45 @@ class Projector:
         else:
             return result
 
+    def apply_transpose(self, to_vec):
+        """Apply the transpose of the (elementwise) projection matrix,
+        mapping a vector on *to_discr* to one on *from_discr*.
+
+        If the projection interpolates from a coarse to a fine
+        discretization, this is the natural restriction of residuals
+        (i.e. of vectors already weighted by the mass matrix).
+        """
+        from hedge._internal import perform_elwise_operator
+        from hedge.tools import log_shape
+
+        try:
+            transposed_matrices = self.transposed_interp_matrices
+        except AttributeError:
+            transposed_matrices = self.transposed_interp_matrices = [
+                    numpy.asarray(imat.T, order="C")
+                    for imat in self.interp_matrices]
+
+        ls = log_shape(to_vec)
+        result = numpy.empty(shape=ls, dtype=object)
+
+        from pytools import indices_in_shape
+        for i in indices_in_shape(ls):
+            result_i = self.from_discr.volume_zeros(kind="numpy")
+            result[i] = result_i
+
+            for from_eg, to_eg, imat_t in zip(
+                    self.from_discr.element_groups,
+                    self.to_discr.element_groups,
+                    transposed_matrices):
+                perform_elwise_operator(
+                        to_eg.ranges, from_eg.ranges,
+                        imat_t, to_vec[i], result_i)
+
+        if ls == ():
+            return result[()]
+        else:
+            return result
+
 
 
 # }}}
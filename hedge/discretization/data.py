@@ -32,7 +32,7 @@ THE SOFTWARE.
 import numpy
 import numpy.linalg as la
 import hedge._internal
-from pytools import memoize_method
+from pytools import memoize_method, Record
 
 
 
@@ -144,6 +144,12 @@ class CurvedElementGroup(ElementGroupBase):
 
 # }}}
 # {{{ face groups -------------------------------------------------------------
+class FlatFaceData(Record):
+    """See :meth:`StraightFaceGroup.get_flat_face_data`."""
+
+
+
+
 class StraightFaceGroup(hedge._internal.StraightFaceGroup):
     """
     Each face group has its own element numbering.
@@ -246,6 +252,85 @@ class StraightFaceGroup(hedge._internal.StraightFaceGroup):
         self.ldis_loc = ldis_loc
         self.ldis_opp = ldis_opp
 
+    @memoize_method
+    def get_flat_face_data(self):
+        """Return the data of :attr:`face_pairs` laid out as a structure
+        of arrays, so that flux gathers can stream through it.
+
+        Node-level arrays have length *face_pair_count*face_length()*, with
+        the nodes of each face pair contiguous:
+
+        * *int_gather*, *ext_gather*: indices of the interior and exterior
+          nodes in the respective input vectors.
+        * *int_write*, *ext_write*: indices in the flux-on-faces vector to
+          which the interior and (for double-sided groups) exterior flux
+          is written. The latter is empty for single-sided groups.
+
+        Face-level arrays have length *face_pair_count*:
+        *face_jacobians*, *int_element_jacobians*,
+        *ext_element_jacobians*, *int_orders*, *ext_orders* and *h*.
+        *normals* holds the interior normals of all faces for the first
+        axis, then those for the second axis, and so on.
+        """
+        face_pairs = self.face_pairs
+        face_pair_count = len(face_pairs)
+        face_length = self.face_length()
+
+        def get_side_array(side, attr, dtype):
+            return numpy.fromiter(
+                    (getattr(getattr(fp, side), attr) for fp in face_pairs),
+                    dtype=dtype, count=face_pair_count)
+
+        index_lists = numpy.asarray(self.index_lists, dtype=numpy.intp)
+        node_nrs = numpy.arange(face_length, dtype=numpy.intp)
+
+        def get_gather_indices(side):
+            return (get_side_array(side, "el_base_index", numpy.intp)
+                    [:, numpy.newaxis]
+                    + index_lists[get_side_array(
+                        side, "face_index_list_number", numpy.intp)])
+
+        def get_write_bases(side):
+            return face_length*(
+                    get_side_array(side, "local_el_number", numpy.intp)
+                    * self.face_count
+                    + get_side_array(side, "face_id", numpy.intp))
+
+        int_write = (get_write_bases("int_side")[:, numpy.newaxis]
+                + node_nrs)
+        if self.double_sided:
+            ext_write = (get_write_bases("ext_side")[:, numpy.newaxis]
+                    + index_lists[numpy.fromiter(
+                        (fp.ext_native_write_map for fp in face_pairs),
+                        dtype=numpy.intp, count=face_pair_count)])
+        else:
+            ext_write = numpy.zeros((0,), dtype=numpy.intp)
+
+        def to_index_array(ary):
+            return numpy.ascontiguousarray(ary.ravel(), dtype=numpy.uint32)
+
+        return FlatFaceData(
+                face_pair_count=face_pair_count,
+                face_length=face_length,
+                int_gather=to_index_array(get_gather_indices("int_side")),
+                ext_gather=to_index_array(get_gather_indices("ext_side")),
+                int_write=to_index_array(int_write),
+                ext_write=to_index_array(ext_write),
+                normals=numpy.array(
+                    [fp.int_side.normal for fp in face_pairs],
+                    dtype=numpy.float64).T.copy().ravel(),
+                face_jacobians=get_side_array(
+                    "int_side", "face_jacobian", numpy.float64),
+                int_element_jacobians=get_side_array(
+                    "int_side", "element_jacobian", numpy.float64),
+                ext_element_jacobians=get_side_array(
+                    "ext_side", "element_jacobian", numpy.float64),
+                int_orders=get_side_array(
+                    "int_side", "order", numpy.float64),
+                ext_orders=get_side_array(
+                    "ext_side", "order", numpy.float64),
+                h=get_side_array("int_side", "h", numpy.float64))
+
 
 
 
@@ -365,9 +450,12 @@ class Boundary(object):
       this list are actually C++ ElementRanges objects. There is one list per face
       group object, in the same order.
     :ivar el_face_to_face_group_and_face_pair:
+    :ivar face_normals: an array of shape *(face_count, dimensions)*
+      holding the outward unit normal of each face, in the order in which
+      the faces' nodes appear in :attr:`nodes`.
     """
     def __init__(self, discr, nodes, vol_indices, face_groups, fg_ranges,
-            el_face_to_face_group_and_face_pair={}):
+            el_face_to_face_group_and_face_pair={}, face_normals=None):
         self.discr = discr
         self.nodes = nodes
         self.vol_indices = numpy.asarray(vol_indices, dtype=numpy.intp)
@@ -375,6 +463,7 @@ class Boundary(object):
         self.fg_ranges = fg_ranges
         self.el_face_to_face_group_and_face_pair = \
                 el_face_to_face_group_and_face_pair
+        self.face_normals = face_normals
 
     def find_facepair(self, el_face):
         fg, fp_idx = self.el_face_to_face_group_and_face_pair[el_face]
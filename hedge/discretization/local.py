@@ -33,6 +33,7 @@ from hedge.tools import AffineMap
 import hedge._internal
 from math import sqrt
 from pytools import memoize_method
+from hedge.discretization.matrix_cache import memoize_method_on_disk
 import hedge.mesh.element
 
 
@@ -128,6 +129,14 @@ GradTetrahedronBasisFunction = hedge._internal.GradTetrahedronBasisFunction
 # {{{ base classes ------------------------------------------------------------
 # {{{ generic base classes ----------------------------------------------------
 class LocalDiscretization(object):
+    def matrix_cache_key(self):
+        """Return a tuple identifying this local discretization in the
+        on-disk cache of reference matrices, or *None* if its matrices
+        should not be cached on disk.
+        See :mod:`hedge.discretization.matrix_cache`.
+        """
+        return None
+
     # {{{ numbering -----------------------------------------------------------
     @memoize_method
     def face_count(self):
@@ -140,25 +149,47 @@ class LocalDiscretization(object):
     # }}}
 
     # {{{ matrices ------------------------------------------------------------
-    @memoize_method
-    def vandermonde(self):
+    def vandermonde_at(self, points):
+        """Return the Vandermonde matrix of the basis_functions() at
+        *points*, given in unit coordinates."""
+
         from hedge.polynomial import generic_vandermonde
 
         return generic_vandermonde(
-                list(self.unit_nodes()),
+                list(points),
                 list(self.basis_functions()))
 
-    @memoize_method
-    def grad_vandermonde(self):
-        """Compute the Vandermonde matrices of the grad_basis_functions().
-        Return a list of these matrices."""
+    def grad_vandermonde_at(self, points):
+        """Return a list of the Vandermonde matrices of the
+        grad_basis_functions() at *points*, given in unit coordinates."""
 
         from hedge.polynomial import generic_multi_vandermonde
 
         return generic_multi_vandermonde(
-                list(self.unit_nodes()),
+                list(points),
                 list(self.grad_basis_functions()))
 
+    def face_vandermonde_at(self, points):
+        """Return the Vandermonde matrix of the face_basis() at *points*,
+        given in facial unit coordinates."""
+
+        from hedge.polynomial import generic_vandermonde
+
+        return generic_vandermonde(
+                list(points),
+                list(self.face_basis()))
+
+    @memoize_method_on_disk
+    def vandermonde(self):
+        return self.vandermonde_at(self.unit_nodes())
+
+    @memoize_method_on_disk
+    def grad_vandermonde(self):
+        """Compute the Vandermonde matrices of the grad_basis_functions().
+        Return a list of these matrices."""
+
+        return self.grad_vandermonde_at(self.unit_nodes())
+
     def _assemble_multi_face_mass_matrix(self, face_mass_matrix):
         """Helper for the function below."""
 
@@ -176,7 +207,7 @@ class LocalDiscretization(object):
 
         return result
 
-    @memoize_method
+    @memoize_method_on_disk
     def multi_face_mass_matrix(self):
         """Return a matrix that combines the effect of multiple face
         mass matrices applied to a vector of the shape::
@@ -188,7 +219,7 @@ class LocalDiscretization(object):
         """
         return self._assemble_multi_face_mass_matrix(self.face_mass_matrix())
 
-    @memoize_method
+    @memoize_method_on_disk
     def lifting_matrix(self):
         """Return a matrix that combines the effect of the inverse
         mass matrix applied after the multi-face mass matrix to a vector
@@ -236,7 +267,7 @@ class LocalDiscretization(object):
 
 
 class OrthonormalLocalDiscretization(LocalDiscretization):
-    @memoize_method
+    @memoize_method_on_disk
     def inverse_mass_matrix(self):
         """Return the inverse of the mass matrix of the unit element
         with respect to the nodal coefficients. Divide by the Jacobian
@@ -247,7 +278,7 @@ class OrthonormalLocalDiscretization(LocalDiscretization):
         v = self.vandermonde()
         return numpy.dot(v, v.T)
 
-    @memoize_method
+    @memoize_method_on_disk
     def mass_matrix(self):
         """Return the mass matrix of the unit element with respect
         to the nodal coefficients. Multiply by the Jacobian to obtain
@@ -256,7 +287,7 @@ class OrthonormalLocalDiscretization(LocalDiscretization):
 
         return numpy.asarray(la.inv(self.inverse_mass_matrix()), order="C")
 
-    @memoize_method
+    @memoize_method_on_disk
     def differentiation_matrices(self):
         """Return matrices that map the nodal values of a function
         to the nodal values of its derivative in each of the unit
@@ -272,6 +303,10 @@ class OrthonormalLocalDiscretization(LocalDiscretization):
 
 # {{{ simplex base class ------------------------------------------------------
 class PkSimplexDiscretization(OrthonormalLocalDiscretization):
+    def matrix_cache_key(self):
+        cls = type(self)
+        return ("%s.%s" % (cls.__module__, cls.__name__), self.order)
+
     # queries -----------------------------------------------------------------
     @property
     def has_facial_nodes(self):
@@ -348,15 +383,11 @@ class PkSimplexDiscretization(OrthonormalLocalDiscretization):
         dim = self.dimensions
         return [unodes[i][:dim-1] for i in face_indices[0]]
 
-    @memoize_method
+    @memoize_method_on_disk
     def face_vandermonde(self):
-        from hedge.polynomial import generic_vandermonde
+        return self.face_vandermonde_at(self.unit_face_nodes())
 
-        return generic_vandermonde(
-                self.unit_face_nodes(),
-                self.face_basis())
-
-    @memoize_method
+    @memoize_method_on_disk
     def face_mass_matrix(self):
         face_vdm = self.face_vandermonde()
 
@@ -511,7 +542,7 @@ class PkSimplexDiscretization(OrthonormalLocalDiscretization):
             yield self.equilateral_to_unit(
                     self.barycentric_to_equilateral(bary))
 
-    @memoize_method
+    @memoize_method_on_disk
     def unit_nodes(self):
         """Generate the warped nodes in unit coordinates (r,s,...)."""
         return [self.equilateral_to_unit(node)
@@ -534,6 +565,30 @@ class PkSimplexDiscretization(OrthonormalLocalDiscretization):
         return generate_nonnegative_integer_tuples_summing_to_at_most(
                 self.order, self.dimensions)
 
+    def vandermonde_at(self, points):
+        from hedge.polynomial import simplex_vandermonde
+        return simplex_vandermonde(self.dimensions,
+                self.generate_mode_identifiers(), points)
+
+    def grad_vandermonde_at(self, points):
+        from hedge.polynomial import grad_simplex_vandermonde
+        return grad_simplex_vandermonde(self.dimensions,
+                self.generate_mode_identifiers(), points)
+
+    def face_vandermonde_at(self, points):
+        if self.dimensions == 1:
+            return OrthonormalLocalDiscretization.face_vandermonde_at(
+                    self, points)
+
+        # face_basis() is the (dimensions-1)-simplex basis
+        from pytools import \
+                generate_nonnegative_integer_tuples_summing_to_at_most
+        from hedge.polynomial import simplex_vandermonde
+        return simplex_vandermonde(self.dimensions-1,
+                generate_nonnegative_integer_tuples_summing_to_at_most(
+                    self.order, self.dimensions-1),
+                points)
+
     # }}}
 
     # {{{ time step scaling ---------------------------------------------------
@@ -574,6 +629,12 @@ class PkSimplexDiscretization(OrthonormalLocalDiscretization):
         def face_node_count(self):
             return len(self.face_nodes)
 
+        def matrix_cache_key(self):
+            ldis_key = self.ldis.matrix_cache_key()
+            if ldis_key is None:
+                return None
+            return ldis_key + ("quadrature", self.exact_to_degree)
+
         @memoize_method
         def face_indices(self):
             """Return a list of face index lists. Each face index list contains
@@ -586,35 +647,26 @@ class PkSimplexDiscretization(OrthonormalLocalDiscretization):
                     for face_idx in range(self.ldis.face_count())]
 
         # {{{ matrices
-        @memoize_method
+        @memoize_method_on_disk
         def vandermonde(self):
-            from hedge.polynomial import generic_vandermonde
-            return generic_vandermonde(
-                    self.volume_nodes,
-                    list(self.ldis.basis_functions()))
+            return self.ldis.vandermonde_at(self.volume_nodes)
 
-        @memoize_method
+        @memoize_method_on_disk
         def face_vandermonde(self):
-            from hedge.polynomial import generic_vandermonde
-            return generic_vandermonde(
-                    self.face_nodes,
-                    list(self.ldis.face_basis()))
+            return self.ldis.face_vandermonde_at(self.face_nodes)
 
-        @memoize_method
+        @memoize_method_on_disk
         def volume_up_interpolation_matrix(self):
             from hedge.tools.linalg import leftsolve
             return leftsolve(
                         self.ldis.vandermonde(), 
                         self.vandermonde())
 
-        @memoize_method
+        @memoize_method_on_disk
         def diff_vandermonde_matrices(self):
-            from hedge.polynomial import generic_multi_vandermonde
-            return generic_multi_vandermonde(
-                    self.volume_nodes,
-                    list(self.ldis.grad_basis_functions()))
+            return self.ldis.grad_vandermonde_at(self.volume_nodes)
 
-        @memoize_method
+        @memoize_method_on_disk
         def volume_to_face_up_interpolation_matrix(self):
             """Generate a matrix that maps volume nodal values to
             a vector of face nodal values on the quadrature grid, with 
@@ -631,22 +683,19 @@ class PkSimplexDiscretization(OrthonormalLocalDiscretization):
                     [face_map(qnode) for qnode in self.face_nodes]
                     for face_map in face_maps))
 
-            from hedge.polynomial import generic_vandermonde
-            vdm = generic_vandermonde(
-                    face_nodes,
-                    list(ldis.basis_functions()))
+            vdm = ldis.vandermonde_at(face_nodes)
 
             from hedge.tools.linalg import leftsolve
             return leftsolve(self.ldis.vandermonde(), vdm)
 
-        @memoize_method
+        @memoize_method_on_disk
         def face_up_interpolation_matrix(self):
             from hedge.tools.linalg import leftsolve
             return leftsolve(
                         self.ldis.face_vandermonde(), 
                         self.face_vandermonde())
 
-        @memoize_method
+        @memoize_method_on_disk
         def mass_matrix(self):
             return numpy.asarray(
                     la.solve(
@@ -656,7 +705,7 @@ class PkSimplexDiscretization(OrthonormalLocalDiscretization):
                             numpy.diag(self.volume_weights))),
                     order="C")
 
-        @memoize_method
+        @memoize_method_on_disk
         def stiffness_t_matrices(self):
             return [numpy.asarray(
                 la.solve(
@@ -668,7 +717,7 @@ class PkSimplexDiscretization(OrthonormalLocalDiscretization):
                     for diff_vdm in self.diff_vandermonde_matrices()]
 
 
-        @memoize_method
+        @memoize_method_on_disk
         def face_mass_matrix(self):
             return numpy.asarray(
                     la.solve(
@@ -678,7 +727,7 @@ class PkSimplexDiscretization(OrthonormalLocalDiscretization):
                             numpy.diag(self.face_weights))),
                     order="C")
 
-        @memoize_method
+        @memoize_method_on_disk
         def multi_face_mass_matrix(self):
             z= self.ldis._assemble_multi_face_mass_matrix(
                     self.face_mass_matrix())
@@ -902,6 +951,10 @@ class TriangleDiscretization(PkSimplexDiscretization):
         self.order = order
         self.fancy_node_ordering = fancy_node_ordering
 
+    def matrix_cache_key(self):
+        return (PkSimplexDiscretization.matrix_cache_key(self)
+                + (self.fancy_node_ordering,))
+
     # numbering ---------------------------------------------------------------
     @memoize_method
     def node_tuples(self):
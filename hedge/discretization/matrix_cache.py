@@ -0,0 +1,183 @@
+"""Persistent on-disk cache for reference element matrices."""
+
+from __future__ import division
+
+__copyright__ = "Copyright (C) 2026 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+
+
+
+import os
+import numpy
+from pytools import memoize, memoize_method
+
+
+
+
+def get_cache_dir():
+    """Return the directory holding the cached matrices, or *None* if
+    caching is disabled.
+
+    The cache is only used if the environment variable
+    :envvar:`HEDGE_MATRIX_CACHE_DIR` names its location.
+    """
+    return os.environ.get("HEDGE_MATRIX_CACHE_DIR") or None
+
+
+
+
+@memoize
+def get_source_hash():
+    """Return a hash of the source and data files of the :mod:`hedge`
+    package, so that cached matrices computed by a different version of
+    hedge are never used.
+    """
+    from hashlib import sha1
+    checksum = sha1()
+
+    import hedge
+    package_dir = os.path.dirname(os.path.abspath(hedge.__file__))
+    for dirpath, dirnames, file_names in os.walk(package_dir):
+        dirnames.sort()
+        for file_name in sorted(file_names):
+            if not file_name.endswith((".py", ".npz")):
+                continue
+
+            path = os.path.join(dirpath, file_name)
+            checksum.update(os.path.relpath(path, package_dir))
+            inf = open(path, "rb")
+            try:
+                checksum.update(inf.read())
+            finally:
+                inf.close()
+
+    return checksum.hexdigest()
+
+
+
+
+def _get_file_name(cache_dir, key):
+    from hashlib import sha1
+    return os.path.join(cache_dir, get_source_hash(),
+            "%s-%s" % (
+                "-".join(str(key_part) for key_part in key[:2]),
+                sha1(repr(key)).hexdigest()))
+
+
+
+
+def _save(file_name, value):
+    """Write *value* to *file_name* atomically, so that concurrent
+    writers (such as several MPI ranks) never expose partial files.
+    """
+    directory = os.path.dirname(file_name)
+    try:
+        os.makedirs(directory)
+    except OSError:
+        if not os.path.isdir(directory):
+            raise
+
+    from tempfile import mkstemp
+    fd, temp_name = mkstemp(dir=directory, suffix=".npy")
+    try:
+        outf = os.fdopen(fd, "wb")
+        try:
+            numpy.save(outf, value)
+        finally:
+            outf.close()
+        os.rename(temp_name, file_name)
+    except:
+        os.unlink(temp_name)
+        raise
+
+
+
+
+def load_or_compute(key, compute):
+    """Return the array (or list of equal-shape arrays) identified by the
+    tuple *key* from the on-disk cache, calling *compute* to obtain and
+    store it if necessary. Cached arrays are memory-mapped copy-on-write.
+    """
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return compute()
+
+    base_name = _get_file_name(cache_dir, key)
+
+    for suffix, is_list in [(".npy", False), ("-list.npy", True)]:
+        # Map copy-on-write: pages are shared between processes, while
+        # callers may still modify the arrays they get.
+        try:
+            value = numpy.load(base_name+suffix, mmap_mode="c") \
+                    .view(numpy.ndarray)
+        except IOError:
+            continue
+
+        if is_list:
+            return list(value)
+        else:
+            return value
+
+    result = compute()
+
+    if isinstance(result, numpy.ndarray):
+        if result.dtype == object:
+            return result
+        to_save, suffix = result, ".npy"
+    else:
+        arrays = [numpy.asarray(ary) for ary in result]
+        if len(set(ary.shape for ary in arrays)) > 1:
+            return result
+        to_save, suffix = numpy.array(arrays), "-list.npy"
+
+    try:
+        _save(base_name+suffix, to_save)
+    except (OSError, IOError):
+        from warnings import warn
+        warn("could not write reference matrix cache in '%s'" % cache_dir)
+
+    return result
+
+
+
+
+def memoize_method_on_disk(method):
+    """Like :func:`pytools.memoize_method`, but also keeps the result in
+    the on-disk cache (see :func:`load_or_compute`).
+
+    The instance must provide a method *matrix_cache_key()*, returning a
+    tuple of hashable values identifying it, or *None* if its results
+    must not be cached on disk. The method name and its arguments are
+    appended to form the full key.
+    """
+    def wrapper(self, *args):
+        key = self.matrix_cache_key()
+        if key is None:
+            return method(self, *args)
+
+        return load_or_compute(key + (method.__name__,) + args,
+                lambda: method(self, *args))
+
+    from functools import update_wrapper
+    update_wrapper(wrapper, method)
+    return memoize_method(wrapper)
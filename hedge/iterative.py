@@ -218,3 +218,652 @@ def parallel_cg(pcon, operator, b, precon=None, x=None, tol=1e-7, max_iterations
         debug = False
 
     return cg.run(max_iterations, tol, debug_callback, debug)
+
+
+
+
+# {{{ pipelined cg
+
+class PipelinedCGStateContainer:
+    """Preconditioned conjugate gradients in the pipelined formulation of
+
+    P. Ghysels, W. Vanroose. Hiding global synchronization latency in
+    the preconditioned Conjugate Gradient algorithm. Parallel Computing
+    40 (2014), pp. 224-238. http://dx.doi.org/10.1016/j.parco.2013.06.001
+
+    Both inner products of an iteration are carried out in one
+    (possibly non-blocking) reduction that is overlapped with the
+    application of the preconditioner and the operator. All vector
+    updates happen in place.
+
+    :arg dot_products_async: a function that accepts a list of vector
+      pairs *(a, b)* and returns a :class:`hedge.tools.futures.Future`
+      of an array of their inner products, such as
+      :meth:`hedge.discretization.Discretization.nodewise_dot_products_async`.
+    """
+
+    def __init__(self, operator, precon=None, dot_products_async=None):
+        if precon is None:
+            precon = IdentityOperator(operator.dtype, operator.shape[0])
+
+        self.operator = operator
+        self.precon = precon
+
+        if dot_products_async is None:
+            def dot_products_async(pairs):
+                from hedge.tools.futures import ImmediateFuture
+                return ImmediateFuture(numpy.array(
+                    [numpy.dot(a, b.conj()) for a, b in pairs]))
+
+        self.dot_products_async = dot_products_async
+
+    def reset(self, rhs, x=None):
+        self.rhs = rhs
+
+        if x is None:
+            x = numpy.zeros((self.operator.shape[0],))
+        self.x = x
+
+        self.residual = rhs - self.operator(x)
+        self.restart_recurrences()
+
+        self.gamma = self.dot_products_async(
+                [(self.residual, self.u)])()[0]
+        return self.gamma
+
+    def restart_recurrences(self):
+        self.u = self.precon(self.residual)
+        if self.u is self.residual:
+            self.u = self.residual.copy()
+        self.w = self.operator(self.u)
+
+        self.z = numpy.zeros_like(self.residual)
+        self.q = numpy.zeros_like(self.residual)
+        self.s = numpy.zeros_like(self.residual)
+        self.p = numpy.zeros_like(self.residual)
+        self.scratch = numpy.empty_like(self.residual)
+
+        self.gamma_old = None
+        self.alpha_old = None
+
+    def one_iteration(self):
+        """Perform one iteration and return the preconditioned residual
+        inner product from the *beginning* of the iteration.
+        """
+        reduction = self.dot_products_async(
+                [(self.residual, self.u), (self.w, self.u)])
+
+        m = self.precon(self.w)
+        n = self.operator(m)
+
+        gamma, delta = reduction()
+
+        if self.gamma_old is None:
+            beta = 0
+            alpha = gamma / delta
+        else:
+            beta = gamma / self.gamma_old
+            alpha = gamma / (delta - beta * gamma / self.alpha_old)
+
+        self.gamma_old = gamma
+        self.alpha_old = alpha
+
+        # in-place updates, avoiding temporaries
+        for vec, summand in [
+                (self.z, n), (self.q, m), (self.s, self.w), (self.p, self.u)]:
+            vec *= beta
+            vec += summand
+
+        scratch = self.scratch
+        for vec, direction, factor in [
+                (self.x, self.p, alpha),
+                (self.residual, self.s, -alpha),
+                (self.u, self.q, -alpha),
+                (self.w, self.z, -alpha)]:
+            numpy.multiply(direction, factor, scratch)
+            vec += scratch
+
+        return gamma
+
+    def run(self, max_iterations=None, tol=1e-7, debug=0):
+        if max_iterations is None:
+            max_iterations = 10 * self.operator.shape[0]
+
+        if self.dot_products_async([(self.rhs, self.rhs)])()[0] == 0:
+            return self.rhs
+
+        gamma_0 = self.gamma
+        iterations = 0
+        while iterations < max_iterations:
+            gamma = self.one_iteration()
+
+            if abs(gamma) < tol*tol * abs(gamma_0):
+                # The recurrence claims convergence--confirm using the
+                # true residual and restart the recurrences if needed.
+                self.residual = self.rhs - self.operator(self.x)
+                self.restart_recurrences()
+
+                self.gamma = self.dot_products_async(
+                        [(self.residual, self.u)])()[0]
+                if abs(self.gamma) < tol*tol * abs(gamma_0):
+                    if debug:
+                        print "%d iterations" % iterations
+                    return self.x
+
+            if debug and iterations % debug == 0:
+                print "debug: gamma=%g" % gamma
+            iterations += 1
+
+        raise ConvergenceError("pipelined cg failed to converge")
+
+
+
+
+def parallel_pipelined_cg(pcon, operator, b, precon=None, x=None, tol=1e-7,
+        max_iterations=None, debug=False, dot_products_async=None):
+    """Like :func:`parallel_cg`, but using :class:`PipelinedCGStateContainer`.
+    Pass :meth:`hedge.discretization.Discretization.nodewise_dot_products_async`
+    as *dot_products_async* for distributed runs.
+    """
+    if x is None:
+        x = numpy.zeros((operator.shape[1],))
+
+    cg = PipelinedCGStateContainer(operator, precon,
+            dot_products_async=dot_products_async)
+    cg.reset(b, x)
+
+    if not pcon.is_head_rank:
+        debug = False
+
+    return cg.run(max_iterations, tol, debug)
+
+# }}}
+
+
+
+
+# {{{ gmres
+
+def gmres(operator, b, precon=None, x=None, tol=1e-7, restart=30,
+        max_iterations=None, debug=False, dot=None):
+    """Solve *operator(x) = b* using restarted, flexible GMRES with
+    right preconditioning.
+
+    Since the Krylov basis is built from the preconditioned vectors,
+    *precon* is allowed to change from one iteration to the next.
+    Only real-valued systems are supported.
+
+    :arg tol: the iteration stops once the residual norm has been
+      reduced to *tol* times the norm of *b*.
+    :arg max_iterations: the maximum total number of inner iterations.
+    """
+    if precon is None:
+        precon = IdentityOperator(operator.dtype, operator.shape[0])
+
+    if dot is None:
+        dot = numpy.dot
+
+    def norm(a):
+        return abs(dot(a, a))**0.5
+
+    if max_iterations is None:
+        max_iterations = 10 * operator.shape[0]
+
+    b_norm = norm(b)
+    if b_norm == 0:
+        return numpy.zeros_like(b)
+
+    if x is None:
+        x = numpy.zeros_like(b)
+
+    iterations = 0
+    while True:
+        residual = b - operator(x)
+        beta = norm(residual)
+        if beta <= tol*b_norm:
+            if debug:
+                print "%d iterations" % iterations
+            return x
+
+        if iterations >= max_iterations:
+            raise ConvergenceError("gmres failed to converge")
+
+        basis = [residual/beta]
+        precon_basis = []
+
+        hessenberg = numpy.zeros((restart+1, restart))
+        cs = numpy.zeros(restart)
+        sn = numpy.zeros(restart)
+        g = numpy.zeros(restart+1)
+        g[0] = beta
+
+        for j in xrange(restart):
+            z = precon(basis[j])
+            precon_basis.append(z)
+            w = operator(z)
+
+            # modified Gram-Schmidt
+            for i in xrange(j+1):
+                hessenberg[i, j] = dot(w, basis[i])
+                w = w - hessenberg[i, j]*basis[i]
+            w_norm = hessenberg[j+1, j] = norm(w)
+
+            # apply previous Givens rotations to the new column
+            for i in xrange(j):
+                h_i = hessenberg[i, j]
+                h_ip1 = hessenberg[i+1, j]
+                hessenberg[i, j] = cs[i]*h_i + sn[i]*h_ip1
+                hessenberg[i+1, j] = -sn[i]*h_i + cs[i]*h_ip1
+
+            # compute and apply the new rotation
+            denom = (hessenberg[j, j]**2 + hessenberg[j+1, j]**2)**0.5
+            if denom == 0:
+                cs[j], sn[j] = 1, 0
+            else:
+                cs[j] = hessenberg[j, j]/denom
+                sn[j] = hessenberg[j+1, j]/denom
+
+            hessenberg[j, j] = denom
+            hessenberg[j+1, j] = 0
+            g[j+1] = -sn[j]*g[j]
+            g[j] = cs[j]*g[j]
+
+            iterations += 1
+
+            if debug:
+                print "debug: gmres residual=%g" % abs(g[j+1])
+
+            if (abs(g[j+1]) <= tol*b_norm or w_norm == 0
+                    or iterations >= max_iterations):
+                break
+
+            basis.append(w/w_norm)
+
+        k = len(precon_basis)
+        y = numpy.linalg.solve(hessenberg[:k, :k], g[:k])
+        for y_i, z_i in zip(y, precon_basis):
+            x = x + y_i*z_i
+
+# }}}
+
+
+
+
+# {{{ matrix-free newton-krylov
+
+class FiniteDifferenceJacobian(OperatorBase):
+    """The Jacobian of *func* at *x0*, applied to a vector *v* by the
+    first-order difference quotient
+
+    .. math::
+
+        J v \\approx \\frac{f(x_0 + h v) - f(x_0)}{h}.
+
+    No matrix is ever formed, so any (e.g. compiled) right-hand side
+    may be used.
+    """
+
+    def __init__(self, func, x0, f0=None, epsilon=None, dot=None):
+        self.func = func
+        self.x0 = x0
+
+        if f0 is None:
+            f0 = func(x0)
+        self.f0 = f0
+
+        if epsilon is None:
+            epsilon = numpy.finfo(x0.dtype).eps**0.5
+        self.epsilon = epsilon
+
+        if dot is None:
+            dot = numpy.dot
+
+        def norm(a):
+            return abs(dot(a, a))**0.5
+
+        self.norm = norm
+        self.x0_norm = norm(x0)
+
+    @property
+    def dtype(self):
+        return self.x0.dtype
+
+    @property
+    def shape(self):
+        n = len(self.x0)
+        return n, n
+
+    def __call__(self, operand):
+        operand_norm = self.norm(operand)
+        if operand_norm == 0:
+            return numpy.zeros_like(self.f0)
+
+        h = self.epsilon*(1+self.x0_norm)/operand_norm
+        return (self.func(self.x0 + h*operand) - self.f0)/h
+
+
+
+
+def newton_krylov(func, x0, precon=None, tol=1e-8, max_iterations=20,
+        krylov_tol=1e-4, restart=30, max_krylov_iterations=None,
+        debug=False, dot=None):
+    """Solve *func(x) = 0* by an inexact Newton iteration starting at *x0*.
+    Each linearized system is solved by :func:`gmres` using a
+    :class:`FiniteDifferenceJacobian`.
+
+    :arg tol: the iteration stops once the norm of *func(x)* has been
+      reduced to *tol* times its initial value.
+    :arg krylov_tol: the relative tolerance of each linear solve.
+      Since the difference quotients carry a relative error of about
+      the square root of machine epsilon, this should not be chosen
+      much tighter than that.
+    :arg precon: an approximate inverse of the Jacobian of *func*,
+      held fixed over all Newton steps.
+    """
+    if dot is None:
+        dot = numpy.dot
+
+    def norm(a):
+        return abs(dot(a, a))**0.5
+
+    x = x0
+    f = func(x)
+    f0_norm = norm(f)
+
+    for iterations in xrange(max_iterations):
+        if norm(f) <= tol*f0_norm:
+            if debug:
+                print "%d newton iterations" % iterations
+            return x
+
+        jacobian = FiniteDifferenceJacobian(func, x, f, dot=dot)
+        dx = gmres(jacobian, -f, precon=precon, tol=krylov_tol,
+                restart=restart, max_iterations=max_krylov_iterations,
+                debug=debug, dot=dot)
+
+        x = x + dx
+        f = func(x)
+
+        if debug:
+            print "debug: newton residual=%g" % norm(f)
+
+    if norm(f) <= tol*f0_norm:
+        return x
+
+    raise ConvergenceError("newton iteration failed to converge")
+
+# }}}
+
+
+
+
+# {{{ element block-jacobi preconditioner
+
+class ElementBlockJacobiPreconditioner(OperatorBase):
+    """Applies one dense matrix per element to a (flattened) volume vector,
+    in the manner of
+    :class:`hedge.optemplate.operators.ElementwiseLinearOperator`,
+    except that each element carries its own matrix.
+
+    A vector with *component_count* components is expected to be stored
+    component-major, i.e. as the concatenation of its component volume
+    vectors. Each element block couples all components of that element.
+
+    :ivar inverse_blocks: a list (one entry per element group) of arrays
+      of shape *(element_count, n, n)*, where *n* is the number of nodes
+      per element times *component_count*.
+    """
+
+    def __init__(self, discr, inverse_blocks, component_count=1):
+        self.discr = discr
+        self.inverse_blocks = inverse_blocks
+        self.component_count = component_count
+        self.element_dof_indices = [
+                _element_dof_indices(discr, eg, component_count)
+                for eg in discr.element_groups]
+
+    @property
+    def dtype(self):
+        return self.inverse_blocks[0].dtype
+
+    @property
+    def shape(self):
+        n = len(self.discr)*self.component_count
+        return n, n
+
+    def __call__(self, operand):
+        result = numpy.empty_like(operand)
+        for dof_idx, inv_blocks in zip(
+                self.element_dof_indices, self.inverse_blocks):
+            # Each element has its own matrix, which rules out
+            # perform_elwise_operator--apply the whole stack of blocks of
+            # the group at once instead.
+            result[dof_idx] = numpy.einsum(
+                    "eij,ej->ei", inv_blocks, operand[dof_idx])
+
+        return result
+
+
+
+
+def _element_dof_indices(discr, eg, component_count):
+    """Return an integer array of shape *(element_count, n)* giving the
+    indices of each element's degrees of freedom in a component-major
+    flattened vector.
+    """
+    el_dofs = eg.el_array_from_volume(numpy.arange(len(discr)))
+    return numpy.hstack([
+        comp*len(discr) + el_dofs
+        for comp in range(component_count)])
+
+
+
+
+def make_block_jacobi_preconditioner(discr, operator, component_count=1,
+        coloring_distance=2):
+    """Recover the element-diagonal blocks of the linear (or linearized,
+    e.g. :class:`FiniteDifferenceJacobian`) *operator* by probing and
+    return an :class:`ElementBlockJacobiPreconditioner` applying their
+    inverses.
+
+    Elements are colored such that elements at most *coloring_distance*
+    face adjacencies apart never share a color. All elements of one color
+    are probed at once, so the number of operator applications is the
+    number of colors times the block size. The default of 2 accommodates
+    operators that apply a flux-based derivative twice, such as
+    second-order operators in LDG or IP form.
+    """
+    colors = discr.mesh.element_colors(coloring_distance)
+    n_total = len(discr)*component_count
+
+    inverse_blocks = []
+    for eg in discr.element_groups:
+        dof_idx = _element_dof_indices(discr, eg, component_count)
+        el_count, block_size = dof_idx.shape
+        eg_colors = colors[eg.member_nrs]
+
+        blocks = numpy.empty((el_count, block_size, block_size),
+                dtype=operator.dtype)
+
+        for color in xrange(numpy.max(eg_colors)+1):
+            color_els = numpy.nonzero(eg_colors == color)[0]
+            if not len(color_els):
+                continue
+
+            for j in xrange(block_size):
+                probe = numpy.zeros(n_total, dtype=operator.dtype)
+                probe[dof_idx[color_els, j]] = 1
+                response = operator(probe)
+                blocks[color_els, :, j] = response[dof_idx[color_els]]
+
+        inverse_blocks.append(numpy.linalg.inv(blocks))
+
+    return ElementBlockJacobiPreconditioner(discr, inverse_blocks,
+            component_count)
+
+# }}}
+
+
+
+
+# {{{ sparse assembly by probing
+
+def assemble_sparse_matrix(discr, operator, component_count=1,
+        stencil_radius=1, dtype=None):
+    """Return a :class:`scipy.sparse.csr_matrix` representing the linear
+    *operator*, which acts on component-major flattened volume vectors
+    (see :class:`ElementBlockJacobiPreconditioner`).
+
+    *stencil_radius* is the number of face adjacencies over which one
+    application of *operator* can propagate information: 1 for operators
+    applying one flux-based derivative, 2 for second-order operators in
+    LDG form. Elements are colored such that no two elements of the same
+    color influence a common element, so that a single application per
+    color and element-local degree of freedom recovers all columns
+    belonging to that color. The work is thus proportional to the number
+    of nonzeros (times the number of colors).
+
+    In a distributed setting, only the rank-local block is assembled.
+    """
+    if dtype is None:
+        dtype = operator.dtype
+
+    # only one (straight) element group exists at the moment
+    eg, = discr.element_groups
+
+    mesh = discr.mesh
+    colors = mesh.element_colors(2*stencil_radius)[eg.member_nrs]
+    neighborhoods = mesh.element_neighborhoods(stencil_radius)
+
+    el_id_to_group_idx = numpy.empty(len(mesh.elements), dtype=numpy.intp)
+    el_id_to_group_idx[eg.member_nrs] = numpy.arange(len(eg.member_nrs))
+
+    dof_idx = _element_dof_indices(discr, eg, component_count)
+    el_count, block_size = dof_idx.shape
+    n_total = len(discr)*component_count
+
+    all_rows = []
+    all_cols = []
+    all_values = []
+
+    for color in xrange(numpy.max(colors)+1):
+        color_els = numpy.nonzero(colors == color)[0]
+        if not len(color_els):
+            continue
+
+        # (probed element, influenced element) pairs
+        col_els = []
+        row_els = []
+        for el in color_els:
+            nb_els = el_id_to_group_idx[
+                    list(neighborhoods[eg.member_nrs[el]])]
+            col_els.extend([el]*len(nb_els))
+            row_els.extend(nb_els)
+
+        col_els = numpy.array(col_els, dtype=numpy.intp)
+        row_dofs = dof_idx[numpy.array(row_els, dtype=numpy.intp)]
+
+        for j in xrange(block_size):
+            probe = numpy.zeros(n_total, dtype=dtype)
+            probe[dof_idx[color_els, j]] = 1
+            response = operator(probe)
+
+            all_rows.append(row_dofs.ravel())
+            all_cols.append(numpy.repeat(dof_idx[col_els, j], block_size))
+            all_values.append(response[row_dofs].ravel())
+
+    from scipy.sparse import coo_matrix
+    return coo_matrix(
+            (numpy.hstack(all_values),
+                (numpy.hstack(all_rows), numpy.hstack(all_cols))),
+            shape=(n_total, n_total)).tocsr()
+
+# }}}
+
+
+
+
+# {{{ chebyshev smoother
+
+def estimate_largest_eigenvalue(operator, precon=None, iterations=10,
+        dot=None):
+    """Estimate the largest eigenvalue of *precon(operator(x))* by power
+    iteration.
+    """
+    if precon is None:
+        precon = IdentityOperator(operator.dtype, operator.shape[0])
+
+    if dot is None:
+        dot = numpy.dot
+
+    def norm(a):
+        return abs(dot(a, a))**0.5
+
+    v = numpy.random.RandomState(17).rand(operator.shape[0]) \
+            .astype(operator.dtype)
+    v /= norm(v)
+
+    eigval = 0
+    for i in xrange(iterations):
+        w = precon(operator(v))
+        eigval = norm(w)
+        v = w/eigval
+
+    return eigval
+
+
+
+
+class ChebyshevSmoother:
+    """Carries out *degree* steps of preconditioned Chebyshev iteration
+    towards the solution of *operator(x) = rhs*, targeting the part of
+    the spectrum of *precon(operator)* between *eigenvalue_range*
+    times its (estimated) largest eigenvalue.
+
+    For symmetric positive definite *operator* and *precon*, the
+    smoother is a fixed symmetric polynomial in the preconditioned
+    operator, so it may be used inside a preconditioner for CG.
+    """
+
+    def __init__(self, operator, precon=None, degree=2,
+            eigenvalue_range=(0.1, 1.1), dot=None):
+        if precon is None:
+            precon = IdentityOperator(operator.dtype, operator.shape[0])
+
+        self.operator = operator
+        self.precon = precon
+        self.degree = degree
+
+        lambda_max = estimate_largest_eigenvalue(operator, precon, dot=dot)
+        lower, upper = eigenvalue_range
+        self.theta = (upper+lower)/2*lambda_max
+        self.delta = (upper-lower)/2*lambda_max
+
+    def __call__(self, rhs, x=None):
+        """Return the improved solution. *x* is left unmodified.
+        A missing initial guess *x* is taken to be zero.
+        """
+        if x is None:
+            residual = rhs
+            x = numpy.zeros_like(rhs)
+        else:
+            residual = rhs - self.operator(x)
+            x = x.copy()
+
+        sigma = self.theta/self.delta
+        rho = 1/sigma
+        d = self.precon(residual)/self.theta
+
+        for k in xrange(self.degree):
+            x += d
+            if k == self.degree-1:
+                break
+
+            residual = residual - self.operator(d)
+            rho_new = 1/(2*sigma - rho)
+            d = rho_new*rho*d + 2*rho_new/self.delta*self.precon(residual)
+            rho = rho_new
+
+        return x
+
+# }}}
@@ -26,7 +26,8 @@ THE SOFTWARE.
 
 
 
-from pytools.log import LogQuantity, MultiLogQuantity
+from pytools.log import (LogQuantity,
+        PostLogQuantity, MultiPostLogQuantity)
 import numpy
 
 
@@ -45,7 +46,159 @@ def axis_name(axis):
 
 
 
-class Integral(LogQuantity):
+class FusedReductions(object):
+    """Computes the volume integrals of a number of densities of the same
+    fields in a single pass. The densities are compiled into one operator,
+    and their integrals are taken by one batched reduction, which, for
+    distributed discretizations, amounts to a single collective operation.
+
+    Log quantities in this module that are given an instance of this class
+    (in place of a getter or an :class:`EMFieldGetter`) register their
+    densities with it. All quantities logged in one
+    :class:`pytools.log.LogManager` tick share a single evaluation, while
+    calling a quantity directly always evaluates its integral afresh.
+
+    .. attribute:: field
+
+        The operator template (a :class:`hedge.optemplate.Field` or an
+        object array of them) standing for the result of *fgetter* in
+        the densities.
+    """
+
+    def __init__(self, discr, fgetter, field_count=None):
+        """
+        :param fgetter: a callable that returns the current fields.
+        :param field_count: the number of components of the fields, or
+          *None* if they are a single volume vector.
+        """
+        self.discr = discr
+        self.fgetter = fgetter
+
+        from hedge.optemplate import Field, make_vector_field
+        if field_count is None:
+            self.field = Field("f")
+        else:
+            self.field = make_vector_field("f", field_count)
+
+        self.densities = []
+        self.compiled_densities = None
+
+        self.tick_values = None
+        self.tick_readers = set()
+
+    def add_integral(self, density):
+        """Register the volume integral of *density*, an operator template
+        in terms of :attr:`field`, or an object array of them.
+
+        :returns: a value suitable for indexing the result of
+          :meth:`evaluate` to obtain the integral of *density*.
+        """
+        from hedge.tools import is_obj_array
+
+        # invalidate the fused operator
+        self.compiled_densities = None
+        self.tick_values = None
+
+        if is_obj_array(density):
+            start = len(self.densities)
+            self.densities.extend(density)
+            return slice(start, len(self.densities))
+        else:
+            self.densities.append(density)
+            return len(self.densities)-1
+
+    def evaluate(self):
+        """Return an array of the integrals of all registered densities
+        for the current fields.
+        """
+        fields = self.fgetter()
+        discr = self.discr
+
+        if self.compiled_densities is None:
+            from hedge.tools import make_obj_array
+            self.compiled_densities = discr.compile(
+                    make_obj_array(self.densities))
+
+        densities = self.compiled_densities(f=fields)
+
+        from hedge.tools import is_zero
+        nonzero_indices = [i for i, density in enumerate(densities)
+                if not is_zero(density)]
+
+        nonzero_values = discr.integrals_async(
+                [densities[i] for i in nonzero_indices])()
+
+        # complex densities have complex integrals
+        nonzero_values = numpy.asarray(nonzero_values)
+        values = numpy.zeros(len(densities), dtype=nonzero_values.dtype)
+        values[nonzero_indices] = nonzero_values
+
+        return values
+
+    def get(self, index, for_tick=False):
+        """Return the integral (or array of integrals) registered under
+        *index* by :meth:`add_integral`.
+
+        If *for_tick* is true, as when called from
+        :meth:`pytools.log.PostLogQuantity.prepare_for_tick`, the integrals
+        are evaluated once for all quantities preparing for the same log
+        manager tick. Otherwise, they are evaluated afresh.
+        """
+        if not for_tick:
+            return self.evaluate()[index]
+
+        if isinstance(index, slice):
+            position = index.start
+        else:
+            position = index
+
+        # Each quantity prepares once per tick, so a quantity coming back
+        # means that a new tick has begun.
+        if self.tick_values is None or position in self.tick_readers:
+            self.tick_values = self.evaluate()
+            self.tick_readers = set()
+
+        self.tick_readers.add(position)
+        return self.tick_values[index]
+
+
+
+
+class _TickSnapshotMixin(object):
+    """For post log quantities (see :class:`pytools.log.PostLogQuantity`)
+    that log the state at the beginning of a tick, so that quantities
+    sharing a :class:`FusedReductions` can be evaluated together.
+
+    The value is computed by :meth:`prepare_for_tick` and handed to the
+    log manager when it gathers post quantities after :meth:`tick`. Calls
+    at any other time compute the value afresh.
+
+    Subclasses implement *compute(for_tick)*.
+    """
+
+    tick_value = None
+    gathering = False
+
+    def prepare_for_tick(self):
+        self.tick_value = self.compute(for_tick=True)
+        self.gathering = False
+
+    def tick(self):
+        # the log manager gathers post quantities right after this
+        self.gathering = True
+
+    def __call__(self):
+        if self.gathering:
+            self.gathering = False
+            value, self.tick_value = self.tick_value, None
+            return value
+        else:
+            return self.compute(for_tick=False)
+
+
+
+
+class Integral(_TickSnapshotMixin, PostLogQuantity):
     """Log the volume integral of a variable in a scope."""
 
     def __init__(self, getter, discr, name=None,
@@ -53,7 +206,8 @@ class Integral(LogQuantity):
         """Construct the integral logger.
 
         :param getter: a callable that returns the value of which to
-          take the integral.
+          take the integral, or a :class:`FusedReductions` whose fields
+          are to be integrated.
         :param discr: a L{discretization.Discretization} to which the variable belongs.
         :param name: the name reported to the :class:`pytools.log.LogManager`.
         :param unit: the unit of measure for the log quantity.
@@ -67,15 +221,31 @@ class Integral(LogQuantity):
             except AttributeError:
                 raise ValueError("must specify a name")
 
-        LogQuantity.__init__(self, name, unit, description)
+        PostLogQuantity.__init__(self, name, unit, description)
 
         self.discr = discr
 
+        if isinstance(getter, FusedReductions):
+            from hedge.tools import is_obj_array
+            field = getter.field
+            if is_obj_array(field):
+                # abs (unlike fabs) is the modulus for complex fields, too
+                from hedge.tools.symbolic import CFunction
+                c_abs = CFunction("abs")
+                density = sum(c_abs(f_i) for f_i in field)
+            else:
+                density = field
+
+            self.reduction_index = getter.add_integral(density)
+
     @property
     def default_aggregator(self):
         return sum
 
-    def __call__(self):
+    def compute(self, for_tick):
+        if isinstance(self.getter, FusedReductions):
+            return self.getter.get(self.reduction_index, for_tick)
+
         var = self.getter()
 
         from hedge.tools import log_shape
@@ -90,7 +260,7 @@ class Integral(LogQuantity):
 
 
 
-class LpNorm(LogQuantity):
+class LpNorm(_TickSnapshotMixin, PostLogQuantity):
     """Log the Lp norm of a variable in a scope."""
 
     def __init__(self, getter, discr, p=2, name=None,
@@ -98,7 +268,8 @@ class LpNorm(LogQuantity):
         """Construct the Lp norm logger.
 
         :param getter: a callable that returns the value of which to
-          take the norm.
+          take the norm, or a :class:`FusedReductions` whose fields
+          are to be measured. The maximum norm is not fused.
         :param discr: a L{discretization.Discretization} to which the variable belongs.
         :param p: the power of the norm.
         :param name: the name reported to the :class:`pytools.log.LogManager`.
@@ -115,7 +286,24 @@ class LpNorm(LogQuantity):
             except AttributeError:
                 raise ValueError("must specify a name")
 
-        LogQuantity.__init__(self, name, unit, description)
+        PostLogQuantity.__init__(self, name, unit, description)
+
+        if isinstance(getter, FusedReductions) and p != numpy.Inf:
+            from hedge.tools import is_obj_array
+            field = getter.field
+            if is_obj_array(field):
+                components = list(field)
+            else:
+                components = [field]
+
+            # abs (unlike fabs) is the modulus for complex fields, too
+            from hedge.tools.symbolic import CFunction
+            c_abs = CFunction("abs")
+            density = sum(c_abs(f_i)**p for f_i in components)
+
+            self.reduction_index = getter.add_integral(density)
+        else:
+            self.reduction_index = None
 
     @property
     def default_aggregator(self):
@@ -126,8 +314,16 @@ class LpNorm(LogQuantity):
         else:
             return Norm(self.p)
 
-    def __call__(self):
-        var = self.getter()
+    def compute(self, for_tick):
+        if self.reduction_index is not None:
+            # the density is real, drop the imaginary zero of complex fields
+            return numpy.real(self.getter.get(
+                self.reduction_index, for_tick))**(1/self.p)
+
+        if isinstance(self.getter, FusedReductions):
+            var = self.getter.fgetter()
+        else:
+            var = self.getter()
         return self.discr.norm(var, self.p)
 
 
@@ -136,12 +332,22 @@ class LpNorm(LogQuantity):
 # electromagnetic quantities --------------------------------------------------
 class EMFieldGetter(object):
     """Makes E and H field accessible as self.e and self.h from a variable lookup.
-    To be used with the EM log quantities in this module."""
+    To be used with the EM log quantities in this module.
+
+    .. attribute:: reductions
+
+        A :class:`FusedReductions` through which the EM log quantities
+        sharing this getter compute all their integrals in one pass.
+    """
     def __init__(self, discr, maxwell_op, fgetter):
         self.discr = discr
         self.maxwell_op = maxwell_op
         self.fgetter = fgetter
 
+        from hedge.tools import count_subset
+        self.reductions = FusedReductions(discr, fgetter,
+                count_subset(maxwell_op.get_eh_subset()))
+
     @property
     def e(self):
         fields = self.fgetter()
@@ -154,54 +360,62 @@ class EMFieldGetter(object):
         e, h = self.maxwell_op.split_eh(fields)
         return h
 
+    def get_eh_templates(self):
+        """Return operator templates for E and H in terms of the fields of
+        :attr:`reductions`.
+        """
+        return self.maxwell_op.split_eh(self.reductions.field)
+
 
 
-class ElectricFieldEnergy(LogQuantity):
+class ElectricFieldEnergy(_TickSnapshotMixin, PostLogQuantity):
     def __init__(self, fields, name="W_el"):
-        LogQuantity.__init__(self, name, "J", "Energy of the electric field")
+        PostLogQuantity.__init__(self, name, "J",
+                "Energy of the electric field")
         self.fields = fields
 
+        e, h = fields.get_eh_templates()
+        d = fields.maxwell_op.epsilon * e
+
+        from hedge.optemplate.tools import ptwise_dot
+        self.reduction_index = fields.reductions.add_integral(
+                1/2*ptwise_dot(1, 1, e, d))
+
     @property
     def default_aggregator(self):
         from pytools import norm_2
         return norm_2
 
-    def __call__(self):
-        max_op = self.fields.maxwell_op
-
-        e = self.fields.e
-        d = max_op.epsilon * e
-
-        from hedge.tools import ptwise_dot
-        energy_density = 1/2*(ptwise_dot(1, 1, e, d))
-        return self.fields.discr.integral(energy_density)
+    def compute(self, for_tick):
+        return self.fields.reductions.get(self.reduction_index, for_tick)
 
 
 
 
-class MagneticFieldEnergy(LogQuantity):
+class MagneticFieldEnergy(_TickSnapshotMixin, PostLogQuantity):
     def __init__(self, fields, name="W_mag"):
-        LogQuantity.__init__(self, name, "J", "Energy of the magnetic field")
+        PostLogQuantity.__init__(self, name, "J",
+                "Energy of the magnetic field")
         self.fields = fields
 
+        e, h = fields.get_eh_templates()
+        b = fields.maxwell_op.mu * h
+
+        from hedge.optemplate.tools import ptwise_dot
+        self.reduction_index = fields.reductions.add_integral(
+                1/2*ptwise_dot(1, 1, h, b))
+
     @property
     def default_aggregator(self):
         from pytools import norm_2
         return norm_2
 
-    def __call__(self):
-        max_op = self.fields.maxwell_op
+    def compute(self, for_tick):
+        return self.fields.reductions.get(self.reduction_index, for_tick)
 
-        h = self.fields.h
-        b = max_op.mu * h
 
-        from hedge.tools import ptwise_dot
-        energy_density = 1/2*(ptwise_dot(1, 1, h, b))
-        return self.fields.discr.integral(energy_density)
 
-
-
-class EMFieldMomentum(MultiLogQuantity):
+class EMFieldMomentum(_TickSnapshotMixin, MultiPostLogQuantity):
     def __init__(self, fields, c0, names=None):
         if names is None:
             names = ["p%s_field" % axis_name(i)
@@ -209,7 +423,7 @@ class EMFieldMomentum(MultiLogQuantity):
 
         vdim = len(names)
 
-        MultiLogQuantity.__init__(self, names,
+        MultiPostLogQuantity.__init__(self, names,
             units=["N*s"] * vdim,
             descriptions=["Field Momentum"] * vdim)
 
@@ -220,69 +434,84 @@ class EMFieldMomentum(MultiLogQuantity):
         h_subset = fields.maxwell_op.get_eh_subset()[3:6]
 
         from hedge.tools import SubsettableCrossProduct
-        self.poynting_cross = SubsettableCrossProduct(
+        poynting_cross = SubsettableCrossProduct(
                 op1_subset=e_subset,
                 op2_subset=h_subset,
                 )
 
-    def __call__(self):
-        max_op = self.fields.maxwell_op
-
-        e = self.fields.e
-        h = self.fields.h
-
-        poynting_s = self.poynting_cross(e, h)
+        e, h = fields.get_eh_templates()
+        poynting_s = poynting_cross(e, h,
+                three_mult=lambda lc, x, y: lc*x*y)
 
         momentum_density = poynting_s/self.c0**2
-        return self.fields.discr.integral(momentum_density)
+        self.reduction_index = fields.reductions.add_integral(
+                momentum_density)
+
+    def compute(self, for_tick):
+        return self.fields.reductions.get(self.reduction_index, for_tick)
 
 
 
 
-class EMFieldDivergenceD(LogQuantity):
+class EMFieldDivergenceD(_TickSnapshotMixin, PostLogQuantity):
     def __init__(self, maxwell_op, fields, name="divD"):
-        LogQuantity.__init__(self, name, "C", "Integral over div D")
+        PostLogQuantity.__init__(self, name, "C", "Integral over div D")
 
         self.fields = fields
 
         from hedge.models.nd_calculus import DivergenceOperator
         div_op = DivergenceOperator(maxwell_op.dimensions,
                 maxwell_op.get_eh_subset()[:3])
-        self.bound_div_op = div_op.bind(self.fields.discr)
 
-    def __call__(self):
-        max_op = self.fields.maxwell_op
-        d = max_op.epsilon * self.fields.e
-        div_d = self.bound_div_op(d)
+        e, h = fields.get_eh_templates()
+        d = maxwell_op.epsilon * e
+
+        if div_op.arg_count:
+            div_d = div_op.op_template(d[:div_op.arg_count])
+        else:
+            div_d = 0
 
-        return self.fields.discr.integral(div_d)
+        self.reduction_index = fields.reductions.add_integral(div_d)
 
+    def compute(self, for_tick):
+        return self.fields.reductions.get(self.reduction_index, for_tick)
 
 
 
-class EMFieldDivergenceB(MultiLogQuantity):
+
+class EMFieldDivergenceB(_TickSnapshotMixin, MultiPostLogQuantity):
     def __init__(self, maxwell_op, fields, names=None):
         self.fields = fields
 
         from hedge.models.nd_calculus import DivergenceOperator
-        self.div_op = DivergenceOperator(maxwell_op.dimensions,
-                maxwell_op.get_eh_subset()[3:]).bind(self.fields.discr)
+        div_op = DivergenceOperator(maxwell_op.dimensions,
+                maxwell_op.get_eh_subset()[3:])
 
         if names is None:
             names = ["divB", "err_divB_l1"]
 
-        MultiLogQuantity.__init__(self,
+        MultiPostLogQuantity.__init__(self,
                 names=names,
                 units=["T/m", "T/m"],
                 descriptions=["Integral over div B", "Integral over |div B|"])
 
-    def __call__(self):
-        max_op = self.fields.maxwell_op
-        b = max_op.mu * self.fields.h
-        div_b = self.div_op(b)
+        e, h = fields.get_eh_templates()
+        b = maxwell_op.mu * h
 
-        return [self.fields.discr.integral(div_b),
-                self.fields.discr.integral(numpy.absolute(div_b))]
+        if div_op.arg_count:
+            from hedge.tools.symbolic import CFunction, \
+                    make_common_subexpression as cse
+            div_b = cse(div_op.op_template(b[:div_op.arg_count]), "div_b")
+            abs_div_b = CFunction("abs")(div_b)
+        else:
+            div_b = abs_div_b = 0
+
+        from hedge.tools import join_fields
+        self.reduction_index = fields.reductions.add_integral(
+                join_fields(div_b, abs_div_b))
+
+    def compute(self, for_tick):
+        return list(self.fields.reductions.get(self.reduction_index, for_tick))
 
 
 
@@ -299,3 +528,146 @@ def add_em_quantities(mgr, maxwell_op, fields):
     mgr.add_quantity(EMFieldMomentum(fields, maxwell_op.c))
     mgr.add_quantity(EMFieldDivergenceD(maxwell_op, fields))
     mgr.add_quantity(EMFieldDivergenceB(maxwell_op, fields))
+
+
+
+
+# performance quantities ------------------------------------------------------
+KERNEL_CLASSES = ["gather", "lift", "el_local", "diff", "vector_math"]
+
+
+
+
+class KernelRates(MultiPostLogQuantity):
+    """Log the achieved floating point rate and estimated memory bandwidth
+    of each class of kernels (see :data:`KERNEL_CLASSES`) in each step, from
+    the timers, flop counters and byte counters of an instrumented
+    discretization. The byte counts are lower bounds of the memory traffic,
+    see :mod:`hedge.tools.flops`.
+    """
+
+    # gather before the timers and counters we read are reset
+    sort_weight = -1
+
+    def __init__(self, discr, kernel_classes=KERNEL_CLASSES):
+        if not discr.instrumented:
+            raise RuntimeError("discretization must be instrumented "
+                    "(see Discretization.add_instrumentation)")
+
+        self.discr = discr
+        self.kernel_classes = kernel_classes
+
+        names = []
+        units = []
+        descriptions = []
+        for kc in kernel_classes:
+            names.extend(["r_flops_%s" % kc, "r_bytes_%s" % kc])
+            units.extend(["1/s", "B/s"])
+            descriptions.extend([
+                "Floating point rate in %s" % kc,
+                "Estimated memory bandwidth in %s" % kc])
+
+        MultiPostLogQuantity.__init__(self, names, units, descriptions)
+
+    def __call__(self):
+        result = []
+        for kc in self.kernel_classes:
+            elapsed = getattr(self.discr, "%s_timer" % kc).elapsed
+            flops = getattr(self.discr, "%s_flop_counter" % kc).events
+            byte_count = getattr(self.discr, "%s_byte_counter" % kc).events
+
+            if elapsed:
+                result.extend([flops/elapsed, byte_count/elapsed])
+            else:
+                result.extend([None, None])
+
+        return result
+
+
+
+
+class PeakRSS(LogQuantity):
+    """Log the peak resident set size of the process."""
+
+    def __init__(self, name="max_rss"):
+        LogQuantity.__init__(self, name, "B", "Peak resident set size")
+
+    @property
+    def default_aggregator(self):
+        return max
+
+    def __call__(self):
+        from hedge.tools.perf import get_peak_rss
+        return get_peak_rss()
+
+
+
+
+class HardwareCounters(MultiPostLogQuantity):
+    """Log the CPU cycles, instructions and last-level cache misses of the
+    process in each step, as counted by the hardware. The memory bandwidth
+    achieved over the step is estimated from the cache misses.
+
+    :raises hedge.tools.perf.PerfCountersUnavailable: if the hardware
+      counters cannot be read on this machine.
+    """
+
+    def __init__(self, cache_line_size=64, names=None):
+        if names is None:
+            names = ["hw_cycles", "hw_instructions", "hw_cache_misses",
+                    "r_hw_bytes"]
+
+        MultiPostLogQuantity.__init__(self, names,
+                units=["1", "1", "1", "B/s"],
+                descriptions=[
+                    "CPU cycles",
+                    "Instructions retired",
+                    "Last-level cache misses",
+                    "Memory bandwidth estimated from cache misses"])
+
+        from hedge.tools.perf import PerfCounterSet
+        self.counters = PerfCounterSet(
+                ["cycles", "instructions", "cache_misses"])
+        self.cache_line_size = cache_line_size
+
+        self.prepare_for_tick()
+
+    def prepare_for_tick(self):
+        from time import time
+        self.start_time = time()
+        self.start_counts = self.counters.read()
+
+    def __call__(self):
+        from time import time
+        elapsed = time() - self.start_time
+
+        cycles, instructions, cache_misses = [
+                end-start for start, end in zip(
+                    self.start_counts, self.counters.read())]
+
+        if elapsed:
+            bandwidth = cache_misses*self.cache_line_size/elapsed
+        else:
+            bandwidth = None
+
+        return [cycles, instructions, cache_misses, bandwidth]
+
+
+
+
+def add_performance_quantities(mgr, discr, hardware_counters=True):
+    """Add :class:`KernelRates` and :class:`PeakRSS` to *mgr*, along with
+    :class:`HardwareCounters` if *hardware_counters* is *True* and the
+    counters are available. *discr* must have been instrumented with
+    *mgr*.
+    """
+    mgr.add_quantity(KernelRates(discr))
+    mgr.add_quantity(PeakRSS())
+
+    if hardware_counters:
+        from hedge.tools.perf import PerfCountersUnavailable
+        try:
+            mgr.add_quantity(HardwareCounters())
+        except PerfCountersUnavailable, e:
+            from warnings import warn
+            warn("hardware counters not logged: %s" % e)
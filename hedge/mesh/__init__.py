@@ -148,6 +148,20 @@ class Mesh(pytools.Record):
                     )
             return self._bounding_box
 
+    def interface_element_ids(self):
+        """Return an integer array of shape *(interface_count, 2)* holding
+        the ids of the two elements adjacent to each of :attr:`interfaces`.
+        """
+        return _interface_element_ids(self.interfaces)
+
+    def element_centroids(self):
+        """Return an array of shape *(element_count, dimensions)* holding
+        the vertex centroid of each element.
+        """
+        vertex_indices = numpy.array(
+                [el.vertex_indices for el in self.elements], dtype=numpy.intp)
+        return numpy.mean(self.points[vertex_indices], axis=1)
+
     def element_adjacency_graph(self):
         """Return a dictionary mapping each element id to a
         list of adjacent element ids.
@@ -158,6 +172,58 @@ class Mesh(pytools.Record):
             adjacency.setdefault(e2.id, set()).add(e1.id)
         return adjacency
 
+    def element_neighborhoods(self, distance=1):
+        """Return a list that contains, for each element id, the set of
+        ids of elements (including itself) that are at most *distance*
+        face adjacencies away.
+        """
+        adjacency = self.element_adjacency_graph()
+
+        result = []
+        for el_id in xrange(len(self.elements)):
+            nearby = set([el_id])
+            frontier = [el_id]
+            for i in range(distance):
+                frontier = [nb
+                        for frontier_el in frontier
+                        for nb in adjacency.get(frontier_el, ())
+                        if nb not in nearby]
+                nearby.update(frontier)
+
+            result.append(nearby)
+
+        return result
+
+    def element_colors(self, distance=1):
+        """Return an array of (greedily chosen) colors, one per element id,
+        such that no two elements that are at most *distance* face
+        adjacencies apart share a color.
+
+        Elements of one color can be probed simultaneously when recovering
+        element-block matrices of an operator whose stencil reaches at
+        most *distance* elements away.
+        """
+        colors = numpy.empty(len(self.elements), dtype=numpy.int32)
+        colors.fill(-1)
+
+        for el_id, nearby in enumerate(self.element_neighborhoods(distance)):
+            used = set(colors[nb] for nb in nearby)
+            color = 0
+            while color in used:
+                color += 1
+            colors[el_id] = color
+
+        return colors
+
+
+
+
+
+def _interface_element_ids(interfaces):
+    return numpy.fromiter(
+            (el.id for face1, face2 in interfaces
+                for el, face_nr in [face1, face2]),
+            dtype=numpy.intp, count=2*len(interfaces)).reshape(-1, 2)
 
 
 
@@ -489,13 +555,31 @@ class ConformalMesh(Mesh):
         if method == "cuthill":
             from hedge.mesh.tools import cuthill_mckee
             return cuthill_mckee(self.element_adjacency_graph())
+        elif method == "rcm":
+            from hedge.mesh.tools import reverse_cuthill_mckee
+            return reverse_cuthill_mckee(
+                    len(self.elements), self.interface_element_ids())
+        elif method in ["hilbert", "morton"]:
+            from hedge.mesh.tools import space_filling_curve_order
+            return space_filling_curve_order(
+                    self.element_centroids(), curve=method)
         else:
             raise ValueError("invalid mesh reorder method")
 
     def reordered_by(self, method):
         """Return a reordered copy of *self*.
 
-        :param method: "cuthill"
+        :param method: one of
+
+          * *"cuthill"*: Cuthill-McKee ordering of the element
+            adjacency graph.
+          * *"rcm"*: reverse Cuthill-McKee ordering of the element
+            adjacency graph, as computed by :mod:`scipy.sparse.csgraph`.
+          * *"hilbert"*, *"morton"*: ordering of the element centroids
+            along a Hilbert or Morton (Z-order) space-filling curve.
+
+        See :func:`hedge.mesh.tools.average_face_neighbor_distance` for a
+        measure of the resulting locality.
         """
 
         old_numbers = self.get_reorder_oldnumbers(method)
@@ -518,21 +602,20 @@ class ConformalMesh(Mesh):
                 )
 
         # sort interfaces by element id -- this is actually the most important part
-        def face_cmp(face1, face2):
-            (face1_el1, _), (face1_el2, _) = face1
-            (face2_el1, _), (face2_el2, _) = face2
-
-            return cmp(
-                    min(face1_el1.id, face1_el2.id),
-                    min(face2_el1.id, face2_el2.id))
-
         interfaces = [
                 ((old2new_el[e1], f1), (old2new_el[e2], f2))
                 for (e1, f1), (e2, f2) in self.interfaces]
-        interfaces.sort(face_cmp)
+
+        if interfaces:
+            el_ids = _interface_element_ids(interfaces)
+            face_order = numpy.lexsort(
+                    (numpy.max(el_ids, axis=1), numpy.min(el_ids, axis=1)))
+            interfaces = [interfaces[i] for i in face_order]
 
         tag_to_boundary = dict(
-                (tag, [(old2new_el[old_el], fnr) for old_el, fnr in elfaces])
+                (tag, sorted(
+                    [(old2new_el[old_el], fnr) for old_el, fnr in elfaces],
+                    key=lambda (el, fnr): (el.id, fnr)))
                 for tag, elfaces in self.tag_to_boundary.iteritems())
 
         tag_to_elements = dict(
@@ -592,3 +675,44 @@ def check_bc_coverage(mesh, bc_tags, incomplete_ok=False):
     elif bdry_face_countdown < 0:
         raise RuntimeError("More BCs were assigned than boundary faces are present "
                 "(did something screw up your periodicity?)")
+
+
+
+
+# poke generator bits into hedge.mesh for backwards compatibility -------------
+def _add_depr_generator_functions():
+    """Make the functions in :mod:`hedge.mesh.generator` available here for
+    backwards compatibility, without importing that module until one of
+    them is actually called.
+    """
+    def make_forwarder(name):
+        def forwarder(*args, **kwargs):
+            from warnings import warn
+            warn("This function is deprecated. Use hedge.mesh.generator.%s "
+                    "instead." % name, DeprecationWarning, stacklevel=2)
+
+            import hedge.mesh.generator
+            return getattr(hedge.mesh.generator, name)(*args, **kwargs)
+
+        forwarder.__name__ = name
+        return forwarder
+
+    for name in [
+            "make_1d_mesh",
+            "make_uniform_1d_mesh",
+            "make_single_element_mesh",
+            "make_regular_rect_mesh",
+            "make_centered_regular_rect_mesh",
+            "make_regular_square_mesh",
+            "finish_2d_rect_mesh",
+            "make_rect_mesh",
+            "make_rect_mesh_with_corner",
+            "make_square_mesh",
+            "make_disk_mesh",
+            "make_ball_mesh",
+            "make_cylinder_mesh",
+            "make_box_mesh",
+            ]:
+        globals()[name] = make_forwarder(name)
+
+_add_depr_generator_functions()
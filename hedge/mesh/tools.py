@@ -27,6 +27,11 @@ THE SOFTWARE.
 
 
 
+import numpy
+
+
+
+
 # mesh reorderings ------------------------------------------------------------
 def cuthill_mckee(graph):
     """Return a Cuthill-McKee ordering for the given graph.
@@ -79,3 +84,128 @@ def cuthill_mckee(graph):
         levelset = list(next_levelset)
 
     return old_numbers
+
+
+
+
+def _quantize(points, bits):
+    """Map *points* (an array of shape *(n, dimensions)*) onto integer
+    coordinates in *[0, 2**bits)*, preserving their aspect ratio.
+    """
+    lower = numpy.min(points, axis=0)
+    extent = numpy.max(numpy.max(points, axis=0) - lower)
+    if extent == 0:
+        extent = 1
+
+    return numpy.minimum(
+            ((points - lower) / extent * 2**bits).astype(numpy.int64),
+            2**bits-1)
+
+
+
+
+def _interleave_bits(coords, bits):
+    """Return an integer key for each row of *coords* whose bits, from
+    the most significant one, are the bits of the coordinates from
+    the most significant one, interleaved.
+    """
+    keys = numpy.zeros(len(coords), dtype=numpy.int64)
+    for bit in xrange(bits-1, -1, -1):
+        for axis in xrange(coords.shape[1]):
+            keys = (keys << 1) | ((coords[:, axis] >> bit) & 1)
+    return keys
+
+
+
+
+def _hilbert_transpose(coords, bits):
+    """Convert integer *coords* in *[0, 2**bits)* to the "transposed"
+    form of their Hilbert curve index, in which interleaving the bits
+    of the coordinates yields the index.
+
+    See J. Skilling, "Programming the Hilbert curve," AIP Conference
+    Proceedings 707, 381-387, 2004.
+    """
+    x = coords.copy()
+    dimensions = x.shape[1]
+
+    # inverse undo
+    q = 2**(bits-1)
+    while q > 1:
+        p = q - 1
+        for i in xrange(dimensions):
+            invert = (x[:, i] & q) != 0
+            x[invert, 0] ^= p
+
+            exchange = ~invert
+            t = (x[exchange, 0] ^ x[exchange, i]) & p
+            x[exchange, 0] ^= t
+            x[exchange, i] ^= t
+        q >>= 1
+
+    # Gray encode
+    for i in xrange(1, dimensions):
+        x[:, i] ^= x[:, i-1]
+
+    t = numpy.zeros(len(x), dtype=x.dtype)
+    q = 2**(bits-1)
+    while q > 1:
+        t[(x[:, dimensions-1] & q) != 0] ^= q - 1
+        q >>= 1
+
+    x ^= t[:, numpy.newaxis]
+    return x
+
+
+
+
+def space_filling_curve_order(points, curve="hilbert"):
+    """Return an ordering (in the form of a list of "old numbers", as
+    taken by :meth:`hedge.mesh.ConformalMesh.reordered`) of *points*,
+    an array of shape *(n, dimensions)*, along a space-filling curve.
+
+    :param curve: *"hilbert"* or *"morton"*.
+    """
+    points = numpy.asarray(points, dtype=numpy.float64)
+    bits = min(62 // points.shape[1], 31)
+    coords = _quantize(points, bits)
+
+    if curve == "hilbert":
+        coords = _hilbert_transpose(coords, bits)
+    elif curve != "morton":
+        raise ValueError("invalid space-filling curve: %s" % curve)
+
+    return numpy.argsort(_interleave_bits(coords, bits), kind="mergesort")
+
+
+
+
+def reverse_cuthill_mckee(element_count, interface_el_ids):
+    """Return a reverse Cuthill-McKee ordering (in the form of a list of
+    "old numbers") of the element adjacency graph given by the integer
+    array *interface_el_ids* of shape *(interface_count, 2)*.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import reverse_cuthill_mckee as rcm
+
+    adjacency = coo_matrix(
+            (numpy.ones(len(interface_el_ids), dtype=numpy.int8),
+                (interface_el_ids[:, 0], interface_el_ids[:, 1])),
+            shape=(element_count, element_count)).tocsr()
+
+    return rcm(adjacency, symmetric_mode=False)
+
+
+
+
+def average_face_neighbor_distance(mesh):
+    """Return the mean difference of the ids of the two elements
+    adjacent to each interior face of *mesh*.
+
+    Smaller values indicate that neighboring elements, and hence their
+    degrees of freedom, tend to be close together in memory.
+    """
+    el_ids = mesh.interface_element_ids()
+    if not len(el_ids):
+        return 0
+    return numpy.mean(numpy.abs(el_ids[:, 0] - el_ids[:, 1]))
@@ -27,6 +27,7 @@ THE SOFTWARE.
 
 from pytools import memoize_method
 
+import numpy
 import hedge.mesh
 from hedge.models import HyperbolicOperator
 from hedge.tools.symbolic import make_common_subexpression as cse
@@ -61,6 +62,14 @@ class MaxwellOperator(HyperbolicOperator):
           domain, or a TimeConstantGivenFunction for spatially variable material coefficients
         :param mu: can be a number, for fixed material throughout the computation
           domain, or a TimeConstantGivenFunction for spatially variable material coefficients
+        :param incident_bc: an :class:`hedge.data.ITimeDependentGivenFunction`
+          or a function *f(x, el, t)*, preferably marked by
+          :func:`hedge.data.vectorized`.
+
+        If *incident_bc* or *current* is a
+        :class:`hedge.data.CompiledExpressionData`, its expressions are
+        compiled into the operator. They must yield all six (or, for
+        *current*, all three) field components.
         """
 
         self.dimensions = dimensions or self._default_dimensions
@@ -102,8 +111,9 @@ class MaxwellOperator(HyperbolicOperator):
         self.absorb_tag = absorb_tag
         self.incident_tag = incident_tag
 
+        from hedge.data import as_time_dependent_given_function
         self.current = current
-        self.incident_bc_data = incident_bc
+        self.incident_bc_data = as_time_dependent_given_function(incident_bc)
 
     @property
     def c(self):
@@ -205,7 +215,15 @@ class MaxwellOperator(HyperbolicOperator):
 
         nabla = make_nabla(self.dimensions)
 
-        if self.current is not None:
+        from hedge.data import CompiledExpressionData
+        if isinstance(self.current, CompiledExpressionData):
+            from hedge.optemplate import make_nodes
+            from hedge.tools import full_to_subset_indices
+            j = cse(self.current.get_op_template(
+                make_nodes(self.dimensions))[
+                    full_to_subset_indices(self.get_eh_subset()[:3])],
+                "j")
+        elif self.current is not None:
             from hedge.optemplate import make_vector_field
             j = make_vector_field("j",
                     count_subset(self.get_eh_subset()[:3]))
@@ -305,7 +323,17 @@ class MaxwellOperator(HyperbolicOperator):
         from hedge.tools import join_fields
         fld_cnt = count_subset(self.get_eh_subset())
 
-        if self.incident_bc_data is not None:
+        from hedge.data import CompiledExpressionData
+        if isinstance(self.incident_bc_data, CompiledExpressionData):
+            from hedge.optemplate import BoundarizeOperator, make_nodes
+            from hedge.tools import full_to_subset_indices
+            inc_field = cse(
+                    -self.incident_bc_data.get_op_template(
+                        BoundarizeOperator(self.incident_tag)(
+                            make_nodes(self.dimensions)))[
+                        full_to_subset_indices(self.get_eh_subset())],
+                    "incident_bc")
+        elif self.incident_bc_data is not None:
             from hedge.optemplate import make_vector_field
             inc_field = cse(
                    -make_vector_field("incident_bc", fld_cnt))
@@ -388,13 +416,21 @@ class MaxwellOperator(HyperbolicOperator):
         e_indices = full_to_subset_indices(self.get_eh_subset()[0:3])
         all_indices = full_to_subset_indices(self.get_eh_subset())
 
+        # symbolic data is evaluated inside compiled_op_template
+        from hedge.data import CompiledExpressionData
+        interpolate_current = (self.current is not None
+                and not isinstance(self.current, CompiledExpressionData))
+        interpolate_incident_bc = (self.incident_bc_data is not None
+                and not isinstance(self.incident_bc_data,
+                    CompiledExpressionData))
+
         def rhs(t, w):
-            if self.current is not None:
+            if interpolate_current:
                 j = self.current.volume_interpolant(t, discr)[e_indices]
             else:
                 j = 0
 
-            if self.incident_bc_data is not None:
+            if interpolate_incident_bc:
                 incident_bc_data = self.incident_bc_data.boundary_interpolant(
                         t, discr, self.incident_tag)[all_indices]
             else:
@@ -408,7 +444,7 @@ class MaxwellOperator(HyperbolicOperator):
 
             return compiled_op_template(
                     w=w, j=j, incident_bc=incident_bc_data,
-                    **kwargs)
+                    t=numpy.float64(t), **kwargs)
 
         return rhs
 
@@ -147,11 +147,21 @@ class GasDynamicsOperator(TimeDependentOperator):
           :class:`hedge.data.IFieldDependentGivenFunction`
           or be None.
 
+        :param bc_inflow: (likewise the other *bc_* arguments) should
+          implement :class:`hedge.data.ITimeDependentGivenFunction`,
+          or be a function *f(x, el, t)*, preferably marked by
+          :func:`hedge.data.vectorized`, or be None.
+
+          A :class:`hedge.data.CompiledExpressionData` given as *source*
+          or as boundary data is compiled into the operator, avoiding
+          its evaluation in Python at every time step.
+
         :param artificial_viscosity_mode:
         """
         from hedge.data import (
                 TimeConstantGivenFunction,
-                ConstantGivenFunction)
+                ConstantGivenFunction,
+                as_time_dependent_given_function)
 
         if gamma is not None:
             if equation_of_state is not None:
@@ -181,10 +191,11 @@ class GasDynamicsOperator(TimeDependentOperator):
         self.spec_gas_const = spec_gas_const
         self.mu = mu
 
-        self.bc_inflow = bc_inflow
-        self.bc_outflow = bc_outflow
-        self.bc_noslip = bc_noslip
-        self.bc_supersonic_inflow = bc_supersonic_inflow
+        self.bc_inflow = as_time_dependent_given_function(bc_inflow)
+        self.bc_outflow = as_time_dependent_given_function(bc_outflow)
+        self.bc_noslip = as_time_dependent_given_function(bc_noslip)
+        self.bc_supersonic_inflow = as_time_dependent_given_function(
+                bc_supersonic_inflow)
 
         self.inflow_tag = inflow_tag
         self.outflow_tag = outflow_tag
@@ -480,13 +491,45 @@ class GasDynamicsOperator(TimeDependentOperator):
 
     # {{{ boundary conditions ---------------------------------------------
 
+    def get_boundary_data(self):
+        """Return a list of tuples *(bc_name, tag, bc)* of the boundary
+        data supplied to the operator.
+        """
+        return [
+                ("bc_q_in", self.inflow_tag, self.bc_inflow),
+                ("bc_q_out", self.outflow_tag, self.bc_outflow),
+                ("bc_q_noslip", self.noslip_tag, self.bc_noslip),
+                ("bc_q_supersonic_in", self.supersonic_inflow_tag,
+                    self.bc_supersonic_inflow),
+                ]
+
+    def boundary_data(self, bc_name):
+        """Return an operator template for the boundary data *bc_name*.
+        If the data is a :class:`hedge.data.CompiledExpressionData`, its
+        expressions are evaluated within the compiled operator. Otherwise,
+        the data is expected as an argument of the same name.
+        """
+        for name, tag, bc in self.get_boundary_data():
+            if name == bc_name:
+                break
+        else:
+            raise ValueError("invalid boundary data name: %s" % bc_name)
+
+        if isinstance(bc, hedge.data.CompiledExpressionData):
+            from hedge.optemplate import BoundarizeOperator, make_nodes
+            return cse(bc.get_op_template(
+                BoundarizeOperator(tag)(make_nodes(self.dimensions))),
+                bc_name)
+        else:
+            return make_vector_field(bc_name, self.dimensions+2)
+
     def make_bc_info(self, bc_name, tag, state, state0=None):
         """
         :param state0: The boundary 'free-stream' state around which the
           BC is linearized.
         """
         if state0 is None:
-            state0 = make_vector_field(bc_name, self.dimensions+2)
+            state0 = self.boundary_data(bc_name)
 
         state0 = cse(to_bdry_quad(state0))
 
@@ -558,7 +601,7 @@ class GasDynamicsOperator(TimeDependentOperator):
     def noslip_state(self, state):
         from hedge.optemplate import make_normal
         state0 = join_fields(
-            make_vector_field("bc_q_noslip", 2),
+            self.boundary_data("bc_q_noslip")[:2],
             [0]*self.dimensions)
         normal = make_normal(self.noslip_tag, self.dimensions)
         bc = self.make_bc_info("bc_q_noslip", self.noslip_tag, state, state0)
@@ -597,7 +640,7 @@ class GasDynamicsOperator(TimeDependentOperator):
         from hedge.optemplate import BoundarizeOperator
         return {
                 self.supersonic_inflow_tag:
-                make_vector_field("bc_q_supersonic_in", self.dimensions+2),
+                self.boundary_data("bc_q_supersonic_in"),
                 self.supersonic_outflow_tag:
                 BoundarizeOperator(self.supersonic_outflow_tag)(
                             (state)),
@@ -787,7 +830,14 @@ class GasDynamicsOperator(TimeDependentOperator):
                 + self.make_extra_terms(),
                  speed)
 
-        if self.source is not None:
+        if isinstance(self.source, hedge.data.CompiledExpressionData):
+            from hedge.optemplate import make_nodes
+            result = result + join_fields(
+                    self.source.get_op_template(
+                        make_nodes(self.dimensions), self.state()),
+                    # extra field for speed
+                    0)
+        elif self.source is not None:
             result = result + join_fields(
                     make_vector_field("source_vect", len(self.state())),
                     # extra field for speed
@@ -824,27 +874,28 @@ class GasDynamicsOperator(TimeDependentOperator):
             raise RuntimeError("no-slip BCs only make sense for "
                     "viscous problems")
 
+        # symbolic data is evaluated inside bound_op
+        from hedge.data import CompiledExpressionData
+        interpolated_bcs = [(bc_name, tag, bc)
+                for bc_name, tag, bc in self.get_boundary_data()
+                if not isinstance(bc, CompiledExpressionData)]
+        interpolate_source = (self.source is not None
+                and not isinstance(self.source, CompiledExpressionData))
+
         def rhs(t, q):
             extra_kwargs = {}
-            if self.source is not None:
+            if interpolate_source:
                 extra_kwargs["source_vect"] = self.source.volume_interpolant(
                         t, q, discr)
 
             if sensor is not None:
                 extra_kwargs["sensor"] = sensor(q)
 
-            opt_result = bound_op(q=q,
-                    bc_q_in=self.bc_inflow.boundary_interpolant(
-                        t, discr, self.inflow_tag),
-                    bc_q_out=self.bc_outflow.boundary_interpolant(
-                        t, discr, self.outflow_tag),
-                    bc_q_noslip=self.bc_noslip.boundary_interpolant(
-                        t, discr, self.noslip_tag),
-                    bc_q_supersonic_in=self.bc_supersonic_inflow
-                    .boundary_interpolant(t, discr, 
-                        self.supersonic_inflow_tag),
-                    **extra_kwargs
-                    )
+            for bc_name, tag, bc in interpolated_bcs:
+                extra_kwargs[bc_name] = bc.boundary_interpolant(
+                        t, discr, tag)
+
+            opt_result = bound_op(q=q, t=numpy.float64(t), **extra_kwargs)
 
             max_speed = opt_result[-1]
             ode_rhs = opt_result[:-1]
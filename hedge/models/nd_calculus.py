@@ -103,16 +103,25 @@ class DivergenceOperator(Operator):
 
         return flux
 
-    def op_template(self):
+    def op_template(self, v=None):
+        """
+        :param v: if given, an object array of operator templates of which
+          to take the divergence, with the boundary values taken from the
+          volume. Otherwise, *v* and the boundary values *bc* are fields.
+        """
         from hedge.mesh import TAG_ALL
         from hedge.optemplate import make_vector_field, BoundaryPair, \
-                get_flux_operator, make_nabla, InverseMassOperator
+                get_flux_operator, make_nabla, InverseMassOperator, \
+                BoundarizeOperator
 
         nabla = make_nabla(self.dimensions)
         m_inv = InverseMassOperator()
 
-        v = make_vector_field("v", self.arg_count)
-        bc = make_vector_field("bc", self.arg_count)
+        if v is None:
+            v = make_vector_field("v", self.arg_count)
+            bc = make_vector_field("bc", self.arg_count)
+        else:
+            bc = BoundarizeOperator(TAG_ALL)(v)
 
         local_op_result = 0
         idx = 0
@@ -29,6 +29,7 @@ THE SOFTWARE.
 
 
 import numpy
+from pytools import Record
 
 from hedge.models import Operator
 from hedge.second_order import LDGSecondDerivative
@@ -247,6 +248,133 @@ class BoundPoissonOperator(hedge.iterative.OperatorBase):
                 neu_bc=pop.neumann_bc.boundary_interpolant(
                     self.discr, pop.neumann_tag)))
 
+    def multigrid_preconditioner(self, **kwargs):
+        """Return a :class:`PMultigridPreconditioner` for *-self*.
+        Keyword arguments are passed on to its constructor.
+        """
+        return PMultigridPreconditioner(self, **kwargs)
+
+
+
+
+class _PMultigridLevel(Record):
+    pass
+
+
+
+
+class PMultigridPreconditioner(hedge.iterative.OperatorBase):
+    """A polynomial-order (p-) multigrid V-cycle approximating the inverse
+    of the negated (and hence positive definite) operator of a
+    :class:`BoundPoissonOperator`. This is what :func:`hedge.iterative.parallel_cg`
+    needs as *precon* when solving with *-bound_op*.
+
+    Coarse levels are obtained by re-discretizing the same
+    :class:`PoissonOperator` on the same mesh at successively halved
+    orders, down to order 1. Corrections are transferred by
+    :class:`hedge.discretization.Projector` (interpolation of modes) and
+    residuals by its transpose. Each level is smoothed by Chebyshev
+    iteration accelerated block Jacobi, and the order-1 level is solved
+    by block-Jacobi preconditioned CG.
+    """
+
+    def __init__(self, bound_op, make_discretization=None,
+            smoother_degree=2, coarse_tol=1e-10):
+        """
+        :arg make_discretization: a function taking an order and returning
+          a discretization of the same mesh (with the same partitioning,
+          if any). By default, the class of the fine discretization is
+          instantiated anew.
+        """
+        from hedge.iterative import NegOperator, ChebyshevSmoother, \
+                make_block_jacobi_preconditioner
+        from hedge.discretization import Projector
+
+        fine_discr = bound_op.discr
+        if make_discretization is None:
+            def make_discretization(order):
+                return fine_discr.__class__(fine_discr.mesh, order=order,
+                        quad_min_degrees=fine_discr.quad_min_degrees,
+                        debug=fine_discr.debug,
+                        default_scalar_type=fine_discr.default_scalar_type,
+                        run_context=fine_discr.run_context)
+
+        fine_order = max(eg.local_discretization.order
+                for eg in fine_discr.element_groups)
+        orders = []
+        order = fine_order
+        while order > 1:
+            orders.append(order)
+            order = order // 2
+        orders.append(1)
+
+        self.levels = []
+        self.discrs = []
+        for i, order in enumerate(orders):
+            if i == 0:
+                discr = fine_discr
+                level_bound_op = bound_op
+            else:
+                discr = make_discretization(order)
+                self.discrs.append(discr)
+                level_bound_op = bound_op.poisson_op.bind(discr)
+
+            operator = NegOperator(level_bound_op)
+            block_jacobi = make_block_jacobi_preconditioner(discr, operator)
+
+            if i > 0:
+                prolongation = Projector(discr, self.levels[-1].discr)
+            else:
+                prolongation = None
+
+            if i < len(orders) - 1:
+                smoother = ChebyshevSmoother(operator, block_jacobi,
+                        degree=smoother_degree,
+                        dot=discr.nodewise_dot_product)
+            else:
+                smoother = None
+
+            self.levels.append(_PMultigridLevel(
+                discr=discr, operator=operator, block_jacobi=block_jacobi,
+                prolongation=prolongation, smoother=smoother))
+
+        self.coarse_tol = coarse_tol
+
+    def close(self):
+        for discr in self.discrs:
+            discr.close()
+
+    @property
+    def dtype(self):
+        return self.levels[0].operator.dtype
+
+    @property
+    def shape(self):
+        return self.levels[0].operator.shape
+
+    def v_cycle(self, level_nr, rhs):
+        level = self.levels[level_nr]
+
+        if level_nr == len(self.levels) - 1:
+            from hedge.iterative import CGStateContainer
+            cg = CGStateContainer(level.operator, level.block_jacobi,
+                    dot=level.discr.nodewise_dot_product)
+            cg.reset(rhs, level.discr.volume_zeros())
+            return cg.run(tol=self.coarse_tol)
+
+        x = level.smoother(rhs)
+
+        coarse_level = self.levels[level_nr+1]
+        coarse_rhs = coarse_level.prolongation.apply_transpose(
+                rhs - level.operator(x))
+        x = x + coarse_level.prolongation(
+                self.v_cycle(level_nr+1, coarse_rhs))
+
+        return level.smoother(rhs, x)
+
+    def __call__(self, operand):
+        return self.v_cycle(0, operand)
+
 
 
 
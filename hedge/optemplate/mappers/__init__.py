@@ -187,6 +187,7 @@ class IdentityMapperMixin(LocalOpReducerMixin, FluxOpReducerMixin):
     map_jacobian = map_scalar_parameter
     map_inverse_metric_derivative = map_scalar_parameter
     map_forward_metric_derivative = map_scalar_parameter
+    map_node_coordinate_component = map_scalar_parameter
 
     map_mass_base = map_elementwise_linear
     map_ref_mass_base = map_elementwise_linear
@@ -256,6 +257,7 @@ class DependencyMapper(
     map_jacobian = map_normal_component
     map_forward_metric_derivative = map_normal_component
     map_inverse_metric_derivative = map_normal_component
+    map_node_coordinate_component = map_normal_component
 
 
 class FlopCounter(
@@ -276,6 +278,7 @@ class FlopCounter(
     map_jacobian = map_normal_component
     map_forward_metric_derivative = map_normal_component
     map_inverse_metric_derivative = map_normal_component
+    map_node_coordinate_component = map_normal_component
 
 
 
@@ -541,7 +544,7 @@ class GlobalToReferenceMapper(CSECachingMapperMixin, IdentityMapper):
                 InverseMassOperator, ReferenceInverseMassOperator,
                 DifferentiationOperator, ReferenceDifferentiationOperator,
 
-                MInvSTOperator)
+                MInvSTOperator, FusedElementwiseLinearOperator)
 
         # Global-to-reference is run after operator specialization, so
         # if we encounter non-quadrature operators here, we know they
@@ -599,11 +602,89 @@ class GlobalToReferenceMapper(CSECachingMapperMixin, IdentityMapper):
                     InverseMassOperator()(
                         StiffnessTOperator(expr.op.xyz_axis)(expr.field)))
 
+        elif isinstance(expr.op, FusedElementwiseLinearOperator):
+            # Like the rewrites of the mass operators above, this relies
+            # on the Jacobian being constant on each element.
+            ref_ops = []
+            jacobian_power = 0
+            for op in expr.op.operators:
+                if isinstance(op, MassOperator):
+                    ref_ops.append(ReferenceMassOperator())
+                    jacobian_power += 1
+                elif isinstance(op, InverseMassOperator):
+                    ref_ops.append(ReferenceInverseMassOperator())
+                    jacobian_power -= 1
+                else:
+                    ref_ops.append(op)
+
+            rec_field = self.rec(expr.field)
+            if jacobian_power > 0:
+                rec_field = Jacobian(None)**jacobian_power * rec_field
+            elif jacobian_power < 0:
+                rec_field = 1/Jacobian(None)**(-jacobian_power) * rec_field
+
+            return FusedElementwiseLinearOperator(ref_ops)(rec_field)
+
         else:
             return IdentityMapper.map_operator_binding(self, expr)
 
 # }}}
 
+# {{{ elementwise linear operator fusion --------------------------------------
+
+class ElementwiseLinearFuser(CSECachingMapperMixin, IdentityMapper):
+    """Replaces chains of elementwise linear operators applied directly to
+    one another, such as a filter following an inverse Vandermonde
+    operator, by a single
+    :class:`hedge.optemplate.operators.FusedElementwiseLinearOperator`.
+
+    Chains are not fused across common subexpressions, since their values
+    may be needed elsewhere.
+
+    Must run after :class:`OperatorSpecializer` (so that mass operators on
+    quadrature grids are no longer elementwise linear) and before
+    :class:`GlobalToReferenceMapper` (which turns the global mass operators
+    within fused operators into reference ones).
+    """
+
+    map_common_subexpression_uncached = \
+            IdentityMapper.map_common_subexpression
+
+    @staticmethod
+    def is_fusable(op):
+        from hedge.optemplate.operators import (
+                ElementwiseLinearOperator,
+                MassOperator, InverseMassOperator,
+                ReferenceMassOperatorBase)
+
+        if not isinstance(op, ElementwiseLinearOperator):
+            return False
+
+        return (op.mapper_method == "map_elementwise_linear"
+                or isinstance(op, (MassOperator, InverseMassOperator,
+                    ReferenceMassOperatorBase)))
+
+    def map_operator_binding(self, expr):
+        from hedge.optemplate.operators import FusedElementwiseLinearOperator
+        from hedge.optemplate.primitives import OperatorBinding
+
+        ops = []
+        field = expr
+        while (isinstance(field, OperatorBinding)
+                and self.is_fusable(field.op)):
+            if isinstance(field.op, FusedElementwiseLinearOperator):
+                ops.extend(field.op.operators)
+            else:
+                ops.append(field.op)
+            field = field.field
+
+        if len(ops) < 2:
+            return IdentityMapper.map_operator_binding(self, expr)
+
+        return FusedElementwiseLinearOperator(ops)(self.rec(field))
+
+# }}}
+
 # {{{ stringification ---------------------------------------------------------
 class StringifyMapper(pymbolic.mapper.stringifier.StringifyMapper):
     def _format_btag(self, tag):
@@ -764,6 +845,12 @@ class StringifyMapper(pymbolic.mapper.stringifier.StringifyMapper):
             result += "Q[%s]" % expr.quadrature_tag
         return result
 
+    def map_node_coordinate_component(self, expr, enclosing_prec):
+        result = "x%d" % expr.axis
+        if expr.quadrature_tag is not None:
+            result += "Q[%s]" % expr.quadrature_tag
+        return result
+
     # }}}
 
     def map_operator_binding(self, expr, enclosing_prec):
@@ -1432,6 +1519,7 @@ class CollectorMixin(OperatorReducerMixin, LocalOpReducerMixin, FluxOpReducerMix
     map_jacobian = map_constant
     map_forward_metric_derivative = map_constant
     map_inverse_metric_derivative = map_constant
+    map_node_coordinate_component = map_constant
     map_scalar_parameter = map_constant
     map_c_function = map_constant
 
@@ -1490,6 +1578,7 @@ class GeometricFactorCollector(CollectorMixin, CombineMapper):
 
     map_forward_metric_derivative = map_jacobian
     map_inverse_metric_derivative = map_jacobian
+    map_node_coordinate_component = map_jacobian
 
 
 
@@ -51,7 +51,12 @@ class ExpensiveBoundaryOperatorDetector(CombineMapper):
                 QuadratureBoundaryGridUpsampler)
 
         if isinstance(expr.op, BoundarizeOperator):
-            return False
+            # Boundary data computed from node coordinates is evaluated
+            # as a boundary vector rather than inside the flux.
+            from hedge.optemplate.mappers import GeometricFactorCollector
+            from hedge.optemplate.primitives import NodeCoordinateComponent
+            return any(isinstance(gf, NodeCoordinateComponent)
+                    for gf in GeometricFactorCollector()(expr.field))
 
         elif isinstance(expr.op, FluxExchangeOperator):
             # FIXME: Duplication of these is an even bigger problem!
@@ -79,6 +84,7 @@ class ExpensiveBoundaryOperatorDetector(CombineMapper):
         return False
 
     map_variable = map_normal_component
+    map_scalar_parameter = map_normal_component
     map_constant = map_normal_component
 
     @memoize_method
@@ -651,6 +651,7 @@ class TypeInferrer(pymbolic.mapper.RecursiveMapper):
 
     map_forward_metric_derivative = map_jacobian
     map_inverse_metric_derivative = map_jacobian
+    map_node_coordinate_component = map_jacobian
 
     def map_common_subexpression(self, expr, typedict):
         outer_tp = typedict[expr]
@@ -365,6 +365,50 @@ class VandermondeOperator(ElementwiseLinearOperator, StatelessOperator):
                 eg.local_discretization.vandermonde(),
                 order="C")
 
+
+
+
+class FusedElementwiseLinearOperator(ElementwiseLinearOperator):
+    """The composition of a sequence of elementwise linear operators,
+    which is applied in a single pass over the volume.
+
+    .. note::
+
+        This operator is purely for internal use. It is inserted
+        by :class:`hedge.optemplate.mappers.ElementwiseLinearFuser`.
+    """
+
+    def __init__(self, operators):
+        """
+        :param operators: a sequence of :class:`ElementwiseLinearOperator`
+          instances. The last one is applied first.
+        """
+        self.operators = tuple(operators)
+
+    def __getinitargs__(self):
+        return (self.operators,)
+
+    def matrix(self, eg):
+        result = self.operators[0].matrix(eg)
+        for op in self.operators[1:]:
+            result = numpy.dot(result, op.matrix(eg))
+
+        return numpy.asarray(result, order="C")
+
+    def coefficients(self, eg):
+        # Per-element coefficients scale whole elements, and thus commute
+        # with the element-local matrices.
+        result = None
+        for op in self.operators:
+            coeffs = op.coefficients(eg)
+            if coeffs is not None:
+                if result is None:
+                    result = coeffs
+                else:
+                    result = result*coeffs
+
+        return result
+
 # }}}
 
 # }}}
@@ -297,6 +297,50 @@ class InverseMetricDerivative(GeometricFactorBase):
     def __getinitargs__(self):
         return (self.quadrature_tag, self.rst_axis, self.xyz_axis)
 
+
+
+
+class NodeCoordinateComponent(GeometricFactorBase):
+    """The *axis*-th coordinate of the nodes, as a volume vector.
+
+    Use :class:`hedge.optemplate.operators.BoundarizeOperator` to obtain
+    boundary node coordinates.
+    """
+
+    def __init__(self, axis, quadrature_tag=None):
+        """
+        :param quadrature_tag: quadrature tag for the grid on
+        which the coordinates are needed, or None for
+        nodal representation.
+        """
+
+        GeometricFactorBase.__init__(self, quadrature_tag)
+        self.axis = axis
+
+    def stringifier(self):
+        from hedge.optemplate.mappers import StringifyMapper
+        return StringifyMapper
+
+    def get_hash(self):
+        return hash((self.__class__, self.quadrature_tag, self.axis))
+
+    def is_equal(self, other):
+        return (other.__class__ == self.__class__
+                and other.quadrature_tag == self.quadrature_tag
+                and other.axis == self.axis)
+
+    mapper_method = intern("map_node_coordinate_component")
+
+    def __getinitargs__(self):
+        return (self.axis, self.quadrature_tag)
+
+
+
+
+def make_nodes(dimensions, quadrature_tag=None):
+    return numpy.array([NodeCoordinateComponent(i, quadrature_tag)
+        for i in range(dimensions)], dtype=object)
+
 # }}}
 
 
@@ -217,6 +217,21 @@ def ptwise_dot(logdims1, logdims2, a1, a2):
 
 
 
+
+def optemplate_cache_key(optemplate):
+    """Return a hashable key for *optemplate*, which may be an expression
+    or an object array of expressions. Since expressions hash and compare
+    structurally, structurally equal operator templates give equal keys.
+    """
+    from hedge.tools import is_obj_array
+    if is_obj_array(optemplate):
+        return ("obj_array", optemplate.shape, tuple(
+            optemplate_cache_key(subexpr) for subexpr in optemplate.flat))
+    else:
+        return optemplate
+
+
+
 # }}}
 
 # {{{ process_optemplate function ---------------------------------------------
@@ -227,7 +242,8 @@ def process_optemplate(optemplate, post_bind_mapper=None,
     from hedge.optemplate.mappers import (
             OperatorBinder, CommutativeConstantFoldingMapper,
             EmptyFluxKiller, InverseMassContractor, DerivativeJoiner,
-            ErrorChecker, OperatorSpecializer, GlobalToReferenceMapper)
+            ErrorChecker, OperatorSpecializer, GlobalToReferenceMapper,
+            ElementwiseLinearFuser)
     from hedge.optemplate.mappers.bc_to_flux import BCToFluxRewriter
     from hedge.optemplate.mappers.type_inference import TypeInferrer
 
@@ -264,6 +280,19 @@ def process_optemplate(optemplate, post_bind_mapper=None,
             TypeInferrer()(optemplate, type_hints)
             )(optemplate)
 
+    # Ordering restriction:
+    #
+    # - Must run OperatorSpecializer before fusing elementwise linear
+    # operators, because mass operators on quadrature grids are not
+    # elementwise linear.
+    #
+    # - Must fuse elementwise linear operators before performing the
+    # GlobalToReferenceMapper, which replaces global mass operators within
+    # fused operators by reference ones.
+
+    dumper("before-elwise-linear-fusion", optemplate)
+    optemplate = ElementwiseLinearFuser()(optemplate)
+
     # Ordering restriction:
     #
     # - Must run OperatorSpecializer before performing the GlobalToReferenceMapper,
@@ -100,9 +100,244 @@ def generic_multi_vandermonde(points, functions):
 
 
 
+# {{{ array-based orthonormal basis evaluation
+
+def jacobi_values(alpha, beta, n, x):
+    """Return an array of shape *(n+1,) + x.shape* containing the
+    orthonormal Jacobi polynomials of degrees 0 through *n* (normalized
+    as in :class:`JacobiFunction`) evaluated at all of *x*.
+    """
+    from math import gamma, sqrt
+
+    x = numpy.asarray(x, dtype=numpy.float64)
+    result = numpy.empty((n+1,)+x.shape)
+
+    gamma0 = (2**(alpha+beta+1)/(alpha+beta+1)
+            * gamma(alpha+1) * gamma(beta+1) / gamma(alpha+beta+1))
+    result[0] = 1/sqrt(gamma0)
+    if n == 0:
+        return result
+
+    gamma1 = (alpha+1)*(beta+1)/(alpha+beta+3)*gamma0
+    result[1] = ((alpha+beta+2)/2*x + (alpha-beta)/2)/sqrt(gamma1)
+
+    a_old = 2/(2+alpha+beta)*sqrt((alpha+1)*(beta+1)/(alpha+beta+3))
+    for i in xrange(1, n):
+        h1 = 2*i+alpha+beta
+        a_new = 2/(h1+2)*sqrt((i+1)*(i+1+alpha+beta)*(i+1+alpha)
+                *(i+1+beta)/(h1+1)/(h1+3))
+        b_new = -(alpha**2-beta**2)/h1/(h1+2)
+        result[i+1] = 1/a_new*(-a_old*result[i-1] + (x-b_new)*result[i])
+        a_old = a_new
+
+    return result
+
+
+
+
+def diff_jacobi_values(alpha, beta, n, x):
+    """Return an array of shape *(n+1,) + x.shape* containing the
+    derivatives of the polynomials returned by :func:`jacobi_values`.
+    """
+    x = numpy.asarray(x, dtype=numpy.float64)
+    result = numpy.zeros((n+1,)+x.shape)
+    if n == 0:
+        return result
+
+    degrees = numpy.arange(1, n+1)
+    factors = numpy.sqrt(degrees*(degrees+alpha+beta+1))
+    result[1:] = (factors.reshape((-1,)+(1,)*x.ndim)
+            * jacobi_values(alpha+1, beta+1, n-1, x))
+    return result
+
+
+
+
+def _quotient(num, den, default):
+    """Return *num/den*, or *default* where *den* is zero."""
+    result = numpy.empty_like(num)
+    result.fill(default)
+    nonzero = den != 0
+    result[nonzero] = num[nonzero]/den[nonzero]
+    return result
+
+
+
+
+def simplex_vandermonde(dimensions, mode_ids, points):
+    """Return the Vandermonde matrix of the orthonormal simplex basis
+    (as given by :class:`LegendreFunction`,
+    :class:`hedge.discretization.local.TriangleBasisFunction` or
+    :class:`hedge.discretization.local.TetrahedronBasisFunction`) for the
+    modes *mode_ids* at *points*, an array of shape
+    *(point_count, dimensions)* in unit coordinates.
+
+    This is equivalent to, but much faster than, :func:`generic_vandermonde`
+    applied to the corresponding basis functions.
+    """
+    points = numpy.asarray(points, dtype=numpy.float64) \
+            .reshape(-1, dimensions)
+    mode_ids = list(mode_ids)
+    result = numpy.empty((len(points), len(mode_ids)))
+    if not mode_ids:
+        return result
+
+    order = max(sum(mode_id) for mode_id in mode_ids)
+
+    if dimensions == 1:
+        f = jacobi_values(0, 0, order, points[:, 0])
+        for n, (i,) in enumerate(mode_ids):
+            result[:, n] = f[i]
+
+    elif dimensions == 2:
+        r, s = points.T
+        a = _quotient(2*(1+r), 1-s, 2) - 1
+
+        f = jacobi_values(0, 0, order, a)
+        g = dict((i, jacobi_values(2*i+1, 0, order-i, s))
+                for i in range(order+1))
+
+        for n, (i, j) in enumerate(mode_ids):
+            result[:, n] = 2**0.5 * f[i] * g[i][j] * (1-s)**i
+
+    elif dimensions == 3:
+        r, s, t = points.T
+        a = -_quotient(2*(1+r), s+t, 0) - 1
+        b = _quotient(2*(1+s), 1-t, 0) - 1
+        c = t
+
+        f = jacobi_values(0, 0, order, a)
+        g = dict((i, jacobi_values(2*i+1, 0, order-i, b))
+                for i in range(order+1))
+        h = {}
+        for n, (i, j, k) in enumerate(mode_ids):
+            try:
+                h_ij = h[i+j]
+            except KeyError:
+                h_ij = h[i+j] = jacobi_values(2*(i+j)+2, 0, order-i-j, c)
+
+            result[:, n] = (8**0.5 * f[i] * g[i][j] * (1-b)**i
+                    * h_ij[k] * (1-c)**(i+j))
+
+    else:
+        raise ValueError("unsupported dimension: %d" % dimensions)
+
+    return result
+
+
+
+
+def grad_simplex_vandermonde(dimensions, mode_ids, points):
+    """Return a list of *dimensions* matrices, the Vandermonde matrices of
+    the unit-coordinate derivatives of the basis evaluated by
+    :func:`simplex_vandermonde`.
+
+    This is equivalent to, but much faster than,
+    :func:`generic_multi_vandermonde` applied to the corresponding
+    gradient functions.
+    """
+    points = numpy.asarray(points, dtype=numpy.float64) \
+            .reshape(-1, dimensions)
+    mode_ids = list(mode_ids)
+    result = [numpy.empty((len(points), len(mode_ids)))
+            for axis in range(dimensions)]
+    if not mode_ids:
+        return result
+
+    order = max(sum(mode_id) for mode_id in mode_ids)
+
+    if dimensions == 1:
+        df = diff_jacobi_values(0, 0, order, points[:, 0])
+        for n, (i,) in enumerate(mode_ids):
+            result[0][:, n] = df[i]
+
+    elif dimensions == 2:
+        r, s = points.T
+        s = numpy.minimum(s, 1-numpy.finfo(numpy.float64).eps)
+        a = _quotient(2*(1+r), 1-s, 2) - 1
+        one_s = 1-s
+
+        f = jacobi_values(0, 0, order, a)
+        df = diff_jacobi_values(0, 0, order, a)
+        g = {}
+        dg = {}
+        for i in range(order+1):
+            g[i] = jacobi_values(2*i+1, 0, order-i, s)
+            dg[i] = diff_jacobi_values(2*i+1, 0, order-i, s)
+
+        for n, (i, j) in enumerate(mode_ids):
+            g_s = g[i][j]
+            result[0][:, n] = 2*2**0.5 * g_s * one_s**(i-1) * df[i]
+            result[1][:, n] = 2**0.5*(
+                    f[i] * one_s**i * dg[i][j]
+                    + (2*r+2) * g_s * one_s**(i-2) * df[i]
+                    - i * f[i] * g_s * one_s**(i-1))
+
+    elif dimensions == 3:
+        r, s, t = points.T
+        a = -_quotient(2*(1+r), s+t, 0) - 1
+        b = _quotient(2*(1+s), 1-t, 0) - 1
+        c = t
+        half_one_b = 0.5*(1-b)
+        half_one_c = 0.5*(1-c)
+
+        f = jacobi_values(0, 0, order, a)
+        df = diff_jacobi_values(0, 0, order, a)
+        g = {}
+        dg = {}
+        for i in range(order+1):
+            g[i] = jacobi_values(2*i+1, 0, order-i, b)
+            dg[i] = diff_jacobi_values(2*i+1, 0, order-i, b)
+        h = {}
+        dh = {}
+        for ij in range(order+1):
+            h[ij] = jacobi_values(2*ij+2, 0, order-ij, c)
+            dh[ij] = diff_jacobi_values(2*ij+2, 0, order-ij, c)
+
+        for n, (i, j, k) in enumerate(mode_ids):
+            fa = f[i]
+            gb = g[i][j]
+            hc = h[i+j][k]
+
+            v_r = df[i]*gb*hc
+            if i > 0:
+                v_r = v_r*half_one_b**(i-1)
+            if i+j > 0:
+                v_r = v_r*half_one_c**(i+j-1)
+
+            v_s = 0.5*(1+a)*v_r
+            tmp = dg[i][j]*half_one_b**i
+            if i > 0:
+                tmp = tmp - 0.5*i*gb*half_one_b**(i-1)
+            if i+j > 0:
+                tmp = tmp*half_one_c**(i+j-1)
+            tmp = fa*tmp*hc
+            v_s = v_s + tmp
+
+            v_t = 0.5*(1+a)*v_r + 0.5*(1+b)*tmp
+            tmp = dh[i+j][k]*half_one_c**(i+j)
+            if i+j > 0:
+                tmp = tmp - 0.5*(i+j)*hc*half_one_c**(i+j-1)
+            tmp = fa*gb*tmp*half_one_b**i
+            v_t = v_t + tmp
+
+            scale = 2**(2*i+j+1.5)
+            result[0][:, n] = v_r*scale
+            result[1][:, n] = v_s*scale
+            result[2][:, n] = v_t*scale
+
+    else:
+        raise ValueError("unsupported dimension: %d" % dimensions)
+
+    return result
+
+# }}}
+
+
+
+
 def legendre_vandermonde(points, N):
-    return generic_vandermonde(points,
-            [LegendreFunction(i) for i in range(N+1)])
+    return simplex_vandermonde(1, [(i,) for i in range(N+1)], points)
 
 
 
@@ -327,6 +327,31 @@ class SimplexCubature(object):
 
 
 
+_QUAD_DATA = None
+
+def _get_quadrature_rule(table_name, order):
+    """Return a tuple *(points, weights)* of the rule of *order* in the
+    table *table_name* in :file:`quad_data.npz`.
+
+    The archive is opened on first use, and only the arrays for the
+    requested rule are read from it.
+    """
+    global _QUAD_DATA
+    if _QUAD_DATA is None:
+        from os.path import join, dirname
+        _QUAD_DATA = numpy.load(join(dirname(__file__), "quad_data.npz"))
+
+    prefix = "%s_%d_" % (table_name, order)
+    try:
+        return _QUAD_DATA[prefix+"points"], _QUAD_DATA[prefix+"weights"]
+    except KeyError:
+        raise ValueError("no %s quadrature rule of order %d is available"
+                % (table_name, order))
+
+
+
+
+
 class XiaoGimbutasSimplexCubature(Quadrature):
     """
     See
@@ -338,20 +363,18 @@ class XiaoGimbutasSimplexCubature(Quadrature):
 
     def __init__(self, order, dimension):
         if dimension == 2:
-            from hedge.xg_quad_data import triangle_table as table
             from hedge.discretization.local import TriangleDiscretization
+            points, weights = _get_quadrature_rule("xg_triangle", order)
             e2u = TriangleDiscretization.equilateral_to_unit
         elif dimension == 3:
-            from hedge.xg_quad_data import tetrahedron_table as table
             from hedge.discretization.local import TetrahedronDiscretization
+            points, weights = _get_quadrature_rule("xg_tetrahedron", order)
             e2u = TetrahedronDiscretization.equilateral_to_unit
         else:
             raise ValueError("invalid dimensionality for XG quadrature")
 
-        pts = numpy.array([
-                e2u(pt) for pt in table[order]["points"]
-                ])
-        wts = table[order]["weights"]*e2u.jacobian()
+        pts = numpy.array([e2u(pt) for pt in points])
+        wts = weights*e2u.jacobian()
 
         Quadrature.__init__(self, pts, wts)
 
@@ -364,11 +387,11 @@ class XiaoGimbutasSimplexCubature(Quadrature):
 class CoolsSimplexCubature(Quadrature):
     def __init__(self, order, dimension):
         if dimension == 2:
-            from hedge.cools_quad_data import triangle_table as table
+            points, weights = _get_quadrature_rule("cools_triangle", order)
         else:
             raise ValueError("invalid dimensionality for XG quadrature")
 
-        Quadrature.__init__(self, table[order]["points"], table[order]["weights"])
+        Quadrature.__init__(self, points, weights)
 
         self.exact_to = order
 
@@ -128,6 +128,8 @@ def make_ab_coefficients(order):
 class AdamsBashforthTimeStepper(TimeStepper):
     dt_fudge_factor = 0.95
 
+    checkpoint_attributes = ("f_history", "dof_count", "startup_stepper")
+
     def __init__(self, order, startup_stepper=None, dtype=numpy.float64, rcon=None):
         self.f_history = []
 
@@ -28,4 +28,51 @@ THE SOFTWARE.
 
 
 class TimeStepper(object):
-    pass
+    """
+    .. attribute:: checkpoint_attributes
+
+        Names of the attributes making up the state that a time stepper
+        carries from one step to the next, such as a history of right-hand
+        sides. Attributes that have not been set yet (or have been deleted)
+        are part of the state by their absence. Attributes holding time
+        steppers themselves (such as startup steppers) are checkpointed
+        recursively.
+    """
+
+    checkpoint_attributes = ()
+
+    def get_checkpoint_state(self):
+        """Return a dictionary of the values of
+        :attr:`checkpoint_attributes`, suitable for
+        :meth:`set_checkpoint_state`.
+        """
+        result = {}
+        for name in self.checkpoint_attributes:
+            try:
+                value = getattr(self, name)
+            except AttributeError:
+                continue
+
+            if isinstance(value, TimeStepper):
+                value = value.get_checkpoint_state()
+
+            result[name] = value
+
+        return result
+
+    def set_checkpoint_state(self, state):
+        """Restore a state obtained from :meth:`get_checkpoint_state`
+        on a time stepper constructed with the same arguments.
+        """
+        for name in self.checkpoint_attributes:
+            if name not in state:
+                self.__dict__.pop(name, None)
+                continue
+
+            value = state[name]
+            current_value = getattr(self, name, None)
+            if isinstance(current_value, TimeStepper) \
+                    and isinstance(value, dict):
+                current_value.set_checkpoint_state(value)
+            else:
+                setattr(self, name, value)
@@ -37,11 +37,12 @@ BIT1998, Vol. 38, No.2, pp.372-390
 
 import numpy
 import numpy.linalg as la
+from hedge.timestep.base import TimeStepper
 
 
 
 
-class Dumka3TimeStepper(object):
+class Dumka3TimeStepper(TimeStepper):
     """Third-order "DUMKA" timesteppers.
 
     Alexei A. Medovikov, "High order explicit methods for parabolic equations"
@@ -53,6 +54,8 @@ class Dumka3TimeStepper(object):
 
     dt_fudge_factor = 3
 
+    checkpoint_attributes = ("pol_index", "last_eps", "last_dt")
+
     POLYNOMIAL_COUNT = 13
     # 14 polynomials are available, but polynomial 13 fails
     # accuracy test?
@@ -233,3 +233,104 @@ class KennedyCarpenterIMEXARK4(KennedyCarpenterIMEXRungeKuttaBase):
             == len(low_order_coeffs)
             == len(high_order_coeffs)
             == len(c))
+
+
+
+
+# {{{ matrix-free implicit stage solver
+
+def _flatten_field(field):
+    """Return a flat, component-major copy of *field* and a function
+    undoing the flattening.
+    """
+    from pytools.obj_array import log_shape
+    ls = log_shape(field)
+
+    if ls == ():
+        return field, lambda flat: flat
+
+    if field.dtype != object:
+        shape = field.shape
+        return field.reshape(-1), lambda flat: flat.reshape(shape)
+
+    components = list(field.flat)
+    sizes = [len(comp) for comp in components]
+    offsets = numpy.cumsum([0] + sizes)
+
+    def unflatten(flat):
+        result = numpy.empty(ls, dtype=object)
+        for i, (start, end) in enumerate(zip(offsets[:-1], offsets[1:])):
+            result.flat[i] = flat[start:end]
+        return result
+
+    return numpy.hstack(components), unflatten
+
+
+
+
+class NewtonKrylovImplicitRHS(object):
+    """Turns a right-hand side *rhs(t, y)*, e.g. a bound (and possibly
+    nonlinear) operator, into an *rhs_impl* suitable for
+    :class:`KennedyCarpenterIMEXRungeKuttaBase`, solving
+
+    .. math::
+
+        k - f(t, y_0 + \\alpha k) = 0
+
+    by :func:`hedge.iterative.newton_krylov`. Only applications of *rhs*
+    are needed.
+
+    :arg make_precon: if given, a function of the
+      :class:`hedge.iterative.FiniteDifferenceJacobian` of the stage
+      residual (acting on component-major flattened vectors) returning
+      a preconditioner, for example by way of
+      :func:`hedge.iterative.make_block_jacobi_preconditioner`.
+      The preconditioner is lagged: it is only rebuilt when
+      *alpha* changes or after :meth:`invalidate_preconditioner`.
+    """
+
+    def __init__(self, rhs, make_precon=None, tol=1e-8, krylov_tol=1e-4,
+            restart=30, max_newton_iterations=20, dot=None):
+        self.rhs = rhs
+        self.make_precon = make_precon
+        self.tol = tol
+        self.krylov_tol = krylov_tol
+        self.restart = restart
+        self.max_newton_iterations = max_newton_iterations
+        self.dot = dot
+
+        self.invalidate_preconditioner()
+
+    def invalidate_preconditioner(self):
+        self.precon = None
+        self.precon_alpha = None
+
+    def __call__(self, t, y0, alpha):
+        k0 = self.rhs(t, y0)
+        if alpha == 0:
+            return k0
+
+        flat_y0, unflatten = _flatten_field(y0)
+        flat_k0, _ = _flatten_field(k0)
+
+        rhs = self.rhs
+
+        def residual(k):
+            return k - _flatten_field(rhs(t, unflatten(flat_y0 + alpha*k)))[0]
+
+        from hedge.iterative import newton_krylov, FiniteDifferenceJacobian
+
+        if self.make_precon is not None and (
+                self.precon is None or self.precon_alpha != alpha):
+            self.precon = self.make_precon(
+                    FiniteDifferenceJacobian(residual, flat_k0,
+                        dot=self.dot))
+            self.precon_alpha = alpha
+
+        return unflatten(newton_krylov(residual, flat_k0,
+            precon=self.precon, tol=self.tol, krylov_tol=self.krylov_tol,
+            restart=self.restart,
+            max_iterations=self.max_newton_iterations,
+            dot=self.dot))
+
+# }}}
@@ -64,6 +64,8 @@ class TwoRateAdamsBashforthTimeStepper(TimeStepper):
     Numerical Mathematics,  vol. 24, Dec. 1984, pg. 484-502.
     """
 
+    checkpoint_attributes = ("histories", "startup_history", "startup_stepper")
+
     def __init__(self, method, large_dt, substep_count, order,
             order_f2f=None, order_s2f=None,
             order_f2s=None, order_s2s=None,
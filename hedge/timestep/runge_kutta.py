@@ -69,6 +69,8 @@ class LSRK4TimeStepper(TimeStepper):
 
     adaptive = False
 
+    checkpoint_attributes = ("residual", "dof_count")
+
     def __init__(self, dtype=numpy.float64, rcon=None,
             vector_primitive_factory=None):
         if vector_primitive_factory is None:
@@ -109,12 +111,14 @@ class LSRK4TimeStepper(TimeStepper):
             from hedge.tools import count_dofs
             self.dof_count = count_dofs(self.residual)
 
-            self.linear_combiner = self.vector_primitive_factory\
+        # not part of the state, may be missing after a restart
+        try:
+            lc = self.linear_combiner
+        except AttributeError:
+            lc = self.linear_combiner = self.vector_primitive_factory\
                     .make_linear_combiner(self.dtype, self.scalar_dtype, 
                             y, arg_count=2)
 
-        lc = self.linear_combiner
-
         for a, b, c in self.coeffs:
             this_rhs = rhs(t + c*dt, y)
 
@@ -254,6 +258,8 @@ class EmbeddedRungeKuttaTimeStepperBase(TimeStepper):
 
 
 class EmbeddedButcherTableauTimeStepperBase(EmbeddedRungeKuttaTimeStepperBase):
+    checkpoint_attributes = ("last_rhs", "dof_count")
+
     def __call__(self, y, t, dt, rhs, reject_hook=None):
         from hedge.tools import count_dofs
 
@@ -264,6 +270,10 @@ class EmbeddedButcherTableauTimeStepperBase(EmbeddedRungeKuttaTimeStepperBase):
             self.last_rhs = rhs(t, y)
             self.dof_count = count_dofs(self.last_rhs)
 
+        # not part of the state, may be missing after a restart
+        try:
+            self.norm
+        except AttributeError:
             if self.adaptive:
                 self.norm = self.vector_primitive_factory \
                         .make_maximum_norm(self.last_rhs)
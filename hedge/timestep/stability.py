@@ -113,3 +113,31 @@ def approximate_imag_stability_region(stepper_class, *stepper_args):
     from cmath import pi
     angle = pi/2
     return abs(make_k(angle, find_stable_k(angle)))
+
+
+
+
+def estimate_max_stable_dt(discr, operator, stepper_class=None,
+        stepper_args=(), component_count=1, stencil_radius=1):
+    """Estimate the largest stable time step for integrating the linear
+    *operator* (acting on component-major flattened volume vectors) with
+    the given time stepper, from the spectral radius of its assembled
+    matrix and the stepper's stability region along the imaginary axis.
+
+    See :func:`hedge.iterative.assemble_sparse_matrix` for the meaning of
+    *component_count* and *stencil_radius*.
+    """
+    from hedge.iterative import assemble_sparse_matrix
+    matrix = assemble_sparse_matrix(discr, operator,
+            component_count=component_count, stencil_radius=stencil_radius)
+
+    from scipy.sparse.linalg import eigs
+    spectral_radius = numpy.max(numpy.abs(
+        eigs(matrix, k=1, which="LM", return_eigenvectors=False)))
+
+    if stepper_class is None:
+        from hedge.timestep.runge_kutta import LSRK4TimeStepper
+        stepper_class = LSRK4TimeStepper
+
+    return (approximate_imag_stability_region(stepper_class, *stepper_args)
+            / spectral_radius)
@@ -0,0 +1,171 @@
+"""Ensembles: many independent states sharing one discretization."""
+
+from __future__ import division
+
+__copyright__ = "Copyright (C) 2026 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+
+
+
+import numpy
+
+
+
+
+class EnsembleVector(numpy.ndarray):
+    """A stack of independent per-member values, with the ensemble
+    axis first.
+
+    A volume field of an ensemble of size *n* has shape *(n, ndof)*,
+    a per-member scalar (such as a batched time or time step) has
+    shape *(n,)*. Vector-valued fields are represented, as usual in
+    hedge, by object arrays, each of whose entries is an
+    :class:`EnsembleVector`.
+
+    The class is only a marker: since a plain two-dimensional array is
+    read by hedge as a vector field, ensembles need to be labeled as such
+    to be told apart. Use :func:`make_ensemble` to create instances.
+    """
+
+
+
+
+def make_ensemble(members):
+    """Stack the states in *members* into one ensemble state.
+
+    *members* is a sequence of scalars, volume (or boundary) vectors,
+    or object arrays of those. All members must have the same structure,
+    except that members which are a scalar zero (as hedge returns for
+    vanishing results) are broadcast to the structure of the others.
+    """
+    from hedge.tools import is_obj_array, is_zero
+
+    members = list(members)
+    if not members:
+        raise ValueError("cannot make an empty ensemble")
+
+    nonzero_members = [m for m in members if not is_zero(m)]
+    if not nonzero_members:
+        return numpy.array(members).view(EnsembleVector)
+
+    template = nonzero_members[0]
+
+    if is_obj_array(template):
+        from pytools import single_valued, indices_in_shape
+        shape = single_valued(m.shape for m in nonzero_members)
+
+        result = numpy.zeros(shape, dtype=object)
+        for i in indices_in_shape(shape):
+            result[i] = make_ensemble(
+                    0 if is_zero(m) else m[i] for m in members)
+        return result
+    else:
+        template = numpy.asarray(template)
+        dtype = numpy.result_type(*nonzero_members)
+        result = numpy.zeros((len(members),)+template.shape, dtype=dtype)
+        for i, m in enumerate(members):
+            if not is_zero(m):
+                result[i] = m
+        return result.view(EnsembleVector)
+
+
+
+
+def is_ensemble(value):
+    return isinstance(value, EnsembleVector)
+
+
+
+
+def ensemble_size(value):
+    """Return the ensemble size of *value*, or *None* if *value* is
+    not (and does not contain) an :class:`EnsembleVector`.
+
+    *value* may be an object array, a list, or a tuple.
+
+    :raises ValueError: if different ensemble sizes are encountered.
+    """
+    from hedge.tools import is_obj_array
+
+    if isinstance(value, EnsembleVector):
+        return value.shape[0]
+    elif is_obj_array(value) or isinstance(value, (list, tuple)):
+        if is_obj_array(value):
+            value = value.flat
+
+        sizes = set(ensemble_size(v) for v in value)
+        sizes.discard(None)
+
+        if not sizes:
+            return None
+        elif len(sizes) > 1:
+            raise ValueError("inconsistent ensemble sizes: %s"
+                    % ", ".join(str(s) for s in sorted(sizes)))
+        else:
+            size, = sizes
+            return size
+    else:
+        return None
+
+
+
+
+def ensemble_member(value, i):
+    """Return member *i* of *value*. Values that are not part of an
+    ensemble are shared by all members and returned unchanged.
+    """
+    from hedge.tools import is_obj_array
+
+    if isinstance(value, EnsembleVector):
+        return value.view(numpy.ndarray)[i]
+    elif is_obj_array(value):
+        from hedge.tools import with_object_array_or_scalar
+        return with_object_array_or_scalar(
+                lambda subval: ensemble_member(subval, i), value)
+    else:
+        return value
+
+
+
+
+def split_ensemble(value):
+    """Return a list of the members of *value*."""
+    size = ensemble_size(value)
+    if size is None:
+        raise ValueError("value is not an ensemble")
+
+    return [ensemble_member(value, i) for i in xrange(size)]
+
+
+
+
+def ensemble_factor(factor, vec_ndim):
+    """Return *factor* in a form that scales each member of an ensemble
+    vector with *vec_ndim* dimensions by its own factor, if *factor* is
+    itself per-member.
+    """
+    if isinstance(factor, numpy.ndarray):
+        factor = factor.view(numpy.ndarray)
+        return factor.reshape(factor.shape + (1,)*(vec_ndim-factor.ndim))
+    else:
+        return factor
@@ -28,10 +28,13 @@ THE SOFTWARE.
 
 
 
-def time_count_flop(func, timer, counter, flop_counter, flops, increment=1):
+def time_count_flop(func, timer, counter, flop_counter, flops, increment=1,
+        byte_counter=None, byte_count=0):
     def wrapped_f(*args, **kwargs):
         counter.add()
         flop_counter.add(flops)
+        if byte_counter is not None:
+            byte_counter.add(byte_count)
         sub_timer = timer.start_sub_timer()
         try:
             return func(*args, **kwargs)
@@ -43,6 +46,16 @@ def time_count_flop(func, timer, counter, flop_counter, flops, increment=1):
 
 
 
+def count_calls(func, counter):
+    def wrapped_f(*args, **kwargs):
+        counter.add()
+        return func(*args, **kwargs)
+
+    return wrapped_f
+
+
+
+
 # flop counting ---------------------------------------------------------------
 def diff_rst_flops(discr):
     result = 0
@@ -131,6 +144,64 @@ def gather_flops(discr, quadrature_tag=None):
 
 
 
+# memory traffic estimation ---------------------------------------------------
+# These count the bytes that each operation must at least read and write,
+# ignoring operator matrices, which are assumed to stay in cache.
+
+def _scalar_size(discr):
+    import numpy
+    return numpy.dtype(discr.default_scalar_type).itemsize
+
+
+
+
+def diff_rst_bytes(discr):
+    # read the operand, write one result per reference axis
+    return (_scalar_size(discr)
+            * len(discr.nodes)
+            * (1 + discr.dimensions))
+
+
+
+
+def mass_bytes(discr):
+    # read the operand, write the result
+    return 2 * _scalar_size(discr) * len(discr.nodes)
+
+
+
+
+def lift_bytes(discr, fg):
+    ldis = fg.ldis_loc
+    return (_scalar_size(discr)
+            * fg.element_count()
+            * (fg.face_length() * ldis.face_count() # read face values
+                + ldis.node_count())) # write the volume result
+
+
+
+
+def gather_bytes(discr, arg_count, result_count, quadrature_tag=None):
+    face_node_count = 0
+    for eg in discr.element_groups:
+        ldis = eg.local_discretization
+
+        if quadrature_tag is None:
+            fnc = ldis.face_node_count()
+        else:
+            fnc = eg.quadrature_info[quadrature_tag] \
+                    .ldis_quad_info.face_node_count()
+
+        face_node_count += fnc * ldis.face_count() * len(eg.members)
+
+    # read the arguments, write the fluxes
+    return (_scalar_size(discr)
+            * face_node_count
+            * (arg_count + result_count))
+
+
+
+
 def count_dofs(vec):
     try:
         dtype = vec.dtype
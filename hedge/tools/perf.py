@@ -0,0 +1,194 @@
+"""Access to hardware performance counters and process resource usage."""
+
+from __future__ import division
+
+__copyright__ = "Copyright (C) 2026 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+
+
+
+import os
+import sys
+
+
+
+
+class PerfCountersUnavailable(RuntimeError):
+    pass
+
+
+
+
+# {{{ Linux perf_event interface
+
+# from linux/perf_event.h
+PERF_TYPE_HARDWARE = 0
+
+PERF_COUNT_HW_CPU_CYCLES = 0
+PERF_COUNT_HW_INSTRUCTIONS = 1
+PERF_COUNT_HW_CACHE_REFERENCES = 2
+PERF_COUNT_HW_CACHE_MISSES = 3
+
+PERF_FORMAT_TOTAL_TIME_ENABLED = 1
+PERF_FORMAT_TOTAL_TIME_RUNNING = 2
+
+_ATTR_FLAG_EXCLUDE_KERNEL = 1 << 5
+_ATTR_FLAG_EXCLUDE_HV = 1 << 6
+
+# size of the first published version of struct perf_event_attr
+_PERF_ATTR_SIZE_VER0 = 64
+
+_PERF_EVENT_OPEN_SYSCALL_NUMBERS = {
+        "x86_64": 298,
+        "i386": 336,
+        "i686": 336,
+        "aarch64": 241,
+        "armv7l": 364,
+        "ppc64": 319,
+        "ppc64le": 319,
+        }
+
+HARDWARE_EVENTS = {
+        "cycles": PERF_COUNT_HW_CPU_CYCLES,
+        "instructions": PERF_COUNT_HW_INSTRUCTIONS,
+        "cache_references": PERF_COUNT_HW_CACHE_REFERENCES,
+        "cache_misses": PERF_COUNT_HW_CACHE_MISSES,
+        }
+
+
+
+
+def _make_perf_event_attr(config):
+    """Return a packed ``struct perf_event_attr`` (of the first published
+    size) that counts the hardware event *config* in user space.
+    """
+    import struct
+
+    # struct perf_event_attr: type, size, config, sample_period,
+    # sample_type, read_format, flags, wakeup_events, bp_type, config1
+    return struct.pack("=IIQQQQQIIQ",
+            PERF_TYPE_HARDWARE, _PERF_ATTR_SIZE_VER0, config, 0, 0,
+            PERF_FORMAT_TOTAL_TIME_ENABLED | PERF_FORMAT_TOTAL_TIME_RUNNING,
+            # count user space only, which unprivileged processes may
+            _ATTR_FLAG_EXCLUDE_KERNEL | _ATTR_FLAG_EXCLUDE_HV,
+            0, 0, 0)
+
+
+
+
+def _perf_event_open(config):
+    import ctypes
+
+    if not sys.platform.startswith("linux"):
+        raise PerfCountersUnavailable("perf counters require Linux")
+
+    try:
+        syscall_nr = _PERF_EVENT_OPEN_SYSCALL_NUMBERS[os.uname()[4]]
+    except KeyError:
+        raise PerfCountersUnavailable("unknown machine type '%s'"
+                % os.uname()[4])
+
+    attr = ctypes.create_string_buffer(_make_perf_event_attr(config),
+            _PERF_ATTR_SIZE_VER0)
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.syscall.restype = ctypes.c_long
+
+    # this process, any cpu, no group, no flags
+    fd = libc.syscall(ctypes.c_long(syscall_nr), attr,
+            ctypes.c_int(0), ctypes.c_int(-1), ctypes.c_int(-1),
+            ctypes.c_ulong(0))
+    if fd < 0:
+        errno = ctypes.get_errno()
+        raise PerfCountersUnavailable("perf_event_open failed: %s"
+                % os.strerror(errno))
+
+    return fd
+
+
+
+
+class PerfCounterSet(object):
+    """Counts hardware events of the current process in user space, using
+    the Linux perf_event interface.
+
+    :param events: a list of keys of :data:`HARDWARE_EVENTS`.
+    :raises PerfCountersUnavailable: if the counters cannot be opened,
+      for instance because of the system's ``perf_event_paranoid``
+      setting, or inside a container or virtual machine without access
+      to the performance monitoring unit.
+    """
+
+    def __init__(self, events=["cycles", "instructions", "cache_misses"]):
+        self.events = events
+        self.fds = []
+
+        try:
+            for event in events:
+                self.fds.append(_perf_event_open(HARDWARE_EVENTS[event]))
+        except:
+            self.close()
+            raise
+
+    def read(self):
+        """Return a list of the current counts of :attr:`events` since
+        construction. Counts are scaled to compensate for times at which
+        the kernel had to multiplex the counters.
+        """
+        import struct
+
+        result = []
+        for fd in self.fds:
+            value, time_enabled, time_running = struct.unpack(
+                    "=QQQ", os.read(fd, 24))
+            if time_running and time_running < time_enabled:
+                value = int(value * time_enabled / time_running)
+            result.append(value)
+
+        return result
+
+    def close(self):
+        for fd in self.fds:
+            os.close(fd)
+        self.fds = []
+
+# }}}
+
+
+
+
+def get_peak_rss():
+    """Return the peak resident set size of the current process in bytes."""
+    import resource
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if sys.platform == "darwin":
+        return max_rss
+    else:
+        # kilobytes
+        return max_rss * 1024
+
+
+
+
+# vim: foldmethod=marker
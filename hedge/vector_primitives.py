@@ -86,6 +86,32 @@ class NumpyLinearCombiner(object):
 
 
 
+class EnsembleLinearCombiner(object):
+    """Linear combinations of :class:`hedge.tools.ensemble.EnsembleVector`
+    instances. Factors may be scalars or hold one value per ensemble
+    member (as for a batched time step).
+    """
+    def __init__(self, result_dtype, scalar_dtype):
+        self.result_dtype = result_dtype
+
+    def __call__(self, *args):
+        from hedge.tools.ensemble import EnsembleVector, ensemble_factor
+
+        result = None
+        for fac, vec in args:
+            vec = vec.view(numpy.ndarray)
+            term = ensemble_factor(fac, vec.ndim)*vec
+
+            if result is None:
+                result = numpy.array(term, dtype=self.result_dtype)
+            else:
+                result += term
+
+        return result.view(EnsembleVector)
+
+
+
+
 class CUDALinearCombiner:
     def __init__(self, result_dtype, scalar_dtype, sample_vec, arg_count,
             pool=None):
@@ -190,7 +216,10 @@ class VectorPrimitiveFactory(object):
         if sample_is_obj_array:
             sample_vec = sample_vec[0]
 
-        if isinstance(sample_vec, numpy.ndarray) and sample_vec.dtype != object:
+        from hedge.tools.ensemble import EnsembleVector
+        if isinstance(sample_vec, EnsembleVector):
+            kernel = EnsembleLinearCombiner(result_dtype, scalar_dtype)
+        elif isinstance(sample_vec, numpy.ndarray) and sample_vec.dtype != object:
             kernel = NumpyLinearCombiner(result_dtype, scalar_dtype, sample_vec,
                     arg_count)
         else:
@@ -476,7 +476,8 @@ class SiloVisualizer(Visualizer):
 
         from pyvisfile.silo import DB_NODECENT, DBOPT_DTIME, DBOPT_CYCLE
 
-        # put mesh coordinates
+        # put mesh coordinates (into every file, even though Silo
+        # multimesh objects could refer to a mesh in a separate file)
         mesh_opts = {}
         if time is not None:
             mesh_opts[DBOPT_DTIME] = float(time)
@@ -520,6 +521,136 @@ class SiloVisualizer(Visualizer):
 
 
 
+# asynchronous writing --------------------------------------------------------
+def _snapshot_field(field):
+    from hedge.tools import is_obj_array, make_obj_array
+    if is_obj_array(field):
+        return make_obj_array([_snapshot_field(f_i) for f_i in field])
+    elif isinstance(field, numpy.ndarray):
+        return field.copy()
+    else:
+        return field
+
+
+
+
+class AsyncVisualizationFile(hedge.tools.Closable):
+    """Collects snapshots of the data added to a file by
+    :meth:`AsyncVisualizer.add_data`. Closing it hands the file over to
+    the background writer.
+    """
+
+    def __init__(self, visualizer, pathname):
+        hedge.tools.Closable.__init__(self)
+        self.visualizer = visualizer
+        self.pathname = pathname
+        self.data = []
+
+    def do_close(self):
+        self.visualizer.submit(self)
+
+
+
+
+class AsyncVisualizer(Visualizer, hedge.tools.Closable):
+    """Wraps another visualizer (such as :class:`VtkVisualizer` or
+    :class:`SiloVisualizer`) so that files are written by a background
+    thread, letting the solver continue immediately.
+
+    Use it like the wrapped visualizer::
+
+        vis = AsyncVisualizer(VtkVisualizer(discr, rcon, "fld"))
+
+        visf = vis.make_file("fld-%04d" % step)
+        vis.add_data(visf, [("u", u)], time=t, step=step)
+        visf.close()
+
+        vis.close()
+
+    :meth:`add_data` copies the fields it is given. The background thread
+    then creates, fills and closes the actual file through the wrapped
+    visualizer, which includes all serialization and compression. At most
+    *max_pending* closed files wait to be written in addition to the one
+    being written, so the default of one gives double buffering. If the
+    writer falls behind, closing a file blocks until a buffer frees up.
+
+    Errors encountered by the background thread are re-raised by the next
+    call to :meth:`make_file` or :meth:`close`.
+
+    Each file still contains the mesh, since the wrapped visualizers write
+    it along with the data; only the work of doing so moves off the solver
+    thread. VTK XML pieces must carry their own geometry. Silo does not
+    require this--multimesh and multivar objects may refer to blocks in
+    other files, so a mesh written once could be shared by all time
+    steps--but :class:`SiloVisualizer` does not currently make use of that.
+    """
+
+    def __init__(self, visualizer, max_pending=1):
+        hedge.tools.Closable.__init__(self)
+
+        self.visualizer = visualizer
+        self.error = None
+
+        from Queue import Queue
+        self.queue = Queue(max_pending)
+
+        from threading import Thread
+        self.thread = Thread(target=self._write_files)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _write_files(self):
+        while True:
+            async_visf = self.queue.get()
+            if async_visf is None:
+                return
+
+            if self.error is not None:
+                # skip further files, report the first error
+                continue
+
+            try:
+                visf = self.visualizer.make_file(async_visf.pathname)
+                for args, kwargs in async_visf.data:
+                    self.visualizer.add_data(visf, *args, **kwargs)
+                visf.close()
+            except:
+                import sys
+                self.error = sys.exc_info()
+
+    def _check_error(self):
+        if self.error is not None:
+            exc_type, exc_value, exc_tb = self.error
+            self.error = None
+            raise exc_type, exc_value, exc_tb
+
+    def make_file(self, pathname):
+        self._check_error()
+        return AsyncVisualizationFile(self, pathname)
+
+    def add_data(self, visf, variables=[], **kwargs):
+        def snapshot(variables):
+            return [(name, _snapshot_field(field))
+                    for name, field in variables]
+
+        for deprecated_key in ["scalars", "vectors"]:
+            if deprecated_key in kwargs:
+                kwargs[deprecated_key] = snapshot(kwargs[deprecated_key])
+
+        visf.data.append(((snapshot(variables),), kwargs))
+
+    def submit(self, async_visf):
+        self.queue.put(async_visf)
+
+    def do_close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.visualizer.close()
+        self._check_error()
+
+
+
+
 # tools -----------------------------------------------------------------------
 def get_rank_partition(pcon, discr):
     vec = discr.volume_zeros()
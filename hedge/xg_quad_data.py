@@ -1,16877 +0,0 @@
-# GENERATED, DO NOT EDIT
-# Xiao-Gimbutas quadratures
-# http://dx.doi.org/10.1016/j.camwa.2009.10.027
-import numpy
-
-triangle_table = {1: {'points': [[0.0, 2.2204460492503101e-16]],
-     'weights': [1.7320508075688801]},
- 2: {'points': [[-0.5, -0.28867513459481298],
-                [0.5, -0.28867513459481298],
-                [0.0, 0.57735026918962595]],
-     'weights': [0.57735026918962595,
-                 0.57735026918962595,
-                 0.57735026918962595]},
- 3: {'points': [[0.0, -0.39011034927098698],
-                [0.337845472747895, 0.19505517463549299],
-                [-0.337845472747895, 0.19505517463549399],
-                [-0.72527135947068699, -0.41873561462592801],
-                [0.72527135947068799, -0.41873561462592701],
-                [0.0, 0.83747122925185502]],
-     'weights': [0.38690826279781898,
-                 0.38690826279781898,
-                 0.38690826279781898,
-                 0.190442006391807,
-                 0.190442006391807,
-                 0.190442006391807]},
- 4: {'points': [[0.0, -0.39011034927098698],
-                [0.337845472747895, 0.19505517463549299],
-                [-0.337845472747895, 0.19505517463549399],
-                [-0.72527135947068699, -0.41873561462592801],
-                [0.72527135947068799, -0.41873561462592701],
-                [0.0, 0.83747122925185502]],
-     'weights': [0.38690826279781898,
-                 0.38690826279781898,
-                 0.38690826279781898,
-                 0.190442006391807,
-                 0.190442006391807,
-                 0.190442006391807]},
- 5: {'points': [[-0.69614047802963097, -0.40191689238420197],
-                [0.69614047802963097, -0.40191689238420197],
-                [0.0, 0.80383378476840495],
-                [0.0, -0.473919345231475],
-                [0.410426192315345, 0.236959672615738],
-                [-0.410426192315345, 0.236959672615738],
-                [0.0, 2.2204460492503101e-16]],
-     'weights': [0.21813305936723101,
-                 0.21813305936723101,
-                 0.21813305936723101,
-                 0.22931339925472999,
-                 0.22931339925472999,
-                 0.22931339925472999,
-                 0.38971143170299799]},
- 6: {'points': [[-0.34171005235065099, -0.19728639070945],
-                [0.34171005235065099, -0.19728639070944901],
-                [0.0, 0.39457278141889901],
-                [0.0, -0.50854615859082597],
-                [0.44041389233664502, 0.25427307929541298],
-                [-0.44041389233664502, 0.25427307929541298],
-                [-0.69739024379082304, -0.54379745836573701],
-                [0.81963753535355, -0.33205893829140698],
-                [-0.122247291562727, 0.87585639665714399],
-                [0.69739024379082304, -0.54379745836573701],
-                [0.122247291562728, 0.87585639665714499],
-                [-0.81963753535355, -0.33205893829140698]],
-     'weights': [0.29675767605247,
-                 0.29675767605247,
-                 0.29675767605247,
-                 0.13983034892552501,
-                 0.13983034892552501,
-                 0.13983034892552501,
-                 0.070381122105815805,
-                 0.070381122105815805,
-                 0.070381122105815805,
-                 0.070381122105815805,
-                 0.070381122105815805,
-                 0.070381122105815805]},
- 7: {'points': [[0.0, -0.48449728984184898],
-                [0.41958696106775301, 0.24224864492092399],
-                [-0.41958696106775301, 0.24224864492092499],
-                [-0.82660707983647996, -0.47724182005764298],
-                [0.82660707983648096, -0.47724182005764199],
-                [0.0, 0.95448364011528597],
-                [-0.434350770138343, -0.49599375367952703],
-                [0.64671857587404302, -0.128161924253377],
-                [-0.21236780573569999, 0.62415567793290405],
-                [0.434350770138343, -0.49599375367952703],
-                [0.21236780573569999, 0.62415567793290405],
-                [-0.64671857587404302, -0.128161924253377],
-                [-0.27500918080825798, -0.158776624569266],
-                [0.27500918080825798, -0.158776624569266],
-                [0.0, 0.317553249138532]],
-     'weights': [0.092111905258839805,
-                 0.092111905258839805,
-                 0.092111905258839805,
-                 0.070872350075267099,
-                 0.070872350075267099,
-                 0.070872350075267099,
-                 0.096569696969135699,
-                 0.096569696969135699,
-                 0.096569696969135699,
-                 0.096569696969135699,
-                 0.096569696969135699,
-                 0.096569696969135699,
-                 0.22122661991724701,
-                 0.22122661991724701,
-                 0.22122661991724701]},
- 8: {'points': [[-0.48829207674471897, -0.28191556195172501],
-                [0.48829207674471897, -0.28191556195172501],
-                [0.0, 0.56383112390345003],
-                [0.0, -0.43633565854637002],
-                [0.37787776487816899, 0.21816782927318501],
-                [-0.37787776487816899, 0.21816782927318601],
-                [0.0, 2.2204460492503101e-16],
-                [-0.84835831504890702, -0.489799901562744],
-                [0.84835831504890702, -0.489799901562744],
-                [0.0, 0.979599803125488],
-                [-0.46537956332076602, -0.56281008819734801],
-                [0.72009761554544705, -0.12162548013921801],
-                [-0.25471805222468002, 0.68443556833656705],
-                [0.46537956332076602, -0.56281008819734801],
-                [0.25471805222468102, 0.68443556833656605],
-                [-0.72009761554544705, -0.12162548013921801]],
-     'weights': [0.17877772998979499,
-                 0.17877772998979499,
-                 0.17877772998979499,
-                 0.164703541925695,
-                 0.164703541925695,
-                 0.164703541925695,
-                 0.24996196482310501,
-                 0.056219767020732697,
-                 0.056219767020732697,
-                 0.056219767020732697,
-                 0.047164287656184398,
-                 0.047164287656184398,
-                 0.047164287656184398,
-                 0.047164287656184398,
-                 0.047164287656184398,
-                 0.047164287656184398]},
- 9: {'points': [[0.0, -0.54160946728182002],
-                [0.46904755759621303, 0.27080473364091001],
-                [-0.46904755759621303, 0.27080473364091101],
-                [0.0, 2.2204460492503101e-16],
-                [-0.43538939314290198, -0.25137218333336198],
-                [0.43538939314290198, -0.25137218333336198],
-                [0.0, 0.50274436666672495],
-                [-0.51923560962373205, -0.51354426784066498],
-                [0.70436018672976197, -0.192899094563319],
-                [-0.185124577106029, 0.70644336240398498],
-                [0.51923560962373205, -0.51354426784066498],
-                [0.18512457710603, 0.70644336240398498],
-                [-0.70436018672976197, -0.192899094563319],
-                [0.0, -0.35942222147133202],
-                [0.31126877447881002, 0.17971111073566601],
-                [-0.31126877447881002, 0.17971111073566601],
-                [-0.86581145981664198, -0.49987647939260099],
-                [0.86581145981664198, -0.49987647939260099],
-                [-1.11022302462516e-16, 0.99975295878520298]],
-     'weights': [0.054273292833344901,
-                 0.054273292833344901,
-                 0.054273292833344901,
-                 0.16824413439546801,
-                 0.13795393052991001,
-                 0.13795393052991001,
-                 0.13795393052991001,
-                 0.074969289332873404,
-                 0.074969289332873404,
-                 0.074969289332873404,
-                 0.074969289332873404,
-                 0.074969289332873404,
-                 0.074969289332873404,
-                 0.13480125524841899,
-                 0.13480125524841899,
-                 0.13480125524841899,
-                 0.044301833780382799,
-                 0.044301833780382799,
-                 0.044301833780382799]},
- 10: {'points': [[0.0, -0.56063064349133296],
-                 [0.485520379403511, 0.28031532174566698],
-                 [-0.485520379403511, 0.28031532174566698],
-                 [-0.94258175427147595, -0.54419982956186697],
-                 [0.94258175427147595, -0.54419982956186597],
-                 [0.0, 1.0883996591237299],
-                 [-0.69780686931593405, -0.51720719429149498],
-                 [0.79681800393447599, -0.34571487861713901],
-                 [-0.099011134618541399, 0.86292207290863499],
-                 [0.69780686931593405, -0.51720719429149498],
-                 [0.099011134618541802, 0.86292207290863499],
-                 [-0.79681800393447599, -0.34571487861713901],
-                 [0.0, 2.2204460492503101e-16],
-                 [-0.30903100009613399, -0.51225507594767405],
-                 [0.59814140903627999, -0.0115011586663268],
-                 [-0.289110408940145, 0.523756234614001],
-                 [0.30903100009613399, -0.51225507594767405],
-                 [0.289110408940145, 0.523756234614001],
-                 [-0.59814140903627999, -0.011501158666326399],
-                 [-0.44654496194426002, -0.25781285398379],
-                 [0.44654496194426102, -0.25781285398379],
-                 [0.0, 0.51562570796758],
-                 [0.0, -0.32874839651011201],
-                 [0.28470446283115702, 0.164374198255056],
-                 [-0.28470446283115602, 0.164374198255056]],
-      'weights': [0.0169612642809767,
-                  0.0169612642809767,
-                  0.0169612642809767,
-                  0.011059766611144399,
-                  0.011059766611144399,
-                  0.011059766611144399,
-                  0.050164142997470303,
-                  0.050164142997470303,
-                  0.050164142997470303,
-                  0.050164142997470303,
-                  0.050164142997470303,
-                  0.050164142997470303,
-                  0.144825210684212,
-                  0.0670980012538894,
-                  0.0670980012538894,
-                  0.0670980012538894,
-                  0.0670980012538894,
-                  0.0670980012538894,
-                  0.0670980012538894,
-                  0.13619768439139801,
-                  0.13619768439139801,
-                  0.13619768439139801,
-                  0.13033219517531699,
-                  0.13033219517531699,
-                  0.13033219517531699]},
- 11: {'points': [[-0.90745931309323602, -0.52392187869301299],
-                 [0.90745931309323602, -0.52392187869301199],
-                 [0.0, 1.04784375738603],
-                 [0.0, -0.57312463741413],
-                 [0.49634049553538201, 0.286562318707065],
-                 [-0.49634049553538201, 0.286562318707066],
-                 [-0.66702609775505695, -0.55246647968395701],
-                 [0.81196305502319499, -0.30142830580110302],
-                 [-0.14493695726813799, 0.85389478548506104],
-                 [0.66702609775505695, -0.55246647968395701],
-                 [0.14493695726813799, 0.85389478548506104],
-                 [-0.81196305502319499, -0.30142830580110302],
-                 [0.0, 2.2204460492503101e-16],
-                 [-0.66037651813991805, -0.38126856051459002],
-                 [0.66037651813991805, -0.38126856051458902],
-                 [0.0, 0.76253712102917903],
-                 [0.0, -0.35791680916635199],
-                 [0.309965049179528, 0.178958404583176],
-                 [-0.309965049179528, 0.17895840458317699],
-                 [-0.35654962414219199, -0.20585402147795401],
-                 [0.35654962414219199, -0.20585402147795401],
-                 [0.0, 0.41170804295590901],
-                 [-0.33107350040092298, -0.49479368349849501],
-                 [0.59404064974223503, -0.039321220117789303],
-                 [-0.26296714934131199, 0.534114903616285],
-                 [0.33107350040092298, -0.49479368349849501],
-                 [0.26296714934131199, 0.534114903616285],
-                 [-0.59404064974223503, -0.039321220117788797]],
-      'weights': [0.0212164046756247,
-                  0.0212164046756247,
-                  0.0212164046756247,
-                  0.0215908652668995,
-                  0.0215908652668995,
-                  0.0215908652668995,
-                  0.025214543258536001,
-                  0.025214543258536001,
-                  0.025214543258536001,
-                  0.025214543258536001,
-                  0.025214543258536001,
-                  0.025214543258536001,
-                  0.14106711134588801,
-                  0.069505886673672301,
-                  0.069505886673672301,
-                  0.069505886673672301,
-                  0.109283524278008,
-                  0.109283524278008,
-                  0.109283524278008,
-                  0.117511173657065,
-                  0.117511173657065,
-                  0.117511173657065,
-                  0.070395478836327893,
-                  0.070395478836327893,
-                  0.070395478836327893,
-                  0.070395478836327893,
-                  0.070395478836327893,
-                  0.070395478836327893]},
- 12: {'points': [[-0.18561247895522201, -0.107163414689751],
-                 [0.18561247895522201, -0.107163414689751],
-                 [0.0, 0.21432682937950201],
-                 [-0.67222651702193703, -0.38811016055901998],
-                 [0.67222651702193703, -0.38811016055901998],
-                 [0.0, 0.77622032111803996],
-                 [0.0, -0.369890934579921],
-                 [0.320334945975779, 0.184945467289961],
-                 [-0.320334945975779, 0.184945467289961],
-                 [-0.37279552304503899, -0.37591965438942698],
-                 [0.51195373200562999, -0.13489056617939699],
-                 [-0.139158208960591, 0.51081022056882497],
-                 [0.37279552304503899, -0.37591965438942698],
-                 [0.139158208960591, 0.51081022056882497],
-                 [-0.51195373200562899, -0.13489056617939699],
-                 [-0.724058075276651, -0.54031470967359196],
-                 [0.82995530225406899, -0.35689533216804897],
-                 [-0.105897226977418, 0.89721004184164099],
-                 [0.724058075276651, -0.54031470967359196],
-                 [0.105897226977419, 0.89721004184164099],
-                 [-0.82995530225406999, -0.35689533216804797],
-                 [-0.39365448416805099, -0.53745394007281799],
-                 [0.66227600755112503, -0.072187813566782402],
-                 [-0.26862152338307399, 0.60964175363960005],
-                 [0.39365448416805099, -0.53745394007281799],
-                 [0.26862152338307399, 0.60964175363960005],
-                 [-0.66227600755112503, -0.072187813566781903],
-                 [0.0, -0.53648686378750898],
-                 [0.46461125283662502, 0.26824343189375499],
-                 [-0.46461125283662502, 0.26824343189375499],
-                 [-0.92606090969099297, -0.53466151549608498],
-                 [0.92606090969099297, -0.53466151549608398],
-                 [0.0, 1.06932303099217]],
-      'weights': [0.10832455882230101,
-                  0.10832455882230101,
-                  0.10832455882230101,
-                  0.049339289490348402,
-                  0.049339289490348402,
-                  0.049339289490348402,
-                  0.086461092324641595,
-                  0.086461092324641595,
-                  0.086461092324641595,
-                  0.074871990135361902,
-                  0.074871990135361902,
-                  0.074871990135361902,
-                  0.074871990135361902,
-                  0.074871990135361902,
-                  0.074871990135361902,
-                  0.026125695927505199,
-                  0.026125695927505199,
-                  0.026125695927505199,
-                  0.026125695927505199,
-                  0.026125695927505199,
-                  0.026125695927505199,
-                  0.037730276057865497,
-                  0.037730276057865497,
-                  0.037730276057865497,
-                  0.037730276057865497,
-                  0.037730276057865497,
-                  0.037730276057865497,
-                  0.042031396496122198,
-                  0.042031396496122198,
-                  0.042031396496122198,
-                  0.0137380078147475,
-                  0.0137380078147475,
-                  0.0137380078147475]},
- 13: {'points': [[0.0, -0.56396461592102098],
-                 [0.48840768422313802, 0.28198230796051099],
-                 [-0.48840768422313802, 0.28198230796051099],
-                 [0.0, -0.472071681932134],
-                 [0.40882606896047602, 0.236035840966067],
-                 [-0.40882606896047602, 0.236035840966068],
-                 [-0.30666914515275301, -0.177055513506094],
-                 [0.30666914515275301, -0.177055513506094],
-                 [0.0, 0.35411102701218899],
-                 [-0.39685461846296799, -0.54446208086261505],
-                 [0.66994530265584595, -0.071455140766803996],
-                 [-0.27309068419287702, 0.61591722162941898],
-                 [0.39685461846296799, -0.54446208086261505],
-                 [0.27309068419287802, 0.61591722162941898],
-                 [-0.66994530265584595, -0.071455140766803496],
-                 [0.0, 2.2204460492503101e-16],
-                 [-0.36877346231328101, -0.408066497653155],
-                 [0.53778268455761602, -0.115333937778267],
-                 [-0.16900922224433401, 0.52340043543142301],
-                 [0.36877346231328101, -0.408066497653155],
-                 [0.16900922224433501, 0.52340043543142201],
-                 [-0.53778268455761602, -0.115333937778267],
-                 [0.0, -0.28109188226279302],
-                 [0.243432710837164, 0.14054594113139701],
-                 [-0.243432710837164, 0.14054594113139701],
-                 [-0.65932026228359997, -0.38065873091161201],
-                 [0.65932026228359997, -0.38065873091161101],
-                 [0.0, 0.76131746182322302],
-                 [-0.72443410422579602, -0.53930344496737104],
-                 [0.82926753580310397, -0.35772661514367798],
-                 [-0.104833431577308, 0.89703006011104902],
-                 [0.72443410422579602, -0.53930344496737104],
-                 [0.104833431577308, 0.89703006011104902],
-                 [-0.82926753580310397, -0.35772661514367698],
-                 [-0.92531220552635096, -0.534229250945085],
-                 [0.92531220552635096, -0.534229250945085],
-                 [0.0, 1.06845850189017]],
-      'weights': [0.0172191421596227,
-                  0.0172191421596227,
-                  0.0172191421596227,
-                  0.056778775992838801,
-                  0.056778775992838801,
-                  0.056778775992838801,
-                  0.079782433733739999,
-                  0.079782433733739999,
-                  0.079782433733739999,
-                  0.0313942845677408,
-                  0.0313942845677408,
-                  0.0313942845677408,
-                  0.0313942845677408,
-                  0.0313942845677408,
-                  0.0313942845677408,
-                  0.089413046843727695,
-                  0.064453006161221002,
-                  0.064453006161221002,
-                  0.064453006161221002,
-                  0.064453006161221002,
-                  0.064453006161221002,
-                  0.064453006161221002,
-                  0.081314754746803095,
-                  0.081314754746803095,
-                  0.081314754746803095,
-                  0.053525735805294898,
-                  0.053525735805294898,
-                  0.053525735805294898,
-                  0.026661583972911299,
-                  0.026661583972911299,
-                  0.026661583972911299,
-                  0.026661583972911299,
-                  0.026661583972911299,
-                  0.026661583972911299,
-                  0.013907328399670699,
-                  0.013907328399670699,
-                  0.013907328399670699]},
- 14: {'points': [[0.0, -0.29206320844176897],
-                 [0.25293415802136199, 0.14603160422088499],
-                 [-0.25293415802136199, 0.14603160422088499],
-                 [-0.38860728567183001, -0.55198100751730805],
-                 [0.67233321775243304, -0.060553277728866997],
-                 [-0.28372593208060298, 0.61253428524617604],
-                 [0.38860728567183001, -0.55198100751730805],
-                 [0.28372593208060298, 0.61253428524617604],
-                 [-0.67233321775243304, -0.060553277728866699],
-                 [-0.81460035072738202, -0.47030973177441798],
-                 [0.81460035072738202, -0.47030973177441698],
-                 [-2.2204460492503101e-16, 0.94061946354883597],
-                 [-0.233360831050338, -0.41641460445461098],
-                 [0.47730604148971101, 0.0061108942894646497],
-                 [-0.24394521043937301, 0.410303710165147],
-                 [0.233360831050338, -0.41641460445461098],
-                 [0.24394521043937301, 0.410303710165147],
-                 [-0.47730604148971101, 0.00611089428946487],
-                 [-0.179567415073484, -0.103673295430361],
-                 [0.179567415073484, -0.103673295430361],
-                 [0.0, 0.20734659086072299],
-                 [-0.46838340276236901, -0.27042128366880702],
-                 [0.46838340276236901, -0.27042128366880702],
-                 [0.0, 0.54084256733761404],
-                 [-0.94182711625389703, -0.54376413909927701],
-                 [0.94182711625389703, -0.54376413909927601],
-                 [0.0, 1.08752827819855],
-                 [0.0, -0.53912013325044394],
-                 [0.46689173108653598, 0.26956006662522197],
-                 [-0.46689173108653598, 0.26956006662522197],
-                 [-0.598341866953641, -0.47840728699646101],
-                 [0.71348379737134804, -0.27897561343143101],
-                 [-0.115141930417707, 0.75738290042789302],
-                 [0.598341866953641, -0.47840728699646101],
-                 [0.115141930417708, 0.75738290042789302],
-                 [-0.71348379737134804, -0.27897561343143101],
-                 [-0.76078267367321395, -0.57515345557307995],
-                 [0.87848884043729902, -0.37128039437351001],
-                 [-0.11770616676408401, 0.94643384994659097],
-                 [0.76078267367321395, -0.57515345557307995],
-                 [0.117706166764085, 0.94643384994659097],
-                 [-0.87848884043729902, -0.37128039437351001]],
-      'weights': [0.056791094234956201,
-                  0.056791094234956201,
-                  0.056791094234956201,
-                  0.025004419126359399,
-                  0.025004419126359399,
-                  0.025004419126359399,
-                  0.025004419126359399,
-                  0.025004419126359399,
-                  0.025004419126359399,
-                  0.024999901169243301,
-                  0.024999901169243301,
-                  0.024999901169243301,
-                  0.066807816407880194,
-                  0.066807816407880194,
-                  0.066807816407880194,
-                  0.066807816407880194,
-                  0.066807816407880194,
-                  0.066807816407880194,
-                  0.089675379523009899,
-                  0.089675379523009899,
-                  0.089675379523009899,
-                  0.073027745871103306,
-                  0.073027745871103306,
-                  0.073027745871103306,
-                  0.0085275851855245895,
-                  0.0085275851855245895,
-                  0.0085275851855245895,
-                  0.0379034747834186,
-                  0.0379034747834186,
-                  0.0379034747834186,
-                  0.042722337771115601,
-                  0.042722337771115601,
-                  0.042722337771115601,
-                  0.042722337771115601,
-                  0.042722337771115601,
-                  0.042722337771115601,
-                  0.0086779709058299702,
-                  0.0086779709058299702,
-                  0.0086779709058299702,
-                  0.0086779709058299702,
-                  0.0086779709058299702,
-                  0.0086779709058299702]},
- 15: {'points': [[-0.61006531020076604, -0.35222137106766499],
-                 [0.61006531020076604, -0.35222137106766499],
-                 [0.0, 0.70444274213532998],
-                 [0.0, 2.2204460492503101e-16],
-                 [0.0, -0.43905276476834398],
-                 [0.380230847891179, 0.21952638238417199],
-                 [-0.380230847891179, 0.21952638238417199],
-                 [-0.55076221170342599, -0.43082877955573501],
-                 [0.64848977362842497, -0.26155967700180199],
-                 [-0.097727561924999207, 0.692388456557537],
-                 [0.55076221170342599, -0.43082877955573501],
-                 [0.097727561924999803, 0.692388456557538],
-                 [-0.64848977362842497, -0.26155967700180199],
-                 [-0.68357214208317696, -0.54959053538220703],
-                 [0.81774543636206998, -0.317195572672274],
-                 [-0.13417329427889299, 0.86678610805448097],
-                 [0.68357214208317696, -0.54959053538220703],
-                 [0.13417329427889399, 0.86678610805448097],
-                 [-0.81774543636206998, -0.317195572672273],
-                 [-0.25612692724233199, -0.408214741518866],
-                 [0.48158779997580298, -0.017705054825675099],
-                 [-0.22546087273347001, 0.42591979634454202],
-                 [0.25612692724233199, -0.408214741518866],
-                 [0.22546087273347001, 0.42591979634454202],
-                 [-0.48158779997580298, -0.0177050548256747],
-                 [0.0, -0.54854909315008704],
-                 [0.47505744989089199, 0.27427454657504402],
-                 [-0.47505744989089099, 0.27427454657504402],
-                 [-0.33540297761457399, -0.19364499941277599],
-                 [0.33540297761457399, -0.19364499941277599],
-                 [0.0, 0.38728999882555298],
-                 [0.0, -0.22031826248214001],
-                 [0.19080121222718199, 0.11015913124107],
-                 [-0.19080121222718199, 0.110159131241071],
-                 [-0.365650385128021, -0.54538656727512602],
-                 [0.65514381470706096, -0.0439692387868666],
-                 [-0.28949342957903901, 0.589355806061994],
-                 [0.365650385128021, -0.54538656727512602],
-                 [0.28949342957904001, 0.589355806061994],
-                 [-0.65514381470706096, -0.043969238786866302],
-                 [-0.83097424691169897, -0.47976320514411702],
-                 [0.83097424691169997, -0.47976320514411602],
-                 [0.0, 0.95952641028823304],
-                 [-0.92281600612376802, -0.57542156951901402],
-                 [0.95973770015086302, -0.51147131956257197],
-                 [-0.036921694027095102, 1.0868928890815901],
-                 [0.92281600612376802, -0.57542156951901402],
-                 [0.036921694027095803, 1.0868928890815901],
-                 [-0.95973770015086302, -0.51147131956257197]],
-      'weights': [0.0128128528933213,
-                  0.0128128528933213,
-                  0.0128128528933213,
-                  0.051494597534008597,
-                  0.0374020574490216,
-                  0.0374020574490216,
-                  0.0374020574490216,
-                  0.041967606280213697,
-                  0.041967606280213697,
-                  0.041967606280213697,
-                  0.041967606280213697,
-                  0.041967606280213697,
-                  0.041967606280213697,
-                  0.0194483399386624,
-                  0.0194483399386624,
-                  0.0194483399386624,
-                  0.0194483399386624,
-                  0.0194483399386624,
-                  0.0194483399386624,
-                  0.053823860711329399,
-                  0.053823860711329399,
-                  0.053823860711329399,
-                  0.053823860711329399,
-                  0.053823860711329399,
-                  0.053823860711329399,
-                  0.027422307037708898,
-                  0.027422307037708898,
-                  0.027422307037708898,
-                  0.080171931278679998,
-                  0.080171931278679998,
-                  0.080171931278679998,
-                  0.080256377911185395,
-                  0.080256377911185395,
-                  0.080256377911185395,
-                  0.028469307056700099,
-                  0.028469307056700099,
-                  0.028469307056700099,
-                  0.028469307056700099,
-                  0.028469307056700099,
-                  0.028469307056700099,
-                  0.026127075802302401,
-                  0.026127075802302401,
-                  0.026127075802302401,
-                  0.0042872864994628404,
-                  0.0042872864994628404,
-                  0.0042872864994628404,
-                  0.0042872864994628404,
-                  0.0042872864994628404,
-                  0.0042872864994628404]},
- 16: {'points': [[-0.162796073942169, -0.56061007710965005],
-                 [0.56690060536559495, 0.13931950288453601],
-                 [-0.40410453142342501, 0.42129057422511401],
-                 [0.162796073942169, -0.56061007710965005],
-                 [0.40410453142342501, 0.42129057422511401],
-                 [-0.56690060536559395, 0.13931950288453701],
-                 [-0.36133516018585399, -0.52485883552713897],
-                 [0.63520866506014795, -0.050496010237899798],
-                 [-0.27387350487429302, 0.57535484576503904],
-                 [0.36133516018585399, -0.52485883552713897],
-                 [0.27387350487429402, 0.57535484576503904],
-                 [-0.63520866506014795, -0.0504960102378995],
-                 [-0.799976583279285, -0.46186669570169298],
-                 [0.799976583279285, -0.46186669570169198],
-                 [0.0, 0.92373339140338495],
-                 [-0.809968849178485, -0.55862165096055505],
-                 [0.88876496542508698, -0.42214277418233698],
-                 [-0.078796116246601794, 0.98076442514289197],
-                 [0.809968849178484, -0.55862165096055505],
-                 [0.078796116246602405, 0.98076442514289197],
-                 [-0.88876496542508698, -0.42214277418233598],
-                 [-0.30011609466308597, -0.39262157635321698],
-                 [0.49007830652731998, -0.063597373886199099],
-                 [-0.18996221186423401, 0.456218950239416],
-                 [0.30011609466308597, -0.39262157635321698],
-                 [0.18996221186423501, 0.456218950239416],
-                 [-0.49007830652731998, -0.063597373886198696],
-                 [-0.27603495789586502, -0.15936885724692501],
-                 [0.27603495789586502, -0.15936885724692401],
-                 [0.0, 0.31873771449384902],
-                 [0.0, -0.27527401254502898],
-                 [0.23839428786567099, 0.13763700627251499],
-                 [-0.23839428786567099, 0.13763700627251499],
-                 [-0.60911897435540696, -0.48840198582588101],
-                 [0.727528014161684, -0.28331151280596401],
-                 [-0.118409039806276, 0.77171349863184602],
-                 [0.60911897435540796, -0.48840198582588101],
-                 [0.118409039806277, 0.77171349863184602],
-                 [-0.727528014161684, -0.28331151280596401],
-                 [-0.54980879023889395, -0.31743225304724898],
-                 [0.54980879023889395, -0.31743225304724798],
-                 [0.0, 0.63486450609449696],
-                 [-0.56820549744094995, -0.57094697658781501],
-                 [0.77855733465944099, -0.20660690705992901],
-                 [-0.21035183721849099, 0.77755388364774403],
-                 [0.56820549744094995, -0.57094697658781501],
-                 [0.21035183721849199, 0.77755388364774403],
-                 [-0.77855733465944199, -0.20660690705992901],
-                 [0.0, -0.47186155418111703],
-                 [0.408644092990055, 0.23593077709055901],
-                 [-0.408644092990055, 0.23593077709055901],
-                 [0.0, 2.2204460492503101e-16],
-                 [-0.94887511178284401, -0.54783330121516205],
-                 [0.948875111782845, -0.54783330121516105],
-                 [0.0, 1.0956666024303201]],
-      'weights': [0.014172004396406999,
-                  0.014172004396406999,
-                  0.014172004396406999,
-                  0.014172004396406999,
-                  0.014172004396406999,
-                  0.014172004396406999,
-                  0.024220318012982099,
-                  0.024220318012982099,
-                  0.024220318012982099,
-                  0.024220318012982099,
-                  0.024220318012982099,
-                  0.024220318012982099,
-                  0.0215214684371785,
-                  0.0215214684371785,
-                  0.0215214684371785,
-                  0.00996253102743078,
-                  0.00996253102743078,
-                  0.00996253102743078,
-                  0.00996253102743078,
-                  0.00996253102743078,
-                  0.00996253102743078,
-                  0.054812586692653598,
-                  0.054812586692653598,
-                  0.054812586692653598,
-                  0.054812586692653598,
-                  0.054812586692653598,
-                  0.054812586692653598,
-                  0.071332851593884,
-                  0.071332851593884,
-                  0.071332851593884,
-                  0.070988483030141505,
-                  0.070988483030141505,
-                  0.070988483030141505,
-                  0.0305760332837141,
-                  0.0305760332837141,
-                  0.0305760332837141,
-                  0.0305760332837141,
-                  0.0305760332837141,
-                  0.0305760332837141,
-                  0.049854478708652401,
-                  0.049854478708652401,
-                  0.049854478708652401,
-                  0.0079928786492233905,
-                  0.0079928786492233905,
-                  0.0079928786492233905,
-                  0.0079928786492233905,
-                  0.0079928786492233905,
-                  0.0079928786492233905,
-                  0.046927612081552099,
-                  0.046927612081552099,
-                  0.046927612081552099,
-                  0.080069089391916801,
-                  0.0065629747494232397,
-                  0.0065629747494232397,
-                  0.0065629747494232397]},
- 17: {'points': [[0.0, -0.29018817691328502],
-                 [0.251310333084798, 0.14509408845664301],
-                 [-0.251310333084797, 0.14509408845664301],
-                 [-0.84341388249881499, -0.55730147641877004],
-                 [0.90434417739463602, -0.451767109939052],
-                 [-0.060930294895821198, 1.0090685863578199],
-                 [0.84341388249881399, -0.55730147641877004],
-                 [0.060930294895821899, 1.0090685863578199],
-                 [-0.90434417739463602, -0.451767109939052],
-                 [-0.45892565120088802, -0.26496084825885702],
-                 [0.45892565120088802, -0.26496084825885702],
-                 [0.0, 0.52992169651771404],
-                 [-0.15581940864945501, -0.55443580380164503],
-                 [0.55806519518459696, 0.14227433560772601],
-                 [-0.40224578653514198, 0.41216146819392002],
-                 [0.15581940864945501, -0.55443580380164503],
-                 [0.40224578653514198, 0.41216146819392002],
-                 [-0.55806519518459696, 0.14227433560772601],
-                 [-0.44328038905528799, -0.55459827350347102],
-                 [0.70193638827663996, -0.106592941169593],
-                 [-0.25865599922135202, 0.66119121467306397],
-                 [0.44328038905528799, -0.55459827350347102],
-                 [0.25865599922135202, 0.66119121467306397],
-                 [-0.70193638827663996, -0.106592941169593],
-                 [-0.24405663711918901, -0.30454277894986898],
-                 [0.38577010166928999, -0.0590878582324839],
-                 [-0.1417134645501, 0.363630637182353],
-                 [0.24405663711918901, -0.30454277894986898],
-                 [0.1417134645501, 0.363630637182353],
-                 [-0.38577010166928999, -0.059087858232483498],
-                 [-0.14288049269024, -0.082492090916656394],
-                 [0.14288049269024, -0.082492090916656297],
-                 [0.0, 0.16498418183331301],
-                 [-0.32008743864026601, -0.460697724865201],
-                 [0.55901965251909103, -0.046854990862162202],
-                 [-0.23893221387882499, 0.50755271572736405],
-                 [0.32008743864026601, -0.460697724865201],
-                 [0.23893221387882499, 0.50755271572736405],
-                 [-0.55901965251909103, -0.046854990862161799],
-                 [-0.584512632441199, -0.442176970183767],
-                 [0.67519280536817605, -0.28511430343511102],
-                 [-0.090680172926976596, 0.72729127361887802],
-                 [0.584512632441199, -0.442176970183767],
-                 [0.090680172926977096, 0.72729127361887802],
-                 [-0.67519280536817605, -0.28511430343511002],
-                 [-0.80003780956120896, -0.46190204471204299],
-                 [0.80003780956120896, -0.46190204471204199],
-                 [0.0, 0.92380408942408498],
-                 [-0.66559778269229497, -0.54960689880096802],
-                 [0.80877242780296899, -0.30162113911363803],
-                 [-0.14317464511067299, 0.85122803791460599],
-                 [0.66559778269229497, -0.54960689880096802],
-                 [0.14317464511067399, 0.85122803791460599],
-                 [-0.80877242780296899, -0.30162113911363803],
-                 [-0.95573352501773801, -0.55179300794254105],
-                 [0.95573352501773801, -0.55179300794254105],
-                 [0.0, 1.1035860158850801],
-                 [0.0, -0.458177800700447],
-                 [0.39679361485667097, 0.229088900350224],
-                 [-0.39679361485667097, 0.229088900350224]],
-      'weights': [0.047303912348453603,
-                  0.047303912348453603,
-                  0.047303912348453603,
-                  0.0079403243514037103,
-                  0.0079403243514037103,
-                  0.0079403243514037103,
-                  0.0079403243514037103,
-                  0.0079403243514037103,
-                  0.0079403243514037103,
-                  0.045574813059238099,
-                  0.045574813059238099,
-                  0.045574813059238099,
-                  0.0180106263229684,
-                  0.0180106263229684,
-                  0.0180106263229684,
-                  0.0180106263229684,
-                  0.0180106263229684,
-                  0.0180106263229684,
-                  0.015055357146020999,
-                  0.015055357146020999,
-                  0.015055357146020999,
-                  0.015055357146020999,
-                  0.015055357146020999,
-                  0.015055357146020999,
-                  0.045330585836691001,
-                  0.045330585836691001,
-                  0.045330585836691001,
-                  0.045330585836691001,
-                  0.045330585836691001,
-                  0.045330585836691001,
-                  0.065326439018958404,
-                  0.065326439018958404,
-                  0.065326439018958404,
-                  0.038949964599921498,
-                  0.038949964599921498,
-                  0.038949964599921498,
-                  0.038949964599921498,
-                  0.038949964599921498,
-                  0.038949964599921498,
-                  0.035607324387862099,
-                  0.035607324387862099,
-                  0.035607324387862099,
-                  0.035607324387862099,
-                  0.035607324387862099,
-                  0.035607324387862099,
-                  0.0215796224011344,
-                  0.0215796224011344,
-                  0.0215796224011344,
-                  0.0138188213147073,
-                  0.0138188213147073,
-                  0.0138188213147073,
-                  0.0138188213147073,
-                  0.0138188213147073,
-                  0.0138188213147073,
-                  0.0048045142189525603,
-                  0.0048045142189525603,
-                  0.0048045142189525603,
-                  0.043334960223738901,
-                  0.043334960223738901,
-                  0.043334960223738901]},
- 18: {'points': [[-0.13948489081933199, -0.420726040917827],
-                 [0.43410188487815499, 0.089565561565273094],
-                 [-0.29461699405882302, 0.33116047935255399],
-                 [0.13948489081933199, -0.420726040917827],
-                 [0.29461699405882302, 0.33116047935255399],
-                 [-0.43410188487815499, 0.089565561565273399],
-                 [0.0, -0.49046440452670897],
-                 [0.42475463397213697, 0.24523220226335499],
-                 [-0.42475463397213697, 0.24523220226335499],
-                 [-0.54508447908218505, -0.31470467072918701],
-                 [0.54508447908218505, -0.31470467072918601],
-                 [-1.11022302462516e-16, 0.62940934145837402],
-                 [-0.89294878385120102, -0.55570148308783895],
-                 [0.92772599320035698, -0.49546558954964098],
-                 [-0.034777209349155798, 1.05116707263748],
-                 [0.89294878385120102, -0.55570148308783895],
-                 [0.034777209349156499, 1.05116707263748],
-                 [-0.92772599320035798, -0.49546558954963998],
-                 [0.0, 2.2204460492503101e-16],
-                 [-0.34186434923523401, -0.48379919937747201],
-                 [0.58991457160908101, -0.054163611397211799],
-                 [-0.248050222373846, 0.537962810774685],
-                 [0.34186434923523401, -0.48379919937747201],
-                 [0.248050222373847, 0.537962810774684],
-                 [-0.58991457160908101, -0.054163611397211403],
-                 [-0.47648266163227498, -0.55915504286023199],
-                 [0.72248380258727396, -0.13306856800625899],
-                 [-0.246001140954999, 0.69222361086649098],
-                 [0.47648266163227498, -0.55915504286023199],
-                 [0.246001140955, 0.69222361086649098],
-                 [-0.72248380258727496, -0.13306856800625899],
-                 [0.0, -0.26927767315911699],
-                 [0.23320130562775801, 0.134638836579559],
-                 [-0.23320130562775801, 0.134638836579559],
-                 [-0.57691929083982096, -0.46282281236308997],
-                 [0.68927595837730504, -0.26821535561904303],
-                 [-0.112356667537484, 0.73103816798213395],
-                 [0.57691929083982096, -0.46282281236308997],
-                 [0.11235666753748499, 0.73103816798213395],
-                 [-0.68927595837730604, -0.26821535561904303],
-                 [-0.203156170283877, -0.11729226960093],
-                 [0.203156170283877, -0.11729226960093],
-                 [0.0, 0.23458453920186001],
-                 [-0.98872316697679496, -0.57083958660807199],
-                 [0.98872316697679496, -0.57083958660807199],
-                 [0.0, 1.14167917321614],
-                 [-0.31378647708219898, -0.31915880712448202],
-                 [0.43329287335243799, -0.112167656954966],
-                 [-0.11950639627024, 0.43132646407944902],
-                 [0.31378647708219898, -0.31915880712448202],
-                 [0.11950639627024, 0.43132646407944902],
-                 [-0.43329287335243799, -0.112167656954966],
-                 [-0.166176837976096, -0.55709943481991497],
-                 [0.56555068197604697, 0.134636354202088],
-                 [-0.39937384399995102, 0.422463080617828],
-                 [0.166176837976096, -0.55709943481991497],
-                 [0.39937384399995102, 0.422463080617827],
-                 [-0.56555068197604697, 0.134636354202088],
-                 [-0.72011081467827898, -0.55252734012256599],
-                 [0.83855812017072695, -0.34737058899001499],
-                 [-0.118447305492447, 0.89989792911258104],
-                 [0.72011081467827998, -0.55252734012256599],
-                 [0.118447305492448, 0.89989792911258204],
-                 [-0.83855812017072695, -0.347370588990014],
-                 [-0.78268388329800098, -0.45188275071248302],
-                 [0.78268388329800098, -0.45188275071248202],
-                 [0.0, 0.90376550142496603]],
-      'weights': [0.0265493219845,
-                  0.0265493219845,
-                  0.0265493219845,
-                  0.0265493219845,
-                  0.0265493219845,
-                  0.0265493219845,
-                  0.022702037551893602,
-                  0.022702037551893602,
-                  0.022702037551893602,
-                  0.035192395205734299,
-                  0.035192395205734299,
-                  0.035192395205734299,
-                  0.0073049533356313902,
-                  0.0073049533356313902,
-                  0.0073049533356313902,
-                  0.0073049533356313902,
-                  0.0073049533356313902,
-                  0.0073049533356313902,
-                  0.053258001043759301,
-                  0.028346584885043699,
-                  0.028346584885043699,
-                  0.028346584885043699,
-                  0.028346584885043699,
-                  0.028346584885043699,
-                  0.028346584885043699,
-                  0.0133884674391092,
-                  0.0133884674391092,
-                  0.0133884674391092,
-                  0.0133884674391092,
-                  0.0133884674391092,
-                  0.0133884674391092,
-                  0.057975194342300203,
-                  0.057975194342300203,
-                  0.057975194342300203,
-                  0.029291843825096701,
-                  0.029291843825096701,
-                  0.029291843825096701,
-                  0.029291843825096701,
-                  0.029291843825096701,
-                  0.029291843825096701,
-                  0.053895179863138097,
-                  0.053895179863138097,
-                  0.053895179863138097,
-                  0.00092146075846558095,
-                  0.00092146075846558095,
-                  0.00092146075846558095,
-                  0.047792281325700403,
-                  0.047792281325700403,
-                  0.047792281325700403,
-                  0.047792281325700403,
-                  0.047792281325700403,
-                  0.047792281325700403,
-                  0.016603654637273601,
-                  0.016603654637273601,
-                  0.016603654637273601,
-                  0.016603654637273601,
-                  0.016603654637273601,
-                  0.016603654637273601,
-                  0.0132358212692021,
-                  0.0132358212692021,
-                  0.0132358212692021,
-                  0.0132358212692021,
-                  0.0132358212692021,
-                  0.0132358212692021,
-                  0.0238854770503928,
-                  0.0238854770503928,
-                  0.0238854770503928]},
- 19: {'points': [[-0.71015029250539596, -0.56868110833623997],
-                 [0.84756743272417201, -0.33066763964650298],
-                 [-0.13741714021877599, 0.899348747982743],
-                 [0.71015029250539596, -0.56868110833623997],
-                 [0.13741714021877699, 0.899348747982743],
-                 [-0.84756743272417201, -0.33066763964650198],
-                 [-0.842421160437689, -0.48637208374973701],
-                 [0.842421160437689, -0.48637208374973701],
-                 [0.0, 0.97274416749947401],
-                 [-0.87005513863591799, -0.56041590202911495],
-                 [0.92036197715994394, -0.47328190173734003],
-                 [-0.050306838524025101, 1.0336978037664499],
-                 [0.87005513863591899, -0.56041590202911495],
-                 [0.050306838524025697, 1.0336978037664499],
-                 [-0.92036197715994394, -0.47328190173733897],
-                 [-0.69945621064432195, -0.50955355803618796],
-                 [0.79101443117024794, -0.35097006823468901],
-                 [-0.091558220525925299, 0.86052362627087697],
-                 [0.69945621064432195, -0.50955355803618796],
-                 [0.091558220525925799, 0.86052362627087697],
-                 [-0.79101443117024794, -0.35097006823468802],
-                 [-0.24805042378404701, -0.35337391260199702],
-                 [0.430055997240055, -0.038131012115481998],
-                 [-0.18200557345600801, 0.39150492471748],
-                 [0.24805042378404701, -0.35337391260199702],
-                 [0.18200557345600801, 0.39150492471748],
-                 [-0.430055997240055, -0.038131012115481797],
-                 [-0.66565583284900398, -0.38431657428301702],
-                 [0.66565583284900398, -0.38431657428301702],
-                 [0.0, 0.76863314856603404],
-                 [-0.96508291801623203, -0.55719088250698201],
-                 [0.96508291801623203, -0.55719088250698101],
-                 [0.0, 1.11438176501396],
-                 [-0.23451360054062501, -0.13539649040075799],
-                 [0.234513600540626, -0.13539649040075799],
-                 [0.0, 0.27079298080151698],
-                 [-0.48257092691741799, -0.44820650104172199],
-                 [0.62944367950217595, -0.19381543131742701],
-                 [-0.14687275258475799, 0.64202193235914895],
-                 [0.48257092691741799, -0.44820650104172199],
-                 [0.14687275258475799, 0.64202193235914895],
-                 [-0.62944367950217595, -0.19381543131742701],
-                 [0.0, -0.24469161409484999],
-                 [0.21190915389915799, 0.122345807047425],
-                 [-0.21190915389915799, 0.122345807047425],
-                 [-0.25105983153559802, -0.50652963110043003],
-                 [0.56419744407033201, 0.035840623570545703],
-                 [-0.31313761253473399, 0.47068900752988502],
-                 [0.25105983153559802, -0.50652963110043003],
-                 [0.31313761253473399, 0.47068900752988502],
-                 [-0.56419744407033201, 0.035840623570546098],
-                 [-0.46548698176111702, -0.268749034224048],
-                 [0.46548698176111802, -0.268749034224047],
-                 [0.0, 0.537498068448096],
-                 [0.0, -0.43599548606828897],
-                 [0.37758316687048299, 0.21799774303414499],
-                 [-0.37758316687048299, 0.21799774303414499],
-                 [0.0, 2.2204460492503101e-16],
-                 [0.0, -0.55141263467657597],
-                 [0.47753734959762301, 0.27570631733828799],
-                 [-0.47753734959762301, 0.27570631733828799],
-                 [-0.50128815307877606, -0.55150176836813103],
-                 [0.72825861817823001, -0.158377390998337],
-                 [-0.22697046509945401, 0.70987915936646895],
-                 [0.50128815307877606, -0.55150176836813103],
-                 [0.22697046509945401, 0.70987915936646795],
-                 [-0.72825861817823001, -0.158377390998337],
-                 [-0.26869006747347801, -0.57376647619684396],
-                 [0.63124137796308499, 0.054190813921835702],
-                 [-0.36255131048960698, 0.51957566227500895],
-                 [0.26869006747347801, -0.57376647619684396],
-                 [0.36255131048960798, 0.51957566227500895],
-                 [-0.63124137796308499, 0.054190813921836098]],
-      'weights': [0.0050674480363308702,
-                  0.0050674480363308702,
-                  0.0050674480363308702,
-                  0.0050674480363308702,
-                  0.0050674480363308702,
-                  0.0050674480363308702,
-                  0.012313830965687,
-                  0.012313830965687,
-                  0.012313830965687,
-                  0.0057632065284463404,
-                  0.0057632065284463404,
-                  0.0057632065284463404,
-                  0.0057632065284463404,
-                  0.0057632065284463404,
-                  0.0057632065284463404,
-                  0.016793131655126699,
-                  0.016793131655126699,
-                  0.016793131655126699,
-                  0.016793131655126699,
-                  0.016793131655126699,
-                  0.016793131655126699,
-                  0.045633069062954099,
-                  0.045633069062954099,
-                  0.045633069062954099,
-                  0.045633069062954099,
-                  0.045633069062954099,
-                  0.045633069062954099,
-                  0.026387718738554899,
-                  0.026387718738554899,
-                  0.026387718738554899,
-                  0.0030574029536457699,
-                  0.0030574029536457699,
-                  0.0030574029536457699,
-                  0.054997557430948397,
-                  0.054997557430948397,
-                  0.054997557430948397,
-                  0.031364105217872598,
-                  0.031364105217872598,
-                  0.031364105217872598,
-                  0.031364105217872598,
-                  0.031364105217872598,
-                  0.031364105217872598,
-                  0.054624307510076603,
-                  0.054624307510076603,
-                  0.054624307510076603,
-                  0.027889844900463399,
-                  0.027889844900463399,
-                  0.027889844900463399,
-                  0.027889844900463399,
-                  0.027889844900463399,
-                  0.027889844900463399,
-                  0.0426984836920343,
-                  0.0426984836920343,
-                  0.0426984836920343,
-                  0.0398087126717429,
-                  0.0398087126717429,
-                  0.0398087126717429,
-                  0.059702337888032003,
-                  0.0178780243696894,
-                  0.0178780243696894,
-                  0.0178780243696894,
-                  0.014646091446293599,
-                  0.014646091446293599,
-                  0.014646091446293599,
-                  0.014646091446293599,
-                  0.014646091446293599,
-                  0.014646091446293599,
-                  0.0056848289331302704,
-                  0.0056848289331302704,
-                  0.0056848289331302704,
-                  0.0056848289331302704,
-                  0.0056848289331302704,
-                  0.0056848289331302704]},
- 20: {'points': [[-0.44111500676637699, -0.25467786790015201],
-                 [0.44111500676637699, -0.25467786790015101],
-                 [0.0, 0.50935573580030302],
-                 [-0.88806735820334504, -0.51272592831722197],
-                 [0.88806735820334604, -0.51272592831722097],
-                 [0.0, 1.0254518566344399],
-                 [0.0, -0.49506265376045899],
-                 [0.42873683462149698, 0.247531326880229],
-                 [-0.42873683462149698, 0.24753132688023],
-                 [-0.86696389117550798, -0.56894127058564403],
-                 [0.92619953917631803, -0.46634211862897501],
-                 [-0.059235648000809799, 1.03528338921462],
-                 [0.86696389117550798, -0.56894127058564403],
-                 [0.059235648000810499, 1.03528338921462],
-                 [-0.92619953917631903, -0.46634211862897501],
-                 [-0.46255868049954102, -0.39335935346809803],
-                 [0.57193853316936505, -0.20390789131956299],
-                 [-0.109379852669824, 0.59726724478766202],
-                 [0.46255868049954102, -0.39335935346809803],
-                 [0.109379852669824, 0.59726724478766202],
-                 [-0.57193853316936505, -0.20390789131956299],
-                 [0.0, -0.388733597648101],
-                 [0.33665317086777402, 0.194366798824051],
-                 [-0.33665317086777402, 0.194366798824051],
-                 [-0.674161804181169, -0.56423729270253897],
-                 [0.82572473133353996, -0.30172260233077303],
-                 [-0.15156292715236999, 0.86595989503331305],
-                 [0.674161804181169, -0.56423729270253897],
-                 [0.15156292715237099, 0.86595989503331305],
-                 [-0.82572473133353996, -0.30172260233077203],
-                 [-0.22447168033665599, -0.33519558519158099],
-                 [0.40252373218062798, -0.026800385005933399],
-                 [-0.17805205184397199, 0.361995970197515],
-                 [0.22447168033665599, -0.33519558519158099],
-                 [0.17805205184397199, 0.361995970197515],
-                 [-0.40252373218062798, -0.026800385005933201],
-                 [-0.23626219697998299, -0.13640604302572501],
-                 [0.23626219697998299, -0.13640604302572501],
-                 [0.0, 0.27281208605145102],
-                 [0.0, 2.2204460492503101e-16],
-                 [-0.55640337063475898, -0.49670535155060402],
-                 [0.70836113795588296, -0.233506777945688],
-                 [-0.15195776732112401, 0.73021212949629299],
-                 [0.55640337063475898, -0.49670535155060402],
-                 [0.15195776732112401, 0.73021212949629299],
-                 [-0.70836113795588296, -0.233506777945688],
-                 [0.0, -0.208164844430097],
-                 [0.18027604345129999, 0.104082422215049],
-                 [-0.18027604345129999, 0.104082422215049],
-                 [-0.76173172264834799, -0.51090241799311997],
-                 [0.82332033416111206, -0.40422781368539201],
-                 [-0.0615886115127635, 0.91513023167851204],
-                 [0.76173172264834799, -0.51090241799311997],
-                 [0.061588611512764201, 0.91513023167851204],
-                 [-0.82332033416111206, -0.40422781368539101],
-                 [-0.150120934074749, -0.56032152802942503],
-                 [0.56031314459817105, 0.150152221466131],
-                 [-0.41019221052342097, 0.41016930656329498],
-                 [0.150120934074749, -0.56032152802942503],
-                 [0.41019221052342197, 0.41016930656329498],
-                 [-0.56031314459817105, 0.150152221466131],
-                 [-0.27874288623783799, -0.48210916153383898],
-                 [0.55689022440443903, -0.00034383983924435302],
-                 [-0.27814733816659998, 0.482453001373084],
-                 [0.27874288623783799, -0.48210916153383898],
-                 [0.27814733816660098, 0.482453001373083],
-                 [-0.55689022440443903, -0.00034383983924390899],
-                 [-0.42809996429665798, -0.55875287099133297],
-                 [0.69794416286431304, -0.091369008944450894],
-                 [-0.26984419856765401, 0.65012187993578396],
-                 [0.42809996429665897, -0.55875287099133297],
-                 [0.26984419856765401, 0.65012187993578396],
-                 [-0.69794416286431304, -0.091369008944450505],
-                 [-0.96707157691480605, -0.55833903525740003],
-                 [0.96707157691480705, -0.55833903525739903],
-                 [0.0, 1.1166780705148001],
-                 [-0.67184920986485597, -0.387892322170312],
-                 [0.67184920986485597, -0.387892322170312],
-                 [0.0, 0.775784644340625]],
-      'weights': [0.031777807905515897,
-                  0.031777807905515897,
-                  0.031777807905515897,
-                  0.0074868776408441402,
-                  0.0074868776408441402,
-                  0.0074868776408441402,
-                  0.024601444503963399,
-                  0.024601444503963399,
-                  0.024601444503963399,
-                  0.0039139831136192601,
-                  0.0039139831136192601,
-                  0.0039139831136192601,
-                  0.0039139831136192601,
-                  0.0039139831136192601,
-                  0.0039139831136192601,
-                  0.026751898229609401,
-                  0.026751898229609401,
-                  0.026751898229609401,
-                  0.026751898229609401,
-                  0.026751898229609401,
-                  0.026751898229609401,
-                  0.032744073875638498,
-                  0.032744073875638498,
-                  0.032744073875638498,
-                  0.0076310605056112797,
-                  0.0076310605056112797,
-                  0.0076310605056112797,
-                  0.0076310605056112797,
-                  0.0076310605056112797,
-                  0.0076310605056112797,
-                  0.040501395273404399,
-                  0.040501395273404399,
-                  0.040501395273404399,
-                  0.040501395273404399,
-                  0.040501395273404399,
-                  0.040501395273404399,
-                  0.048785640395690999,
-                  0.048785640395690999,
-                  0.048785640395690999,
-                  0.048186036947648697,
-                  0.0207374929862153,
-                  0.0207374929862153,
-                  0.0207374929862153,
-                  0.0207374929862153,
-                  0.0207374929862153,
-                  0.0207374929862153,
-                  0.047763208453764097,
-                  0.047763208453764097,
-                  0.047763208453764097,
-                  0.014361165998702401,
-                  0.014361165998702401,
-                  0.014361165998702401,
-                  0.014361165998702401,
-                  0.014361165998702401,
-                  0.014361165998702401,
-                  0.012802216254069101,
-                  0.012802216254069101,
-                  0.012802216254069101,
-                  0.012802216254069101,
-                  0.012802216254069101,
-                  0.012802216254069101,
-                  0.030024150086167701,
-                  0.030024150086167701,
-                  0.030024150086167701,
-                  0.030024150086167701,
-                  0.030024150086167701,
-                  0.030024150086167701,
-                  0.012395249225327599,
-                  0.012395249225327599,
-                  0.012395249225327599,
-                  0.012395249225327599,
-                  0.012395249225327599,
-                  0.012395249225327599,
-                  0.0027672656745718,
-                  0.0027672656745718,
-                  0.0027672656745718,
-                  0.027124715078301199,
-                  0.027124715078301199,
-                  0.027124715078301199]},
- 21: {'points': [[-0.10319129405505199, -0.059577521400710202],
-                 [0.10319129405505199, -0.059577521400710202],
-                 [0.0, 0.119155042801421],
-                 [-0.21632544850764901, -0.22176792985285501],
-                 [0.30021938525108199, -0.076459368966258795],
-                 [-0.083893936743433206, 0.29822729881911397],
-                 [0.21632544850764901, -0.22176792985285501],
-                 [0.083893936743433303, 0.29822729881911397],
-                 [-0.30021938525108199, -0.076459368966258795],
-                 [0.0, -0.56698524576800602],
-                 [0.49102362640605701, 0.28349262288400301],
-                 [-0.49102362640605701, 0.28349262288400301],
-                 [-0.51732142577254403, -0.56534402375875803],
-                 [0.74826299933907003, -0.16534148476162999],
-                 [-0.230941573566526, 0.73068550852038805],
-                 [0.51732142577254403, -0.56534402375875803],
-                 [0.230941573566526, 0.73068550852038805],
-                 [-0.74826299933907003, -0.16534148476162899],
-                 [0.0, -0.24347179507408301],
-                 [0.21085275963915501, 0.121735897537042],
-                 [-0.21085275963915501, 0.121735897537042],
-                 [-0.238489978004851, -0.36295805875690101],
-                 [0.43357588839418598, -0.025059350121742398],
-                 [-0.19508591038933501, 0.388017408878643],
-                 [0.238489978004851, -0.36295805875690101],
-                 [0.19508591038933601, 0.388017408878643],
-                 [-0.43357588839418598, -0.025059350121741999],
-                 [-0.49726138663597802, -0.509815248069866],
-                 [0.69014364938315798, -0.175733369112899],
-                 [-0.19288226274718001, 0.68554861718276605],
-                 [0.49726138663597802, -0.509815248069866],
-                 [0.19288226274718101, 0.68554861718276605],
-                 [-0.69014364938315798, -0.175733369112899],
-                 [-0.72412950658754904, -0.560833003954614],
-                 [0.847760381999208, -0.34669804635740098],
-                 [-0.123630875411659, 0.90753105031201597],
-                 [0.72412950658754904, -0.560833003954614],
-                 [0.12363087541166, 0.90753105031201597],
-                 [-0.847760381999209, -0.34669804635740098],
-                 [-0.25333184867896102, -0.485461177710234],
-                 [0.54708763678765504, 0.023338772311461801],
-                 [-0.29375578810869402, 0.46212240539877297],
-                 [0.25333184867896102, -0.485461177710234],
-                 [0.29375578810869402, 0.46212240539877297],
-                 [-0.54708763678765504, 0.023338772311461999],
-                 [-0.64303426713184197, -0.37125600722672297],
-                 [0.64303426713184197, -0.37125600722672197],
-                 [0.0, 0.74251201445344595],
-                 [-0.42913384572616398, -0.24776054134837999],
-                 [0.42913384572616398, -0.24776054134837999],
-                 [0.0, 0.49552108269676098],
-                 [-0.46634273354591999, -0.40335187439348502],
-                 [0.582484336661788, -0.20218871692430199],
-                 [-0.11614160311586801, 0.60554059131778804],
-                 [0.46634273354591999, -0.40335187439348502],
-                 [0.11614160311586801, 0.60554059131778804],
-                 [-0.582484336661789, -0.20218871692430199],
-                 [0.0, -0.51360341626925599],
-                 [0.44479360595965001, 0.25680170813462799],
-                 [-0.44479360595965001, 0.25680170813462899],
-                 [0.0, -0.40349668011940398],
-                 [0.34943837532608701, 0.20174834005970199],
-                 [-0.34943837532608701, 0.20174834005970199],
-                 [-0.69288931850735602, -0.49169851113649399],
-                 [0.77226806090086697, -0.354210496270011],
-                 [-0.079378742393510601, 0.84590900740650499],
-                 [0.69288931850735602, -0.49169851113649399],
-                 [0.079378742393511295, 0.84590900740650499],
-                 [-0.77226806090086797, -0.354210496270011],
-                 [-0.83911727336156505, -0.48446458365696499],
-                 [0.83911727336156505, -0.48446458365696399],
-                 [0.0, 0.96892916731392897],
-                 [-0.26783854808923102, -0.55958871884460204],
-                 [0.618537320235229, 0.047839372664287103],
-                 [-0.35069877214599798, 0.51174934618031598],
-                 [0.26783854808923102, -0.55958871884460204],
-                 [0.35069877214599798, 0.51174934618031498],
-                 [-0.618537320235229, 0.047839372664287498],
-                 [-0.96777263070151398, -0.55874378884987197],
-                 [0.96777263070151498, -0.55874378884987197],
-                 [2.2204460492503101e-16, 1.1174875776997399],
-                 [-0.87825896621183197, -0.55950684866453704],
-                 [0.92367662764077996, -0.48084115150863699],
-                 [-0.045417661428947702, 1.04034800017317],
-                 [0.87825896621183197, -0.55950684866453704],
-                 [0.045417661428948299, 1.04034800017317],
-                 [-0.92367662764078096, -0.48084115150863699]],
-      'weights': [0.037154433060612099,
-                  0.037154433060612099,
-                  0.037154433060612099,
-                  0.030302949681343099,
-                  0.030302949681343099,
-                  0.030302949681343099,
-                  0.030302949681343099,
-                  0.030302949681343099,
-                  0.030302949681343099,
-                  0.0076865465106561101,
-                  0.0076865465106561101,
-                  0.0076865465106561101,
-                  0.00728521404182158,
-                  0.00728521404182158,
-                  0.00728521404182158,
-                  0.00728521404182158,
-                  0.00728521404182158,
-                  0.00728521404182158,
-                  0.039838389069373599,
-                  0.039838389069373599,
-                  0.039838389069373599,
-                  0.031951981028476698,
-                  0.031951981028476698,
-                  0.031951981028476698,
-                  0.031951981028476698,
-                  0.031951981028476698,
-                  0.031951981028476698,
-                  0.018134405999360701,
-                  0.018134405999360701,
-                  0.018134405999360701,
-                  0.018134405999360701,
-                  0.018134405999360701,
-                  0.018134405999360701,
-                  0.0077609959863546799,
-                  0.0077609959863546799,
-                  0.0077609959863546799,
-                  0.0077609959863546799,
-                  0.0077609959863546799,
-                  0.0077609959863546799,
-                  0.025115266576949499,
-                  0.025115266576949499,
-                  0.025115266576949499,
-                  0.025115266576949499,
-                  0.025115266576949499,
-                  0.025115266576949499,
-                  0.023652942037072099,
-                  0.023652942037072099,
-                  0.023652942037072099,
-                  0.033697467376361097,
-                  0.033697467376361097,
-                  0.033697467376361097,
-                  0.0275465996192416,
-                  0.0275465996192416,
-                  0.0275465996192416,
-                  0.0275465996192416,
-                  0.0275465996192416,
-                  0.0275465996192416,
-                  0.021155978987467398,
-                  0.021155978987467398,
-                  0.021155978987467398,
-                  0.0339732676583923,
-                  0.0339732676583923,
-                  0.0339732676583923,
-                  0.016994833719091499,
-                  0.016994833719091499,
-                  0.016994833719091499,
-                  0.016994833719091499,
-                  0.016994833719091499,
-                  0.016994833719091499,
-                  0.0123877747754797,
-                  0.0123877747754797,
-                  0.0123877747754797,
-                  0.011847028091863301,
-                  0.011847028091863301,
-                  0.011847028091863301,
-                  0.011847028091863301,
-                  0.011847028091863301,
-                  0.011847028091863301,
-                  0.0026131437931020901,
-                  0.0026131437931020901,
-                  0.0026131437931020901,
-                  0.0056558882160520603,
-                  0.0056558882160520603,
-                  0.0056558882160520603,
-                  0.0056558882160520603,
-                  0.0056558882160520603,
-                  0.0056558882160520603]},
- 22: {'points': [[0.0, -0.17961779550825399],
-                 [0.15555357388190599, 0.089808897754127107],
-                 [-0.15555357388190599, 0.089808897754127301],
-                 [0.0, -0.43105921890016002],
-                 [0.373308234103016, 0.21552960945008001],
-                 [-0.373308234103016, 0.21552960945008101],
-                 [-0.85243937884353005, -0.56370814820709403],
-                 [0.91440526608939199, -0.45638008316117801],
-                 [-0.061965887245860801, 1.02008823136827],
-                 [0.85243937884353005, -0.56370814820709403],
-                 [0.061965887245861502, 1.02008823136827],
-                 [-0.91440526608939199, -0.45638008316117701],
-                 [-0.116325222910149, -0.067160398760717999],
-                 [0.11632522291015, -0.067160398760717999],
-                 [0.0, 0.134320797521436],
-                 [-0.43446842910914801, -0.25084046450056102],
-                 [0.43446842910914801, -0.25084046450056002],
-                 [0.0, 0.50168092900112105],
-                 [0.0, -0.30708760414931302],
-                 [0.26594566638060502, 0.15354380207465701],
-                 [-0.26594566638060502, 0.15354380207465701],
-                 [-0.77445005331884897, -0.49983703894353898],
-                 [0.82009660013692098, -0.42077490066456702],
-                 [-0.0456465468180716, 0.92061193960810594],
-                 [0.77445005331884897, -0.49983703894353898],
-                 [0.045646546818072203, 0.92061193960810594],
-                 [-0.82009660013692098, -0.42077490066456602],
-                 [-0.13904123725801901, -0.51105561801610599],
-                 [0.51210776657771395, 0.13511456536899],
-                 [-0.37306652931969497, 0.37594105264711702],
-                 [0.13904123725801901, -0.51105561801610599],
-                 [0.37306652931969497, 0.37594105264711702],
-                 [-0.51210776657771395, 0.13511456536899],
-                 [-0.233040713998176, -0.39938711325111997],
-                 [0.46239974301869102, -0.0021256218129237499],
-                 [-0.229359029020515, 0.401512735064045],
-                 [0.233040713998176, -0.39938711325111997],
-                 [0.229359029020515, 0.401512735064045],
-                 [-0.46239974301869102, -0.0021256218129234198],
-                 [-0.26744719790035498, -0.56453267538284102],
-                 [0.62262323709811096, 0.050650270138749003],
-                 [-0.35517603919775598, 0.51388240524409201],
-                 [0.26744719790035498, -0.56453267538284102],
-                 [0.35517603919775698, 0.51388240524409201],
-                 [-0.62262323709811096, 0.050650270138749301],
-                 [-0.22878505379994199, -0.246387752735059],
-                 [0.32777057994989101, -0.074939792229409899],
-                 [-0.098985526149948502, 0.32132754496446903],
-                 [0.22878505379994199, -0.246387752735059],
-                 [0.098985526149948794, 0.32132754496446903],
-                 [-0.32777057994989101, -0.074939792229409705],
-                 [0.0, -0.56405220111847199],
-                 [0.48848353522912602, 0.28202610055923599],
-                 [-0.48848353522912602, 0.28202610055923599],
-                 [-0.3801447489582, -0.50115450425960695],
-                 [0.624084906388917, -0.078637757583256099],
-                 [-0.24394015743071601, 0.57979226184286403],
-                 [0.3801447489582, -0.50115450425960695],
-                 [0.24394015743071601, 0.57979226184286403],
-                 [-0.624084906388917, -0.078637757583255793],
-                 [-0.45773619140744598, -0.38909376761177],
-                 [0.56583318290971496, -0.201864286184499],
-                 [-0.10809699150226899, 0.59095805379626998],
-                 [0.45773619140744598, -0.38909376761177],
-                 [0.10809699150226899, 0.59095805379626998],
-                 [-0.56583318290971496, -0.201864286184499],
-                 [-0.69910784887798605, -0.56151116446763505],
-                 [0.835836857376547, -0.32468957487960998],
-                 [-0.13672900849856101, 0.88620073934724597],
-                 [0.69910784887798605, -0.56151116446763505],
-                 [0.13672900849856101, 0.88620073934724597],
-                 [-0.835836857376547, -0.32468957487960998],
-                 [-0.59915020623635895, -0.49377028890768598],
-                 [0.72719271694621701, -0.27199415482952899],
-                 [-0.128042510709858, 0.76576444373721597],
-                 [0.59915020623635895, -0.49377028890768598],
-                 [0.128042510709859, 0.76576444373721597],
-                 [-0.72719271694621701, -0.27199415482952799],
-                 [-0.50285479867282901, -0.56147791277581904],
-                 [0.73768153546413595, -0.15474607367766999],
-                 [-0.234826736791307, 0.71622398645348895],
-                 [0.50285479867282901, -0.56147791277581904],
-                 [0.234826736791308, 0.71622398645348895],
-                 [-0.73768153546413695, -0.15474607367766899],
-                 [-0.91267458798757695, -0.526932919057159],
-                 [0.91267458798757695, -0.526932919057158],
-                 [0.0, 1.05386583811432],
-                 [-0.65370538534238498, -0.37741698019813402],
-                 [0.65370538534238498, -0.37741698019813402],
-                 [0.0, 0.75483396039626804],
-                 [-0.96233289290517399, -0.57423523645313301],
-                 [0.97846874896916403, -0.54628711392668305],
-                 [-0.016135856063990199, 1.1205223503798201],
-                 [0.96233289290517399, -0.57423523645313301],
-                 [0.016135856063991001, 1.1205223503798201],
-                 [-0.97846874896916403, -0.54628711392668305]],
-      'weights': [0.0233707068372025,
-                  0.0233707068372025,
-                  0.0233707068372025,
-                  0.024008648239984699,
-                  0.024008648239984699,
-                  0.024008648239984699,
-                  0.0044954313052876201,
-                  0.0044954313052876201,
-                  0.0044954313052876201,
-                  0.0044954313052876201,
-                  0.0044954313052876201,
-                  0.0044954313052876201,
-                  0.036504293982636098,
-                  0.036504293982636098,
-                  0.036504293982636098,
-                  0.027749704088016702,
-                  0.027749704088016702,
-                  0.027749704088016702,
-                  0.032654514183051597,
-                  0.032654514183051597,
-                  0.032654514183051597,
-                  0.013020826730262201,
-                  0.013020826730262201,
-                  0.013020826730262201,
-                  0.013020826730262201,
-                  0.013020826730262201,
-                  0.013020826730262201,
-                  0.019394315841714999,
-                  0.019394315841714999,
-                  0.019394315841714999,
-                  0.019394315841714999,
-                  0.019394315841714999,
-                  0.019394315841714999,
-                  0.030690370187894601,
-                  0.030690370187894601,
-                  0.030690370187894601,
-                  0.030690370187894601,
-                  0.030690370187894601,
-                  0.030690370187894601,
-                  0.0084944281821165996,
-                  0.0084944281821165996,
-                  0.0084944281821165996,
-                  0.0084944281821165996,
-                  0.0084944281821165996,
-                  0.0084944281821165996,
-                  0.037596621520548199,
-                  0.037596621520548199,
-                  0.037596621520548199,
-                  0.037596621520548199,
-                  0.037596621520548199,
-                  0.037596621520548199,
-                  0.0091614050399744101,
-                  0.0091614050399744101,
-                  0.0091614050399744101,
-                  0.020199562535429701,
-                  0.020199562535429701,
-                  0.020199562535429701,
-                  0.020199562535429701,
-                  0.020199562535429701,
-                  0.020199562535429701,
-                  0.027210799857461301,
-                  0.027210799857461301,
-                  0.027210799857461301,
-                  0.027210799857461301,
-                  0.027210799857461301,
-                  0.027210799857461301,
-                  0.0071129906587551099,
-                  0.0071129906587551099,
-                  0.0071129906587551099,
-                  0.0071129906587551099,
-                  0.0071129906587551099,
-                  0.0071129906587551099,
-                  0.018296665874208501,
-                  0.018296665874208501,
-                  0.018296665874208501,
-                  0.018296665874208501,
-                  0.018296665874208501,
-                  0.018296665874208501,
-                  0.0087539179719766207,
-                  0.0087539179719766207,
-                  0.0087539179719766207,
-                  0.0087539179719766207,
-                  0.0087539179719766207,
-                  0.0087539179719766207,
-                  0.0061818784130230203,
-                  0.0061818784130230203,
-                  0.0061818784130230203,
-                  0.024968747565214899,
-                  0.024968747565214899,
-                  0.024968747565214899,
-                  0.00110925475460562,
-                  0.00110925475460562,
-                  0.00110925475460562,
-                  0.00110925475460562,
-                  0.00110925475460562,
-                  0.00110925475460562]},
- 23: {'points': [[-0.65712214849613204, -0.53600577707072905],
-                 [0.79275569376653499, -0.301081585451696],
-                 [-0.135633545270403, 0.83708736252242499],
-                 [0.65712214849613204, -0.53600577707072905],
-                 [0.135633545270404, 0.83708736252242499],
-                 [-0.79275569376653598, -0.301081585451696],
-                 [-0.76660745759442595, -0.56836123421761697],
-                 [0.87551899615594597, -0.37972091589856699],
-                 [-0.10891153856152, 0.94808215011618402],
-                 [0.76660745759442595, -0.56836123421761697],
-                 [0.10891153856152, 0.94808215011618402],
-                 [-0.87551899615594697, -0.37972091589856599],
-                 [-0.88297819372890296, -0.50978769783795197],
-                 [0.88297819372890396, -0.50978769783795197],
-                 [0.0, 1.0195753956758999],
-                 [-0.77617921446782401, -0.52064114314269105],
-                 [0.83897806345085202, -0.41187034604723999],
-                 [-0.062798848983028094, 0.93251148918993099],
-                 [0.77617921446782401, -0.52064114314269105],
-                 [0.062798848983028704, 0.93251148918993099],
-                 [-0.83897806345085202, -0.41187034604723999],
-                 [-0.37522786404063002, -0.57311090188249403],
-                 [0.68394253223636503, -0.038401411525711901],
-                 [-0.30871466819573501, 0.611512313408206],
-                 [0.37522786404063002, -0.57311090188249403],
-                 [0.30871466819573601, 0.611512313408206],
-                 [-0.68394253223636503, -0.038401411525711499],
-                 [-0.58004024629858697, -0.56223762431711999],
-                 [0.77693218877133097, -0.221210776353399],
-                 [-0.196891942472743, 0.78344840067052002],
-                 [0.58004024629858697, -0.56223762431711999],
-                 [0.196891942472744, 0.78344840067052002],
-                 [-0.77693218877133097, -0.221210776353399],
-                 [-0.89831420119030503, -0.56494438615384301],
-                 [0.93841329072978596, -0.49549072573420799],
-                 [-0.040099089539480402, 1.06043511188805],
-                 [0.89831420119030503, -0.56494438615384301],
-                 [0.040099089539481297, 1.06043511188805],
-                 [-0.93841329072978596, -0.49549072573420699],
-                 [-0.214453858673537, -0.45865810284942798],
-                 [0.50443649805594903, 0.043606561873833501],
-                 [-0.28998263938241198, 0.41505154097559499],
-                 [0.214453858673537, -0.45865810284942798],
-                 [0.28998263938241198, 0.41505154097559499],
-                 [-0.50443649805594903, 0.043606561873833799],
-                 [0.0, -0.50920750140222304],
-                 [0.44098663201192601, 0.25460375070111202],
-                 [-0.44098663201192501, 0.25460375070111202],
-                 [-0.41730612660269001, -0.40115163422567002],
-                 [0.55606056931041903, -0.16082188967998001],
-                 [-0.13875444270772799, 0.56197352390565103],
-                 [0.41730612660269101, -0.40115163422567002],
-                 [0.13875444270772899, 0.56197352390565103],
-                 [-0.55606056931041903, -0.16082188967997901],
-                 [-0.73947685537709995, -0.42693716151146699],
-                 [0.73947685537710095, -0.42693716151146699],
-                 [0.0, 0.85387432302293398],
-                 [0.0, -0.211276155682112],
-                 [0.182970518034625, 0.105638077841056],
-                 [-0.182970518034625, 0.105638077841056],
-                 [-0.20124604636825799, -0.116189459044062],
-                 [0.20124604636825799, -0.116189459044061],
-                 [0.0, 0.232378918088124],
-                 [-0.59578381850403705, -0.47628237617657099],
-                 [0.71036454639574498, -0.27782273389990803],
-                 [-0.11458072789170801, 0.75410511007647896],
-                 [0.59578381850403594, -0.47628237617657099],
-                 [0.11458072789170901, 0.75410511007647896],
-                 [-0.71036454639574498, -0.27782273389990703],
-                 [-0.21256122928680801, -0.30917657348348698],
-                 [0.374035381535129, -0.029495137680280802],
-                 [-0.16147415224832201, 0.33867171116376799],
-                 [0.21256122928680801, -0.30917657348348698],
-                 [0.16147415224832201, 0.33867171116376799],
-                 [-0.374035381535129, -0.029495137680280399],
-                 [-0.58861183806505701, -0.33983520315506099],
-                 [0.58861183806505701, -0.33983520315506099],
-                 [-1.11022302462516e-16, 0.67967040631012299],
-                 [0.0, -0.57374563316209204],
-                 [0.49687829362875902, 0.28687281658104602],
-                 [-0.49687829362875902, 0.28687281658104602],
-                 [-0.18972387666404, -0.55178698374999002],
-                 [0.57272348373710202, 0.11158779497947099],
-                 [-0.38299960707306202, 0.440199188770519],
-                 [0.189723876664039, -0.55178698374999002],
-                 [0.38299960707306302, 0.440199188770519],
-                 [-0.57272348373710202, 0.11158779497947099],
-                 [0.0, -0.38575926863496202],
-                 [0.33407732638318299, 0.19287963431748101],
-                 [-0.33407732638318199, 0.19287963431748101],
-                 [-0.403750580810391, -0.23310550651634701],
-                 [0.403750580810391, -0.23310550651634701],
-                 [0.0, 0.46621101303269502],
-                 [-0.40941795217926302, -0.52020349027005797],
-                 [0.65521841380083201, -0.094464602217615101],
-                 [-0.24580046162156899, 0.61466809248767296],
-                 [0.40941795217926302, -0.52020349027005797],
-                 [0.24580046162156999, 0.61466809248767296],
-                 [-0.65521841380083201, -0.094464602217614699],
-                 [-0.97295067938320501, -0.56173333665012304],
-                 [0.97295067938320501, -0.56173333665012204],
-                 [0.0, 1.1234666733002501],
-                 [0.0, 2.2204460492503101e-16]],
-      'weights': [0.0043789120578930701,
-                  0.0043789120578930701,
-                  0.0043789120578930701,
-                  0.0043789120578930701,
-                  0.0043789120578930701,
-                  0.0043789120578930701,
-                  0.00385384721972603,
-                  0.00385384721972603,
-                  0.00385384721972603,
-                  0.00385384721972603,
-                  0.00385384721972603,
-                  0.00385384721972603,
-                  0.0067822610778879603,
-                  0.0067822610778879603,
-                  0.0067822610778879603,
-                  0.0092284194111024904,
-                  0.0092284194111024904,
-                  0.0092284194111024904,
-                  0.0092284194111024904,
-                  0.0092284194111024904,
-                  0.0092284194111024904,
-                  0.0039509874646072498,
-                  0.0039509874646072498,
-                  0.0039509874646072498,
-                  0.0039509874646072498,
-                  0.0039509874646072498,
-                  0.0039509874646072498,
-                  0.0071269566569902099,
-                  0.0071269566569902099,
-                  0.0071269566569902099,
-                  0.0071269566569902099,
-                  0.0071269566569902099,
-                  0.0071269566569902099,
-                  0.0033819873863251198,
-                  0.0033819873863251198,
-                  0.0033819873863251198,
-                  0.0033819873863251198,
-                  0.0033819873863251198,
-                  0.0033819873863251198,
-                  0.025948049550971599,
-                  0.025948049550971599,
-                  0.025948049550971599,
-                  0.025948049550971599,
-                  0.025948049550971599,
-                  0.025948049550971599,
-                  0.019741723310874999,
-                  0.019741723310874999,
-                  0.019741723310874999,
-                  0.027922809596408599,
-                  0.027922809596408599,
-                  0.027922809596408599,
-                  0.027922809596408599,
-                  0.027922809596408599,
-                  0.027922809596408599,
-                  0.0155190315197909,
-                  0.0155190315197909,
-                  0.0155190315197909,
-                  0.041005624707437897,
-                  0.041005624707437897,
-                  0.041005624707437897,
-                  0.041236428140783099,
-                  0.041236428140783099,
-                  0.041236428140783099,
-                  0.018135016214379199,
-                  0.018135016214379199,
-                  0.018135016214379199,
-                  0.018135016214379199,
-                  0.018135016214379199,
-                  0.018135016214379199,
-                  0.036103552680812299,
-                  0.036103552680812299,
-                  0.036103552680812299,
-                  0.036103552680812299,
-                  0.036103552680812299,
-                  0.036103552680812299,
-                  0.025217706078456598,
-                  0.025217706078456598,
-                  0.025217706078456598,
-                  0.0041699895759305002,
-                  0.0041699895759305002,
-                  0.0041699895759305002,
-                  0.012293713562278799,
-                  0.012293713562278799,
-                  0.012293713562278799,
-                  0.012293713562278799,
-                  0.012293713562278799,
-                  0.012293713562278799,
-                  0.032825741461834,
-                  0.032825741461834,
-                  0.032825741461834,
-                  0.034528914151345902,
-                  0.034528914151345902,
-                  0.034528914151345902,
-                  0.017624612301626801,
-                  0.017624612301626801,
-                  0.017624612301626801,
-                  0.017624612301626801,
-                  0.017624612301626801,
-                  0.017624612301626801,
-                  0.00184525978367459,
-                  0.00184525978367459,
-                  0.00184525978367459,
-                  0.043739583526100502]},
- 24: {'points': [[0.0, 2.2204460492503101e-16],
-                 [0.0, -0.29638036437519599],
-                 [0.25667292473180803, 0.148190182187598],
-                 [-0.25667292473180803, 0.148190182187598],
-                 [-0.51291809884922102, -0.29613340244282899],
-                 [0.51291809884922102, -0.29613340244282899],
-                 [0.0, 0.59226680488565797],
-                 [-0.346673197390368, -0.282265480017235],
-                 [0.41778567500151897, -0.15909505574261801],
-                 [-0.071112477611150096, 0.44136053575985401],
-                 [0.346673197390368, -0.282265480017235],
-                 [0.071112477611150499, 0.44136053575985401],
-                 [-0.41778567500151897, -0.15909505574261801],
-                 [-0.17228858629081101, -0.28331767767631],
-                 [0.33150459935430199, -0.00754745367179477],
-                 [-0.15921601306349001, 0.29086513134810499],
-                 [0.17228858629081101, -0.28331767767631],
-                 [0.15921601306349101, 0.29086513134810499],
-                 [-0.33150459935430199, -0.0075474536717944404],
-                 [-0.87704311299664806, -0.50636107737952296],
-                 [0.87704311299664905, -0.50636107737952196],
-                 [0.0, 1.0127221547590499],
-                 [-0.97980618733633396, -0.56569136601229397],
-                 [0.97980618733633495, -0.56569136601229397],
-                 [0.0, 1.1313827320245899],
-                 [-0.77534695461921799, -0.51098115521172305],
-                 [0.83019613857807995, -0.41597958184128198],
-                 [-0.054849183958861403, 0.92696073705300497],
-                 [0.77534695461921799, -0.51098115521172305],
-                 [0.054849183958862097, 0.92696073705300497],
-                 [-0.83019613857807995, -0.41597958184128198],
-                 [-0.118302958878854, -0.416864535545107],
-                 [0.42016675715829099, 0.105978900040601],
-                 [-0.30186379827943699, 0.31088563550450699],
-                 [0.118302958878854, -0.416864535545107],
-                 [0.30186379827943699, 0.31088563550450699],
-                 [-0.42016675715829099, 0.105978900040601],
-                 [-0.63345645296257003, -0.50600932341283],
-                 [0.75494515510857196, -0.29558471875035303],
-                 [-0.12148870214600201, 0.80159404216318297],
-                 [0.63345645296257003, -0.50600932341283],
-                 [0.12148870214600201, 0.80159404216318297],
-                 [-0.75494515510857196, -0.29558471875035203],
-                 [-0.45325106659208297, -0.50881145127983196],
-                 [0.66726917584080403, -0.13812121232121999],
-                 [-0.214018109248721, 0.64693266360105295],
-                 [0.45325106659208297, -0.50881145127983196],
-                 [0.214018109248722, 0.64693266360105295],
-                 [-0.66726917584080403, -0.13812121232121999],
-                 [-0.236902817189521, -0.510505751685433],
-                 [0.56056235833241697, 0.050089017928490603],
-                 [-0.32365954114289502, 0.46041673375694298],
-                 [0.236902817189521, -0.510505751685433],
-                 [0.32365954114289502, 0.46041673375694298],
-                 [-0.56056235833241597, 0.050089017928490999],
-                 [-0.34221988285107902, -0.41361091237025699],
-                 [0.52930749882064099, -0.089565656044040806],
-                 [-0.187087615969562, 0.50317656841429803],
-                 [0.34221988285107902, -0.41361091237025699],
-                 [0.187087615969562, 0.50317656841429803],
-                 [-0.52930749882064099, -0.089565656044040501],
-                 [-0.22606667538238701, -0.56455388712044596],
-                 [0.601951345742752, 0.086497459729985599],
-                 [-0.37588467036036499, 0.478056427390461],
-                 [0.22606667538238701, -0.56455388712044596],
-                 [0.37588467036036499, 0.478056427390461],
-                 [-0.601951345742752, 0.086497459729985904],
-                 [-0.44495329180516602, -0.56428020831842496],
-                 [0.71115764115911395, -0.103200750041572],
-                 [-0.26620434935394699, 0.66748095835999699],
-                 [0.44495329180516602, -0.56428020831842496],
-                 [0.26620434935394799, 0.66748095835999699],
-                 [-0.71115764115911395, -0.103200750041571],
-                 [0.0, -0.56437817053789696],
-                 [0.488765833027205, 0.28218908526894898],
-                 [-0.488765833027205, 0.28218908526894898],
-                 [-0.80452275594748601, -0.56481964637042004],
-                 [0.89140954028706998, -0.41432732138798101],
-                 [-0.086886784339583495, 0.97914696775840104],
-                 [0.80452275594748601, -0.56481964637042004],
-                 [0.086886784339584203, 0.97914696775840104],
-                 [-0.89140954028706998, -0.41432732138798001],
-                 [-0.20730605368518201, -0.11968820589977899],
-                 [0.20730605368518201, -0.11968820589977899],
-                 [0.0, 0.23937641179955799],
-                 [-0.54364142669910298, -0.41182463487840798],
-                 [0.62847130905850401, -0.26489496863183498],
-                 [-0.084829882359400102, 0.67671960351024396],
-                 [0.54364142669910298, -0.41182463487840798],
-                 [0.084829882359400699, 0.67671960351024396],
-                 [-0.62847130905850401, -0.26489496863183498],
-                 [0.0, -0.51019021318165303],
-                 [0.44183768537751, 0.25509510659082701],
-                 [-0.44183768537751, 0.25509510659082701],
-                 [-0.64253738555354101, -0.56351478264510602],
-                 [0.80928680995549795, -0.27469630744805001],
-                 [-0.166749424401957, 0.83821109009315597],
-                 [0.64253738555354101, -0.56351478264510602],
-                 [0.166749424401958, 0.83821109009315597],
-                 [-0.80928680995549895, -0.27469630744804902],
-                 [-0.71101451320235398, -0.41050442059511],
-                 [0.71101451320235398, -0.41050442059511],
-                 [0.0, 0.82100884119022],
-                 [-0.91734214502720901, -0.56336411329583402],
-                 [0.94655870620829097, -0.51275954490775499],
-                 [-0.029216561181081999, 1.07612365820359],
-                 [0.91734214502720901, -0.56336411329583402],
-                 [0.0292165611810828, 1.07612365820359],
-                 [-0.94655870620829097, -0.51275954490775399],
-                 [0.0, -0.14556014125612901],
-                 [0.12605878010625901, 0.072780070628064603],
-                 [-0.12605878010625901, 0.0727800706280647]],
-      'weights': [0.021729772228580701,
-                  0.022708108753958501,
-                  0.022708108753958501,
-                  0.022708108753958501,
-                  0.017976983142258301,
-                  0.017976983142258301,
-                  0.017976983142258301,
-                  0.0244999380122208,
-                  0.0244999380122208,
-                  0.0244999380122208,
-                  0.0244999380122208,
-                  0.0244999380122208,
-                  0.0244999380122208,
-                  0.026456110642788799,
-                  0.026456110642788799,
-                  0.026456110642788799,
-                  0.026456110642788799,
-                  0.026456110642788799,
-                  0.026456110642788799,
-                  0.0066401627149324802,
-                  0.0066401627149324802,
-                  0.0066401627149324802,
-                  0.00106911616472099,
-                  0.00106911616472099,
-                  0.00106911616472099,
-                  0.0092946548058251005,
-                  0.0092946548058251005,
-                  0.0092946548058251005,
-                  0.0092946548058251005,
-                  0.0092946548058251005,
-                  0.0092946548058251005,
-                  0.026035935465727199,
-                  0.026035935465727199,
-                  0.026035935465727199,
-                  0.026035935465727199,
-                  0.026035935465727199,
-                  0.026035935465727199,
-                  0.0124779264152924,
-                  0.0124779264152924,
-                  0.0124779264152924,
-                  0.0124779264152924,
-                  0.0124779264152924,
-                  0.0124779264152924,
-                  0.0154236992747272,
-                  0.0154236992747272,
-                  0.0154236992747272,
-                  0.0154236992747272,
-                  0.0154236992747272,
-                  0.0154236992747272,
-                  0.017229145644366801,
-                  0.017229145644366801,
-                  0.017229145644366801,
-                  0.017229145644366801,
-                  0.017229145644366801,
-                  0.017229145644366801,
-                  0.024859002141460099,
-                  0.024859002141460099,
-                  0.024859002141460099,
-                  0.024859002141460099,
-                  0.024859002141460099,
-                  0.024859002141460099,
-                  0.0073476180633951903,
-                  0.0073476180633951903,
-                  0.0073476180633951903,
-                  0.0073476180633951903,
-                  0.0073476180633951903,
-                  0.0073476180633951903,
-                  0.00706897579323028,
-                  0.00706897579323028,
-                  0.00706897579323028,
-                  0.00706897579323028,
-                  0.00706897579323028,
-                  0.00706897579323028,
-                  0.0075227239926066404,
-                  0.0075227239926066404,
-                  0.0075227239926066404,
-                  0.00448464739789977,
-                  0.00448464739789977,
-                  0.00448464739789977,
-                  0.00448464739789977,
-                  0.00448464739789977,
-                  0.00448464739789977,
-                  0.035541697590809003,
-                  0.035541697590809003,
-                  0.035541697590809003,
-                  0.020513651373484001,
-                  0.020513651373484001,
-                  0.020513651373484001,
-                  0.020513651373484001,
-                  0.020513651373484001,
-                  0.020513651373484001,
-                  0.017931046928207801,
-                  0.017931046928207801,
-                  0.017931046928207801,
-                  0.00642110511085378,
-                  0.00642110511085378,
-                  0.00642110511085378,
-                  0.00642110511085378,
-                  0.00642110511085378,
-                  0.00642110511085378,
-                  0.017367954260181499,
-                  0.017367954260181499,
-                  0.017367954260181499,
-                  0.0031124045165316899,
-                  0.0031124045165316899,
-                  0.0031124045165316899,
-                  0.0031124045165316899,
-                  0.0031124045165316899,
-                  0.0031124045165316899,
-                  0.032899588916817601,
-                  0.032899588916817601,
-                  0.032899588916817601]},
- 25: {'points': [[-0.101068962686411, -0.16412936732602301],
-                 [0.19267468295460899, -0.0054636055575612002],
-                 [-0.091605720268198604, 0.16959297288358499],
-                 [0.101068962686411, -0.16412936732602301],
-                 [0.091605720268198798, 0.16959297288358499],
-                 [-0.19267468295460899, -0.0054636055575609799],
-                 [-0.19822338168349901, -0.309416564241486],
-                 [0.36707429582657602, -0.016958202041225799],
-                 [-0.16885091414307701, 0.326374766282712],
-                 [0.19822338168349901, -0.309416564241486],
-                 [0.16885091414307701, 0.326374766282712],
-                 [-0.36707429582657602, -0.0169582020412254],
-                 [-0.54416882293507596, -0.31417601640616799],
-                 [0.54416882293507596, -0.31417601640616799],
-                 [0.0, 0.62835203281233598],
-                 [-0.21149812370670801, -0.42680272847907802],
-                 [0.475371067120748, 0.0302386162567863],
-                 [-0.263872943414039, 0.39656411222229199],
-                 [0.21149812370670801, -0.42680272847907802],
-                 [0.26387294341404, 0.39656411222229199],
-                 [-0.475371067120747, 0.030238616256786401],
-                 [-0.43195443916571102, -0.51938030184061501],
-                 [0.66577375520205795, -0.11439336667465801],
-                 [-0.23381931603634601, 0.63377366851527395],
-                 [0.43195443916571102, -0.51938030184061501],
-                 [0.23381931603634701, 0.63377366851527395],
-                 [-0.66577375520205795, -0.11439336667465801],
-                 [-0.296882760330201, -0.17140534159440099],
-                 [0.296882760330201, -0.17140534159439999],
-                 [0.0, 0.34281068318880198],
-                 [-0.38474543524853, -0.31726997654103201],
-                 [0.467136577166892, -0.174564332644811],
-                 [-0.082391141918361693, 0.49183430918584398],
-                 [0.38474543524853, -0.31726997654103201],
-                 [0.082391141918362096, 0.49183430918584398],
-                 [-0.467136577166892, -0.174564332644811],
-                 [-0.44610259942390101, -0.56638621016371504],
-                 [0.71355614606691997, -0.103143078713514],
-                 [-0.26745354664301901, 0.66952928887722896],
-                 [0.44610259942390101, -0.56638621016371504],
-                 [0.26745354664301901, 0.66952928887722896],
-                 [-0.71355614606691997, -0.103143078713513],
-                 [-0.22137705760375601, -0.51397841934329602],
-                 [0.55580689695014296, 0.065271053971744403],
-                 [-0.33442983934638698, 0.44870736537155198],
-                 [0.22137705760375601, -0.51397841934329602],
-                 [0.33442983934638698, 0.44870736537155198],
-                 [-0.55580689695014296, 0.065271053971744805],
-                 [-0.61731007693916595, -0.51555889787873699],
-                 [0.75514214117967704, -0.27682675970207499],
-                 [-0.13783206424051, 0.79238565758081303],
-                 [0.61731007693916595, -0.51555889787873699],
-                 [0.137832064240511, 0.79238565758081303],
-                 [-0.75514214117967704, -0.27682675970207499],
-                 [0.0, -0.51754315983825805],
-                 [0.44820552397480201, 0.25877157991912902],
-                 [-0.44820552397480201, 0.25877157991912902],
-                 [0.0, -0.430943361839566],
-                 [0.37320789894533402, 0.215471680919783],
-                 [-0.37320789894533402, 0.215471680919784],
-                 [0.0, -0.31003404709979199],
-                 [0.26849736082652098, 0.15501702354989599],
-                 [-0.26849736082652098, 0.15501702354989599],
-                 [-0.79651806690280103, -0.56539513442956801],
-                 [0.88790558304352396, -0.407107313296314],
-                 [-0.091387516140723199, 0.97250244772588301],
-                 [0.79651806690280103, -0.56539513442956801],
-                 [0.091387516140723796, 0.97250244772588301],
-                 [-0.88790558304352496, -0.407107313296314],
-                 [-0.413920452208623, -0.43511575359046101],
-                 [0.58378152230046099, -0.14090774996337899],
-                 [-0.16986107009183801, 0.57602350355384102],
-                 [0.413920452208623, -0.43511575359046101],
-                 [0.16986107009183801, 0.57602350355384102],
-                 [-0.58378152230046099, -0.14090774996337899],
-                 [0.0, -0.56600071280432096],
-                 [0.49017099584864199, 0.28300035640216098],
-                 [-0.49017099584864199, 0.28300035640216098],
-                 [-0.73444884818595801, -0.42403424020617397],
-                 [0.73444884818595801, -0.42403424020617297],
-                 [0.0, 0.84806848041234795],
-                 [-0.63850986152765798, -0.56539075488967505],
-                 [0.80889768756314795, -0.27027038320499902],
-                 [-0.17038782603548999, 0.83566113809467402],
-                 [0.63850986152765798, -0.56539075488967505],
-                 [0.17038782603549099, 0.83566113809467402],
-                 [-0.80889768756314795, -0.27027038320499802],
-                 [-0.22892419094449701, -0.56510101599839802],
-                 [0.60385393103125795, 0.084296343100465396],
-                 [-0.374929740086761, 0.48080467289793399],
-                 [0.22892419094449701, -0.56510101599839802],
-                 [0.374929740086761, 0.48080467289793299],
-                 [-0.60385393103125795, 0.084296343100465701],
-                 [0.0, 2.2204460492503101e-16],
-                 [-0.591750503835898, -0.42985305045574201],
-                 [0.66813891350685595, -0.297544443796257],
-                 [-0.076388409670957905, 0.72739749425199995],
-                 [0.591750503835898, -0.42985305045574201],
-                 [0.076388409670958404, 0.72739749425199995],
-                 [-0.66813891350685595, -0.297544443796257],
-                 [-0.87868714323457697, -0.51140281695466505],
-                 [0.88223140266695099, -0.50526397954258695],
-                 [-0.0035442594323738001, 1.01666679649725],
-                 [0.87868714323457697, -0.51140281695466505],
-                 [0.0035442594323744601, 1.01666679649725],
-                 [-0.88223140266695199, -0.50526397954258695],
-                 [-0.77076798743091401, -0.51452589863303999],
-                 [0.83097649283668595, -0.41024170822245598],
-                 [-0.0602085054057723, 0.92476760685549697],
-                 [0.77076798743091401, -0.51452589863303999],
-                 [0.0602085054057728, 0.92476760685549697],
-                 [-0.83097649283668695, -0.41024170822245598],
-                 [-0.97648706298777699, -0.56377506867618099],
-                 [0.97648706298777799, -0.56377506867617999],
-                 [0.0, 1.12755013735236],
-                 [-0.910812915417614, -0.56414917432882805],
-                 [0.94397397420158802, -0.50671253568220698],
-                 [-0.033161058783973699, 1.07086171001104],
-                 [0.910812915417614, -0.56414917432882805],
-                 [0.033161058783974399, 1.07086171001104],
-                 [-0.94397397420158802, -0.50671253568220598]],
-      'weights': [0.0312823211908064,
-                  0.0312823211908064,
-                  0.0312823211908064,
-                  0.0312823211908064,
-                  0.0312823211908064,
-                  0.0312823211908064,
-                  0.0253313991131454,
-                  0.0253313991131454,
-                  0.0253313991131454,
-                  0.0253313991131454,
-                  0.0253313991131454,
-                  0.0253313991131454,
-                  0.018876462735815801,
-                  0.018876462735815801,
-                  0.018876462735815801,
-                  0.0214456903562384,
-                  0.0214456903562384,
-                  0.0214456903562384,
-                  0.0214456903562384,
-                  0.0214456903562384,
-                  0.0214456903562384,
-                  0.0131721555725704,
-                  0.0131721555725704,
-                  0.0131721555725704,
-                  0.0131721555725704,
-                  0.0131721555725704,
-                  0.0131721555725704,
-                  0.028376662172259801,
-                  0.028376662172259801,
-                  0.028376662172259801,
-                  0.023103797535021901,
-                  0.023103797535021901,
-                  0.023103797535021901,
-                  0.023103797535021901,
-                  0.023103797535021901,
-                  0.023103797535021901,
-                  0.0058276682270355096,
-                  0.0058276682270355096,
-                  0.0058276682270355096,
-                  0.0058276682270355096,
-                  0.0058276682270355096,
-                  0.0058276682270355096,
-                  0.015244527559362399,
-                  0.015244527559362399,
-                  0.015244527559362399,
-                  0.015244527559362399,
-                  0.015244527559362399,
-                  0.015244527559362399,
-                  0.0117573506021255,
-                  0.0117573506021255,
-                  0.0117573506021255,
-                  0.0117573506021255,
-                  0.0117573506021255,
-                  0.0117573506021255,
-                  0.015175614925878,
-                  0.015175614925878,
-                  0.015175614925878,
-                  0.022400421035807298,
-                  0.022400421035807298,
-                  0.022400421035807298,
-                  0.027209668995777401,
-                  0.027209668995777401,
-                  0.027209668995777401,
-                  0.0042222957498023999,
-                  0.0042222957498023999,
-                  0.0042222957498023999,
-                  0.0042222957498023999,
-                  0.0042222957498023999,
-                  0.0042222957498023999,
-                  0.019634492159130199,
-                  0.019634492159130199,
-                  0.019634492159130199,
-                  0.019634492159130199,
-                  0.019634492159130199,
-                  0.019634492159130199,
-                  0.0067323131641087797,
-                  0.0067323131641087797,
-                  0.0067323131641087797,
-                  0.0137022774820922,
-                  0.0137022774820922,
-                  0.0137022774820922,
-                  0.0054052585201615497,
-                  0.0054052585201615497,
-                  0.0054052585201615497,
-                  0.0054052585201615497,
-                  0.0054052585201615497,
-                  0.0054052585201615497,
-                  0.00703942089955901,
-                  0.00703942089955901,
-                  0.00703942089955901,
-                  0.00703942089955901,
-                  0.00703942089955901,
-                  0.00703942089955901,
-                  0.032938753726062302,
-                  0.016694714202567101,
-                  0.016694714202567101,
-                  0.016694714202567101,
-                  0.016694714202567101,
-                  0.016694714202567101,
-                  0.016694714202567101,
-                  0.0034738655952473302,
-                  0.0034738655952473302,
-                  0.0034738655952473302,
-                  0.0034738655952473302,
-                  0.0034738655952473302,
-                  0.0034738655952473302,
-                  0.0095385134372626395,
-                  0.0095385134372626395,
-                  0.0095385134372626395,
-                  0.0095385134372626395,
-                  0.0095385134372626395,
-                  0.0095385134372626395,
-                  0.0013931566960908701,
-                  0.0013931566960908701,
-                  0.0013931566960908701,
-                  0.00307858298318526,
-                  0.00307858298318526,
-                  0.00307858298318526,
-                  0.00307858298318526,
-                  0.00307858298318526,
-                  0.00307858298318526]},
- 26: {'points': [[-0.83506202914393002, -0.56904567277510198],
-                 [0.91033902310880999, -0.438662094586874],
-                 [-0.075276993964879399, 1.0077077673619801],
-                 [0.83506202914393002, -0.56904567277510198],
-                 [0.075276993964880107, 1.0077077673619801],
-                 [-0.91033902310880999, -0.438662094586874],
-                 [-0.90755758065010295, -0.52685198805474698],
-                 [0.91004599601479796, -0.52254192621275997],
-                 [-0.0024884153646944599, 1.0493939142675099],
-                 [0.90755758065010295, -0.52685198805474698],
-                 [0.0024884153646951299, 1.0493939142675099],
-                 [-0.91004599601479796, -0.52254192621275997],
-                 [-0.79978863227060104, -0.46175818213623498],
-                 [0.79978863227060204, -0.46175818213623399],
-                 [0.0, 0.92351636427246897],
-                 [-0.82303054094670403, -0.53195431906859003],
-                 [0.87220122443960402, -0.44678819701599898],
-                 [-0.0491706834928997, 0.97874251608458995],
-                 [0.82303054094670403, -0.53195431906859003],
-                 [0.0491706834929002, 0.97874251608458995],
-                 [-0.87220122443960402, -0.44678819701599898],
-                 [-0.92810181341106002, -0.56748083945007899],
-                 [0.95550372983021703, -0.52001932798734396],
-                 [-0.0274019164191566, 1.0875001674374201],
-                 [0.92810181341106002, -0.56748083945007899],
-                 [0.027401916419157499, 1.0875001674374201],
-                 [-0.95550372983021803, -0.52001932798734296],
-                 [-0.98097965052376901, -0.56636886529944397],
-                 [0.98097965052377001, -0.56636886529944297],
-                 [0.0, 1.1327377305988899],
-                 [-0.69330289802874401, -0.50508092946854799],
-                 [0.78406436490119102, -0.34787745747599103],
-                 [-0.0907614668724461, 0.85295838694453896],
-                 [0.69330289802874401, -0.50508092946854799],
-                 [0.0907614668724466, 0.85295838694453896],
-                 [-0.78406436490119102, -0.34787745747599103],
-                 [-0.682580075064668, -0.40406610454040398],
-                 [0.69122154887254295, -0.38909863285288998],
-                 [-0.0086414738078742798, 0.79316473739329396],
-                 [0.682580075064668, -0.40406610454040398],
-                 [0.0086414738078748297, 0.79316473739329396],
-                 [-0.69122154887254295, -0.38909863285288898],
-                 [0.0, -0.55571014035627997],
-                 [0.48125909868915401, 0.27785507017813998],
-                 [-0.48125909868915401, 0.27785507017813998],
-                 [-0.37884097121369797, -0.368439996445587],
-                 [0.508498882298976, -0.143865906842638],
-                 [-0.12965791108527699, 0.51230590328822501],
-                 [0.37884097121369797, -0.368439996445587],
-                 [0.12965791108527799, 0.51230590328822501],
-                 [-0.508498882298976, -0.143865906842638],
-                 [-0.19241793339756899, -0.526189051999293],
-                 [0.55190205292342298, 0.096455707533649696],
-                 [-0.35948411952585402, 0.42973334446564299],
-                 [0.19241793339756899, -0.526189051999293],
-                 [0.35948411952585402, 0.42973334446564299],
-                 [-0.55190205292342298, 0.096455707533650195],
-                 [-0.195602941980832, -0.42600632803846],
-                 [0.46673377324464999, 0.043606047208855497],
-                 [-0.27113083126381698, 0.38240028082960498],
-                 [0.195602941980833, -0.42600632803846],
-                 [0.27113083126381698, 0.38240028082960498],
-                 [-0.46673377324464899, 0.0436060472088559],
-                 [0.0, -0.19209885829653001],
-                 [0.166362491322782, 0.096049429148265197],
-                 [-0.166362491322782, 0.096049429148265295],
-                 [-0.54994973953459703, -0.44517417854698799],
-                 [0.66050701749786001, -0.25368335596810299],
-                 [-0.11055727796326199, 0.69885753451509103],
-                 [0.54994973953459703, -0.44517417854698799],
-                 [0.11055727796326199, 0.69885753451509103],
-                 [-0.66050701749786001, -0.25368335596810199],
-                 [-0.18055869721276399, -0.10424561244031701],
-                 [0.18055869721276399, -0.10424561244031701],
-                 [0.0, 0.20849122488063501],
-                 [-0.168530649854017, -0.57378652101945704],
-                 [0.58117902847895198, 0.14094143641984999],
-                 [-0.41264837862493498, 0.43284508459960802],
-                 [0.168530649854016, -0.57378652101945704],
-                 [0.41264837862493597, 0.43284508459960702],
-                 [-0.58117902847895198, 0.14094143641985099],
-                 [-0.19069066073587401, -0.28207244982265001],
-                 [0.33962723762206298, -0.024106731550381],
-                 [-0.14893657688619, 0.30617918137303202],
-                 [0.19069066073587401, -0.28207244982265001],
-                 [0.14893657688619, 0.30617918137303202],
-                 [-0.33962723762206298, -0.0241067315503809],
-                 [-0.70452513950898799, -0.56349454153453604],
-                 [0.840263157617267, -0.32838939765229103],
-                 [-0.13573801810827901, 0.89188393918682696],
-                 [0.70452513950898799, -0.56349454153453604],
-                 [0.13573801810828001, 0.89188393918682696],
-                 [-0.840263157617268, -0.32838939765229003],
-                 [0.0, -0.47976154988972602],
-                 [0.41548568996349799, 0.23988077494486301],
-                 [-0.41548568996349799, 0.23988077494486301],
-                 [-0.53739570890636701, -0.31026555719844101],
-                 [0.53739570890636701, -0.31026555719844101],
-                 [0.0, 0.62053111439688202],
-                 [-0.38125784859592099, -0.48872837635331601],
-                 [0.61388011377025398, -0.085814794099611194],
-                 [-0.23262226517433199, 0.57454317045292702],
-                 [0.38125784859592099, -0.48872837635331601],
-                 [0.23262226517433299, 0.57454317045292702],
-                 [-0.61388011377025398, -0.085814794099610694],
-                 [-0.363870510093383, -0.210080736952581],
-                 [0.363870510093383, -0.210080736952581],
-                 [0.0, 0.42016147390516301],
-                 [0.0, -0.35559725708670198],
-                 [0.30795625815314998, 0.17779862854335099],
-                 [-0.30795625815314998, 0.17779862854335099],
-                 [-0.54412206780215, -0.53788618565697899],
-                 [0.73788413502473205, -0.202280440647891],
-                 [-0.19376206722258099, 0.74016662630487096],
-                 [0.54412206780215, -0.53788618565697899],
-                 [0.19376206722258199, 0.74016662630486996],
-                 [-0.73788413502473205, -0.202280440647891],
-                 [0.0, 2.2204460492503101e-16],
-                 [-0.36472969593802701, -0.56094203589043601],
-                 [0.66815490110069298, -0.035394164251687101],
-                 [-0.30342520516266602, 0.59633620014212296],
-                 [0.36472969593802601, -0.56094203589043601],
-                 [0.30342520516266702, 0.59633620014212296],
-                 [-0.66815490110069298, -0.035394164251686497],
-                 [-0.54666639745238899, -0.57654658422239302],
-                 [0.77263718712793095, -0.18515369547789401],
-                 [-0.22597078967554199, 0.76170027970028698],
-                 [0.54666639745238899, -0.57654658422239302],
-                 [0.22597078967554199, 0.76170027970028698],
-                 [-0.77263718712793095, -0.18515369547789301]],
-      'weights': [0.0024223188639424299,
-                  0.0024223188639424299,
-                  0.0024223188639424299,
-                  0.0024223188639424299,
-                  0.0024223188639424299,
-                  0.0024223188639424299,
-                  0.0020880994398929202,
-                  0.0020880994398929202,
-                  0.0020880994398929202,
-                  0.0020880994398929202,
-                  0.0020880994398929202,
-                  0.0020880994398929202,
-                  0.00851099508425468,
-                  0.00851099508425468,
-                  0.00851099508425468,
-                  0.0057253713895506902,
-                  0.0057253713895506902,
-                  0.0057253713895506902,
-                  0.0057253713895506902,
-                  0.0057253713895506902,
-                  0.0057253713895506902,
-                  0.0018805002802209901,
-                  0.0018805002802209901,
-                  0.0018805002802209901,
-                  0.0018805002802209901,
-                  0.0018805002802209901,
-                  0.0018805002802209901,
-                  0.00091270957129977403,
-                  0.00091270957129977403,
-                  0.00091270957129977403,
-                  0.011091356913543999,
-                  0.011091356913543999,
-                  0.011091356913543999,
-                  0.011091356913543999,
-                  0.011091356913543999,
-                  0.011091356913543999,
-                  0.0079920480211343303,
-                  0.0079920480211343303,
-                  0.0079920480211343303,
-                  0.0079920480211343303,
-                  0.0079920480211343303,
-                  0.0079920480211343303,
-                  0.0091836090928120798,
-                  0.0091836090928120798,
-                  0.0091836090928120798,
-                  0.024905978216277502,
-                  0.024905978216277502,
-                  0.024905978216277502,
-                  0.024905978216277502,
-                  0.024905978216277502,
-                  0.024905978216277502,
-                  0.014306336478686199,
-                  0.014306336478686199,
-                  0.014306336478686199,
-                  0.014306336478686199,
-                  0.014306336478686199,
-                  0.014306336478686199,
-                  0.0237775211144431,
-                  0.0237775211144431,
-                  0.0237775211144431,
-                  0.0237775211144431,
-                  0.0237775211144431,
-                  0.0237775211144431,
-                  0.033719682619198298,
-                  0.033719682619198298,
-                  0.033719682619198298,
-                  0.018009250333889299,
-                  0.018009250333889299,
-                  0.018009250333889299,
-                  0.018009250333889299,
-                  0.018009250333889299,
-                  0.018009250333889299,
-                  0.033836733029791399,
-                  0.033836733029791399,
-                  0.033836733029791399,
-                  0.0032166737769167299,
-                  0.0032166737769167299,
-                  0.0032166737769167299,
-                  0.0032166737769167299,
-                  0.0032166737769167299,
-                  0.0032166737769167299,
-                  0.030482651727862801,
-                  0.030482651727862801,
-                  0.030482651727862801,
-                  0.030482651727862801,
-                  0.030482651727862801,
-                  0.030482651727862801,
-                  0.0051385819336685901,
-                  0.0051385819336685901,
-                  0.0051385819336685901,
-                  0.0051385819336685901,
-                  0.0051385819336685901,
-                  0.0051385819336685901,
-                  0.0199679540304682,
-                  0.0199679540304682,
-                  0.0199679540304682,
-                  0.022958782832387802,
-                  0.022958782832387802,
-                  0.022958782832387802,
-                  0.0175060530347983,
-                  0.0175060530347983,
-                  0.0175060530347983,
-                  0.0175060530347983,
-                  0.0175060530347983,
-                  0.0175060530347983,
-                  0.029348466576990299,
-                  0.029348466576990299,
-                  0.029348466576990299,
-                  0.0284271117178563,
-                  0.0284271117178563,
-                  0.0284271117178563,
-                  0.010858811679226,
-                  0.010858811679226,
-                  0.010858811679226,
-                  0.010858811679226,
-                  0.010858811679226,
-                  0.010858811679226,
-                  0.0354839404820552,
-                  0.0079528124128934695,
-                  0.0079528124128934695,
-                  0.0079528124128934695,
-                  0.0079528124128934695,
-                  0.0079528124128934695,
-                  0.0079528124128934695,
-                  0.00197375661999378,
-                  0.00197375661999378,
-                  0.00197375661999378,
-                  0.00197375661999378,
-                  0.00197375661999378,
-                  0.00197375661999378]},
- 27: {'points': [[0.0, -0.16413151730008799],
-                 [0.14214206354356199, 0.082065758650044299],
-                 [-0.14214206354356199, 0.082065758650044396],
-                 [0.0, -0.39260212186133903],
-                 [0.34000341111159399, 0.19630106093067001],
-                 [-0.34000341111159399, 0.19630106093067001],
-                 [0.0, -0.28685548406622902],
-                 [0.24842413641623701, 0.14342774203311501],
-                 [-0.24842413641623601, 0.14342774203311501],
-                 [-0.75908605663468398, -0.438258539136127],
-                 [0.75908605663468498, -0.438258539136126],
-                 [0.0, 0.876517078272254],
-                 [-0.39518500208573398, -0.52412330045467304],
-                 [0.65149659395195803, -0.080178600773515504],
-                 [-0.25631159186622399, 0.60430190122818905],
-                 [0.39518500208573398, -0.52412330045467304],
-                 [0.25631159186622399, 0.60430190122818905],
-                 [-0.65149659395195803, -0.080178600773515102],
-                 [-0.18067167650541299, -0.35365133466807502],
-                 [0.39660687815753198, 0.020359405736025502],
-                 [-0.21593520165211899, 0.33329192893205001],
-                 [0.18067167650541299, -0.35365133466807502],
-                 [0.21593520165211899, 0.33329192893205001],
-                 [-0.39660687815753198, 0.0203594057360258],
-                 [-0.29979877999038701, -0.17308890633017099],
-                 [0.29979877999038701, -0.17308890633017099],
-                 [0.0, 0.34617781266034298],
-                 [-0.22010619980742599, -0.52879484695937695],
-                 [0.568002870760838, 0.073779862916003899],
-                 [-0.34789667095341198, 0.45501498404337398],
-                 [0.22010619980742699, -0.52879484695937695],
-                 [0.34789667095341198, 0.45501498404337398],
-                 [-0.568002870760838, 0.073779862916004205],
-                 [-0.096503604500472601, -0.055716382036116799],
-                 [0.096503604500472601, -0.055716382036116702],
-                 [0.0, 0.111432764072234],
-                 [-0.47566010093529998, -0.27462248731776001],
-                 [0.47566010093529998, -0.27462248731776001],
-                 [0.0, 0.54924497463552002],
-                 [-0.15697790099606701, -0.215124888345503],
-                 [0.26479256879153101, -0.0283844059226009],
-                 [-0.107814667795463, 0.243509294268105],
-                 [0.15697790099606701, -0.215124888345503],
-                 [0.107814667795463, 0.243509294268105],
-                 [-0.26479256879153101, -0.028384405922600699],
-                 [-0.119504301064822, -0.462967516857265],
-                 [0.46069378125780303, 0.12798999784499401],
-                 [-0.34118948019298101, 0.33497751901227202],
-                 [0.119504301064822, -0.462967516857265],
-                 [0.34118948019298101, 0.33497751901227202],
-                 [-0.46069378125780303, 0.12798999784499401],
-                 [-0.53186222626516999, -0.50628322547494498],
-                 [0.70438524790381196, -0.20746458652151201],
-                 [-0.172523021638642, 0.71374781199645798],
-                 [0.53186222626516999, -0.50628322547494498],
-                 [0.172523021638642, 0.71374781199645798],
-                 [-0.70438524790381296, -0.20746458652151201],
-                 [-0.33699460349041599, -0.56817102280382703],
-                 [0.66054784118750898, -0.0077603761590505603],
-                 [-0.32355323769709299, 0.57593139896287804],
-                 [0.33699460349041599, -0.56817102280382703],
-                 [0.32355323769709399, 0.57593139896287704],
-                 [-0.66054784118750898, -0.0077603761590500104],
-                 [0.0, -0.52734615007802199],
-                 [0.45669516255548798, 0.263673075039011],
-                 [-0.45669516255548798, 0.263673075039011],
-                 [-0.658335392300752, -0.46810290449456399],
-                 [0.73455670302794895, -0.336083721695563],
-                 [-0.076221310727197497, 0.80418662619012804],
-                 [0.658335392300752, -0.46810290449456399],
-                 [0.076221310727198094, 0.80418662619012804],
-                 [-0.73455670302794995, -0.336083721695563],
-                 [-0.90228543945945505, -0.52093474135779705],
-                 [0.90228543945945505, -0.52093474135779605],
-                 [-1.11022302462516e-16, 1.0418694827155901],
-                 [-0.34054463966780402, -0.319339042924285],
-                 [0.44682804342654198, -0.13525078761279399],
-                 [-0.106283403758738, 0.45458983053707902],
-                 [0.34054463966780402, -0.319339042924285],
-                 [0.106283403758738, 0.45458983053707902],
-                 [-0.44682804342654198, -0.13525078761279299],
-                 [-0.48855088636612098, -0.41333011108690498],
-                 [0.60222981953336496, -0.21643242309101299],
-                 [-0.11367893316724299, 0.62976253417791905],
-                 [0.48855088636612098, -0.41333011108690498],
-                 [0.11367893316724401, 0.62976253417791905],
-                 [-0.60222981953336496, -0.21643242309101199],
-                 [-0.114398179092309, -0.56768418377653096],
-                 [0.54882801402326398, 0.18477036264764399],
-                 [-0.43442983493095499, 0.382913821128888],
-                 [0.114398179092309, -0.56768418377653096],
-                 [0.43442983493095499, 0.382913821128887],
-                 [-0.54882801402326398, 0.18477036264764499],
-                 [-0.61728729428596696, -0.35639098552333898],
-                 [0.61728729428596696, -0.35639098552333898],
-                 [-1.11022302462516e-16, 0.71278197104667795],
-                 [-0.32048121511116201, -0.447313259700438],
-                 [0.54762525390578598, -0.053888243871751999],
-                 [-0.227144038794625, 0.50120150357219095],
-                 [0.32048121511116201, -0.447313259700438],
-                 [0.227144038794625, 0.50120150357219095],
-                 [-0.54762525390578598, -0.053888243871751597],
-                 [-0.82912386550847395, -0.56525617363432301],
-                 [0.90408813876754801, -0.43541424359712899],
-                 [-0.074964273259074302, 1.00067041723145],
-                 [0.82912386550847395, -0.56525617363432301],
-                 [0.074964273259074996, 1.00067041723145],
-                 [-0.90408813876754801, -0.43541424359712799],
-                 [-0.92517649077195097, -0.56679589738285796],
-                 [0.95344789128032803, -0.51782839530122005],
-                 [-0.0282714005083767, 1.0846242926840799],
-                 [0.92517649077195097, -0.56679589738285796],
-                 [0.028271400508377498, 1.0846242926840799],
-                 [-0.95344789128032903, -0.51782839530122005],
-                 [-0.80474142977810004, -0.51666886935781797],
-                 [0.84981908109750404, -0.43859208698673702],
-                 [-0.045077651319403299, 0.95526095634455499],
-                 [0.80474142977810004, -0.51666886935781797],
-                 [0.045077651319404, 0.95526095634455499],
-                 [-0.84981908109750404, -0.43859208698673602],
-                 [-0.980082342457123, -0.56585080424561995],
-                 [0.980082342457124, -0.56585080424561895],
-                 [0.0, 1.1317016084912399],
-                 [-0.68622113488411596, -0.54383161967864202],
-                 [0.81408256546499902, -0.32236912558411102],
-                 [-0.12786143058088301, 0.86620074526275403],
-                 [0.68622113488411596, -0.54383161967864202],
-                 [0.12786143058088401, 0.86620074526275403],
-                 [-0.81408256546500002, -0.32236912558411102],
-                 [-0.533228220935273, -0.56465005418958403],
-                 [0.75561540164407603, -0.179464158249936],
-                 [-0.22238718070880201, 0.74411421243952003],
-                 [0.533228220935273, -0.56465005418958403],
-                 [0.22238718070880301, 0.74411421243952003],
-                 [-0.75561540164407603, -0.179464158249935],
-                 [-0.704198629316797, -0.57650099541315203],
-                 [0.85136382199320404, -0.32160340459195202],
-                 [-0.14716519267640699, 0.89810440000510405],
-                 [0.704198629316797, -0.57650099541315203],
-                 [0.14716519267640699, 0.89810440000510405],
-                 [-0.85136382199320404, -0.32160340459195103]],
-      'weights': [0.016558552888316001,
-                  0.016558552888316001,
-                  0.016558552888316001,
-                  0.016298874897317399,
-                  0.016298874897317399,
-                  0.016298874897317399,
-                  0.020871605448568,
-                  0.020871605448568,
-                  0.020871605448568,
-                  0.0090285259243376697,
-                  0.0090285259243376697,
-                  0.0090285259243376697,
-                  0.0095813497091309999,
-                  0.0095813497091309999,
-                  0.0095813497091309999,
-                  0.0095813497091309999,
-                  0.0095813497091309999,
-                  0.0095813497091309999,
-                  0.0217501175181961,
-                  0.0217501175181961,
-                  0.0217501175181961,
-                  0.0217501175181961,
-                  0.0217501175181961,
-                  0.0217501175181961,
-                  0.023333002714206401,
-                  0.023333002714206401,
-                  0.023333002714206401,
-                  0.0110767293976163,
-                  0.0110767293976163,
-                  0.0110767293976163,
-                  0.0110767293976163,
-                  0.0110767293976163,
-                  0.0110767293976163,
-                  0.0272762768491762,
-                  0.0272762768491762,
-                  0.0272762768491762,
-                  0.019541763720894299,
-                  0.019541763720894299,
-                  0.019541763720894299,
-                  0.023755757921100299,
-                  0.023755757921100299,
-                  0.023755757921100299,
-                  0.023755757921100299,
-                  0.023755757921100299,
-                  0.023755757921100299,
-                  0.0170819529240583,
-                  0.0170819529240583,
-                  0.0170819529240583,
-                  0.0170819529240583,
-                  0.0170819529240583,
-                  0.0170819529240583,
-                  0.0111810338531417,
-                  0.0111810338531417,
-                  0.0111810338531417,
-                  0.0111810338531417,
-                  0.0111810338531417,
-                  0.0111810338531417,
-                  0.0050711440143755802,
-                  0.0050711440143755802,
-                  0.0050711440143755802,
-                  0.0050711440143755802,
-                  0.0050711440143755802,
-                  0.0050711440143755802,
-                  0.012327416808628901,
-                  0.012327416808628901,
-                  0.012327416808628901,
-                  0.0123506226480082,
-                  0.0123506226480082,
-                  0.0123506226480082,
-                  0.0123506226480082,
-                  0.0123506226480082,
-                  0.0123506226480082,
-                  0.0048104931740180499,
-                  0.0048104931740180499,
-                  0.0048104931740180499,
-                  0.021386779897396801,
-                  0.021386779897396801,
-                  0.021386779897396801,
-                  0.021386779897396801,
-                  0.021386779897396801,
-                  0.021386779897396801,
-                  0.0185220327421446,
-                  0.0185220327421446,
-                  0.0185220327421446,
-                  0.0185220327421446,
-                  0.0185220327421446,
-                  0.0185220327421446,
-                  0.0056161186210071301,
-                  0.0056161186210071301,
-                  0.0056161186210071301,
-                  0.0056161186210071301,
-                  0.0056161186210071301,
-                  0.0056161186210071301,
-                  0.016875795236907801,
-                  0.016875795236907801,
-                  0.016875795236907801,
-                  0.0189323737707018,
-                  0.0189323737707018,
-                  0.0189323737707018,
-                  0.0189323737707018,
-                  0.0189323737707018,
-                  0.0189323737707018,
-                  0.0034902956399728499,
-                  0.0034902956399728499,
-                  0.0034902956399728499,
-                  0.0034902956399728499,
-                  0.0034902956399728499,
-                  0.0034902956399728499,
-                  0.0020728726950330601,
-                  0.0020728726950330601,
-                  0.0020728726950330601,
-                  0.0020728726950330601,
-                  0.0020728726950330601,
-                  0.0020728726950330601,
-                  0.0074948575696246701,
-                  0.0074948575696246701,
-                  0.0074948575696246701,
-                  0.0074948575696246701,
-                  0.0074948575696246701,
-                  0.0074948575696246701,
-                  0.00099669548345096993,
-                  0.00099669548345096993,
-                  0.00099669548345096993,
-                  0.0080062093298564306,
-                  0.0080062093298564306,
-                  0.0080062093298564306,
-                  0.0080062093298564306,
-                  0.0080062093298564306,
-                  0.0080062093298564306,
-                  0.0058790199293943801,
-                  0.0058790199293943801,
-                  0.0058790199293943801,
-                  0.0058790199293943801,
-                  0.0058790199293943801,
-                  0.0058790199293943801,
-                  0.0014663648411425399,
-                  0.0014663648411425399,
-                  0.0014663648411425399,
-                  0.0014663648411425399,
-                  0.0014663648411425399,
-                  0.0014663648411425399]},
- 28: {'points': [[-0.088051232450547606, -0.050836402757801803],
-                 [0.088051232450547606, -0.050836402757801803],
-                 [0.0, 0.101672805515604],
-                 [-0.88746481351385098, -0.54006894012803597],
-                 [0.91144582870274105, -0.49853260340379701],
-                 [-0.0239810151888897, 1.0386015435318301],
-                 [0.88746481351385098, -0.54006894012803597],
-                 [0.023981015188890599, 1.0386015435318301],
-                 [-0.91144582870274204, -0.49853260340379602],
-                 [-0.524141421108266, -0.492359108751727],
-                 [0.688466206517794, -0.20774023147957199],
-                 [-0.164324785409528, 0.70009934023129905],
-                 [0.524141421108266, -0.492359108751727],
-                 [0.164324785409528, 0.70009934023129905],
-                 [-0.688466206517794, -0.20774023147957099],
-                 [-0.98558762141002598, -0.56902927853104202],
-                 [0.98558762141002598, -0.56902927853104102],
-                 [0.0, 1.13805855706208],
-                 [0.0, -0.43282761808513498],
-                 [0.37483971272123601, 0.21641380904256799],
-                 [-0.37483971272123601, 0.21641380904256799],
-                 [-0.33813652586498999, -0.26963680688236202],
-                 [0.40258058748794001, -0.15801641790531401],
-                 [-0.064444061622949203, 0.42765322478767698],
-                 [0.33813652586498999, -0.26963680688236202],
-                 [0.064444061622949605, 0.42765322478767698],
-                 [-0.40258058748794001, -0.15801641790531401],
-                 [0.0, -0.18337097274071901],
-                 [0.158803920710126, 0.091685486370359601],
-                 [-0.158803920710126, 0.091685486370359698],
-                 [-0.15580617966892299, -0.248585624186239],
-                 [0.29318455539535598, -0.010639297566770199],
-                 [-0.13737837572643299, 0.25922492175300998],
-                 [0.15580617966892299, -0.248585624186239],
-                 [0.13737837572643299, 0.25922492175300998],
-                 [-0.29318455539535598, -0.0106392975667698],
-                 [-0.711545284110362, -0.56962812500573701],
-                 [0.84908506902024705, -0.33140222947972098],
-                 [-0.137539784909884, 0.90103035448545898],
-                 [0.711545284110362, -0.56962812500573701],
-                 [0.137539784909885, 0.90103035448545898],
-                 [-0.84908506902024705, -0.33140222947972098],
-                 [-0.56152923713272496, -0.42548755921389902],
-                 [0.64924765383983396, -0.27355480471768601],
-                 [-0.087718416707109406, 0.69904236393158503],
-                 [0.56152923713272496, -0.42548755921389902],
-                 [0.087718416707109906, 0.69904236393158503],
-                 [-0.64924765383983396, -0.27355480471768601],
-                 [-0.15254044569676001, -0.46791873168797898],
-                 [0.481499731396764, 0.101855464765994],
-                 [-0.32895928570000399, 0.36606326692198499],
-                 [0.15254044569676001, -0.46791873168797898],
-                 [0.32895928570000399, 0.36606326692198499],
-                 [-0.481499731396764, 0.101855464765995],
-                 [-0.22520778354861301, -0.13002377445539101],
-                 [0.22520778354861301, -0.13002377445539101],
-                 [0.0, 0.26004754891078202],
-                 [-0.32755930579423398, -0.57016318648548503],
-                 [0.65755545669623106, 0.00140691317894104],
-                 [-0.32999615090199702, 0.56875627330654499],
-                 [0.32755930579423398, -0.57016318648548503],
-                 [0.32999615090199802, 0.56875627330654399],
-                 [-0.65755545669623106, 0.00140691317894148],
-                 [-0.62891280297171903, -0.53786850890931803],
-                 [0.780264194096985, -0.27572020968412803],
-                 [-0.15135139112526599, 0.81358871859344595],
-                 [0.62891280297171903, -0.53786850890931803],
-                 [0.15135139112526599, 0.81358871859344595],
-                 [-0.780264194096986, -0.27572020968412703],
-                 [-0.42562113948455499, -0.53803125336295898],
-                 [0.678759303184582, -0.099583092499824694],
-                 [-0.25313816370002701, 0.63761434586278398],
-                 [0.42562113948455499, -0.53803125336295898],
-                 [0.25313816370002701, 0.63761434586278398],
-                 [-0.678759303184582, -0.099583092499824194],
-                 [-0.94140501712803104, -0.56669876546504006],
-                 [0.96147803575002, -0.53193127735047996],
-                 [-0.0200730186219878, 1.09863004281552],
-                 [0.94140501712803104, -0.56669876546504006],
-                 [0.020073018621988601, 1.09863004281552],
-                 [-0.96147803575002, -0.53193127735047896],
-                 [-0.40187196592587698, -0.38330233101247302],
-                 [0.53288553894953195, -0.156380166054367],
-                 [-0.13101357302365499, 0.53968249706684002],
-                 [0.40187196592587698, -0.38330233101247302],
-                 [0.13101357302365499, 0.53968249706684002],
-                 [-0.53288553894953195, -0.156380166054367],
-                 [-0.53523254211119897, -0.56906848596694104],
-                 [0.76044403639611902, -0.17899073541695201],
-                 [-0.22521149428491999, 0.74805922138389302],
-                 [0.53523254211119897, -0.56906848596694104],
-                 [0.22521149428491999, 0.74805922138389302],
-                 [-0.76044403639611902, -0.17899073541695101],
-                 [-0.682312467464117, -0.39393328676184602],
-                 [0.682312467464117, -0.39393328676184602],
-                 [0.0, 0.78786657352369205],
-                 [0.0, -0.33331193876680698],
-                 [0.28865660635669799, 0.16665596938340399],
-                 [-0.28865660635669799, 0.16665596938340399],
-                 [-0.346334696075564, -0.46918587486573199],
-                 [0.57949423476833295, -0.0653417075805348],
-                 [-0.23315953869276901, 0.53452758244626797],
-                 [0.346334696075564, -0.46918587486573199],
-                 [0.23315953869276901, 0.53452758244626697],
-                 [-0.57949423476833295, -0.065341707580534397],
-                 [-0.70700191257838996, -0.49038194407928198],
-                 [0.77818417741905299, -0.36709064477742898],
-                 [-0.071182264840662798, 0.85747258885671096],
-                 [0.70700191257838996, -0.49038194407928198],
-                 [0.071182264840663506, 0.85747258885671096],
-                 [-0.77818417741905299, -0.36709064477742898],
-                 [-0.226624400636702, -0.53278806818989199],
-                 [0.57472020220403297, 0.070131546026139704],
-                 [-0.348095801567331, 0.46265652216375203],
-                 [0.226624400636702, -0.53278806818989199],
-                 [0.348095801567331, 0.46265652216375203],
-                 [-0.57472020220403297, 0.070131546026140107],
-                 [-0.10878662096604701, -0.56757013000065204],
-                 [0.545923461492824, 0.18957308765186101],
-                 [-0.43713684052677698, 0.377997042348792],
-                 [0.10878662096604701, -0.56757013000065204],
-                 [0.43713684052677698, 0.377997042348791],
-                 [-0.545923461492824, 0.18957308765186101],
-                 [-0.20631360388374001, -0.37281400062453801],
-                 [0.426023197369227, 0.0077341782026301197],
-                 [-0.21970959348548699, 0.36507982242190801],
-                 [0.20631360388374001, -0.37281400062453801],
-                 [0.21970959348548699, 0.36507982242190801],
-                 [-0.426023197369228, 0.00773417820263034],
-                 [-0.79729933059714098, -0.54575369430987397],
-                 [0.87128622878012796, -0.41760462756251399],
-                 [-0.073986898182987204, 0.96335832187238901],
-                 [0.79729933059714098, -0.54575369430987397],
-                 [0.073986898182987607, 0.96335832187238901],
-                 [-0.87128622878012896, -0.41760462756251399],
-                 [0.0, -0.52483841201603298],
-                 [0.454523397687769, 0.26241920600801599],
-                 [-0.454523397687768, 0.26241920600801699],
-                 [-0.52408693341082102, -0.30258173208350297],
-                 [0.52408693341082102, -0.30258173208350297],
-                 [0.0, 0.60516346416700595],
-                 [-0.81748242282172301, -0.47197369687391],
-                 [0.81748242282172401, -0.471973696873909],
-                 [-2.2204460492503101e-16, 0.94394739374782],
-                 [-0.85821826344224705, -0.57527136550578095],
-                 [0.92730874831889298, -0.45560313537986202],
-                 [-0.069090484876645195, 1.0308745008856399],
-                 [0.85821826344224705, -0.57527136550578095],
-                 [0.069090484876645805, 1.0308745008856399],
-                 [-0.92730874831889298, -0.45560313537986102]],
-      'weights': [0.024876521354714898,
-                  0.024876521354714898,
-                  0.024876521354714898,
-                  0.00366768610094024,
-                  0.00366768610094024,
-                  0.00366768610094024,
-                  0.00366768610094024,
-                  0.00366768610094024,
-                  0.00366768610094024,
-                  0.0102116038549518,
-                  0.0102116038549518,
-                  0.0102116038549518,
-                  0.0102116038549518,
-                  0.0102116038549518,
-                  0.0102116038549518,
-                  0.00053890198945989699,
-                  0.00053890198945989699,
-                  0.00053890198945989699,
-                  0.015331602812479,
-                  0.015331602812479,
-                  0.015331602812479,
-                  0.0217498057709445,
-                  0.0217498057709445,
-                  0.0217498057709445,
-                  0.0217498057709445,
-                  0.0217498057709445,
-                  0.0217498057709445,
-                  0.024613457633603099,
-                  0.024613457633603099,
-                  0.024613457633603099,
-                  0.022700455552736198,
-                  0.022700455552736198,
-                  0.022700455552736198,
-                  0.022700455552736198,
-                  0.022700455552736198,
-                  0.022700455552736198,
-                  0.0030811372475020899,
-                  0.0030811372475020899,
-                  0.0030811372475020899,
-                  0.0030811372475020899,
-                  0.0030811372475020899,
-                  0.0030811372475020899,
-                  0.013877068591204701,
-                  0.013877068591204701,
-                  0.013877068591204701,
-                  0.013877068591204701,
-                  0.013877068591204701,
-                  0.013877068591204701,
-                  0.014661283082378599,
-                  0.014661283082378599,
-                  0.014661283082378599,
-                  0.014661283082378599,
-                  0.014661283082378599,
-                  0.014661283082378599,
-                  0.022677305767027801,
-                  0.022677305767027801,
-                  0.022677305767027801,
-                  0.0041166764692494697,
-                  0.0041166764692494697,
-                  0.0041166764692494697,
-                  0.0041166764692494697,
-                  0.0041166764692494697,
-                  0.0041166764692494697,
-                  0.0074078814252933499,
-                  0.0074078814252933499,
-                  0.0074078814252933499,
-                  0.0074078814252933499,
-                  0.0074078814252933499,
-                  0.0074078814252933499,
-                  0.0088876331334176092,
-                  0.0088876331334176092,
-                  0.0088876331334176092,
-                  0.0088876331334176092,
-                  0.0088876331334176092,
-                  0.0088876331334176092,
-                  0.00164292021067346,
-                  0.00164292021067346,
-                  0.00164292021067346,
-                  0.00164292021067346,
-                  0.00164292021067346,
-                  0.00164292021067346,
-                  0.0177465692985396,
-                  0.0177465692985396,
-                  0.0177465692985396,
-                  0.0177465692985396,
-                  0.0177465692985396,
-                  0.0177465692985396,
-                  0.00402623067575045,
-                  0.00402623067575045,
-                  0.00402623067575045,
-                  0.00402623067575045,
-                  0.00402623067575045,
-                  0.00402623067575045,
-                  0.013527218722957301,
-                  0.013527218722957301,
-                  0.013527218722957301,
-                  0.023465123905356499,
-                  0.023465123905356499,
-                  0.023465123905356499,
-                  0.015458754618412,
-                  0.015458754618412,
-                  0.015458754618412,
-                  0.015458754618412,
-                  0.015458754618412,
-                  0.015458754618412,
-                  0.010250075367004299,
-                  0.010250075367004299,
-                  0.010250075367004299,
-                  0.010250075367004299,
-                  0.010250075367004299,
-                  0.010250075367004299,
-                  0.010843564084166601,
-                  0.010843564084166601,
-                  0.010843564084166601,
-                  0.010843564084166601,
-                  0.010843564084166601,
-                  0.010843564084166601,
-                  0.00543894722331318,
-                  0.00543894722331318,
-                  0.00543894722331318,
-                  0.00543894722331318,
-                  0.00543894722331318,
-                  0.00543894722331318,
-                  0.022147973431975599,
-                  0.022147973431975599,
-                  0.022147973431975599,
-                  0.022147973431975599,
-                  0.022147973431975599,
-                  0.022147973431975599,
-                  0.0055510776764536402,
-                  0.0055510776764536402,
-                  0.0055510776764536402,
-                  0.0055510776764536402,
-                  0.0055510776764536402,
-                  0.0055510776764536402,
-                  0.013305805831488901,
-                  0.013305805831488901,
-                  0.013305805831488901,
-                  0.020685310594920198,
-                  0.020685310594920198,
-                  0.020685310594920198,
-                  0.0088823930261193607,
-                  0.0088823930261193607,
-                  0.0088823930261193607,
-                  0.0012559699608417801,
-                  0.0012559699608417801,
-                  0.0012559699608417801,
-                  0.0012559699608417801,
-                  0.0012559699608417801,
-                  0.0012559699608417801]},
- 29: {'points': [[-0.87938703907162097, -0.57262394724341603],
-                 [0.93560040466392902, -0.475259541973094],
-                 [-0.056213365592307697, 1.0478834892165101],
-                 [0.87938703907162097, -0.57262394724341603],
-                 [0.056213365592308502, 1.0478834892165101],
-                 [-0.93560040466392902, -0.475259541973094],
-                 [-0.143246280114143, -0.305110507202835],
-                 [0.33585659025628101, 0.028500336024948201],
-                 [-0.192610310142138, 0.276610171177887],
-                 [0.143246280114143, -0.305110507202835],
-                 [0.192610310142139, 0.276610171177887],
-                 [-0.33585659025628101, 0.028500336024948301],
-                 [-0.35189538626807199, -0.57371128821577699],
-                 [0.67279624316679498, -0.017894699874799601],
-                 [-0.320900856898722, 0.59160598809057696],
-                 [0.35189538626807199, -0.57371128821577699],
-                 [0.320900856898723, 0.59160598809057696],
-                 [-0.67279624316679498, -0.017894699874799299],
-                 [0.0, -0.57359111146432695],
-                 [0.49674447391305898, 0.28679555573216398],
-                 [-0.49674447391305798, 0.28679555573216398],
-                 [-0.615542482687221, -0.45928362498519099],
-                 [0.70552252812299099, -0.30343361462308099],
-                 [-0.089980045435769401, 0.76271723960827298],
-                 [0.615542482687221, -0.45928362498519099],
-                 [0.089980045435769998, 0.76271723960827198],
-                 [-0.70552252812299099, -0.30343361462308099],
-                 [-0.93007010487368402, -0.55859049859349896],
-                 [0.94878861453142804, -0.52616908882431801],
-                 [-0.018718509657743701, 1.08475958741782],
-                 [0.93007010487368402, -0.55859049859349896],
-                 [0.018718509657744201, 1.08475958741782],
-                 [-0.94878861453142804, -0.52616908882431701],
-                 [-0.197429311166753, -0.198148329459922],
-                 [0.27031614261311798, -0.071904634192109795],
-                 [-0.0728868314463645, 0.27005296365203202],
-                 [0.197429311166753, -0.198148329459922],
-                 [0.072886831446364694, 0.27005296365203202],
-                 [-0.27031614261311798, -0.071904634192109698],
-                 [-0.82766874673327495, -0.54048028336522902],
-                 [0.88190402900553799, -0.44654201890683098],
-                 [-0.054235282272262202, 0.98702230227206],
-                 [0.82766874673327495, -0.54048028336522902],
-                 [0.054235282272262701, 0.98702230227206],
-                 [-0.88190402900553799, -0.44654201890682998],
-                 [-0.72491944440610001, -0.50660081473204699],
-                 [0.80118889733889598, -0.37449824718696001],
-                 [-0.076269452932796106, 0.881099061919007],
-                 [0.72491944440610001, -0.50660081473204699],
-                 [0.076269452932796702, 0.881099061919007],
-                 [-0.80118889733889598, -0.37449824718696001],
-                 [-0.97606406728761796, -0.57457293178871904],
-                 [0.98562678889974298, -0.55800981209788103],
-                 [-0.0095627216121250101, 1.1325827438866001],
-                 [0.97606406728761796, -0.57457293178871904],
-                 [0.0095627216121256797, 1.1325827438866001],
-                 [-0.98562678889974398, -0.55800981209788103],
-                 [0.0, -0.35003739955028701],
-                 [0.30314128028519199, 0.175018699775144],
-                 [-0.30314128028519199, 0.175018699775144],
-                 [-0.876707993118645, -0.50616759582774695],
-                 [0.876707993118646, -0.50616759582774695],
-                 [0.0, 1.0123351916554899],
-                 [-0.48236271621499199, -0.40146746347211099],
-                 [0.58886238026724502, -0.217004634344591],
-                 [-0.106499664052253, 0.61847209781670298],
-                 [0.48236271621499199, -0.40146746347211099],
-                 [0.106499664052253, 0.61847209781670298],
-                 [-0.58886238026724502, -0.217004634344591],
-                 [-0.17405270877030801, -0.50542328918299895],
-                 [0.52473576248192, 0.10197757719891901],
-                 [-0.35068305371161201, 0.40344571198408102],
-                 [0.17405270877030801, -0.50542328918299895],
-                 [0.35068305371161201, 0.40344571198408102],
-                 [-0.52473576248192, 0.10197757719891901],
-                 [-0.18672840783491601, -0.41479896168463398],
-                 [0.45259064219975897, 0.045687936049059102],
-                 [-0.26586223436484302, 0.36911102563557602],
-                 [0.18672840783491601, -0.41479896168463398],
-                 [0.26586223436484402, 0.36911102563557602],
-                 [-0.45259064219975897, 0.045687936049059297],
-                 [-0.49956457122986497, -0.56230562425237496],
-                 [0.73675324090835603, -0.151482797389556],
-                 [-0.237188669678491, 0.71378842164193201],
-                 [0.49956457122986497, -0.56230562425237496],
-                 [0.237188669678492, 0.71378842164193201],
-                 [-0.73675324090835603, -0.151482797389556],
-                 [-0.64840539960610799, -0.54688501268470702],
-                 [0.79781901373698605, -0.28809304166753602],
-                 [-0.149413614130877, 0.83497805435224404],
-                 [0.64840539960610799, -0.54688501268470702],
-                 [0.149413614130878, 0.83497805435224404],
-                 [-0.79781901373698605, -0.28809304166753602],
-                 [-0.374784084602797, -0.21638169213341299],
-                 [0.374784084602797, -0.21638169213341199],
-                 [0.0, 0.43276338426682498],
-                 [-0.76445927822389503, -0.56778324409762204],
-                 [0.87394435234362799, -0.37814953305179799],
-                 [-0.109485074119734, 0.94593277714942003],
-                 [0.76445927822389503, -0.56778324409762204],
-                 [0.109485074119734, 0.94593277714942003],
-                 [-0.87394435234362899, -0.37814953305179799],
-                 [-0.51776234670410903, -0.29893023024587001],
-                 [0.51776234670410903, -0.29893023024587001],
-                 [0.0, 0.59786046049174002],
-                 [-0.34535027682270603, -0.53602539551087203],
-                 [0.63688674799737, -0.0310694151770157],
-                 [-0.29153647117466303, 0.56709481068788803],
-                 [0.34535027682270603, -0.53602539551087203],
-                 [0.29153647117466402, 0.56709481068788803],
-                 [-0.63688674799737, -0.0310694151770151],
-                 [-0.513259365005587, -0.50755670245009599],
-                 [0.69618668068563505, -0.19071729760006001],
-                 [-0.182927315680048, 0.69827400005015605],
-                 [0.513259365005587, -0.50755670245009599],
-                 [0.182927315680049, 0.69827400005015605],
-                 [-0.69618668068563605, -0.19071729760006001],
-                 [-0.355329875851088, -0.459781424185497],
-                 [0.57584733145837297, -0.077833987117864503],
-                 [-0.220517455607285, 0.53761541130336199],
-                 [0.355329875851088, -0.459781424185497],
-                 [0.220517455607286, 0.53761541130336199],
-                 [-0.57584733145837297, -0.077833987117864004],
-                 [0.0, -0.53717224317544598],
-                 [0.46520480879780801, 0.26858612158772299],
-                 [-0.46520480879780801, 0.26858612158772299],
-                 [-0.32573169227336601, -0.33566750808701801],
-                 [0.45356243536505902, -0.114258166282921],
-                 [-0.12783074309169301, 0.44992567436994002],
-                 [0.32573169227336601, -0.33566750808701801],
-                 [0.12783074309169301, 0.44992567436994002],
-                 [-0.45356243536505902, -0.114258166282921],
-                 [-0.092840766354614704, -0.053601641446607798],
-                 [0.092840766354614704, -0.053601641446607597],
-                 [0.0, 0.107203282893216],
-                 [-0.18040262369804999, -0.56337853290640005],
-                 [0.57810143329277497, 0.12545601142132401],
-                 [-0.39769880959472498, 0.43792252148507699],
-                 [0.18040262369804999, -0.56337853290640005],
-                 [0.39769880959472498, 0.43792252148507699],
-                 [-0.57810143329277497, 0.12545601142132501],
-                 [-0.65671956101672302, -0.379157215335098],
-                 [0.65671956101672302, -0.379157215335098],
-                 [0.0, 0.75831443067019599],
-                 [0.0, -0.45528374978288599],
-                 [0.39428729324221701, 0.227641874891443],
-                 [-0.39428729324221701, 0.227641874891443],
-                 [-0.77883435582969995, -0.44966022499240699],
-                 [0.77883435582969995, -0.44966022499240599],
-                 [0.0, 0.89932044998481298],
-                 [0.0, -0.198443989747636],
-                 [0.17185753634979101, 0.099221994873818095],
-                 [-0.17185753634979101, 0.099221994873818206],
-                 [-0.62723509783699305, -0.57713645303871197],
-                 [0.81343237870006502, -0.25463330235269799],
-                 [-0.186197280863072, 0.83176975539140996],
-                 [0.62723509783699305, -0.57713645303871197],
-                 [0.186197280863072, 0.83176975539140996],
-                 [-0.81343237870006602, -0.25463330235269799]],
-      'weights': [0.0013323852304701999,
-                  0.0013323852304701999,
-                  0.0013323852304701999,
-                  0.0013323852304701999,
-                  0.0013323852304701999,
-                  0.0013323852304701999,
-                  0.018103766906687802,
-                  0.018103766906687802,
-                  0.018103766906687802,
-                  0.018103766906687802,
-                  0.018103766906687802,
-                  0.018103766906687802,
-                  0.0023431598138011602,
-                  0.0023431598138011602,
-                  0.0023431598138011602,
-                  0.0023431598138011602,
-                  0.0023431598138011602,
-                  0.0023431598138011602,
-                  0.00262658941042052,
-                  0.00262658941042052,
-                  0.00262658941042052,
-                  0.0111529119343303,
-                  0.0111529119343303,
-                  0.0111529119343303,
-                  0.0111529119343303,
-                  0.0111529119343303,
-                  0.0111529119343303,
-                  0.0022035054022877601,
-                  0.0022035054022877601,
-                  0.0022035054022877601,
-                  0.0022035054022877601,
-                  0.0022035054022877601,
-                  0.0022035054022877601,
-                  0.023461055263765299,
-                  0.023461055263765299,
-                  0.023461055263765299,
-                  0.023461055263765299,
-                  0.023461055263765299,
-                  0.023461055263765299,
-                  0.0047831115649544197,
-                  0.0047831115649544197,
-                  0.0047831115649544197,
-                  0.0047831115649544197,
-                  0.0047831115649544197,
-                  0.0047831115649544197,
-                  0.0078162028950317895,
-                  0.0078162028950317895,
-                  0.0078162028950317895,
-                  0.0078162028950317895,
-                  0.0078162028950317895,
-                  0.0078162028950317895,
-                  0.00046677423782440301,
-                  0.00046677423782440301,
-                  0.00046677423782440301,
-                  0.00046677423782440301,
-                  0.00046677423782440301,
-                  0.00046677423782440301,
-                  0.019348913287678401,
-                  0.019348913287678401,
-                  0.019348913287678401,
-                  0.0049545166232829599,
-                  0.0049545166232829599,
-                  0.0049545166232829599,
-                  0.0162576016279657,
-                  0.0162576016279657,
-                  0.0162576016279657,
-                  0.0162576016279657,
-                  0.0162576016279657,
-                  0.0162576016279657,
-                  0.0135496922332552,
-                  0.0135496922332552,
-                  0.0135496922332552,
-                  0.0135496922332552,
-                  0.0135496922332552,
-                  0.0135496922332552,
-                  0.018412386605652,
-                  0.018412386605652,
-                  0.018412386605652,
-                  0.018412386605652,
-                  0.018412386605652,
-                  0.018412386605652,
-                  0.0052849006680605604,
-                  0.0052849006680605604,
-                  0.0052849006680605604,
-                  0.0052849006680605604,
-                  0.0052849006680605604,
-                  0.0052849006680605604,
-                  0.0066257294330170496,
-                  0.0066257294330170496,
-                  0.0066257294330170496,
-                  0.0066257294330170496,
-                  0.0066257294330170496,
-                  0.0066257294330170496,
-                  0.021718537449065999,
-                  0.021718537449065999,
-                  0.021718537449065999,
-                  0.00301670463191506,
-                  0.00301670463191506,
-                  0.00301670463191506,
-                  0.00301670463191506,
-                  0.00301670463191506,
-                  0.00301670463191506,
-                  0.018310232838491199,
-                  0.018310232838491199,
-                  0.018310232838491199,
-                  0.0098192618661505898,
-                  0.0098192618661505898,
-                  0.0098192618661505898,
-                  0.0098192618661505898,
-                  0.0098192618661505898,
-                  0.0098192618661505898,
-                  0.011400354542296799,
-                  0.011400354542296799,
-                  0.011400354542296799,
-                  0.011400354542296799,
-                  0.011400354542296799,
-                  0.011400354542296799,
-                  0.015898363012476401,
-                  0.015898363012476401,
-                  0.015898363012476401,
-                  0.015898363012476401,
-                  0.015898363012476401,
-                  0.015898363012476401,
-                  0.010625094491302899,
-                  0.010625094491302899,
-                  0.010625094491302899,
-                  0.021682446803749401,
-                  0.021682446803749401,
-                  0.021682446803749401,
-                  0.021682446803749401,
-                  0.021682446803749401,
-                  0.021682446803749401,
-                  0.028250162298592899,
-                  0.028250162298592899,
-                  0.028250162298592899,
-                  0.0063069865999920002,
-                  0.0063069865999920002,
-                  0.0063069865999920002,
-                  0.0063069865999920002,
-                  0.0063069865999920002,
-                  0.0063069865999920002,
-                  0.014155840704289701,
-                  0.014155840704289701,
-                  0.014155840704289701,
-                  0.017862841996651498,
-                  0.017862841996651498,
-                  0.017862841996651498,
-                  0.0097148082059508607,
-                  0.0097148082059508607,
-                  0.0097148082059508607,
-                  0.0275624973838236,
-                  0.0275624973838236,
-                  0.0275624973838236,
-                  0.0011928159763541599,
-                  0.0011928159763541599,
-                  0.0011928159763541599,
-                  0.0011928159763541599,
-                  0.0011928159763541599,
-                  0.0011928159763541599]},
- 30: {'points': [[-0.434057107817093, -0.49449740552349403],
-                 [0.645275869197388, -0.12865577930105601],
-                 [-0.211218761380294, 0.62315318482455095],
-                 [0.434057107817093, -0.49449740552349403],
-                 [0.21121876138029499, 0.62315318482455095],
-                 [-0.645275869197388, -0.12865577930105601],
-                 [-0.99004382519006595, -0.57160206898301202],
-                 [0.99004382519006695, -0.57160206898301102],
-                 [0.0, 1.1432041379660201],
-                 [-0.13719609648588699, -0.43937592123719199],
-                 [0.44910875784554199, 0.100872655761757],
-                 [-0.31191266135965601, 0.33850326547543502],
-                 [0.13719609648588699, -0.43937592123719199],
-                 [0.31191266135965601, 0.33850326547543502],
-                 [-0.44910875784554199, 0.100872655761758],
-                 [-0.23002603213365899, -0.477422366921817],
-                 [0.52847291415601805, 0.039502796101424403],
-                 [-0.29844688202235897, 0.43791957082039301],
-                 [0.23002603213365899, -0.477422366921817],
-                 [0.29844688202235897, 0.43791957082039301],
-                 [-0.52847291415601805, 0.039502796101424799],
-                 [-0.78288277832596598, -0.45199758281041902],
-                 [0.78288277832596598, -0.45199758281041802],
-                 [0.0, 0.90399516562083704],
-                 [-0.35671356772393797, -0.44352953384065102],
-                 [0.56246462749664305, -0.087158244603185803],
-                 [-0.205751059772704, 0.53068777844383797],
-                 [0.35671356772393797, -0.44352953384065102],
-                 [0.205751059772705, 0.53068777844383797],
-                 [-0.56246462749664305, -0.0871582446031854],
-                 [-0.85852626927348397, -0.49567037267141201],
-                 [0.85852626927348397, -0.49567037267141101],
-                 [0.0, 0.99134074534282302],
-                 [-0.49401409080195102, -0.537931591292508],
-                 [0.71286946895847603, -0.158862956815708],
-                 [-0.21885537815652401, 0.69679454810821695],
-                 [0.49401409080195102, -0.537931591292508],
-                 [0.218855378156525, 0.69679454810821695],
-                 [-0.71286946895847603, -0.158862956815708],
-                 [-0.37062552685346001, -0.36290163137317799],
-                 [0.49959479527071798, -0.13952030585949801],
-                 [-0.128969268417258, 0.50242193723267703],
-                 [0.37062552685346001, -0.36290163137317799],
-                 [0.128969268417259, 0.50242193723267703],
-                 [-0.49959479527071798, -0.13952030585949801],
-                 [-0.51430581999606495, -0.37663681425566797],
-                 [0.58332995914388197, -0.25708349830294502],
-                 [-0.069024139147816396, 0.63372031255861305],
-                 [0.51430581999606495, -0.37663681425566797],
-                 [0.069024139147816799, 0.63372031255861305],
-                 [-0.58332995914388197, -0.25708349830294502],
-                 [0.0, -0.46660354209881599],
-                 [0.404090520953376, 0.233301771049408],
-                 [-0.404090520953376, 0.233301771049408],
-                 [-0.96194018597659603, -0.55537642531790699],
-                 [0.96194018597659703, -0.55537642531790699],
-                 [0.0, 1.11075285063581],
-                 [-0.54607380091083801, -0.46213867523774999],
-                 [0.67326073328259695, -0.24184444631103699],
-                 [-0.12718693237175799, 0.70398312154878695],
-                 [0.54607380091083801, -0.46213867523774999],
-                 [0.12718693237175899, 0.70398312154878695],
-                 [-0.67326073328259695, -0.24184444631103699],
-                 [-0.842758721744164, -0.56966207432086502],
-                 [0.91472118880649, -0.44501942513091403],
-                 [-0.071962467062325799, 1.0146814994517801],
-                 [0.842758721744163, -0.56966207432086502],
-                 [0.071962467062326493, 1.0146814994517801],
-                 [-0.91472118880649, -0.44501942513091403],
-                 [-0.63522547533181595, -0.36674759917893202],
-                 [0.63522547533181595, -0.36674759917893202],
-                 [0.0, 0.73349519835786403],
-                 [-0.577240245701932, -0.56927271273635804],
-                 [0.78162475376193297, -0.215268360496465],
-                 [-0.204384508060001, 0.78454107323282396],
-                 [0.577240245701932, -0.56927271273635804],
-                 [0.204384508060001, 0.78454107323282396],
-                 [-0.78162475376193297, -0.215268360496465],
-                 [-0.39821033011703799, -0.56920325339091604],
-                 [0.692049642411803, -0.060258635235284103],
-                 [-0.29383931229476501, 0.629461888626201],
-                 [0.39821033011703799, -0.56920325339091604],
-                 [0.29383931229476601, 0.629461888626201],
-                 [-0.692049642411803, -0.060258635235283402],
-                 [-0.306059853228069, -0.53373365021893704],
-                 [0.615256826558232, 0.00181121713542376],
-                 [-0.30919697333016199, 0.53192243308351295],
-                 [0.306059853228069, -0.53373365021893704],
-                 [0.30919697333016199, 0.53192243308351295],
-                 [-0.615256826558232, 0.0018112171354240901],
-                 [-0.68776182141386699, -0.463421901377366],
-                 [0.74521604996981905, -0.36390825840878199],
-                 [-0.057454228555951802, 0.82733015978614899],
-                 [0.68776182141386699, -0.463421901377366],
-                 [0.057454228555952502, 0.82733015978614899],
-                 [-0.74521604996981905, -0.36390825840878199],
-                 [-0.196847580155319, -0.35889692861698103],
-                 [0.409237647600175, 0.0089734592204907503],
-                 [-0.212390067444856, 0.34992346939649099],
-                 [0.196847580155319, -0.35889692861698103],
-                 [0.212390067444856, 0.34992346939649099],
-                 [-0.409237647600175, 0.0089734592204909792],
-                 [-0.096321844715106603, -0.23982388127083001],
-                 [0.255854495972275, 0.036494776172753297],
-                 [-0.15953265125716901, 0.203329105098078],
-                 [0.096321844715106603, -0.23982388127083001],
-                 [0.15953265125716901, 0.203329105098078],
-                 [-0.255854495972276, 0.036494776172753401],
-                 [-0.28286197991209999, -0.24652609751239701],
-                 [0.35492885309762601, -0.121702611612444],
-                 [-0.072066873185525099, 0.36822870912484101],
-                 [0.28286197991209999, -0.24652609751239701],
-                 [0.072066873185525404, 0.36822870912484101],
-                 [-0.35492885309762601, -0.121702611612444],
-                 [-0.45277131544764099, -0.26140764085503698],
-                 [0.45277131544764099, -0.26140764085503598],
-                 [0.0, 0.52281528171007297],
-                 [-0.103334245946111, -0.52966101087647699],
-                 [0.51036701378623095, 0.17534042336799799],
-                 [-0.40703276784011999, 0.35432058750848],
-                 [0.103334245946111, -0.52966101087647699],
-                 [0.40703276784011999, 0.35432058750848],
-                 [-0.51036701378623095, 0.17534042336799799],
-                 [-0.64379410387887004, -0.52874213045823903],
-                 [0.77980116896737595, -0.29317098353662002],
-                 [-0.13600706508850499, 0.821913113994859],
-                 [0.64379410387887004, -0.52874213045823903],
-                 [0.13600706508850599, 0.821913113994859],
-                 [-0.77980116896737595, -0.29317098353662002],
-                 [0.0, -0.100299411171165],
-                 [0.086861838058849505, 0.050149705585582599],
-                 [-0.086861838058849505, 0.050149705585582703],
-                 [-0.89873358431890404, -0.54980647624872103],
-                 [0.92551316775604997, -0.50342287713005496],
-                 [-0.026779583437145101, 1.05322935337878],
-                 [0.89873358431890404, -0.54980647624872103],
-                 [0.026779583437145999, 1.05322935337878],
-                 [-0.92551316775604997, -0.50342287713005396],
-                 [-0.78478618004244405, -0.53007527494669204],
-                 [0.851451744043078, -0.41460713098235902],
-                 [-0.066665564000633698, 0.94468240592905195],
-                 [0.78478618004244405, -0.53007527494669204],
-                 [0.066665564000634406, 0.94468240592905195],
-                 [-0.851451744043079, -0.41460713098235902],
-                 [-0.72349108151471497, -0.56749280180954798],
-                 [0.85320872358923305, -0.34281525509844801],
-                 [-0.129717642074518, 0.91030805690799599],
-                 [0.72349108151471497, -0.56749280180954798],
-                 [0.129717642074519, 0.91030805690799599],
-                 [-0.85320872358923305, -0.34281525509844701],
-                 [0.0, -0.358222454317979],
-                 [0.31022974564538103, 0.17911122715899],
-                 [-0.31022974564538103, 0.17911122715899],
-                 [-0.18271587764821501, -0.105491061145416],
-                 [0.18271587764821501, -0.105491061145416],
-                 [0.0, 0.21098212229083199],
-                 [-0.20239462350406001, -0.56840882187053599],
-                 [0.59345379122709796, 0.10892552539136501],
-                 [-0.391059167723038, 0.45948329647917202],
-                 [0.20239462350406101, -0.56840882187053599],
-                 [0.391059167723038, 0.45948329647917202],
-                 [-0.59345379122709796, 0.10892552539136501],
-                 [0.0, -0.56806418709095796],
-                 [0.49195801700092601, 0.28403209354547898],
-                 [-0.49195801700092601, 0.28403209354547898],
-                 [-0.94049820614395796, -0.576425858672863],
-                 [0.96944854008093695, -0.52628240939793003],
-                 [-0.028950333936979, 1.10270826807079],
-                 [0.94049820614395796, -0.576425858672863],
-                 [0.028950333936979902, 1.10270826807079],
-                 [-0.96944854008093695, -0.52628240939792903]],
-      'weights': [0.0073001758011272903,
-                  0.0073001758011272903,
-                  0.0073001758011272903,
-                  0.0073001758011272903,
-                  0.0073001758011272903,
-                  0.0073001758011272903,
-                  0.00029744491435345,
-                  0.00029744491435345,
-                  0.00029744491435345,
-                  0.010262267225419799,
-                  0.010262267225419799,
-                  0.010262267225419799,
-                  0.010262267225419799,
-                  0.010262267225419799,
-                  0.010262267225419799,
-                  0.010295691370799699,
-                  0.010295691370799699,
-                  0.010295691370799699,
-                  0.010295691370799699,
-                  0.010295691370799699,
-                  0.010295691370799699,
-                  0.00658514054865159,
-                  0.00658514054865159,
-                  0.00658514054865159,
-                  0.011911632772231701,
-                  0.011911632772231701,
-                  0.011911632772231701,
-                  0.011911632772231701,
-                  0.011911632772231701,
-                  0.011911632772231701,
-                  0.0049267036311942299,
-                  0.0049267036311942299,
-                  0.0049267036311942299,
-                  0.0070884161431005602,
-                  0.0070884161431005602,
-                  0.0070884161431005602,
-                  0.0070884161431005602,
-                  0.0070884161431005602,
-                  0.0070884161431005602,
-                  0.015367888402426999,
-                  0.015367888402426999,
-                  0.015367888402426999,
-                  0.015367888402426999,
-                  0.015367888402426999,
-                  0.015367888402426999,
-                  0.0130498301146057,
-                  0.0130498301146057,
-                  0.0130498301146057,
-                  0.0130498301146057,
-                  0.0130498301146057,
-                  0.0130498301146057,
-                  0.0134825064570537,
-                  0.0134825064570537,
-                  0.0134825064570537,
-                  0.0014662678628644501,
-                  0.0014662678628644501,
-                  0.0014662678628644501,
-                  0.0117848853966103,
-                  0.0117848853966103,
-                  0.0117848853966103,
-                  0.0117848853966103,
-                  0.0117848853966103,
-                  0.0117848853966103,
-                  0.0020900597660339702,
-                  0.0020900597660339702,
-                  0.0020900597660339702,
-                  0.0020900597660339702,
-                  0.0020900597660339702,
-                  0.0020900597660339702,
-                  0.0127945066091034,
-                  0.0127945066091034,
-                  0.0127945066091034,
-                  0.0033929984663259001,
-                  0.0033929984663259001,
-                  0.0033929984663259001,
-                  0.0033929984663259001,
-                  0.0033929984663259001,
-                  0.0033929984663259001,
-                  0.0039394558595964796,
-                  0.0039394558595964796,
-                  0.0039394558595964796,
-                  0.0039394558595964796,
-                  0.0039394558595964796,
-                  0.0039394558595964796,
-                  0.0092919067201895095,
-                  0.0092919067201895095,
-                  0.0092919067201895095,
-                  0.0092919067201895095,
-                  0.0092919067201895095,
-                  0.0092919067201895095,
-                  0.0101672591428853,
-                  0.0101672591428853,
-                  0.0101672591428853,
-                  0.0101672591428853,
-                  0.0101672591428853,
-                  0.0101672591428853,
-                  0.019577411055514901,
-                  0.019577411055514901,
-                  0.019577411055514901,
-                  0.019577411055514901,
-                  0.019577411055514901,
-                  0.019577411055514901,
-                  0.0247968798728757,
-                  0.0247968798728757,
-                  0.0247968798728757,
-                  0.0247968798728757,
-                  0.0247968798728757,
-                  0.0247968798728757,
-                  0.022388529355431602,
-                  0.022388529355431602,
-                  0.022388529355431602,
-                  0.022388529355431602,
-                  0.022388529355431602,
-                  0.022388529355431602,
-                  0.018624484198345701,
-                  0.018624484198345701,
-                  0.018624484198345701,
-                  0.0108800444307553,
-                  0.0108800444307553,
-                  0.0108800444307553,
-                  0.0108800444307553,
-                  0.0108800444307553,
-                  0.0108800444307553,
-                  0.0081439937677792208,
-                  0.0081439937677792208,
-                  0.0081439937677792208,
-                  0.0081439937677792208,
-                  0.0081439937677792208,
-                  0.0081439937677792208,
-                  0.0270132225758145,
-                  0.0270132225758145,
-                  0.0270132225758145,
-                  0.0031705309130939602,
-                  0.0031705309130939602,
-                  0.0031705309130939602,
-                  0.0031705309130939602,
-                  0.0031705309130939602,
-                  0.0031705309130939602,
-                  0.0066196912880277098,
-                  0.0066196912880277098,
-                  0.0066196912880277098,
-                  0.0066196912880277098,
-                  0.0066196912880277098,
-                  0.0066196912880277098,
-                  0.00332533066999982,
-                  0.00332533066999982,
-                  0.00332533066999982,
-                  0.00332533066999982,
-                  0.00332533066999982,
-                  0.00332533066999982,
-                  0.021486019302559101,
-                  0.021486019302559101,
-                  0.021486019302559101,
-                  0.025832759693036899,
-                  0.025832759693036899,
-                  0.025832759693036899,
-                  0.0045770619053705202,
-                  0.0045770619053705202,
-                  0.0045770619053705202,
-                  0.0045770619053705202,
-                  0.0045770619053705202,
-                  0.0045770619053705202,
-                  0.00483470480347864,
-                  0.00483470480347864,
-                  0.00483470480347864,
-                  0.00058131385638303097,
-                  0.00058131385638303097,
-                  0.00058131385638303097,
-                  0.00058131385638303097,
-                  0.00058131385638303097,
-                  0.00058131385638303097]},
- 31: {'points': [[0.0, 2.2204460492503101e-16],
-                 [0.0, -0.52938101092158396],
-                 [0.45845740373917998, 0.26469050546079198],
-                 [-0.45845740373917898, 0.26469050546079298],
-                 [-0.61514906219173304, -0.39259296230588597],
-                 [0.64757000979974999, -0.33643823381927201],
-                 [-0.032420947608016802, 0.72903119612515799],
-                 [0.61514906219173304, -0.39259296230588597],
-                 [0.032420947608017302, 0.72903119612515799],
-                 [-0.64757000979974999, -0.33643823381927102],
-                 [0.0, -0.29879521023518402],
-                 [0.25876424259278102, 0.14939760511759201],
-                 [-0.25876424259278102, 0.14939760511759201],
-                 [-0.60227258275696605, -0.57170178188865695],
-                 [0.79624455788288995, -0.23573246572606901],
-                 [-0.19397197512592401, 0.80743424761472704],
-                 [0.60227258275696505, -0.57170178188865695],
-                 [0.19397197512592501, 0.80743424761472704],
-                 [-0.79624455788288995, -0.23573246572606901],
-                 [-0.50981188019097601, -0.55459143708784697],
-                 [0.73519621333488205, -0.16421432085257101],
-                 [-0.22538433314390599, 0.71880575794041801],
-                 [0.50981188019097601, -0.55459143708784697],
-                 [0.22538433314390599, 0.71880575794041801],
-                 [-0.73519621333488305, -0.16421432085257001],
-                 [-0.76237961047990399, -0.44016007333525498],
-                 [0.76237961047990399, -0.44016007333525398],
-                 [0.0, 0.88032014667050995],
-                 [-0.93815432009933297, -0.57328995909056402],
-                 [0.96556082835663604, -0.52582049433085898],
-                 [-0.027406508257302599, 1.09911045342142],
-                 [0.93815432009933297, -0.57328995909056402],
-                 [0.0274065082573034, 1.09911045342142],
-                 [-0.96556082835663604, -0.52582049433085798],
-                 [-0.94680595225085695, -0.54663867140237299],
-                 [0.94680595225085795, -0.54663867140237199],
-                 [0.0, 1.09327734280475],
-                 [-0.20647073303633401, -0.57395302409498306],
-                 [0.600293265963324, 0.10816761210003099],
-                 [-0.39382253292698999, 0.46578541199495199],
-                 [0.20647073303633401, -0.57395302409498306],
-                 [0.39382253292698999, 0.46578541199495199],
-                 [-0.600293265963325, 0.10816761210003201],
-                 [-0.14400331667261801, -0.31297598217411599],
-                 [0.34304680967348, 0.031777460619355602],
-                 [-0.19904349300086099, 0.28119852155476099],
-                 [0.14400331667261801, -0.31297598217411599],
-                 [0.19904349300086099, 0.28119852155476099],
-                 [-0.34304680967348, 0.0317774606193559],
-                 [-0.48161033312897999, -0.380891924229109],
-                 [0.57066724904323596, -0.22664082110022901],
-                 [-0.089056915914255394, 0.60753274532933799],
-                 [0.48161033312897999, -0.380891924229109],
-                 [0.089056915914255796, 0.60753274532933799],
-                 [-0.57066724904323596, -0.22664082110022801],
-                 [-0.100370705110887, -0.48291646123243898],
-                 [0.46840327588841901, 0.15453465019443499],
-                 [-0.36803257077753199, 0.32838181103800501],
-                 [0.100370705110887, -0.48291646123243898],
-                 [0.36803257077753199, 0.32838181103800401],
-                 [-0.46840327588841901, 0.15453465019443499],
-                 [-0.69003405314433996, -0.47237945269405601],
-                 [0.75410963283101196, -0.361397293152312],
-                 [-0.064075579686671394, 0.83377674584636796],
-                 [0.69003405314433996, -0.47237945269405601],
-                 [0.064075579686672102, 0.83377674584636796],
-                 [-0.75410963283101196, -0.36139729315231101],
-                 [-0.45131857503676798, -0.512244294249529],
-                 [0.66927585928210698, -0.13473120405687],
-                 [-0.217957284245339, 0.646975498306399],
-                 [0.45131857503676798, -0.512244294249529],
-                 [0.21795728424534, 0.646975498306399],
-                 [-0.66927585928210698, -0.134731204056869],
-                 [-0.84660740995916595, -0.56975292247630704],
-                 [0.91672420972448998, -0.44830706281863097],
-                 [-0.070116799765324297, 1.0180599852949399],
-                 [0.84660740995916595, -0.56975292247630704],
-                 [0.070116799765324894, 1.0180599852949399],
-                 [-0.91672420972449098, -0.44830706281862998],
-                 [-0.14911203462776201, -0.54743183795864703],
-                 [0.54864589582647505, 0.14458110898169699],
-                 [-0.39953386119871298, 0.40285072897695001],
-                 [0.14911203462776201, -0.54743183795864703],
-                 [0.39953386119871398, 0.40285072897695001],
-                 [-0.54864589582647505, 0.14458110898169699],
-                 [-0.55167853197329197, -0.46896195562367599],
-                 [0.68197223296517995, -0.243286645599539],
-                 [-0.130293700991887, 0.71224860122321498],
-                 [0.55167853197329197, -0.46896195562367599],
-                 [0.130293700991888, 0.71224860122321498],
-                 [-0.68197223296517995, -0.243286645599538],
-                 [-0.88689641508961203, -0.54546676966840701],
-                 [0.915836286997882, -0.49534144115874901],
-                 [-0.028939871908269198, 1.0408082108271599],
-                 [0.88689641508961203, -0.54546676966840701],
-                 [0.028939871908269899, 1.0408082108271599],
-                 [-0.915836286997882, -0.49534144115874801],
-                 [-0.34469050962721598, -0.199007158520382],
-                 [0.34469050962721598, -0.199007158520382],
-                 [0.0, 0.39801431704076501],
-                 [-0.48264763844834202, -0.278656743981887],
-                 [0.48264763844834202, -0.278656743981887],
-                 [0.0, 0.557313487963775],
-                 [-0.84671445753285601, -0.48885081998334301],
-                 [0.84671445753285601, -0.48885081998334201],
-                 [0.0, 0.97770163996668502],
-                 [-0.27328678036217302, -0.50303973149300196],
-                 [0.57228857676692901, 0.014846571434400799],
-                 [-0.29900179640475599, 0.48819316005860203],
-                 [0.27328678036217302, -0.50303973149300196],
-                 [0.29900179640475599, 0.48819316005860097],
-                 [-0.57228857676692901, 0.0148465714344014],
-                 [-0.33518301010596502, -0.554506105979088],
-                 [0.64780787938445905, -0.0130239486791576],
-                 [-0.31262486927849398, 0.56753005465824602],
-                 [0.33518301010596502, -0.554506105979088],
-                 [0.31262486927849398, 0.56753005465824602],
-                 [-0.64780787938445905, -0.0130239486791572],
-                 [-0.41995122085501602, -0.57527720939459104],
-                 [0.70818028798144395, -0.076049820913437594],
-                 [-0.28822906712642699, 0.65132703030802896],
-                 [0.41995122085501602, -0.57527720939459104],
-                 [0.28822906712642798, 0.65132703030802896],
-                 [-0.70818028798144395, -0.076049820913437302],
-                 [-0.183287647217797, -0.19780119278968999],
-                 [0.26294468146363298, -0.059831162295646903],
-                 [-0.079657034245836505, 0.25763235508533699],
-                 [0.183287647217796, -0.19780119278968999],
-                 [0.0796570342458367, 0.25763235508533699],
-                 [-0.26294468146363298, -0.059831162295646799],
-                 [-0.369918612945079, -0.43682917497899099],
-                 [0.563264469118543, -0.101944328653646],
-                 [-0.193345856173464, 0.53877350363263699],
-                 [0.369918612945079, -0.43682917497899099],
-                 [0.193345856173464, 0.53877350363263699],
-                 [-0.563264469118543, -0.101944328653646],
-                 [-0.198262137735152, -0.41232373405740902],
-                 [0.45621389714455102, 0.034461819141453499],
-                 [-0.25795175940939902, 0.377861914915956],
-                 [0.198262137735152, -0.41232373405740902],
-                 [0.25795175940939902, 0.377861914915956],
-                 [-0.45621389714455102, 0.034461819141453701],
-                 [0.0, -0.56955126226549402],
-                 [0.493245861879411, 0.28477563113274701],
-                 [-0.493245861879411, 0.28477563113274701],
-                 [-0.32037552704774402, -0.32293156387181898],
-                 [0.43985470152070499, -0.11598756323826601],
-                 [-0.11947917447296, 0.43891912711008502],
-                 [0.32037552704774402, -0.32293156387181898],
-                 [0.11947917447296, 0.43891912711008502],
-                 [-0.43985470152070399, -0.11598756323826501],
-                 [0.0, -0.179562178034845],
-                 [0.15550540773704, 0.089781089017422905],
-                 [-0.15550540773704, 0.089781089017423002],
-                 [-0.107525528896021, -0.062079893052874598],
-                 [0.107525528896021, -0.062079893052874598],
-                 [0.0, 0.12415978610575],
-                 [-0.78037306571930998, -0.52966581912912802],
-                 [0.84889058774177395, -0.41098998977750201],
-                 [-0.068517522022463195, 0.94065580890663003],
-                 [0.78037306571930998, -0.52966581912912802],
-                 [0.068517522022463903, 0.94065580890663003],
-                 [-0.84889058774177395, -0.41098998977750101],
-                 [-0.98475157161181603, -0.56854658495499],
-                 [0.98475157161181603, -0.568546584954989],
-                 [0.0, 1.13709316990998],
-                 [-0.63930924222334995, -0.53253326710134996],
-                 [0.78084195878176699, -0.28739141108892502],
-                 [-0.14153271655841801, 0.81992467819027504],
-                 [0.63930924222334995, -0.53253326710134996],
-                 [0.14153271655841801, 0.81992467819027504],
-                 [-0.78084195878176799, -0.28739141108892502],
-                 [0.0, -0.40532624526153899],
-                 [0.35102282521705502, 0.20266312263076999],
-                 [-0.35102282521705502, 0.20266312263076999],
-                 [-0.73284741377468399, -0.56730901867998795],
-                 [0.85772772886023196, -0.351009968086608],
-                 [-0.124880315085548, 0.91831898676659596],
-                 [0.73284741377468299, -0.56730901867998795],
-                 [0.124880315085549, 0.91831898676659596],
-                 [-0.85772772886023196, -0.351009968086607]],
-      'weights': [0.0144507091433366,
-                  0.0070043933679905298,
-                  0.0070043933679905298,
-                  0.0070043933679905298,
-                  0.010056794909810001,
-                  0.010056794909810001,
-                  0.010056794909810001,
-                  0.010056794909810001,
-                  0.010056794909810001,
-                  0.010056794909810001,
-                  0.015316668433359401,
-                  0.015316668433359401,
-                  0.015316668433359401,
-                  0.0022236963716527301,
-                  0.0022236963716527301,
-                  0.0022236963716527301,
-                  0.0022236963716527301,
-                  0.0022236963716527301,
-                  0.0022236963716527301,
-                  0.0048956663342256002,
-                  0.0048956663342256002,
-                  0.0048956663342256002,
-                  0.0048956663342256002,
-                  0.0048956663342256002,
-                  0.0048956663342256002,
-                  0.0073157146995561197,
-                  0.0073157146995561197,
-                  0.0073157146995561197,
-                  0.00087556735286846801,
-                  0.00087556735286846801,
-                  0.00087556735286846801,
-                  0.00087556735286846801,
-                  0.00087556735286846801,
-                  0.00087556735286846801,
-                  0.0017093023034565401,
-                  0.0017093023034565401,
-                  0.0017093023034565401,
-                  0.0022563347044107702,
-                  0.0022563347044107702,
-                  0.0022563347044107702,
-                  0.0022563347044107702,
-                  0.0022563347044107702,
-                  0.0022563347044107702,
-                  0.017654065457781198,
-                  0.017654065457781198,
-                  0.017654065457781198,
-                  0.017654065457781198,
-                  0.017654065457781198,
-                  0.017654065457781198,
-                  0.013625819395183,
-                  0.013625819395183,
-                  0.013625819395183,
-                  0.013625819395183,
-                  0.013625819395183,
-                  0.013625819395183,
-                  0.012333603397143299,
-                  0.012333603397143299,
-                  0.012333603397143299,
-                  0.012333603397143299,
-                  0.012333603397143299,
-                  0.012333603397143299,
-                  0.0085980984878994606,
-                  0.0085980984878994606,
-                  0.0085980984878994606,
-                  0.0085980984878994606,
-                  0.0085980984878994606,
-                  0.0085980984878994606,
-                  0.0094161859154308306,
-                  0.0094161859154308306,
-                  0.0094161859154308306,
-                  0.0094161859154308306,
-                  0.0094161859154308306,
-                  0.0094161859154308306,
-                  0.0019963322121630501,
-                  0.0019963322121630501,
-                  0.0019963322121630501,
-                  0.0019963322121630501,
-                  0.0019963322121630501,
-                  0.0019963322121630501,
-                  0.0072370845131609204,
-                  0.0072370845131609204,
-                  0.0072370845131609204,
-                  0.0072370845131609204,
-                  0.0072370845131609204,
-                  0.0072370845131609204,
-                  0.011020039986812899,
-                  0.011020039986812899,
-                  0.011020039986812899,
-                  0.011020039986812899,
-                  0.011020039986812899,
-                  0.011020039986812899,
-                  0.0031398085097082001,
-                  0.0031398085097082001,
-                  0.0031398085097082001,
-                  0.0031398085097082001,
-                  0.0031398085097082001,
-                  0.0031398085097082001,
-                  0.019463061000708499,
-                  0.019463061000708499,
-                  0.019463061000708499,
-                  0.0165570130938811,
-                  0.0165570130938811,
-                  0.0165570130938811,
-                  0.0056449036643912102,
-                  0.0056449036643912102,
-                  0.0056449036643912102,
-                  0.011587349312984101,
-                  0.011587349312984101,
-                  0.011587349312984101,
-                  0.011587349312984101,
-                  0.011587349312984101,
-                  0.011587349312984101,
-                  0.0063041686809225403,
-                  0.0063041686809225403,
-                  0.0063041686809225403,
-                  0.0063041686809225403,
-                  0.0063041686809225403,
-                  0.0063041686809225403,
-                  0.0016097166439319199,
-                  0.0016097166439319199,
-                  0.0016097166439319199,
-                  0.0016097166439319199,
-                  0.0016097166439319199,
-                  0.0016097166439319199,
-                  0.022335811510202599,
-                  0.022335811510202599,
-                  0.022335811510202599,
-                  0.022335811510202599,
-                  0.022335811510202599,
-                  0.022335811510202599,
-                  0.014680685485837701,
-                  0.014680685485837701,
-                  0.014680685485837701,
-                  0.014680685485837701,
-                  0.014680685485837701,
-                  0.014680685485837701,
-                  0.016666270105325499,
-                  0.016666270105325499,
-                  0.016666270105325499,
-                  0.016666270105325499,
-                  0.016666270105325499,
-                  0.016666270105325499,
-                  0.0040316264948201301,
-                  0.0040316264948201301,
-                  0.0040316264948201301,
-                  0.020091216113343201,
-                  0.020091216113343201,
-                  0.020091216113343201,
-                  0.020091216113343201,
-                  0.020091216113343201,
-                  0.020091216113343201,
-                  0.023797330545723999,
-                  0.023797330545723999,
-                  0.023797330545723999,
-                  0.021406486094990799,
-                  0.021406486094990799,
-                  0.021406486094990799,
-                  0.0063507144632898504,
-                  0.0063507144632898504,
-                  0.0063507144632898504,
-                  0.0063507144632898504,
-                  0.0063507144632898504,
-                  0.0063507144632898504,
-                  0.00059652068709690901,
-                  0.00059652068709690901,
-                  0.00059652068709690901,
-                  0.0076995512576653298,
-                  0.0076995512576653298,
-                  0.0076995512576653298,
-                  0.0076995512576653298,
-                  0.0076995512576653298,
-                  0.0076995512576653298,
-                  0.018072178801312101,
-                  0.018072178801312101,
-                  0.018072178801312101,
-                  0.00315450235552639,
-                  0.00315450235552639,
-                  0.00315450235552639,
-                  0.00315450235552639,
-                  0.00315450235552639,
-                  0.00315450235552639]},
- 32: {'points': [[-0.99562766361289001, -0.574825899599541],
-                 [0.99562766361289001, -0.57482589959954],
-                 [0.0, 1.14965179919908],
-                 [-0.42746868613914901, -0.30218292328704999],
-                 [0.47543243122600498, -0.21910727987533499],
-                 [-0.047963745086855199, 0.52129020316238595],
-                 [0.42746868613914901, -0.30218292328704999],
-                 [0.047963745086855497, 0.52129020316238595],
-                 [-0.47543243122600498, -0.21910727987533499],
-                 [-0.091710704502811297, -0.55177404065234503],
-                 [0.52370568860512401, 0.19646322042777001],
-                 [-0.43199498410231202, 0.355310820224575],
-                 [0.091710704502811199, -0.55177404065234503],
-                 [0.43199498410231302, 0.355310820224575],
-                 [-0.52370568860512401, 0.19646322042777001],
-                 [0.0, -0.57267682745711801],
-                 [0.49595268073654197, 0.286338413728559],
-                 [-0.49595268073654197, 0.28633841372856],
-                 [-0.48363645746701001, -0.48826894371900198],
-                 [0.66467153787315503, -0.17470698650324101],
-                 [-0.18103508040614499, 0.66297593022224399],
-                 [0.48363645746701001, -0.48826894371900198],
-                 [0.18103508040614599, 0.66297593022224399],
-                 [-0.66467153787315503, -0.17470698650324101],
-                 [-0.74677040622149204, -0.54347180509529602],
-                 [0.84404559256385703, -0.37498624003458902],
-                 [-0.097275186342365302, 0.91845804512988505],
-                 [0.74677040622149204, -0.54347180509529602],
-                 [0.097275186342365802, 0.91845804512988505],
-                 [-0.84404559256385703, -0.37498624003458803],
-                 [-0.330900341559975, -0.55549427045965405],
-                 [0.64652232065475201, -0.0088209666820585602],
-                 [-0.31562197909477702, 0.56431523714171306],
-                 [0.330900341559975, -0.55549427045965405],
-                 [0.31562197909477702, 0.56431523714171306],
-                 [-0.64652232065475201, -0.0088209666820581196],
-                 [-0.46023597931811999, -0.54086954371044305],
-                 [0.69852475464560104, -0.12814127796988001],
-                 [-0.23828877532748099, 0.669010821680324],
-                 [0.46023597931811999, -0.54086954371044305],
-                 [0.23828877532748099, 0.669010821680323],
-                 [-0.69852475464560104, -0.12814127796988001],
-                 [-0.55152849427095296, -0.37375893906115298],
-                 [0.59944898325395402, -0.290758217419049],
-                 [-0.0479204889830014, 0.66451715648020204],
-                 [0.55152849427095296, -0.37375893906115298],
-                 [0.047920488983001802, 0.66451715648020204],
-                 [-0.59944898325395501, -0.290758217419049],
-                 [-0.20577133469764, -0.52660317145013902],
-                 [0.55893739153809197, 0.085098382506282697],
-                 [-0.35316605684045199, 0.44150478894385597],
-                 [0.20577133469764, -0.52660317145013902],
-                 [0.35316605684045199, 0.44150478894385597],
-                 [-0.55893739153809197, 0.085098382506283002],
-                 [-0.20092303305428399, -0.57138712716648798],
-                 [0.59529728404873095, 0.111689112752814],
-                 [-0.39437425099444601, 0.45969801441367503],
-                 [0.20092303305428399, -0.57138712716648798],
-                 [0.39437425099444701, 0.45969801441367503],
-                 [-0.59529728404872995, 0.111689112752814],
-                 [0.0, -0.51211470939471704],
-                 [0.44350434798750998, 0.25605735469735902],
-                 [-0.44350434798750998, 0.25605735469735902],
-                 [-0.25879477956175601, -0.42082435075243702],
-                 [0.49384196806358099, -0.013710678091055299],
-                 [-0.23504718850182599, 0.43453502884349299],
-                 [0.25879477956175601, -0.42082435075243702],
-                 [0.23504718850182599, 0.43453502884349299],
-                 [-0.49384196806358099, -0.0137106780910551],
-                 [0.0, -0.41206328125638497],
-                 [0.35685726953480201, 0.20603164062819301],
-                 [-0.35685726953480101, 0.20603164062819301],
-                 [-0.72262398109805304, -0.48953938794088198],
-                 [0.78526553665891596, -0.38104103104431902],
-                 [-0.062641555560862094, 0.870580418985202],
-                 [0.72262398109805304, -0.48953938794088198],
-                 [0.062641555560862802, 0.870580418985202],
-                 [-0.78526553665891596, -0.38104103104431902],
-                 [-0.32997225542915498, -0.49430799576545797],
-                 [0.59306940934123498, -0.038610357862966502],
-                 [-0.26309715391208, 0.53291835362842499],
-                 [0.32997225542915498, -0.49430799576545797],
-                 [0.26309715391208, 0.53291835362842499],
-                 [-0.59306940934123498, -0.038610357862966301],
-                 [-0.40104907184189398, -0.57513903374312303],
-                 [0.69860954985052703, -0.059749167507689098],
-                 [-0.297560478008633, 0.63488820125081302],
-                 [0.40104907184189398, -0.57513903374312303],
-                 [0.297560478008633, 0.63488820125081302],
-                 [-0.69860954985052703, -0.059749167507688501],
-                 [0.0, -0.14894052019733001],
-                 [0.12898627414375699, 0.074470260098665197],
-                 [-0.12898627414375699, 0.074470260098665197],
-                 [-0.69151287469732103, -0.56996729278416802],
-                 [0.83936259222599297, -0.31388407013980102],
-                 [-0.14784971752867199, 0.88385136292397004],
-                 [0.69151287469732103, -0.56996729278416802],
-                 [0.14784971752867199, 0.88385136292397004],
-                 [-0.83936259222599297, -0.31388407013980102],
-                 [-0.81882407794345802, -0.570677522688396],
-                 [0.90363327098864998, -0.423783691385206],
-                 [-0.084809193045192105, 0.994461214073602],
-                 [0.81882407794345802, -0.570677522688396],
-                 [0.084809193045192605, 0.994461214073602],
-                 [-0.90363327098865098, -0.423783691385205],
-                 [-0.15094516045128001, -0.087148229019417905],
-                 [0.15094516045128001, -0.087148229019417697],
-                 [0.0, 0.17429645803883601],
-                 [-0.15979469018140199, -0.22764895370246799],
-                 [0.27704712214198601, -0.024561784235723898],
-                 [-0.11725243196058401, 0.25221073793819299],
-                 [0.15979469018140199, -0.22764895370246799],
-                 [0.11725243196058401, 0.25221073793819299],
-                 [-0.27704712214198601, -0.024561784235723701],
-                 [0.0, -0.27832827065225102],
-                 [0.24103935297623999, 0.13916413532612601],
-                 [-0.24103935297623999, 0.13916413532612601],
-                 [-0.59877821961446398, -0.46007242792991998],
-                 [0.69782351997532799, -0.288520935453983],
-                 [-0.099045300360863897, 0.74859336338390403],
-                 [0.59877821961446398, -0.46007242792991998],
-                 [0.099045300360864494, 0.74859336338390403],
-                 [-0.69782351997532899, -0.288520935453983],
-                 [-0.90919242687866697, -0.52492249240356803],
-                 [0.90919242687866697, -0.52492249240356703],
-                 [0.0, 1.0498449848071401],
-                 [-0.96156941055966405, -0.55516235803113201],
-                 [0.96156941055966405, -0.55516235803113201],
-                 [0.0, 1.11032471606226],
-                 [-0.42015173485048002, -0.41181398695180699],
-                 [0.56671724175925797, -0.157955082348716],
-                 [-0.14656550690877801, 0.56976906930052296],
-                 [0.42015173485048002, -0.41181398695180699],
-                 [0.14656550690877901, 0.56976906930052296],
-                 [-0.56671724175925797, -0.157955082348715],
-                 [-0.28990563943088199, -0.31690029177033702],
-                 [0.41939652285525397, -0.092615502562347005],
-                 [-0.12949088342437101, 0.40951579433268498],
-                 [0.28990563943088199, -0.31690029177033702],
-                 [0.12949088342437201, 0.40951579433268498],
-                 [-0.41939652285525397, -0.092615502562346796],
-                 [-0.84085334890090002, -0.53517509064720503],
-                 [0.88390189842356903, -0.46061281568179702],
-                 [-0.043048549522669101, 0.99578790632900205],
-                 [0.84085334890090002, -0.53517509064720503],
-                 [0.043048549522669802, 0.99578790632900205],
-                 [-0.88390189842356903, -0.46061281568179602],
-                 [-0.127236199246236, -0.35324390902713099],
-                 [0.36953629857273301, 0.066432173685346999],
-                 [-0.24230009932649699, 0.286811735341785],
-                 [0.127236199246236, -0.35324390902713099],
-                 [0.24230009932649699, 0.286811735341785],
-                 [-0.36953629857273301, 0.066432173685347304],
-                 [-0.12551628141173299, -0.467837164527446],
-                 [0.46791701002111502, 0.125218293972606],
-                 [-0.34240072860938198, 0.34261887055484103],
-                 [0.12551628141173299, -0.467837164527446],
-                 [0.34240072860938198, 0.34261887055484003],
-                 [-0.46791701002111502, 0.125218293972606],
-                 [0.0, 2.2204460492503101e-16],
-                 [-0.81396805052120702, -0.46994467308017401],
-                 [0.81396805052120702, -0.46994467308017301],
-                 [0.0, 0.93988934616034803],
-                 [-0.55077303550427203, -0.56822819321284002],
-                 [0.76748656822098704, -0.19286934385974899],
-                 [-0.21671353271671501, 0.76109753707258898],
-                 [0.55077303550427203, -0.56822819321284002],
-                 [0.21671353271671601, 0.76109753707258798],
-                 [-0.76748656822098704, -0.19286934385974799],
-                 [-0.61718975394462305, -0.53204175653167196],
-                 [0.76935655400283498, -0.268481127605674],
-                 [-0.15216680005821201, 0.80052288413734696],
-                 [0.61718975394462305, -0.53204175653167196],
-                 [0.15216680005821201, 0.80052288413734696],
-                 [-0.76935655400283498, -0.268481127605674],
-                 [-0.90920085094674896, -0.56772912901378603],
-                 [0.94626827366772603, -0.50352646955542002],
-                 [-0.037067422720976899, 1.07125559856921],
-                 [0.90920085094674896, -0.56772912901378603],
-                 [0.037067422720977503, 1.07125559856921],
-                 [-0.94626827366772603, -0.50352646955542002],
-                 [-0.31216600921579002, -0.18022912945258801],
-                 [0.31216600921579002, -0.18022912945258701],
-                 [0.0, 0.36045825890517502],
-                 [-0.69412351929919103, -0.40075240071823898],
-                 [0.69412351929919103, -0.40075240071823798],
-                 [0.0, 0.80150480143647695],
-                 [-0.97068830122109395, -0.57627103176029304],
-                 [0.98440950358002899, -0.55250521213368298],
-                 [-0.0137212023589348, 1.1287762438939799],
-                 [0.97068830122109395, -0.57627103176029304],
-                 [0.013721202358935701, 1.1287762438939799],
-                 [-0.98440950358002999, -0.55250521213368198]],
-      'weights': [9.2359708099317396e-05,
-                  9.2359708099317396e-05,
-                  9.2359708099317396e-05,
-                  0.014461271735885701,
-                  0.014461271735885701,
-                  0.014461271735885701,
-                  0.014461271735885701,
-                  0.014461271735885701,
-                  0.014461271735885701,
-                  0.0052665641986118601,
-                  0.0052665641986118601,
-                  0.0052665641986118601,
-                  0.0052665641986118601,
-                  0.0052665641986118601,
-                  0.0052665641986118601,
-                  0.0024502062667233599,
-                  0.0024502062667233599,
-                  0.0024502062667233599,
-                  0.0091556960906106905,
-                  0.0091556960906106905,
-                  0.0091556960906106905,
-                  0.0091556960906106905,
-                  0.0091556960906106905,
-                  0.0091556960906106905,
-                  0.00431847018651026,
-                  0.00431847018651026,
-                  0.00431847018651026,
-                  0.00431847018651026,
-                  0.00431847018651026,
-                  0.00431847018651026,
-                  0.0052317998586081001,
-                  0.0052317998586081001,
-                  0.0052317998586081001,
-                  0.0052317998586081001,
-                  0.0052317998586081001,
-                  0.0052317998586081001,
-                  0.0063118972508511796,
-                  0.0063118972508511796,
-                  0.0063118972508511796,
-                  0.0063118972508511796,
-                  0.0063118972508511796,
-                  0.0063118972508511796,
-                  0.0129576274549256,
-                  0.0129576274549256,
-                  0.0129576274549256,
-                  0.0129576274549256,
-                  0.0129576274549256,
-                  0.0129576274549256,
-                  0.0079122750596166205,
-                  0.0079122750596166205,
-                  0.0079122750596166205,
-                  0.0079122750596166205,
-                  0.0079122750596166205,
-                  0.0079122750596166205,
-                  0.0029188583265054302,
-                  0.0029188583265054302,
-                  0.0029188583265054302,
-                  0.0029188583265054302,
-                  0.0029188583265054302,
-                  0.0029188583265054302,
-                  0.0096648697336634802,
-                  0.0096648697336634802,
-                  0.0096648697336634802,
-                  0.014218763001534299,
-                  0.014218763001534299,
-                  0.014218763001534299,
-                  0.014218763001534299,
-                  0.014218763001534299,
-                  0.014218763001534299,
-                  0.014512144795370999,
-                  0.014512144795370999,
-                  0.014512144795370999,
-                  0.0077347791902617497,
-                  0.0077347791902617497,
-                  0.0077347791902617497,
-                  0.0077347791902617497,
-                  0.0077347791902617497,
-                  0.0077347791902617497,
-                  0.010743624888629901,
-                  0.010743624888629901,
-                  0.010743624888629901,
-                  0.010743624888629901,
-                  0.010743624888629901,
-                  0.010743624888629901,
-                  0.00153960704720825,
-                  0.00153960704720825,
-                  0.00153960704720825,
-                  0.00153960704720825,
-                  0.00153960704720825,
-                  0.00153960704720825,
-                  0.0219300054683573,
-                  0.0219300054683573,
-                  0.0219300054683573,
-                  0.0025724926590401502,
-                  0.0025724926590401502,
-                  0.0025724926590401502,
-                  0.0025724926590401502,
-                  0.0025724926590401502,
-                  0.0025724926590401502,
-                  0.0019272639244672801,
-                  0.0019272639244672801,
-                  0.0019272639244672801,
-                  0.0019272639244672801,
-                  0.0019272639244672801,
-                  0.0019272639244672801,
-                  0.022313548403221001,
-                  0.022313548403221001,
-                  0.022313548403221001,
-                  0.020738466302767499,
-                  0.020738466302767499,
-                  0.020738466302767499,
-                  0.020738466302767499,
-                  0.020738466302767499,
-                  0.020738466302767499,
-                  0.018845519968677199,
-                  0.018845519968677199,
-                  0.018845519968677199,
-                  0.0101884702869825,
-                  0.0101884702869825,
-                  0.0101884702869825,
-                  0.0101884702869825,
-                  0.0101884702869825,
-                  0.0101884702869825,
-                  0.0032203643999397301,
-                  0.0032203643999397301,
-                  0.0032203643999397301,
-                  0.00138865623601147,
-                  0.00138865623601147,
-                  0.00138865623601147,
-                  0.014633652953535199,
-                  0.014633652953535199,
-                  0.014633652953535199,
-                  0.014633652953535199,
-                  0.014633652953535199,
-                  0.014633652953535199,
-                  0.0176867604663959,
-                  0.0176867604663959,
-                  0.0176867604663959,
-                  0.0176867604663959,
-                  0.0176867604663959,
-                  0.0176867604663959,
-                  0.0043127357621422103,
-                  0.0043127357621422103,
-                  0.0043127357621422103,
-                  0.0043127357621422103,
-                  0.0043127357621422103,
-                  0.0043127357621422103,
-                  0.017127394205430801,
-                  0.017127394205430801,
-                  0.017127394205430801,
-                  0.017127394205430801,
-                  0.017127394205430801,
-                  0.017127394205430801,
-                  0.0128329604025924,
-                  0.0128329604025924,
-                  0.0128329604025924,
-                  0.0128329604025924,
-                  0.0128329604025924,
-                  0.0128329604025924,
-                  0.022568744990890399,
-                  0.0068872377950158501,
-                  0.0068872377950158501,
-                  0.0068872377950158501,
-                  0.0033698663442452699,
-                  0.0033698663442452699,
-                  0.0033698663442452699,
-                  0.0033698663442452699,
-                  0.0033698663442452699,
-                  0.0033698663442452699,
-                  0.00737998546788714,
-                  0.00737998546788714,
-                  0.00737998546788714,
-                  0.00737998546788714,
-                  0.00737998546788714,
-                  0.00737998546788714,
-                  0.00182796202918369,
-                  0.00182796202918369,
-                  0.00182796202918369,
-                  0.00182796202918369,
-                  0.00182796202918369,
-                  0.00182796202918369,
-                  0.021712292164068801,
-                  0.021712292164068801,
-                  0.021712292164068801,
-                  0.0114824560909346,
-                  0.0114824560909346,
-                  0.0114824560909346,
-                  0.00029460148686035202,
-                  0.00029460148686035202,
-                  0.00029460148686035202,
-                  0.00029460148686035202,
-                  0.00029460148686035202,
-                  0.00029460148686035202]},
- 33: {'points': [[-0.73994728019629097, -0.42720876140746],
-                 [0.73994728019629097, -0.42720876140746],
-                 [0.0, 0.85441752281492001],
-                 [0.0, -0.26359952191974301],
-                 [0.22828388240792999, 0.131799760959871],
-                 [-0.22828388240792999, 0.131799760959872],
-                 [-0.39676550645769898, -0.42678545506855398],
-                 [0.56798979928391902, -0.13021628040349001],
-                 [-0.17122429282622001, 0.55700173547204401],
-                 [0.39676550645769998, -0.42678545506855398],
-                 [0.17122429282622001, 0.55700173547204401],
-                 [-0.56798979928391902, -0.13021628040348901],
-                 [-0.31598316073300298, -0.379737067271539],
-                 [0.48685352738225401, -0.083780910727112495],
-                 [-0.17087036664925101, 0.46351797799865202],
-                 [0.31598316073300298, -0.379737067271539],
-                 [0.17087036664925201, 0.46351797799865202],
-                 [-0.48685352738225501, -0.083780910727112107],
-                 [0.0, -0.15588528269354399],
-                 [0.135000614888728, 0.077942641346772396],
-                 [-0.135000614888728, 0.077942641346772507],
-                 [0.0, -0.57381590818073303],
-                 [0.496939153580154, 0.28690795409036701],
-                 [-0.496939153580153, 0.28690795409036701],
-                 [-0.64019940087608096, -0.41858125784281602],
-                 [0.68260170327796299, -0.34513831572485498],
-                 [-0.042402302401882697, 0.76371957356767195],
-                 [0.64019940087608096, -0.41858125784281602],
-                 [0.042402302401883099, 0.76371957356767195],
-                 [-0.68260170327796399, -0.34513831572485498],
-                 [-0.130233108337241, -0.20333227220053601],
-                 [0.24120746730349699, -0.0111190441335937],
-                 [-0.110974358966256, 0.21445131633413],
-                 [0.130233108337241, -0.20333227220053601],
-                 [0.110974358966256, 0.21445131633413],
-                 [-0.24120746730349699, -0.011119044133593501],
-                 [-0.22101799597383601, -0.12760479947124601],
-                 [0.22101799597383601, -0.12760479947124601],
-                 [0.0, 0.25520959894249201],
-                 [-0.775918251747865, -0.53856910378372602],
-                 [0.85437365144405697, -0.40268036538179802],
-                 [-0.078455399696191794, 0.94124946916552399],
-                 [0.775918251747865, -0.53856910378372602],
-                 [0.078455399696192293, 0.94124946916552399],
-                 [-0.85437365144405697, -0.40268036538179702],
-                 [-0.19029241130244401, -0.40545819052596599],
-                 [0.446283298819179, 0.037931032927669903],
-                 [-0.25599088751673599, 0.36752715759829702],
-                 [0.19029241130244401, -0.40545819052596599],
-                 [0.25599088751673599, 0.36752715759829702],
-                 [-0.446283298819179, 0.037931032927670097],
-                 [-0.66275085646437604, -0.54194078514648203],
-                 [0.80070991551592496, -0.30298868550480201],
-                 [-0.13795905905155001, 0.84492947065128499],
-                 [0.66275085646437604, -0.54194078514648203],
-                 [0.13795905905155001, 0.84492947065128499],
-                 [-0.80070991551592596, -0.30298868550480201],
-                 [0.0, -0.50291356104093599],
-                 [0.43553591976914702, 0.25145678052046799],
-                 [-0.43553591976914602, 0.25145678052046799],
-                 [-0.13890838462724001, -0.47583110208346102],
-                 [0.48153601462864398, 0.11761736115588101],
-                 [-0.342627630001404, 0.35821374092758002],
-                 [0.13890838462724001, -0.47583110208346102],
-                 [0.342627630001404, 0.35821374092758002],
-                 [-0.48153601462864398, 0.11761736115588201],
-                 [-0.52593106350449004, -0.543705337850385],
-                 [0.73382816650387905, -0.18361699270906201],
-                 [-0.20789710299938899, 0.72732233055944795],
-                 [0.52593106350449004, -0.543705337850385],
-                 [0.20789710299938899, 0.72732233055944795],
-                 [-0.73382816650387905, -0.18361699270906201],
-                 [-0.74112180754338097, -0.489240511719231],
-                 [0.79425561548104295, -0.39721005677159399],
-                 [-0.053133807937661599, 0.88645056849082504],
-                 [0.74112180754338097, -0.489240511719231],
-                 [0.053133807937662203, 0.88645056849082504],
-                 [-0.79425561548104295, -0.39721005677159299],
-                 [-0.492955709145108, -0.570757647116094],
-                 [0.74076847637932497, -0.14153334350218899],
-                 [-0.247812767234217, 0.71229099061828405],
-                 [0.492955709145108, -0.570757647116094],
-                 [0.247812767234218, 0.71229099061828305],
-                 [-0.74076847637932497, -0.14153334350218899],
-                 [-0.51670323488631797, -0.41461766926988503],
-                 [0.61742105188877405, -0.240169292994206],
-                 [-0.10071781700245599, 0.65478696226409105],
-                 [0.51670323488631797, -0.41461766926988503],
-                 [0.10071781700245699, 0.65478696226409205],
-                 [-0.61742105188877405, -0.240169292994206],
-                 [-0.64505375945992205, -0.57099887763461898],
-                 [0.81702641329394199, -0.27313350368163902],
-                 [-0.17197265383402099, 0.84413238131625901],
-                 [0.64505375945992105, -0.57099887763461898],
-                 [0.17197265383402099, 0.84413238131625901],
-                 [-0.81702641329394299, -0.27313350368163902],
-                 [-0.61872928859268195, -0.49001038870971603],
-                 [0.73372608903724201, -0.29083008763187801],
-                 [-0.11499680044456, 0.78084047634159404],
-                 [0.61872928859268195, -0.49001038870971603],
-                 [0.114996800444561, 0.78084047634159404],
-                 [-0.73372608903724201, -0.29083008763187701],
-                 [-0.874922003537138, -0.57022781943877898],
-                 [0.93129277934715704, -0.47259077167375102],
-                 [-0.056370775810018703, 1.0428185911125301],
-                 [0.874922003537138, -0.57022781943877898],
-                 [0.056370775810019397, 1.0428185911125301],
-                 [-0.93129277934715804, -0.47259077167375002],
-                 [-0.33145619841996099, -0.56983893491575399],
-                 [0.65922309291249104, -0.0021300206156240598],
-                 [-0.32776689449252999, 0.57196895553137905],
-                 [0.33145619841996099, -0.56983893491575399],
-                 [0.32776689449252999, 0.57196895553137905],
-                 [-0.65922309291249104, -0.0021300206156237302],
-                 [-0.097409390068179502, -0.32834341163271902],
-                 [0.33305843067327501, 0.079812699450168598],
-                 [-0.23564904060509601, 0.24853071218255099],
-                 [0.097409390068179405, -0.32834341163271902],
-                 [0.23564904060509601, 0.24853071218255099],
-                 [-0.33305843067327501, 0.079812699450168806],
-                 [-0.92944767082626001, -0.53661686294921296],
-                 [0.92944767082626001, -0.53661686294921196],
-                 [0.0, 1.0732337258984199],
-                 [-0.86499638747373797, -0.53947756141543202],
-                 [0.899699466694313, -0.47937006502630902],
-                 [-0.034703079220574501, 1.0188476264417401],
-                 [0.86499638747373797, -0.53947756141543202],
-                 [0.034703079220575098, 1.0188476264417401],
-                 [-0.899699466694313, -0.47937006502630802],
-                 [-0.081928414718918097, -0.0473013922922466],
-                 [0.081928414718918097, -0.047301392292246502],
-                 [0.0, 0.094602784584493602],
-                 [-0.56053284785007096, -0.32362379059586699],
-                 [0.56053284785007196, -0.32362379059586599],
-                 [0.0, 0.64724758119173298],
-                 [-0.83686239016150998, -0.48316272623442202],
-                 [0.83686239016151098, -0.48316272623442202],
-                 [0.0, 0.96632545246884405],
-                 [-0.249722836118837, -0.28583342001808199],
-                 [0.37240042104566501, -0.073349609974970406],
-                 [-0.122677584926828, 0.35918302999305302],
-                 [0.249722836118837, -0.28583342001808199],
-                 [0.122677584926828, 0.35918302999305302],
-                 [-0.37240042104566501, -0.073349609974970004],
-                 [-0.47779523112848898, -0.49332159111642898],
-                 [0.66612664570643199, -0.16712201240611399],
-                 [-0.188331414577943, 0.66044360352254405],
-                 [0.47779523112848898, -0.49332159111642898],
-                 [0.188331414577943, 0.66044360352254305],
-                 [-0.66612664570643199, -0.16712201240611299],
-                 [-0.166164454166182, -0.56914512902821002],
-                 [0.57597636726169299, 0.14066992600021699],
-                 [-0.40981191309551102, 0.42847520302799402],
-                 [0.166164454166182, -0.56914512902821002],
-                 [0.40981191309551102, 0.42847520302799402],
-                 [-0.57597636726169299, 0.14066992600021699],
-                 [-0.36279240961074999, -0.53901095406565902],
-                 [0.64819338394432302, -0.0446819659902494],
-                 [-0.28540097433357298, 0.583692920055909],
-                 [0.36279240961074999, -0.53901095406565902],
-                 [0.28540097433357298, 0.583692920055909],
-                 [-0.64819338394432302, -0.044681965990249199],
-                 [-0.77375327602359301, -0.56974068564230496],
-                 [0.88028654534759598, -0.38521965047671203],
-                 [-0.106533269324003, 0.95496033611901698],
-                 [0.77375327602359301, -0.56974068564230496],
-                 [0.106533269324004, 0.95496033611901698],
-                 [-0.88028654534759698, -0.38521965047671097],
-                 [-0.34542395241023799, -0.19943061190859501],
-                 [0.34542395241023799, -0.19943061190859501],
-                 [0.0, 0.39886122381719102],
-                 [-0.30711355053101702, -0.48180999095667199],
-                 [0.57081646723113799, -0.0250631411279604],
-                 [-0.26370291670012003, 0.50687313208463303],
-                 [0.30711355053101702, -0.48180999095667199],
-                 [0.26370291670012103, 0.50687313208463303],
-                 [-0.57081646723113799, -0.025063141127960001],
-                 [0.0, -0.54960747258649001],
-                 [0.47597403336965999, 0.274803736293245],
-                 [-0.47597403336965999, 0.274803736293245],
-                 [-0.184864593327596, -0.53508842266119805],
-                 [0.55583246395934005, 0.10744677724862201],
-                 [-0.37096787063174402, 0.42764164541257599],
-                 [0.184864593327596, -0.53508842266119805],
-                 [0.37096787063174402, 0.42764164541257599],
-                 [-0.55583246395934005, 0.10744677724862201],
-                 [0.0, -0.415923000964384],
-                 [0.36019988485341597, 0.207961500482192],
-                 [-0.36019988485341597, 0.207961500482192],
-                 [-0.42184939757610801, -0.31644289654629298],
-                 [0.484972286044275, -0.20711084659892401],
-                 [-0.063122888468166702, 0.52355374314521796],
-                 [0.42184939757610801, -0.31644289654629298],
-                 [0.063122888468167201, 0.52355374314521796],
-                 [-0.484972286044275, -0.20711084659892401],
-                 [-0.98582001846829503, -0.569163453035193],
-                 [0.98582001846829503, -0.569163453035192],
-                 [0.0, 1.13832690607038],
-                 [-0.94593887427662104, -0.56955190911504405],
-                 [0.96621585920586495, -0.53443114099328604],
-                 [-0.020276984929242799, 1.1039830501083301],
-                 [0.94593887427662104, -0.56955190911504405],
-                 [0.020276984929243499, 1.1039830501083301],
-                 [-0.96621585920586495, -0.53443114099328604]],
-      'weights': [0.0055466571738315403,
-                  0.0055466571738315403,
-                  0.0055466571738315403,
-                  0.0118380128999703,
-                  0.0118380128999703,
-                  0.0118380128999703,
-                  0.0086790008145456194,
-                  0.0086790008145456194,
-                  0.0086790008145456194,
-                  0.0086790008145456194,
-                  0.0086790008145456194,
-                  0.0086790008145456194,
-                  0.0108541934576283,
-                  0.0108541934576283,
-                  0.0108541934576283,
-                  0.0108541934576283,
-                  0.0108541934576283,
-                  0.0108541934576283,
-                  0.0154744221747343,
-                  0.0154744221747343,
-                  0.0154744221747343,
-                  0.0018032229182948301,
-                  0.0018032229182948301,
-                  0.0018032229182948301,
-                  0.0088440112949635802,
-                  0.0088440112949635802,
-                  0.0088440112949635802,
-                  0.0088440112949635802,
-                  0.0088440112949635802,
-                  0.0088440112949635802,
-                  0.016695665306210899,
-                  0.016695665306210899,
-                  0.016695665306210899,
-                  0.016695665306210899,
-                  0.016695665306210899,
-                  0.016695665306210899,
-                  0.0168681955415989,
-                  0.0168681955415989,
-                  0.0168681955415989,
-                  0.0041937073005386596,
-                  0.0041937073005386596,
-                  0.0041937073005386596,
-                  0.0041937073005386596,
-                  0.0041937073005386596,
-                  0.0041937073005386596,
-                  0.0133321956147332,
-                  0.0133321956147332,
-                  0.0133321956147332,
-                  0.0133321956147332,
-                  0.0133321956147332,
-                  0.0133321956147332,
-                  0.0051757916319037298,
-                  0.0051757916319037298,
-                  0.0051757916319037298,
-                  0.0051757916319037298,
-                  0.0051757916319037298,
-                  0.0051757916319037298,
-                  0.0094644897138712897,
-                  0.0094644897138712897,
-                  0.0094644897138712897,
-                  0.010736730121636799,
-                  0.010736730121636799,
-                  0.010736730121636799,
-                  0.010736730121636799,
-                  0.010736730121636799,
-                  0.010736730121636799,
-                  0.0057452078416259196,
-                  0.0057452078416259196,
-                  0.0057452078416259196,
-                  0.0057452078416259196,
-                  0.0057452078416259196,
-                  0.0057452078416259196,
-                  0.0064240545307013598,
-                  0.0064240545307013598,
-                  0.0064240545307013598,
-                  0.0064240545307013598,
-                  0.0064240545307013598,
-                  0.0064240545307013598,
-                  0.0026719421481102598,
-                  0.0026719421481102598,
-                  0.0026719421481102598,
-                  0.0026719421481102598,
-                  0.0026719421481102598,
-                  0.0026719421481102598,
-                  0.0114526185643757,
-                  0.0114526185643757,
-                  0.0114526185643757,
-                  0.0114526185643757,
-                  0.0114526185643757,
-                  0.0114526185643757,
-                  0.0023472374883496501,
-                  0.0023472374883496501,
-                  0.0023472374883496501,
-                  0.0023472374883496501,
-                  0.0023472374883496501,
-                  0.0023472374883496501,
-                  0.0084933334324684608,
-                  0.0084933334324684608,
-                  0.0084933334324684608,
-                  0.0084933334324684608,
-                  0.0084933334324684608,
-                  0.0084933334324684608,
-                  0.00158615351208961,
-                  0.00158615351208961,
-                  0.00158615351208961,
-                  0.00158615351208961,
-                  0.00158615351208961,
-                  0.00158615351208961,
-                  0.0031554783320420698,
-                  0.0031554783320420698,
-                  0.0031554783320420698,
-                  0.0031554783320420698,
-                  0.0031554783320420698,
-                  0.0031554783320420698,
-                  0.016008271572614498,
-                  0.016008271572614498,
-                  0.016008271572614498,
-                  0.016008271572614498,
-                  0.016008271572614498,
-                  0.016008271572614498,
-                  0.0023926014011681502,
-                  0.0023926014011681502,
-                  0.0023926014011681502,
-                  0.0033959129116631001,
-                  0.0033959129116631001,
-                  0.0033959129116631001,
-                  0.0033959129116631001,
-                  0.0033959129116631001,
-                  0.0033959129116631001,
-                  0.0209383118464367,
-                  0.0209383118464367,
-                  0.0209383118464367,
-                  0.0127781121624646,
-                  0.0127781121624646,
-                  0.0127781121624646,
-                  0.0055587580282006202,
-                  0.0055587580282006202,
-                  0.0055587580282006202,
-                  0.0176840963471399,
-                  0.0176840963471399,
-                  0.0176840963471399,
-                  0.0176840963471399,
-                  0.0176840963471399,
-                  0.0176840963471399,
-                  0.0094635279984214005,
-                  0.0094635279984214005,
-                  0.0094635279984214005,
-                  0.0094635279984214005,
-                  0.0094635279984214005,
-                  0.0094635279984214005,
-                  0.00348333086015103,
-                  0.00348333086015103,
-                  0.00348333086015103,
-                  0.00348333086015103,
-                  0.00348333086015103,
-                  0.00348333086015103,
-                  0.0073929725686723204,
-                  0.0073929725686723204,
-                  0.0073929725686723204,
-                  0.0073929725686723204,
-                  0.0073929725686723204,
-                  0.0073929725686723204,
-                  0.0022306673740761299,
-                  0.0022306673740761299,
-                  0.0022306673740761299,
-                  0.0022306673740761299,
-                  0.0022306673740761299,
-                  0.0022306673740761299,
-                  0.017192987878012,
-                  0.017192987878012,
-                  0.017192987878012,
-                  0.0114313332468355,
-                  0.0114313332468355,
-                  0.0114313332468355,
-                  0.0114313332468355,
-                  0.0114313332468355,
-                  0.0114313332468355,
-                  0.0066898072731260503,
-                  0.0066898072731260503,
-                  0.0066898072731260503,
-                  0.0085692049918889793,
-                  0.0085692049918889793,
-                  0.0085692049918889793,
-                  0.0085692049918889793,
-                  0.0085692049918889793,
-                  0.0085692049918889793,
-                  0.0161666119646009,
-                  0.0161666119646009,
-                  0.0161666119646009,
-                  0.015902792547086399,
-                  0.015902792547086399,
-                  0.015902792547086399,
-                  0.015902792547086399,
-                  0.015902792547086399,
-                  0.015902792547086399,
-                  0.00050832700570132704,
-                  0.00050832700570132704,
-                  0.00050832700570132704,
-                  0.0011154437933342601,
-                  0.0011154437933342601,
-                  0.0011154437933342601,
-                  0.0011154437933342601,
-                  0.0011154437933342601,
-                  0.0011154437933342601]},
- 34: {'points': [[-0.20865073605333601, -0.54080960852670901],
-                 [0.57268022762151505, 0.089707966322843793],
-                 [-0.36402949156817899, 0.45110164220386501],
-                 [0.20865073605333601, -0.54080960852670901],
-                 [0.36402949156817899, 0.45110164220386501],
-                 [-0.57268022762151505, 0.089707966322844196],
-                 [-0.89097175315861199, -0.57148188680340894],
-                 [0.940403708353721, -0.48586322888801198],
-                 [-0.049431955195108297, 1.05734511569142],
-                 [0.89097175315861199, -0.57148188680340894],
-                 [0.049431955195108998, 1.05734511569142],
-                 [-0.940403708353721, -0.48586322888801198],
-                 [-0.86205221453761804, -0.49770607811880702],
-                 [0.86205221453761804, -0.49770607811880702],
-                 [0.0, 0.99541215623761403],
-                 [-0.87999414063426395, -0.54581251858802005],
-                 [0.91268457711792395, -0.48919102167671902],
-                 [-0.032690436483658901, 1.03500354026474],
-                 [0.87999414063426395, -0.54581251858802005],
-                 [0.032690436483659498, 1.03500354026474],
-                 [-0.91268457711792395, -0.48919102167671802],
-                 [-0.93748375745509405, -0.54125649972760104],
-                 [0.93748375745509405, -0.54125649972760004],
-                 [0.0, 1.0825129994552001],
-                 [-0.68124048521147096, -0.47254254003026203],
-                 [0.74985408664076703, -0.35370029626444],
-                 [-0.068613601429295998, 0.82624283629470197],
-                 [0.68124048521147096, -0.47254254003026203],
-                 [0.068613601429296595, 0.82624283629470197],
-                 [-0.74985408664076703, -0.35370029626444],
-                 [-0.78844430308137303, -0.51513519234555505],
-                 [0.84034231449532004, -0.42524519976480901],
-                 [-0.051898011413946503, 0.94038039211036395],
-                 [0.78844430308137303, -0.51513519234555505],
-                 [0.051898011413946898, 0.94038039211036395],
-                 [-0.84034231449532004, -0.42524519976480901],
-                 [-0.77271347743962704, -0.446126334206221],
-                 [0.77271347743962704, -0.44612633420622],
-                 [0.0, 0.892252668412442],
-                 [0.0, -0.14988699059565599],
-                 [0.129805941552637, 0.074943495297828094],
-                 [-0.129805941552637, 0.074943495297828205],
-                 [-0.28883149528014901, -0.29318823199080302],
-                 [0.39832420463475499, -0.103541296330252],
-                 [-0.109492709354606, 0.39672952832105601],
-                 [0.28883149528014901, -0.29318823199080302],
-                 [0.109492709354607, 0.39672952832105601],
-                 [-0.39832420463475599, -0.103541296330252],
-                 [-0.80036260521166303, -0.55884631397612305],
-                 [0.88415640732044898, -0.41371119136433399],
-                 [-0.083793802108785398, 0.97255750534045804],
-                 [0.80036260521166303, -0.55884631397612305],
-                 [0.083793802108786106, 0.97255750534045804],
-                 [-0.88415640732044898, -0.41371119136433399],
-                 [-0.13793248053350499, -0.079635354766011898],
-                 [0.13793248053350499, -0.079635354766011704],
-                 [0.0, 0.15927070953202399],
-                 [-0.146562853086425, -0.52342688512318802],
-                 [0.52658240608365203, 0.13478628853762301],
-                 [-0.38001955299722701, 0.38864059658556499],
-                 [0.146562853086425, -0.52342688512318802],
-                 [0.38001955299722701, 0.38864059658556499],
-                 [-0.52658240608365203, 0.13478628853762301],
-                 [-0.147912237781784, -0.34665387857625302],
-                 [0.37416718405833299, 0.045231183838497703],
-                 [-0.22625494627654899, 0.30142269473775601],
-                 [0.147912237781784, -0.34665387857625302],
-                 [0.22625494627654999, 0.30142269473775601],
-                 [-0.37416718405833299, 0.045231183838497897],
-                 [-0.14888251010183201, -0.44866353740446802],
-                 [0.46299527619497499, 0.095395732774854497],
-                 [-0.31411276609314298, 0.35326780462961399],
-                 [0.14888251010183201, -0.44866353740446802],
-                 [0.31411276609314298, 0.35326780462961399],
-                 [-0.46299527619497399, 0.095395732774854802],
-                 [-0.14412341550112301, -0.22199147096348901],
-                 [0.26431196102841897, -0.0138188036224075],
-                 [-0.12018854552729601, 0.23581027458589701],
-                 [0.14412341550112301, -0.22199147096348901],
-                 [0.12018854552729601, 0.23581027458589701],
-                 [-0.26431196102841797, -0.0138188036224073],
-                 [-0.560219434912688, -0.42108532754196898],
-                 [0.64478030826858101, -0.274621598557166],
-                 [-0.084560873355892699, 0.69570692609913598],
-                 [0.560219434912688, -0.42108532754196898],
-                 [0.084560873355893101, 0.69570692609913498],
-                 [-0.64478030826858101, -0.274621598557165],
-                 [-0.56775489079636199, -0.50128574606027498],
-                 [0.71800363604141404, -0.24104728552237201],
-                 [-0.150248745245052, 0.74233303158264696],
-                 [0.56775489079636199, -0.50128574606027498],
-                 [0.150248745245052, 0.74233303158264696],
-                 [-0.71800363604141404, -0.24104728552237201],
-                 [0.0, -0.48871256531163398],
-                 [0.423237496708537, 0.24435628265581699],
-                 [-0.423237496708537, 0.24435628265581799],
-                 [-0.43438042322623999, -0.45790141180639499],
-                 [0.61374446666621796, -0.147233775517363],
-                 [-0.179364043439977, 0.60513518732375804],
-                 [0.43438042322623999, -0.45790141180639499],
-                 [0.179364043439977, 0.60513518732375804],
-                 [-0.61374446666621796, -0.147233775517362],
-                 [-0.42883411933471099, -0.36052903462331498],
-                 [0.52664436245302604, -0.19111672404173],
-                 [-0.0978102431183141, 0.55164575866504595],
-                 [0.42883411933471199, -0.36052903462331498],
-                 [0.097810243118314502, 0.55164575866504595],
-                 [-0.52664436245302604, -0.19111672404173],
-                 [-0.69612085434081405, -0.56926107479496701],
-                 [0.84105497932848206, -0.31822780656578897],
-                 [-0.144934124987667, 0.88748888136075699],
-                 [0.69612085434081505, -0.56926107479496701],
-                 [0.144934124987668, 0.88748888136075599],
-                 [-0.84105497932848206, -0.31822780656578797],
-                 [-0.666481896142463, -0.38479350214786301],
-                 [0.666481896142463, -0.38479350214786301],
-                 [0.0, 0.76958700429572602],
-                 [0.0, -0.54916967076805201],
-                 [0.47559488587306897, 0.274584835384026],
-                 [-0.47559488587306897, 0.274584835384026],
-                 [-0.29429125011188201, -0.49260808560575498],
-                 [0.57375674130014498, -0.0085596559054924599],
-                 [-0.27946549118826203, 0.50116774151124799],
-                 [0.29429125011188201, -0.49260808560575498],
-                 [0.27946549118826203, 0.50116774151124799],
-                 [-0.57375674130014498, -0.0085596559054922396],
-                 [-0.54733683171138103, -0.31600506712596299],
-                 [0.54733683171138103, -0.31600506712596199],
-                 [0.0, 0.63201013425192598],
-                 [-0.69057074957270703, -0.53464092774804695],
-                 [0.80829800011904296, -0.330731348366403],
-                 [-0.117727250546335, 0.86537227611445],
-                 [0.69057074957270703, -0.53464092774804695],
-                 [0.117727250546336, 0.86537227611445],
-                 [-0.80829800011904296, -0.330731348366402],
-                 [-0.14635945730951799, -0.56702734467084204],
-                 [0.56423981378014298, 0.156762664221274],
-                 [-0.41788035647062399, 0.41026468044956799],
-                 [0.14635945730951799, -0.56702734467084204],
-                 [0.41788035647062499, 0.41026468044956799],
-                 [-0.56423981378014298, 0.15676266422127499],
-                 [-0.98752612782304205, -0.57014847573042304],
-                 [0.98752612782304305, -0.57014847573042204],
-                 [0.0, 1.1402969514608501],
-                 [-0.27869526875855, -0.160904788439624],
-                 [0.27869526875855, -0.160904788439623],
-                 [0.0, 0.32180957687924799],
-                 [-0.43610043846910301, -0.527954392259812],
-                 [0.67527213497112404, -0.11369686218587],
-                 [-0.23917169650202, 0.64165125444568305],
-                 [0.43610043846910301, -0.527954392259812],
-                 [0.23917169650202, 0.64165125444568305],
-                 [-0.67527213497112404, -0.113696862185869],
-                 [0.0, -0.28467385501300602],
-                 [0.246534790234512, 0.14233692750650301],
-                 [-0.246534790234511, 0.14233692750650401],
-                 [0.0, -0.57576434340793103],
-                 [0.49862654798453498, 0.28788217170396602],
-                 [-0.49862654798453498, 0.28788217170396602],
-                 [-0.29361459879318202, -0.55039498029219602],
-                 [0.62346333444506796, 0.020919788669226301],
-                 [-0.32984873565188599, 0.52947519162296997],
-                 [0.29361459879318202, -0.55039498029219602],
-                 [0.32984873565188599, 0.52947519162296997],
-                 [-0.62346333444506796, 0.020919788669226599],
-                 [-0.292175242450739, -0.57574687817495995],
-                 [0.64469904387446897, 0.034842256768262699],
-                 [-0.35252380142373002, 0.54090462140669704],
-                 [0.292175242450739, -0.57574687817495995],
-                 [0.35252380142373002, 0.54090462140669704],
-                 [-0.64469904387446897, 0.034842256768262997],
-                 [0.0, -0.39917165954426298],
-                 [0.34569279763612498, 0.19958582977213199],
-                 [-0.34569279763612498, 0.19958582977213199],
-                 [-0.294042509437836, -0.40538150617520002],
-                 [0.49809193729104001, -0.051957529878091303],
-                 [-0.20404942785320401, 0.45733903605329201],
-                 [0.294042509437836, -0.40538150617520002],
-                 [0.20404942785320401, 0.45733903605329201],
-                 [-0.49809193729104001, -0.051957529878090998],
-                 [-0.95251437348711399, -0.57046622308344297],
-                 [0.97029542793477896, -0.53966853336793796],
-                 [-0.0177810544476651, 1.1101347564513799],
-                 [0.95251437348711399, -0.57046622308344297],
-                 [0.017781054447665801, 1.1101347564513799],
-                 [-0.97029542793477896, -0.53966853336793696],
-                 [0.0, 2.2204460492503101e-16],
-                 [-0.57112662404758996, -0.55348323362954899],
-                 [0.76489385291574197, -0.21786854838808301],
-                 [-0.19376722886815101, 0.77135178201763199],
-                 [0.57112662404758996, -0.55348323362954899],
-                 [0.19376722886815201, 0.77135178201763199],
-                 [-0.76489385291574197, -0.21786854838808301],
-                 [-0.41684036926310097, -0.240662899403155],
-                 [0.41684036926310197, -0.240662899403154],
-                 [0.0, 0.48132579880630899],
-                 [-0.57210738184377696, -0.57601288500270797],
-                 [0.78489548224139805, -0.20745308386796099],
-                 [-0.212788100397621, 0.78346596887066899],
-                 [0.57210738184377696, -0.57601288500270797],
-                 [0.212788100397621, 0.78346596887066899],
-                 [-0.78489548224139805, -0.20745308386796099],
-                 [-0.43576534554125901, -0.56789016986039298],
-                 [0.70968998642918901, -0.093438774397438001],
-                 [-0.27392464088793, 0.66132894425783095],
-                 [0.43576534554125901, -0.56789016986039298],
-                 [0.273924640887931, 0.66132894425783095],
-                 [-0.70968998642918901, -0.093438774397437502],
-                 [-0.806261445157887, -0.57734211176549399],
-                 [0.90312365804241601, -0.40957183771593703],
-                 [-0.096862212884528204, 0.98691394948143196],
-                 [0.806261445157887, -0.57734211176549399],
-                 [0.096862212884528898, 0.98691394948143196],
-                 [-0.90312365804241601, -0.40957183771593703]],
-      'weights': [0.000176125270556917,
-                  0.000176125270556917,
-                  0.000176125270556917,
-                  0.000176125270556917,
-                  0.000176125270556917,
-                  0.000176125270556917,
-                  0.0011328443087166801,
-                  0.0011328443087166801,
-                  0.0011328443087166801,
-                  0.0011328443087166801,
-                  0.0011328443087166801,
-                  0.0011328443087166801,
-                  0.0039819269020796803,
-                  0.0039819269020796803,
-                  0.0039819269020796803,
-                  0.0026323910100446699,
-                  0.0026323910100446699,
-                  0.0026323910100446699,
-                  0.0026323910100446699,
-                  0.0026323910100446699,
-                  0.0026323910100446699,
-                  0.0019047026132103901,
-                  0.0019047026132103901,
-                  0.0019047026132103901,
-                  0.00808804972153262,
-                  0.00808804972153262,
-                  0.00808804972153262,
-                  0.00808804972153262,
-                  0.00808804972153262,
-                  0.00808804972153262,
-                  0.0051132142619519398,
-                  0.0051132142619519398,
-                  0.0051132142619519398,
-                  0.0051132142619519398,
-                  0.0051132142619519398,
-                  0.0051132142619519398,
-                  0.0069236539185477597,
-                  0.0069236539185477597,
-                  0.0069236539185477597,
-                  0.0203342878972517,
-                  0.0203342878972517,
-                  0.0203342878972517,
-                  0.017079632311847101,
-                  0.017079632311847101,
-                  0.017079632311847101,
-                  0.017079632311847101,
-                  0.017079632311847101,
-                  0.017079632311847101,
-                  0.0029899929920613301,
-                  0.0029899929920613301,
-                  0.0029899929920613301,
-                  0.0029899929920613301,
-                  0.0029899929920613301,
-                  0.0029899929920613301,
-                  0.020371009189831701,
-                  0.020371009189831701,
-                  0.020371009189831701,
-                  0.0087229239684997097,
-                  0.0087229239684997097,
-                  0.0087229239684997097,
-                  0.0087229239684997097,
-                  0.0087229239684997097,
-                  0.0087229239684997097,
-                  0.016727939250816899,
-                  0.016727939250816899,
-                  0.016727939250816899,
-                  0.016727939250816899,
-                  0.016727939250816899,
-                  0.016727939250816899,
-                  0.0131842235590711,
-                  0.0131842235590711,
-                  0.0131842235590711,
-                  0.0131842235590711,
-                  0.0131842235590711,
-                  0.0131842235590711,
-                  0.019166638482963402,
-                  0.019166638482963402,
-                  0.019166638482963402,
-                  0.019166638482963402,
-                  0.019166638482963402,
-                  0.019166638482963402,
-                  0.011264980826593499,
-                  0.011264980826593499,
-                  0.011264980826593499,
-                  0.011264980826593499,
-                  0.011264980826593499,
-                  0.011264980826593499,
-                  0.0083704598601266906,
-                  0.0083704598601266906,
-                  0.0083704598601266906,
-                  0.0083704598601266906,
-                  0.0083704598601266906,
-                  0.0083704598601266906,
-                  0.011231007518087499,
-                  0.011231007518087499,
-                  0.011231007518087499,
-                  0.0114203020585825,
-                  0.0114203020585825,
-                  0.0114203020585825,
-                  0.0114203020585825,
-                  0.0114203020585825,
-                  0.0114203020585825,
-                  0.014350502554939399,
-                  0.014350502554939399,
-                  0.014350502554939399,
-                  0.014350502554939399,
-                  0.014350502554939399,
-                  0.014350502554939399,
-                  0.0024238827971230399,
-                  0.0024238827971230399,
-                  0.0024238827971230399,
-                  0.0024238827971230399,
-                  0.0024238827971230399,
-                  0.0024238827971230399,
-                  0.0101038035155714,
-                  0.0101038035155714,
-                  0.0101038035155714,
-                  0.0064594599542713701,
-                  0.0064594599542713701,
-                  0.0064594599542713701,
-                  0.010557306989817,
-                  0.010557306989817,
-                  0.010557306989817,
-                  0.010557306989817,
-                  0.010557306989817,
-                  0.010557306989817,
-                  0.0133148126816563,
-                  0.0133148126816563,
-                  0.0133148126816563,
-                  0.0054441927472747703,
-                  0.0054441927472747703,
-                  0.0054441927472747703,
-                  0.0054441927472747703,
-                  0.0054441927472747703,
-                  0.0054441927472747703,
-                  0.0038647800346316998,
-                  0.0038647800346316998,
-                  0.0038647800346316998,
-                  0.0038647800346316998,
-                  0.0038647800346316998,
-                  0.0038647800346316998,
-                  0.00039310860128204101,
-                  0.00039310860128204101,
-                  0.00039310860128204101,
-                  0.018729876633551901,
-                  0.018729876633551901,
-                  0.018729876633551901,
-                  0.0076829114147084401,
-                  0.0076829114147084401,
-                  0.0076829114147084401,
-                  0.0076829114147084401,
-                  0.0076829114147084401,
-                  0.0076829114147084401,
-                  0.018441915437978101,
-                  0.018441915437978101,
-                  0.018441915437978101,
-                  0.0013179627806983499,
-                  0.0013179627806983499,
-                  0.0013179627806983499,
-                  0.0060419601962602102,
-                  0.0060419601962602102,
-                  0.0060419601962602102,
-                  0.0060419601962602102,
-                  0.0060419601962602102,
-                  0.0060419601962602102,
-                  0.00126759423650627,
-                  0.00126759423650627,
-                  0.00126759423650627,
-                  0.00126759423650627,
-                  0.00126759423650627,
-                  0.00126759423650627,
-                  0.015347597070648899,
-                  0.015347597070648899,
-                  0.015347597070648899,
-                  0.0142908003530229,
-                  0.0142908003530229,
-                  0.0142908003530229,
-                  0.0142908003530229,
-                  0.0142908003530229,
-                  0.0142908003530229,
-                  0.00086250513729918402,
-                  0.00086250513729918402,
-                  0.00086250513729918402,
-                  0.00086250513729918402,
-                  0.00086250513729918402,
-                  0.00086250513729918402,
-                  0.0209594860796656,
-                  0.0048598195706256496,
-                  0.0048598195706256496,
-                  0.0048598195706256496,
-                  0.0048598195706256496,
-                  0.0048598195706256496,
-                  0.0048598195706256496,
-                  0.016281521874740801,
-                  0.016281521874740801,
-                  0.016281521874740801,
-                  0.00100052014359594,
-                  0.00100052014359594,
-                  0.00100052014359594,
-                  0.00100052014359594,
-                  0.00100052014359594,
-                  0.00100052014359594,
-                  0.00339937280749536,
-                  0.00339937280749536,
-                  0.00339937280749536,
-                  0.00339937280749536,
-                  0.00339937280749536,
-                  0.00339937280749536,
-                  0.00049769675350018504,
-                  0.00049769675350018504,
-                  0.00049769675350018504,
-                  0.00049769675350018504,
-                  0.00049769675350018504,
-                  0.00049769675350018504]},
- 35: {'points': [[-0.0956944941480459, -0.0552492419563392],
-                 [0.095694494148045997, -0.0552492419563392],
-                 [0.0, 0.110498483912679],
-                 [0.0, -0.54839524322647304],
-                 [0.47492421194867201, 0.27419762161323702],
-                 [-0.47492421194867201, 0.27419762161323702],
-                 [0.0, -0.084731241225870599],
-                 [0.073379407395791393, 0.042365620612935598],
-                 [-0.073379407395791393, 0.042365620612935702],
-                 [-0.88784082040153101, -0.57376800669530204],
-                 [0.94081807987765598, -0.48200870163689202],
-                 [-0.052977259476125298, 1.0557767083321901],
-                 [0.88784082040153101, -0.57376800669530204],
-                 [0.052977259476125999, 1.0557767083321901],
-                 [-0.94081807987765698, -0.48200870163689202],
-                 [-0.100342075983277, -0.56192636681814701],
-                 [0.53681354671244697, 0.194064396539087],
-                 [-0.43647147072916898, 0.36786197027905998],
-                 [0.100342075983277, -0.56192636681814701],
-                 [0.43647147072916997, 0.36786197027905998],
-                 [-0.53681354671244697, 0.194064396539088],
-                 [-0.69311601738832995, -0.57368528854276502],
-                 [0.84338404234960496, -0.31341343455680798],
-                 [-0.150268024961275, 0.88709872309957305],
-                 [0.69311601738832995, -0.57368528854276502],
-                 [0.150268024961276, 0.88709872309957305],
-                 [-0.84338404234960496, -0.31341343455680698],
-                 [-0.21275811967196301, -0.122835957664887],
-                 [0.21275811967196301, -0.122835957664886],
-                 [0.0, 0.245671915329774],
-                 [-0.201705506514406, -0.57170157791299603],
-                 [0.59596084311350594, 0.111168696231815],
-                 [-0.3942553365991, 0.460532881681182],
-                 [0.201705506514406, -0.57170157791299603],
-                 [0.3942553365991, 0.46053288168118101],
-                 [-0.59596084311350594, 0.111168696231815],
-                 [0.0, -0.24069657869901301],
-                 [0.208449351757346, 0.120348289349507],
-                 [-0.208449351757346, 0.120348289349507],
-                 [-0.64267456637991904, -0.49911718050235998],
-                 [0.75358544097026603, -0.30701391059997801],
-                 [-0.110910874590347, 0.80613109110233905],
-                 [0.64267456637991904, -0.49911718050235998],
-                 [0.110910874590348, 0.80613109110233905],
-                 [-0.75358544097026703, -0.30701391059997801],
-                 [0.0, -0.484127711115449],
-                 [0.419266896501993, 0.242063855557724],
-                 [-0.419266896501992, 0.242063855557725],
-                 [-0.59680262574112597, -0.56244420234421399],
-                 [0.78549228031192797, -0.23562413376496399],
-                 [-0.188689654570802, 0.79806833610917904],
-                 [0.59680262574112597, -0.56244420234421399],
-                 [0.188689654570802, 0.79806833610917904],
-                 [-0.78549228031192797, -0.23562413376496399],
-                 [-0.88583797294857902, -0.55314597935499399],
-                 [0.92195745659693695, -0.49058519853288501],
-                 [-0.036119483648357403, 1.0437311778878799],
-                 [0.88583797294857902, -0.55314597935499399],
-                 [0.036119483648358, 1.0437311778878799],
-                 [-0.92195745659693695, -0.49058519853288501],
-                 [-0.214810541471467, -0.25264039633717],
-                 [0.32619827198589202, -0.059711187746396201],
-                 [-0.11138773051442501, 0.312351584083567],
-                 [0.214810541471467, -0.25264039633717],
-                 [0.11138773051442501, 0.312351584083567],
-                 [-0.32619827198589202, -0.059711187746396097],
-                 [-0.81139585286780203, -0.46845961407257197],
-                 [0.81139585286780302, -0.46845961407257197],
-                 [0.0, 0.93691922814514395],
-                 [0.0, -0.37503784513188998],
-                 [0.32479230126479097, 0.18751892256594499],
-                 [-0.32479230126479097, 0.18751892256594599],
-                 [-0.94111852004958696, -0.54335503088997195],
-                 [0.94111852004958696, -0.54335503088997095],
-                 [0.0, 1.0867100617799399],
-                 [-0.097750969393388801, -0.17426334519355699],
-                 [0.19979196858277201, 0.00247684985754892],
-                 [-0.102040999189383, 0.17178649533600901],
-                 [0.097750969393388898, -0.17426334519355699],
-                 [0.102040999189383, 0.17178649533600901],
-                 [-0.19979196858277201, 0.0024768498575490302],
-                 [-0.55225246543256501, -0.52711753152174201],
-                 [0.732623405794256, -0.214705898606318],
-                 [-0.18037094036169099, 0.74182343012805996],
-                 [0.55225246543256501, -0.52711753152174201],
-                 [0.18037094036169099, 0.74182343012805996],
-                 [-0.732623405794256, -0.214705898606317],
-                 [-0.73330302740947995, -0.48456866722910102],
-                 [0.78630028940310903, -0.39277471679409498],
-                 [-0.052997261993629599, 0.877343384023197],
-                 [0.73330302740947995, -0.48456866722910102],
-                 [0.0529972619936303, 0.877343384023197],
-                 [-0.78630028940311003, -0.39277471679409498],
-                 [-0.35377855031177002, -0.57129468294377395],
-                 [0.67164498363216996, -0.020733870412136701],
-                 [-0.31786643332039999, 0.59202855335591098],
-                 [0.35377855031177002, -0.57129468294377395],
-                 [0.31786643332039999, 0.59202855335591098],
-                 [-0.67164498363216996, -0.020733870412136299],
-                 [-0.51564990450718295, -0.57531330331362096],
-                 [0.75606088805832905, -0.15890926510542999],
-                 [-0.24041098355114601, 0.73422256841905098],
-                 [0.51564990450718295, -0.57531330331362096],
-                 [0.24041098355114601, 0.73422256841905098],
-                 [-0.75606088805832905, -0.15890926510542999],
-                 [-0.219739871814322, -0.37997627488267699],
-                 [0.43893904279093798, -0.00031217377420011998],
-                 [-0.21919917097661601, 0.380288448656878],
-                 [0.219739871814322, -0.37997627488267699],
-                 [0.21919917097661701, 0.380288448656878],
-                 [-0.43893904279093798, -0.00031217377419978702],
-                 [-0.60482829086183798, -0.43023229931186702],
-                 [0.67500624616358695, -0.30868051515794198],
-                 [-0.070177955301748099, 0.73891281446980905],
-                 [0.60482829086183798, -0.43023229931186702],
-                 [0.070177955301748501, 0.73891281446980905],
-                 [-0.67500624616358695, -0.30868051515794098],
-                 [-0.10540651029786, -0.31309961497003302],
-                 [0.32385547562810602, 0.065265091842804296],
-                 [-0.21844896533024499, 0.24783452312723001],
-                 [0.10540651029786, -0.31309961497003302],
-                 [0.21844896533024599, 0.24783452312723001],
-                 [-0.32385547562810502, 0.065265091842804504],
-                 [-0.87913939350941905, -0.50757136549786797],
-                 [0.87913939350941905, -0.50757136549786697],
-                 [0.0, 1.0151427309957399],
-                 [-0.44461399827537901, -0.55376202677277897],
-                 [0.70187898197407494, -0.108166003998259],
-                 [-0.25726498369869499, 0.66192803077103901],
-                 [0.44461399827537901, -0.55376202677277897],
-                 [0.25726498369869599, 0.66192803077103901],
-                 [-0.70187898197407494, -0.108166003998259],
-                 [-0.238760115725515, -0.47996330941134002],
-                 [0.53504047669742905, 0.033209329076862103],
-                 [-0.29628036097191401, 0.446753980334479],
-                 [0.238760115725515, -0.47996330941134002],
-                 [0.29628036097191401, 0.446753980334479],
-                 [-0.53504047669742905, 0.033209329076862498],
-                 [-0.106806245003931, -0.43574907178403999],
-                 [0.43077288834243299, 0.12537761443579101],
-                 [-0.323966643338502, 0.310371457348249],
-                 [0.106806245003931, -0.43574907178403999],
-                 [0.323966643338502, 0.310371457348249],
-                 [-0.43077288834243299, 0.12537761443579201],
-                 [-0.49845820778025601, -0.467118346583828],
-                 [0.65376545860550705, -0.19811829737065001],
-                 [-0.15530725082525099, 0.66523664395447801],
-                 [0.49845820778025601, -0.467118346583828],
-                 [0.15530725082525099, 0.66523664395447801],
-                 [-0.65376545860550705, -0.19811829737064901],
-                 [-0.471187282992797, -0.37748161580172201],
-                 [0.56250231024228703, -0.21931934911106801],
-                 [-0.091315027249490296, 0.596800964912791],
-                 [0.471187282992797, -0.37748161580172201],
-                 [0.091315027249490699, 0.596800964912791],
-                 [-0.56250231024228703, -0.21931934911106801],
-                 [-0.70442153599362201, -0.40669796342888798],
-                 [0.704421535993623, -0.40669796342888698],
-                 [0.0, 0.81339592685777595],
-                 [-0.33861070795850501, -0.320682654759814],
-                 [0.44702467955428599, -0.132904147705591],
-                 [-0.10841397159578101, 0.453586802465406],
-                 [0.33861070795850501, -0.320682654759814],
-                 [0.108413971595782, 0.453586802465406],
-                 [-0.44702467955428599, -0.132904147705591],
-                 [-0.70498953851611901, -0.54513781159869801],
-                 [0.82459796266598695, -0.33796994395787799],
-                 [-0.119608424149868, 0.88310775555657595],
-                 [0.70498953851611901, -0.54513781159869801],
-                 [0.119608424149869, 0.88310775555657595],
-                 [-0.82459796266598695, -0.33796994395787699],
-                 [-0.58139661103207796, -0.33566948988530698],
-                 [0.58139661103207796, -0.33566948988530598],
-                 [-1.11022302462516e-16, 0.67133897977061296],
-                 [-0.33539196847092401, -0.193638643280726],
-                 [0.33539196847092401, -0.193638643280726],
-                 [0.0, 0.38727728656145299],
-                 [-0.115408562902092, -0.52024278749878905],
-                 [0.50824775156062696, 0.160174646461929],
-                 [-0.39283918865853501, 0.36006814103686002],
-                 [0.115408562902092, -0.52024278749878905],
-                 [0.39283918865853501, 0.36006814103686002],
-                 [-0.50824775156062596, 0.160174646461929],
-                 [-0.45774903359410102, -0.26428152776684499],
-                 [0.45774903359410102, -0.26428152776684499],
-                 [0.0, 0.52856305553369098],
-                 [-0.35516859452256599, -0.42946854793782202],
-                 [0.549514969901852, -0.092850751514045302],
-                 [-0.19434637537928601, 0.52231929945186795],
-                 [0.35516859452256599, -0.42946854793782202],
-                 [0.19434637537928601, 0.52231929945186795],
-                 [-0.549514969901852, -0.092850751514044996],
-                 [-0.95143357699664399, -0.57105763188292902],
-                 [0.97026720473392103, -0.538436831751127],
-                 [-0.0188336277372767, 1.10949446363406],
-                 [0.95143357699664399, -0.57105763188292902],
-                 [0.018833627737277599, 1.10949446363406],
-                 [-0.97026720473392103, -0.538436831751126],
-                 [-0.80625540528872497, -0.532282172661523],
-                 [0.864097586150817, -0.43209657658779299],
-                 [-0.057842180862091301, 0.96437874924931699],
-                 [0.80625540528872497, -0.532282172661523],
-                 [0.057842180862091697, 0.96437874924931699],
-                 [-0.864097586150817, -0.43209657658779199],
-                 [-0.39094238101462497, -0.50900886837618198],
-                 [0.63628580127265499, -0.084061599186549901],
-                 [-0.24534342025802999, 0.59307046756273196],
-                 [0.39094238101462497, -0.50900886837618198],
-                 [0.24534342025802999, 0.59307046756273196],
-                 [-0.63628580127265499, -0.084061599186549499],
-                 [-0.26704107522244402, -0.54310638162348901],
-                 [0.60386446105461, 0.040288835815196801],
-                 [-0.33682338583216498, 0.50281754580829296],
-                 [0.26704107522244402, -0.54310638162348901],
-                 [0.33682338583216598, 0.50281754580829296],
-                 [-0.60386446105461, 0.040288835815197301],
-                 [-0.80012284035409698, -0.56864030976986901],
-                 [0.89251837405360701, -0.40860655100987398],
-                 [-0.092395533699510299, 0.97724686077974299],
-                 [0.80012284035409698, -0.56864030976986901],
-                 [0.092395533699511007, 0.97724686077974299],
-                 [-0.89251837405360701, -0.40860655100987298],
-                 [-0.98716837819454994, -0.56994192888611095],
-                 [0.98716837819455105, -0.56994192888610995],
-                 [0.0, 1.1398838577722199],
-                 [0.0, -0.57704966306400096],
-                 [0.49973966745867499, 0.28852483153200098],
-                 [-0.49973966745867499, 0.28852483153200098]],
-      'weights': [0.00995571377794288,
-                  0.00995571377794288,
-                  0.00995571377794288,
-                  0.0039774262083962196,
-                  0.0039774262083962196,
-                  0.0039774262083962196,
-                  0.0138483538824476,
-                  0.0138483538824476,
-                  0.0138483538824476,
-                  0.00078669640704059299,
-                  0.00078669640704059299,
-                  0.00078669640704059299,
-                  0.00078669640704059299,
-                  0.00078669640704059299,
-                  0.00078669640704059299,
-                  0.00341517002105453,
-                  0.00341517002105453,
-                  0.00341517002105453,
-                  0.00341517002105453,
-                  0.00341517002105453,
-                  0.00341517002105453,
-                  0.00135561780639318,
-                  0.00135561780639318,
-                  0.00135561780639318,
-                  0.00135561780639318,
-                  0.00135561780639318,
-                  0.00135561780639318,
-                  0.015225048575219001,
-                  0.015225048575219001,
-                  0.015225048575219001,
-                  0.0021905127093338099,
-                  0.0021905127093338099,
-                  0.0021905127093338099,
-                  0.0021905127093338099,
-                  0.0021905127093338099,
-                  0.0021905127093338099,
-                  0.014411297710147699,
-                  0.014411297710147699,
-                  0.014411297710147699,
-                  0.00616134857943777,
-                  0.00616134857943777,
-                  0.00616134857943777,
-                  0.00616134857943777,
-                  0.00616134857943777,
-                  0.00616134857943777,
-                  0.0091368941293918492,
-                  0.0091368941293918492,
-                  0.0091368941293918492,
-                  0.0031918798024674401,
-                  0.0031918798024674401,
-                  0.0031918798024674401,
-                  0.0031918798024674401,
-                  0.0031918798024674401,
-                  0.0031918798024674401,
-                  0.00230186077079262,
-                  0.00230186077079262,
-                  0.00230186077079262,
-                  0.00230186077079262,
-                  0.00230186077079262,
-                  0.00230186077079262,
-                  0.0156290095227141,
-                  0.0156290095227141,
-                  0.0156290095227141,
-                  0.0156290095227141,
-                  0.0156290095227141,
-                  0.0156290095227141,
-                  0.0051410847062006299,
-                  0.0051410847062006299,
-                  0.0051410847062006299,
-                  0.0131725625437242,
-                  0.0131725625437242,
-                  0.0131725625437242,
-                  0.00175477710291901,
-                  0.00175477710291901,
-                  0.00175477710291901,
-                  0.014905171008515501,
-                  0.014905171008515501,
-                  0.014905171008515501,
-                  0.014905171008515501,
-                  0.014905171008515501,
-                  0.014905171008515501,
-                  0.0062535140098947603,
-                  0.0062535140098947603,
-                  0.0062535140098947603,
-                  0.0062535140098947603,
-                  0.0062535140098947603,
-                  0.0062535140098947603,
-                  0.0061029862723654803,
-                  0.0061029862723654803,
-                  0.0061029862723654803,
-                  0.0061029862723654803,
-                  0.0061029862723654803,
-                  0.0061029862723654803,
-                  0.00238689855283284,
-                  0.00238689855283284,
-                  0.00238689855283284,
-                  0.00238689855283284,
-                  0.00238689855283284,
-                  0.00238689855283284,
-                  0.0012038265556321801,
-                  0.0012038265556321801,
-                  0.0012038265556321801,
-                  0.0012038265556321801,
-                  0.0012038265556321801,
-                  0.0012038265556321801,
-                  0.014081089127210299,
-                  0.014081089127210299,
-                  0.014081089127210299,
-                  0.014081089127210299,
-                  0.014081089127210299,
-                  0.014081089127210299,
-                  0.0095083637313827605,
-                  0.0095083637313827605,
-                  0.0095083637313827605,
-                  0.0095083637313827605,
-                  0.0095083637313827605,
-                  0.0095083637313827605,
-                  0.0142651484936837,
-                  0.0142651484936837,
-                  0.0142651484936837,
-                  0.0142651484936837,
-                  0.0142651484936837,
-                  0.0142651484936837,
-                  0.00357640021454662,
-                  0.00357640021454662,
-                  0.00357640021454662,
-                  0.00481470896907052,
-                  0.00481470896907052,
-                  0.00481470896907052,
-                  0.00481470896907052,
-                  0.00481470896907052,
-                  0.00481470896907052,
-                  0.0109669679211733,
-                  0.0109669679211733,
-                  0.0109669679211733,
-                  0.0109669679211733,
-                  0.0109669679211733,
-                  0.0109669679211733,
-                  0.0120303238616146,
-                  0.0120303238616146,
-                  0.0120303238616146,
-                  0.0120303238616146,
-                  0.0120303238616146,
-                  0.0120303238616146,
-                  0.00964049280430492,
-                  0.00964049280430492,
-                  0.00964049280430492,
-                  0.00964049280430492,
-                  0.00964049280430492,
-                  0.00964049280430492,
-                  0.0127091135976464,
-                  0.0127091135976464,
-                  0.0127091135976464,
-                  0.0127091135976464,
-                  0.0127091135976464,
-                  0.0127091135976464,
-                  0.0086665580369097092,
-                  0.0086665580369097092,
-                  0.0086665580369097092,
-                  0.015088633518415599,
-                  0.015088633518415599,
-                  0.015088633518415599,
-                  0.015088633518415599,
-                  0.015088633518415599,
-                  0.015088633518415599,
-                  0.00474018906505984,
-                  0.00474018906505984,
-                  0.00474018906505984,
-                  0.00474018906505984,
-                  0.00474018906505984,
-                  0.00474018906505984,
-                  0.011637787615217301,
-                  0.011637787615217301,
-                  0.011637787615217301,
-                  0.015868891780023001,
-                  0.015868891780023001,
-                  0.015868891780023001,
-                  0.0081435098099659296,
-                  0.0081435098099659296,
-                  0.0081435098099659296,
-                  0.0081435098099659296,
-                  0.0081435098099659296,
-                  0.0081435098099659296,
-                  0.0145005676515296,
-                  0.0145005676515296,
-                  0.0145005676515296,
-                  0.012427480063365399,
-                  0.012427480063365399,
-                  0.012427480063365399,
-                  0.012427480063365399,
-                  0.012427480063365399,
-                  0.012427480063365399,
-                  0.00081968780315066505,
-                  0.00081968780315066505,
-                  0.00081968780315066505,
-                  0.00081968780315066505,
-                  0.00081968780315066505,
-                  0.00081968780315066505,
-                  0.0043901635569088002,
-                  0.0043901635569088002,
-                  0.0043901635569088002,
-                  0.0043901635569088002,
-                  0.0043901635569088002,
-                  0.0043901635569088002,
-                  0.0087817700459859906,
-                  0.0087817700459859906,
-                  0.0087817700459859906,
-                  0.0087817700459859906,
-                  0.0087817700459859906,
-                  0.0087817700459859906,
-                  0.0070218588320299204,
-                  0.0070218588320299204,
-                  0.0070218588320299204,
-                  0.0070218588320299204,
-                  0.0070218588320299204,
-                  0.0070218588320299204,
-                  0.0021728203036985101,
-                  0.0021728203036985101,
-                  0.0021728203036985101,
-                  0.0021728203036985101,
-                  0.0021728203036985101,
-                  0.0021728203036985101,
-                  0.00041627024395810198,
-                  0.00041627024395810198,
-                  0.00041627024395810198,
-                  0.00108700796476885,
-                  0.00108700796476885,
-                  0.00108700796476885]},
- 36: {'points': [[-0.457703063875392, -0.52141842729563104],
-                 [0.68041313597704201, -0.13567326705824501],
-                 [-0.22271007210165, 0.65709169435387704],
-                 [0.457703063875392, -0.52141842729563104],
-                 [0.22271007210165, 0.65709169435387704],
-                 [-0.68041313597704201, -0.13567326705824501],
-                 [-0.36361676298891199, -0.414294642773197],
-                 [0.54059806678784394, -0.10775403260366399],
-                 [-0.17698130379893201, 0.52204867537686195],
-                 [0.36361676298891199, -0.414294642773197],
-                 [0.17698130379893201, 0.52204867537686195],
-                 [-0.54059806678784394, -0.10775403260366399],
-                 [-0.74962911892600903, -0.46477792693461001],
-                 [0.77732405130664395, -0.41680889693916501],
-                 [-0.027694932380635001, 0.88158682387377496],
-                 [0.74962911892600903, -0.46477792693461001],
-                 [0.027694932380635699, 0.88158682387377496],
-                 [-0.77732405130664395, -0.41680889693916401],
-                 [-0.26737758237747999, -0.449674457144221],
-                 [0.52311829450861203, -0.0067185501692540502],
-                 [-0.25574071213113098, 0.45639300731347499],
-                 [0.26737758237747999, -0.449674457144221],
-                 [0.25574071213113198, 0.45639300731347499],
-                 [-0.52311829450861203, -0.0067185501692536001],
-                 [-0.37317732959222399, -0.49063516603887503],
-                 [0.61149118257577395, -0.077863464523866596],
-                 [-0.23831385298355001, 0.56849863056274197],
-                 [0.37317732959222399, -0.49063516603887503],
-                 [0.23831385298355001, 0.56849863056274197],
-                 [-0.61149118257577395, -0.077863464523866194],
-                 [-0.14975882871475801, -0.463214462918352],
-                 [0.476034906645037, 0.101912281351194],
-                 [-0.32627607793027902, 0.36130218156715899],
-                 [0.14975882871475801, -0.463214462918352],
-                 [0.32627607793027902, 0.36130218156715899],
-                 [-0.476034906645037, 0.101912281351194],
-                 [-0.98352138144106105, -0.57521271319697798],
-                 [0.98990951292888596, -0.56414814489463505],
-                 [-0.0063881314878239098, 1.1393608580916099],
-                 [0.98352138144106105, -0.57521271319697798],
-                 [0.0063881314878246904, 1.1393608580916099],
-                 [-0.98990951292888596, -0.56414814489463505],
-                 [0.0, -0.27374719021510402],
-                 [0.237072020940891, 0.13687359510755201],
-                 [-0.237072020940891, 0.13687359510755201],
-                 [-0.53788829941643901, -0.39427972611017897],
-                 [0.61040040871680501, -0.26868506863795699],
-                 [-0.072512109300365599, 0.66296479474813597],
-                 [0.53788829941643901, -0.39427972611017897],
-                 [0.072512109300366001, 0.66296479474813597],
-                 [-0.61040040871680501, -0.26868506863795699],
-                 [-0.25563046668462203, -0.36279824244610598],
-                 [0.442007727748985, -0.039983356907101003],
-                 [-0.186377261064363, 0.40278159935320801],
-                 [0.25563046668462203, -0.36279824244610598],
-                 [0.186377261064363, 0.40278159935320701],
-                 [-0.442007727748985, -0.039983356907100802],
-                 [0.0, -0.36620767514629499],
-                 [0.317145149737531, 0.18310383757314799],
-                 [-0.31714514973753, 0.18310383757314799],
-                 [-0.83136119811518305, -0.57248771387722097],
-                 [0.91146950262974302, -0.433736060349806],
-                 [-0.080108304514558498, 1.0062237742270299],
-                 [0.83136119811518405, -0.57248771387722097],
-                 [0.080108304514559206, 1.0062237742270299],
-                 [-0.91146950262974302, -0.433736060349805],
-                 [-0.13003286298009301, -0.38562994925042099],
-                 [0.39898176400101398, 0.080203211957629403],
-                 [-0.268948901020922, 0.30542673729279202],
-                 [0.13003286298009201, -0.38562994925042099],
-                 [0.268948901020922, 0.30542673729279202],
-                 [-0.39898176400101398, 0.080203211957629597],
-                 [-0.29484302362535902, -0.17022769905878399],
-                 [0.29484302362535902, -0.17022769905878399],
-                 [0.0, 0.34045539811756798],
-                 [-0.60110699315720795, -0.57257600517555596],
-                 [0.79641886265804496, -0.23428592387884301],
-                 [-0.19531186950083701, 0.80686192905439902],
-                 [0.60110699315720795, -0.57257600517555596],
-                 [0.19531186950083801, 0.80686192905439902],
-                 [-0.79641886265804496, -0.23428592387884201],
-                 [-0.63205241025983805, -0.45255306558366198],
-                 [0.707948656485895, -0.321096911016373],
-                 [-0.075896246226056799, 0.77364997660003498],
-                 [0.63205241025983805, -0.45255306558366198],
-                 [0.075896246226057507, 0.77364997660003498],
-                 [-0.707948656485895, -0.321096911016373],
-                 [-0.52716585532238103, -0.55235918086652402],
-                 [0.74194001030516399, -0.18035943228367199],
-                 [-0.21477415498278299, 0.73271861315019704],
-                 [0.52716585532238103, -0.55235918086652402],
-                 [0.21477415498278299, 0.73271861315019604],
-                 [-0.74194001030516399, -0.18035943228367099],
-                 [-0.28230973261381898, -0.572600004326562],
-                 [0.63704101626079201, 0.041812601984121497],
-                 [-0.35473128364697198, 0.53078740234244104],
-                 [0.28230973261381898, -0.572600004326562],
-                 [0.35473128364697298, 0.53078740234244104],
-                 [-0.63704101626079201, 0.041812601984121997],
-                 [-0.71047632569890895, -0.50975814717158197],
-                 [0.79670166808612997, -0.36041147325689099],
-                 [-0.086225342387221501, 0.87016962042847301],
-                 [0.71047632569890895, -0.50975814717158197],
-                 [0.086225342387222098, 0.87016962042847301],
-                 [-0.79670166808613097, -0.36041147325688999],
-                 [-0.95056420733325397, -0.56440377229715],
-                 [0.964070108467727, -0.54101086533024101],
-                 [-0.0135059011344725, 1.1054146376273899],
-                 [0.95056420733325397, -0.56440377229715],
-                 [0.0135059011344731, 1.1054146376273899],
-                 [-0.964070108467727, -0.54101086533024101],
-                 [-0.28616499791046102, -0.27325102827656],
-                 [0.37972483105295202, -0.1112006437261],
-                 [-0.093559833142490403, 0.384451672002661],
-                 [0.28616499791046102, -0.27325102827656],
-                 [0.093559833142490695, 0.384451672002661],
-                 [-0.37972483105295202, -0.1112006437261],
-                 [-0.54753479566032504, -0.31611936166517601],
-                 [0.54753479566032504, -0.31611936166517501],
-                 [0.0, 0.63223872333035103],
-                 [-0.13633349630545999, -0.28077682324477798],
-                 [0.31132660987660099, 0.022320140435108798],
-                 [-0.174993113571141, 0.25845668280966899],
-                 [0.13633349630545999, -0.28077682324477798],
-                 [0.174993113571141, 0.25845668280966899],
-                 [-0.31132660987660099, 0.022320140435109],
-                 [-0.080918371229769304, -0.51793028571538902],
-                 [0.48899997043374399, 0.18888777773985499],
-                 [-0.40808159920397502, 0.32904250797553503],
-                 [0.080918371229769401, -0.51793028571538902],
-                 [0.40808159920397502, 0.32904250797553503],
-                 [-0.48899997043374399, 0.18888777773985499],
-                 [-0.44770259704283499, -0.57210278655469204],
-                 [0.71930684525364696, -0.101670429102017],
-                 [-0.27160424821081203, 0.673773215656709],
-                 [0.44770259704283499, -0.57210278655469204],
-                 [0.27160424821081203, 0.673773215656709],
-                 [-0.71930684525364696, -0.101670429102017],
-                 [-0.480110472234068, -0.45179917425831601],
-                 [0.63132479843356804, -0.18988827844848799],
-                 [-0.15121432619950001, 0.64168745270680405],
-                 [0.480110472234068, -0.45179917425831601],
-                 [0.15121432619950001, 0.64168745270680405],
-                 [-0.63132479843356804, -0.18988827844848799],
-                 [-0.41323708163607697, -0.345572385845966],
-                 [0.505893005807042, -0.18508761755960301],
-                 [-0.092655924170965603, 0.53066000340556896],
-                 [0.41323708163607697, -0.345572385845966],
-                 [0.092655924170965895, 0.53066000340556896],
-                 [-0.505893005807042, -0.18508761755960301],
-                 [-0.65560184610300898, -0.54673762175281404],
-                 [0.80128959269412903, -0.29439904261677502],
-                 [-0.14568774659111999, 0.841136664369589],
-                 [0.65560184610300898, -0.54673762175281404],
-                 [0.14568774659111999, 0.841136664369589],
-                 [-0.80128959269412903, -0.29439904261677402],
-                 [-0.57620923725165996, -0.504243492780175],
-                 [0.72479229306645698, -0.246890090965105],
-                 [-0.148583055814796, 0.75113358374528005],
-                 [0.57620923725165996, -0.504243492780175],
-                 [0.148583055814797, 0.75113358374528005],
-                 [-0.72479229306645698, -0.246890090965104],
-                 [-0.249251938340149, -0.51773945365247098],
-                 [0.57300148857458999, 0.043011216281153897],
-                 [-0.32374955023444102, 0.47472823737131697],
-                 [0.249251938340149, -0.51773945365247098],
-                 [0.32374955023444102, 0.47472823737131697],
-                 [-0.57300148857458999, 0.043011216281154202],
-                 [-0.783777031328875, -0.54712080331353397],
-                 [0.86570903027290702, -0.405210418376791],
-                 [-0.081931998944031401, 0.95233122169032502],
-                 [0.783777031328875, -0.54712080331353397],
-                 [0.0819319989440319, 0.95233122169032502],
-                 [-0.86570903027290702, -0.40521041837679],
-                 [-0.098306369371972097, -0.57522359685526203],
-                 [0.54731143241890201, 0.202475985197687],
-                 [-0.449005063046929, 0.37274761165757597],
-                 [0.098306369371972097, -0.57522359685526203],
-                 [0.44900506304693, 0.37274761165757597],
-                 [-0.54731143241890101, 0.202475985197687],
-                 [0.0, -0.45359100459111601],
-                 [0.39282133290401, 0.226795502295558],
-                 [-0.39282133290401, 0.226795502295558],
-                 [-0.15401622396033299, -0.16813042003647699],
-                 [0.22261332688070401, -0.049316752526363097],
-                 [-0.068597102920370703, 0.21744717256283999],
-                 [0.15401622396033299, -0.16813042003647699],
-                 [0.068597102920370703, 0.21744717256283999],
-                 [-0.22261332688070401, -0.049316752526363],
-                 [-0.35730985892987799, -0.55046376829560195],
-                 [0.65537053667184098, -0.034207530708107198],
-                 [-0.29806067774196299, 0.58467129900370995],
-                 [0.35730985892987799, -0.55046376829560195],
-                 [0.29806067774196399, 0.58467129900370995],
-                 [-0.65537053667184098, -0.034207530708106899],
-                 [-0.72653937769578902, -0.57068525840467199],
-                 [0.85749762019162701, -0.343858928731955],
-                 [-0.13095824249583801, 0.914544187136627],
-                 [0.72653937769578902, -0.57068525840467199],
-                 [0.13095824249583801, 0.914544187136627],
-                 [-0.85749762019162701, -0.34385892873195401],
-                 [-0.42651591436807301, -0.24624907797406601],
-                 [0.42651591436807301, -0.24624907797406601],
-                 [0.0, 0.49249815594813301],
-                 [-0.83027114581134698, -0.51140681795256004],
-                 [0.85802686892115398, -0.46333249532556098],
-                 [-0.0277557231098065, 0.97473931327812102],
-                 [0.83027114581134698, -0.51140681795256004],
-                 [0.0277557231098071, 0.97473931327812102],
-                 [-0.85802686892115398, -0.46333249532555998],
-                 [-0.91194985271971896, -0.52651449295517005],
-                 [0.91194985271971896, -0.52651449295516894],
-                 [0.0, 1.0530289859103401],
-                 [-0.075564343026720104, -0.043627093787613903],
-                 [0.075564343026720104, -0.043627093787613903],
-                 [0.0, 0.087254187575228404],
-                 [-0.88144405800714398, -0.55627077065397501],
-                 [0.92246664777266196, -0.48521756092204399],
-                 [-0.041022589765517099, 1.0414883315760199],
-                 [0.88144405800714398, -0.55627077065397501],
-                 [0.041022589765517897, 1.0414883315760199],
-                 [-0.92246664777266196, -0.48521756092204299],
-                 [-0.66646520563485701, -0.38478386587880398],
-                 [0.66646520563485701, -0.38478386587880398],
-                 [0.0, 0.76956773175760795],
-                 [-0.917845515683399, -0.575863201302935],
-                 [0.95763491927467304, -0.506945932679984],
-                 [-0.0397894035912741, 1.08280913398292],
-                 [0.917845515683399, -0.575863201302935],
-                 [0.039789403591274898, 1.08280913398292],
-                 [-0.95763491927467403, -0.506945932679984],
-                 [-0.174769027765103, -0.55598397134820998],
-                 [0.56888075716706099, 0.126637567834818],
-                 [-0.39411172940195699, 0.42934640351339198],
-                 [0.174769027765103, -0.55598397134820998],
-                 [0.39411172940195799, 0.42934640351339198],
-                 [-0.56888075716706099, 0.126637567834818],
-                 [0.0, -0.16513031625331101],
-                 [0.143007048810326, 0.082565158126655699],
-                 [-0.143007048810326, 0.082565158126655797],
-                 [0.0, -0.55823188110938404],
-                 [0.483442990243101, 0.27911594055469202],
-                 [-0.483442990243101, 0.27911594055469202]],
-      'weights': [0.0053029908020404797,
-                  0.0053029908020404797,
-                  0.0053029908020404797,
-                  0.0053029908020404797,
-                  0.0053029908020404797,
-                  0.0053029908020404797,
-                  0.0085273572006823502,
-                  0.0085273572006823502,
-                  0.0085273572006823502,
-                  0.0085273572006823502,
-                  0.0085273572006823502,
-                  0.0085273572006823502,
-                  0.0057568533709362203,
-                  0.0057568533709362203,
-                  0.0057568533709362203,
-                  0.0057568533709362203,
-                  0.0057568533709362203,
-                  0.0057568533709362203,
-                  0.0082146605728455006,
-                  0.0082146605728455006,
-                  0.0082146605728455006,
-                  0.0082146605728455006,
-                  0.0082146605728455006,
-                  0.0082146605728455006,
-                  0.0071253128511118901,
-                  0.0071253128511118901,
-                  0.0071253128511118901,
-                  0.0071253128511118901,
-                  0.0071253128511118901,
-                  0.0071253128511118901,
-                  0.0090678792446778605,
-                  0.0090678792446778605,
-                  0.0090678792446778605,
-                  0.0090678792446778605,
-                  0.0090678792446778605,
-                  0.0090678792446778605,
-                  0.00022575537833488299,
-                  0.00022575537833488299,
-                  0.00022575537833488299,
-                  0.00022575537833488299,
-                  0.00022575537833488299,
-                  0.00022575537833488299,
-                  0.0132856862241963,
-                  0.0132856862241963,
-                  0.0132856862241963,
-                  0.0090546494267267092,
-                  0.0090546494267267092,
-                  0.0090546494267267092,
-                  0.0090546494267267092,
-                  0.0090546494267267092,
-                  0.0090546494267267092,
-                  0.0114854671339394,
-                  0.0114854671339394,
-                  0.0114854671339394,
-                  0.0114854671339394,
-                  0.0114854671339394,
-                  0.0114854671339394,
-                  0.011910093536542,
-                  0.011910093536542,
-                  0.011910093536542,
-                  0.0012041817191718201,
-                  0.0012041817191718201,
-                  0.0012041817191718201,
-                  0.0012041817191718201,
-                  0.0012041817191718201,
-                  0.0012041817191718201,
-                  0.0119829726538506,
-                  0.0119829726538506,
-                  0.0119829726538506,
-                  0.0119829726538506,
-                  0.0119829726538506,
-                  0.0119829726538506,
-                  0.0139741819605671,
-                  0.0139741819605671,
-                  0.0139741819605671,
-                  0.00176271997029356,
-                  0.00176271997029356,
-                  0.00176271997029356,
-                  0.00176271997029356,
-                  0.00176271997029356,
-                  0.00176271997029356,
-                  0.0078479071351681799,
-                  0.0078479071351681799,
-                  0.0078479071351681799,
-                  0.0078479071351681799,
-                  0.0078479071351681799,
-                  0.0078479071351681799,
-                  0.0041210347039036602,
-                  0.0041210347039036602,
-                  0.0041210347039036602,
-                  0.0041210347039036602,
-                  0.0041210347039036602,
-                  0.0041210347039036602,
-                  0.0021076964446790098,
-                  0.0021076964446790098,
-                  0.0021076964446790098,
-                  0.0021076964446790098,
-                  0.0021076964446790098,
-                  0.0021076964446790098,
-                  0.0053919213456811704,
-                  0.0053919213456811704,
-                  0.0053919213456811704,
-                  0.0053919213456811704,
-                  0.0053919213456811704,
-                  0.0053919213456811704,
-                  0.00112268992915328,
-                  0.00112268992915328,
-                  0.00112268992915328,
-                  0.00112268992915328,
-                  0.00112268992915328,
-                  0.00112268992915328,
-                  0.0144542493376991,
-                  0.0144542493376991,
-                  0.0144542493376991,
-                  0.0144542493376991,
-                  0.0144542493376991,
-                  0.0144542493376991,
-                  0.010688590636864601,
-                  0.010688590636864601,
-                  0.010688590636864601,
-                  0.0154218389154807,
-                  0.0154218389154807,
-                  0.0154218389154807,
-                  0.0154218389154807,
-                  0.0154218389154807,
-                  0.0154218389154807,
-                  0.0082511678327868692,
-                  0.0082511678327868692,
-                  0.0082511678327868692,
-                  0.0082511678327868692,
-                  0.0082511678327868692,
-                  0.0082511678327868692,
-                  0.0021358671801925402,
-                  0.0021358671801925402,
-                  0.0021358671801925402,
-                  0.0021358671801925402,
-                  0.0021358671801925402,
-                  0.0021358671801925402,
-                  0.0091470230762663203,
-                  0.0091470230762663203,
-                  0.0091470230762663203,
-                  0.0091470230762663203,
-                  0.0091470230762663203,
-                  0.0091470230762663203,
-                  0.0124776215540049,
-                  0.0124776215540049,
-                  0.0124776215540049,
-                  0.0124776215540049,
-                  0.0124776215540049,
-                  0.0124776215540049,
-                  0.0044168100413819397,
-                  0.0044168100413819397,
-                  0.0044168100413819397,
-                  0.0044168100413819397,
-                  0.0044168100413819397,
-                  0.0044168100413819397,
-                  0.0070894938061565301,
-                  0.0070894938061565301,
-                  0.0070894938061565301,
-                  0.0070894938061565301,
-                  0.0070894938061565301,
-                  0.0070894938061565301,
-                  0.0077412135788659398,
-                  0.0077412135788659398,
-                  0.0077412135788659398,
-                  0.0077412135788659398,
-                  0.0077412135788659398,
-                  0.0077412135788659398,
-                  0.0036394239947000299,
-                  0.0036394239947000299,
-                  0.0036394239947000299,
-                  0.0036394239947000299,
-                  0.0036394239947000299,
-                  0.0036394239947000299,
-                  0.0014239001022171699,
-                  0.0014239001022171699,
-                  0.0014239001022171699,
-                  0.0014239001022171699,
-                  0.0014239001022171699,
-                  0.0014239001022171699,
-                  0.0115375950730868,
-                  0.0115375950730868,
-                  0.0115375950730868,
-                  0.017690033521357298,
-                  0.017690033521357298,
-                  0.017690033521357298,
-                  0.017690033521357298,
-                  0.017690033521357298,
-                  0.017690033521357298,
-                  0.0052658178528216196,
-                  0.0052658178528216196,
-                  0.0052658178528216196,
-                  0.0052658178528216196,
-                  0.0052658178528216196,
-                  0.0052658178528216196,
-                  0.00192190116265906,
-                  0.00192190116265906,
-                  0.00192190116265906,
-                  0.00192190116265906,
-                  0.00192190116265906,
-                  0.00192190116265906,
-                  0.014017877028184,
-                  0.014017877028184,
-                  0.014017877028184,
-                  0.0046192083182826603,
-                  0.0046192083182826603,
-                  0.0046192083182826603,
-                  0.0046192083182826603,
-                  0.0046192083182826603,
-                  0.0046192083182826603,
-                  0.00271485750470148,
-                  0.00271485750470148,
-                  0.00271485750470148,
-                  0.019066893615837299,
-                  0.019066893615837299,
-                  0.019066893615837299,
-                  0.0023133422383948901,
-                  0.0023133422383948901,
-                  0.0023133422383948901,
-                  0.0023133422383948901,
-                  0.0023133422383948901,
-                  0.0023133422383948901,
-                  0.0093938622939331307,
-                  0.0093938622939331307,
-                  0.0093938622939331307,
-                  0.00046103351483156298,
-                  0.00046103351483156298,
-                  0.00046103351483156298,
-                  0.00046103351483156298,
-                  0.00046103351483156298,
-                  0.00046103351483156298,
-                  0.0050016205853245796,
-                  0.0050016205853245796,
-                  0.0050016205853245796,
-                  0.0050016205853245796,
-                  0.0050016205853245796,
-                  0.0050016205853245796,
-                  0.018197525085705601,
-                  0.018197525085705601,
-                  0.018197525085705601,
-                  0.0050158732367671698,
-                  0.0050158732367671698,
-                  0.0050158732367671698]},
- 37: {'points': [[-0.69308820352671896, -0.40015466087830498],
-                 [0.69308820352671896, -0.40015466087830498],
-                 [0.0, 0.80030932175661096],
-                 [-0.33412271632399898, -0.51875656535329795],
-                 [0.61631772213791702, -0.029980477641395799],
-                 [-0.28219500581391799, 0.54873704299469395],
-                 [0.33412271632399898, -0.51875656535329795],
-                 [0.28219500581391899, 0.54873704299469395],
-                 [-0.61631772213791702, -0.0299804776413953],
-                 [-0.89493929237359404, -0.51669344136026796],
-                 [0.89493929237359404, -0.51669344136026796],
-                 [0.0, 1.0333868827205399],
-                 [-0.75613518652324796, -0.51993973121115999],
-                 [0.82834860892734097, -0.39486241461883798],
-                 [-0.072213422404093106, 0.91480214582999797],
-                 [0.75613518652324796, -0.51993973121115999],
-                 [0.072213422404093799, 0.91480214582999797],
-                 [-0.82834860892734197, -0.39486241461883698],
-                 [-0.84800448035565501, -0.57382818530981505],
-                 [0.92095202606365101, -0.447479329856112],
-                 [-0.072947545707995998, 1.0213075151659301],
-                 [0.84800448035565501, -0.57382818530981505],
-                 [0.072947545707996705, 1.0213075151659301],
-                 [-0.92095202606365201, -0.447479329856111],
-                 [-0.70551641007683097, -0.48120343056361498],
-                 [0.76949260029472699, -0.37039341863152803],
-                 [-0.063976190217895995, 0.851596849195143],
-                 [0.70551641007683097, -0.48120343056361498],
-                 [0.063976190217896606, 0.851596849195143],
-                 [-0.76949260029472699, -0.37039341863152703],
-                 [-0.123468822790997, -0.16501678669005199],
-                 [0.20464314071996101, -0.024418743767336201],
-                 [-0.081174317928964304, 0.18943553045738901],
-                 [0.123468822790997, -0.16501678669005199],
-                 [0.081174317928964304, 0.18943553045738901],
-                 [-0.20464314071996101, -0.024418743767336101],
-                 [-0.14115293561514999, -0.44697785411625901],
-                 [0.45767064440131, 0.10124689899666101],
-                 [-0.31651770878615998, 0.345730955119599],
-                 [0.14115293561514999, -0.44697785411625901],
-                 [0.31651770878615998, 0.345730955119599],
-                 [-0.45767064440131, 0.10124689899666101],
-                 [-0.22226952863035099, -0.12832737218738399],
-                 [0.22226952863035099, -0.12832737218738399],
-                 [0.0, 0.25665474437476898],
-                 [-0.31129235394249, -0.48447626446390601],
-                 [0.57521492952757503, -0.0273489542861006],
-                 [-0.26392257558508497, 0.51182521875000697],
-                 [0.31129235394249, -0.48447626446390601],
-                 [0.26392257558508497, 0.51182521875000697],
-                 [-0.57521492952757503, -0.027348954286100201],
-                 [-0.25517618371949402, -0.41922309411584402],
-                 [0.49064594121718302, -0.0113775104839243],
-                 [-0.235469757497689, 0.43060060459976901],
-                 [0.25517618371949402, -0.41922309411584402],
-                 [0.235469757497689, 0.43060060459976901],
-                 [-0.49064594121718302, -0.011377510483924101],
-                 [-0.22738491727535501, -0.34332292689716498],
-                 [0.41101883503225001, -0.025259651349297599],
-                 [-0.183633917756895, 0.36858257824646401],
-                 [0.22738491727535501, -0.34332292689716498],
-                 [0.183633917756896, 0.36858257824646401],
-                 [-0.41101883503225101, -0.025259651349297502],
-                 [-0.824314118080548, -0.50673434341218704],
-                 [0.85100187340525602, -0.46050979524982599],
-                 [-0.0266877553247079, 0.96724413866201397],
-                 [0.824314118080548, -0.50673434341218704],
-                 [0.0266877553247085, 0.96724413866201397],
-                 [-0.85100187340525602, -0.46050979524982599],
-                 [-0.96025084028127405, -0.57217095597866796],
-                 [0.97564000332579104, -0.545516143699603],
-                 [-0.0153891630445169, 1.11768709967827],
-                 [0.96025084028127405, -0.57217095597866796],
-                 [0.0153891630445175, 1.11768709967827],
-                 [-0.97564000332579104, -0.545516143699602],
-                 [-0.88743516782176102, -0.54747072920426998],
-                 [0.91784114323016897, -0.49480603494321701],
-                 [-0.030405975408408101, 1.0422767641474899],
-                 [0.88743516782176002, -0.54747072920426998],
-                 [0.030405975408408701, 1.0422767641474899],
-                 [-0.91784114323016897, -0.49480603494321601],
-                 [-0.147438016728448, -0.26364744637852899],
-                 [0.30204439457092602, 0.0041386552188339403],
-                 [-0.15460637784247799, 0.259508791159696],
-                 [0.147438016728448, -0.26364744637852899],
-                 [0.15460637784247799, 0.259508791159696],
-                 [-0.30204439457092602, 0.0041386552188340496],
-                 [-0.58167629238312102, -0.335830963988619],
-                 [0.58167629238312202, -0.335830963988618],
-                 [0.0, 0.671661927977238],
-                 [0.0, -0.44283386491499299],
-                 [0.38350537667243001, 0.221416932457496],
-                 [-0.38350537667243001, 0.221416932457497],
-                 [-0.63852651231947499, -0.42124005904839301],
-                 [0.68406784838730195, -0.34236015113434598],
-                 [-0.045541336067827398, 0.76360021018273905],
-                 [0.63852651231947499, -0.42124005904839301],
-                 [0.045541336067827801, 0.76360021018273905],
-                 [-0.68406784838730195, -0.34236015113434598],
-                 [-0.91244418004082894, -0.57039245293560403],
-                 [0.95019644438956796, -0.50500361298281804],
-                 [-0.037752264348737997, 1.0753960659184201],
-                 [0.91244418004082894, -0.57039245293560403],
-                 [0.0377522643487389, 1.0753960659184201],
-                 [-0.95019644438956796, -0.50500361298281704],
-                 [0.0, -0.15872646837428001],
-                 [0.13746115386511401, 0.079363234187140003],
-                 [-0.13746115386511301, 0.0793632341871401],
-                 [-0.53650720489459303, -0.437114220901474],
-                 [0.64680562210341597, -0.24607175830136399],
-                 [-0.110298417208822, 0.68318597920283797],
-                 [0.53650720489459403, -0.437114220901474],
-                 [0.110298417208822, 0.68318597920283797],
-                 [-0.64680562210341597, -0.24607175830136399],
-                 [-0.0852778815765836, -0.54811072534421301],
-                 [0.51731675302309599, 0.200202550845864],
-                 [-0.43203887144651199, 0.34790817449834899],
-                 [0.0852778815765836, -0.54811072534421301],
-                 [0.43203887144651199, 0.34790817449834899],
-                 [-0.51731675302309599, 0.200202550845865],
-                 [-0.164356563196386, -0.50551055464016503],
-                 [0.51996326379773805, 0.11041831831331],
-                 [-0.35560670060135102, 0.39509223632685597],
-                 [0.164356563196386, -0.50551055464016503],
-                 [0.35560670060135202, 0.39509223632685597],
-                 [-0.51996326379773805, 0.11041831831331],
-                 [-0.81381272571201302, -0.55356126813574202],
-                 [0.88630448361268799, -0.42800186032179],
-                 [-0.072491757900674497, 0.98156312845753202],
-                 [0.81381272571201402, -0.55356126813574202],
-                 [0.072491757900675205, 0.98156312845753202],
-                 [-0.88630448361268899, -0.42800186032179],
-                 [-0.94797647390829198, -0.54731447239638498],
-                 [0.94797647390829198, -0.54731447239638498],
-                 [0.0, 1.09462894479277],
-                 [-0.41910547578514401, -0.54631433608883695],
-                 [0.68267483139713403, -0.0897988208506805],
-                 [-0.26356935561199002, 0.63611315693951798],
-                 [0.41910547578514401, -0.54631433608883695],
-                 [0.26356935561199002, 0.63611315693951798],
-                 [-0.68267483139713403, -0.08979882085068],
-                 [-0.486774940454688, -0.35483129429226101],
-                 [0.550680385142155, -0.24414381721328701],
-                 [-0.063905444687466201, 0.59897511150554905],
-                 [0.486774940454688, -0.35483129429226101],
-                 [0.063905444687466506, 0.59897511150554905],
-                 [-0.550680385142155, -0.24414381721328701],
-                 [-0.359090345233538, -0.33950304358022099],
-                 [0.47356343301937498, -0.14122983943585801],
-                 [-0.11447308778583699, 0.48073288301607903],
-                 [0.359090345233538, -0.33950304358022099],
-                 [0.11447308778583801, 0.48073288301607903],
-                 [-0.47356343301937598, -0.14122983943585701],
-                 [-0.76603320945807196, -0.44226947968881097],
-                 [0.76603320945807196, -0.44226947968880997],
-                 [0.0, 0.88453895937762195],
-                 [-0.25248858363296001, -0.54714013952455198],
-                 [0.60008155207490399, 0.054908542170580797],
-                 [-0.34759296844194398, 0.49223159735397198],
-                 [0.25248858363296001, -0.54714013952455198],
-                 [0.34759296844194398, 0.49223159735397198],
-                 [-0.60008155207490399, 0.0549085421705812],
-                 [0.0, -0.50545261693006505],
-                 [0.43773480667076098, 0.25272630846503302],
-                 [-0.43773480667076098, 0.25272630846503302],
-                 [0.0, -0.272722041878874],
-                 [0.23618421643906901, 0.136361020939437],
-                 [-0.23618421643906801, 0.136361020939437],
-                 [-0.39948855862139299, -0.42805065874848303],
-                 [0.57044702389354596, -0.131941910913114],
-                 [-0.170958465272153, 0.55999256966159705],
-                 [0.39948855862139299, -0.42805065874848303],
-                 [0.170958465272153, 0.55999256966159705],
-                 [-0.57044702389354596, -0.131941910913113],
-                 [0.0, -0.57184433744987295],
-                 [0.49523172324187098, 0.28592216872493698],
-                 [-0.49523172324187098, 0.28592216872493698],
-                 [-0.0726221539439484, -0.041928420128668799],
-                 [0.0726221539439484, -0.041928420128668799],
-                 [0.0, 0.083856840257338305],
-                 [-0.74822550833094303, -0.57144178004035595],
-                 [0.86899585246421995, -0.36226140795394401],
-                 [-0.120770344133276, 0.93370318799429997],
-                 [0.74822550833094303, -0.57144178004035595],
-                 [0.120770344133277, 0.93370318799429997],
-                 [-0.86899585246421995, -0.36226140795394302],
-                 [-0.61214302766947204, -0.500177850487322],
-                 [0.73923823876705197, -0.280042487467622],
-                 [-0.12709521109757899, 0.78022033795494505],
-                 [0.61214302766947204, -0.500177850487322],
-                 [0.12709521109758001, 0.78022033795494505],
-                 [-0.73923823876705197, -0.280042487467622],
-                 [-0.082456232718866193, -0.36587111104193898],
-                 [0.35808179303258902, 0.11152636328607],
-                 [-0.27562556031372298, 0.25434474775586902],
-                 [0.082456232718865999, -0.36587111104193898],
-                 [0.27562556031372298, 0.25434474775586902],
-                 [-0.35808179303258902, 0.11152636328607],
-                 [-0.98898529953405001, -0.57099092891056702],
-                 [0.98898529953405001, -0.57099092891056602],
-                 [0.0, 1.14198185782113],
-                 [-0.288496337423859, -0.23836996263996599],
-                 [0.350682611857287, -0.130660175787846],
-                 [-0.062186274433428203, 0.36903013842781202],
-                 [0.288496337423859, -0.23836996263996599],
-                 [0.062186274433428501, 0.36903013842781202],
-                 [-0.350682611857287, -0.130660175787846],
-                 [-0.69338845905777902, -0.54563400792324401],
-                 [0.81922714155913801, -0.32767501627336099],
-                 [-0.12583868250135899, 0.87330902419660505],
-                 [0.69338845905777902, -0.54563400792324401],
-                 [0.12583868250135999, 0.87330902419660505],
-                 [-0.819227141559139, -0.32767501627335999],
-                 [-0.17221861996121399, -0.57169987252525301],
-                 [0.581215922927801, 0.13670423637151699],
-                 [-0.40899730296658698, 0.43499563615373599],
-                 [0.17221861996121399, -0.57169987252525301],
-                 [0.40899730296658698, 0.43499563615373599],
-                 [-0.581215922927801, 0.13670423637151799],
-                 [-0.49166762890981203, -0.57133062792022105],
-                 [0.74062065219393203, -0.140131342894246],
-                 [-0.24895302328412, 0.71146197081446805],
-                 [0.49166762890981203, -0.57133062792022105],
-                 [0.248953023284121, 0.71146197081446805],
-                 [-0.74062065219393203, -0.140131342894246],
-                 [-0.33772735494586897, -0.57122090496927302],
-                 [0.66355549234906197, -0.0068700164514100496],
-                 [-0.325828137403192, 0.57809092142068397],
-                 [0.33772735494586897, -0.57122090496927302],
-                 [0.325828137403193, 0.57809092142068397],
-                 [-0.66355549234906197, -0.0068700164514096098],
-                 [-0.561992097543217, -0.54470987727952402],
-                 [0.75272864018798002, -0.214344494558766],
-                 [-0.190736542644763, 0.75905437183829105],
-                 [0.561992097543217, -0.54470987727952402],
-                 [0.190736542644763, 0.75905437183829005],
-                 [-0.75272864018798002, -0.214344494558766],
-                 [-0.629081558998839, -0.57104889149423999],
-                 [0.80908362633637498, -0.25927616539819398],
-                 [-0.18000206733753599, 0.83032505689243397],
-                 [0.629081558998839, -0.57104889149423999],
-                 [0.18000206733753599, 0.83032505689243397],
-                 [-0.80908362633637498, -0.25927616539819298],
-                 [-0.47085424810000798, -0.49810325155934498],
-                 [0.66679719360802803, -0.15872011455475499],
-                 [-0.19594294550801999, 0.65682336611409997],
-                 [0.47085424810000698, -0.49810325155934498],
-                 [0.19594294550801999, 0.65682336611409997],
-                 [-0.66679719360802803, -0.15872011455475399],
-                 [-0.43190721639941099, -0.24936174765314201],
-                 [0.43190721639941099, -0.24936174765314201],
-                 [0.0, 0.49872349530628401]],
-      'weights': [0.0026223072069977002,
-                  0.0026223072069977002,
-                  0.0026223072069977002,
-                  0.0036359073674563599,
-                  0.0036359073674563599,
-                  0.0036359073674563599,
-                  0.0036359073674563599,
-                  0.0036359073674563599,
-                  0.0036359073674563599,
-                  0.00191336824107688,
-                  0.00191336824107688,
-                  0.00191336824107688,
-                  0.0033300844821302199,
-                  0.0033300844821302199,
-                  0.0033300844821302199,
-                  0.0033300844821302199,
-                  0.0033300844821302199,
-                  0.0033300844821302199,
-                  0.00083215170346457299,
-                  0.00083215170346457299,
-                  0.00083215170346457299,
-                  0.00083215170346457299,
-                  0.00083215170346457299,
-                  0.00083215170346457299,
-                  0.0052525262772389501,
-                  0.0052525262772389501,
-                  0.0052525262772389501,
-                  0.0052525262772389501,
-                  0.0052525262772389501,
-                  0.0052525262772389501,
-                  0.012676717618083999,
-                  0.012676717618083999,
-                  0.012676717618083999,
-                  0.012676717618083999,
-                  0.012676717618083999,
-                  0.012676717618083999,
-                  0.0093328420034238108,
-                  0.0093328420034238108,
-                  0.0093328420034238108,
-                  0.0093328420034238108,
-                  0.0093328420034238108,
-                  0.0093328420034238108,
-                  0.013137765341336099,
-                  0.013137765341336099,
-                  0.013137765341336099,
-                  0.0079141141224284492,
-                  0.0079141141224284492,
-                  0.0079141141224284492,
-                  0.0079141141224284492,
-                  0.0079141141224284492,
-                  0.0079141141224284492,
-                  0.0099079539955660295,
-                  0.0099079539955660295,
-                  0.0099079539955660295,
-                  0.0099079539955660295,
-                  0.0099079539955660295,
-                  0.0099079539955660295,
-                  0.0116255334192651,
-                  0.0116255334192651,
-                  0.0116255334192651,
-                  0.0116255334192651,
-                  0.0116255334192651,
-                  0.0116255334192651,
-                  0.0040132959712055197,
-                  0.0040132959712055197,
-                  0.0040132959712055197,
-                  0.0040132959712055197,
-                  0.0040132959712055197,
-                  0.0040132959712055197,
-                  0.00053463084446774998,
-                  0.00053463084446774998,
-                  0.00053463084446774998,
-                  0.00053463084446774998,
-                  0.00053463084446774998,
-                  0.00053463084446774998,
-                  0.0020866064046908498,
-                  0.0020866064046908498,
-                  0.0020866064046908498,
-                  0.0020866064046908498,
-                  0.0020866064046908498,
-                  0.0020866064046908498,
-                  0.014140023288812699,
-                  0.014140023288812699,
-                  0.014140023288812699,
-                  0.014140023288812699,
-                  0.014140023288812699,
-                  0.014140023288812699,
-                  0.0090933709300903397,
-                  0.0090933709300903397,
-                  0.0090933709300903397,
-                  0.010185904455422201,
-                  0.010185904455422201,
-                  0.010185904455422201,
-                  0.0075595773676801004,
-                  0.0075595773676801004,
-                  0.0075595773676801004,
-                  0.0075595773676801004,
-                  0.0075595773676801004,
-                  0.0075595773676801004,
-                  0.00095227555954727097,
-                  0.00095227555954727097,
-                  0.00095227555954727097,
-                  0.00095227555954727097,
-                  0.00095227555954727097,
-                  0.00095227555954727097,
-                  0.0149728111952193,
-                  0.0149728111952193,
-                  0.0149728111952193,
-                  0.0090870974496229506,
-                  0.0090870974496229506,
-                  0.0090870974496229506,
-                  0.0090870974496229506,
-                  0.0090870974496229506,
-                  0.0090870974496229506,
-                  0.0056438692943972099,
-                  0.0056438692943972099,
-                  0.0056438692943972099,
-                  0.0056438692943972099,
-                  0.0056438692943972099,
-                  0.0056438692943972099,
-                  0.0082813419228008299,
-                  0.0082813419228008299,
-                  0.0082813419228008299,
-                  0.0082813419228008299,
-                  0.0082813419228008299,
-                  0.0082813419228008299,
-                  0.0027864746735892999,
-                  0.0027864746735892999,
-                  0.0027864746735892999,
-                  0.0027864746735892999,
-                  0.0027864746735892999,
-                  0.0027864746735892999,
-                  0.00152002570879997,
-                  0.00152002570879997,
-                  0.00152002570879997,
-                  0.00516595672413159,
-                  0.00516595672413159,
-                  0.00516595672413159,
-                  0.00516595672413159,
-                  0.00516595672413159,
-                  0.00516595672413159,
-                  0.0105550290157592,
-                  0.0105550290157592,
-                  0.0105550290157592,
-                  0.0105550290157592,
-                  0.0105550290157592,
-                  0.0105550290157592,
-                  0.0122756342627232,
-                  0.0122756342627232,
-                  0.0122756342627232,
-                  0.0122756342627232,
-                  0.0122756342627232,
-                  0.0122756342627232,
-                  0.0062115388077732302,
-                  0.0062115388077732302,
-                  0.0062115388077732302,
-                  0.0054555315831102203,
-                  0.0054555315831102203,
-                  0.0054555315831102203,
-                  0.0054555315831102203,
-                  0.0054555315831102203,
-                  0.0054555315831102203,
-                  0.0086589425782944603,
-                  0.0086589425782944603,
-                  0.0086589425782944603,
-                  0.015725016493510598,
-                  0.015725016493510598,
-                  0.015725016493510598,
-                  0.010828556401118799,
-                  0.010828556401118799,
-                  0.010828556401118799,
-                  0.010828556401118799,
-                  0.010828556401118799,
-                  0.010828556401118799,
-                  0.0024520264122879299,
-                  0.0024520264122879299,
-                  0.0024520264122879299,
-                  0.017678413250763199,
-                  0.017678413250763199,
-                  0.017678413250763199,
-                  0.00164424505054736,
-                  0.00164424505054736,
-                  0.00164424505054736,
-                  0.00164424505054736,
-                  0.00164424505054736,
-                  0.00164424505054736,
-                  0.0069823334281130696,
-                  0.0069823334281130696,
-                  0.0069823334281130696,
-                  0.0069823334281130696,
-                  0.0069823334281130696,
-                  0.0069823334281130696,
-                  0.014154696004041,
-                  0.014154696004041,
-                  0.014154696004041,
-                  0.014154696004041,
-                  0.014154696004041,
-                  0.014154696004041,
-                  0.00030015632628715701,
-                  0.00030015632628715701,
-                  0.00030015632628715701,
-                  0.0155168526054319,
-                  0.0155168526054319,
-                  0.0155168526054319,
-                  0.0155168526054319,
-                  0.0155168526054319,
-                  0.0155168526054319,
-                  0.0042644801135160899,
-                  0.0042644801135160899,
-                  0.0042644801135160899,
-                  0.0042644801135160899,
-                  0.0042644801135160899,
-                  0.0042644801135160899,
-                  0.0024617515521675698,
-                  0.0024617515521675698,
-                  0.0024617515521675698,
-                  0.0024617515521675698,
-                  0.0024617515521675698,
-                  0.0024617515521675698,
-                  0.0022605973627597199,
-                  0.0022605973627597199,
-                  0.0022605973627597199,
-                  0.0022605973627597199,
-                  0.0022605973627597199,
-                  0.0022605973627597199,
-                  0.002504388765278,
-                  0.002504388765278,
-                  0.002504388765278,
-                  0.002504388765278,
-                  0.002504388765278,
-                  0.002504388765278,
-                  0.0050828677402342702,
-                  0.0050828677402342702,
-                  0.0050828677402342702,
-                  0.0050828677402342702,
-                  0.0050828677402342702,
-                  0.0050828677402342702,
-                  0.0020723277863006701,
-                  0.0020723277863006701,
-                  0.0020723277863006701,
-                  0.0020723277863006701,
-                  0.0020723277863006701,
-                  0.0020723277863006701,
-                  0.0084411572662180107,
-                  0.0084411572662180107,
-                  0.0084411572662180107,
-                  0.0084411572662180107,
-                  0.0084411572662180107,
-                  0.0084411572662180107,
-                  0.0143597633871211,
-                  0.0143597633871211,
-                  0.0143597633871211]},
- 38: {'points': [[0.0, -0.43557198951312298],
-                 [0.377216408095294, 0.21778599475656199],
-                 [-0.377216408095294, 0.21778599475656199],
-                 [-0.38017185669450698, -0.48676901082212498],
-                 [0.61164025749423701, -0.085853980290277604],
-                 [-0.231468400799729, 0.572622991112404],
-                 [0.38017185669450698, -0.48676901082212498],
-                 [0.231468400799729, 0.572622991112403],
-                 [-0.61164025749423601, -0.085853980290277201],
-                 [0.0, -0.20761979727194599],
-                 [0.17980401876607999, 0.10380989863597299],
-                 [-0.17980401876607999, 0.10380989863597299],
-                 [-0.64388710735877097, -0.40573908618816901],
-                 [0.67332390962662303, -0.35475304904788901],
-                 [-0.029436802267852401, 0.76049213523605796],
-                 [0.64388710735877097, -0.40573908618816901],
-                 [0.029436802267853099, 0.76049213523605796],
-                 [-0.67332390962662403, -0.35475304904788901],
-                 [0.0, -0.46713152507187],
-                 [0.40454776762080702, 0.233565762535935],
-                 [-0.40454776762080702, 0.233565762535936],
-                 [-0.91532058656497195, -0.573774614583622],
-                 [0.954563685558528, -0.50580357328032799],
-                 [-0.0392430989935557, 1.0795781878639501],
-                 [0.91532058656497195, -0.573774614583622],
-                 [0.039243098993556602, 1.0795781878639501],
-                 [-0.954563685558529, -0.50580357328032699],
-                 [-0.78472586424382296, -0.51373173879402501],
-                 [0.83726766864788904, -0.422726664044837],
-                 [-0.052541804404065799, 0.93645840283886195],
-                 [0.78472586424382296, -0.51373173879402501],
-                 [0.052541804404066403, 0.93645840283886195],
-                 [-0.83726766864788904, -0.422726664044836],
-                 [-0.099643590876239904, -0.18600062141874099],
-                 [0.21090305870644199, 0.0067064296862435801],
-                 [-0.11125946783020201, 0.179294191732498],
-                 [0.099643590876239904, -0.18600062141874099],
-                 [0.11125946783020201, 0.179294191732498],
-                 [-0.21090305870644099, 0.0067064296862436902],
-                 [-0.41959606976158897, -0.52071016051529595],
-                 [0.66074626189571395, -0.103025775483995],
-                 [-0.241150192134125, 0.623735935999292],
-                 [0.41959606976158897, -0.52071016051529595],
-                 [0.241150192134125, 0.623735935999292],
-                 [-0.66074626189571395, -0.103025775483995],
-                 [-0.90709796569683099, -0.55471321549486496],
-                 [0.93394471928192002, -0.50821327426720897],
-                 [-0.026846753585088898, 1.06292648976207],
-                 [0.90709796569683099, -0.55471321549486496],
-                 [0.026846753585089801, 1.06292648976207],
-                 [-0.93394471928192102, -0.50821327426720797],
-                 [-0.94748648786119705, -0.54703157882019604],
-                 [0.94748648786119805, -0.54703157882019504],
-                 [0.0, 1.0940631576403901],
-                 [-0.31006871991021501, -0.44966761533984601],
-                 [0.544457938098584, -0.043693580691245099],
-                 [-0.234389218188368, 0.49336119603109202],
-                 [0.31006871991021501, -0.44966761533984601],
-                 [0.234389218188368, 0.49336119603109202],
-                 [-0.544457938098584, -0.0436935806912448],
-                 [-0.563559656041417, -0.32537131911992501],
-                 [0.563559656041418, -0.32537131911992501],
-                 [0.0, 0.65074263823985101],
-                 [-0.55804669150858499, -0.57266700781635504],
-                 [0.77496752243247702, -0.19694910743611499],
-                 [-0.216920830923892, 0.76961611525246998],
-                 [0.55804669150858499, -0.57266700781635504],
-                 [0.216920830923892, 0.76961611525246998],
-                 [-0.77496752243247702, -0.19694910743611499],
-                 [-0.23391252232540799, -0.197757022002539],
-                 [0.28821886599366098, -0.103695675595829],
-                 [-0.054306343668252599, 0.30145269759836801],
-                 [0.23391252232540799, -0.197757022002539],
-                 [0.054306343668252897, 0.30145269759836801],
-                 [-0.28821886599366098, -0.103695675595829],
-                 [-0.84191118240738105, -0.54145730613515197],
-                 [0.88987137338141897, -0.45838781862741002],
-                 [-0.047960190974038301, 0.99984512476256204],
-                 [0.84191118240738105, -0.54145730613515197],
-                 [0.047960190974039002, 0.99984512476256204],
-                 [-0.88987137338141897, -0.45838781862741002],
-                 [-0.53335107942756499, -0.40306833625953498],
-                 [0.61574295837566795, -0.26036141579035599],
-                 [-0.082391878948103195, 0.66342975204989096],
-                 [0.53335107942756499, -0.40306833625953498],
-                 [0.0823918789481035, 0.66342975204989096],
-                 [-0.61574295837566795, -0.26036141579035499],
-                 [-0.99085847720091802, -0.57207240854077301],
-                 [0.99085847720091802, -0.57207240854077301],
-                 [0.0, 1.14414481708155],
-                 [-0.47291121570664002, -0.45699037409328203],
-                 [0.63222088110305596, -0.18105793948989199],
-                 [-0.159309665396416, 0.63804831358317404],
-                 [0.47291121570664002, -0.45699037409328203],
-                 [0.159309665396416, 0.63804831358317404],
-                 [-0.63222088110305596, -0.18105793948989099],
-                 [-0.82379151966393305, -0.47561625563410298],
-                 [0.82379151966393405, -0.47561625563410298],
-                 [0.0, 0.95123251126820596],
-                 [-0.727857221603608, -0.45891721551063702],
-                 [0.76136257766803295, -0.40088423648136601],
-                 [-0.033505356064425, 0.85980145199200297],
-                 [0.727857221603608, -0.45891721551063702],
-                 [0.033505356064425597, 0.85980145199200297],
-                 [-0.76136257766803295, -0.40088423648136501],
-                 [-0.498552211845049, -0.552546537161551],
-                 [0.72779544387755002, -0.155485611989959],
-                 [-0.22924323203249999, 0.70803214915151003],
-                 [0.498552211845049, -0.552546537161551],
-                 [0.22924323203250099, 0.70803214915150903],
-                 [-0.72779544387755002, -0.155485611989958],
-                 [-0.54925671022190303, -0.50985596144990697],
-                 [0.71617656999751, -0.220742283526283],
-                 [-0.166919859775607, 0.73059824497618997],
-                 [0.54925671022190303, -0.50985596144990697],
-                 [0.166919859775607, 0.73059824497618997],
-                 [-0.71617656999751, -0.220742283526282],
-                 [-0.44686452030684998, -0.31858800667671699],
-                 [0.49933756727650902, -0.22770202329732001],
-                 [-0.052473046969658703, 0.54629002997403797],
-                 [0.44686452030684998, -0.31858800667671699],
-                 [0.052473046969659001, 0.54629002997403797],
-                 [-0.49933756727650902, -0.22770202329732001],
-                 [-0.619539746159956, -0.46956784465504098],
-                 [0.71642755535154801, -0.30175323650116398],
-                 [-0.096887809191591706, 0.77132108115620601],
-                 [0.619539746159956, -0.46956784465504098],
-                 [0.096887809191592095, 0.77132108115620601],
-                 [-0.71642755535154801, -0.30175323650116398],
-                 [-0.62648548681833005, -0.54683284777191998],
-                 [0.78681388120343598, -0.26913592280097498],
-                 [-0.16032839438510599, 0.81596877057289496],
-                 [0.62648548681833005, -0.54683284777191998],
-                 [0.16032839438510599, 0.81596877057289496],
-                 [-0.78681388120343598, -0.26913592280097498],
-                 [-0.67197877643540305, -0.57051260429903305],
-                 [0.83006779671988296, -0.29669438904752699],
-                 [-0.15808902028447899, 0.86720699334656004],
-                 [0.67197877643540305, -0.57051260429903305],
-                 [0.15808902028447999, 0.86720699334656004],
-                 [-0.83006779671988296, -0.29669438904752599],
-                 [-0.413358852396778, -0.57227331670064996],
-                 [0.70228265636913001, -0.071842608704466501],
-                 [-0.28892380397235101, 0.64411592540511797],
-                 [0.413358852396778, -0.57227331670064996],
-                 [0.28892380397235201, 0.64411592540511797],
-                 [-0.70228265636913001, -0.071842608704466099],
-                 [-0.253464635518383, -0.57253866498558204],
-                 [0.62256534628553395, 0.066762519172907903],
-                 [-0.36910071076715001, 0.50577614581267505],
-                 [0.253464635518383, -0.57253866498558204],
-                 [0.36910071076715101, 0.50577614581267505],
-                 [-0.62256534628553395, 0.066762519172908097],
-                 [-0.69573906885921899, -0.51790249949511202],
-                 [0.79638625567583399, -0.343576458289858],
-                 [-0.100647186816615, 0.86147895778497097],
-                 [0.69573906885921899, -0.51790249949511202],
-                 [0.100647186816615, 0.86147895778497097],
-                 [-0.79638625567583399, -0.343576458289858],
-                 [-0.88784932749475998, -0.51260004822892802],
-                 [0.88784932749475998, -0.51260004822892802],
-                 [0.0, 1.02520009645786],
-                 [-0.143485665126208, -0.082841487385468399],
-                 [0.143485665126208, -0.082841487385468301],
-                 [0.0, 0.16568297477093699],
-                 [-0.38636910084523102, -0.38903470904529402],
-                 [0.53009849140972798, -0.14008810204667499],
-                 [-0.14372939056449699, 0.52912281109196901],
-                 [0.38636910084523102, -0.38903470904529402],
-                 [0.14372939056449699, 0.52912281109196901],
-                 [-0.53009849140972798, -0.14008810204667399],
-                 [0.0, -0.30137742399876299],
-                 [0.26100050531004299, 0.150688711999382],
-                 [-0.26100050531004299, 0.150688711999382],
-                 [-0.33658056387534602, -0.55145765476506103],
-                 [0.64586662007560502, -0.015758491353609499],
-                 [-0.30928605620025901, 0.56721614611867099],
-                 [0.33658056387534602, -0.55145765476506103],
-                 [0.30928605620025901, 0.56721614611867099],
-                 [-0.64586662007560502, -0.015758491353608999],
-                 [-0.37693173503841099, -0.21762163869053899],
-                 [0.37693173503841099, -0.21762163869053899],
-                 [0.0, 0.43524327738107899],
-                 [0.0, -0.55031736573002399],
-                 [0.47658881886593202, 0.27515868286501199],
-                 [-0.47658881886593202, 0.27515868286501199],
-                 [-0.087843541547485193, -0.51270307120416003],
-                 [0.48793565503484698, 0.180276797063564],
-                 [-0.40009211348736201, 0.332426274140597],
-                 [0.087843541547485193, -0.51270307120416003],
-                 [0.40009211348736201, 0.332426274140596],
-                 [-0.48793565503484698, 0.180276797063565],
-                 [-0.085039120745944399, -0.57221773164738798],
-                 [0.538074652475517, 0.21246282694221399],
-                 [-0.45303553172957201, 0.35975490470517402],
-                 [0.085039120745944399, -0.57221773164738798],
-                 [0.45303553172957201, 0.35975490470517402],
-                 [-0.538074652475517, 0.21246282694221399],
-                 [-0.84482245043809001, -0.57007049747206395],
-                 [0.91610675797788499, -0.446602455030774],
-                 [-0.071284307539794298, 1.01667295250284],
-                 [0.84482245043809001, -0.57007049747206395],
-                 [0.071284307539795103, 1.01667295250284],
-                 [-0.91610675797788499, -0.446602455030773],
-                 [-0.233617559313652, -0.379421570653033],
-                 [0.44539749858614502, -0.0126079558092244],
-                 [-0.211779939272492, 0.39202952646225703],
-                 [0.233617559313652, -0.379421570653033],
-                 [0.211779939272492, 0.39202952646225703],
-                 [-0.44539749858614502, -0.0126079558092242],
-                 [-0.084712737676102101, -0.38182236985847601],
-                 [0.37302424086866898, 0.117547802077607],
-                 [-0.28831150319256699, 0.26427456778087],
-                 [0.084712737676102101, -0.38182236985847601],
-                 [0.28831150319256699, 0.26427456778087],
-                 [-0.37302424086866898, 0.117547802077607],
-                 [-0.302282001417716, -0.299881483863502],
-                 [0.410845983859224, -0.11184315040279499],
-                 [-0.108563982441508, 0.41172463426629702],
-                 [0.302282001417716, -0.299881483863502],
-                 [0.108563982441508, 0.41172463426629702],
-                 [-0.410845983859224, -0.11184315040279399],
-                 [-0.17281546621195601, -0.551100816389402],
-                 [0.56367504014554404, 0.12588782428829601],
-                 [-0.390859573933588, 0.42521299210110702],
-                 [0.17281546621195601, -0.551100816389402],
-                 [0.390859573933588, 0.42521299210110702],
-                 [-0.56367504014554404, 0.12588782428829601],
-                 [0.0, -0.080478911639902201],
-                 [0.069696781949078607, 0.040239455819951399],
-                 [-0.069696781949078399, 0.040239455819951399],
-                 [-0.16293712483088199, -0.45603365215790598],
-                 [0.476405290164784, 0.086909136755813493],
-                 [-0.31346816533390198, 0.36912451540209401],
-                 [0.16293712483088199, -0.45603365215790598],
-                 [0.31346816533390198, 0.36912451540209301],
-                 [-0.476405290164784, 0.086909136755813798],
-                 [-0.963662882224533, -0.57138683817501201],
-                 [0.97666695835989503, -0.54886311760307105],
-                 [-0.013004076135361999, 1.1202499557780801],
-                 [0.963662882224533, -0.57138683817501201],
-                 [0.0130040761353627, 1.1202499557780801],
-                 [-0.97666695835989503, -0.54886311760307005],
-                 [-0.253736813195933, -0.51210804711264002],
-                 [0.57036698487995097, 0.036311497453335201],
-                 [-0.31663017168401703, 0.47579654965930501],
-                 [0.253736813195933, -0.51210804711264002],
-                 [0.31663017168401802, 0.47579654965930501],
-                 [-0.57036698487995097, 0.036311497453335499],
-                 [-0.15001122172665199, -0.28983256020905701],
-                 [0.326007970848253, 0.015002751236508001],
-                 [-0.17599674912159999, 0.27482980897254999],
-                 [0.15001122172665199, -0.28983256020905701],
-                 [0.17599674912160099, 0.27482980897254999],
-                 [-0.326007970848253, 0.0150027512365082],
-                 [-0.75738968673027796, -0.55650931396143499],
-                 [0.86064604669839095, -0.37766405229204097],
-                 [-0.103256359968113, 0.93417336625347602],
-                 [0.75738968673027796, -0.55650931396143499],
-                 [0.103256359968114, 0.93417336625347602],
-                 [-0.86064604669839095, -0.37766405229204097],
-                 [-0.766645574693675, -0.57683373408531402],
-                 [0.88287545482455698, -0.37551767634098598],
-                 [-0.11622988013088199, 0.9523514104263],
-                 [0.766645574693675, -0.57683373408531402],
-                 [0.11622988013088301, 0.9523514104263],
-                 [-0.88287545482455698, -0.37551767634098498]],
-      'weights': [0.0054801471639129799,
-                  0.0054801471639129799,
-                  0.0054801471639129799,
-                  0.0043041553174135204,
-                  0.0043041553174135204,
-                  0.0043041553174135204,
-                  0.0043041553174135204,
-                  0.0043041553174135204,
-                  0.0043041553174135204,
-                  0.010152689852099901,
-                  0.010152689852099901,
-                  0.010152689852099901,
-                  0.0064025070359718696,
-                  0.0064025070359718696,
-                  0.0064025070359718696,
-                  0.0064025070359718696,
-                  0.0064025070359718696,
-                  0.0064025070359718696,
-                  0.0068073353619764196,
-                  0.0068073353619764196,
-                  0.0068073353619764196,
-                  0.00060224168507228796,
-                  0.00060224168507228796,
-                  0.00060224168507228796,
-                  0.00060224168507228796,
-                  0.00060224168507228796,
-                  0.00060224168507228796,
-                  0.0035919735117671699,
-                  0.0035919735117671699,
-                  0.0035919735117671699,
-                  0.0035919735117671699,
-                  0.0035919735117671699,
-                  0.0035919735117671699,
-                  0.0127670176725774,
-                  0.0127670176725774,
-                  0.0127670176725774,
-                  0.0127670176725774,
-                  0.0127670176725774,
-                  0.0127670176725774,
-                  0.0054133483280898002,
-                  0.0054133483280898002,
-                  0.0054133483280898002,
-                  0.0054133483280898002,
-                  0.0054133483280898002,
-                  0.0054133483280898002,
-                  0.00156954324404139,
-                  0.00156954324404139,
-                  0.00156954324404139,
-                  0.00156954324404139,
-                  0.00156954324404139,
-                  0.00156954324404139,
-                  0.0012115171753732501,
-                  0.0012115171753732501,
-                  0.0012115171753732501,
-                  0.0086526811129032707,
-                  0.0086526811129032707,
-                  0.0086526811129032707,
-                  0.0086526811129032707,
-                  0.0086526811129032707,
-                  0.0086526811129032707,
-                  0.0090108601115680299,
-                  0.0090108601115680299,
-                  0.0090108601115680299,
-                  0.0016033043513588199,
-                  0.0016033043513588199,
-                  0.0016033043513588199,
-                  0.0016033043513588199,
-                  0.0016033043513588199,
-                  0.0016033043513588199,
-                  0.0143451331101272,
-                  0.0143451331101272,
-                  0.0143451331101272,
-                  0.0143451331101272,
-                  0.0143451331101272,
-                  0.0143451331101272,
-                  0.0026618892340077001,
-                  0.0026618892340077001,
-                  0.0026618892340077001,
-                  0.0026618892340077001,
-                  0.0026618892340077001,
-                  0.0026618892340077001,
-                  0.0090460523143863093,
-                  0.0090460523143863093,
-                  0.0090460523143863093,
-                  0.0090460523143863093,
-                  0.0090460523143863093,
-                  0.0090460523143863093,
-                  0.000214855122224532,
-                  0.000214855122224532,
-                  0.000214855122224532,
-                  0.0081724960396098705,
-                  0.0081724960396098705,
-                  0.0081724960396098705,
-                  0.0081724960396098705,
-                  0.0081724960396098705,
-                  0.0081724960396098705,
-                  0.0043411813421901898,
-                  0.0043411813421901898,
-                  0.0043411813421901898,
-                  0.0062390496673861802,
-                  0.0062390496673861802,
-                  0.0062390496673861802,
-                  0.0062390496673861802,
-                  0.0062390496673861802,
-                  0.0062390496673861802,
-                  0.0041054635182214702,
-                  0.0041054635182214702,
-                  0.0041054635182214702,
-                  0.0041054635182214702,
-                  0.0041054635182214702,
-                  0.0041054635182214702,
-                  0.0062535518316177699,
-                  0.0062535518316177699,
-                  0.0062535518316177699,
-                  0.0062535518316177699,
-                  0.0062535518316177699,
-                  0.0062535518316177699,
-                  0.0113283995518453,
-                  0.0113283995518453,
-                  0.0113283995518453,
-                  0.0113283995518453,
-                  0.0113283995518453,
-                  0.0113283995518453,
-                  0.0070654188592277596,
-                  0.0070654188592277596,
-                  0.0070654188592277596,
-                  0.0070654188592277596,
-                  0.0070654188592277596,
-                  0.0070654188592277596,
-                  0.0040281247662188203,
-                  0.0040281247662188203,
-                  0.0040281247662188203,
-                  0.0040281247662188203,
-                  0.0040281247662188203,
-                  0.0040281247662188203,
-                  0.0017419997456568899,
-                  0.0017419997456568899,
-                  0.0017419997456568899,
-                  0.0017419997456568899,
-                  0.0017419997456568899,
-                  0.0017419997456568899,
-                  0.0019800142693555799,
-                  0.0019800142693555799,
-                  0.0019800142693555799,
-                  0.0019800142693555799,
-                  0.0019800142693555799,
-                  0.0019800142693555799,
-                  0.0020584753934148,
-                  0.0020584753934148,
-                  0.0020584753934148,
-                  0.0020584753934148,
-                  0.0020584753934148,
-                  0.0020584753934148,
-                  0.0050319868202169798,
-                  0.0050319868202169798,
-                  0.0050319868202169798,
-                  0.0050319868202169798,
-                  0.0050319868202169798,
-                  0.0050319868202169798,
-                  0.0029575637096566402,
-                  0.0029575637096566402,
-                  0.0029575637096566402,
-                  0.0155635322235448,
-                  0.0155635322235448,
-                  0.0155635322235448,
-                  0.0109581921672381,
-                  0.0109581921672381,
-                  0.0109581921672381,
-                  0.0109581921672381,
-                  0.0109581921672381,
-                  0.0109581921672381,
-                  0.0137485070999653,
-                  0.0137485070999653,
-                  0.0137485070999653,
-                  0.00472102701977765,
-                  0.00472102701977765,
-                  0.00472102701977765,
-                  0.00472102701977765,
-                  0.00472102701977765,
-                  0.00472102701977765,
-                  0.0134208878148501,
-                  0.0134208878148501,
-                  0.0134208878148501,
-                  0.0052583288110277498,
-                  0.0052583288110277498,
-                  0.0052583288110277498,
-                  0.0078316263819391899,
-                  0.0078316263819391899,
-                  0.0078316263819391899,
-                  0.0078316263819391899,
-                  0.0078316263819391899,
-                  0.0078316263819391899,
-                  0.0022329153483186502,
-                  0.0022329153483186502,
-                  0.0022329153483186502,
-                  0.0022329153483186502,
-                  0.0022329153483186502,
-                  0.0022329153483186502,
-                  0.0014145380399996799,
-                  0.0014145380399996799,
-                  0.0014145380399996799,
-                  0.0014145380399996799,
-                  0.0014145380399996799,
-                  0.0014145380399996799,
-                  0.012033906788168999,
-                  0.012033906788168999,
-                  0.012033906788168999,
-                  0.012033906788168999,
-                  0.012033906788168999,
-                  0.012033906788168999,
-                  0.0122951669347171,
-                  0.0122951669347171,
-                  0.0122951669347171,
-                  0.0122951669347171,
-                  0.0122951669347171,
-                  0.0122951669347171,
-                  0.0133227968515099,
-                  0.0133227968515099,
-                  0.0133227968515099,
-                  0.0133227968515099,
-                  0.0133227968515099,
-                  0.0133227968515099,
-                  0.0050666279636969198,
-                  0.0050666279636969198,
-                  0.0050666279636969198,
-                  0.0050666279636969198,
-                  0.0050666279636969198,
-                  0.0050666279636969198,
-                  0.017278927789165101,
-                  0.017278927789165101,
-                  0.017278927789165101,
-                  0.010490506923963199,
-                  0.010490506923963199,
-                  0.010490506923963199,
-                  0.010490506923963199,
-                  0.010490506923963199,
-                  0.010490506923963199,
-                  0.00057799511133376598,
-                  0.00057799511133376598,
-                  0.00057799511133376598,
-                  0.00057799511133376598,
-                  0.00057799511133376598,
-                  0.00057799511133376598,
-                  0.0078452703023875608,
-                  0.0078452703023875608,
-                  0.0078452703023875608,
-                  0.0078452703023875608,
-                  0.0078452703023875608,
-                  0.0078452703023875608,
-                  0.014553621714100301,
-                  0.014553621714100301,
-                  0.014553621714100301,
-                  0.014553621714100301,
-                  0.014553621714100301,
-                  0.014553621714100301,
-                  0.0031366952594398399,
-                  0.0031366952594398399,
-                  0.0031366952594398399,
-                  0.0031366952594398399,
-                  0.0031366952594398399,
-                  0.0031366952594398399,
-                  0.00050625361895662003,
-                  0.00050625361895662003,
-                  0.00050625361895662003,
-                  0.00050625361895662003,
-                  0.00050625361895662003,
-                  0.00050625361895662003]},
- 39: {'points': [[-0.51907510039262506, -0.56977344334974001],
-                 [0.75297582653892103, -0.16464550173710099],
-                 [-0.23390072614629601, 0.73441894508684102],
-                 [0.51907510039262506, -0.56977344334974001],
-                 [0.23390072614629601, 0.73441894508684102],
-                 [-0.75297582653892103, -0.16464550173710099],
-                 [-0.236017478518837, -0.17648949499470301],
-                 [0.270853125425918, -0.11615238463711],
-                 [-0.034835646907080499, 0.29264187963181298],
-                 [0.236017478518837, -0.17648949499470301],
-                 [0.0348356469070807, 0.29264187963181298],
-                 [-0.270853125425918, -0.116152384637109],
-                 [-0.062535084249163694, -0.168414030590636],
-                 [0.17711837096980201, 0.030050043707742301],
-                 [-0.114583286720638, 0.138363986882894],
-                 [0.062535084249163694, -0.168414030590636],
-                 [0.114583286720638, 0.138363986882894],
-                 [-0.17711837096980201, 0.030050043707742301],
-                 [-0.44171982481354, -0.57273896147926695],
-                 [0.71686640278493297, -0.096171108904104005],
-                 [-0.27514657797139203, 0.66891007038337202],
-                 [0.44171982481354, -0.57273896147926695],
-                 [0.27514657797139203, 0.66891007038337202],
-                 [-0.71686640278493297, -0.096171108904103506],
-                 [0.0, -0.48177391174488199],
-                 [0.41722844645167001, 0.24088695587244099],
-                 [-0.41722844645167001, 0.24088695587244099],
-                 [-0.15015342269982099, -0.21805432181592899],
-                 [0.26391729344749199, -0.021009517615263401],
-                 [-0.113763870747671, 0.239063839431193],
-                 [0.15015342269982099, -0.21805432181592899],
-                 [0.113763870747671, 0.239063839431192],
-                 [-0.26391729344749199, -0.021009517615262999],
-                 [0.0, -0.43015355484213602],
-                 [0.37252390602147301, 0.21507677742106801],
-                 [-0.37252390602147301, 0.21507677742106901],
-                 [-0.073242413817247207, -0.55672301202474295],
-                 [0.51875747819344098, 0.214931715012143],
-                 [-0.44551506437619298, 0.34179129701260103],
-                 [0.073242413817247207, -0.55672301202474295],
-                 [0.44551506437619398, 0.34179129701260003],
-                 [-0.51875747819344098, 0.214931715012144],
-                 [-0.61576635195673102, -0.57361430082863896],
-                 [0.80464773247001498, -0.246462153175879],
-                 [-0.18888138051328399, 0.82007645400451901],
-                 [0.61576635195673102, -0.57361430082863896],
-                 [0.18888138051328501, 0.82007645400451801],
-                 [-0.80464773247001598, -0.246462153175879],
-                 [0.0, -0.071062437062144407],
-                 [0.0615418757506501, 0.035531218531072599],
-                 [-0.0615418757506501, 0.035531218531072599],
-                 [0.0, -0.57425388147699596],
-                 [0.49731844958089699, 0.28712694073849798],
-                 [-0.49731844958089699, 0.28712694073849898],
-                 [-0.480038624782682, -0.39157484051927399],
-                 [0.57913307176387196, -0.219938223599912],
-                 [-0.099094446981190201, 0.61151306411918604],
-                 [0.480038624782682, -0.39157484051927399],
-                 [0.099094446981190507, 0.61151306411918604],
-                 [-0.57913307176387196, -0.219938223599911],
-                 [-0.36508484113357398, -0.38260125928736599],
-                 [0.51388483062956303, -0.12487211731459701],
-                 [-0.14879998949598899, 0.50747337660196401],
-                 [0.36508484113357398, -0.38260125928736599],
-                 [0.14879998949598899, 0.50747337660196401],
-                 [-0.51388483062956303, -0.12487211731459701],
-                 [-0.660005025410903, -0.381054079087491],
-                 [0.660005025410904, -0.381054079087491],
-                 [0.0, 0.76210815817498201],
-                 [-0.56713187575704005, -0.37974002964326198],
-                 [0.61243045038344002, -0.30128059687988501],
-                 [-0.045298574626400502, 0.68102062652314799],
-                 [0.56713187575704005, -0.37974002964326198],
-                 [0.045298574626401002, 0.68102062652314799],
-                 [-0.61243045038344002, -0.30128059687988501],
-                 [-0.140316131635804, -0.47005865572418298],
-                 [0.477240802943808, 0.113511993304724],
-                 [-0.33692467130800402, 0.35654666241945998],
-                 [0.140316131635804, -0.47005865572418298],
-                 [0.33692467130800502, 0.35654666241945898],
-                 [-0.477240802943808, 0.113511993304725],
-                 [-0.25349195822799397, -0.36610435880584302],
-                 [0.44380165427606999, -0.0364782960775848],
-                 [-0.19030969604807599, 0.40258265488342798],
-                 [0.25349195822799397, -0.36610435880584302],
-                 [0.19030969604807599, 0.40258265488342798],
-                 [-0.44380165427606999, -0.0364782960775843],
-                 [-0.232482678935507, -0.51041551846753397],
-                 [0.55827414494644301, 0.0538718533357566],
-                 [-0.325791466010936, 0.45654366513177802],
-                 [0.232482678935507, -0.51041551846753397],
-                 [0.325791466010936, 0.45654366513177802],
-                 [-0.55827414494644301, 0.053871853335756899],
-                 [-0.52163635975054701, -0.54750015447026101],
-                 [0.73496722222242405, -0.17800026184648199],
-                 [-0.21333086247187599, 0.725500416316743],
-                 [0.52163635975054701, -0.54750015447026101],
-                 [0.21333086247187699, 0.725500416316743],
-                 [-0.73496722222242405, -0.17800026184648099],
-                 [-0.95266388583149597, -0.55002075093205005],
-                 [0.95266388583149697, -0.55002075093204905],
-                 [0.0, 1.1000415018641001],
-                 [-0.90690106293315298, -0.552127503946095],
-                 [0.93160697601198805, -0.50933560724617299],
-                 [-0.0247059130788343, 1.0614631111922701],
-                 [0.90690106293315298, -0.552127503946095],
-                 [0.024705913078835198, 1.0614631111922701],
-                 [-0.93160697601198805, -0.509335607246172],
-                 [-0.129323422907205, -0.31033539412300198],
-                 [0.333420046457579, 0.043170327519503199],
-                 [-0.204096623550373, 0.26716506660349898],
-                 [0.129323422907205, -0.31033539412300198],
-                 [0.204096623550373, 0.26716506660349898],
-                 [-0.333420046457578, 0.0431703275195034],
-                 [-0.137844104224426, -0.40217042416953103],
-                 [0.41721185609379002, 0.081708716064502598],
-                 [-0.27936775186936402, 0.320461708105029],
-                 [0.137844104224426, -0.40217042416953103],
-                 [0.27936775186936402, 0.320461708105028],
-                 [-0.41721185609379002, 0.081708716064502807],
-                 [-0.66294103217865996, -0.45041551128090102],
-                 [0.721541791117147, -0.34891601943734601],
-                 [-0.0586007589384865, 0.79933153071824703],
-                 [0.66294103217865996, -0.45041551128090102],
-                 [0.058600758938486902, 0.79933153071824703],
-                 [-0.721541791117147, -0.34891601943734601],
-                 [-0.64122202646501303, -0.55393733579619797],
-                 [0.80033481813668494, -0.27834589648674102],
-                 [-0.159112791671671, 0.83228323228293799],
-                 [0.64122202646501303, -0.55393733579619797],
-                 [0.159112791671672, 0.83228323228293799],
-                 [-0.80033481813668494, -0.27834589648674002],
-                 [-0.81530008183876101, -0.50261462137952595],
-                 [0.84292707134754696, -0.45476327189013599],
-                 [-0.027626989508786101, 0.95737789326966205],
-                 [0.81530008183876101, -0.50261462137952595],
-                 [0.027626989508786601, 0.95737789326966205],
-                 [-0.84292707134754696, -0.45476327189013499],
-                 [-0.90238671492070699, -0.57241680160442598],
-                 [0.94692084920282404, -0.49528141835670503],
-                 [-0.044534134282116299, 1.06769821996113],
-                 [0.90238671492070699, -0.57241680160442598],
-                 [0.044534134282117097, 1.06769821996113],
-                 [-0.94692084920282404, -0.49528141835670503],
-                 [-0.50797244570018296, -0.29327802826591298],
-                 [0.50797244570018296, -0.29327802826591298],
-                 [0.0, 0.58655605653182696],
-                 [0.0, -0.26028645488038099],
-                 [0.22541468218740199, 0.13014322744019099],
-                 [-0.22541468218740199, 0.13014322744019099],
-                 [-0.365216049211529, -0.50737982602401799],
-                 [0.62201184331029202, -0.062596463474962893],
-                 [-0.25679579409876302, 0.56997628949898105],
-                 [0.365216049211529, -0.50737982602401799],
-                 [0.25679579409876402, 0.56997628949898105],
-                 [-0.62201184331029202, -0.062596463474962505],
-                 [-0.081466971749275793, -0.52365228029452604],
-                 [0.49422966335934598, 0.191273673043001],
-                 [-0.41276269161007101, 0.33237860725152502],
-                 [0.081466971749275793, -0.52365228029452604],
-                 [0.41276269161007101, 0.33237860725152502],
-                 [-0.49422966335934598, 0.191273673043001],
-                 [-0.50100475560027302, -0.50930584971577297],
-                 [0.69157418195001596, -0.179229920908764],
-                 [-0.190569426349742, 0.68853577062453797],
-                 [0.50100475560027302, -0.50930584971577297],
-                 [0.190569426349742, 0.68853577062453797],
-                 [-0.69157418195001596, -0.179229920908764],
-                 [0.0, -0.35752411415513002],
-                 [0.30962496532387002, 0.17876205707756501],
-                 [-0.30962496532387002, 0.17876205707756501],
-                 [-0.42538501367251802, -0.45339755648003299],
-                 [0.60534630876175699, -0.14169544998957501],
-                 [-0.179961295089239, 0.59509300646960805],
-                 [0.42538501367251802, -0.45339755648003299],
-                 [0.17996129508924, 0.59509300646960805],
-                 [-0.60534630876175699, -0.14169544998957401],
-                 [-0.40434782435372002, -0.30993099181146799],
-                 [0.47058202450569803, -0.19520999194955599],
-                 [-0.066234200151977701, 0.50514098376102401],
-                 [0.40434782435372002, -0.30993099181146799],
-                 [0.066234200151978007, 0.50514098376102401],
-                 [-0.47058202450569803, -0.19520999194955599],
-                 [-0.88890204598181799, -0.51320783553081295],
-                 [0.88890204598181899, -0.51320783553081195],
-                 [0.0, 1.0264156710616199],
-                 [-0.16442016253358899, -0.57254647239454004],
-                 [0.57804987120763196, 0.14388119854881501],
-                 [-0.41362970867404297, 0.428665273845725],
-                 [0.16442016253358899, -0.57254647239454004],
-                 [0.41362970867404297, 0.428665273845725],
-                 [-0.57804987120763196, 0.14388119854881601],
-                 [-0.27207964379670202, -0.27970449294975802],
-                 [0.37827101834548599, -0.095775636905685996],
-                 [-0.106191374548784, 0.37548012985544399],
-                 [0.27207964379670202, -0.27970449294975802],
-                 [0.10619137454878499, 0.37548012985544399],
-                 [-0.37827101834548599, -0.095775636905685704],
-                 [-0.31259592531293401, -0.57171692937562602],
-                 [0.65141934726939299, 0.015142452247309601],
-                 [-0.33882342195645898, 0.55657447712831698],
-                 [0.31259592531293401, -0.57171692937562602],
-                 [0.33882342195645898, 0.55657447712831698],
-                 [-0.65141934726939299, 0.01514245224731],
-                 [-0.36480475130444301, -0.21062012136727501],
-                 [0.36480475130444301, -0.21062012136727501],
-                 [0.0, 0.42124024273455002],
-                 [-0.230615755038724, -0.54949681464841704],
-                 [0.59118607830352099, 0.075029304947744804],
-                 [-0.36057032326479699, 0.47446750970067297],
-                 [0.230615755038724, -0.54949681464841704],
-                 [0.36057032326479699, 0.47446750970067297],
-                 [-0.59118607830351999, 0.075029304947745207],
-                 [-0.73174496781264098, -0.50173031881501495],
-                 [0.800383685848989, -0.38284457180966602],
-                 [-0.068638718036347704, 0.88457489062468198],
-                 [0.73174496781264098, -0.50173031881501495],
-                 [0.068638718036348398, 0.88457489062468198],
-                 [-0.80038368584899, -0.38284457180966602],
-                 [-0.55942199595539999, -0.45905866008218899],
-                 [0.67726745943612099, -0.25494432989207699],
-                 [-0.117845463480721, 0.71400298997426603],
-                 [0.55942199595539999, -0.45905866008218899],
-                 [0.117845463480721, 0.71400298997426603],
-                 [-0.67726745943612099, -0.25494432989207699],
-                 [-0.28187070033874601, -0.44792709733285802],
-                 [0.52885159550305305, -0.020143638409435598],
-                 [-0.24698089516430699, 0.46807073574229502],
-                 [0.28187070033874601, -0.44792709733285802],
-                 [0.24698089516430799, 0.46807073574229402],
-                 [-0.52885159550305305, -0.020143638409435199],
-                 [-0.63181925527793303, -0.51472732382392605],
-                 [0.76167656609246503, -0.289807863758892],
-                 [-0.129857310814532, 0.80453518758281894],
-                 [0.63181925527793303, -0.51472732382392605],
-                 [0.129857310814533, 0.80453518758281894],
-                 [-0.76167656609246603, -0.289807863758891],
-                 [-0.95845151882990198, -0.57244321215608895],
-                 [0.97497612336608896, -0.54382175752442996],
-                 [-0.016524604536186802, 1.11626496968052],
-                 [0.95845151882990198, -0.57244321215608895],
-                 [0.016524604536187499, 1.11626496968052],
-                 [-0.97497612336608896, -0.54382175752442896],
-                 [-0.83806929801902996, -0.54626015892447699],
-                 [0.89210982371343694, -0.45265922275403297],
-                 [-0.054040525694406302, 0.99891938167851102],
-                 [0.83806929801902996, -0.54626015892447699],
-                 [0.054040525694407003, 0.99891938167851102],
-                 [-0.89210982371343694, -0.45265922275403297],
-                 [-0.139128134622794, -0.080325665976320501],
-                 [0.139128134622794, -0.080325665976320307],
-                 [0.0, 0.160651331952641],
-                 [-0.73014202636963199, -0.571820627928606],
-                 [0.860282203378958, -0.34641122924244599],
-                 [-0.13014017700932601, 0.91823185717105305],
-                 [0.73014202636963299, -0.571820627928606],
-                 [0.13014017700932601, 0.91823185717105305],
-                 [-0.860282203378959, -0.34641122924244599],
-                 [-0.38481648423499698, -0.54913090515973995],
-                 [0.667969555988977, -0.058695398562651803],
-                 [-0.28315307175397902, 0.60782630372239199],
-                 [0.38481648423499698, -0.54913090515973995],
-                 [0.28315307175397902, 0.60782630372239199],
-                 [-0.667969555988977, -0.0586953985626514],
-                 [-0.74786883044034502, -0.546319887569652],
-                 [0.84706131644814897, -0.37451346207506903],
-                 [-0.099192486007804295, 0.92083334964472197],
-                 [0.74786883044034502, -0.546319887569652],
-                 [0.099192486007804795, 0.92083334964472197],
-                 [-0.84706131644814897, -0.37451346207506903],
-                 [-0.75797025135117202, -0.43761432865532801],
-                 [0.75797025135117202, -0.43761432865532701],
-                 [0.0, 0.87522865731065502],
-                 [-0.82569754738333501, -0.57117161215160095],
-                 [0.90749789973546602, -0.42948924580067299],
-                 [-0.081800352352130901, 1.00066085795227],
-                 [0.82569754738333501, -0.57117161215160095],
-                 [0.081800352352131595, 1.00066085795227],
-                 [-0.90749789973546602, -0.42948924580067199],
-                 [-0.98907034023781004, -0.571040027183775],
-                 [0.98907034023781004, -0.571040027183774],
-                 [2.2204460492503101e-16, 1.14208005436755]],
-      'weights': [0.00135516180487411,
-                  0.00135516180487411,
-                  0.00135516180487411,
-                  0.00135516180487411,
-                  0.00135516180487411,
-                  0.00135516180487411,
-                  0.0093979793004484707,
-                  0.0093979793004484707,
-                  0.0093979793004484707,
-                  0.0093979793004484707,
-                  0.0093979793004484707,
-                  0.0093979793004484707,
-                  0.0111432614247346,
-                  0.0111432614247346,
-                  0.0111432614247346,
-                  0.0111432614247346,
-                  0.0111432614247346,
-                  0.0111432614247346,
-                  0.00132417126730493,
-                  0.00132417126730493,
-                  0.00132417126730493,
-                  0.00132417126730493,
-                  0.00132417126730493,
-                  0.00132417126730493,
-                  0.00658261228999691,
-                  0.00658261228999691,
-                  0.00658261228999691,
-                  0.010841752424939999,
-                  0.010841752424939999,
-                  0.010841752424939999,
-                  0.010841752424939999,
-                  0.010841752424939999,
-                  0.010841752424939999,
-                  0.0083294942373866292,
-                  0.0083294942373866292,
-                  0.0083294942373866292,
-                  0.0037448452391461999,
-                  0.0037448452391461999,
-                  0.0037448452391461999,
-                  0.0037448452391461999,
-                  0.0037448452391461999,
-                  0.0037448452391461999,
-                  0.00119659419106528,
-                  0.00119659419106528,
-                  0.00119659419106528,
-                  0.00119659419106528,
-                  0.00119659419106528,
-                  0.00119659419106528,
-                  0.0139932290266134,
-                  0.0139932290266134,
-                  0.0139932290266134,
-                  0.00145228421388989,
-                  0.00145228421388989,
-                  0.00145228421388989,
-                  0.0075882810132877603,
-                  0.0075882810132877603,
-                  0.0075882810132877603,
-                  0.0075882810132877603,
-                  0.0075882810132877603,
-                  0.0075882810132877603,
-                  0.0084831329128261003,
-                  0.0084831329128261003,
-                  0.0084831329128261003,
-                  0.0084831329128261003,
-                  0.0084831329128261003,
-                  0.0084831329128261003,
-                  0.0064240649382255903,
-                  0.0064240649382255903,
-                  0.0064240649382255903,
-                  0.0076746992031603801,
-                  0.0076746992031603801,
-                  0.0076746992031603801,
-                  0.0076746992031603801,
-                  0.0076746992031603801,
-                  0.0076746992031603801,
-                  0.0081404282277805703,
-                  0.0081404282277805703,
-                  0.0081404282277805703,
-                  0.0081404282277805703,
-                  0.0081404282277805703,
-                  0.0081404282277805703,
-                  0.0098639378257506499,
-                  0.0098639378257506499,
-                  0.0098639378257506499,
-                  0.0098639378257506499,
-                  0.0098639378257506499,
-                  0.0098639378257506499,
-                  0.0064488235087770598,
-                  0.0064488235087770598,
-                  0.0064488235087770598,
-                  0.0064488235087770598,
-                  0.0064488235087770598,
-                  0.0064488235087770598,
-                  0.0039336720587555803,
-                  0.0039336720587555803,
-                  0.0039336720587555803,
-                  0.0039336720587555803,
-                  0.0039336720587555803,
-                  0.0039336720587555803,
-                  0.00115806114133767,
-                  0.00115806114133767,
-                  0.00115806114133767,
-                  0.0016457698313391801,
-                  0.0016457698313391801,
-                  0.0016457698313391801,
-                  0.0016457698313391801,
-                  0.0016457698313391801,
-                  0.0016457698313391801,
-                  0.0128745079499204,
-                  0.0128745079499204,
-                  0.0128745079499204,
-                  0.0128745079499204,
-                  0.0128745079499204,
-                  0.0128745079499204,
-                  0.010715212001936401,
-                  0.010715212001936401,
-                  0.010715212001936401,
-                  0.010715212001936401,
-                  0.010715212001936401,
-                  0.010715212001936401,
-                  0.0066466103620772404,
-                  0.0066466103620772404,
-                  0.0066466103620772404,
-                  0.0066466103620772404,
-                  0.0066466103620772404,
-                  0.0066466103620772404,
-                  0.0032837483013806101,
-                  0.0032837483013806101,
-                  0.0032837483013806101,
-                  0.0032837483013806101,
-                  0.0032837483013806101,
-                  0.0032837483013806101,
-                  0.0040112169201599896,
-                  0.0040112169201599896,
-                  0.0040112169201599896,
-                  0.0040112169201599896,
-                  0.0040112169201599896,
-                  0.0040112169201599896,
-                  0.000845709767987358,
-                  0.000845709767987358,
-                  0.000845709767987358,
-                  0.000845709767987358,
-                  0.000845709767987358,
-                  0.000845709767987358,
-                  0.0100520225404059,
-                  0.0100520225404059,
-                  0.0100520225404059,
-                  0.013335417065073799,
-                  0.013335417065073799,
-                  0.013335417065073799,
-                  0.0068125836557686803,
-                  0.0068125836557686803,
-                  0.0068125836557686803,
-                  0.0068125836557686803,
-                  0.0068125836557686803,
-                  0.0068125836557686803,
-                  0.0064726447476668603,
-                  0.0064726447476668603,
-                  0.0064726447476668603,
-                  0.0064726447476668603,
-                  0.0064726447476668603,
-                  0.0064726447476668603,
-                  0.0061152251219890796,
-                  0.0061152251219890796,
-                  0.0061152251219890796,
-                  0.0061152251219890796,
-                  0.0061152251219890796,
-                  0.0061152251219890796,
-                  0.011737247871378099,
-                  0.011737247871378099,
-                  0.011737247871378099,
-                  0.0084408057823444193,
-                  0.0084408057823444193,
-                  0.0084408057823444193,
-                  0.0084408057823444193,
-                  0.0084408057823444193,
-                  0.0084408057823444193,
-                  0.010513015661091699,
-                  0.010513015661091699,
-                  0.010513015661091699,
-                  0.010513015661091699,
-                  0.010513015661091699,
-                  0.010513015661091699,
-                  0.00275751085091529,
-                  0.00275751085091529,
-                  0.00275751085091529,
-                  0.0019083104997894701,
-                  0.0019083104997894701,
-                  0.0019083104997894701,
-                  0.0019083104997894701,
-                  0.0019083104997894701,
-                  0.0019083104997894701,
-                  0.012659875998294001,
-                  0.012659875998294001,
-                  0.012659875998294001,
-                  0.012659875998294001,
-                  0.012659875998294001,
-                  0.012659875998294001,
-                  0.0020327686507989498,
-                  0.0020327686507989498,
-                  0.0020327686507989498,
-                  0.0020327686507989498,
-                  0.0020327686507989498,
-                  0.0020327686507989498,
-                  0.0123418385933218,
-                  0.0123418385933218,
-                  0.0123418385933218,
-                  0.0048978004710715003,
-                  0.0048978004710715003,
-                  0.0048978004710715003,
-                  0.0048978004710715003,
-                  0.0048978004710715003,
-                  0.0048978004710715003,
-                  0.0048702143362808299,
-                  0.0048702143362808299,
-                  0.0048702143362808299,
-                  0.0048702143362808299,
-                  0.0048702143362808299,
-                  0.0048702143362808299,
-                  0.0075822633269555196,
-                  0.0075822633269555196,
-                  0.0075822633269555196,
-                  0.0075822633269555196,
-                  0.0075822633269555196,
-                  0.0075822633269555196,
-                  0.0100108815798796,
-                  0.0100108815798796,
-                  0.0100108815798796,
-                  0.0100108815798796,
-                  0.0100108815798796,
-                  0.0100108815798796,
-                  0.0057533329285451504,
-                  0.0057533329285451504,
-                  0.0057533329285451504,
-                  0.0057533329285451504,
-                  0.0057533329285451504,
-                  0.0057533329285451504,
-                  0.00056018236387191903,
-                  0.00056018236387191903,
-                  0.00056018236387191903,
-                  0.00056018236387191903,
-                  0.00056018236387191903,
-                  0.00056018236387191903,
-                  0.0027019274000659702,
-                  0.0027019274000659702,
-                  0.0027019274000659702,
-                  0.0027019274000659702,
-                  0.0027019274000659702,
-                  0.0027019274000659702,
-                  0.0151186012644672,
-                  0.0151186012644672,
-                  0.0151186012644672,
-                  0.00150421625077037,
-                  0.00150421625077037,
-                  0.00150421625077037,
-                  0.00150421625077037,
-                  0.00150421625077037,
-                  0.00150421625077037,
-                  0.00476604654650773,
-                  0.00476604654650773,
-                  0.00476604654650773,
-                  0.00476604654650773,
-                  0.00476604654650773,
-                  0.00476604654650773,
-                  0.0035517195604523898,
-                  0.0035517195604523898,
-                  0.0035517195604523898,
-                  0.0035517195604523898,
-                  0.0035517195604523898,
-                  0.0035517195604523898,
-                  0.0064218994359688201,
-                  0.0064218994359688201,
-                  0.0064218994359688201,
-                  0.0013581878583804499,
-                  0.0013581878583804499,
-                  0.0013581878583804499,
-                  0.0013581878583804499,
-                  0.0013581878583804499,
-                  0.0013581878583804499,
-                  0.00030294916428953299,
-                  0.00030294916428953299,
-                  0.00030294916428953299]},
- 40: {'points': [[-0.66411637423956604, -0.57470378380535803],
-                 [0.82976626354626304, -0.28778975925799799],
-                 [-0.165649889306697, 0.86249354306335702],
-                 [0.66411637423956604, -0.57470378380535803],
-                 [0.16564988930669799, 0.86249354306335702],
-                 [-0.82976626354626304, -0.28778975925799799],
-                 [-0.242071978637384, -0.55141831198597602],
-                 [0.59857825561048095, 0.066068672948649598],
-                 [-0.356506276973096, 0.48534963903732697],
-                 [0.242071978637384, -0.55141831198597602],
-                 [0.356506276973096, 0.48534963903732697],
-                 [-0.59857825561047995, 0.066068672948650001],
-                 [-0.67514797177612496, -0.56556494724168904],
-                 [0.82736759768937096, -0.30191282125081897],
-                 [-0.152219625913246, 0.86747776849250802],
-                 [0.67514797177612496, -0.56556494724168904],
-                 [0.152219625913246, 0.86747776849250802],
-                 [-0.82736759768937096, -0.30191282125081897],
-                 [-0.87225015944191198, -0.51618467078933095],
-                 [0.88315411766862395, -0.497298461137058],
-                 [-0.0109039582267115, 1.0134831319263899],
-                 [0.87225015944191198, -0.51618467078933095],
-                 [0.010903958226712101, 1.0134831319263899],
-                 [-0.88315411766862395, -0.497298461137057],
-                 [-0.76868567879223404, -0.57460672418387404],
-                 [0.88196685972471001, -0.37839796326742298],
-                 [-0.11328118093247599, 0.95300468745129696],
-                 [0.76868567879223404, -0.57460672418387404],
-                 [0.11328118093247599, 0.95300468745129696],
-                 [-0.88196685972471001, -0.37839796326742198],
-                 [-0.309991311546089, -0.54008229992950396],
-                 [0.62272064764632196, 0.0015807992133826099],
-                 [-0.31272933610023201, 0.53850150071612202],
-                 [0.309991311546089, -0.54008229992950396],
-                 [0.31272933610023301, 0.53850150071612202],
-                 [-0.62272064764632196, 0.0015807992133829399],
-                 [-0.85323240841065695, -0.57384241303948402],
-                 [0.92357831166648396, -0.45199973449606601],
-                 [-0.070345903255826597, 1.0258421475355499],
-                 [0.85323240841065695, -0.57384241303948402],
-                 [0.070345903255827097, 1.0258421475355499],
-                 [-0.92357831166648396, -0.45199973449606601],
-                 [-0.53727030292133604, -0.55074388383078998],
-                 [0.74559334583703796, -0.18991778911344201],
-                 [-0.208323042915702, 0.74066167294423302],
-                 [0.53727030292133604, -0.55074388383078998],
-                 [0.208323042915702, 0.74066167294423302],
-                 [-0.74559334583703796, -0.18991778911344201],
-                 [-0.76757602207091502, -0.55974233776493998],
-                 [0.86853909511358496, -0.38486916556674799],
-                 [-0.10096307304267001, 0.94461150333168797],
-                 [0.76757602207091502, -0.55974233776493998],
-                 [0.10096307304267001, 0.94461150333168797],
-                 [-0.86853909511358496, -0.384869165566747],
-                 [-0.41709706260058899, -0.52536474950509005],
-                 [0.66352775062455105, -0.098534277303433199],
-                 [-0.24643068802396101, 0.62389902680852405],
-                 [0.41709706260058899, -0.52536474950509005],
-                 [0.24643068802396201, 0.62389902680852405],
-                 [-0.66352775062455105, -0.098534277303432796],
-                 [-0.642503246428627, -0.54449319151536002],
-                 [0.79279655925428105, -0.28417753766348403],
-                 [-0.150293312825654, 0.82867072917884499],
-                 [0.642503246428627, -0.54449319151536002],
-                 [0.150293312825655, 0.82867072917884499],
-                 [-0.79279655925428105, -0.28417753766348403],
-                 [-0.73395730528035596, -0.53103387228266596],
-                 [0.82686747630698798, -0.37010873552462598],
-                 [-0.092910171026631003, 0.90114260780729205],
-                 [0.73395730528035596, -0.53103387228266596],
-                 [0.092910171026631599, 0.90114260780729205],
-                 [-0.82686747630698798, -0.37010873552462598],
-                 [-0.43310798704792502, -0.575871411831967],
-                 [0.715273265483656, -0.087146813449461305],
-                 [-0.28216527843573103, 0.66301822528142895],
-                 [0.43310798704792502, -0.575871411831967],
-                 [0.28216527843573103, 0.66301822528142895],
-                 [-0.715273265483656, -0.087146813449460903],
-                 [-0.84693242965372495, -0.55611797625038795],
-                 [0.90507850976088999, -0.45540601124380897],
-                 [-0.058146080107164697, 1.0115239874941999],
-                 [0.84693242965372495, -0.55611797625038795],
-                 [0.058146080107165397, 1.0115239874941999],
-                 [-0.90507850976088999, -0.45540601124380797],
-                 [-0.52988575538367899, -0.51296985906932002],
-                 [0.70918780702159401, -0.202409595731113],
-                 [-0.17930205163791499, 0.71537945480043297],
-                 [0.52988575538367899, -0.51296985906932002],
-                 [0.17930205163791499, 0.71537945480043297],
-                 [-0.70918780702159401, -0.202409595731112],
-                 [-0.813952036210011, -0.52158827793142704],
-                 [0.85868471710979999, -0.44410900185422802],
-                 [-0.044732680899788303, 0.96569727978565501],
-                 [0.813952036210011, -0.52158827793142704],
-                 [0.044732680899788803, 0.96569727978565501],
-                 [-0.85868471710979999, -0.44410900185422703],
-                 [-0.13262238321158201, -0.56187932687266295],
-                 [0.55291296253881805, 0.16608531046466701],
-                 [-0.42029057932723601, 0.395794016407997],
-                 [0.13262238321158201, -0.56187932687266295],
-                 [0.42029057932723601, 0.395794016407997],
-                 [-0.55291296253881805, 0.16608531046466701],
-                 [-0.95288876390861998, -0.55015058435041198],
-                 [0.95288876390862098, -0.55015058435041198],
-                 [0.0, 1.10030116870082],
-                 [-0.118330111307671, -0.068317921616721997],
-                 [0.118330111307671, -0.068317921616721997],
-                 [0.0, 0.13663584323344399],
-                 [0.0, -0.12737340589454799],
-                 [0.110308605271225, 0.063686702947274104],
-                 [-0.110308605271225, 0.063686702947274201],
-                 [-0.12565893500209099, -0.189292573222892],
-                 [0.22676164465979601, -0.0141775433128618],
-                 [-0.101102709657705, 0.203470116535754],
-                 [0.12565893500208999, -0.189292573222892],
-                 [0.101102709657705, 0.203470116535754],
-                 [-0.22676164465979601, -0.0141775433128618],
-                 [-0.25582836243545198, -0.25237212852983298],
-                 [0.34647485573171199, -0.095367796612757294],
-                 [-0.090646493296260594, 0.34773992514259],
-                 [0.25582836243545198, -0.25237212852983298],
-                 [0.090646493296260705, 0.34773992514259],
-                 [-0.34647485573171299, -0.095367796612757003],
-                 [-0.41982097163871201, -0.56044801444994197],
-                 [0.695272703833554, -0.083351619255619805],
-                 [-0.27545173219484198, 0.64379963370556204],
-                 [0.41982097163871201, -0.56044801444994197],
-                 [0.27545173219484198, 0.64379963370556204],
-                 [-0.695272703833554, -0.083351619255619305],
-                 [-0.395842445718664, -0.475667991108983],
-                 [0.60986178692682202, -0.104975618334035],
-                 [-0.21401934120815699, 0.58064360944301796],
-                 [0.395842445718664, -0.475667991108983],
-                 [0.21401934120815799, 0.58064360944301796],
-                 [-0.60986178692682202, -0.104975618334034],
-                 [-0.13831881077136099, -0.52410356380693002],
-                 [0.52304640585644002, 0.14226417795421401],
-                 [-0.38472759508507898, 0.38183938585271598],
-                 [0.13831881077136099, -0.52410356380693002],
-                 [0.38472759508507898, 0.38183938585271598],
-                 [-0.52304640585644002, 0.14226417795421401],
-                 [-0.55558835329547196, -0.57170940642241597],
-                 [0.77290904619207002, -0.195298924789434],
-                 [-0.217320692896599, 0.76700833121185097],
-                 [0.55558835329547196, -0.57170940642241597],
-                 [0.217320692896599, 0.76700833121185097],
-                 [-0.77290904619207101, -0.195298924789434],
-                 [-0.26904113625079301, -0.49908301034879299],
-                 [0.566739133684663, 0.016545046518179],
-                 [-0.29769799743386899, 0.48253796383061398],
-                 [0.26904113625079301, -0.49908301034879299],
-                 [0.29769799743386999, 0.48253796383061398],
-                 [-0.566739133684663, 0.016545046518179202],
-                 [-0.38617376855258301, -0.31612494675971298],
-                 [0.46685911894020599, -0.17637382046185199],
-                 [-0.080685350387623297, 0.49249876722156599],
-                 [0.38617376855258301, -0.31612494675971298],
-                 [0.0806853503876237, 0.49249876722156599],
-                 [-0.46685911894020599, -0.17637382046185199],
-                 [-0.90712290003268403, -0.54847061860786905],
-                 [0.92855093896012197, -0.51135616647898197],
-                 [-0.021428038927437901, 1.0598267850868499],
-                 [0.90712290003268403, -0.54847061860786905],
-                 [0.021428038927438602, 1.0598267850868499],
-                 [-0.92855093896012197, -0.51135616647898097],
-                 [-0.132112540834121, -0.29657575362028799],
-                 [0.32289840719874402, 0.033875060289286697],
-                 [-0.190785866364624, 0.26270069333100199],
-                 [0.132112540834121, -0.29657575362028799],
-                 [0.190785866364624, 0.26270069333100199],
-                 [-0.32289840719874402, 0.033875060289286898],
-                 [-0.135322000060908, -0.46558820109446503],
-                 [0.470872209880558, 0.115601810803567],
-                 [-0.335550209819651, 0.34998639029089801],
-                 [0.135322000060907, -0.46558820109446503],
-                 [0.335550209819651, 0.34998639029089801],
-                 [-0.470872209880558, 0.115601810803568],
-                 [-0.51005162143835603, -0.37923882528380798],
-                 [0.58345626751632396, -0.25209824876515502],
-                 [-0.073404646077968302, 0.631337074048964],
-                 [0.51005162143835603, -0.37923882528380798],
-                 [0.073404646077968705, 0.631337074048964],
-                 [-0.58345626751632396, -0.25209824876515502],
-                 [-0.51567412876653596, -0.45684803758863601],
-                 [0.65347907060409505, -0.21816287679190999],
-                 [-0.13780494183755901, 0.67501091438054595],
-                 [0.51567412876653596, -0.45684803758863601],
-                 [0.13780494183755901, 0.67501091438054595],
-                 [-0.65347907060409505, -0.21816287679190899],
-                 [-0.72835797984670603, -0.48029591121869603],
-                 [0.78012745037253906, -0.39062855798701401],
-                 [-0.051769470525832598, 0.87092446920570998],
-                 [0.72835797984670603, -0.48029591121869603],
-                 [0.051769470525833097, 0.87092446920570998],
-                 [-0.78012745037253906, -0.39062855798701301],
-                 [-0.62260740206958098, -0.43603282267888399],
-                 [0.68891920235853998, -0.32117741543704698],
-                 [-0.066311800288958694, 0.75721023811593202],
-                 [0.62260740206958098, -0.43603282267888399],
-                 [0.066311800288959097, 0.75721023811593202],
-                 [-0.68891920235853998, -0.32117741543704598],
-                 [-0.63528538940605805, -0.50005009951296397],
-                 [0.75069878404619195, -0.300148236122254],
-                 [-0.115413394640134, 0.80019833563521803],
-                 [0.63528538940605805, -0.50005009951296397],
-                 [0.115413394640134, 0.80019833563521803],
-                 [-0.75069878404619195, -0.300148236122253],
-                 [-0.13545478402323899, -0.38891721146901798],
-                 [0.40453957711279298, 0.077151321706249901],
-                 [-0.26908479308955502, 0.31176588976276798],
-                 [0.13545478402323899, -0.38891721146901798],
-                 [0.26908479308955502, 0.31176588976276798],
-                 [-0.40453957711279298, 0.077151321706250206],
-                 [-0.24191105544338001, -0.13966741298018201],
-                 [0.24191105544338001, -0.13966741298018201],
-                 [0.0, 0.27933482596036402],
-                 [-0.91834711208585895, -0.57179705694461502],
-                 [0.954364333166143, -0.50941340008612201],
-                 [-0.036017221080283802, 1.0812104570307399],
-                 [0.91834711208585895, -0.57179705694461502],
-                 [0.036017221080284503, 1.0812104570307399],
-                 [-0.954364333166143, -0.50941340008612102],
-                 [-0.26841456178680501, -0.43363067211489698],
-                 [0.509742458805024, -0.015638493195592001],
-                 [-0.241327897018219, 0.44926916531048999],
-                 [0.26841456178680501, -0.43363067211489698],
-                 [0.241327897018219, 0.44926916531048999],
-                 [-0.509742458805024, -0.015638493195591598],
-                 [-0.36826861145558698, -0.21261998195797299],
-                 [0.36826861145558698, -0.21261998195797299],
-                 [0.0, 0.42523996391594598],
-                 [-0.99082746811437405, -0.57205450543630998],
-                 [0.99082746811437405, -0.57205450543630898],
-                 [0.0, 1.14410901087262],
-                 [0.0, -0.242344700173517],
-                 [0.20987666682278799, 0.121172350086759],
-                 [-0.20987666682278799, 0.121172350086759],
-                 [0.0, -0.49681561132122698],
-                 [0.43025494040087903, 0.24840780566061399],
-                 [-0.43025494040087903, 0.24840780566061399],
-                 [-0.29450956974500198, -0.57125217727234001],
-                 [0.64197368235751895, 0.030573319579372999],
-                 [-0.34746411261251597, 0.54067885769296697],
-                 [0.29450956974500198, -0.57125217727234001],
-                 [0.34746411261251697, 0.54067885769296697],
-                 [-0.64197368235751895, 0.030573319579373499],
-                 [-0.80543126452089198, -0.465015957384878],
-                 [0.80543126452089198, -0.465015957384877],
-                 [0.0, 0.930031914769756],
-                 [-0.49331086065111401, -0.28481315819108699],
-                 [0.49331086065111501, -0.28481315819108699],
-                 [0.0, 0.56962631638217398],
-                 [0.0, 2.2204460492503101e-16],
-                 [-0.15766005001997599, -0.57631399232172598],
-                 [0.57793258291703298, 0.15161938768163899],
-                 [-0.42027253289705702, 0.42469460464008801],
-                 [0.15766005001997599, -0.57631399232172598],
-                 [0.42027253289705702, 0.42469460464008801],
-                 [-0.57793258291703298, 0.15161938768163899],
-                 [-0.71110589752252695, -0.41055718135696201],
-                 [0.71110589752252695, -0.41055718135696101],
-                 [0.0, 0.82111436271392302],
-                 [-0.395004203419271, -0.40469300239711797],
-                 [0.54797652251933604, -0.13973717356416601],
-                 [-0.15297231910006501, 0.54443017596128396],
-                 [0.395004203419271, -0.40469300239711797],
-                 [0.15297231910006501, 0.54443017596128396],
-                 [-0.54797652251933604, -0.13973717356416501],
-                 [0.0, -0.54513955979531903],
-                 [0.472104707390612, 0.27256977989766001],
-                 [-0.472104707390612, 0.27256977989766001],
-                 [0.0, -0.57203141564320803],
-                 [0.495393737709793, 0.28601570782160401],
-                 [-0.495393737709793, 0.28601570782160401],
-                 [-0.26583541850389603, -0.35075660264700098],
-                 [0.43668183768937502, -0.054841924326541197],
-                 [-0.17084641918547899, 0.40559852697354298],
-                 [0.26583541850389603, -0.35075660264700098],
-                 [0.17084641918547899, 0.40559852697354298],
-                 [-0.43668183768937502, -0.054841924326541003],
-                 [0.0, -0.34273351742727798],
-                 [0.29681593282041902, 0.17136675871363899],
-                 [-0.29681593282041902, 0.17136675871363899],
-                 [-0.609275179029372, -0.35176518862316603],
-                 [0.609275179029372, -0.35176518862316503],
-                 [0.0, 0.70353037724633105],
-                 [0.0, -0.42794958420783002],
-                 [0.370615211462968, 0.21397479210391501],
-                 [-0.370615211462968, 0.21397479210391501],
-                 [-0.964881636326406, -0.57216175902539301],
-                 [0.97794743655318395, -0.54953112919106895],
-                 [-0.013065800226777601, 1.1216928882164601],
-                 [0.964881636326406, -0.57216175902539301],
-                 [0.0130658002267783, 1.1216928882164601],
-                 [-0.97794743655318395, -0.54953112919106795]],
-      'weights': [0.00065393988364031703,
-                  0.00065393988364031703,
-                  0.00065393988364031703,
-                  0.00065393988364031703,
-                  0.00065393988364031703,
-                  0.00065393988364031703,
-                  0.0026875972051298999,
-                  0.0026875972051298999,
-                  0.0026875972051298999,
-                  0.0026875972051298999,
-                  0.0026875972051298999,
-                  0.0026875972051298999,
-                  0.0014972099380154301,
-                  0.0014972099380154301,
-                  0.0014972099380154301,
-                  0.0014972099380154301,
-                  0.0014972099380154301,
-                  0.0014972099380154301,
-                  0.0017271749665464301,
-                  0.0017271749665464301,
-                  0.0017271749665464301,
-                  0.0017271749665464301,
-                  0.0017271749665464301,
-                  0.0017271749665464301,
-                  0.00070854220241766005,
-                  0.00070854220241766005,
-                  0.00070854220241766005,
-                  0.00070854220241766005,
-                  0.00070854220241766005,
-                  0.00070854220241766005,
-                  0.0035397353550262298,
-                  0.0035397353550262298,
-                  0.0035397353550262298,
-                  0.0035397353550262298,
-                  0.0035397353550262298,
-                  0.0035397353550262298,
-                  0.00071472094956639303,
-                  0.00071472094956639303,
-                  0.00071472094956639303,
-                  0.00071472094956639303,
-                  0.00071472094956639303,
-                  0.00071472094956639303,
-                  0.0033163520597025401,
-                  0.0033163520597025401,
-                  0.0033163520597025401,
-                  0.0033163520597025401,
-                  0.0033163520597025401,
-                  0.0033163520597025401,
-                  0.0020161125717040799,
-                  0.0020161125717040799,
-                  0.0020161125717040799,
-                  0.0020161125717040799,
-                  0.0020161125717040799,
-                  0.0020161125717040799,
-                  0.0050552911575654901,
-                  0.0050552911575654901,
-                  0.0050552911575654901,
-                  0.0050552911575654901,
-                  0.0050552911575654901,
-                  0.0050552911575654901,
-                  0.0033642283999427902,
-                  0.0033642283999427902,
-                  0.0033642283999427902,
-                  0.0033642283999427902,
-                  0.0033642283999427902,
-                  0.0033642283999427902,
-                  0.00353982005949622,
-                  0.00353982005949622,
-                  0.00353982005949622,
-                  0.00353982005949622,
-                  0.00353982005949622,
-                  0.00353982005949622,
-                  0.00079012496014799801,
-                  0.00079012496014799801,
-                  0.00079012496014799801,
-                  0.00079012496014799801,
-                  0.00079012496014799801,
-                  0.00079012496014799801,
-                  0.0019366972016276599,
-                  0.0019366972016276599,
-                  0.0019366972016276599,
-                  0.0019366972016276599,
-                  0.0019366972016276599,
-                  0.0019366972016276599,
-                  0.0052593244926938199,
-                  0.0052593244926938199,
-                  0.0052593244926938199,
-                  0.0052593244926938199,
-                  0.0052593244926938199,
-                  0.0052593244926938199,
-                  0.0033605001723384801,
-                  0.0033605001723384801,
-                  0.0033605001723384801,
-                  0.0033605001723384801,
-                  0.0033605001723384801,
-                  0.0033605001723384801,
-                  0.0033167447675754198,
-                  0.0033167447675754198,
-                  0.0033167447675754198,
-                  0.0033167447675754198,
-                  0.0033167447675754198,
-                  0.0033167447675754198,
-                  0.00108358245082826,
-                  0.00108358245082826,
-                  0.00108358245082826,
-                  0.0148861608240872,
-                  0.0148861608240872,
-                  0.0148861608240872,
-                  0.014894480526755601,
-                  0.014894480526755601,
-                  0.014894480526755601,
-                  0.0142584744401042,
-                  0.0142584744401042,
-                  0.0142584744401042,
-                  0.0142584744401042,
-                  0.0142584744401042,
-                  0.0142584744401042,
-                  0.013058832546233599,
-                  0.013058832546233599,
-                  0.013058832546233599,
-                  0.013058832546233599,
-                  0.013058832546233599,
-                  0.013058832546233599,
-                  0.0032132567071920101,
-                  0.0032132567071920101,
-                  0.0032132567071920101,
-                  0.0032132567071920101,
-                  0.0032132567071920101,
-                  0.0032132567071920101,
-                  0.0076293744183244397,
-                  0.0076293744183244397,
-                  0.0076293744183244397,
-                  0.0076293744183244397,
-                  0.0076293744183244397,
-                  0.0076293744183244397,
-                  0.0065942725055445498,
-                  0.0065942725055445498,
-                  0.0065942725055445498,
-                  0.0065942725055445498,
-                  0.0065942725055445498,
-                  0.0065942725055445498,
-                  0.0016791272660446901,
-                  0.0016791272660446901,
-                  0.0016791272660446901,
-                  0.0016791272660446901,
-                  0.0016791272660446901,
-                  0.0016791272660446901,
-                  0.0073163217528411902,
-                  0.0073163217528411902,
-                  0.0073163217528411902,
-                  0.0073163217528411902,
-                  0.0073163217528411902,
-                  0.0073163217528411902,
-                  0.011465008169531801,
-                  0.011465008169531801,
-                  0.011465008169531801,
-                  0.011465008169531801,
-                  0.011465008169531801,
-                  0.011465008169531801,
-                  0.0017344883033178801,
-                  0.0017344883033178801,
-                  0.0017344883033178801,
-                  0.0017344883033178801,
-                  0.0017344883033178801,
-                  0.0017344883033178801,
-                  0.013087914698866601,
-                  0.013087914698866601,
-                  0.013087914698866601,
-                  0.013087914698866601,
-                  0.013087914698866601,
-                  0.013087914698866601,
-                  0.0091776263505184193,
-                  0.0091776263505184193,
-                  0.0091776263505184193,
-                  0.0091776263505184193,
-                  0.0091776263505184193,
-                  0.0091776263505184193,
-                  0.0096210049471788205,
-                  0.0096210049471788205,
-                  0.0096210049471788205,
-                  0.0096210049471788205,
-                  0.0096210049471788205,
-                  0.0096210049471788205,
-                  0.0078045941976853696,
-                  0.0078045941976853696,
-                  0.0078045941976853696,
-                  0.0078045941976853696,
-                  0.0078045941976853696,
-                  0.0078045941976853696,
-                  0.0053921082314379301,
-                  0.0053921082314379301,
-                  0.0053921082314379301,
-                  0.0053921082314379301,
-                  0.0053921082314379301,
-                  0.0053921082314379301,
-                  0.0076034228274705802,
-                  0.0076034228274705802,
-                  0.0076034228274705802,
-                  0.0076034228274705802,
-                  0.0076034228274705802,
-                  0.0076034228274705802,
-                  0.0056093372514203202,
-                  0.0056093372514203202,
-                  0.0056093372514203202,
-                  0.0056093372514203202,
-                  0.0056093372514203202,
-                  0.0056093372514203202,
-                  0.0113870183534118,
-                  0.0113870183534118,
-                  0.0113870183534118,
-                  0.0113870183534118,
-                  0.0113870183534118,
-                  0.0113870183534118,
-                  0.0139241913069604,
-                  0.0139241913069604,
-                  0.0139241913069604,
-                  0.00080009935913433303,
-                  0.00080009935913433303,
-                  0.00080009935913433303,
-                  0.00080009935913433303,
-                  0.00080009935913433303,
-                  0.00080009935913433303,
-                  0.0097346968767475801,
-                  0.0097346968767475801,
-                  0.0097346968767475801,
-                  0.0097346968767475801,
-                  0.0097346968767475801,
-                  0.0097346968767475801,
-                  0.0124912448816062,
-                  0.0124912448816062,
-                  0.0124912448816062,
-                  0.00021297969654698301,
-                  0.00021297969654698301,
-                  0.00021297969654698301,
-                  0.0139721160583757,
-                  0.0139721160583757,
-                  0.0139721160583757,
-                  0.0081042245550874397,
-                  0.0081042245550874397,
-                  0.0081042245550874397,
-                  0.0021352195066264802,
-                  0.0021352195066264802,
-                  0.0021352195066264802,
-                  0.0021352195066264802,
-                  0.0021352195066264802,
-                  0.0021352195066264802,
-                  0.0047064991859080601,
-                  0.0047064991859080601,
-                  0.0047064991859080601,
-                  0.010807896633163,
-                  0.010807896633163,
-                  0.010807896633163,
-                  0.015216905441465299,
-                  0.00077770854567432897,
-                  0.00077770854567432897,
-                  0.00077770854567432897,
-                  0.00077770854567432897,
-                  0.00077770854567432897,
-                  0.00077770854567432897,
-                  0.0067392527331220798,
-                  0.0067392527331220798,
-                  0.0067392527331220798,
-                  0.0098522224183609005,
-                  0.0098522224183609005,
-                  0.0098522224183609005,
-                  0.0098522224183609005,
-                  0.0098522224183609005,
-                  0.0098522224183609005,
-                  0.0052463283866287097,
-                  0.0052463283866287097,
-                  0.0052463283866287097,
-                  0.0020871698283728298,
-                  0.0020871698283728298,
-                  0.0020871698283728298,
-                  0.0116877210529297,
-                  0.0116877210529297,
-                  0.0116877210529297,
-                  0.0116877210529297,
-                  0.0116877210529297,
-                  0.0116877210529297,
-                  0.012513869171828401,
-                  0.012513869171828401,
-                  0.012513869171828401,
-                  0.0088964914372516302,
-                  0.0088964914372516302,
-                  0.0088964914372516302,
-                  0.0105385832486672,
-                  0.0105385832486672,
-                  0.0105385832486672,
-                  0.00048248115557237599,
-                  0.00048248115557237599,
-                  0.00048248115557237599,
-                  0.00048248115557237599,
-                  0.00048248115557237599,
-                  0.00048248115557237599]},
- 41: {'points': [[-0.994569834720755, -0.57421516180390997],
-                 [0.994569834720755, -0.57421516180390897],
-                 [0.0, 1.1484303236078199],
-                 [-0.056176745848366398, -0.0324336593377514],
-                 [0.056176745848366398, -0.0324336593377514],
-                 [0.0, 0.064867318675503299],
-                 [0.0, -0.133364879382979],
-                 [0.11549737351830699, 0.066682439691489806],
-                 [-0.11549737351830699, 0.066682439691489806],
-                 [-0.89446859394723699, -0.53097841550313796],
-                 [0.90707509366054495, -0.50914331749408603],
-                 [-0.012606499713308, 1.0401217329972201],
-                 [0.89446859394723699, -0.53097841550313796],
-                 [0.0126064997133086, 1.0401217329972201],
-                 [-0.90707509366054495, -0.50914331749408503],
-                 [-0.83678266843431504, -0.54016766573740105],
-                 [0.88619025504868798, -0.45459121544194703],
-                 [-0.049407586614372397, 0.99475888117934896],
-                 [0.83678266843431504, -0.54016766573740105],
-                 [0.049407586614373097, 0.99475888117934896],
-                 [-0.88619025504868798, -0.45459121544194703],
-                 [-0.94247957093734003, -0.55659144758280998],
-                 [0.95326211860453802, -0.53791552718819002],
-                 [-0.0107825476671972, 1.0945069747709999],
-                 [0.94247957093734103, -0.55659144758280998],
-                 [0.010782547667197899, 1.0945069747709999],
-                 [-0.95326211860453802, -0.53791552718818902],
-                 [-0.47818348033753499, -0.41036116782557402],
-                 [0.59447493623236403, -0.20893845772957501],
-                 [-0.116291455894829, 0.61929962555514895],
-                 [0.47818348033753499, -0.41036116782557402],
-                 [0.116291455894829, 0.61929962555514995],
-                 [-0.59447493623236403, -0.20893845772957501],
-                 [-0.47786178727052703, -0.35568548495723201],
-                 [0.54696355936561403, -0.23599770479549501],
-                 [-0.069101772095087305, 0.59168318975272804],
-                 [0.47786178727052703, -0.35568548495723201],
-                 [0.069101772095087693, 0.59168318975272804],
-                 [-0.54696355936561403, -0.23599770479549501],
-                 [0.0, -0.51447322281830399],
-                 [0.44554688052750302, 0.25723661140915199],
-                 [-0.44554688052750302, 0.25723661140915199],
-                 [-0.82977481051684199, -0.50391286234357402],
-                 [0.85128874534168697, -0.46664963415621802],
-                 [-0.021513934824844101, 0.97056249649979198],
-                 [0.82977481051684299, -0.50391286234357402],
-                 [0.021513934824844799, 0.97056249649979198],
-                 [-0.85128874534168697, -0.46664963415621702],
-                 [-0.80506207604730995, -0.55710779590286597],
-                 [0.88500054192189304, -0.41865031152897703],
-                 [-0.079938465874582601, 0.97575810743184299],
-                 [0.80506207604730995, -0.55710779590286597],
-                 [0.079938465874583198, 0.97575810743184299],
-                 [-0.88500054192189304, -0.41865031152897703],
-                 [-0.75892338634994105, -0.46781272099145899],
-                 [0.78459939376709598, -0.423340571609432],
-                 [-0.025676007417154499, 0.89115329260089104],
-                 [0.75892338634994105, -0.46781272099145899],
-                 [0.025676007417155099, 0.89115329260089104],
-                 [-0.78459939376709598, -0.423340571609431],
-                 [-0.066697937351822403, -0.55164499869306804],
-                 [0.51108755141474205, 0.21806039121983301],
-                 [-0.44438961406291899, 0.33358460747323598],
-                 [0.066697937351822403, -0.55164499869306804],
-                 [0.44438961406291999, 0.33358460747323598],
-                 [-0.51108755141474205, 0.21806039121983301],
-                 [-0.93039119591469899, -0.57416322708744405],
-                 [0.96243553853393005, -0.51866079757579198],
-                 [-0.0320443426192304, 1.0928240246632399],
-                 [0.93039119591469899, -0.57416322708744405],
-                 [0.032044342619231198, 1.0928240246632399],
-                 [-0.96243553853393005, -0.51866079757579098],
-                 [-0.101792465446898, -0.13038223693758699],
-                 [0.16381056211364101, -0.022963742522069001],
-                 [-0.0620180966667436, 0.153345979459657],
-                 [0.101792465446898, -0.13038223693758699],
-                 [0.062018096666743801, 0.153345979459657],
-                 [-0.16381056211364101, -0.022963742522068901],
-                 [-0.57315400507473702, -0.33091061911701197],
-                 [0.57315400507473702, -0.33091061911701197],
-                 [0.0, 0.66182123823402395],
-                 [-0.119643789502203, -0.51461673052711498],
-                 [0.50549305660007404, 0.15369380414961101],
-                 [-0.38584926709786999, 0.36092292637750401],
-                 [0.119643789502204, -0.51461673052711498],
-                 [0.38584926709786999, 0.36092292637750401],
-                 [-0.50549305660007404, 0.15369380414961201],
-                 [-0.893703151809777, -0.55908758428750205],
-                 [0.93103562683833896, -0.49442584076573598],
-                 [-0.037332475028561497, 1.0535134250532401],
-                 [0.893703151809777, -0.55908758428750205],
-                 [0.037332475028562399, 1.0535134250532401],
-                 [-0.93103562683833896, -0.49442584076573598],
-                 [-0.47609915540097503, -0.27487597553170601],
-                 [0.47609915540097503, -0.27487597553170601],
-                 [0.0, 0.54975195106341301],
-                 [0.0, -0.318228811812104],
-                 [0.27559423524541998, 0.159114405906053],
-                 [-0.27559423524541998, 0.159114405906053],
-                 [-0.125375067088282, -0.31576402673138898],
-                 [0.336147202294793, 0.049304020266064397],
-                 [-0.210772135206511, 0.26646000646532603],
-                 [0.125375067088282, -0.31576402673138898],
-                 [0.210772135206511, 0.26646000646532497],
-                 [-0.336147202294793, 0.049304020266064501],
-                 [-0.37006788298624599, -0.21365879186054401],
-                 [0.37006788298624599, -0.21365879186054401],
-                 [0.0, 0.42731758372108902],
-                 [-0.86060405291382602, -0.57305121360034506],
-                 [0.92657893510431399, -0.458779365623048],
-                 [-0.065974882190488193, 1.0318305792233899],
-                 [0.86060405291382602, -0.57305121360034506],
-                 [0.065974882190488901, 1.0318305792233899],
-                 [-0.92657893510431399, -0.458779365623047],
-                 [-0.372465287785125, -0.30895554368016498],
-                 [0.45379599335961801, -0.168086629409717],
-                 [-0.081330705574492998, 0.477042173089883],
-                 [0.372465287785125, -0.30895554368016498],
-                 [0.0813307055744934, 0.477042173089883],
-                 [-0.45379599335961901, -0.168086629409717],
-                 [-0.25224760836480198, -0.31414513744457001],
-                 [0.39818147368475298, -0.061380268165501399],
-                 [-0.14593386531995101, 0.37552540561007203],
-                 [0.25224760836480198, -0.31414513744457001],
-                 [0.14593386531995101, 0.37552540561007203],
-                 [-0.39818147368475298, -0.061380268165501101],
-                 [-0.77250795122178395, -0.57323223918730304],
-                 [0.88268765701533403, -0.38239539078988399],
-                 [-0.11017970579354899, 0.95562762997718698],
-                 [0.77250795122178395, -0.57323223918730304],
-                 [0.11017970579355001, 0.95562762997718698],
-                 [-0.88268765701533403, -0.38239539078988299],
-                 [-0.97281903597154695, -0.57206883390058005],
-                 [0.98183566085701601, -0.55645158148615703],
-                 [-0.0090166248854688397, 1.1285204153867401],
-                 [0.97281903597154695, -0.57206883390058005],
-                 [0.0090166248854697296, 1.1285204153867401],
-                 [-0.98183566085701601, -0.55645158148615603],
-                 [-0.20361834007684201, -0.55123879656195296],
-                 [0.57919597141263501, 0.099280743098012603],
-                 [-0.37557763133579197, 0.45195805346394102],
-                 [0.20361834007684201, -0.55123879656195296],
-                 [0.37557763133579303, 0.45195805346394102],
-                 [-0.57919597141263401, 0.099280743098013005],
-                 [-0.14229399114449101, -0.57235407491813595],
-                 [0.566820164410893, 0.16294682632206101],
-                 [-0.42452617326640202, 0.40940724859607502],
-                 [0.14229399114449101, -0.57235407491813595],
-                 [0.42452617326640202, 0.40940724859607502],
-                 [-0.566820164410893, 0.16294682632206101],
-                 [-0.21178007912397201, -0.122271285691225],
-                 [0.21178007912397201, -0.122271285691225],
-                 [0.0, 0.244542571382451],
-                 [-0.071543818078714905, -0.39589172778650999],
-                 [0.37862420245058898, 0.13598709995335601],
-                 [-0.30708038437187402, 0.25990462783315499],
-                 [0.071543818078714905, -0.39589172778650999],
-                 [0.30708038437187402, 0.25990462783315499],
-                 [-0.37862420245058898, 0.13598709995335601],
-                 [0.0, -0.57251313359481404],
-                 [0.49581091769334301, 0.28625656679740702],
-                 [-0.49581091769334301, 0.28625656679740702],
-                 [-0.34072584339074102, -0.55166089418268205],
-                 [0.64811527033201199, -0.019246789010918398],
-                 [-0.30738942694127103, 0.57090768319360097],
-                 [0.34072584339074102, -0.55166089418268205],
-                 [0.30738942694127203, 0.57090768319360097],
-                 [-0.64811527033201199, -0.019246789010917899],
-                 [-0.25420500317361, -0.513705727001739],
-                 [0.57198471123986405, 0.036704872983418999],
-                 [-0.317779708066254, 0.47700085401831999],
-                 [0.25420500317361, -0.513705727001739],
-                 [0.317779708066254, 0.47700085401831999],
-                 [-0.57198471123986405, 0.036704872983419498],
-                 [-0.13311178834618601, -0.22603324747774101],
-                 [0.262306428588712, -0.0022615665121040701],
-                 [-0.129194640242525, 0.228294813989846],
-                 [0.13311178834618601, -0.22603324747774101],
-                 [0.129194640242525, 0.228294813989845],
-                 [-0.262306428588712, -0.0022615665121038498],
-                 [-0.428351204140759, -0.46374623851729502],
-                 [0.615791625535834, -0.139089905268904],
-                 [-0.187440421395075, 0.60283614378619899],
-                 [0.428351204140759, -0.46374623851729502],
-                 [0.187440421395076, 0.60283614378619899],
-                 [-0.615791625535834, -0.139089905268903],
-                 [-0.28308678232916801, -0.57244266277975997],
-                 [0.63729327934186497, 0.041060986417225102],
-                 [-0.35420649701269702, 0.53138167636253597],
-                 [0.28308678232916801, -0.57244266277975997],
-                 [0.35420649701269702, 0.53138167636253597],
-                 [-0.63729327934186497, 0.041060986417225401],
-                 [-0.38982610581001498, -0.51490548014106796],
-                 [0.64083427925499603, -0.080146570619299501],
-                 [-0.251008173444981, 0.59505205076036805],
-                 [0.38982610581001498, -0.51490548014106796],
-                 [0.251008173444981, 0.59505205076036805],
-                 [-0.64083427925499603, -0.080146570619299001],
-                 [-0.71358109961060001, -0.55283101652347999],
-                 [0.83555625411460899, -0.34156385166147402],
-                 [-0.121975154504008, 0.89439486818495495],
-                 [0.71358109961060001, -0.55283101652347999],
-                 [0.121975154504009, 0.89439486818495495],
-                 [-0.83555625411460899, -0.34156385166147302],
-                 [-0.67177893900431696, -0.46689252269607201],
-                 [0.740230254993959, -0.34833136555706001],
-                 [-0.068451315989641895, 0.81522388825313197],
-                 [0.67177893900431696, -0.46689252269607201],
-                 [0.068451315989642506, 0.81522388825313197],
-                 [-0.74023025499396, -0.34833136555705901],
-                 [-0.75059812077502197, -0.51923400712748302],
-                 [0.82496890106870202, -0.39042003706028799],
-                 [-0.074370780293678898, 0.90965404418777196],
-                 [0.75059812077502197, -0.51923400712748302],
-                 [0.074370780293679495, 0.90965404418777196],
-                 [-0.82496890106870202, -0.39042003706028799],
-                 [-0.59464715111368405, -0.40487430456712198],
-                 [0.647955008651528, -0.31254238686893299],
-                 [-0.053307857537843499, 0.71741669143605602],
-                 [0.59464715111368405, -0.40487430456712198],
-                 [0.053307857537844103, 0.71741669143605602],
-                 [-0.647955008651528, -0.31254238686893299],
-                 [-0.55914730411574698, -0.46537465321601301],
-                 [0.682599924020315, -0.25154844321381398],
-                 [-0.123452619904567, 0.71692309642982799],
-                 [0.55914730411574698, -0.46537465321601301],
-                 [0.123452619904568, 0.71692309642982799],
-                 [-0.682599924020315, -0.25154844321381298],
-                 [-0.47513641482741598, -0.55154491728129496],
-                 [0.715220117107496, -0.135707746862956],
-                 [-0.24008370228008, 0.68725266414425101],
-                 [0.47513641482741598, -0.55154491728129496],
-                 [0.24008370228008, 0.68725266414425101],
-                 [-0.715220117107496, -0.135707746862956],
-                 [-0.55098939175943096, -0.57240622147657905],
-                 [0.77121302496269495, -0.19096769974111399],
-                 [-0.22022363320326399, 0.76337392121769299],
-                 [0.55098939175943096, -0.57240622147657905],
-                 [0.22022363320326399, 0.76337392121769299],
-                 [-0.77121302496269495, -0.190967699741113],
-                 [0.0, -0.229438508053707],
-                 [0.198699576580911, 0.114719254026854],
-                 [-0.198699576580911, 0.114719254026854],
-                 [-0.66906775613675296, -0.57244722857070496],
-                 [0.83028772033660403, -0.29320605938212801],
-                 [-0.16121996419985099, 0.86565328795283303],
-                 [0.66906775613675296, -0.57244722857070496],
-                 [0.16121996419985099, 0.86565328795283303],
-                 [-0.83028772033660403, -0.29320605938212702],
-                 [-0.42086181836543402, -0.572438265250372],
-                 [0.70617698898783399, -0.078257893562192204],
-                 [-0.28531517062239897, 0.65069615881256404],
-                 [0.42086181836543402, -0.572438265250372],
-                 [0.28531517062240003, 0.65069615881256404],
-                 [-0.70617698898783399, -0.078257893562191802],
-                 [-0.21245173597369901, -0.39438908961583802],
-                 [0.447776838569583, 0.0132059443765915],
-                 [-0.23532510259588399, 0.38118314523924701],
-                 [0.21245173597369901, -0.39438908961583802],
-                 [0.23532510259588399, 0.38118314523924701],
-                 [-0.447776838569583, 0.0132059443765918],
-                 [-0.25800420807868601, -0.221571625367288],
-                 [0.32088876036522301, -0.112652385795784],
-                 [-0.062884552286537096, 0.33422401116307199],
-                 [0.25800420807868601, -0.221571625367288],
-                 [0.062884552286537304, 0.33422401116307199],
-                 [-0.32088876036522301, -0.112652385795784],
-                 [-0.29370336187542401, -0.460473851754782],
-                 [0.54563373433582296, -0.0241176466836205],
-                 [-0.25193037246039801, 0.48459149843840299],
-                 [0.29370336187542401, -0.460473851754782],
-                 [0.25193037246039901, 0.48459149843840299],
-                 [-0.54563373433582296, -0.024117646683620202],
-                 [-0.60047596226514399, -0.55148536852211305],
-                 [0.77783832008814402, -0.244284753422464],
-                 [-0.177362357823, 0.79577012194457797],
-                 [0.60047596226514399, -0.55148536852211305],
-                 [0.177362357823001, 0.79577012194457697],
-                 [-0.77783832008814502, -0.244284753422464],
-                 [-0.64378659978871, -0.51606114317066698],
-                 [0.76881535978619098, -0.29950497844769502],
-                 [-0.125028759997481, 0.81556612161836195],
-                 [0.64378659978871, -0.51606114317066698],
-                 [0.125028759997481, 0.81556612161836195],
-                 [-0.76881535978619098, -0.29950497844769403],
-                 [-0.52124100620529901, -0.514559970529609],
-                 [0.70624250935186295, -0.19412796760314599],
-                 [-0.18500150314656399, 0.70868793813275599],
-                 [0.52124100620529901, -0.514559970529609],
-                 [0.18500150314656399, 0.70868793813275599],
-                 [-0.70624250935186295, -0.19412796760314599],
-                 [-0.35101185488933601, -0.39271417796087899],
-                 [0.51560638198511199, -0.107628094383222],
-                 [-0.16459452709577599, 0.500342272344102],
-                 [0.35101185488933601, -0.39271417796087899],
-                 [0.16459452709577599, 0.500342272344101],
-                 [-0.51560638198511199, -0.107628094383222],
-                 [-0.148783469746785, -0.462048153288455],
-                 [0.47453717339287999, 0.102173812180319],
-                 [-0.32575370364609602, 0.35987434110813699],
-                 [0.148783469746785, -0.462048153288455],
-                 [0.32575370364609602, 0.35987434110813699],
-                 [-0.47453717339287999, 0.102173812180319],
-                 [0.0, -0.46220719577895802],
-                 [0.40028317335654501, 0.23110359788947901],
-                 [-0.40028317335654501, 0.23110359788947901],
-                 [-0.69071354327190804, -0.39878365014095701],
-                 [0.69071354327190804, -0.39878365014095601],
-                 [0.0, 0.79756730028191303]],
-      'weights': [9.0429200282174401e-05,
-                  9.0429200282174401e-05,
-                  9.0429200282174401e-05,
-                  0.0111600704368364,
-                  0.0111600704368364,
-                  0.0111600704368364,
-                  0.0097795118038650694,
-                  0.0097795118038650694,
-                  0.0097795118038650694,
-                  0.0016396181780284,
-                  0.0016396181780284,
-                  0.0016396181780284,
-                  0.0016396181780284,
-                  0.0016396181780284,
-                  0.0016396181780284,
-                  0.0018668707488435901,
-                  0.0018668707488435901,
-                  0.0018668707488435901,
-                  0.0018668707488435901,
-                  0.0018668707488435901,
-                  0.0018668707488435901,
-                  0.00095877916032083895,
-                  0.00095877916032083895,
-                  0.00095877916032083895,
-                  0.00095877916032083895,
-                  0.00095877916032083895,
-                  0.00095877916032083895,
-                  0.0064860468854307397,
-                  0.0064860468854307397,
-                  0.0064860468854307397,
-                  0.0064860468854307397,
-                  0.0064860468854307397,
-                  0.0064860468854307397,
-                  0.0070559232878514098,
-                  0.0070559232878514098,
-                  0.0070559232878514098,
-                  0.0070559232878514098,
-                  0.0070559232878514098,
-                  0.0070559232878514098,
-                  0.0051530361783987096,
-                  0.0051530361783987096,
-                  0.0051530361783987096,
-                  0.00309821379866219,
-                  0.00309821379866219,
-                  0.00309821379866219,
-                  0.00309821379866219,
-                  0.00309821379866219,
-                  0.00309821379866219,
-                  0.0017864800506479199,
-                  0.0017864800506479199,
-                  0.0017864800506479199,
-                  0.0017864800506479199,
-                  0.0017864800506479199,
-                  0.0017864800506479199,
-                  0.0043859116440376801,
-                  0.0043859116440376801,
-                  0.0043859116440376801,
-                  0.0043859116440376801,
-                  0.0043859116440376801,
-                  0.0043859116440376801,
-                  0.0039014073052849501,
-                  0.0039014073052849501,
-                  0.0039014073052849501,
-                  0.0039014073052849501,
-                  0.0039014073052849501,
-                  0.0039014073052849501,
-                  0.00048815688414163301,
-                  0.00048815688414163301,
-                  0.00048815688414163301,
-                  0.00048815688414163301,
-                  0.00048815688414163301,
-                  0.00048815688414163301,
-                  0.0105817445590238,
-                  0.0105817445590238,
-                  0.0105817445590238,
-                  0.0105817445590238,
-                  0.0105817445590238,
-                  0.0105817445590238,
-                  0.0073524790818396196,
-                  0.0073524790818396196,
-                  0.0073524790818396196,
-                  0.0057313062656866197,
-                  0.0057313062656866197,
-                  0.0057313062656866197,
-                  0.0057313062656866197,
-                  0.0057313062656866197,
-                  0.0057313062656866197,
-                  0.00129962765091248,
-                  0.00129962765091248,
-                  0.00129962765091248,
-                  0.00129962765091248,
-                  0.00129962765091248,
-                  0.00129962765091248,
-                  0.0087230438396526892,
-                  0.0087230438396526892,
-                  0.0087230438396526892,
-                  0.010409799385039,
-                  0.010409799385039,
-                  0.010409799385039,
-                  0.0107796940009142,
-                  0.0107796940009142,
-                  0.0107796940009142,
-                  0.0107796940009142,
-                  0.0107796940009142,
-                  0.0107796940009142,
-                  0.0105260693919956,
-                  0.0105260693919956,
-                  0.0105260693919956,
-                  0.00084943386568900195,
-                  0.00084943386568900195,
-                  0.00084943386568900195,
-                  0.00084943386568900195,
-                  0.00084943386568900195,
-                  0.00084943386568900195,
-                  0.010202895157514,
-                  0.010202895157514,
-                  0.010202895157514,
-                  0.010202895157514,
-                  0.010202895157514,
-                  0.010202895157514,
-                  0.0108047409900231,
-                  0.0108047409900231,
-                  0.0108047409900231,
-                  0.0108047409900231,
-                  0.0108047409900231,
-                  0.0108047409900231,
-                  0.0010200362233393301,
-                  0.0010200362233393301,
-                  0.0010200362233393301,
-                  0.0010200362233393301,
-                  0.0010200362233393301,
-                  0.0010200362233393301,
-                  0.00041404945067455198,
-                  0.00041404945067455198,
-                  0.00041404945067455198,
-                  0.00041404945067455198,
-                  0.00041404945067455198,
-                  0.00041404945067455198,
-                  0.0040497664669853703,
-                  0.0040497664669853703,
-                  0.0040497664669853703,
-                  0.0040497664669853703,
-                  0.0040497664669853703,
-                  0.0040497664669853703,
-                  0.00181074302129102,
-                  0.00181074302129102,
-                  0.00181074302129102,
-                  0.00181074302129102,
-                  0.00181074302129102,
-                  0.00181074302129102,
-                  0.011721030662929999,
-                  0.011721030662929999,
-                  0.011721030662929999,
-                  0.0103753119033225,
-                  0.0103753119033225,
-                  0.0103753119033225,
-                  0.0103753119033225,
-                  0.0103753119033225,
-                  0.0103753119033225,
-                  0.0017729964372186499,
-                  0.0017729964372186499,
-                  0.0017729964372186499,
-                  0.00396336454553501,
-                  0.00396336454553501,
-                  0.00396336454553501,
-                  0.00396336454553501,
-                  0.00396336454553501,
-                  0.00396336454553501,
-                  0.0062535470220245297,
-                  0.0062535470220245297,
-                  0.0062535470220245297,
-                  0.0062535470220245297,
-                  0.0062535470220245297,
-                  0.0062535470220245297,
-                  0.0122259539576517,
-                  0.0122259539576517,
-                  0.0122259539576517,
-                  0.0122259539576517,
-                  0.0122259539576517,
-                  0.0122259539576517,
-                  0.0075838755212646498,
-                  0.0075838755212646498,
-                  0.0075838755212646498,
-                  0.0075838755212646498,
-                  0.0075838755212646498,
-                  0.0075838755212646498,
-                  0.00176173531602917,
-                  0.00176173531602917,
-                  0.00176173531602917,
-                  0.00176173531602917,
-                  0.00176173531602917,
-                  0.00176173531602917,
-                  0.0059850747615838402,
-                  0.0059850747615838402,
-                  0.0059850747615838402,
-                  0.0059850747615838402,
-                  0.0059850747615838402,
-                  0.0059850747615838402,
-                  0.0028797410000533301,
-                  0.0028797410000533301,
-                  0.0028797410000533301,
-                  0.0028797410000533301,
-                  0.0028797410000533301,
-                  0.0028797410000533301,
-                  0.0058043978362951696,
-                  0.0058043978362951696,
-                  0.0058043978362951696,
-                  0.0058043978362951696,
-                  0.0058043978362951696,
-                  0.0058043978362951696,
-                  0.0041336512302708297,
-                  0.0041336512302708297,
-                  0.0041336512302708297,
-                  0.0041336512302708297,
-                  0.0041336512302708297,
-                  0.0041336512302708297,
-                  0.0072319685570242202,
-                  0.0072319685570242202,
-                  0.0072319685570242202,
-                  0.0072319685570242202,
-                  0.0072319685570242202,
-                  0.0072319685570242202,
-                  0.0067049791004275099,
-                  0.0067049791004275099,
-                  0.0067049791004275099,
-                  0.0067049791004275099,
-                  0.0067049791004275099,
-                  0.0067049791004275099,
-                  0.0037972428749727298,
-                  0.0037972428749727298,
-                  0.0037972428749727298,
-                  0.0037972428749727298,
-                  0.0037972428749727298,
-                  0.0037972428749727298,
-                  0.00158089878056633,
-                  0.00158089878056633,
-                  0.00158089878056633,
-                  0.00158089878056633,
-                  0.00158089878056633,
-                  0.00158089878056633,
-                  0.012522917401770599,
-                  0.012522917401770599,
-                  0.012522917401770599,
-                  0.0013905504084066999,
-                  0.0013905504084066999,
-                  0.0013905504084066999,
-                  0.0013905504084066999,
-                  0.0013905504084066999,
-                  0.0013905504084066999,
-                  0.0016963005888145899,
-                  0.0016963005888145899,
-                  0.0016963005888145899,
-                  0.0016963005888145899,
-                  0.0016963005888145899,
-                  0.0016963005888145899,
-                  0.010314512833338899,
-                  0.010314512833338899,
-                  0.010314512833338899,
-                  0.010314512833338899,
-                  0.010314512833338899,
-                  0.010314512833338899,
-                  0.011695699645547,
-                  0.011695699645547,
-                  0.011695699645547,
-                  0.011695699645547,
-                  0.011695699645547,
-                  0.011695699645547,
-                  0.0085436430386868004,
-                  0.0085436430386868004,
-                  0.0085436430386868004,
-                  0.0085436430386868004,
-                  0.0085436430386868004,
-                  0.0085436430386868004,
-                  0.00346326524875541,
-                  0.00346326524875541,
-                  0.00346326524875541,
-                  0.00346326524875541,
-                  0.00346326524875541,
-                  0.00346326524875541,
-                  0.0049504954710409502,
-                  0.0049504954710409502,
-                  0.0049504954710409502,
-                  0.0049504954710409502,
-                  0.0049504954710409502,
-                  0.0049504954710409502,
-                  0.0056419527681549602,
-                  0.0056419527681549602,
-                  0.0056419527681549602,
-                  0.0056419527681549602,
-                  0.0056419527681549602,
-                  0.0056419527681549602,
-                  0.010171090188655999,
-                  0.010171090188655999,
-                  0.010171090188655999,
-                  0.010171090188655999,
-                  0.010171090188655999,
-                  0.010171090188655999,
-                  0.0088249347396200696,
-                  0.0088249347396200696,
-                  0.0088249347396200696,
-                  0.0088249347396200696,
-                  0.0088249347396200696,
-                  0.0088249347396200696,
-                  0.0088921242427831507,
-                  0.0088921242427831507,
-                  0.0088921242427831507,
-                  0.0068754952603232297,
-                  0.0068754952603232297,
-                  0.0068754952603232297]},
- 42: {'points': [[0.0, -0.23915669727967101],
-                 [0.20711577532938, 0.119578348639836],
-                 [-0.20711577532938, 0.119578348639836],
-                 [-0.99590382227213703, -0.57498533987579603],
-                 [0.99590382227213703, -0.57498533987579603],
-                 [0.0, 1.1499706797515901],
-                 [-0.33732186702983102, -0.57463021225838495],
-                 [0.66630529511272096, -0.0048141999706371504],
-                 [-0.32898342808288999, 0.57944441222902299],
-                 [0.33732186702983102, -0.57463021225838495],
-                 [0.32898342808288999, 0.57944441222902299],
-                 [-0.66630529511272096, -0.0048141999706367003],
-                 [0.0, -0.568799929797703],
-                 [0.49259518887561599, 0.284399964898852],
-                 [-0.49259518887561599, 0.284399964898852],
-                 [-0.94952259941407702, -0.56069717377459205],
-                 [0.96033929602597301, -0.54196210567272995],
-                 [-0.0108166966118961, 1.10265927944732],
-                 [0.94952259941407702, -0.56069717377459205],
-                 [0.010816696611896799, 1.10265927944732],
-                 [-0.96033929602597301, -0.54196210567272896],
-                 [-0.86369982899641895, -0.539412192800793],
-                 [0.898994576574766, -0.478279896754778],
-                 [-0.0352947475783459, 1.0176920895555699],
-                 [0.86369982899641895, -0.539412192800793],
-                 [0.035294747578346698, 1.0176920895555699],
-                 [-0.898994576574766, -0.478279896754778],
-                 [0.0, -0.50772285124871797],
-                 [0.43970088726325801, 0.25386142562435898],
-                 [-0.43970088726325701, 0.25386142562435898],
-                 [-0.80060101283264895, -0.46222721027241698],
-                 [0.80060101283264895, -0.46222721027241698],
-                 [0.0, 0.92445442054483395],
-                 [-0.091964505433817803, -0.57476336247113202],
-                 [0.54374192578147296, 0.20773808328340801],
-                 [-0.451777420347655, 0.36702527918772498],
-                 [0.091964505433817803, -0.57476336247113202],
-                 [0.451777420347655, 0.36702527918772498],
-                 [-0.54374192578147196, 0.20773808328340801],
-                 [-0.66309355251219504, -0.48132277490581299],
-                 [0.74838452674455103, -0.33359447410832499],
-                 [-0.085290974232355501, 0.81491724901413798],
-                 [0.66309355251219504, -0.48132277490581299],
-                 [0.085290974232356001, 0.81491724901413798],
-                 [-0.74838452674455103, -0.33359447410832399],
-                 [-0.51372916997472295, -0.37176697642006601],
-                 [0.57882423085526902, -0.25901902365317098],
-                 [-0.065095060880545702, 0.63078600007323704],
-                 [0.51372916997472295, -0.37176697642006601],
-                 [0.065095060880546299, 0.63078600007323704],
-                 [-0.57882423085526902, -0.25901902365317098],
-                 [-0.87029083183676104, -0.50246264603421797],
-                 [0.87029083183676104, -0.50246264603421698],
-                 [0.0, 1.0049252920684399],
-                 [-0.93438263780905795, -0.57493742331160902],
-                 [0.96510173307875002, -0.52173038954195405],
-                 [-0.030719095269691198, 1.0966678128535601],
-                 [0.93438263780905795, -0.57493742331160902],
-                 [0.0307190952696921, 1.0966678128535601],
-                 [-0.96510173307875002, -0.52173038954195305],
-                 [0.0, -0.54376585322681203],
-                 [0.47091504260493999, 0.27188292661340602],
-                 [-0.47091504260493999, 0.27188292661340702],
-                 [-0.90377238041680596, -0.55951105488338204],
-                 [0.93643697743564103, -0.50293431323799698],
-                 [-0.032664597018834202, 1.0624453681213799],
-                 [0.90377238041680596, -0.55951105488338204],
-                 [0.032664597018835097, 1.0624453681213799],
-                 [-0.93643697743564103, -0.50293431323799698],
-                 [-0.97636560454756205, -0.57287342016015197],
-                 [0.98430573728534898, -0.55912070683946402],
-                 [-0.0079401327377863797, 1.1319941269996201],
-                 [0.97636560454756205, -0.57287342016015197],
-                 [0.0079401327377870406, 1.1319941269996201],
-                 [-0.98430573728534898, -0.55912070683946402],
-                 [-0.80976763015790199, -0.50897875397137904],
-                 [0.84567234600471397, -0.446789961893376],
-                 [-0.035904715846812402, 0.95576871586475398],
-                 [0.80976763015790199, -0.50897875397137904],
-                 [0.035904715846812901, 0.95576871586475398],
-                 [-0.84567234600471497, -0.446789961893375],
-                 [-0.11503943729553499, -0.55605671624505304],
-                 [0.53907896086093898, 0.178401282987526],
-                 [-0.42403952356540298, 0.37765543325752798],
-                 [0.11503943729553499, -0.55605671624505304],
-                 [0.42403952356540398, 0.37765543325752798],
-                 [-0.53907896086093898, 0.178401282987527],
-                 [-0.45642869772220002, -0.57286458799044504],
-                 [0.72432963498933201, -0.10884655324845099],
-                 [-0.26790093726713099, 0.68171114123889698],
-                 [0.45642869772220002, -0.57286458799044504],
-                 [0.26790093726713099, 0.68171114123889698],
-                 [-0.72432963498933201, -0.10884655324845099],
-                 [-0.260816324365508, -0.51230069551399304],
-                 [0.57407357887430899, 0.030276785134784202],
-                 [-0.31325725450879999, 0.48202391037921],
-                 [0.260816324365508, -0.51230069551399304],
-                 [0.31325725450880099, 0.482023910379209],
-                 [-0.57407357887430899, 0.0302767851347845],
-                 [-0.23737442933070799, -0.54774164573700101],
-                 [0.59304539458429295, 0.068298536859273007],
-                 [-0.35567096525358499, 0.47944310887772801],
-                 [0.23737442933070901, -0.54774164573700101],
-                 [0.35567096525358499, 0.47944310887772801],
-                 [-0.59304539458429295, 0.068298536859273298],
-                 [-0.480026979179001, -0.42881250819630901],
-                 [0.61137601514802697, -0.20130930437276401],
-                 [-0.131349035969025, 0.63012181256907396],
-                 [0.480026979179001, -0.42881250819630901],
-                 [0.131349035969026, 0.63012181256907396],
-                 [-0.61137601514802697, -0.20130930437276401],
-                 [-0.55650162501787404, -0.47691618600212898],
-                 [0.69127234506276503, -0.24348645151173601],
-                 [-0.13477072004489099, 0.72040263751386602],
-                 [0.55650162501787404, -0.47691618600212898],
-                 [0.13477072004489199, 0.72040263751386602],
-                 [-0.69127234506276503, -0.24348645151173501],
-                 [-0.124781765744177, -0.51872351401291195],
-                 [0.51161862354760301, 0.15129757794292001],
-                 [-0.38683685780342603, 0.36742593606999202],
-                 [0.124781765744177, -0.51872351401291195],
-                 [0.38683685780342603, 0.36742593606999202],
-                 [-0.51161862354760301, 0.15129757794292001],
-                 [-0.91900353211487995, -0.53058693665274304],
-                 [0.91900353211487995, -0.53058693665274304],
-                 [0.0, 1.0611738733054901],
-                 [-0.57250293774060901, -0.57297391133539799],
-                 [0.78246143179249195, -0.20931513215688999],
-                 [-0.20995849405188199, 0.78228904349228801],
-                 [0.57250293774060901, -0.57297391133539799],
-                 [0.20995849405188299, 0.78228904349228801],
-                 [-0.78246143179249195, -0.20931513215688899],
-                 [-0.35082904042609803, -0.558892596812534],
-                 [0.65942970703975701, -0.024380562988051101],
-                 [-0.30860066661365898, 0.58327315980058603],
-                 [0.35082904042609803, -0.558892596812534],
-                 [0.30860066661365998, 0.58327315980058603],
-                 [-0.65942970703975701, -0.024380562988050601],
-                 [-0.584485579269031, -0.33745290652843002],
-                 [0.584485579269031, -0.33745290652842902],
-                 [-1.11022302462516e-16, 0.67490581305685904],
-                 [0.0, -0.46308066751251398],
-                 [0.40103962206729199, 0.23154033375625699],
-                 [-0.40103962206729199, 0.23154033375625699],
-                 [-0.48329385573259598, -0.55408939280498604],
-                 [0.72150241800291004, -0.14150006015486699],
-                 [-0.23820856227031401, 0.69558945295985297],
-                 [0.48329385573259598, -0.55408939280498604],
-                 [0.23820856227031401, 0.69558945295985297],
-                 [-0.72150241800291004, -0.14150006015486599],
-                 [-0.60723425879311599, -0.424337820754705],
-                 [0.67110446195666096, -0.31371138378570002],
-                 [-0.063870203163543998, 0.73804920454040601],
-                 [0.60723425879311599, -0.424337820754705],
-                 [0.063870203163544498, 0.73804920454040601],
-                 [-0.67110446195666096, -0.31371138378570002],
-                 [-0.74479369220077296, -0.52032748775510695],
-                 [0.82301366878364501, -0.38484651414672399],
-                 [-0.078219976582872205, 0.90517400190183095],
-                 [0.74479369220077296, -0.52032748775510695],
-                 [0.078219976582872802, 0.90517400190183095],
-                 [-0.82301366878364501, -0.384846514146723],
-                 [-0.088899121520171806, -0.239945454170224],
-                 [0.252248419594094, 0.042983829474523401],
-                 [-0.16334929807392301, 0.196961624695701],
-                 [0.088899121520171806, -0.239945454170224],
-                 [0.16334929807392301, 0.196961624695701],
-                 [-0.252248419594094, 0.042983829474523498],
-                 [-0.64093927012580798, -0.52285819108589404],
-                 [0.77327811112006595, -0.29364059466905901],
-                 [-0.13233884099425799, 0.81649878575495405],
-                 [0.64093927012580798, -0.52285819108589404],
-                 [0.13233884099425899, 0.81649878575495405],
-                 [-0.77327811112006695, -0.29364059466905901],
-                 [-0.72840614316212504, -0.46066493316460799],
-                 [0.76315060633427401, -0.400485757668741],
-                 [-0.034744463172148098, 0.86115069083335005],
-                 [0.72840614316212504, -0.46066493316460799],
-                 [0.034744463172148701, 0.86115069083335005],
-                 [-0.76315060633427401, -0.400485757668741],
-                 [-0.34632334976132401, -0.25420978730877802],
-                 [0.39331380858070297, -0.172819925162641],
-                 [-0.046990458819378703, 0.42702971247142002],
-                 [0.34632334976132401, -0.25420978730877802],
-                 [0.046990458819379001, 0.42702971247142002],
-                 [-0.39331380858070297, -0.172819925162641],
-                 [-0.29328359092418199, -0.46670083015487401],
-                 [0.55081657034349796, -0.020640625176028],
-                 [-0.25753297941931602, 0.48734145533090201],
-                 [0.29328359092418199, -0.46670083015487401],
-                 [0.25753297941931602, 0.48734145533090201],
-                 [-0.55081657034349796, -0.020640625176027501],
-                 [-0.52075640841362503, -0.52093525817617803],
-                 [0.71152137151438799, -0.190520649781655],
-                 [-0.19076496310076299, 0.71145590795783298],
-                 [0.52075640841362503, -0.52093525817617803],
-                 [0.19076496310076299, 0.71145590795783298],
-                 [-0.71152137151438799, -0.19052064978165401],
-                 [-0.60555027935120198, -0.55435992266257095],
-                 [0.78286491554136395, -0.247241963855618],
-                 [-0.17731463619016199, 0.80160188651818998],
-                 [0.60555027935120198, -0.55435992266257095],
-                 [0.17731463619016299, 0.80160188651818998],
-                 [-0.78286491554136395, -0.247241963855618],
-                 [-0.40905454399991298, -0.34138644830088299],
-                 [0.50017660873626402, -0.183558402486942],
-                 [-0.091122064736351205, 0.52494485078782605],
-                 [0.40905454399991298, -0.34138644830088299],
-                 [0.091122064736351496, 0.52494485078782605],
-                 [-0.50017660873626402, -0.183558402486942],
-                 [-0.680258722423423, -0.39274755650975501],
-                 [0.680258722423423, -0.39274755650975401],
-                 [0.0, 0.78549511301950903],
-                 [-0.68384877689179102, -0.57282030241995596],
-                 [0.83800132214506196, -0.30582026192522999],
-                 [-0.15415254525327099, 0.878640564345186],
-                 [0.68384877689179102, -0.57282030241995596],
-                 [0.15415254525327099, 0.878640564345185],
-                 [-0.83800132214506196, -0.30582026192522899],
-                 [-0.71845211882128601, -0.55400012643472696],
-                 [0.83900424260290796, -0.34519772308462598],
-                 [-0.120552123781621, 0.899197849519354],
-                 [0.71845211882128601, -0.55400012643472696],
-                 [0.120552123781622, 0.899197849519354],
-                 [-0.83900424260290796, -0.34519772308462598],
-                 [-0.216673544156887, -0.24499725128675601],
-                 [0.32051061555013399, -0.065146167924494805],
-                 [-0.10383707139324699, 0.31014341921125199],
-                 [0.216673544156887, -0.24499725128675601],
-                 [0.10383707139324699, 0.31014341921125099],
-                 [-0.32051061555013399, -0.0651461679244945],
-                 [-0.784014174741829, -0.57293824798152104],
-                 [0.88818616492266, -0.392507068262756],
-                 [-0.10417199018083, 0.96544531624427699],
-                 [0.784014174741829, -0.57293824798152104],
-                 [0.104171990180831, 0.96544531624427699],
-                 [-0.88818616492266, -0.392507068262755],
-                 [-0.073829866676407202, -0.40234854190615799],
-                 [0.38535899180456401, 0.13723573085329199],
-                 [-0.311529125128157, 0.26511281105286599],
-                 [0.073829866676407202, -0.40234854190615799],
-                 [0.311529125128157, 0.26511281105286599],
-                 [-0.38535899180456401, 0.13723573085329199],
-                 [-0.13454529284893901, -0.14476929626336199],
-                 [0.192646534676536, -0.044134993435117099],
-                 [-0.058101241827597301, 0.188904289698479],
-                 [0.13454529284893901, -0.14476929626336199],
-                 [0.058101241827597502, 0.188904289698479],
-                 [-0.192646534676536, -0.044134993435116801],
-                 [-0.81224627731204901, -0.55359930548468905],
-                 [0.88555420072318702, -0.426626257539229],
-                 [-0.073307923411138204, 0.98022556302391906],
-                 [0.81224627731204901, -0.55359930548468905],
-                 [0.073307923411138898, 0.98022556302391906],
-                 [-0.88555420072318702, -0.426626257539229],
-                 [-0.21779874120415799, -0.57155725996821005],
-                 [0.60388247745197499, 0.097159387189031596],
-                 [-0.386083736247817, 0.474397872779179],
-                 [0.21779874120415799, -0.57155725996821005],
-                 [0.386083736247817, 0.474397872779179],
-                 [-0.60388247745197499, 0.097159387189031901],
-                 [-0.064793826782237898, -0.037408733334550998],
-                 [0.064793826782237898, -0.0374087333345509],
-                 [0.0, 0.0748174666691023],
-                 [-0.42173742894104099, -0.48091898059119698],
-                 [0.627356768824613, -0.12477583689407699],
-                 [-0.20561933988357201, 0.60569481748527498],
-                 [0.42173742894104099, -0.48091898059119698],
-                 [0.20561933988357201, 0.60569481748527498],
-                 [-0.627356768824613, -0.12477583689407699],
-                 [-0.86724517518683597, -0.57249401685345602],
-                 [0.92941694970310795, -0.46480934459455803],
-                 [-0.062171774516271198, 1.0373033614480101],
-                 [0.86724517518683597, -0.57249401685345602],
-                 [0.062171774516271802, 1.0373033614480101],
-                 [-0.92941694970310795, -0.46480934459455697],
-                 [-0.35974948772649801, -0.41046630772117698],
-                 [0.53534899374738898, -0.106319041508997],
-                 [-0.175599506020891, 0.51678534923017405],
-                 [0.35974948772649801, -0.41046630772117698],
-                 [0.175599506020891, 0.51678534923017405],
-                 [-0.53534899374738898, -0.106319041508997],
-                 [-0.38462016485447098, -0.52677593302205095],
-                 [0.648511422526582, -0.069702867060705595],
-                 [-0.26389125767211002, 0.596478800082757],
-                 [0.38462016485447098, -0.52677593302205095],
-                 [0.26389125767211002, 0.596478800082757],
-                 [-0.648511422526582, -0.069702867060705095],
-                 [-0.14709579616219201, -0.46723591737438702],
-                 [0.47818607208784297, 0.10622926242083799],
-                 [-0.33109027592564999, 0.36100665495355],
-                 [0.14709579616219201, -0.46723591737438702],
-                 [0.33109027592564999, 0.36100665495355],
-                 [-0.47818607208784197, 0.10622926242083799],
-                 [-0.14236698354849101, -0.32805865585485899],
-                 [0.35529062167593001, 0.040735903514275501],
-                 [-0.212923638127439, 0.28732275234058402],
-                 [0.14236698354849101, -0.32805865585485899],
-                 [0.212923638127439, 0.28732275234058402],
-                 [-0.35529062167593001, 0.040735903514275702],
-                 [-0.26541827239335503, -0.153239311014149],
-                 [0.26541827239335503, -0.153239311014149],
-                 [0.0, 0.30647862202829801],
-                 [-0.21806859696894801, -0.40551576066406497],
-                 [0.46022124885452398, 0.0139049355892936],
-                 [-0.242152651885576, 0.39161082507477202],
-                 [0.21806859696894801, -0.40551576066406497],
-                 [0.242152651885577, 0.39161082507477202],
-                 [-0.46022124885452398, 0.0139049355892938],
-                 [-0.28058519641950802, -0.33418952446785699],
-                 [0.42970921607756002, -0.075899145791211597],
-                 [-0.149124019658052, 0.41008867025906898],
-                 [0.28058519641950802, -0.33418952446785699],
-                 [0.149124019658052, 0.41008867025906898],
-                 [-0.42970921607756002, -0.075899145791211403],
-                 [-0.47549456256642803, -0.27452691369593102],
-                 [0.47549456256642803, -0.27452691369593002],
-                 [0.0, 0.54905382739186104],
-                 [0.0, -0.32644308263379701],
-                 [0.28270800245057098, 0.163221541316899],
-                 [-0.28270800245057098, 0.163221541316899],
-                 [0.0, -0.14180931586841899],
-                 [0.122810470035343, 0.070904657934209997],
-                 [-0.122810470035343, 0.070904657934210094]],
-      'weights': [0.0061426142936678403,
-                  0.0061426142936678403,
-                  0.0061426142936678403,
-                  6.0135999391313703e-05,
-                  6.0135999391313703e-05,
-                  6.0135999391313703e-05,
-                  0.00092271836140005604,
-                  0.00092271836140005604,
-                  0.00092271836140005604,
-                  0.00092271836140005604,
-                  0.00092271836140005604,
-                  0.00092271836140005604,
-                  0.00175659334888028,
-                  0.00175659334888028,
-                  0.00175659334888028,
-                  0.00076050371949443597,
-                  0.00076050371949443597,
-                  0.00076050371949443597,
-                  0.00076050371949443597,
-                  0.00076050371949443597,
-                  0.00076050371949443597,
-                  0.00179618006932084,
-                  0.00179618006932084,
-                  0.00179618006932084,
-                  0.00179618006932084,
-                  0.00179618006932084,
-                  0.00179618006932084,
-                  0.00492627458371911,
-                  0.00492627458371911,
-                  0.00492627458371911,
-                  0.0032406350838789901,
-                  0.0032406350838789901,
-                  0.0032406350838789901,
-                  0.00096917240726922401,
-                  0.00096917240726922401,
-                  0.00096917240726922401,
-                  0.00096917240726922401,
-                  0.00096917240726922401,
-                  0.00096917240726922401,
-                  0.0043958072627679297,
-                  0.0043958072627679297,
-                  0.0043958072627679297,
-                  0.0043958072627679297,
-                  0.0043958072627679297,
-                  0.0043958072627679297,
-                  0.0070289354914652201,
-                  0.0070289354914652201,
-                  0.0070289354914652201,
-                  0.0070289354914652201,
-                  0.0070289354914652201,
-                  0.0070289354914652201,
-                  0.00230817420814312,
-                  0.00230817420814312,
-                  0.00230817420814312,
-                  0.00039255645541762599,
-                  0.00039255645541762599,
-                  0.00039255645541762599,
-                  0.00039255645541762599,
-                  0.00039255645541762599,
-                  0.00039255645541762599,
-                  0.00379783607733232,
-                  0.00379783607733232,
-                  0.00379783607733232,
-                  0.0011810046336317699,
-                  0.0011810046336317699,
-                  0.0011810046336317699,
-                  0.0011810046336317699,
-                  0.0011810046336317699,
-                  0.0011810046336317699,
-                  0.00032405470058619398,
-                  0.00032405470058619398,
-                  0.00032405470058619398,
-                  0.00032405470058619398,
-                  0.00032405470058619398,
-                  0.00032405470058619398,
-                  0.0029213282816878301,
-                  0.0029213282816878301,
-                  0.0029213282816878301,
-                  0.0029213282816878301,
-                  0.0029213282816878301,
-                  0.0029213282816878301,
-                  0.00329531291139491,
-                  0.00329531291139491,
-                  0.00329531291139491,
-                  0.00329531291139491,
-                  0.00329531291139491,
-                  0.00329531291139491,
-                  0.0013395109807176301,
-                  0.0013395109807176301,
-                  0.0013395109807176301,
-                  0.0013395109807176301,
-                  0.0013395109807176301,
-                  0.0013395109807176301,
-                  0.0054947370083554903,
-                  0.0054947370083554903,
-                  0.0054947370083554903,
-                  0.0054947370083554903,
-                  0.0054947370083554903,
-                  0.0054947370083554903,
-                  0.0037559949749491001,
-                  0.0037559949749491001,
-                  0.0037559949749491001,
-                  0.0037559949749491001,
-                  0.0037559949749491001,
-                  0.0037559949749491001,
-                  0.0070565784603498797,
-                  0.0070565784603498797,
-                  0.0070565784603498797,
-                  0.0070565784603498797,
-                  0.0070565784603498797,
-                  0.0070565784603498797,
-                  0.0058406295005790001,
-                  0.0058406295005790001,
-                  0.0058406295005790001,
-                  0.0058406295005790001,
-                  0.0058406295005790001,
-                  0.0058406295005790001,
-                  0.0057806596678889599,
-                  0.0057806596678889599,
-                  0.0057806596678889599,
-                  0.0057806596678889599,
-                  0.0057806596678889599,
-                  0.0057806596678889599,
-                  0.0016496155046251001,
-                  0.0016496155046251001,
-                  0.0016496155046251001,
-                  0.0012891662140505,
-                  0.0012891662140505,
-                  0.0012891662140505,
-                  0.0012891662140505,
-                  0.0012891662140505,
-                  0.0012891662140505,
-                  0.0030293666615315001,
-                  0.0030293666615315001,
-                  0.0030293666615315001,
-                  0.0030293666615315001,
-                  0.0030293666615315001,
-                  0.0030293666615315001,
-                  0.00755148178593906,
-                  0.00755148178593906,
-                  0.00755148178593906,
-                  0.00785057615266147,
-                  0.00785057615266147,
-                  0.00785057615266147,
-                  0.003296384356258,
-                  0.003296384356258,
-                  0.003296384356258,
-                  0.003296384356258,
-                  0.003296384356258,
-                  0.003296384356258,
-                  0.0068557073616892696,
-                  0.0068557073616892696,
-                  0.0068557073616892696,
-                  0.0068557073616892696,
-                  0.0068557073616892696,
-                  0.0068557073616892696,
-                  0.0037469974941797099,
-                  0.0037469974941797099,
-                  0.0037469974941797099,
-                  0.0037469974941797099,
-                  0.0037469974941797099,
-                  0.0037469974941797099,
-                  0.010854314496705601,
-                  0.010854314496705601,
-                  0.010854314496705601,
-                  0.010854314496705601,
-                  0.010854314496705601,
-                  0.010854314496705601,
-                  0.0042114312134393702,
-                  0.0042114312134393702,
-                  0.0042114312134393702,
-                  0.0042114312134393702,
-                  0.0042114312134393702,
-                  0.0042114312134393702,
-                  0.0048957768766088403,
-                  0.0048957768766088403,
-                  0.0048957768766088403,
-                  0.0048957768766088403,
-                  0.0048957768766088403,
-                  0.0048957768766088403,
-                  0.011215645979644501,
-                  0.011215645979644501,
-                  0.011215645979644501,
-                  0.011215645979644501,
-                  0.011215645979644501,
-                  0.011215645979644501,
-                  0.0073585874606370196,
-                  0.0073585874606370196,
-                  0.0073585874606370196,
-                  0.0073585874606370196,
-                  0.0073585874606370196,
-                  0.0073585874606370196,
-                  0.0050404166488860896,
-                  0.0050404166488860896,
-                  0.0050404166488860896,
-                  0.0050404166488860896,
-                  0.0050404166488860896,
-                  0.0050404166488860896,
-                  0.0030387001176840102,
-                  0.0030387001176840102,
-                  0.0030387001176840102,
-                  0.0030387001176840102,
-                  0.0030387001176840102,
-                  0.0030387001176840102,
-                  0.0092280451709336707,
-                  0.0092280451709336707,
-                  0.0092280451709336707,
-                  0.0092280451709336707,
-                  0.0092280451709336707,
-                  0.0092280451709336707,
-                  0.0064017821741760303,
-                  0.0064017821741760303,
-                  0.0064017821741760303,
-                  0.00123276207362366,
-                  0.00123276207362366,
-                  0.00123276207362366,
-                  0.00123276207362366,
-                  0.00123276207362366,
-                  0.00123276207362366,
-                  0.0027167556712929699,
-                  0.0027167556712929699,
-                  0.0027167556712929699,
-                  0.0027167556712929699,
-                  0.0027167556712929699,
-                  0.0027167556712929699,
-                  0.0119679232384941,
-                  0.0119679232384941,
-                  0.0119679232384941,
-                  0.0119679232384941,
-                  0.0119679232384941,
-                  0.0119679232384941,
-                  0.0010526831314922301,
-                  0.0010526831314922301,
-                  0.0010526831314922301,
-                  0.0010526831314922301,
-                  0.0010526831314922301,
-                  0.0010526831314922301,
-                  0.010149655007136001,
-                  0.010149655007136001,
-                  0.010149655007136001,
-                  0.010149655007136001,
-                  0.010149655007136001,
-                  0.010149655007136001,
-                  0.0134496967525952,
-                  0.0134496967525952,
-                  0.0134496967525952,
-                  0.0134496967525952,
-                  0.0134496967525952,
-                  0.0134496967525952,
-                  0.0022690572827218001,
-                  0.0022690572827218001,
-                  0.0022690572827218001,
-                  0.0022690572827218001,
-                  0.0022690572827218001,
-                  0.0022690572827218001,
-                  0.00183094614410767,
-                  0.00183094614410767,
-                  0.00183094614410767,
-                  0.00183094614410767,
-                  0.00183094614410767,
-                  0.00183094614410767,
-                  0.0140250001448755,
-                  0.0140250001448755,
-                  0.0140250001448755,
-                  0.0069995596545280297,
-                  0.0069995596545280297,
-                  0.0069995596545280297,
-                  0.0069995596545280297,
-                  0.0069995596545280297,
-                  0.0069995596545280297,
-                  0.00090802398357201397,
-                  0.00090802398357201397,
-                  0.00090802398357201397,
-                  0.00090802398357201397,
-                  0.00090802398357201397,
-                  0.00090802398357201397,
-                  0.0090150958336361608,
-                  0.0090150958336361608,
-                  0.0090150958336361608,
-                  0.0090150958336361608,
-                  0.0090150958336361608,
-                  0.0090150958336361608,
-                  0.0052538493322735599,
-                  0.0052538493322735599,
-                  0.0052538493322735599,
-                  0.0052538493322735599,
-                  0.0052538493322735599,
-                  0.0052538493322735599,
-                  0.0084325800475184998,
-                  0.0084325800475184998,
-                  0.0084325800475184998,
-                  0.0084325800475184998,
-                  0.0084325800475184998,
-                  0.0084325800475184998,
-                  0.0114365108504354,
-                  0.0114365108504354,
-                  0.0114365108504354,
-                  0.0114365108504354,
-                  0.0114365108504354,
-                  0.0114365108504354,
-                  0.0126276914411418,
-                  0.0126276914411418,
-                  0.0126276914411418,
-                  0.0097915199662887593,
-                  0.0097915199662887593,
-                  0.0097915199662887593,
-                  0.0097915199662887593,
-                  0.0097915199662887593,
-                  0.0097915199662887593,
-                  0.0107247356462395,
-                  0.0107247356462395,
-                  0.0107247356462395,
-                  0.0107247356462395,
-                  0.0107247356462395,
-                  0.0107247356462395,
-                  0.010488480053062001,
-                  0.010488480053062001,
-                  0.010488480053062001,
-                  0.0117068355206913,
-                  0.0117068355206913,
-                  0.0117068355206913,
-                  0.013721383706481601,
-                  0.013721383706481601,
-                  0.013721383706481601]},
- 43: {'points': [[0.0, -0.27174781657834601],
-                 [0.23534051257980201, 0.13587390828917301],
-                 [-0.23534051257980099, 0.13587390828917301],
-                 [0.0, -0.49274259095938799],
-                 [0.42672760129739401, 0.246371295479694],
-                 [-0.42672760129739401, 0.246371295479694],
-                 [-0.39506733155766899, -0.32541690542417201],
-                 [0.47935297269708599, -0.17942989262218501],
-                 [-0.084285641139416403, 0.50484679804635701],
-                 [0.39506733155766899, -0.32541690542417201],
-                 [0.084285641139416806, 0.50484679804635701],
-                 [-0.47935297269708599, -0.17942989262218501],
-                 [0.0, -0.57450914029685396],
-                 [0.49753951020343401, 0.28725457014842698],
-                 [-0.49753951020343401, 0.28725457014842798],
-                 [-0.11125603549339, -0.064233702041079296],
-                 [0.11125603549339, -0.064233702041079296],
-                 [0.0, 0.12846740408215901],
-                 [-0.24646837298065399, -0.52120501981219503],
-                 [0.57461097422765905, 0.047154637675433],
-                 [-0.32814260124700501, 0.47405038213676198],
-                 [0.24646837298065399, -0.52120501981219503],
-                 [0.32814260124700501, 0.47405038213676198],
-                 [-0.57461097422765905, 0.0471546376754335],
-                 [-0.79575263644167404, -0.55585048147520899],
-                 [0.87925695588417996, -0.41121675754932802],
-                 [-0.083504319442504901, 0.96706723902453795],
-                 [0.79575263644167404, -0.55585048147520899],
-                 [0.083504319442505595, 0.96706723902453795],
-                 [-0.87925695588417996, -0.41121675754932802],
-                 [-0.48253886188632999, -0.33857300476573998],
-                 [0.53448225410592498, -0.248604410323923],
-                 [-0.051943392219595201, 0.58717741508966304],
-                 [0.48253886188632999, -0.33857300476573998],
-                 [0.051943392219595499, 0.58717741508966304],
-                 [-0.53448225410592598, -0.248604410323922],
-                 [-0.062546966261193507, -0.342941213931792],
-                 [0.32826928640020198, 0.117303345254055],
-                 [-0.26572232013900898, 0.225637868677738],
-                 [0.062546966261193507, -0.342941213931792],
-                 [0.26572232013900898, 0.225637868677738],
-                 [-0.32826928640020198, 0.117303345254055],
-                 [-0.30130814355531899, -0.32875457338449099],
-                 [0.43536388393894399, -0.096563219993789001],
-                 [-0.134055740383625, 0.42531779337828102],
-                 [0.30130814355531899, -0.32875457338449099],
-                 [0.134055740383626, 0.42531779337828102],
-                 [-0.43536388393894498, -0.096563219993788696],
-                 [0.0, -0.068781371078380796],
-                 [0.059566414661002202, 0.034390685539190599],
-                 [-0.059566414661002202, 0.0343906855391908],
-                 [-0.35231165502281597, -0.51594631133528102],
-                 [0.62297844011663694, -0.047137687631457197],
-                 [-0.27066678509381997, 0.563083998966739],
-                 [0.35231165502281597, -0.51594631133528102],
-                 [0.27066678509382103, 0.563083998966739],
-                 [-0.62297844011663694, -0.047137687631456801],
-                 [0.0, -0.56039688938398602],
-                 [0.48531794240831, 0.28019844469199301],
-                 [-0.48531794240831, 0.28019844469199301],
-                 [-0.12800312652182799, -0.51600357027661403],
-                 [0.51087376356393099, 0.14714782580656999],
-                 [-0.382870637042102, 0.36885574447004499],
-                 [0.12800312652182799, -0.51600357027661403],
-                 [0.382870637042103, 0.36885574447004399],
-                 [-0.51087376356393099, 0.14714782580657099],
-                 [-0.90127055211839602, -0.52034879587823901],
-                 [0.90127055211839602, -0.52034879587823801],
-                 [0.0, 1.04069759175648],
-                 [-0.75118628320269698, -0.48071245484494601],
-                 [0.79190233941265098, -0.41019017680547498],
-                 [-0.040716056209953798, 0.89090263165042105],
-                 [0.75118628320269698, -0.48071245484494601],
-                 [0.040716056209954402, 0.89090263165042105],
-                 [-0.79190233941265198, -0.41019017680547398],
-                 [-0.67034428298913296, -0.46654018005672199],
-                 [0.73920778930985298, -0.34726508832189301],
-                 [-0.068863506320720205, 0.813805268378615],
-                 [0.67034428298913296, -0.46654018005672199],
-                 [0.068863506320720802, 0.813805268378615],
-                 [-0.73920778930985398, -0.34726508832189301],
-                 [-0.77580876066209603, -0.52493394350877398],
-                 [0.842510510718391, -0.40940312345751001],
-                 [-0.066701750056295001, 0.93433706696628405],
-                 [0.77580876066209603, -0.52493394350877398],
-                 [0.066701750056295403, 0.93433706696628405],
-                 [-0.842510510718392, -0.40940312345751001],
-                 [0.0, -0.53080573778005102],
-                 [0.45969125339206501, 0.26540286889002601],
-                 [-0.45969125339206501, 0.26540286889002601],
-                 [-0.12785487625900599, -0.55199717395419101],
-                 [0.54197101359105004, 0.16527301613908099],
-                 [-0.414116137332044, 0.38672415781511099],
-                 [0.12785487625900499, -0.55199717395419101],
-                 [0.414116137332045, 0.38672415781510999],
-                 [-0.54197101359105004, 0.16527301613908099],
-                 [-0.81185485483071396, -0.46872461897941797],
-                 [0.81185485483071496, -0.46872461897941697],
-                 [0.0, 0.93744923795883595],
-                 [-0.71268785841843496, -0.55378528333018395],
-                 [0.83593605281511996, -0.34031314869399998],
-                 [-0.123248194396684, 0.89409843202418504],
-                 [0.71268785841843496, -0.55378528333018395],
-                 [0.123248194396685, 0.89409843202418504],
-                 [-0.83593605281511996, -0.34031314869399998],
-                 [-0.270400141179302, -0.57306164103038404],
-                 [0.63148600965636303, 0.052357429067017999],
-                 [-0.36108586847705998, 0.52070421196336703],
-                 [0.270400141179302, -0.57306164103038404],
-                 [0.36108586847706098, 0.52070421196336703],
-                 [-0.63148600965636303, 0.052357429067018499],
-                 [-0.56576932068933505, -0.32664706959922002],
-                 [0.56576932068933505, -0.32664706959921902],
-                 [-1.11022302462516e-16, 0.65329413919843904],
-                 [-0.18478688196683099, -0.32979522157781499],
-                 [0.378004480916522, 0.0048674767195154801],
-                 [-0.19321759894969001, 0.3249277448583],
-                 [0.18478688196683099, -0.32979522157781499],
-                 [0.19321759894969001, 0.3249277448583],
-                 [-0.378004480916522, 0.00486747671951571],
-                 [-0.95990613817521497, -0.55420206727223498],
-                 [0.95990613817521497, -0.55420206727223398],
-                 [0.0, 1.10840413454447],
-                 [-0.80938151535440195, -0.57315735914007304],
-                 [0.90105959105850497, -0.41436627408042098],
-                 [-0.091678075704102704, 0.98752363322049397],
-                 [0.80938151535440195, -0.57315735914007304],
-                 [0.091678075704103398, 0.98752363322049397],
-                 [-0.90105959105850497, -0.41436627408041998],
-                 [-0.31942848667068602, -0.239339965213448],
-                 [0.36698873335107302, -0.15696320154250901],
-                 [-0.047560246680387101, 0.396303166755957],
-                 [0.31942848667068602, -0.239339965213448],
-                 [0.047560246680387303, 0.396303166755957],
-                 [-0.36698873335107302, -0.15696320154250801],
-                 [-0.085468012516227695, -0.46640357835051799],
-                 [0.44665135352562801, 0.15918431912524],
-                 [-0.36118334100940103, 0.30721925922527898],
-                 [0.085468012516227695, -0.46640357835051799],
-                 [0.36118334100940103, 0.30721925922527898],
-                 [-0.44665135352562801, 0.15918431912524],
-                 [-0.258256134819142, -0.55450865650449899],
-                 [0.60934665056084603, 0.053597954815693398],
-                 [-0.35109051574170402, 0.50091070168880603],
-                 [0.258256134819142, -0.55450865650449899],
-                 [0.35109051574170402, 0.50091070168880603],
-                 [-0.60934665056084603, 0.0535979548156938],
-                 [-0.58279946491371404, -0.47018294735939897],
-                 [0.69859010929633802, -0.26962766824755502],
-                 [-0.115790644382624, 0.73981061560695405],
-                 [0.58279946491371404, -0.47018294735939897],
-                 [0.115790644382624, 0.73981061560695405],
-                 [-0.69859010929633802, -0.26962766824755402],
-                 [-0.87969623175882095, -0.57282533435858196],
-                 [0.93592940736525698, -0.47542661713729101],
-                 [-0.056233175606435801, 1.0482519514958699],
-                 [0.87969623175882095, -0.57282533435858196],
-                 [0.056233175606436502, 1.0482519514958699],
-                 [-0.93592940736525798, -0.47542661713729101],
-                 [-0.465610392620247, -0.51813075309225798],
-                 [0.68151959096998105, -0.144165051729051],
-                 [-0.21590919834973399, 0.66229580482130901],
-                 [0.46561039262024601, -0.51813075309225798],
-                 [0.21590919834973499, 0.66229580482130901],
-                 [-0.68151959096998105, -0.144165051729051],
-                 [-0.93340399559638298, -0.57275889464282204],
-                 [0.96272575080237, -0.52197212485895494],
-                 [-0.029321755205986798, 1.0947310195017801],
-                 [0.93340399559638298, -0.57275889464282204],
-                 [0.029321755205987499, 1.0947310195017801],
-                 [-0.96272575080237099, -0.52197212485895494],
-                 [-0.51396050819491801, -0.57286153985489896],
-                 [0.75309290046287303, -0.15867208671131],
-                 [-0.23913239226795499, 0.73153362656620902],
-                 [0.51396050819491801, -0.57286153985489896],
-                 [0.23913239226795499, 0.73153362656620902],
-                 [-0.75309290046287303, -0.158672086711309],
-                 [-0.61691723863061598, -0.55262810787321204],
-                 [0.78704859957883699, -0.25795194675005401],
-                 [-0.17013136094822101, 0.81058005462326699],
-                 [0.61691723863061598, -0.55262810787321204],
-                 [0.17013136094822101, 0.81058005462326599],
-                 [-0.78704859957883699, -0.25795194675005301],
-                 [-0.863630814284022, -0.553350267068065],
-                 [0.91103079561385902, -0.471251091126971],
-                 [-0.047399981329836999, 1.0246013581950399],
-                 [0.863630814284022, -0.553350267068065],
-                 [0.047399981329837797, 1.0246013581950399],
-                 [-0.91103079561385902, -0.47125109112697],
-                 [-0.97099189034945799, -0.57303083539166799],
-                 [0.98175520577573205, -0.55438822621547101],
-                 [-0.0107633154262736, 1.12741906160714],
-                 [0.97099189034945799, -0.57303083539166799],
-                 [0.0107633154262743, 1.12741906160714],
-                 [-0.98175520577573305, -0.55438822621547101],
-                 [-0.99230517588993905, -0.57290766041831598],
-                 [0.99230517588993905, -0.57290766041831498],
-                 [0.0, 1.14581532083663],
-                 [-0.43668327166426402, -0.25211920444597002],
-                 [0.43668327166426402, -0.25211920444596903],
-                 [0.0, 0.50423840889193905],
-                 [-0.62361278877871795, -0.40338147343700298],
-                 [0.66114499780180103, -0.33837378048872702],
-                 [-0.037532209023083102, 0.74175525392573005],
-                 [0.62361278877871795, -0.40338147343700298],
-                 [0.0375322090230834, 0.74175525392573005],
-                 [-0.66114499780180103, -0.33837378048872702],
-                 [-0.91989119779265405, -0.55362560310096298],
-                 [0.93939943536724102, -0.51983634445565297],
-                 [-0.019508237574587198, 1.0734619475566201],
-                 [0.91989119779265405, -0.55362560310096298],
-                 [0.019508237574588101, 1.0734619475566201],
-                 [-0.93939943536724202, -0.51983634445565197],
-                 [0.0, -0.17054110158363001],
-                 [0.147692926360807, 0.085270550791815405],
-                 [-0.147692926360807, 0.0852705507918156],
-                 [-0.57692441054824295, -0.51821251917615896],
-                 [0.73724741143980599, -0.240524936010062],
-                 [-0.16032300089156201, 0.75873745518622104],
-                 [0.57692441054824295, -0.51821251917615896],
-                 [0.16032300089156301, 0.75873745518622104],
-                 [-0.73724741143980599, -0.240524936010062],
-                 [-0.50723010453494999, -0.55343995679985702],
-                 [0.73290811432551295, -0.16255417769157399],
-                 [-0.22567800979056299, 0.71599413449143101],
-                 [0.50723010453494999, -0.55343995679985702],
-                 [0.22567800979056399, 0.71599413449143101],
-                 [-0.73290811432551295, -0.16255417769157399],
-                 [-0.084394330147763305, -0.254327618552735],
-                 [0.26245134362454903, 0.054076175433033898],
-                 [-0.17805701347678601, 0.200251443119702],
-                 [0.084394330147763402, -0.254327618552735],
-                 [0.17805701347678601, 0.200251443119702],
-                 [-0.26245134362454903, 0.054076175433034002],
-                 [-0.72274543590291696, -0.57294781282938001],
-                 [0.85756007890443298, -0.33944200154649401],
-                 [-0.13481464300151599, 0.91238981437587396],
-                 [0.72274543590291696, -0.57294781282938001],
-                 [0.13481464300151599, 0.91238981437587396],
-                 [-0.85756007890443298, -0.33944200154649301],
-                 [-0.47250099165753801, -0.46817056136138202],
-                 [0.64169809527174804, -0.17511258140807601],
-                 [-0.169197103614209, 0.64328314276945897],
-                 [0.47250099165753801, -0.46817056136138202],
-                 [0.16919710361421, 0.64328314276945897],
-                 [-0.64169809527174804, -0.17511258140807501],
-                 [-0.35080029727613998, -0.466712211171528],
-                 [0.57958477976902101, -0.070445863510506204],
-                 [-0.228784482492881, 0.53715807468203502],
-                 [0.35080029727613998, -0.466712211171528],
-                 [0.228784482492881, 0.53715807468203502],
-                 [-0.57958477976902101, -0.070445863510505899],
-                 [-0.122750922028211, -0.15827564830985599],
-                 [0.19844619325089299, -0.0271675926594654],
-                 [-0.075695271222681604, 0.18544324096932199],
-                 [0.122750922028211, -0.15827564830985599],
-                 [0.075695271222681701, 0.18544324096932199],
-                 [-0.19844619325089299, -0.027167592659465299],
-                 [-0.38479753550946699, -0.55206358961559898],
-                 [0.670499860866269, -0.057212646257043698],
-                 [-0.28570232535680201, 0.60927623587264301],
-                 [0.38479753550946699, -0.55206358961559898],
-                 [0.28570232535680201, 0.60927623587264301],
-                 [-0.670499860866269, -0.057212646257043101],
-                 [-0.396059177969452, -0.57246915152619804],
-                 [0.69380241708933699, -0.056762733760428202],
-                 [-0.29774323911988498, 0.62923188528662699],
-                 [0.396059177969452, -0.57246915152619804],
-                 [0.29774323911988498, 0.62923188528662699],
-                 [-0.69380241708933699, -0.056762733760427703],
-                 [-0.84481754164315803, -0.51822758166184302],
-                 [0.87120702148250895, -0.47251966179477101],
-                 [-0.026389479839351099, 0.99074724345661402],
-                 [0.84481754164315803, -0.51822758166184302],
-                 [0.0263894798393518, 0.99074724345661402],
-                 [-0.87120702148250995, -0.47251966179477101],
-                 [-0.20507268425580299, -0.24244875862514001],
-                 [0.31250312621327397, -0.056373774875220398],
-                 [-0.10743044195747101, 0.29882253350036098],
-                 [0.20507268425580299, -0.24244875862514001],
-                 [0.10743044195747101, 0.29882253350036098],
-                 [-0.31250312621327397, -0.056373774875220301],
-                 [-0.52353562229447903, -0.40871265880657298],
-                 [0.61572335652201304, -0.24903881928982699],
-                 [-0.092187734227534096, 0.6577514780964],
-                 [0.52353562229447903, -0.40871265880657298],
-                 [0.092187734227534596, 0.6577514780964],
-                 [-0.61572335652201304, -0.24903881928982599],
-                 [-0.13693189087059099, -0.57252078775710602],
-                 [0.56428349182762805, 0.167673897796383],
-                 [-0.427351600957037, 0.40484688996072399],
-                 [0.13693189087059099, -0.57252078775710602],
-                 [0.427351600957038, 0.40484688996072299],
-                 [-0.56428349182762805, 0.167673897796384],
-                 [-0.623206893118187, -0.572576802208564],
-                 [0.80746950288936803, -0.25342460014964102],
-                 [-0.184262609771181, 0.82600140235820596],
-                 [0.623206893118187, -0.572576802208564],
-                 [0.184262609771181, 0.82600140235820596],
-                 [-0.80746950288936803, -0.25342460014964102],
-                 [-0.14379384782311699, -0.40790874923298198],
-                 [0.425156263173257, 0.079425249493757802],
-                 [-0.28136241535014, 0.32848349973922503],
-                 [0.14379384782311699, -0.40790874923298198],
-                 [0.28136241535014, 0.32848349973922503],
-                 [-0.425156263173257, 0.079425249493758093],
-                 [-0.27449236039881098, -0.40488358656967399],
-                 [0.48788565174409898, -0.035275563965286499],
-                 [-0.21339329134528801, 0.44015915053496102],
-                 [0.27449236039881098, -0.40488358656967399],
-                 [0.213393291345289, 0.44015915053496102],
-                 [-0.48788565174409898, -0.035275563965286097],
-                 [-0.68227667429915695, -0.51826247883638299],
-                 [0.78996680965018096, -0.33173769293444],
-                 [-0.10769013535102399, 0.85000017177082399],
-                 [0.68227667429915695, -0.51826247883638299],
-                 [0.10769013535102399, 0.85000017177082399],
-                 [-0.78996680965018196, -0.331737692934439],
-                 [0.0, -0.41416427390059701],
-                 [0.35867678253785301, 0.20708213695029901],
-                 [-0.35867678253785301, 0.20708213695029901],
-                 [-0.40313963669589498, -0.40328359141014303],
-                 [0.55082365343855499, -0.147487370946003],
-                 [-0.14768401674265999, 0.55077096235614598],
-                 [0.40313963669589498, -0.40328359141014303],
-                 [0.14768401674265999, 0.55077096235614598],
-                 [-0.55082365343855499, -0.14748737094600201],
-                 [-0.22073052548745101, -0.47052810769116898],
-                 [0.51785455719889795, 0.0441058113827636],
-                 [-0.29712403171144702, 0.426422296308406],
-                 [0.22073052548745101, -0.47052810769116898],
-                 [0.29712403171144702, 0.426422296308406],
-                 [-0.51785455719889795, 0.044105811382764003],
-                 [-0.72139886135785602, -0.41649982679804798],
-                 [0.72139886135785602, -0.41649982679804798],
-                 [2.2204460492503101e-16, 0.83299965359609596],
-                 [-0.242545202052728, -0.14003353769579399],
-                 [0.242545202052728, -0.14003353769579399],
-                 [0.0, 0.28006707539158898]],
-      'weights': [0.0053346568513853903,
-                  0.0053346568513853903,
-                  0.0053346568513853903,
-                  0.0043082134935829297,
-                  0.0043082134935829297,
-                  0.0043082134935829297,
-                  0.0067768883979380202,
-                  0.0067768883979380202,
-                  0.0067768883979380202,
-                  0.0067768883979380202,
-                  0.0067768883979380202,
-                  0.0067768883979380202,
-                  0.0010541533531023401,
-                  0.0010541533531023401,
-                  0.0010541533531023401,
-                  0.0101811372531439,
-                  0.0101811372531439,
-                  0.0101811372531439,
-                  0.0046030285493887397,
-                  0.0046030285493887397,
-                  0.0046030285493887397,
-                  0.0046030285493887397,
-                  0.0046030285493887397,
-                  0.0046030285493887397,
-                  0.00180200116486766,
-                  0.00180200116486766,
-                  0.00180200116486766,
-                  0.00180200116486766,
-                  0.00180200116486766,
-                  0.00180200116486766,
-                  0.00670099669470056,
-                  0.00670099669470056,
-                  0.00670099669470056,
-                  0.00670099669470056,
-                  0.00670099669470056,
-                  0.00670099669470056,
-                  0.0094154419105322192,
-                  0.0094154419105322192,
-                  0.0094154419105322192,
-                  0.0094154419105322192,
-                  0.0094154419105322192,
-                  0.0094154419105322192,
-                  0.0088906533017092202,
-                  0.0088906533017092202,
-                  0.0088906533017092202,
-                  0.0088906533017092202,
-                  0.0088906533017092202,
-                  0.0088906533017092202,
-                  0.0118965718612302,
-                  0.0118965718612302,
-                  0.0118965718612302,
-                  0.0047196397158195801,
-                  0.0047196397158195801,
-                  0.0047196397158195801,
-                  0.0047196397158195801,
-                  0.0047196397158195801,
-                  0.0047196397158195801,
-                  0.0027960621654885701,
-                  0.0027960621654885701,
-                  0.0027960621654885701,
-                  0.0053380555828412904,
-                  0.0053380555828412904,
-                  0.0053380555828412904,
-                  0.0053380555828412904,
-                  0.0053380555828412904,
-                  0.0053380555828412904,
-                  0.00187688910371867,
-                  0.00187688910371867,
-                  0.00187688910371867,
-                  0.0038036089668389002,
-                  0.0038036089668389002,
-                  0.0038036089668389002,
-                  0.0038036089668389002,
-                  0.0038036089668389002,
-                  0.0038036089668389002,
-                  0.0046889588065651697,
-                  0.0046889588065651697,
-                  0.0046889588065651697,
-                  0.0046889588065651697,
-                  0.0046889588065651697,
-                  0.0046889588065651697,
-                  0.0030713600753870798,
-                  0.0030713600753870798,
-                  0.0030713600753870798,
-                  0.0030713600753870798,
-                  0.0030713600753870798,
-                  0.0030713600753870798,
-                  0.0047052980023863699,
-                  0.0047052980023863699,
-                  0.0047052980023863699,
-                  0.0036709249916180402,
-                  0.0036709249916180402,
-                  0.0036709249916180402,
-                  0.0036709249916180402,
-                  0.0036709249916180402,
-                  0.0036709249916180402,
-                  0.0035062412067305699,
-                  0.0035062412067305699,
-                  0.0035062412067305699,
-                  0.00239415464262243,
-                  0.00239415464262243,
-                  0.00239415464262243,
-                  0.00239415464262243,
-                  0.00239415464262243,
-                  0.00239415464262243,
-                  0.0014354883794187299,
-                  0.0014354883794187299,
-                  0.0014354883794187299,
-                  0.0014354883794187299,
-                  0.0014354883794187299,
-                  0.0014354883794187299,
-                  0.0073533037873581503,
-                  0.0073533037873581503,
-                  0.0073533037873581503,
-                  0.0099782234075241893,
-                  0.0099782234075241893,
-                  0.0099782234075241893,
-                  0.0099782234075241893,
-                  0.0099782234075241893,
-                  0.0099782234075241893,
-                  0.000817704833223433,
-                  0.000817704833223433,
-                  0.000817704833223433,
-                  0.00084288633702724004,
-                  0.00084288633702724004,
-                  0.00084288633702724004,
-                  0.00084288633702724004,
-                  0.00084288633702724004,
-                  0.00084288633702724004,
-                  0.0104982554403312,
-                  0.0104982554403312,
-                  0.0104982554403312,
-                  0.0104982554403312,
-                  0.0104982554403312,
-                  0.0104982554403312,
-                  0.0068574668867106203,
-                  0.0068574668867106203,
-                  0.0068574668867106203,
-                  0.0068574668867106203,
-                  0.0068574668867106203,
-                  0.0068574668867106203,
-                  0.0033801500850149202,
-                  0.0033801500850149202,
-                  0.0033801500850149202,
-                  0.0033801500850149202,
-                  0.0033801500850149202,
-                  0.0033801500850149202,
-                  0.0055007578398398801,
-                  0.0055007578398398801,
-                  0.0055007578398398801,
-                  0.0055007578398398801,
-                  0.0055007578398398801,
-                  0.0055007578398398801,
-                  0.00072359709641924095,
-                  0.00072359709641924095,
-                  0.00072359709641924095,
-                  0.00072359709641924095,
-                  0.00072359709641924095,
-                  0.00072359709641924095,
-                  0.00485632147870856,
-                  0.00485632147870856,
-                  0.00485632147870856,
-                  0.00485632147870856,
-                  0.00485632147870856,
-                  0.00485632147870856,
-                  0.00053248836370274003,
-                  0.00053248836370274003,
-                  0.00053248836370274003,
-                  0.00053248836370274003,
-                  0.00053248836370274003,
-                  0.00053248836370274003,
-                  0.00131297743323075,
-                  0.00131297743323075,
-                  0.00131297743323075,
-                  0.00131297743323075,
-                  0.00131297743323075,
-                  0.00131297743323075,
-                  0.0028207489873994201,
-                  0.0028207489873994201,
-                  0.0028207489873994201,
-                  0.0028207489873994201,
-                  0.0028207489873994201,
-                  0.0028207489873994201,
-                  0.0017347900721299101,
-                  0.0017347900721299101,
-                  0.0017347900721299101,
-                  0.0017347900721299101,
-                  0.0017347900721299101,
-                  0.0017347900721299101,
-                  0.00032857611634505102,
-                  0.00032857611634505102,
-                  0.00032857611634505102,
-                  0.00032857611634505102,
-                  0.00032857611634505102,
-                  0.00032857611634505102,
-                  0.00014849317867335099,
-                  0.00014849317867335099,
-                  0.00014849317867335099,
-                  0.0092409679653996397,
-                  0.0092409679653996397,
-                  0.0092409679653996397,
-                  0.00679413161845793,
-                  0.00679413161845793,
-                  0.00679413161845793,
-                  0.00679413161845793,
-                  0.00679413161845793,
-                  0.00679413161845793,
-                  0.0012735153827903101,
-                  0.0012735153827903101,
-                  0.0012735153827903101,
-                  0.0012735153827903101,
-                  0.0012735153827903101,
-                  0.0012735153827903101,
-                  0.012037200361595401,
-                  0.012037200361595401,
-                  0.012037200361595401,
-                  0.0045513966797918401,
-                  0.0045513966797918401,
-                  0.0045513966797918401,
-                  0.0045513966797918401,
-                  0.0045513966797918401,
-                  0.0045513966797918401,
-                  0.0031898035166985301,
-                  0.0031898035166985301,
-                  0.0031898035166985301,
-                  0.0031898035166985301,
-                  0.0031898035166985301,
-                  0.0031898035166985301,
-                  0.0102624577987817,
-                  0.0102624577987817,
-                  0.0102624577987817,
-                  0.0102624577987817,
-                  0.0102624577987817,
-                  0.0102624577987817,
-                  0.0010606019837381801,
-                  0.0010606019837381801,
-                  0.0010606019837381801,
-                  0.0010606019837381801,
-                  0.0010606019837381801,
-                  0.0010606019837381801,
-                  0.0066250310298592496,
-                  0.0066250310298592496,
-                  0.0066250310298592496,
-                  0.0066250310298592496,
-                  0.0066250310298592496,
-                  0.0066250310298592496,
-                  0.0071504309299115498,
-                  0.0071504309299115498,
-                  0.0071504309299115498,
-                  0.0071504309299115498,
-                  0.0071504309299115498,
-                  0.0071504309299115498,
-                  0.011590939502174699,
-                  0.011590939502174699,
-                  0.011590939502174699,
-                  0.011590939502174699,
-                  0.011590939502174699,
-                  0.011590939502174699,
-                  0.0035459980823540002,
-                  0.0035459980823540002,
-                  0.0035459980823540002,
-                  0.0035459980823540002,
-                  0.0035459980823540002,
-                  0.0035459980823540002,
-                  0.00152076776615603,
-                  0.00152076776615603,
-                  0.00152076776615603,
-                  0.00152076776615603,
-                  0.00152076776615603,
-                  0.00152076776615603,
-                  0.0027328039887475502,
-                  0.0027328039887475502,
-                  0.0027328039887475502,
-                  0.0027328039887475502,
-                  0.0027328039887475502,
-                  0.0027328039887475502,
-                  0.0109247994633164,
-                  0.0109247994633164,
-                  0.0109247994633164,
-                  0.0109247994633164,
-                  0.0109247994633164,
-                  0.0109247994633164,
-                  0.0074004292525060803,
-                  0.0074004292525060803,
-                  0.0074004292525060803,
-                  0.0074004292525060803,
-                  0.0074004292525060803,
-                  0.0074004292525060803,
-                  0.0016798075587641701,
-                  0.0016798075587641701,
-                  0.0016798075587641701,
-                  0.0016798075587641701,
-                  0.0016798075587641701,
-                  0.0016798075587641701,
-                  0.0012782851413471301,
-                  0.0012782851413471301,
-                  0.0012782851413471301,
-                  0.0012782851413471301,
-                  0.0012782851413471301,
-                  0.0012782851413471301,
-                  0.0091138458591404903,
-                  0.0091138458591404903,
-                  0.0091138458591404903,
-                  0.0091138458591404903,
-                  0.0091138458591404903,
-                  0.0091138458591404903,
-                  0.0091803403546304105,
-                  0.0091803403546304105,
-                  0.0091803403546304105,
-                  0.0091803403546304105,
-                  0.0091803403546304105,
-                  0.0091803403546304105,
-                  0.0042535721230824997,
-                  0.0042535721230824997,
-                  0.0042535721230824997,
-                  0.0042535721230824997,
-                  0.0042535721230824997,
-                  0.0042535721230824997,
-                  0.0092366899350132606,
-                  0.0092366899350132606,
-                  0.0092366899350132606,
-                  0.0087565740676864793,
-                  0.0087565740676864793,
-                  0.0087565740676864793,
-                  0.0087565740676864793,
-                  0.0087565740676864793,
-                  0.0087565740676864793,
-                  0.0076802440489966099,
-                  0.0076802440489966099,
-                  0.0076802440489966099,
-                  0.0076802440489966099,
-                  0.0076802440489966099,
-                  0.0076802440489966099,
-                  0.0056996702373982803,
-                  0.0056996702373982803,
-                  0.0056996702373982803,
-                  0.012668581853069299,
-                  0.012668581853069299,
-                  0.012668581853069299]},
- 44: {'points': [[-0.098139750134570103, -0.443033831718811],
-                 [0.43274842807173602, 0.136525399121811],
-                 [-0.33460867793716498, 0.306508432597001],
-                 [0.0981397501345702, -0.443033831718811],
-                 [0.33460867793716598, 0.306508432597001],
-                 [-0.43274842807173602, 0.136525399121811],
-                 [-0.68341323779651597, -0.45575432840314301],
-                 [0.73640144518009598, -0.36397606101278701],
-                 [-0.052988207383579199, 0.81973038941593102],
-                 [0.68341323779651697, -0.45575432840314301],
-                 [0.052988207383579899, 0.81973038941593102],
-                 [-0.73640144518009598, -0.36397606101278701],
-                 [-0.77586730717546903, -0.44794719865318799],
-                 [0.77586730717547003, -0.447947198653187],
-                 [-2.2204460492503101e-16, 0.89589439730637499],
-                 [-0.64713859358657, -0.47423480068975699],
-                 [0.73426868154926495, -0.323321061470424],
-                 [-0.0871300879626946, 0.79755586216018204],
-                 [0.64713859358657, -0.47423480068975699],
-                 [0.087130087962695293, 0.79755586216018204],
-                 [-0.73426868154926495, -0.323321061470424],
-                 [-0.90806084920067098, -0.52426917572656795],
-                 [0.90806084920067098, -0.52426917572656795],
-                 [0.0, 1.0485383514531399],
-                 [-0.084631331202236496, -0.048861921851487598],
-                 [0.084631331202236607, -0.048861921851487397],
-                 [0.0, 0.097723843702975599],
-                 [-0.61911822387514104, -0.50975990521296899],
-                 [0.75102413968274895, -0.28129215721529],
-                 [-0.13190591580760699, 0.79105206242825898],
-                 [0.61911822387514104, -0.50975990521296899],
-                 [0.13190591580760799, 0.79105206242825898],
-                 [-0.75102413968274895, -0.281292157215289],
-                 [-0.87026266950307696, -0.57473769383613205],
-                 [0.93286877812611202, -0.46630073283686002],
-                 [-0.062606108623034701, 1.04103842667299],
-                 [0.87026266950307696, -0.57473769383613205],
-                 [0.062606108623035395, 1.04103842667299],
-                 [-0.93286877812611202, -0.46630073283685902],
-                 [0.0, -0.069986138102749201],
-                 [0.060609773509747097, 0.034993069051374899],
-                 [-0.060609773509746903, 0.034993069051374899],
-                 [-0.75458045483090896, -0.483402158387222],
-                 [0.79592877682301699, -0.41178476388917201],
-                 [-0.0413483219921085, 0.89518692227639396],
-                 [0.75458045483090896, -0.483402158387222],
-                 [0.041348321992109097, 0.89518692227639496],
-                 [-0.79592877682301799, -0.41178476388917101],
-                 [0.0, -0.29215380177307199],
-                 [0.253012614147684, 0.14607690088653599],
-                 [-0.253012614147684, 0.14607690088653699],
-                 [-0.53697356174426503, -0.49152057457139298],
-                 [0.69415608493368197, -0.21927245834544901],
-                 [-0.157182523189417, 0.71079303291684204],
-                 [0.53697356174426503, -0.49152057457139298],
-                 [0.157182523189418, 0.71079303291684204],
-                 [-0.69415608493368297, -0.21927245834544801],
-                 [-0.96188032506084398, -0.55839237146216003],
-                 [0.96452214149608895, -0.55381661117204495],
-                 [-0.0026418164352449698, 1.1122089826342001],
-                 [0.96188032506084398, -0.55839237146216003],
-                 [0.00264181643524575, 1.1122089826342001],
-                 [-0.96452214149608995, -0.55381661117204395],
-                 [-0.63497135644318503, -0.56818695294940502],
-                 [0.80955001357465095, -0.26580784888055897],
-                 [-0.174578657131465, 0.83399480182996499],
-                 [0.63497135644318503, -0.56818695294940502],
-                 [0.174578657131466, 0.83399480182996499],
-                 [-0.80955001357465095, -0.26580784888055897],
-                 [-0.71661876320803497, -0.57414448915008098],
-                 [0.85553309465082705, -0.33353780919170301],
-                 [-0.138914331442791, 0.90768229834178504],
-                 [0.71661876320803497, -0.57414448915008098],
-                 [0.138914331442792, 0.90768229834178404],
-                 [-0.85553309465082705, -0.33353780919170201],
-                 [-0.802189048157817, -0.52016222635334997],
-                 [0.85156822618998096, -0.43463498116565302],
-                 [-0.049379178032163303, 0.95479720751900299],
-                 [0.802189048157817, -0.52016222635334997],
-                 [0.049379178032163698, 0.95479720751900299],
-                 [-0.85156822618998096, -0.43463498116565302],
-                 [0.0, -0.44368193852160298],
-                 [0.38423982996003297, 0.22184096926080199],
-                 [-0.38423982996003297, 0.22184096926080199],
-                 [-0.066288023684680106, -0.49504876408134901],
-                 [0.46186881764887799, 0.19011726956307701],
-                 [-0.39558079396419799, 0.30493149451827301],
-                 [0.066288023684680106, -0.49504876408134901],
-                 [0.39558079396419799, 0.30493149451827201],
-                 [-0.46186881764887799, 0.19011726956307801],
-                 [0.0, -0.56411994538091703],
-                 [0.48854220348136401, 0.28205997269045902],
-                 [-0.48854220348136401, 0.28205997269045902],
-                 [-0.096346157844197297, -0.39812379937236297],
-                 [0.392958403029744, 0.115623679436082],
-                 [-0.29661224518554702, 0.28250011993628199],
-                 [0.096346157844197297, -0.39812379937236297],
-                 [0.29661224518554702, 0.28250011993628199],
-                 [-0.392958403029744, 0.115623679436082],
-                 [-0.078979158502366906, -0.57470725208585205],
-                 [0.53720065929667904, 0.21895566841035899],
-                 [-0.45822150079431201, 0.35575158367549398],
-                 [0.078979158502366906, -0.57470725208585205],
-                 [0.45822150079431201, 0.35575158367549398],
-                 [-0.53720065929667904, 0.21895566841035899],
-                 [0.0, -0.35997162219878598],
-                 [0.311744569465643, 0.17998581109939299],
-                 [-0.311744569465643, 0.17998581109939299],
-                 [-0.47074180626831902, -0.573786886923627],
-                 [0.73228492356840902, -0.120780919389924],
-                 [-0.26154311730009, 0.69456780631355097],
-                 [0.47074180626831902, -0.573786886923627],
-                 [0.261543117300091, 0.69456780631355097],
-                 [-0.73228492356840902, -0.120780919389923],
-                 [-0.44745334967671502, -0.4294211581131],
-                 [0.59561630668683596, -0.17279538877192599],
-                 [-0.148162957010121, 0.60221654688502702],
-                 [0.44745334967671502, -0.4294211581131],
-                 [0.148162957010121, 0.60221654688502702],
-                 [-0.59561630668683596, -0.17279538877192599],
-                 [-0.433528618357299, -0.48369517163228198],
-                 [0.63565661550008001, -0.133599210948849],
-                 [-0.20212799714278101, 0.61729438258113101],
-                 [0.433528618357299, -0.48369517163228198],
-                 [0.20212799714278101, 0.61729438258113101],
-                 [-0.63565661550008001, -0.133599210948848],
-                 [-0.70512227594344501, -0.40710253582755002],
-                 [0.70512227594344501, -0.40710253582754902],
-                 [0.0, 0.81420507165509903],
-                 [-0.55594598323809297, -0.44124347205159697],
-                 [0.66010104766977795, -0.26084160859030803],
-                 [-0.104155064431685, 0.702085080641905],
-                 [0.55594598323809297, -0.44124347205159697],
-                 [0.104155064431685, 0.702085080641905],
-                 [-0.66010104766977795, -0.26084160859030803],
-                 [-0.14596290290189301, -0.52739318463979701],
-                 [0.52971734713178797, 0.13728901039673799],
-                 [-0.38375444422989502, 0.39010417424305899],
-                 [0.14596290290189301, -0.52739318463979701],
-                 [0.38375444422989502, 0.39010417424305899],
-                 [-0.52971734713178797, 0.13728901039673899],
-                 [-0.86605099167006605, -0.52996125245017001],
-                 [0.89198540347829902, -0.48504153353389801],
-                 [-0.025934411808231701, 1.01500278598407],
-                 [0.86605099167006605, -0.52996125245017001],
-                 [0.025934411808232301, 1.01500278598407],
-                 [-0.89198540347829902, -0.48504153353389701],
-                 [-0.25486776344898499, -0.51129076622709602],
-                 [0.57022467399756804, 0.034923425361004297],
-                 [-0.315356910548583, 0.476367340866092],
-                 [0.25486776344898499, -0.51129076622709602],
-                 [0.315356910548584, 0.476367340866092],
-                 [-0.57022467399756804, 0.034923425361004699],
-                 [-0.61931226985326604, -0.54307382180432895],
-                 [0.77997186073948499, -0.26480324766616797],
-                 [-0.16065959088621901, 0.80787706947049698],
-                 [0.61931226985326604, -0.54307382180432895],
-                 [0.16065959088621901, 0.80787706947049698],
-                 [-0.77997186073948499, -0.26480324766616697],
-                 [-0.12971034271981099, -0.55732237980802002],
-                 [0.54751051037125098, 0.166328737975068],
-                 [-0.41780016765143901, 0.39099364183295299],
-                 [0.12971034271981099, -0.55732237980802002],
-                 [0.41780016765144001, 0.39099364183295199],
-                 [-0.54751051037124998, 0.166328737975068],
-                 [-0.79822515124223004, -0.55097785627645401],
-                 [0.87627339607921595, -0.41579433077722],
-                 [-0.078048244836984804, 0.96677218705367396],
-                 [0.79822515124223004, -0.55097785627645401],
-                 [0.078048244836985498, 0.96677218705367396],
-                 [-0.87627339607921595, -0.41579433077722],
-                 [-0.18233030117704499, -0.46762966857796501],
-                 [0.49614432314033802, 0.075912161589993601],
-                 [-0.313814021963292, 0.39171750698797098],
-                 [0.18233030117704499, -0.46762966857796501],
-                 [0.313814021963293, 0.39171750698797098],
-                 [-0.49614432314033802, 0.075912161589993907],
-                 [-0.55153238894207401, -0.31842737322250397],
-                 [0.55153238894207401, -0.31842737322250297],
-                 [0.0, 0.63685474644500795],
-                 [-0.53505438047847498, -0.56204622989751996],
-                 [0.75427350343175803, -0.182347570951744],
-                 [-0.219219122953283, 0.74439380084926399],
-                 [0.53505438047847498, -0.56204622989751996],
-                 [0.219219122953284, 0.74439380084926399],
-                 [-0.75427350343175903, -0.182347570951744],
-                 [-0.492654049977439, -0.36931407173554298],
-                 [0.56616239308676797, -0.24199388668997901],
-                 [-0.073508343109329299, 0.61130795842552299],
-                 [0.492654049977439, -0.36931407173554298],
-                 [0.073508343109329702, 0.61130795842552299],
-                 [-0.56616239308676897, -0.24199388668997901],
-                 [-0.35010388389415498, -0.39632498582251402],
-                 [0.51827944782388202, -0.105036364504679],
-                 [-0.16817556392972699, 0.50136135032719398],
-                 [0.35010388389415498, -0.39632498582251402],
-                 [0.16817556392972699, 0.50136135032719298],
-                 [-0.51827944782388202, -0.105036364504679],
-                 [-0.92522616367486499, -0.55461777591584005],
-                 [0.94292616517097505, -0.52396047403053203],
-                 [-0.017700001496109698, 1.0785782499463701],
-                 [0.92522616367486499, -0.55461777591584005],
-                 [0.017700001496110399, 1.0785782499463701],
-                 [-0.94292616517097505, -0.52396047403053203],
-                 [-0.87000623578272995, -0.55966662276430901],
-                 [0.91968863085549901, -0.47361419025656398],
-                 [-0.049682395072768303, 1.0332808130208699],
-                 [0.87000623578272995, -0.55966662276430901],
-                 [0.049682395072768899, 1.0332808130208699],
-                 [-0.91968863085549901, -0.47361419025656298],
-                 [-0.39195558425080801, -0.32821521149946098],
-                 [0.48022050319241999, -0.17533588736664099],
-                 [-0.088264918941611398, 0.50355109886610305],
-                 [0.39195558425080801, -0.32821521149946098],
-                 [0.0882649189416118, 0.50355109886610305],
-                 [-0.48022050319241999, -0.17533588736664099],
-                 [0.0, -0.16699824018897699],
-                 [0.14462471839095001, 0.083499120094488802],
-                 [-0.14462471839094901, 0.083499120094488802],
-                 [-0.92721116764817701, -0.57291742450707395],
-                 [0.95976662771796795, -0.51652971360241695],
-                 [-0.032555460069790203, 1.0894471381094899],
-                 [0.92721116764817701, -0.57291742450707395],
-                 [0.032555460069790799, 1.0894471381094899],
-                 [-0.95976662771796795, -0.51652971360241595],
-                 [-0.71736233608747602, -0.55564423906875704],
-                 [0.83988319454375504, -0.34343188723552598],
-                 [-0.122520858456279, 0.89907612630428402],
-                 [0.71736233608747602, -0.55564423906875704],
-                 [0.12252085845628, 0.89907612630428402],
-                 [-0.83988319454375604, -0.34343188723552598],
-                 [-0.83817222398596603, -0.48391895914556499],
-                 [0.83817222398596603, -0.48391895914556399],
-                 [0.0, 0.96783791829112997],
-                 [-0.37278066712103097, -0.520998563329098],
-                 [0.63758832473870997, -0.062338246101974602],
-                 [-0.26480765761767899, 0.58333680943107302],
-                 [0.37278066712103097, -0.520998563329098],
-                 [0.26480765761767899, 0.58333680943107302],
-                 [-0.63758832473870997, -0.062338246101973999],
-                 [-0.32791895051098502, -0.243192895596614],
-                 [0.37457070086205702, -0.162389693726538],
-                 [-0.046651750351071899, 0.405582589323152],
-                 [0.32791895051098502, -0.243192895596614],
-                 [0.046651750351072198, 0.405582589323152],
-                 [-0.37457070086205702, -0.162389693726538],
-                 [-0.082912575817595993, -0.23963914680279599],
-                 [0.24898987678124801, 0.048015176450157002],
-                 [-0.166077300963652, 0.19162397035264001],
-                 [0.082912575817595896, -0.23963914680279599],
-                 [0.166077300963652, 0.19162397035264001],
-                 [-0.24898987678124801, 0.048015176450157203],
-                 [-0.61074683692665699, -0.39589947701781403],
-                 [0.64823242290572902, -0.33097253755056999],
-                 [-0.037485585979071701, 0.72687201456838402],
-                 [0.61074683692665699, -0.39589947701781403],
-                 [0.037485585979072103, 0.72687201456838402],
-                 [-0.64823242290572902, -0.33097253755056899],
-                 [-0.71442631215278696, -0.52096259864062699],
-                 [0.80838000092073303, -0.35823003613603099],
-                 [-0.093953688767946006, 0.87919263477665899],
-                 [0.71442631215278696, -0.52096259864062699],
-                 [0.093953688767946603, 0.87919263477665899],
-                 [-0.80838000092073303, -0.35823003613602999],
-                 [-0.96877901836106495, -0.57349729192825405],
-                 [0.98105273299198104, -0.55223859458990598],
-                 [-0.012273714630915601, 1.1257358865181599],
-                 [0.96877901836106495, -0.57349729192825405],
-                 [0.012273714630916401, 1.1257358865181599],
-                 [-0.98105273299198104, -0.55223859458990598],
-                 [-0.409496256955937, -0.55513769246503597],
-                 [0.68551147275096302, -0.077065315045963798],
-                 [-0.27601521579502603, 0.632203007511001],
-                 [0.409496256955937, -0.55513769246503597],
-                 [0.27601521579502603, 0.632203007511001],
-                 [-0.68551147275096302, -0.077065315045963298],
-                 [-0.12565366089364799, -0.14218305300889],
-                 [0.185960966340152, -0.037727735907969497],
-                 [-0.060307305446503999, 0.17991078891685999],
-                 [0.12565366089364799, -0.14218305300889],
-                 [0.060307305446503999, 0.17991078891685999],
-                 [-0.185960966340152, -0.037727735907969399],
-                 [-0.20343660386969001, -0.23757928798370301],
-                 [0.30746800074175101, -0.057391623018931498],
-                 [-0.104031396872061, 0.29497091100263501],
-                 [0.20343660386969001, -0.23757928798370301],
-                 [0.104031396872061, 0.29497091100263501],
-                 [-0.30746800074175001, -0.057391623018931297],
-                 [-0.50234011619811902, -0.53169501576353195],
-                 [0.71163144881584595, -0.16919179408583199],
-                 [-0.20929133261772701, 0.70088680984936502],
-                 [0.50234011619811902, -0.53169501576353195],
-                 [0.20929133261772701, 0.70088680984936402],
-                 [-0.71163144881584595, -0.16919179408583099],
-                 [-0.31662831778935202, -0.46191699231494099],
-                 [0.55834600867911599, -0.043249670605640403],
-                 [-0.241717690889764, 0.50516666292058199],
-                 [0.31662831778935202, -0.46191699231494099],
-                 [0.241717690889764, 0.50516666292058199],
-                 [-0.55834600867911599, -0.043249670605640098],
-                 [-0.34589874154720301, -0.57264358696254902],
-                 [0.66887326439741202, -0.013235303835671],
-                 [-0.322974522850209, 0.58587889079822097],
-                 [0.34589874154720301, -0.57264358696254902],
-                 [0.32297452285021, 0.58587889079821998],
-                 [-0.66887326439741202, -0.013235303835670601],
-                 [-0.22432274313168701, -0.40224171647269003],
-                 [0.46051291649305098, 0.0068516640376932196],
-                 [-0.236190173361364, 0.39539005243499797],
-                 [0.22432274313168701, -0.40224171647269003],
-                 [0.236190173361364, 0.39539005243499797],
-                 [-0.46051291649305098, 0.0068516640376934399],
-                 [-0.21596440556178201, -0.57258509742511499],
-                 [0.60385544297942895, 0.099261887182849506],
-                 [-0.38789103741764702, 0.47332321024226698],
-                 [0.21596440556178201, -0.57258509742511499],
-                 [0.38789103741764702, 0.47332321024226598],
-                 [-0.60385544297942895, 0.099261887182849895],
-                 [-0.13725595717154901, -0.32607364981180798],
-                 [0.35101604282751098, 0.0441696791745931],
-                 [-0.213760085655961, 0.28190397063721501],
-                 [0.13725595717155001, -0.32607364981180798],
-                 [0.213760085655962, 0.28190397063721501],
-                 [-0.35101604282751098, 0.044169679174593399],
-                 [0.0, -0.53670074131097001],
-                 [0.46479647620524001, 0.268350370655485],
-                 [-0.46479647620524001, 0.268350370655485],
-                 [-0.79956786047255901, -0.57191692682127804],
-                 [0.89507851771783198, -0.406487615808169],
-                 [-0.095510657245272898, 0.97840454262944698],
-                 [0.79956786047255901, -0.57191692682127804],
-                 [0.095510657245273495, 0.97840454262944698],
-                 [-0.89507851771783198, -0.406487615808168],
-                 [-0.26642589487294399, -0.32443630511423999],
-                 [0.41418302957536302, -0.068513440628851605],
-                 [-0.147757134702419, 0.39294974574309199],
-                 [0.26642589487294399, -0.32443630511423999],
-                 [0.147757134702419, 0.39294974574309199],
-                 [-0.41418302957536302, -0.068513440628851202],
-                 [-0.45427488825771101, -0.26227572902167701],
-                 [0.45427488825771101, -0.26227572902167601],
-                 [0.0, 0.52455145804335301],
-                 [-0.25018743281606398, -0.14444578168421601],
-                 [0.25018743281606398, -0.14444578168421601],
-                 [0.0, 0.28889156336843202],
-                 [-0.99177543558463699, -0.57260181471044902],
-                 [0.99177543558463699, -0.57260181471044802],
-                 [0.0, 1.1452036294209],
-                 [-0.27326164816658199, -0.55156941189507103],
-                 [0.61430394673486599, 0.0391331767552704],
-                 [-0.341042298568283, 0.51243623513980097],
-                 [0.27326164816658199, -0.55156941189507103],
-                 [0.341042298568284, 0.51243623513980097],
-                 [-0.61430394673486599, 0.039133176755270803],
-                 [-0.58907495578419999, -0.57682151320100505],
-                 [0.79407956177355099, -0.221743119841809],
-                 [-0.205004605989351, 0.798564633042815],
-                 [0.58907495578419899, -0.57682151320100505],
-                 [0.205004605989352, 0.798564633042815],
-                 [-0.79407956177355099, -0.221743119841809]],
-      'weights': [0.0033010540916541299,
-                  0.0033010540916541299,
-                  0.0033010540916541299,
-                  0.0033010540916541299,
-                  0.0033010540916541299,
-                  0.0033010540916541299,
-                  0.0033584614935328301,
-                  0.0033584614935328301,
-                  0.0033584614935328301,
-                  0.0033584614935328301,
-                  0.0033584614935328301,
-                  0.0033584614935328301,
-                  0.00291906058184239,
-                  0.00291906058184239,
-                  0.00291906058184239,
-                  0.0035581569580143101,
-                  0.0035581569580143101,
-                  0.0035581569580143101,
-                  0.0035581569580143101,
-                  0.0035581569580143101,
-                  0.0035581569580143101,
-                  0.00135773512492488,
-                  0.00135773512492488,
-                  0.00135773512492488,
-                  0.0080222960468795297,
-                  0.0080222960468795297,
-                  0.0080222960468795297,
-                  0.00331768152949953,
-                  0.00331768152949953,
-                  0.00331768152949953,
-                  0.00331768152949953,
-                  0.00331768152949953,
-                  0.00331768152949953,
-                  0.00047903159756671002,
-                  0.00047903159756671002,
-                  0.00047903159756671002,
-                  0.00047903159756671002,
-                  0.00047903159756671002,
-                  0.00047903159756671002,
-                  0.0096825268403301391,
-                  0.0096825268403301391,
-                  0.0096825268403301391,
-                  0.0033614786457481401,
-                  0.0033614786457481401,
-                  0.0033614786457481401,
-                  0.0033614786457481401,
-                  0.0033614786457481401,
-                  0.0033614786457481401,
-                  0.0087583748124335694,
-                  0.0087583748124335694,
-                  0.0087583748124335694,
-                  0.0044728437335272804,
-                  0.0044728437335272804,
-                  0.0044728437335272804,
-                  0.0044728437335272804,
-                  0.0044728437335272804,
-                  0.0044728437335272804,
-                  0.00036310059640710002,
-                  0.00036310059640710002,
-                  0.00036310059640710002,
-                  0.00036310059640710002,
-                  0.00036310059640710002,
-                  0.00036310059640710002,
-                  0.0014740756779355901,
-                  0.0014740756779355901,
-                  0.0014740756779355901,
-                  0.0014740756779355901,
-                  0.0014740756779355901,
-                  0.0014740756779355901,
-                  0.00081061060710771796,
-                  0.00081061060710771796,
-                  0.00081061060710771796,
-                  0.00081061060710771796,
-                  0.00081061060710771796,
-                  0.00081061060710771796,
-                  0.0025876439607978698,
-                  0.0025876439607978698,
-                  0.0025876439607978698,
-                  0.0025876439607978698,
-                  0.0025876439607978698,
-                  0.0025876439607978698,
-                  0.0067770513357187697,
-                  0.0067770513357187697,
-                  0.0067770513357187697,
-                  0.0060700503567520797,
-                  0.0060700503567520797,
-                  0.0060700503567520797,
-                  0.0060700503567520797,
-                  0.0060700503567520797,
-                  0.0060700503567520797,
-                  0.0023072309576268801,
-                  0.0023072309576268801,
-                  0.0023072309576268801,
-                  0.0073256163637974697,
-                  0.0073256163637974697,
-                  0.0073256163637974697,
-                  0.0073256163637974697,
-                  0.0073256163637974697,
-                  0.0073256163637974697,
-                  0.00105516668235403,
-                  0.00105516668235403,
-                  0.00105516668235403,
-                  0.00105516668235403,
-                  0.00105516668235403,
-                  0.00105516668235403,
-                  0.0085384017170761599,
-                  0.0085384017170761599,
-                  0.0085384017170761599,
-                  0.0011171076314869699,
-                  0.0011171076314869699,
-                  0.0011171076314869699,
-                  0.0011171076314869699,
-                  0.0011171076314869699,
-                  0.0011171076314869699,
-                  0.0066930613526620403,
-                  0.0066930613526620403,
-                  0.0066930613526620403,
-                  0.0066930613526620403,
-                  0.0066930613526620403,
-                  0.0066930613526620403,
-                  0.00557894348691634,
-                  0.00557894348691634,
-                  0.00557894348691634,
-                  0.00557894348691634,
-                  0.00557894348691634,
-                  0.00557894348691634,
-                  0.0050825671126033803,
-                  0.0050825671126033803,
-                  0.0050825671126033803,
-                  0.0060728786277890797,
-                  0.0060728786277890797,
-                  0.0060728786277890797,
-                  0.0060728786277890797,
-                  0.0060728786277890797,
-                  0.0060728786277890797,
-                  0.0047129144388017401,
-                  0.0047129144388017401,
-                  0.0047129144388017401,
-                  0.0047129144388017401,
-                  0.0047129144388017401,
-                  0.0047129144388017401,
-                  0.00198874934633823,
-                  0.00198874934633823,
-                  0.00198874934633823,
-                  0.00198874934633823,
-                  0.00198874934633823,
-                  0.00198874934633823,
-                  0.0053580598232751903,
-                  0.0053580598232751903,
-                  0.0053580598232751903,
-                  0.0053580598232751903,
-                  0.0053580598232751903,
-                  0.0053580598232751903,
-                  0.0032404176004157798,
-                  0.0032404176004157798,
-                  0.0032404176004157798,
-                  0.0032404176004157798,
-                  0.0032404176004157798,
-                  0.0032404176004157798,
-                  0.0032621551581789201,
-                  0.0032621551581789201,
-                  0.0032621551581789201,
-                  0.0032621551581789201,
-                  0.0032621551581789201,
-                  0.0032621551581789201,
-                  0.00208044372669128,
-                  0.00208044372669128,
-                  0.00208044372669128,
-                  0.00208044372669128,
-                  0.00208044372669128,
-                  0.00208044372669128,
-                  0.0070459347674545697,
-                  0.0070459347674545697,
-                  0.0070459347674545697,
-                  0.0070459347674545697,
-                  0.0070459347674545697,
-                  0.0070459347674545697,
-                  0.0074313028535734999,
-                  0.0074313028535734999,
-                  0.0074313028535734999,
-                  0.0023240872566430699,
-                  0.0023240872566430699,
-                  0.0023240872566430699,
-                  0.0023240872566430699,
-                  0.0023240872566430699,
-                  0.0023240872566430699,
-                  0.0080195308435768997,
-                  0.0080195308435768997,
-                  0.0080195308435768997,
-                  0.0080195308435768997,
-                  0.0080195308435768997,
-                  0.0080195308435768997,
-                  0.0080862533671899692,
-                  0.0080862533671899692,
-                  0.0080862533671899692,
-                  0.0080862533671899692,
-                  0.0080862533671899692,
-                  0.0080862533671899692,
-                  0.00115123952736084,
-                  0.00115123952736084,
-                  0.00115123952736084,
-                  0.00115123952736084,
-                  0.00115123952736084,
-                  0.00115123952736084,
-                  0.0014777660247833301,
-                  0.0014777660247833301,
-                  0.0014777660247833301,
-                  0.0014777660247833301,
-                  0.0014777660247833301,
-                  0.0014777660247833301,
-                  0.0089386950040611802,
-                  0.0089386950040611802,
-                  0.0089386950040611802,
-                  0.0089386950040611802,
-                  0.0089386950040611802,
-                  0.0089386950040611802,
-                  0.011756481837437599,
-                  0.011756481837437599,
-                  0.011756481837437599,
-                  0.00056003837094047398,
-                  0.00056003837094047398,
-                  0.00056003837094047398,
-                  0.00056003837094047398,
-                  0.00056003837094047398,
-                  0.00056003837094047398,
-                  0.0023447102391196701,
-                  0.0023447102391196701,
-                  0.0023447102391196701,
-                  0.0023447102391196701,
-                  0.0023447102391196701,
-                  0.0023447102391196701,
-                  0.0031646744505195801,
-                  0.0031646744505195801,
-                  0.0031646744505195801,
-                  0.0050514952003290004,
-                  0.0050514952003290004,
-                  0.0050514952003290004,
-                  0.0050514952003290004,
-                  0.0050514952003290004,
-                  0.0050514952003290004,
-                  0.0107896852952316,
-                  0.0107896852952316,
-                  0.0107896852952316,
-                  0.0107896852952316,
-                  0.0107896852952316,
-                  0.0107896852952316,
-                  0.010421459984456399,
-                  0.010421459984456399,
-                  0.010421459984456399,
-                  0.010421459984456399,
-                  0.010421459984456399,
-                  0.010421459984456399,
-                  0.0067338348047821404,
-                  0.0067338348047821404,
-                  0.0067338348047821404,
-                  0.0067338348047821404,
-                  0.0067338348047821404,
-                  0.0067338348047821404,
-                  0.0038250939834878002,
-                  0.0038250939834878002,
-                  0.0038250939834878002,
-                  0.0038250939834878002,
-                  0.0038250939834878002,
-                  0.0038250939834878002,
-                  0.00032463924071916801,
-                  0.00032463924071916801,
-                  0.00032463924071916801,
-                  0.00032463924071916801,
-                  0.00032463924071916801,
-                  0.00032463924071916801,
-                  0.00327917692086075,
-                  0.00327917692086075,
-                  0.00327917692086075,
-                  0.00327917692086075,
-                  0.00327917692086075,
-                  0.00327917692086075,
-                  0.0123679572301742,
-                  0.0123679572301742,
-                  0.0123679572301742,
-                  0.0123679572301742,
-                  0.0123679572301742,
-                  0.0123679572301742,
-                  0.011351351826664101,
-                  0.011351351826664101,
-                  0.011351351826664101,
-                  0.011351351826664101,
-                  0.011351351826664101,
-                  0.011351351826664101,
-                  0.0044506136583585898,
-                  0.0044506136583585898,
-                  0.0044506136583585898,
-                  0.0044506136583585898,
-                  0.0044506136583585898,
-                  0.0044506136583585898,
-                  0.0077067941878348903,
-                  0.0077067941878348903,
-                  0.0077067941878348903,
-                  0.0077067941878348903,
-                  0.0077067941878348903,
-                  0.0077067941878348903,
-                  0.00154000242082953,
-                  0.00154000242082953,
-                  0.00154000242082953,
-                  0.00154000242082953,
-                  0.00154000242082953,
-                  0.00154000242082953,
-                  0.0092593471691848998,
-                  0.0092593471691848998,
-                  0.0092593471691848998,
-                  0.0092593471691848998,
-                  0.0092593471691848998,
-                  0.0092593471691848998,
-                  0.00161362077307747,
-                  0.00161362077307747,
-                  0.00161362077307747,
-                  0.00161362077307747,
-                  0.00161362077307747,
-                  0.00161362077307747,
-                  0.0108896041038799,
-                  0.0108896041038799,
-                  0.0108896041038799,
-                  0.0108896041038799,
-                  0.0108896041038799,
-                  0.0108896041038799,
-                  0.0050320293169129598,
-                  0.0050320293169129598,
-                  0.0050320293169129598,
-                  0.0010558375498924801,
-                  0.0010558375498924801,
-                  0.0010558375498924801,
-                  0.0010558375498924801,
-                  0.0010558375498924801,
-                  0.0010558375498924801,
-                  0.0102834430524138,
-                  0.0102834430524138,
-                  0.0102834430524138,
-                  0.0102834430524138,
-                  0.0102834430524138,
-                  0.0102834430524138,
-                  0.0100886352611363,
-                  0.0100886352611363,
-                  0.0100886352611363,
-                  0.0121567575690343,
-                  0.0121567575690343,
-                  0.0121567575690343,
-                  0.00017162808984391801,
-                  0.00017162808984391801,
-                  0.00017162808984391801,
-                  0.0040910943745339602,
-                  0.0040910943745339602,
-                  0.0040910943745339602,
-                  0.0040910943745339602,
-                  0.0040910943745339602,
-                  0.0040910943745339602,
-                  0.00042874697577483802,
-                  0.00042874697577483802,
-                  0.00042874697577483802,
-                  0.00042874697577483802,
-                  0.00042874697577483802,
-                  0.00042874697577483802]},
- 45: {'points': [[-0.96749796278768396, -0.56471941069694798],
-                 [0.97281033706757702, -0.555518108535352],
-                 [-0.0053123742798924, 1.1202375192323],
-                 [0.96749796278768396, -0.56471941069694798],
-                 [0.00531237427989306, 1.1202375192323],
-                 [-0.97281033706757702, -0.555518108535351],
-                 [-0.98943904955500706, -0.57501200548013598],
-                 [0.99269452900433797, -0.56937334967089803],
-                 [-0.0032554794493304699, 1.1443853551510299],
-                 [0.98943904955500706, -0.57501200548013598],
-                 [0.00325547944933113, 1.1443853551510299],
-                 [-0.99269452900433797, -0.56937334967089803],
-                 [-0.85724783085411704, -0.56546982796685097],
-                 [0.91833515151996803, -0.45966348487534597],
-                 [-0.061087320665850202, 1.0251333128422],
-                 [0.85724783085411704, -0.56546982796685097],
-                 [0.061087320665850903, 1.0251333128422],
-                 [-0.91833515151996803, -0.45966348487534497],
-                 [-0.86009422327718299, -0.575220248539144],
-                 [0.92820245964468895, -0.45725332273671399],
-                 [-0.068108236367505598, 1.0324735712758599],
-                 [0.86009422327718399, -0.575220248539144],
-                 [0.068108236367506098, 1.0324735712758599],
-                 [-0.92820245964468995, -0.45725332273671299],
-                 [-0.054678180057409299, -0.56214268954647695],
-                 [0.51416893972766298, 0.23371865181082199],
-                 [-0.45949075967025299, 0.32842403773565498],
-                 [0.054678180057409001, -0.56214268954647695],
-                 [0.45949075967025299, 0.32842403773565498],
-                 [-0.51416893972766198, 0.23371865181082299],
-                 [-0.49732663296837698, -0.57443518202158395],
-                 [0.74613877694241804, -0.143479907118402],
-                 [-0.248812143974041, 0.71791508913998603],
-                 [0.49732663296837698, -0.57443518202158395],
-                 [0.248812143974041, 0.71791508913998603],
-                 [-0.74613877694241804, -0.143479907118401],
-                 [-0.96239582473678997, -0.57430537135662996],
-                 [0.97856095349309202, -0.54630654703982195],
-                 [-0.016165128756301699, 1.12061191839645],
-                 [0.96239582473678997, -0.57430537135662996],
-                 [0.016165128756302501, 1.12061191839645],
-                 [-0.97856095349309202, -0.54630654703982096],
-                 [-0.27961070235673102, -0.57479443137000497],
-                 [0.63759193069862097, 0.045247244274063902],
-                 [-0.35798122834189, 0.52954718709594195],
-                 [0.27961070235673102, -0.57479443137000497],
-                 [0.35798122834189, 0.52954718709594195],
-                 [-0.63759193069862097, 0.045247244274064097],
-                 [-0.40402890296751198, -0.31119792517448303],
-                 [0.47151976028986697, -0.194300331245782],
-                 [-0.067490857322354797, 0.50549825642026602],
-                 [0.40402890296751298, -0.31119792517448303],
-                 [0.067490857322355199, 0.50549825642026602],
-                 [-0.47151976028986797, -0.194300331245782],
-                 [-0.29442839410535798, -0.183091829756063],
-                 [0.30577637284680498, -0.16343655401266499],
-                 [-0.0113479787414468, 0.34652838376872902],
-                 [0.29442839410535798, -0.183091829756063],
-                 [0.011347978741446999, 0.34652838376872902],
-                 [-0.30577637284680498, -0.16343655401266499],
-                 [-0.610580040099169, -0.35251855051306802],
-                 [0.61058004009917, -0.35251855051306802],
-                 [0.0, 0.70503710102613704],
-                 [-0.43275119028613701, -0.379544805425301],
-                 [0.54507103851579997, -0.18500112159309801],
-                 [-0.112319848229664, 0.56454592701839901],
-                 [0.43275119028613701, -0.379544805425301],
-                 [0.112319848229664, 0.56454592701839901],
-                 [-0.54507103851580097, -0.18500112159309701],
-                 [-0.44044389245586801, -0.438136582528725],
-                 [0.59965935702510698, -0.16236730854412099],
-                 [-0.15921546456923899, 0.60050389107284596],
-                 [0.44044389245586801, -0.438136582528725],
-                 [0.15921546456923899, 0.60050389107284596],
-                 [-0.59965935702510698, -0.16236730854411999],
-                 [-0.61279883033232496, -0.52431770764693097],
-                 [0.76047186964242797, -0.26854050065371798],
-                 [-0.14767303931010201, 0.79285820830065001],
-                 [0.61279883033232496, -0.52431770764693097],
-                 [0.14767303931010201, 0.79285820830065001],
-                 [-0.76047186964242797, -0.26854050065371798],
-                 [-0.38095100310734997, -0.21994216419208701],
-                 [0.38095100310734997, -0.21994216419208701],
-                 [0.0, 0.43988432838417402],
-                 [-0.47474623357918, -0.27409486575370101],
-                 [0.47474623357918, -0.27409486575370001],
-                 [0.0, 0.54818973150740102],
-                 [-0.40788451897774203, -0.53068517830945805],
-                 [0.66352910531673603, -0.087895766090391306],
-                 [-0.25564458633899401, 0.61858094439985001],
-                 [0.40788451897774203, -0.53068517830945805],
-                 [0.25564458633899401, 0.61858094439985001],
-                 [-0.66352910531673603, -0.087895766090391],
-                 [-0.69268856593560801, -0.52054382897965201],
-                 [0.79714846264740502, -0.339613980521423],
-                 [-0.10445989671179701, 0.86015780950107501],
-                 [0.69268856593560801, -0.52054382897965201],
-                 [0.10445989671179701, 0.86015780950107501],
-                 [-0.79714846264740502, -0.339613980521422],
-                 [0.0, -0.57563407311774795],
-                 [0.49851373060387799, 0.28781703655887397],
-                 [-0.49851373060387799, 0.28781703655887397],
-                 [-0.76676405679321202, -0.52066524714991103],
-                 [0.83429135929613196, -0.40370452831678],
-                 [-0.067527302502920397, 0.92436977546669197],
-                 [0.76676405679321202, -0.52066524714991103],
-                 [0.067527302502920994, 0.92436977546669197],
-                 [-0.83429135929613296, -0.403704528316779],
-                 [-0.88142494556619699, -0.55109220346610699],
-                 [0.91797232081228897, -0.48779029265658902],
-                 [-0.036547375246092299, 1.0388824961226999],
-                 [0.88142494556619699, -0.55109220346610699],
-                 [0.036547375246093, 1.0388824961226999],
-                 [-0.91797232081228997, -0.48779029265658902],
-                 [-0.30788563677170899, -0.28136936804129398],
-                 [0.39761583895638802, -0.125952098884001],
-                 [-0.089730202184679198, 0.40732146692529497],
-                 [0.30788563677170899, -0.28136936804129398],
-                 [0.089730202184679503, 0.40732146692529497],
-                 [-0.39761583895638802, -0.125952098884001],
-                 [-0.51690806387591803, -0.52770400117212002],
-                 [0.71545910263170798, -0.183803514151514],
-                 [-0.19855103875579, 0.71150751532363499],
-                 [0.51690806387591803, -0.52770400117212002],
-                 [0.19855103875579, 0.71150751532363499],
-                 [-0.71545910263170798, -0.183803514151514],
-                 [-0.36522335396393701, -0.55536072100117395],
-                 [0.66356816963302701, -0.038612342087538699],
-                 [-0.29834481566908999, 0.593973063088713],
-                 [0.36522335396393701, -0.55536072100117395],
-                 [0.29834481566908999, 0.593973063088713],
-                 [-0.66356816963302701, -0.038612342087538297],
-                 [-0.83433874281849096, -0.48170569776159],
-                 [0.83433874281849096, -0.48170569776159],
-                 [0.0, 0.96341139552318],
-                 [-0.54085071215301295, -0.42510034407525699],
-                 [0.63857305320318503, -0.25584028434178502],
-                 [-0.097722341050171899, 0.68094062841704295],
-                 [0.54085071215301195, -0.42510034407525699],
-                 [0.097722341050172398, 0.68094062841704295],
-                 [-0.63857305320318503, -0.25584028434178502],
-                 [-0.83755436630162206, -0.52414106878540401],
-                 [0.872696663885697, -0.46327282387508001],
-                 [-0.035142297584074902, 0.98741389266048396],
-                 [0.83755436630162206, -0.52414106878540401],
-                 [0.035142297584075603, 0.98741389266048396],
-                 [-0.872696663885698, -0.46327282387508001],
-                 [-0.394004509169399, -0.57247532448088401],
-                 [0.69278042862488498, -0.054980251905876097],
-                 [-0.29877591945548598, 0.62745557638676097],
-                 [0.394004509169399, -0.57247532448088401],
-                 [0.29877591945548598, 0.62745557638676097],
-                 [-0.69278042862488498, -0.054980251905875702],
-                 [-0.33507526831923601, -0.43906434358617003],
-                 [0.54777850960118002, -0.070651522751260104],
-                 [-0.21270324128194501, 0.50971586633743104],
-                 [0.33507526831923601, -0.43906434358617003],
-                 [0.21270324128194501, 0.50971586633743104],
-                 [-0.54777850960118102, -0.070651522751259604],
-                 [-0.93207383259146304, -0.55427727760435297],
-                 [0.94605511944158105, -0.53006097842475497],
-                 [-0.0139812868501173, 1.0843382560291099],
-                 [0.93207383259146304, -0.55427727760435297],
-                 [0.0139812868501181, 1.0843382560291099],
-                 [-0.94605511944158105, -0.53006097842475397],
-                 [-0.102541702490218, -0.0592024795358898],
-                 [0.102541702490218, -0.0592024795358898],
-                 [0.0, 0.11840495907178],
-                 [-0.24725397282679601, -0.56071879514252199],
-                 [0.609223707386225, 0.066231175916628499],
-                 [-0.36196973455942799, 0.49448761922589402],
-                 [0.24725397282679601, -0.56071879514252199],
-                 [0.36196973455942899, 0.49448761922589402],
-                 [-0.609223707386225, 0.066231175916628901],
-                 [-0.59548295462739298, -0.57301592049564298],
-                 [0.79398782123584799, -0.22919540598011701],
-                 [-0.19850486660845401, 0.80221132647576099],
-                 [0.59548295462739298, -0.57301592049564298],
-                 [0.19850486660845501, 0.80221132647575999],
-                 [-0.79398782123584799, -0.22919540598011701],
-                 [-0.21190291318947099, -0.227942225526378],
-                 [0.30335521449574099, -0.069542193194820898],
-                 [-0.091452301306269801, 0.29748441872120002],
-                 [0.21190291318947099, -0.227942225526378],
-                 [0.091452301306269995, 0.29748441872120002],
-                 [-0.30335521449574099, -0.069542193194820801],
-                 [-0.48065853549210602, -0.48610984701993099],
-                 [0.66131274429508002, -0.173207578772023],
-                 [-0.180654208802974, 0.65931742579195396],
-                 [0.48065853549210602, -0.48610984701993099],
-                 [0.180654208802974, 0.65931742579195396],
-                 [-0.66131274429508002, -0.173207578772022],
-                 [-0.58563257009522296, -0.48075527463104201],
-                 [0.70916256588145798, -0.26679504567051299],
-                 [-0.123529995786235, 0.74755032030155499],
-                 [0.58563257009522296, -0.48075527463104201],
-                 [0.123529995786236, 0.74755032030155499],
-                 [-0.70916256588145898, -0.26679504567051199],
-                 [0.0, -0.116563360991777],
-                 [0.100946831769375, 0.058281680495888603],
-                 [-0.100946831769375, 0.058281680495888701],
-                 [-0.36489263643259701, -0.49380185173253699],
-                 [0.61009126625247301, -0.069105366938239196],
-                 [-0.245198629819876, 0.56290721867077698],
-                 [0.36489263643259701, -0.49380185173253699],
-                 [0.245198629819876, 0.56290721867077698],
-                 [-0.61009126625247301, -0.069105366938239002],
-                 [-0.10662122389563899, -0.17257418086954501],
-                 [0.202764236618137, -0.0060495980414392303],
-                 [-0.096143012722497104, 0.17862377891098499],
-                 [0.10662122389563899, -0.17257418086954501],
-                 [0.096143012722497104, 0.17862377891098499],
-                 [-0.202764236618136, -0.0060495980414391201],
-                 [-0.630986462168169, -0.41685471639662602],
-                 [0.67650000517092002, -0.33802294748339001],
-                 [-0.045513543002751101, 0.75487766388001598],
-                 [0.630986462168169, -0.41685471639662602],
-                 [0.045513543002751802, 0.75487766388001598],
-                 [-0.67650000517092002, -0.33802294748338901],
-                 [-0.109519500344725, -0.27691779802002697],
-                 [0.29457759801775402, 0.0436122295017028],
-                 [-0.185058097673029, 0.23330556851832501],
-                 [0.109519500344725, -0.27691779802002697],
-                 [0.185058097673029, 0.23330556851832501],
-                 [-0.29457759801775402, 0.043612229501703098],
-                 [-0.14147353942032001, -0.54643161443323596],
-                 [0.54396042924028598, 0.15069612811532199],
-                 [-0.402486889819966, 0.395735486317915],
-                 [0.14147353942032001, -0.54643161443323596],
-                 [0.402486889819966, 0.395735486317914],
-                 [-0.54396042924028598, 0.15069612811532199],
-                 [-0.321951041497192, -0.36959650358697799],
-                 [0.48105548200482501, -0.094019528917936801],
-                 [-0.159104440507633, 0.46361603250491501],
-                 [0.321951041497192, -0.36959650358697799],
-                 [0.159104440507634, 0.46361603250491501],
-                 [-0.48105548200482501, -0.094019528917936496],
-                 [-0.79909003824949698, -0.55312820158517195],
-                 [0.87856809324710705, -0.415468172242557],
-                 [-0.079478054997609807, 0.96859637382773001],
-                 [0.79909003824949698, -0.55312820158517195],
-                 [0.079478054997610403, 0.96859637382773001],
-                 [-0.87856809324710705, -0.415468172242557],
-                 [-0.10582426030688299, -0.37061655711808],
-                 [0.37387548368082502, 0.093661780796582605],
-                 [-0.26805122337394199, 0.27695477632149801],
-                 [0.10582426030688299, -0.37061655711808],
-                 [0.26805122337394199, 0.27695477632149801],
-                 [-0.37387548368082502, 0.0936617807965828],
-                 [-0.112045953691598, -0.44989790809755298],
-                 [0.44564599436775598, 0.127914311760598],
-                 [-0.33360004067615801, 0.321983596336956],
-                 [0.112045953691598, -0.44989790809755298],
-                 [0.333600040676159, 0.321983596336955],
-                 [-0.44564599436775598, 0.127914311760598],
-                 [-0.61200208537204004, -0.555324215808911],
-                 [0.78692592091320901, -0.25234724519678398],
-                 [-0.174923835541169, 0.80767146100569498],
-                 [0.61200208537204004, -0.555324215808911],
-                 [0.174923835541169, 0.80767146100569498],
-                 [-0.78692592091320901, -0.25234724519678298],
-                 [-0.205235072828858, -0.11849252454489401],
-                 [0.205235072828858, -0.11849252454489401],
-                 [0.0, 0.23698504908978801],
-                 [-0.69310856751576, -0.57312340633371495],
-                 [0.84289371314634798, -0.313687923882432],
-                 [-0.14978514563058801, 0.886811330216147],
-                 [0.69310856751576, -0.57312340633371495],
-                 [0.14978514563058901, 0.886811330216147],
-                 [-0.84289371314634798, -0.313687923882432],
-                 [-0.521825370449579, -0.35237310557002599],
-                 [0.56607674625884796, -0.275727474363548],
-                 [-0.044251375809268703, 0.62810057993357404],
-                 [0.521825370449579, -0.35237310557002599],
-                 [0.044251375809269099, 0.62810057993357404],
-                 [-0.56607674625884796, -0.275727474363547],
-                 [0.0, -0.22563680509593201],
-                 [0.195407205241835, 0.112818402547966],
-                 [-0.195407205241835, 0.112818402547966],
-                 [-0.213303059261643, -0.32814170713377599],
-                 [0.39083058404986498, -0.020655014458632499],
-                 [-0.17752752478822201, 0.34879672159240899],
-                 [0.213303059261643, -0.32814170713377599],
-                 [0.17752752478822201, 0.34879672159240899],
-                 [-0.39083058404986498, -0.020655014458632201],
-                 [-0.76353151836479005, -0.47540208897837699],
-                 [0.79347604524986004, -0.42353664700482402],
-                 [-0.029944526885069302, 0.89893873598320195],
-                 [0.76353151836479005, -0.47540208897837699],
-                 [0.029944526885069999, 0.89893873598320195],
-                 [-0.79347604524986004, -0.42353664700482402],
-                 [-0.678844827511766, -0.47291221034981001],
-                 [0.74897640167866897, -0.35144076067794999],
-                 [-0.070131574166902605, 0.82435297102776095],
-                 [0.678844827511766, -0.47291221034981001],
-                 [0.070131574166903105, 0.82435297102776095],
-                 [-0.74897640167866897, -0.35144076067794899],
-                 [0.0, -0.41322179544695797],
-                 [0.35786057225448298, 0.20661089772347899],
-                 [-0.35786057225448298, 0.20661089772348001],
-                 [-0.71309872195622104, -0.55444311333444296],
-                 [0.83671118207907202, -0.34034005195308198],
-                 [-0.123612460122851, 0.894783165287525],
-                 [0.71309872195622104, -0.55444311333444296],
-                 [0.123612460122851, 0.894783165287525],
-                 [-0.83671118207907202, -0.34034005195308198],
-                 [-0.23702202213866999, -0.47815353791872001],
-                 [0.53260412181635197, 0.0338096765309139],
-                 [-0.29558209967768201, 0.44434386138780602],
-                 [0.23702202213866999, -0.47815353791872001],
-                 [0.29558209967768201, 0.44434386138780602],
-                 [-0.53260412181635197, 0.033809676530914302],
-                 [-0.49629255197943001, -0.55841263605812597],
-                 [0.73174580461028604, -0.15059563969413201],
-                 [-0.23545325263085601, 0.709008275752259],
-                 [0.49629255197943001, -0.55841263605812597],
-                 [0.23545325263085601, 0.709008275752258],
-                 [-0.73174580461028604, -0.15059563969413201],
-                 [0.0, -0.32398951274847598],
-                 [0.28058314859992201, 0.16199475637423799],
-                 [-0.28058314859992201, 0.16199475637423799],
-                 [0.0, 2.2204460492503101e-16],
-                 [-0.21703474679151, -0.41120300953009697],
-                 [0.46462962576143402, 0.0176439005396779],
-                 [-0.24759487896992399, 0.39355910899042001],
-                 [0.21703474679151, -0.41120300953009697],
-                 [0.24759487896992399, 0.39355910899042001],
-                 [-0.46462962576143402, 0.017643900539678199],
-                 [-0.127911643011315, -0.50863906936384495],
-                 [0.50445017693202199, 0.14354480239431799],
-                 [-0.37653853392070702, 0.36509426696952801],
-                 [0.127911643011315, -0.50863906936384495],
-                 [0.37653853392070802, 0.36509426696952801],
-                 [-0.50445017693202199, 0.14354480239431799],
-                 [-0.71628268859951605, -0.41354600307880002],
-                 [0.71628268859951705, -0.41354600307879902],
-                 [0.0, 0.82709200615760003],
-                 [0.0, -0.483783051600848],
-                 [0.41896841260669199, 0.241891525800424],
-                 [-0.41896841260669199, 0.241891525800424],
-                 [-0.91918133084949905, -0.57250910447612802],
-                 [0.95539809379895502, -0.50977983096199098],
-                 [-0.036216762949455902, 1.08228893543812],
-                 [0.91918133084949905, -0.57250910447612802],
-                 [0.0362167629494567, 1.08228893543812],
-                 [-0.95539809379895602, -0.50977983096199098],
-                 [-0.78297196007811098, -0.57273156232313405],
-                 [0.88748606256004003, -0.39170782671697202],
-                 [-0.10451410248192899, 0.96443938904010695],
-                 [0.78297196007811098, -0.57273156232313405],
-                 [0.10451410248192899, 0.96443938904010695],
-                 [-0.88748606256004003, -0.39170782671697202],
-                 [-0.14461283051109, -0.57295167407019798],
-                 [0.56849712014115805, 0.161237452099322],
-                 [-0.42388428963006802, 0.41171422197087698],
-                 [0.14461283051109, -0.57295167407019798],
-                 [0.42388428963006902, 0.41171422197087698],
-                 [-0.56849712014115805, 0.161237452099322],
-                 [-0.89774457652960205, -0.51831307292289297],
-                 [0.89774457652960205, -0.51831307292289197],
-                 [0.0, 1.0366261458457899],
-                 [-0.26734836171405202, -0.52758606695132704],
-                 [0.59057711751959296, 0.032262560571143399],
-                 [-0.323228755805541, 0.49532350638018402],
-                 [0.26734836171405202, -0.52758606695132704],
-                 [0.323228755805541, 0.49532350638018402],
-                 [-0.59057711751959296, 0.032262560571144003],
-                 [0.0, -0.532313473095404],
-                 [0.46099699047734499, 0.266156736547702],
-                 [-0.46099699047734399, 0.266156736547703]],
-      'weights': [0.00033654859994815901,
-                  0.00033654859994815901,
-                  0.00033654859994815901,
-                  0.00033654859994815901,
-                  0.00033654859994815901,
-                  0.00033654859994815901,
-                  0.00010282576014238399,
-                  0.00010282576014238399,
-                  0.00010282576014238399,
-                  0.00010282576014238399,
-                  0.00010282576014238399,
-                  0.00010282576014238399,
-                  0.00083257726401922796,
-                  0.00083257726401922796,
-                  0.00083257726401922796,
-                  0.00083257726401922796,
-                  0.00083257726401922796,
-                  0.00083257726401922796,
-                  0.000398588076910798,
-                  0.000398588076910798,
-                  0.000398588076910798,
-                  0.000398588076910798,
-                  0.000398588076910798,
-                  0.000398588076910798,
-                  0.0022420751944656802,
-                  0.0022420751944656802,
-                  0.0022420751944656802,
-                  0.0022420751944656802,
-                  0.0022420751944656802,
-                  0.0022420751944656802,
-                  0.00079764559378672805,
-                  0.00079764559378672805,
-                  0.00079764559378672805,
-                  0.00079764559378672805,
-                  0.00079764559378672805,
-                  0.00079764559378672805,
-                  0.00026858740054026901,
-                  0.00026858740054026901,
-                  0.00026858740054026901,
-                  0.00026858740054026901,
-                  0.00026858740054026901,
-                  0.00026858740054026901,
-                  0.00091180700000119603,
-                  0.00091180700000119603,
-                  0.00091180700000119603,
-                  0.00091180700000119603,
-                  0.00091180700000119603,
-                  0.00091180700000119603,
-                  0.0070626152242044696,
-                  0.0070626152242044696,
-                  0.0070626152242044696,
-                  0.0070626152242044696,
-                  0.0070626152242044696,
-                  0.0070626152242044696,
-                  0.0047238865228060502,
-                  0.0047238865228060502,
-                  0.0047238865228060502,
-                  0.0047238865228060502,
-                  0.0047238865228060502,
-                  0.0047238865228060502,
-                  0.0055467492114406004,
-                  0.0055467492114406004,
-                  0.0055467492114406004,
-                  0.0066126900146778701,
-                  0.0066126900146778701,
-                  0.0066126900146778701,
-                  0.0066126900146778701,
-                  0.0066126900146778701,
-                  0.0066126900146778701,
-                  0.0056180625550610597,
-                  0.0056180625550610597,
-                  0.0056180625550610597,
-                  0.0056180625550610597,
-                  0.0056180625550610597,
-                  0.0056180625550610597,
-                  0.0032648563947682298,
-                  0.0032648563947682298,
-                  0.0032648563947682298,
-                  0.0032648563947682298,
-                  0.0032648563947682298,
-                  0.0032648563947682298,
-                  0.0080321238052439205,
-                  0.0080321238052439205,
-                  0.0080321238052439205,
-                  0.0070789963798301098,
-                  0.0070789963798301098,
-                  0.0070789963798301098,
-                  0.0037771219725382102,
-                  0.0037771219725382102,
-                  0.0037771219725382102,
-                  0.0037771219725382102,
-                  0.0037771219725382102,
-                  0.0037771219725382102,
-                  0.0031775879168395998,
-                  0.0031775879168395998,
-                  0.0031775879168395998,
-                  0.0031775879168395998,
-                  0.0031775879168395998,
-                  0.0031775879168395998,
-                  0.00083677716771506701,
-                  0.00083677716771506701,
-                  0.00083677716771506701,
-                  0.0028186352068682,
-                  0.0028186352068682,
-                  0.0028186352068682,
-                  0.0028186352068682,
-                  0.0028186352068682,
-                  0.0028186352068682,
-                  0.00143506094200954,
-                  0.00143506094200954,
-                  0.00143506094200954,
-                  0.00143506094200954,
-                  0.00143506094200954,
-                  0.00143506094200954,
-                  0.0088464323294360197,
-                  0.0088464323294360197,
-                  0.0088464323294360197,
-                  0.0088464323294360197,
-                  0.0088464323294360197,
-                  0.0088464323294360197,
-                  0.00387825810150638,
-                  0.00387825810150638,
-                  0.00387825810150638,
-                  0.00387825810150638,
-                  0.00387825810150638,
-                  0.00387825810150638,
-                  0.00284086186834762,
-                  0.00284086186834762,
-                  0.00284086186834762,
-                  0.00284086186834762,
-                  0.00284086186834762,
-                  0.00284086186834762,
-                  0.0029316867608479799,
-                  0.0029316867608479799,
-                  0.0029316867608479799,
-                  0.0063595214016810503,
-                  0.0063595214016810503,
-                  0.0063595214016810503,
-                  0.0063595214016810503,
-                  0.0063595214016810503,
-                  0.0063595214016810503,
-                  0.0024473963501961101,
-                  0.0024473963501961101,
-                  0.0024473963501961101,
-                  0.0024473963501961101,
-                  0.0024473963501961101,
-                  0.0024473963501961101,
-                  0.00132405238493273,
-                  0.00132405238493273,
-                  0.00132405238493273,
-                  0.00132405238493273,
-                  0.00132405238493273,
-                  0.00132405238493273,
-                  0.0068485836710583401,
-                  0.0068485836710583401,
-                  0.0068485836710583401,
-                  0.0068485836710583401,
-                  0.0068485836710583401,
-                  0.0068485836710583401,
-                  0.00111688446229048,
-                  0.00111688446229048,
-                  0.00111688446229048,
-                  0.00111688446229048,
-                  0.00111688446229048,
-                  0.00111688446229048,
-                  0.011836411517206101,
-                  0.011836411517206101,
-                  0.011836411517206101,
-                  0.0026929179486143602,
-                  0.0026929179486143602,
-                  0.0026929179486143602,
-                  0.0026929179486143602,
-                  0.0026929179486143602,
-                  0.0026929179486143602,
-                  0.00108509483049269,
-                  0.00108509483049269,
-                  0.00108509483049269,
-                  0.00108509483049269,
-                  0.00108509483049269,
-                  0.00108509483049269,
-                  0.0103781119883845,
-                  0.0103781119883845,
-                  0.0103781119883845,
-                  0.0103781119883845,
-                  0.0103781119883845,
-                  0.0103781119883845,
-                  0.0052973350455986397,
-                  0.0052973350455986397,
-                  0.0052973350455986397,
-                  0.0052973350455986397,
-                  0.0052973350455986397,
-                  0.0052973350455986397,
-                  0.0051899307301942,
-                  0.0051899307301942,
-                  0.0051899307301942,
-                  0.0051899307301942,
-                  0.0051899307301942,
-                  0.0051899307301942,
-                  0.0119381685025649,
-                  0.0119381685025649,
-                  0.0119381685025649,
-                  0.0056003673261564796,
-                  0.0056003673261564796,
-                  0.0056003673261564796,
-                  0.0056003673261564796,
-                  0.0056003673261564796,
-                  0.0056003673261564796,
-                  0.0115118407657606,
-                  0.0115118407657606,
-                  0.0115118407657606,
-                  0.0115118407657606,
-                  0.0115118407657606,
-                  0.0115118407657606,
-                  0.0055337376691505904,
-                  0.0055337376691505904,
-                  0.0055337376691505904,
-                  0.0055337376691505904,
-                  0.0055337376691505904,
-                  0.0055337376691505904,
-                  0.0106728826707343,
-                  0.0106728826707343,
-                  0.0106728826707343,
-                  0.0106728826707343,
-                  0.0106728826707343,
-                  0.0106728826707343,
-                  0.00378248326506365,
-                  0.00378248326506365,
-                  0.00378248326506365,
-                  0.00378248326506365,
-                  0.00378248326506365,
-                  0.00378248326506365,
-                  0.0083800580198710901,
-                  0.0083800580198710901,
-                  0.0083800580198710901,
-                  0.0083800580198710901,
-                  0.0083800580198710901,
-                  0.0083800580198710901,
-                  0.00202813366858157,
-                  0.00202813366858157,
-                  0.00202813366858157,
-                  0.00202813366858157,
-                  0.00202813366858157,
-                  0.00202813366858157,
-                  0.0093660592971227894,
-                  0.0093660592971227894,
-                  0.0093660592971227894,
-                  0.0093660592971227894,
-                  0.0093660592971227894,
-                  0.0093660592971227894,
-                  0.0078520602928134706,
-                  0.0078520602928134706,
-                  0.0078520602928134706,
-                  0.0078520602928134706,
-                  0.0078520602928134706,
-                  0.0078520602928134706,
-                  0.0026445721531917401,
-                  0.0026445721531917401,
-                  0.0026445721531917401,
-                  0.0026445721531917401,
-                  0.0026445721531917401,
-                  0.0026445721531917401,
-                  0.010937306744303101,
-                  0.010937306744303101,
-                  0.010937306744303101,
-                  0.0010367289853215999,
-                  0.0010367289853215999,
-                  0.0010367289853215999,
-                  0.0010367289853215999,
-                  0.0010367289853215999,
-                  0.0010367289853215999,
-                  0.0073115709070896897,
-                  0.0073115709070896897,
-                  0.0073115709070896897,
-                  0.0073115709070896897,
-                  0.0073115709070896897,
-                  0.0073115709070896897,
-                  0.0113593218020028,
-                  0.0113593218020028,
-                  0.0113593218020028,
-                  0.0095515019661804104,
-                  0.0095515019661804104,
-                  0.0095515019661804104,
-                  0.0095515019661804104,
-                  0.0095515019661804104,
-                  0.0095515019661804104,
-                  0.0040481107130878298,
-                  0.0040481107130878298,
-                  0.0040481107130878298,
-                  0.0040481107130878298,
-                  0.0040481107130878298,
-                  0.0040481107130878298,
-                  0.0048289385169819898,
-                  0.0048289385169819898,
-                  0.0048289385169819898,
-                  0.0048289385169819898,
-                  0.0048289385169819898,
-                  0.0048289385169819898,
-                  0.0086894555241308295,
-                  0.0086894555241308295,
-                  0.0086894555241308295,
-                  0.0024778285760194401,
-                  0.0024778285760194401,
-                  0.0024778285760194401,
-                  0.0024778285760194401,
-                  0.0024778285760194401,
-                  0.0024778285760194401,
-                  0.0068797789727415301,
-                  0.0068797789727415301,
-                  0.0068797789727415301,
-                  0.0068797789727415301,
-                  0.0068797789727415301,
-                  0.0068797789727415301,
-                  0.0028111555774784302,
-                  0.0028111555774784302,
-                  0.0028111555774784302,
-                  0.0028111555774784302,
-                  0.0028111555774784302,
-                  0.0028111555774784302,
-                  0.0101888046825232,
-                  0.0101888046825232,
-                  0.0101888046825232,
-                  0.0120229781205925,
-                  0.0083672860925062507,
-                  0.0083672860925062507,
-                  0.0083672860925062507,
-                  0.0083672860925062507,
-                  0.0083672860925062507,
-                  0.0083672860925062507,
-                  0.0061309035520409998,
-                  0.0061309035520409998,
-                  0.0061309035520409998,
-                  0.0061309035520409998,
-                  0.0061309035520409998,
-                  0.0061309035520409998,
-                  0.0054336918671010499,
-                  0.0054336918671010499,
-                  0.0054336918671010499,
-                  0.00708939679471309,
-                  0.00708939679471309,
-                  0.00708939679471309,
-                  0.00063577694340262295,
-                  0.00063577694340262295,
-                  0.00063577694340262295,
-                  0.00063577694340262295,
-                  0.00063577694340262295,
-                  0.00063577694340262295,
-                  0.00098894889268104293,
-                  0.00098894889268104293,
-                  0.00098894889268104293,
-                  0.00098894889268104293,
-                  0.00098894889268104293,
-                  0.00098894889268104293,
-                  0.00151747316303939,
-                  0.00151747316303939,
-                  0.00151747316303939,
-                  0.00151747316303939,
-                  0.00151747316303939,
-                  0.00151747316303939,
-                  0.0021673406112320999,
-                  0.0021673406112320999,
-                  0.0021673406112320999,
-                  0.00534703305717215,
-                  0.00534703305717215,
-                  0.00534703305717215,
-                  0.00534703305717215,
-                  0.00534703305717215,
-                  0.00534703305717215,
-                  0.0052928108522197299,
-                  0.0052928108522197299,
-                  0.0052928108522197299]},
- 46: {'points': [[0.0, -0.505167777447736],
-                 [0.43748812844306301, 0.252583888723868],
-                 [-0.43748812844306301, 0.252583888723869],
-                 [-0.049937321552503099, -0.31040114421146298],
-                 [0.29378393702713601, 0.11195358304431199],
-                 [-0.24384661547463299, 0.19844756116715201],
-                 [0.049937321552503001, -0.31040114421146298],
-                 [0.24384661547463299, 0.19844756116715201],
-                 [-0.29378393702713601, 0.11195358304431199],
-                 [-0.058248078099625102, -0.38139174632823802],
-                 [0.35941898016377699, 0.14025155780822399],
-                 [-0.30117090206415198, 0.24114018852001501],
-                 [0.058248078099624803, -0.38139174632823802],
-                 [0.30117090206415298, 0.24114018852001501],
-                 [-0.35941898016377699, 0.14025155780822399],
-                 [-0.26752517246704899, -0.45087881559146198],
-                 [0.52423509456396999, -0.0062441877125468696],
-                 [-0.25670992209692001, 0.45712300330400901],
-                 [0.26752517246704899, -0.45087881559146198],
-                 [0.25670992209692001, 0.45712300330400901],
-                 [-0.52423509456396999, -0.0062441877125467603],
-                 [-0.43867813853252102, -0.38716524171664202],
-                 [0.55463400405521501, -0.18632379119571099],
-                 [-0.115955865522694, 0.57348903291235398],
-                 [0.43867813853252102, -0.38716524171664202],
-                 [0.115955865522694, 0.57348903291235398],
-                 [-0.55463400405521501, -0.18632379119571099],
-                 [-0.85395076125003999, -0.493028701882397],
-                 [0.85395076125003999, -0.493028701882396],
-                 [0.0, 0.98605740376479301],
-                 [0.0, -0.53179537383682796],
-                 [0.460548303357736, 0.26589768691841398],
-                 [-0.460548303357735, 0.26589768691841498],
-                 [-0.23976542950787999, -0.39923330820610597],
-                 [0.46562890169733101, -0.0080262988000575596],
-                 [-0.22586347218945099, 0.40725960700616398],
-                 [0.23976542950787999, -0.39923330820610597],
-                 [0.22586347218945099, 0.40725960700616398],
-                 [-0.46562890169733001, -0.00802629880005723],
-                 [-0.87549594799702801, -0.55924165141919502],
-                 [0.92206545098189896, -0.478580906166169],
-                 [-0.046569502984870399, 1.0378225575853599],
-                 [0.87549594799702801, -0.55924165141919502],
-                 [0.046569502984871197, 1.0378225575853599],
-                 [-0.92206545098189896, -0.478580906166168],
-                 [-0.41617075719872898, -0.32183421694439202],
-                 [0.48680198628027999, -0.19949733957410901],
-                 [-0.070631229081550506, 0.52133155651850105],
-                 [0.41617075719872898, -0.32183421694439202],
-                 [0.0706312290815507, 0.52133155651850105],
-                 [-0.48680198628027999, -0.19949733957410901],
-                 [-0.54326121142564299, -0.48706522111890299],
-                 [0.69344146050167599, -0.226945399425864],
-                 [-0.150180249076033, 0.71401062054476705],
-                 [0.54326121142564299, -0.48706522111890299],
-                 [0.150180249076034, 0.71401062054476705],
-                 [-0.69344146050167599, -0.226945399425864],
-                 [-0.49334938461621503, -0.43864037323932897],
-                 [0.62654839865885403, -0.20793291339939701],
-                 [-0.13319901404263901, 0.64657328663872704],
-                 [0.49334938461621503, -0.43864037323932897],
-                 [0.13319901404263901, 0.64657328663872704],
-                 [-0.62654839865885403, -0.20793291339939701],
-                 [-0.98141250190288798, -0.57360768783134397],
-                 [0.98746508041944103, -0.563124314323873],
-                 [-0.0060525785165532796, 1.1367320021552201],
-                 [0.98141250190288798, -0.57360768783134397],
-                 [0.0060525785165539397, 1.1367320021552201],
-                 [-0.98746508041944203, -0.563124314323872],
-                 [-0.065605474425671995, -0.55766758615272805],
-                 [0.51575703368824499, 0.22201778559640201],
-                 [-0.450151559262573, 0.33564980055632698],
-                 [0.065605474425671995, -0.55766758615272805],
-                 [0.450151559262573, 0.33564980055632598],
-                 [-0.51575703368824499, 0.22201778559640201],
-                 [-0.16097654175693801, -0.35256727255257703],
-                 [0.38582048545199199, 0.036873861701414198],
-                 [-0.224843943695055, 0.31569341085116298],
-                 [0.16097654175693801, -0.35256727255257703],
-                 [0.224843943695055, 0.31569341085116298],
-                 [-0.38582048545199199, 0.036873861701414497],
-                 [-0.329221434220691, -0.49258841625772298],
-                 [0.59120479919947799, -0.0388199173766045],
-                 [-0.26198336497878599, 0.53140833363432805],
-                 [0.329221434220691, -0.49258841625772298],
-                 [0.26198336497878599, 0.53140833363432805],
-                 [-0.59120479919947799, -0.038819917376604202],
-                 [-0.23167087272607301, -0.30296300817765398],
-                 [0.37820909785183798, -0.049151357008863299],
-                 [-0.146538225125765, 0.35211436518651801],
-                 [0.23167087272607301, -0.30296300817765398],
-                 [0.146538225125765, 0.35211436518651801],
-                 [-0.37820909785183798, -0.049151357008863],
-                 [-0.32291103943378302, -0.27337520447762198],
-                 [0.39820539155927798, -0.14296156107328301],
-                 [-0.075294352125494998, 0.41633676555090599],
-                 [0.32291103943378302, -0.27337520447762198],
-                 [0.075294352125495206, 0.41633676555090599],
-                 [-0.39820539155927798, -0.14296156107328301],
-                 [-0.41111557231165102, -0.23735768634217899],
-                 [0.41111557231165102, -0.23735768634217899],
-                 [0.0, 0.47471537268435798],
-                 [-0.50260385029871202, -0.29017846826570398],
-                 [0.50260385029871202, -0.29017846826570298],
-                 [0.0, 0.58035693653140796],
-                 [-0.079135174960542704, -0.48533267753756898],
-                 [0.45987801551452701, 0.17413326692002801],
-                 [-0.380742840553984, 0.31119941061754097],
-                 [0.079135174960542704, -0.48533267753756898],
-                 [0.380742840553984, 0.31119941061754097],
-                 [-0.45987801551452701, 0.17413326692002901],
-                 [-0.79501562539103099, -0.48917333384362499],
-                 [0.82114434665802105, -0.44391706107239298],
-                 [-0.026128721266989799, 0.93309039491601897],
-                 [0.79501562539103099, -0.48917333384362499],
-                 [0.026128721266990299, 0.93309039491601897],
-                 [-0.82114434665802105, -0.44391706107239298],
-                 [-0.435206228363817, -0.558087440036107],
-                 [0.70092101478620195, -0.097855929630223895],
-                 [-0.265714786422384, 0.65594336966633204],
-                 [0.435206228363817, -0.558087440036107],
-                 [0.265714786422385, 0.65594336966633104],
-                 [-0.70092101478620195, -0.097855929630223396],
-                 [-0.64094592211243895, -0.55694713731397605],
-                 [0.80280333053514297, -0.27660188234442701],
-                 [-0.16185740842270299, 0.833549019658403],
-                 [0.64094592211243895, -0.55694713731397605],
-                 [0.16185740842270399, 0.833549019658403],
-                 [-0.80280333053514297, -0.27660188234442601],
-                 [-0.31732449637355298, -0.556897994489438],
-                 [0.64095005873123601, 0.0036379221421195501],
-                 [-0.32362556235768303, 0.553260072347319],
-                 [0.31732449637355298, -0.556897994489438],
-                 [0.32362556235768403, 0.553260072347319],
-                 [-0.64095005873123601, 0.00363792214212011],
-                 [-0.198627679104313, -0.488593258540233],
-                 [0.52244801356581605, 0.072280013271037793],
-                 [-0.32382033446150299, 0.416313245269195],
-                 [0.198627679104313, -0.488593258540233],
-                 [0.32382033446150299, 0.416313245269195],
-                 [-0.52244801356581605, 0.072280013271038099],
-                 [-0.12403617126406601, -0.26117953849550202],
-                 [0.288206200917834, 0.023171293944912599],
-                 [-0.16417002965376801, 0.23800824455059],
-                 [0.12403617126406601, -0.26117953849550202],
-                 [0.16417002965376801, 0.23800824455059],
-                 [-0.288206200917834, 0.0231712939449128],
-                 [-0.43416110602837898, -0.483989489214672],
-                 [0.63622774583874997, -0.133999802548389],
-                 [-0.20206663981037101, 0.61798929176306205],
-                 [0.43416110602837898, -0.483989489214672],
-                 [0.20206663981037101, 0.61798929176306205],
-                 [-0.63622774583874997, -0.133999802548389],
-                 [-0.38864284496138302, -0.52999026102693303],
-                 [0.65330645228836104, -0.071579446222148305],
-                 [-0.26466360732697802, 0.60156970724908099],
-                 [0.38864284496138302, -0.52999026102693303],
-                 [0.26466360732697802, 0.60156970724908099],
-                 [-0.65330645228836104, -0.071579446222147805],
-                 [-0.49742313896156898, -0.52583495263659696],
-                 [0.70409799666186401, -0.167863598452617],
-                 [-0.20667485770029501, 0.69369855108921397],
-                 [0.49742313896156898, -0.52583495263659696],
-                 [0.20667485770029501, 0.69369855108921397],
-                 [-0.70409799666186401, -0.167863598452617],
-                 [-0.0655069090600717, -0.57355483546767905],
-                 [0.52946651250845, 0.230046770364421],
-                 [-0.463959603448378, 0.34350806510325899],
-                 [0.0655069090600717, -0.57355483546767905],
-                 [0.463959603448378, 0.34350806510325899],
-                 [-0.52946651250845, 0.230046770364421],
-                 [-0.54046107587222403, -0.555572041123234],
-                 [0.75137003918120604, -0.190267000900398],
-                 [-0.21090896330898101, 0.74583904202363305],
-                 [0.54046107587222503, -0.555572041123234],
-                 [0.21090896330898201, 0.74583904202363305],
-                 [-0.75137003918120604, -0.190267000900398],
-                 [-0.19374430311448601, -0.55739761697092705],
-                 [0.57959264786297404, 0.11091132014980599],
-                 [-0.385848344748488, 0.44648629682112201],
-                 [0.19374430311448601, -0.55739761697092705],
-                 [0.385848344748488, 0.44648629682112201],
-                 [-0.57959264786297404, 0.11091132014980699],
-                 [-0.21797347584325399, -0.212462524419952],
-                 [0.29298468142147699, -0.082539305221474998],
-                 [-0.075011205578223605, 0.29500182964142802],
-                 [0.217973475843253, -0.212462524419952],
-                 [0.075011205578223702, 0.29500182964142802],
-                 [-0.29298468142147699, -0.082539305221474901],
-                 [-0.31297864663886599, -0.18069830588755401],
-                 [0.31297864663886599, -0.18069830588755401],
-                 [0.0, 0.36139661177510801],
-                 [-0.100305694360814, -0.057911519640468097],
-                 [0.100305694360814, -0.057911519640468097],
-                 [0.0, 0.115823039280937],
-                 [-0.195845325124718, -0.57359024620476595],
-                 [0.59466638713865705, 0.117188096331954],
-                 [-0.39882106201393902, 0.45640214987281202],
-                 [0.195845325124719, -0.57359024620476595],
-                 [0.39882106201393902, 0.45640214987281202],
-                 [-0.59466638713865705, 0.117188096331954],
-                 [-0.63168655681204899, -0.48075999227146998],
-                 [0.73219364483632798, -0.30667660929262103],
-                 [-0.100507088024279, 0.78743660156409101],
-                 [0.63168655681204899, -0.48075999227146998],
-                 [0.100507088024279, 0.78743660156409101],
-                 [-0.73219364483632698, -0.30667660929262103],
-                 [-0.90233030436033501, -0.57371658547584403],
-                 [0.94801828977471503, -0.49458267344267198],
-                 [-0.045687985414379698, 1.0682992589185201],
-                 [0.90233030436033501, -0.57371658547584403],
-                 [0.0456879854143806, 1.0682992589185201],
-                 [-0.94801828977471503, -0.49458267344267198],
-                 [-0.60642348255765899, -0.52698535358924503],
-                 [0.75959444490944095, -0.26168546455174002],
-                 [-0.15317096235178099, 0.78867081814098605],
-                 [0.60642348255765899, -0.52698535358924503],
-                 [0.15317096235178199, 0.78867081814098505],
-                 [-0.75959444490944095, -0.26168546455173902],
-                 [0.0, -0.113442150547734],
-                 [0.098243784234276293, 0.056721075273866897],
-                 [-0.098243784234276293, 0.056721075273867202],
-                 [-0.80972189677200301, -0.55728798211338804],
-                 [0.88748649811996305, -0.42259574154838098],
-                 [-0.077764601347960302, 0.97988372366177001],
-                 [0.80972189677200301, -0.55728798211338804],
-                 [0.077764601347960899, 0.97988372366177001],
-                 [-0.88748649811996405, -0.42259574154838098],
-                 [-0.58209787586990203, -0.42586101506139001],
-                 [0.65985539545954197, -0.29118104046160098],
-                 [-0.077757519589639598, 0.71704205552299105],
-                 [0.58209787586990203, -0.42586101506139001],
-                 [0.077757519589640306, 0.71704205552299105],
-                 [-0.65985539545954197, -0.29118104046159998],
-                 [-0.83686548692344398, -0.57375019535379501],
-                 [0.91531498806439304, -0.437871673549239],
-                 [-0.078449501140948702, 1.0116218689030301],
-                 [0.83686548692344398, -0.57375019535379501],
-                 [0.078449501140949396, 1.0116218689030301],
-                 [-0.91531498806439304, -0.43787167354923801],
-                 [-0.102439213120018, -0.167758732882375],
-                 [0.196502930942833, -0.0048355944644362702],
-                 [-0.094063717822815293, 0.17259432734681199],
-                 [0.102439213120018, -0.167758732882375],
-                 [0.094063717822815404, 0.17259432734681099],
-                 [-0.196502930942834, -0.0048355944644361496],
-                 [-0.52704295544169999, -0.36463881029295198],
-                 [0.57930795064028096, -0.274113183151666],
-                 [-0.052264995198580501, 0.63875199344461797],
-                 [0.52704295544169999, -0.36463881029295198],
-                 [0.052264995198581, 0.63875199344461797],
-                 [-0.57930795064028096, -0.274113183151666],
-                 [-0.71820502549667098, -0.48207876525200899],
-                 [0.77659497008161005, -0.38094441457976402],
-                 [-0.058389944584938201, 0.86302317983177301],
-                 [0.71820502549667098, -0.48207876525200899],
-                 [0.058389944584938701, 0.86302317983177301],
-                 [-0.77659497008161005, -0.38094441457976302],
-                 [-0.78211800995999003, -0.527478406710845],
-                 [0.84786870513932699, -0.41359486202725998],
-                 [-0.065750695179336294, 0.94107326873810504],
-                 [0.78211800995999003, -0.527478406710845],
-                 [0.065750695179337001, 0.94107326873810504],
-                 [-0.84786870513932699, -0.41359486202725898],
-                 [-0.85578878348644005, -0.53180888262584503],
-                 [0.88845439405541804, -0.47523038546011498],
-                 [-0.032665610568978203, 1.0070392680859599],
-                 [0.85578878348644005, -0.53180888262584503],
-                 [0.032665610568978702, 1.0070392680859599],
-                 [-0.88845439405541804, -0.47523038546011498],
-                 [-0.26080043841003703, -0.52832053993193295],
-                 [0.58793922812718302, 0.038300464984755499],
-                 [-0.32713878971714599, 0.49002007494717797],
-                 [0.26080043841003703, -0.52832053993193295],
-                 [0.32713878971714599, 0.49002007494717797],
-                 [-0.58793922812718302, 0.038300464984755901],
-                 [-0.13061737230200299, -0.528632982114281],
-                 [0.52311827794029298, 0.151198528468036],
-                 [-0.39250090563828999, 0.377434453646246],
-                 [0.13061737230200299, -0.528632982114281],
-                 [0.39250090563828999, 0.37743445364624501],
-                 [-0.52311827794029298, 0.151198528468036],
-                 [-0.90769196814375397, -0.52405620214905801],
-                 [0.90769196814375397, -0.52405620214905801],
-                 [0.0, 1.04811240429812],
-                 [-0.44521414457403902, -0.57371140175475299],
-                 [0.71945572064741603, -0.098711058447899305],
-                 [-0.27424157607337601, 0.67242246020265195],
-                 [0.44521414457403902, -0.57371140175475299],
-                 [0.27424157607337701, 0.67242246020265195],
-                 [-0.71945572064741603, -0.098711058447898695],
-                 [-0.69780908932146601, -0.52448444053919296],
-                 [0.80312139405734295, -0.34207817807447699],
-                 [-0.10531230473587699, 0.86656261861367101],
-                 [0.69780908932146601, -0.52448444053919296],
-                 [0.10531230473587801, 0.86656261861367101],
-                 [-0.80312139405734295, -0.34207817807447599],
-                 [-0.66899206817769497, -0.42468204214393901],
-                 [0.70228147111655204, -0.36702310490020601],
-                 [-0.033289402938856599, 0.79170514704414496],
-                 [0.66899206817769497, -0.42468204214393901],
-                 [0.0332894029388573, 0.79170514704414496],
-                 [-0.70228147111655204, -0.36702310490020501],
-                 [-0.75250391870932498, -0.43445834003307698],
-                 [0.75250391870932498, -0.43445834003307698],
-                 [0.0, 0.86891668006615397],
-                 [-0.72891023006190003, -0.55555967179393695],
-                 [0.84558390412264395, -0.353474940414996],
-                 [-0.116673674060744, 0.909034612208934],
-                 [0.72891023006190003, -0.55555967179393695],
-                 [0.116673674060745, 0.909034612208933],
-                 [-0.84558390412264395, -0.353474940414996],
-                 [-0.37024530768151498, -0.432072679251785],
-                 [0.55930857035400905, -0.104605502458285],
-                 [-0.18906326267249399, 0.53667818171007098],
-                 [0.37024530768151498, -0.432072679251785],
-                 [0.18906326267249399, 0.53667818171007098],
-                 [-0.55930857035400905, -0.104605502458285],
-                 [0.0, -0.44163717527386098],
-                 [0.38246901304276398, 0.22081858763693099],
-                 [-0.38246901304276398, 0.22081858763693099],
-                 [-0.32275953620672099, -0.361204876861562],
-                 [0.474192367436304, -0.098915519237922703],
-                 [-0.15143283122958201, 0.46012039609948502],
-                 [0.32275953620672099, -0.361204876861562],
-                 [0.15143283122958201, 0.46012039609948502],
-                 [-0.474192367436304, -0.098915519237922397],
-                 [-0.66470762672695805, -0.57348736410677204],
-                 [0.82900843942932001, -0.28891000878142398],
-                 [-0.16430081270236099, 0.86239737288819696],
-                 [0.66470762672695805, -0.57348736410677204],
-                 [0.16430081270236199, 0.86239737288819696],
-                 [-0.82900843942932001, -0.28891000878142298],
-                 [-0.32306760913108801, -0.57339310967499002],
-                 [0.65810680389904197, 0.0069117981900718196],
-                 [-0.33503919476795402, 0.56648131148491898],
-                 [0.32306760913108801, -0.57339310967499002],
-                 [0.33503919476795502, 0.56648131148491898],
-                 [-0.65810680389904197, 0.0069117981900721501],
-                 [-0.20015287390691, -0.115558315629231],
-                 [0.20015287390691, -0.115558315629231],
-                 [0.0, 0.23111663125846299],
-                 [-0.61468169515746296, -0.35488664216509702],
-                 [0.61468169515746296, -0.35488664216509602],
-                 [0.0, 0.70977328433019404],
-                 [-0.136837022059177, -0.43325524227150097],
-                 [0.44362855715949001, 0.098123283854292004],
-                 [-0.30679153510031298, 0.335131958417209],
-                 [0.136837022059177, -0.43325524227150097],
-                 [0.30679153510031298, 0.335131958417209],
-                 [-0.44362855715949001, 0.098123283854292406],
-                 [0.0, 2.2204460492503101e-16],
-                 [-0.55947816484895396, -0.57318116904317395],
-                 [0.77612853578672802, -0.19793171910030499],
-                 [-0.21665037093777401, 0.771112888143479],
-                 [0.55947816484895396, -0.57318116904317395],
-                 [0.21665037093777501, 0.771112888143479],
-                 [-0.77612853578672802, -0.19793171910030399],
-                 [-0.75690025149534101, -0.57316379219729496],
-                 [0.874824530319953, -0.36891294982714801],
-                 [-0.117924278824612, 0.94207674202444402],
-                 [0.75690025149534101, -0.57316379219729496],
-                 [0.117924278824612, 0.94207674202444402],
-                 [-0.874824530319953, -0.36891294982714801],
-                 [0.0, -0.22231995200693699],
-                 [0.19253472620614501, 0.111159976003469],
-                 [-0.19253472620614501, 0.111159976003469],
-                 [-0.92282620861069298, -0.55502955244943797],
-                 [0.94208279657766703, -0.52167616371021996],
-                 [-0.019256587966973399, 1.07670571615966],
-                 [0.92282620861069298, -0.55502955244943797],
-                 [0.019256587966974201, 1.07670571615966],
-                 [-0.94208279657766703, -0.52167616371021897],
-                 [-0.96136090469234403, -0.55504197711250802],
-                 [0.96136090469234403, -0.55504197711250702],
-                 [0.0, 1.1100839542250101],
-                 [-0.94945587611159399, -0.57286876316098501],
-                 [0.97084683998778099, -0.535818526904559],
-                 [-0.021390963876186199, 1.10868729006554],
-                 [0.94945587611159399, -0.57286876316098501],
-                 [0.021390963876187101, 1.10868729006554],
-                 [-0.97084683998778099, -0.535818526904559],
-                 [-0.99852123327278197, -0.57649650282159803],
-                 [0.99852123327278197, -0.57649650282159803],
-                 [0.0, 1.1529930056432001]],
-      'weights': [0.0026090961904528501,
-                  0.0026090961904528501,
-                  0.0026090961904528501,
-                  0.0077140488618534196,
-                  0.0077140488618534196,
-                  0.0077140488618534196,
-                  0.0077140488618534196,
-                  0.0077140488618534196,
-                  0.0077140488618534196,
-                  0.0074824759858607799,
-                  0.0074824759858607799,
-                  0.0074824759858607799,
-                  0.0074824759858607799,
-                  0.0074824759858607799,
-                  0.0074824759858607799,
-                  0.0053466324009369499,
-                  0.0053466324009369499,
-                  0.0053466324009369499,
-                  0.0053466324009369499,
-                  0.0053466324009369499,
-                  0.0053466324009369499,
-                  0.0059413253938463096,
-                  0.0059413253938463096,
-                  0.0059413253938463096,
-                  0.0059413253938463096,
-                  0.0059413253938463096,
-                  0.0059413253938463096,
-                  0.0021606800034861002,
-                  0.0021606800034861002,
-                  0.0021606800034861002,
-                  0.0037923536198802401,
-                  0.0037923536198802401,
-                  0.0037923536198802401,
-                  0.0065519359464416196,
-                  0.0065519359464416196,
-                  0.0065519359464416196,
-                  0.0065519359464416196,
-                  0.0065519359464416196,
-                  0.0065519359464416196,
-                  0.00116121993153936,
-                  0.00116121993153936,
-                  0.00116121993153936,
-                  0.00116121993153936,
-                  0.00116121993153936,
-                  0.00116121993153936,
-                  0.0072297788536573402,
-                  0.0072297788536573402,
-                  0.0072297788536573402,
-                  0.0072297788536573402,
-                  0.0072297788536573402,
-                  0.0072297788536573402,
-                  0.0044312210342726003,
-                  0.0044312210342726003,
-                  0.0044312210342726003,
-                  0.0044312210342726003,
-                  0.0044312210342726003,
-                  0.0044312210342726003,
-                  0.0055148271717139,
-                  0.0055148271717139,
-                  0.0055148271717139,
-                  0.0055148271717139,
-                  0.0055148271717139,
-                  0.0055148271717139,
-                  0.00022814069694688201,
-                  0.00022814069694688201,
-                  0.00022814069694688201,
-                  0.00022814069694688201,
-                  0.00022814069694688201,
-                  0.00022814069694688201,
-                  0.0028503881801525501,
-                  0.0028503881801525501,
-                  0.0028503881801525501,
-                  0.0028503881801525501,
-                  0.0028503881801525501,
-                  0.0028503881801525501,
-                  0.0079596102028476005,
-                  0.0079596102028476005,
-                  0.0079596102028476005,
-                  0.0079596102028476005,
-                  0.0079596102028476005,
-                  0.0079596102028476005,
-                  0.0049690115514146697,
-                  0.0049690115514146697,
-                  0.0049690115514146697,
-                  0.0049690115514146697,
-                  0.0049690115514146697,
-                  0.0049690115514146697,
-                  0.0081869435473801901,
-                  0.0081869435473801901,
-                  0.0081869435473801901,
-                  0.0081869435473801901,
-                  0.0081869435473801901,
-                  0.0081869435473801901,
-                  0.0083289677435832692,
-                  0.0083289677435832692,
-                  0.0083289677435832692,
-                  0.0083289677435832692,
-                  0.0083289677435832692,
-                  0.0083289677435832692,
-                  0.0078507221009939902,
-                  0.0078507221009939902,
-                  0.0078507221009939902,
-                  0.0071224242382149101,
-                  0.0071224242382149101,
-                  0.0071224242382149101,
-                  0.0055300348056905703,
-                  0.0055300348056905703,
-                  0.0055300348056905703,
-                  0.0055300348056905703,
-                  0.0055300348056905703,
-                  0.0055300348056905703,
-                  0.0030289499176020399,
-                  0.0030289499176020399,
-                  0.0030289499176020399,
-                  0.0030289499176020399,
-                  0.0030289499176020399,
-                  0.0030289499176020399,
-                  0.0024779937045688199,
-                  0.0024779937045688199,
-                  0.0024779937045688199,
-                  0.0024779937045688199,
-                  0.0024779937045688199,
-                  0.0024779937045688199,
-                  0.0021965440160188299,
-                  0.0021965440160188299,
-                  0.0021965440160188299,
-                  0.0021965440160188299,
-                  0.0021965440160188299,
-                  0.0021965440160188299,
-                  0.00273496667132073,
-                  0.00273496667132073,
-                  0.00273496667132073,
-                  0.00273496667132073,
-                  0.00273496667132073,
-                  0.00273496667132073,
-                  0.0055693144699582196,
-                  0.0055693144699582196,
-                  0.0055693144699582196,
-                  0.0055693144699582196,
-                  0.0055693144699582196,
-                  0.0055693144699582196,
-                  0.0093491007280437008,
-                  0.0093491007280437008,
-                  0.0093491007280437008,
-                  0.0093491007280437008,
-                  0.0093491007280437008,
-                  0.0093491007280437008,
-                  0.0053047610202203999,
-                  0.0053047610202203999,
-                  0.0053047610202203999,
-                  0.0053047610202203999,
-                  0.0053047610202203999,
-                  0.0053047610202203999,
-                  0.00401700411934115,
-                  0.00401700411934115,
-                  0.00401700411934115,
-                  0.00401700411934115,
-                  0.00401700411934115,
-                  0.00401700411934115,
-                  0.0039769623618606999,
-                  0.0039769623618606999,
-                  0.0039769623618606999,
-                  0.0039769623618606999,
-                  0.0039769623618606999,
-                  0.0039769623618606999,
-                  0.0012709967782663101,
-                  0.0012709967782663101,
-                  0.0012709967782663101,
-                  0.0012709967782663101,
-                  0.0012709967782663101,
-                  0.0012709967782663101,
-                  0.0025006661532647801,
-                  0.0025006661532647801,
-                  0.0025006661532647801,
-                  0.0025006661532647801,
-                  0.0025006661532647801,
-                  0.0025006661532647801,
-                  0.0028728943459096,
-                  0.0028728943459096,
-                  0.0028728943459096,
-                  0.0028728943459096,
-                  0.0028728943459096,
-                  0.0028728943459096,
-                  0.0096487861968651695,
-                  0.0096487861968651695,
-                  0.0096487861968651695,
-                  0.0096487861968651695,
-                  0.0096487861968651695,
-                  0.0096487861968651695,
-                  0.0092427150079160397,
-                  0.0092427150079160397,
-                  0.0092427150079160397,
-                  0.0112161061895959,
-                  0.0112161061895959,
-                  0.0112161061895959,
-                  0.0012495662909748301,
-                  0.0012495662909748301,
-                  0.0012495662909748301,
-                  0.0012495662909748301,
-                  0.0012495662909748301,
-                  0.0012495662909748301,
-                  0.0045416586158264303,
-                  0.0045416586158264303,
-                  0.0045416586158264303,
-                  0.0045416586158264303,
-                  0.0045416586158264303,
-                  0.0045416586158264303,
-                  0.00052581529718257402,
-                  0.00052581529718257402,
-                  0.00052581529718257402,
-                  0.00052581529718257402,
-                  0.00052581529718257402,
-                  0.00052581529718257402,
-                  0.0036374573863039998,
-                  0.0036374573863039998,
-                  0.0036374573863039998,
-                  0.0036374573863039998,
-                  0.0036374573863039998,
-                  0.0036374573863039998,
-                  0.011307376637400101,
-                  0.011307376637400101,
-                  0.011307376637400101,
-                  0.0016736783029436099,
-                  0.0016736783029436099,
-                  0.0016736783029436099,
-                  0.0016736783029436099,
-                  0.0016736783029436099,
-                  0.0016736783029436099,
-                  0.0055506553668487604,
-                  0.0055506553668487604,
-                  0.0055506553668487604,
-                  0.0055506553668487604,
-                  0.0055506553668487604,
-                  0.0055506553668487604,
-                  0.00067947495016841401,
-                  0.00067947495016841401,
-                  0.00067947495016841401,
-                  0.00067947495016841401,
-                  0.00067947495016841401,
-                  0.00067947495016841401,
-                  0.010838448584807399,
-                  0.010838448584807399,
-                  0.010838448584807399,
-                  0.010838448584807399,
-                  0.010838448584807399,
-                  0.010838448584807399,
-                  0.0065493006860433299,
-                  0.0065493006860433299,
-                  0.0065493006860433299,
-                  0.0065493006860433299,
-                  0.0065493006860433299,
-                  0.0065493006860433299,
-                  0.0039947361036297598,
-                  0.0039947361036297598,
-                  0.0039947361036297598,
-                  0.0039947361036297598,
-                  0.0039947361036297598,
-                  0.0039947361036297598,
-                  0.0027650984549460801,
-                  0.0027650984549460801,
-                  0.0027650984549460801,
-                  0.0027650984549460801,
-                  0.0027650984549460801,
-                  0.0027650984549460801,
-                  0.0021630474258664801,
-                  0.0021630474258664801,
-                  0.0021630474258664801,
-                  0.0021630474258664801,
-                  0.0021630474258664801,
-                  0.0021630474258664801,
-                  0.00442647824843251,
-                  0.00442647824843251,
-                  0.00442647824843251,
-                  0.00442647824843251,
-                  0.00442647824843251,
-                  0.00442647824843251,
-                  0.0046389255788341702,
-                  0.0046389255788341702,
-                  0.0046389255788341702,
-                  0.0046389255788341702,
-                  0.0046389255788341702,
-                  0.0046389255788341702,
-                  0.0016830505708450101,
-                  0.0016830505708450101,
-                  0.0016830505708450101,
-                  0.00111092009489152,
-                  0.00111092009489152,
-                  0.00111092009489152,
-                  0.00111092009489152,
-                  0.00111092009489152,
-                  0.00111092009489152,
-                  0.0033094595361329499,
-                  0.0033094595361329499,
-                  0.0033094595361329499,
-                  0.0033094595361329499,
-                  0.0033094595361329499,
-                  0.0033094595361329499,
-                  0.0052456282057335799,
-                  0.0052456282057335799,
-                  0.0052456282057335799,
-                  0.0052456282057335799,
-                  0.0052456282057335799,
-                  0.0052456282057335799,
-                  0.0042239486696670197,
-                  0.0042239486696670197,
-                  0.0042239486696670197,
-                  0.0020681023950845398,
-                  0.0020681023950845398,
-                  0.0020681023950845398,
-                  0.0020681023950845398,
-                  0.0020681023950845398,
-                  0.0020681023950845398,
-                  0.0069105123131235398,
-                  0.0069105123131235398,
-                  0.0069105123131235398,
-                  0.0069105123131235398,
-                  0.0069105123131235398,
-                  0.0069105123131235398,
-                  0.0072541822447835498,
-                  0.0072541822447835498,
-                  0.0072541822447835498,
-                  0.0082690874694638702,
-                  0.0082690874694638702,
-                  0.0082690874694638702,
-                  0.0082690874694638702,
-                  0.0082690874694638702,
-                  0.0082690874694638702,
-                  0.00098398031116890897,
-                  0.00098398031116890897,
-                  0.00098398031116890897,
-                  0.00098398031116890897,
-                  0.00098398031116890897,
-                  0.00098398031116890897,
-                  0.0012631669695333701,
-                  0.0012631669695333701,
-                  0.0012631669695333701,
-                  0.0012631669695333701,
-                  0.0012631669695333701,
-                  0.0012631669695333701,
-                  0.0103685312295385,
-                  0.0103685312295385,
-                  0.0103685312295385,
-                  0.0065358593524682202,
-                  0.0065358593524682202,
-                  0.0065358593524682202,
-                  0.00762025481716896,
-                  0.00762025481716896,
-                  0.00762025481716896,
-                  0.00762025481716896,
-                  0.00762025481716896,
-                  0.00762025481716896,
-                  0.011492238728008501,
-                  0.0011759914817920201,
-                  0.0011759914817920201,
-                  0.0011759914817920201,
-                  0.0011759914817920201,
-                  0.0011759914817920201,
-                  0.0011759914817920201,
-                  0.00092048820580289904,
-                  0.00092048820580289904,
-                  0.00092048820580289904,
-                  0.00092048820580289904,
-                  0.00092048820580289904,
-                  0.00092048820580289904,
-                  0.01122654236151,
-                  0.01122654236151,
-                  0.01122654236151,
-                  0.00112154561618584,
-                  0.00112154561618584,
-                  0.00112154561618584,
-                  0.00112154561618584,
-                  0.00112154561618584,
-                  0.00112154561618584,
-                  0.00077829133241896905,
-                  0.00077829133241896905,
-                  0.00077829133241896905,
-                  0.00045263327991359998,
-                  0.00045263327991359998,
-                  0.00045263327991359998,
-                  0.00045263327991359998,
-                  0.00045263327991359998,
-                  0.00045263327991359998,
-                  2.44136374193341e-05,
-                  2.44136374193341e-05,
-                  2.44136374193341e-05]},
- 47: {'points': [[0.0, -0.054885817731744203],
-                 [0.047532512463172902, 0.027442908865872299],
-                 [-0.047532512463172902, 0.027442908865872299],
-                 [-0.96663742233248195, -0.56535389802881197],
-                 [0.97292954898774897, -0.55445561497423101],
-                 [-0.0062921266552663502, 1.1198095130030401],
-                 [0.96663742233248195, -0.56535389802881197],
-                 [0.0062921266552671299, 1.1198095130030401],
-                 [-0.97292954898774897, -0.55445561497423101],
-                 [-0.55421586636589604, -0.43595283427447401],
-                 [0.65465416251647002, -0.26198860231603099],
-                 [-0.10043829615057299, 0.697941436590505],
-                 [0.55421586636589604, -0.43595283427447401],
-                 [0.10043829615057399, 0.697941436590505],
-                 [-0.65465416251647002, -0.26198860231602999],
-                 [-0.61264177937586395, -0.42805378386933801],
-                 [0.67702634070483203, -0.31653645242453099],
-                 [-0.064384561328967999, 0.744590236293869],
-                 [0.61264177937586395, -0.42805378386933801],
-                 [0.064384561328968595, 0.744590236293869],
-                 [-0.67702634070483303, -0.31653645242452999],
-                 [-0.091310367646256801, -0.0527180653403699],
-                 [0.091310367646256801, -0.052718065340369803],
-                 [0.0, 0.10543613068074],
-                 [-0.79684085415639405, -0.49023992523710003],
-                 [0.82298065628290995, -0.44496445985417798],
-                 [-0.026139802126515801, 0.93520438509127901],
-                 [0.79684085415639405, -0.49023992523710003],
-                 [0.026139802126516499, 0.93520438509127901],
-                 [-0.82298065628290995, -0.44496445985417699],
-                 [-0.97128586885482404, -0.57553352291636295],
-                 [0.98406958600253602, -0.553391475306937],
-                 [-0.0127837171477114, 1.1289249982233001],
-                 [0.97128586885482404, -0.57553352291636295],
-                 [0.012783717147712099, 1.1289249982233001],
-                 [-0.98406958600253602, -0.553391475306936],
-                 [-0.93648904794849597, -0.55999425828931504],
-                 [0.95321377762621895, -0.53102617674464303],
-                 [-0.0167247296777235, 1.0910204350339601],
-                 [0.93648904794849597, -0.55999425828931504],
-                 [0.0167247296777242, 1.0910204350339601],
-                 [-0.95321377762621995, -0.53102617674464203],
-                 [-0.84840429261309502, -0.48982644672180498],
-                 [0.84840429261309502, -0.48982644672180398],
-                 [0.0, 0.97965289344360995],
-                 [-0.053945273449791102, -0.224576114721734],
-                 [0.221461257157126, 0.065570080139250003],
-                 [-0.167515983707335, 0.159006034582485],
-                 [0.053945273449790901, -0.224576114721734],
-                 [0.167515983707335, 0.159006034582485],
-                 [-0.221461257157126, 0.0655700801392501],
-                 [-0.10288337054183, -0.30138835771850803],
-                 [0.31245165946001402, 0.061594566343061999],
-                 [-0.20956828891818499, 0.23979379137544601],
-                 [0.102883370541829, -0.30138835771850803],
-                 [0.20956828891818499, 0.23979379137544601],
-                 [-0.31245165946001402, 0.061594566343062297],
-                 [0.0, -0.30545083028761999],
-                 [0.26452817863612799, 0.15272541514380999],
-                 [-0.26452817863612799, 0.15272541514380999],
-                 [-0.732482137649064, -0.48491296481354101],
-                 [0.78618801497748803, -0.39189165661564901],
-                 [-0.0537058773284236, 0.87680462142919102],
-                 [0.732482137649064, -0.48491296481354101],
-                 [0.053705877328424197, 0.87680462142919102],
-                 [-0.78618801497748803, -0.39189165661564901],
-                 [-0.68426811117296304, -0.42961315180326198],
-                 [0.71418995884800696, -0.37778699137374999],
-                 [-0.029921847675043599, 0.80740014317701203],
-                 [0.68426811117296304, -0.42961315180326198],
-                 [0.029921847675044001, 0.80740014317701203],
-                 [-0.71418995884800696, -0.37778699137374899],
-                 [0.0, -0.48945570323521798],
-                 [0.42388107302887601, 0.24472785161760899],
-                 [-0.42388107302887601, 0.24472785161760999],
-                 [-0.11259199413113399, -0.48818031348608398],
-                 [0.47907255017196698, 0.14658262956273099],
-                 [-0.36648055604083302, 0.34159768392335299],
-                 [0.11259199413113399, -0.48818031348608398],
-                 [0.36648055604083302, 0.34159768392335299],
-                 [-0.47907255017196698, 0.14658262956273199],
-                 [-0.76128147379226796, -0.43952606382304099],
-                 [0.76128147379226796, -0.43952606382304099],
-                 [0.0, 0.87905212764608198],
-                 [-0.87984784872866295, -0.52962597960343005],
-                 [0.89859347720512095, -0.49715759866239501],
-                 [-0.018745628476457998, 1.0267835782658301],
-                 [0.87984784872866295, -0.52962597960343005],
-                 [0.018745628476458699, 1.0267835782658301],
-                 [-0.89859347720512095, -0.49715759866239401],
-                 [-0.23123809819905999, -0.37175232717159901],
-                 [0.43756600834611897, -0.014381903777387199],
-                 [-0.20632791014705801, 0.38613423094898702],
-                 [0.23123809819905999, -0.37175232717159901],
-                 [0.20632791014705901, 0.38613423094898702],
-                 [-0.43756600834611897, -0.014381903777387],
-                 [-0.468895509123399, -0.43001929575977699],
-                 [0.60685538880715995, -0.19106577474141301],
-                 [-0.137959879683761, 0.62108507050119],
-                 [0.468895509123399, -0.43001929575977699],
-                 [0.137959879683761, 0.62108507050119],
-                 [-0.60685538880715995, -0.19106577474141301],
-                 [-0.11739233105524099, -0.37274742279795903],
-                 [0.381504902865832, 0.084708970495667696],
-                 [-0.264112571810591, 0.28803845230229203],
-                 [0.11739233105524099, -0.37274742279795903],
-                 [0.264112571810591, 0.28803845230229203],
-                 [-0.381504902865832, 0.084708970495668098],
-                 [-0.10992961573914301, -0.13964656636214601],
-                 [0.17590228189045901, -0.0253785566772868],
-                 [-0.065972666151315806, 0.16502512303943301],
-                 [0.10992961573914301, -0.13964656636214601],
-                 [0.065972666151316001, 0.16502512303943301],
-                 [-0.17590228189045901, -0.025378556677286699],
-                 [-0.16204920039724399, -0.22098784556599299],
-                 [0.27240568838636497, -0.029844801423972198],
-                 [-0.11035648798912, 0.25083264698996599],
-                 [0.16204920039724399, -0.22098784556599299],
-                 [0.110356487989121, 0.25083264698996599],
-                 [-0.27240568838636497, -0.029844801423972101],
-                 [-0.92895931257087805, -0.53633490917900695],
-                 [0.92895931257087905, -0.53633490917900595],
-                 [0.0, 1.0726698183580099],
-                 [-0.56792554236958204, -0.52773439710278602],
-                 [0.74099416552666897, -0.22797074859871999],
-                 [-0.17306862315708599, 0.75570514570150704],
-                 [0.56792554236958204, -0.52773439710278602],
-                 [0.17306862315708699, 0.75570514570150704],
-                 [-0.74099416552666797, -0.22797074859871999],
-                 [-0.36310842599378401, -0.52763898191178904],
-                 [0.63850297535945999, -0.050641630282904401],
-                 [-0.27539454936567498, 0.57828061219469395],
-                 [0.36310842599378401, -0.52763898191178904],
-                 [0.27539454936567498, 0.57828061219469395],
-                 [-0.63850297535945899, -0.050641630282903902],
-                 [-0.46903656396230098, -0.52697835910181401],
-                 [0.69089492820795995, -0.14270840014420999],
-                 [-0.221858364245659, 0.66968675924602505],
-                 [0.46903656396230098, -0.52697835910181401],
-                 [0.22185836424565999, 0.66968675924602505],
-                 [-0.69089492820795995, -0.14270840014420899],
-                 [-0.33803039308384603, -0.36648653111336399],
-                 [0.486401842630932, -0.10949964210516799],
-                 [-0.148371449547086, 0.47598617321853298],
-                 [0.33803039308384603, -0.36648653111336399],
-                 [0.148371449547087, 0.47598617321853198],
-                 [-0.486401842630932, -0.10949964210516799],
-                 [-0.12603730801931601, -0.52894478654176103],
-                 [0.52109827635415995, 0.15532088270154901],
-                 [-0.395060968334844, 0.37362390384021199],
-                 [0.12603730801931601, -0.52894478654176103],
-                 [0.395060968334844, 0.37362390384021199],
-                 [-0.52109827635415995, 0.15532088270154901],
-                 [-0.44018371642510401, -0.36579746792426998],
-                 [0.53688175807499305, -0.19831154679425],
-                 [-0.096698041649889294, 0.56410901471852104],
-                 [0.44018371642510301, -0.36579746792426998],
-                 [0.096698041649889696, 0.56410901471852104],
-                 [-0.53688175807499305, -0.19831154679425],
-                 [-0.21083069268888299, -0.121723157177362],
-                 [0.21083069268888299, -0.121723157177362],
-                 [0.0, 0.243446314354724],
-                 [-0.20847045004866299, -0.29950682881818202],
-                 [0.36361574738779501, -0.030787291271425699],
-                 [-0.15514529733913199, 0.33029412008960801],
-                 [0.20847045004866299, -0.29950682881818202],
-                 [0.15514529733913199, 0.33029412008960801],
-                 [-0.36361574738779401, -0.0307872912714253],
-                 [-0.22797318474342099, -0.48721710760636899],
-                 [0.53592898471720196, 0.046177984433738897],
-                 [-0.30795579997378097, 0.44103912317263],
-                 [0.22797318474342099, -0.48721710760636899],
-                 [0.30795579997378097, 0.44103912317263],
-                 [-0.53592898471720196, 0.046177984433739203],
-                 [-0.81969334154814599, -0.52883882159690698],
-                 [0.86783452478442102, -0.44545584629519602],
-                 [-0.048141183236274601, 0.97429466789210295],
-                 [0.81969334154814599, -0.52883882159690698],
-                 [0.048141183236275302, 0.97429466789210295],
-                 [-0.86783452478442102, -0.44545584629519502],
-                 [-0.248261550621034, -0.52822203489770203],
-                 [0.58158447637063704, 0.0491102078281195],
-                 [-0.33332292574960298, 0.479111827069583],
-                 [0.248261550621034, -0.52822203489770203],
-                 [0.33332292574960398, 0.479111827069583],
-                 [-0.58158447637063704, 0.049110207828119902],
-                 [0.0, -0.37667277468535798],
-                 [0.32620819179149202, 0.18833638734267899],
-                 [-0.32620819179149202, 0.18833638734267899],
-                 [0.0, -0.52940747517054298],
-                 [0.45848032245106901, 0.26470373758527099],
-                 [-0.45848032245106901, 0.26470373758527199],
-                 [-0.12427095901943699, -0.43564261027324402],
-                 [0.43941304697731198, 0.110199497673135],
-                 [-0.31514208795787502, 0.32544311260011],
-                 [0.12427095901943699, -0.43564261027324402],
-                 [0.31514208795787502, 0.32544311260011],
-                 [-0.43941304697731198, 0.110199497673135],
-                 [-0.260701894382667, -0.20992358276179299],
-                 [0.31215010271649202, -0.12081267196922101],
-                 [-0.051448208333824602, 0.33073625473101498],
-                 [0.260701894382667, -0.20992358276179299],
-                 [0.051448208333824803, 0.33073625473101498],
-                 [-0.31215010271649202, -0.12081267196922001],
-                 [-0.56248468735254098, -0.48651251086220898],
-                 [0.70257453734189601, -0.24386977305594401],
-                 [-0.140089849989355, 0.73038228391815296],
-                 [0.56248468735254198, -0.48651251086220898],
-                 [0.140089849989355, 0.73038228391815296],
-                 [-0.70257453734189601, -0.24386977305594301],
-                 [-0.66071472756340199, -0.52681305116132804],
-                 [0.78659084913260202, -0.30878921314375601],
-                 [-0.1258761215692, 0.835602264305085],
-                 [0.66071472756340199, -0.52681305116132804],
-                 [0.1258761215692, 0.835602264305085],
-                 [-0.78659084913260202, -0.30878921314375601],
-                 [-0.82669686777638696, -0.55712806420844696],
-                 [0.89583549065395596, -0.43737645661915298],
-                 [-0.069138622877569098, 0.99450452082759999],
-                 [0.82669686777638596, -0.55712806420844696],
-                 [0.069138622877569694, 0.99450452082759999],
-                 [-0.89583549065395596, -0.43737645661915198],
-                 [-0.51356163243264896, -0.29650494673045302],
-                 [0.51356163243264896, -0.29650494673045302],
-                 [0.0, 0.59300989346090704],
-                 [-0.88966644367593894, -0.55768637399333398],
-                 [0.92780378906062599, -0.491630554121254],
-                 [-0.038137345384686702, 1.04931692811459],
-                 [0.88966644367593894, -0.55768637399333398],
-                 [0.038137345384687403, 1.04931692811459],
-                 [-0.92780378906062599, -0.49163055412125301],
-                 [0.0, -0.139803688074816],
-                 [0.12107354541554601, 0.069901844037408206],
-                 [-0.12107354541554601, 0.069901844037408206],
-                 [-0.34452655299507801, -0.48599981614692001],
-                 [0.59315146351533798, -0.055368839098563001],
-                 [-0.24862491052026001, 0.54136865524548405],
-                 [0.34452655299507801, -0.48599981614692001],
-                 [0.24862491052026001, 0.54136865524548305],
-                 [-0.59315146351533798, -0.055368839098562599],
-                 [-0.362346193285558, -0.209200672233253],
-                 [0.362346193285559, -0.209200672233253],
-                 [0.0, 0.41840134446650701],
-                 [-0.65494542725425298, -0.48392971086401998],
-                 [0.74656813688142598, -0.32523452266262698],
-                 [-0.0916227096271722, 0.80916423352664701],
-                 [0.65494542725425298, -0.48392971086401998],
-                 [0.091622709627172894, 0.80916423352664701],
-                 [-0.74656813688142598, -0.32523452266262598],
-                 [-0.93012524112428296, -0.57383958132479496],
-                 [0.96202227568644005, -0.51859229685235797],
-                 [-0.0318970345621572, 1.09243187817715],
-                 [0.93012524112428296, -0.57383958132479496],
-                 [0.031897034562158103, 1.09243187817715],
-                 [-0.96202227568644005, -0.51859229685235697],
-                 [0.0, -0.43820483878434102],
-                 [0.37949652244850302, 0.21910241939217101],
-                 [-0.37949652244850302, 0.21910241939217101],
-                 [-0.066785089424544905, -0.55764972588734996],
-                 [0.51633137374414595, 0.22098727890800399],
-                 [-0.44954628431960098, 0.336662446979347],
-                 [0.066785089424544794, -0.55764972588734996],
-                 [0.44954628431960098, 0.336662446979346],
-                 [-0.51633137374414595, 0.22098727890800399],
-                 [-0.41597899021645601, -0.29204731777806497],
-                 [0.46090989141113903, -0.214224714079016],
-                 [-0.044930901194683501, 0.50627203185708203],
-                 [0.41597899021645601, -0.29204731777806497],
-                 [0.044930901194683702, 0.50627203185708203],
-                 [-0.46090989141113903, -0.214224714079016],
-                 [-0.246277055766916, -0.43448156854177],
-                 [0.49941060371674101, 0.0039585976074992804],
-                 [-0.25313354794982501, 0.430522970934271],
-                 [0.246277055766916, -0.43448156854177],
-                 [0.25313354794982501, 0.430522970934271],
-                 [-0.49941060371674001, 0.0039585976074994998],
-                 [-0.74973726200095603, -0.55679770960375496],
-                 [0.85706959228632096, -0.37089266025473999],
-                 [-0.107332330285364, 0.92769036985849496],
-                 [0.74973726200095603, -0.55679770960375496],
-                 [0.107332330285365, 0.92769036985849496],
-                 [-0.85706959228632096, -0.37089266025473999],
-                 [-0.74550793444160401, -0.52714057557693095],
-                 [0.82927109703597501, -0.38205852216082797],
-                 [-0.083763162594370694, 0.90919909773775898],
-                 [0.74550793444160401, -0.52714057557693095],
-                 [0.083763162594371096, 0.90919909773775898],
-                 [-0.82927109703597501, -0.38205852216082697],
-                 [-0.45718177804191101, -0.48449632102066598],
-                 [0.64817701106495296, -0.15368287342129999],
-                 [-0.190995233023042, 0.63817919444196702],
-                 [0.45718177804191101, -0.48449632102066598],
-                 [0.190995233023042, 0.63817919444196702],
-                 [-0.64817701106495296, -0.15368287342129999],
-                 [-0.31237691698758102, -0.29161853684292099],
-                 [0.40873751961420801, -0.124717077245647],
-                 [-0.096360602626627198, 0.41633561408856901],
-                 [0.31237691698758102, -0.29161853684292099],
-                 [0.096360602626627503, 0.41633561408856901],
-                 [-0.40873751961420801, -0.124717077245647],
-                 [-0.36244609664691801, -0.43162684421663899],
-                 [0.55502286037037696, -0.098074105090421096],
-                 [-0.192576763723459, 0.52970094930706102],
-                 [0.36244609664691801, -0.43162684421663899],
-                 [0.192576763723459, 0.52970094930706102],
-                 [-0.55502286037037696, -0.098074105090420693],
-                 [-0.32616646260370702, -0.55705385397930196],
-                 [0.64550602012395597, -0.0039415154876665196],
-                 [-0.31933955752024901, 0.56099536946696904],
-                 [0.32616646260370702, -0.55705385397930196],
-                 [0.31933955752024901, 0.56099536946696904],
-                 [-0.64550602012395597, -0.00394151548766619],
-                 [-0.53784292001756895, -0.36980700529962501],
-                 [0.58918372109570605, -0.28088212933100398],
-                 [-0.051340801078137502, 0.65068913463062905],
-                 [0.53784292001756895, -0.36980700529962501],
-                 [0.051340801078138001, 0.65068913463062905],
-                 [-0.58918372109570705, -0.28088212933100298],
-                 [-0.55851533886826799, -0.55689739217360601],
-                 [0.76154495835778202, -0.20523977577639099],
-                 [-0.20302961948951401, 0.76213716794999797],
-                 [0.55851533886826799, -0.55689739217360601],
-                 [0.20302961948951501, 0.76213716794999697],
-                 [-0.76154495835778202, -0.20523977577638999],
-                 [-0.66003657270757099, -0.55674192040916304],
-                 [0.81217093277985497, -0.29323747918699],
-                 [-0.15213436007228301, 0.84997939959615298],
-                 [0.66003657270757099, -0.55674192040916304],
-                 [0.15213436007228401, 0.84997939959615298],
-                 [-0.81217093277985497, -0.29323747918699],
-                 [-0.44695335875345499, -0.55682962368161304],
-                 [0.70570527906473401, -0.108658151146465],
-                 [-0.25875192031127803, 0.66548777482807897],
-                 [0.44695335875345499, -0.55682962368161304],
-                 [0.25875192031127903, 0.66548777482807897],
-                 [-0.70570527906473401, -0.108658151146465],
-                 [-0.19870749346215699, -0.55738068167530297],
-                 [0.58205957664057895, 0.106604603577093],
-                 [-0.38335208317842101, 0.45077607809821102],
-                 [0.19870749346215799, -0.55738068167530297],
-                 [0.38335208317842101, 0.45077607809821002],
-                 [-0.58205957664057895, 0.106604603577093],
-                 [0.0, -0.57360394426682104],
-                 [0.49675558744602, 0.28680197213341102],
-                 [-0.49675558744602, 0.28680197213341102],
-                 [-0.80239000604949895, -0.57345366439244905],
-                 [0.89782044428188601, -0.40816329678539098],
-                 [-0.095430438232386894, 0.98161696117784003],
-                 [0.80239000604949895, -0.57345366439244905],
-                 [0.095430438232387602, 0.98161696117784003],
-                 [-0.89782044428188601, -0.40816329678538998],
-                 [-0.134495539927869, -0.57357771856416995],
-                 [0.56398064528522696, 0.170312305008846],
-                 [-0.42948510535735701, 0.40326541355532403],
-                 [0.134495539927869, -0.57357771856416995],
-                 [0.42948510535735801, 0.40326541355532403],
-                 [-0.56398064528522696, 0.170312305008846],
-                 [-0.71709284775736704, -0.57343681973260197],
-                 [0.85515727723247403, -0.33430221316370601],
-                 [-0.138064429475107, 0.90773903289630797],
-                 [0.71709284775736704, -0.57343681973260197],
-                 [0.138064429475108, 0.90773903289630797],
-                 [-0.85515727723247503, -0.33430221316370501],
-                 [-0.62507647975326597, -0.36088807384965199],
-                 [0.62507647975326597, -0.36088807384965099],
-                 [0.0, 0.72177614769930398],
-                 [-0.51015724874008594, -0.57345497171610604],
-                 [0.75170519780267697, -0.15508165147563799],
-                 [-0.241547949062591, 0.72853662319174395],
-                 [0.51015724874008594, -0.57345497171610604],
-                 [0.241547949062591, 0.72853662319174395],
-                 [-0.75170519780267697, -0.15508165147563799],
-                 [-0.87380123018010203, -0.57352108080599296],
-                 [0.93358444067394897, -0.46997352279106502],
-                 [-0.0597832104938468, 1.04349460359706],
-                 [0.87380123018010103, -0.57352108080599296],
-                 [0.059783210493847598, 1.04349460359706],
-                 [-0.93358444067394897, -0.46997352279106502],
-                 [-0.39184908288647502, -0.57345327364011001],
-                 [0.69254964429892196, -0.052624623409266803],
-                 [-0.300700561412446, 0.626077897049377],
-                 [0.39184908288647502, -0.57345327364011001],
-                 [0.300700561412447, 0.626077897049377],
-                 [-0.69254964429892196, -0.052624623409266297],
-                 [-0.61920375973213904, -0.57342883815743995],
-                 [0.80620582097300797, -0.24953176696814799],
-                 [-0.18700206124086899, 0.822960605125588],
-                 [0.61920375973213904, -0.57342883815743995],
-                 [0.18700206124086999, 0.822960605125588],
-                 [-0.80620582097300797, -0.249531766968147],
-                 [-0.26594843220537401, -0.57351635407928103],
-                 [0.62965394822117604, 0.056440078653143003],
-                 [-0.36370551601580098, 0.51707627542613899],
-                 [0.26594843220537401, -0.57351635407928103],
-                 [0.36370551601580198, 0.51707627542613799],
-                 [-0.62965394822117604, 0.056440078653143502],
-                 [-0.992184709915791, -0.572838109355713],
-                 [0.992184709915791, -0.572838109355713],
-                 [0.0, 1.14567621871143]],
-      'weights': [0.0074732050690642501,
-                  0.0074732050690642501,
-                  0.0074732050690642501,
-                  0.00036854924623765703,
-                  0.00036854924623765703,
-                  0.00036854924623765703,
-                  0.00036854924623765703,
-                  0.00036854924623765703,
-                  0.00036854924623765703,
-                  0.0038996825065809901,
-                  0.0038996825065809901,
-                  0.0038996825065809901,
-                  0.0038996825065809901,
-                  0.0038996825065809901,
-                  0.0038996825065809901,
-                  0.0039232165227311797,
-                  0.0039232165227311797,
-                  0.0039232165227311797,
-                  0.0039232165227311797,
-                  0.0039232165227311797,
-                  0.0039232165227311797,
-                  0.0081392033259943004,
-                  0.0081392033259943004,
-                  0.0081392033259943004,
-                  0.0024295988926256698,
-                  0.0024295988926256698,
-                  0.0024295988926256698,
-                  0.0024295988926256698,
-                  0.0024295988926256698,
-                  0.0024295988926256698,
-                  0.000169411745403612,
-                  0.000169411745403612,
-                  0.000169411745403612,
-                  0.000169411745403612,
-                  0.000169411745403612,
-                  0.000169411745403612,
-                  0.00069951121244016896,
-                  0.00069951121244016896,
-                  0.00069951121244016896,
-                  0.00069951121244016896,
-                  0.00069951121244016896,
-                  0.00069951121244016896,
-                  0.0021416676767829299,
-                  0.0021416676767829299,
-                  0.0021416676767829299,
-                  0.0089263928599995108,
-                  0.0089263928599995108,
-                  0.0089263928599995108,
-                  0.0089263928599995108,
-                  0.0089263928599995108,
-                  0.0089263928599995108,
-                  0.0078106329849182698,
-                  0.0078106329849182698,
-                  0.0078106329849182698,
-                  0.0078106329849182698,
-                  0.0078106329849182698,
-                  0.0078106329849182698,
-                  0.0078219369058782906,
-                  0.0078219369058782906,
-                  0.0078219369058782906,
-                  0.0033161653668116499,
-                  0.0033161653668116499,
-                  0.0033161653668116499,
-                  0.0033161653668116499,
-                  0.0033161653668116499,
-                  0.0033161653668116499,
-                  0.0045141837149525899,
-                  0.0045141837149525899,
-                  0.0045141837149525899,
-                  0.0045141837149525899,
-                  0.0045141837149525899,
-                  0.0045141837149525899,
-                  0.0050999908087115998,
-                  0.0050999908087115998,
-                  0.0050999908087115998,
-                  0.0053280606911370598,
-                  0.0053280606911370598,
-                  0.0053280606911370598,
-                  0.0053280606911370598,
-                  0.0053280606911370598,
-                  0.0053280606911370598,
-                  0.00360786613872797,
-                  0.00360786613872797,
-                  0.00360786613872797,
-                  0.0017888833999533001,
-                  0.0017888833999533001,
-                  0.0017888833999533001,
-                  0.0017888833999533001,
-                  0.0017888833999533001,
-                  0.0017888833999533001,
-                  0.0075419748855831796,
-                  0.0075419748855831796,
-                  0.0075419748855831796,
-                  0.0075419748855831796,
-                  0.0075419748855831796,
-                  0.0075419748855831796,
-                  0.0058752686174100297,
-                  0.0058752686174100297,
-                  0.0058752686174100297,
-                  0.0058752686174100297,
-                  0.0058752686174100297,
-                  0.0058752686174100297,
-                  0.0078516577310448095,
-                  0.0078516577310448095,
-                  0.0078516577310448095,
-                  0.0078516577310448095,
-                  0.0078516577310448095,
-                  0.0078516577310448095,
-                  0.0093006266630855892,
-                  0.0093006266630855892,
-                  0.0093006266630855892,
-                  0.0093006266630855892,
-                  0.0093006266630855892,
-                  0.0093006266630855892,
-                  0.0086797428834691805,
-                  0.0086797428834691805,
-                  0.0086797428834691805,
-                  0.0086797428834691805,
-                  0.0086797428834691805,
-                  0.0086797428834691805,
-                  0.00114836330499573,
-                  0.00114836330499573,
-                  0.00114836330499573,
-                  0.0033833781311484899,
-                  0.0033833781311484899,
-                  0.0033833781311484899,
-                  0.0033833781311484899,
-                  0.0033833781311484899,
-                  0.0033833781311484899,
-                  0.0039320208420198996,
-                  0.0039320208420198996,
-                  0.0039320208420198996,
-                  0.0039320208420198996,
-                  0.0039320208420198996,
-                  0.0039320208420198996,
-                  0.00370429026741487,
-                  0.00370429026741487,
-                  0.00370429026741487,
-                  0.00370429026741487,
-                  0.00370429026741487,
-                  0.00370429026741487,
-                  0.0074099457670250002,
-                  0.0074099457670250002,
-                  0.0074099457670250002,
-                  0.0074099457670250002,
-                  0.0074099457670250002,
-                  0.0074099457670250002,
-                  0.0043422848801329596,
-                  0.0043422848801329596,
-                  0.0043422848801329596,
-                  0.0043422848801329596,
-                  0.0043422848801329596,
-                  0.0043422848801329596,
-                  0.0068827041615067697,
-                  0.0068827041615067697,
-                  0.0068827041615067697,
-                  0.0068827041615067697,
-                  0.0068827041615067697,
-                  0.0068827041615067697,
-                  0.0096964611109661997,
-                  0.0096964611109661997,
-                  0.0096964611109661997,
-                  0.0082106373536319794,
-                  0.0082106373536319794,
-                  0.0082106373536319794,
-                  0.0082106373536319794,
-                  0.0082106373536319794,
-                  0.0082106373536319794,
-                  0.0054748431350368099,
-                  0.0054748431350368099,
-                  0.0054748431350368099,
-                  0.0054748431350368099,
-                  0.0054748431350368099,
-                  0.0054748431350368099,
-                  0.0022629123107841,
-                  0.0022629123107841,
-                  0.0022629123107841,
-                  0.0022629123107841,
-                  0.0022629123107841,
-                  0.0022629123107841,
-                  0.0041957485773657099,
-                  0.0041957485773657099,
-                  0.0041957485773657099,
-                  0.0041957485773657099,
-                  0.0041957485773657099,
-                  0.0041957485773657099,
-                  0.0078839740041324602,
-                  0.0078839740041324602,
-                  0.0078839740041324602,
-                  0.00434273868807597,
-                  0.00434273868807597,
-                  0.00434273868807597,
-                  0.0071598799047770901,
-                  0.0071598799047770901,
-                  0.0071598799047770901,
-                  0.0071598799047770901,
-                  0.0071598799047770901,
-                  0.0071598799047770901,
-                  0.0088423500492635799,
-                  0.0088423500492635799,
-                  0.0088423500492635799,
-                  0.0088423500492635799,
-                  0.0088423500492635799,
-                  0.0088423500492635799,
-                  0.0046724206741426202,
-                  0.0046724206741426202,
-                  0.0046724206741426202,
-                  0.0046724206741426202,
-                  0.0046724206741426202,
-                  0.0046724206741426202,
-                  0.0032579259044036401,
-                  0.0032579259044036401,
-                  0.0032579259044036401,
-                  0.0032579259044036401,
-                  0.0032579259044036401,
-                  0.0032579259044036401,
-                  0.00158347377504036,
-                  0.00158347377504036,
-                  0.00158347377504036,
-                  0.00158347377504036,
-                  0.00158347377504036,
-                  0.00158347377504036,
-                  0.0070397991354053998,
-                  0.0070397991354053998,
-                  0.0070397991354053998,
-                  0.0012142812436081499,
-                  0.0012142812436081499,
-                  0.0012142812436081499,
-                  0.0012142812436081499,
-                  0.0012142812436081499,
-                  0.0012142812436081499,
-                  0.0095351363550560796,
-                  0.0095351363550560796,
-                  0.0095351363550560796,
-                  0.0055254250650869398,
-                  0.0055254250650869398,
-                  0.0055254250650869398,
-                  0.0055254250650869398,
-                  0.0055254250650869398,
-                  0.0055254250650869398,
-                  0.0085644051172092204,
-                  0.0085644051172092204,
-                  0.0085644051172092204,
-                  0.0042155100135688401,
-                  0.0042155100135688401,
-                  0.0042155100135688401,
-                  0.0042155100135688401,
-                  0.0042155100135688401,
-                  0.0042155100135688401,
-                  0.00043448053087350499,
-                  0.00043448053087350499,
-                  0.00043448053087350499,
-                  0.00043448053087350499,
-                  0.00043448053087350499,
-                  0.00043448053087350499,
-                  0.0070421545196487799,
-                  0.0070421545196487799,
-                  0.0070421545196487799,
-                  0.0029632152595370199,
-                  0.0029632152595370199,
-                  0.0029632152595370199,
-                  0.0029632152595370199,
-                  0.0029632152595370199,
-                  0.0029632152595370199,
-                  0.0078427470723880701,
-                  0.0078427470723880701,
-                  0.0078427470723880701,
-                  0.0078427470723880701,
-                  0.0078427470723880701,
-                  0.0078427470723880701,
-                  0.0069423007904281502,
-                  0.0069423007904281502,
-                  0.0069423007904281502,
-                  0.0069423007904281502,
-                  0.0069423007904281502,
-                  0.0069423007904281502,
-                  0.00193910085376547,
-                  0.00193910085376547,
-                  0.00193910085376547,
-                  0.00193910085376547,
-                  0.00193910085376547,
-                  0.00193910085376547,
-                  0.0028676683281910502,
-                  0.0028676683281910502,
-                  0.0028676683281910502,
-                  0.0028676683281910502,
-                  0.0028676683281910502,
-                  0.0028676683281910502,
-                  0.0053252893007031104,
-                  0.0053252893007031104,
-                  0.0053252893007031104,
-                  0.0053252893007031104,
-                  0.0053252893007031104,
-                  0.0053252893007031104,
-                  0.0083659273788452195,
-                  0.0083659273788452195,
-                  0.0083659273788452195,
-                  0.0083659273788452195,
-                  0.0083659273788452195,
-                  0.0083659273788452195,
-                  0.0067527419867555796,
-                  0.0067527419867555796,
-                  0.0067527419867555796,
-                  0.0067527419867555796,
-                  0.0067527419867555796,
-                  0.0067527419867555796,
-                  0.0028506992704184198,
-                  0.0028506992704184198,
-                  0.0028506992704184198,
-                  0.0028506992704184198,
-                  0.0028506992704184198,
-                  0.0028506992704184198,
-                  0.0064292078293087798,
-                  0.0064292078293087798,
-                  0.0064292078293087798,
-                  0.0064292078293087798,
-                  0.0064292078293087798,
-                  0.0064292078293087798,
-                  0.0024570450271942101,
-                  0.0024570450271942101,
-                  0.0024570450271942101,
-                  0.0024570450271942101,
-                  0.0024570450271942101,
-                  0.0024570450271942101,
-                  0.0022327142886418802,
-                  0.0022327142886418802,
-                  0.0022327142886418802,
-                  0.0022327142886418802,
-                  0.0022327142886418802,
-                  0.0022327142886418802,
-                  0.0027045801106103402,
-                  0.0027045801106103402,
-                  0.0027045801106103402,
-                  0.0027045801106103402,
-                  0.0027045801106103402,
-                  0.0027045801106103402,
-                  0.0029362970477618401,
-                  0.0029362970477618401,
-                  0.0029362970477618401,
-                  0.0029362970477618401,
-                  0.0029362970477618401,
-                  0.0029362970477618401,
-                  0.00129701309788085,
-                  0.00129701309788085,
-                  0.00129701309788085,
-                  0.00078427654187028398,
-                  0.00078427654187028398,
-                  0.00078427654187028398,
-                  0.00078427654187028398,
-                  0.00078427654187028398,
-                  0.00078427654187028398,
-                  0.00129096645631175,
-                  0.00129096645631175,
-                  0.00129096645631175,
-                  0.00129096645631175,
-                  0.00129096645631175,
-                  0.00129096645631175,
-                  0.00092205403836717798,
-                  0.00092205403836717798,
-                  0.00092205403836717798,
-                  0.00092205403836717798,
-                  0.00092205403836717798,
-                  0.00092205403836717798,
-                  0.0062910507702055099,
-                  0.0062910507702055099,
-                  0.0062910507702055099,
-                  0.0011390307040982899,
-                  0.0011390307040982899,
-                  0.0011390307040982899,
-                  0.0011390307040982899,
-                  0.0011390307040982899,
-                  0.0011390307040982899,
-                  0.00062712199240658596,
-                  0.00062712199240658596,
-                  0.00062712199240658596,
-                  0.00062712199240658596,
-                  0.00062712199240658596,
-                  0.00062712199240658596,
-                  0.0012228485606518499,
-                  0.0012228485606518499,
-                  0.0012228485606518499,
-                  0.0012228485606518499,
-                  0.0012228485606518499,
-                  0.0012228485606518499,
-                  0.0010424817209573199,
-                  0.0010424817209573199,
-                  0.0010424817209573199,
-                  0.0010424817209573199,
-                  0.0010424817209573199,
-                  0.0010424817209573199,
-                  0.00126896857184808,
-                  0.00126896857184808,
-                  0.00126896857184808,
-                  0.00126896857184808,
-                  0.00126896857184808,
-                  0.00126896857184808,
-                  0.00015459187633762899,
-                  0.00015459187633762899,
-                  0.00015459187633762899]},
- 48: {'points': [[0.0, -0.049852320663764903],
-                 [0.043173376132428401, 0.024926160331882701],
-                 [-0.043173376132428297, 0.024926160331882798],
-                 [-0.0451647726500507, -0.20374579426251399],
-                 [0.19903142007060001, 0.062759056660164597],
-                 [-0.15386664742054901, 0.14098673760235],
-                 [0.045164772650050797, -0.20374579426251399],
-                 [0.15386664742054901, 0.14098673760235],
-                 [-0.19903142007060001, 0.062759056660164694],
-                 [-0.27473470409127199, -0.38976656878879801],
-                 [0.47491510216263, -0.043043948649842498],
-                 [-0.20018039807135801, 0.43281051743864102],
-                 [0.27473470409127199, -0.38976656878879801],
-                 [0.20018039807135801, 0.43281051743864102],
-                 [-0.47491510216263, -0.043043948649842401],
-                 [-0.32601858877976098, -0.51725511617300701],
-                 [0.61096536523317602, -0.0237128219027215],
-                 [-0.28494677645341498, 0.54096793807572896],
-                 [0.32601858877976098, -0.51725511617300701],
-                 [0.28494677645341498, 0.54096793807572896],
-                 [-0.61096536523317602, -0.023712821902721299],
-                 [0.0, -0.13890333151925499],
-                 [0.120293813765966, 0.069451665759627607],
-                 [-0.120293813765966, 0.069451665759627607],
-                 [-0.99385799488525295, -0.57501881807098498],
-                 [0.99490990154620196, -0.57319686228940103],
-                 [-0.0010519066609486799, 1.14821568036039],
-                 [0.99385799488525295, -0.57501881807098498],
-                 [0.00105190666094934, 1.14821568036039],
-                 [-0.99490990154620296, -0.57319686228940103],
-                 [-0.32465958030201603, -0.54414549714157601],
-                 [0.63357361403052503, -0.0090906955527514394],
-                 [-0.30891403372850901, 0.553236192694328],
-                 [0.32465958030201603, -0.54414549714157601],
-                 [0.30891403372851001, 0.553236192694328],
-                 [-0.63357361403052503, -0.0090906955527510994],
-                 [-0.0840126181437513, -0.098677996812038704],
-                 [0.12746396110566099, -0.0234180631449105],
-                 [-0.043451342961909799, 0.12209605995695],
-                 [0.0840126181437513, -0.098677996812038704],
-                 [0.043451342961909903, 0.12209605995695],
-                 [-0.12746396110566099, -0.0234180631449105],
-                 [-0.68050562893254296, -0.57450768223436],
-                 [0.83779106195054498, -0.30208132095670798],
-                 [-0.15728543301800199, 0.87658900319106903],
-                 [0.68050562893254296, -0.57450768223436],
-                 [0.15728543301800299, 0.87658900319106903],
-                 [-0.83779106195054498, -0.30208132095670798],
-                 [-0.55412485218420504, -0.48499178896207101],
-                 [0.69707763596011696, -0.237390304378783],
-                 [-0.142952783775912, 0.72238209334085501],
-                 [0.55412485218420504, -0.48499178896207101],
-                 [0.142952783775912, 0.72238209334085501],
-                 [-0.69707763596011696, -0.237390304378783],
-                 [0.0, -0.540419667417809],
-                 [0.46801716068855997, 0.270209833708905],
-                 [-0.46801716068855898, 0.270209833708905],
-                 [-0.330386794418498, -0.43371331113028699],
-                 [0.54080014260754194, -0.069266701476182593],
-                 [-0.210413348189043, 0.50298001260646996],
-                 [0.330386794418498, -0.43371331113028699],
-                 [0.210413348189044, 0.50298001260646996],
-                 [-0.54080014260754194, -0.069266701476182496],
-                 [-0.85476722552457995, -0.493500087751086],
-                 [0.85476722552457995, -0.493500087751086],
-                 [0.0, 0.98700017550217201],
-                 [-0.75952135375607299, -0.43850985804633802],
-                 [0.75952135375607299, -0.43850985804633702],
-                 [0.0, 0.87701971609267504],
-                 [-0.72722633108802304, -0.53696054670467397],
-                 [0.82863463982023899, -0.36131620367084499],
-                 [-0.101408308732216, 0.89827675037551902],
-                 [0.72722633108802304, -0.53696054670467397],
-                 [0.101408308732216, 0.89827675037551902],
-                 [-0.82863463982023999, -0.36131620367084399],
-                 [-0.238100414154055, -0.33709214277689398],
-                 [0.41098056613794898, -0.037654935920560503],
-                 [-0.172880151983894, 0.37474707869745499],
-                 [0.238100414154055, -0.33709214277689398],
-                 [0.172880151983894, 0.37474707869745499],
-                 [-0.41098056613794898, -0.037654935920560101],
-                 [0.0, -0.50491682572683605],
-                 [0.437270797877641, 0.25245841286341802],
-                 [-0.43727079787764001, 0.25245841286341902],
-                 [0.0, -0.46179620632104401],
-                 [0.399927246045304, 0.23089810316052201],
-                 [-0.399927246045304, 0.23089810316052201],
-                 [-0.76837647852811597, -0.559093346190495],
-                 [0.86837728015187399, -0.38588687698052898],
-                 [-0.100000801623758, 0.94498022317102404],
-                 [0.76837647852811597, -0.559093346190495],
-                 [0.100000801623759, 0.94498022317102404],
-                 [-0.86837728015187399, -0.38588687698052898],
-                 [-0.39481835688065797, -0.559428305488056],
-                 [0.68188830258906696, -0.062208574195051901],
-                 [-0.28706994570840899, 0.62163687968310899],
-                 [0.39481835688065797, -0.559428305488056],
-                 [0.28706994570840999, 0.62163687968310899],
-                 [-0.68188830258906696, -0.062208574195051401],
-                 [-0.35808200103666599, -0.48419731762996798],
-                 [0.59836817803016795, -0.068009450720734596],
-                 [-0.24028617699350199, 0.55220676835070304],
-                 [0.35808200103666599, -0.48419731762996798],
-                 [0.24028617699350199, 0.55220676835070304],
-                 [-0.59836817803016795, -0.068009450720734305],
-                 [-0.707437206766932, -0.456521784744018],
-                 [0.74907806635279595, -0.384397700270459],
-                 [-0.041640859585864103, 0.840919485014477],
-                 [0.707437206766932, -0.456521784744018],
-                 [0.041640859585864602, 0.840919485014477],
-                 [-0.74907806635279595, -0.384397700270458],
-                 [-0.097010789493490401, -0.55049949314164703],
-                 [0.52525194057786895, 0.19123593842827599],
-                 [-0.42824115108437799, 0.35926355471337101],
-                 [0.097010789493490401, -0.55049949314164703],
-                 [0.42824115108437799, 0.35926355471337101],
-                 [-0.52525194057786895, 0.19123593842827699],
-                 [-0.225106068882378, -0.50872207349408805],
-                 [0.55311927355296397, 0.059413462548855003],
-                 [-0.32801320467058498, 0.449308610945233],
-                 [0.225106068882378, -0.50872207349408805],
-                 [0.32801320467058598, 0.449308610945233],
-                 [-0.55311927355296397, 0.059413462548855503],
-                 [-0.89142246128908698, -0.55689353511683903],
-                 [0.92799517925904795, -0.493547729421981],
-                 [-0.036572717969959798, 1.0504412645388199],
-                 [0.89142246128908698, -0.55689353511683903],
-                 [0.036572717969960401, 1.0504412645388199],
-                 [-0.92799517925904795, -0.49354772942198],
-                 [-0.112315015583931, -0.51622984675368799],
-                 [0.50322566927240697, 0.16084726665471499],
-                 [-0.390910653688476, 0.355382580098974],
-                 [0.112315015583931, -0.51622984675368799],
-                 [0.390910653688476, 0.355382580098974],
-                 [-0.50322566927240697, 0.16084726665471499],
-                 [-0.24247749198134, -0.46526044009366002],
-                 [0.52416610648770701, 0.022638552145052299],
-                 [-0.28168861450636701, 0.44262188794860802],
-                 [0.24247749198134, -0.46526044009366002],
-                 [0.28168861450636801, 0.44262188794860802],
-                 [-0.52416610648770701, 0.022638552145052601],
-                 [-0.83724014027395499, -0.55929784568894703],
-                 [0.90298621278551405, -0.44542230770081898],
-                 [-0.065746072511559006, 1.0047201533897701],
-                 [0.83724014027395499, -0.55929784568894703],
-                 [0.0657460725115597, 1.0047201533897701],
-                 [-0.90298621278551405, -0.44542230770081798],
-                 [-0.133183470490917, -0.183993013377767],
-                 [0.22593435894945499, -0.023343762120425399],
-                 [-0.092750888458538003, 0.20733677549819299],
-                 [0.133183470490917, -0.183993013377767],
-                 [0.092750888458538197, 0.20733677549819299],
-                 [-0.22593435894945499, -0.023343762120425299],
-                 [-0.72689161196677399, -0.50260381043912905],
-                 [0.798713473862531, -0.37820469654148198],
-                 [-0.0718218618957569, 0.88080850698061197],
-                 [0.72689161196677399, -0.50260381043912905],
-                 [0.071821861895757594, 0.88080850698061197],
-                 [-0.798713473862531, -0.37820469654148198],
-                 [-0.64034267680893997, -0.49252317057731898],
-                 [0.74670891607688406, -0.30829143995521102],
-                 [-0.106366239267944, 0.80081461053253],
-                 [0.64034267680893997, -0.49252317057731898],
-                 [0.106366239267945, 0.80081461053253],
-                 [-0.74670891607688406, -0.30829143995521002],
-                 [-0.68321717220184297, -0.56097451023259404],
-                 [0.82742676283788097, -0.31119617231226598],
-                 [-0.144209590636038, 0.87217068254486096],
-                 [0.68321717220184297, -0.56097451023259404],
-                 [0.144209590636039, 0.87217068254486096],
-                 [-0.82742676283788197, -0.31119617231226598],
-                 [-0.83839805257724098, -0.57406923516192598],
-                 [0.91635756746995101, -0.43903939443432899],
-                 [-0.077959514892710399, 1.0131086295962599],
-                 [0.83839805257724098, -0.57406923516192598],
-                 [0.077959514892710996, 1.0131086295962599],
-                 [-0.91635756746995101, -0.43903939443432799],
-                 [-0.964886276598659, -0.55707735153161198],
-                 [0.96488627659866, -0.55707735153161198],
-                 [0.0, 1.11415470306322],
-                 [-0.59225145333921003, -0.55651660365661104],
-                 [0.77808324306406595, -0.23464650219170499],
-                 [-0.18583178972485501, 0.79116310584831595],
-                 [0.59225145333921003, -0.55651660365661104],
-                 [0.18583178972485601, 0.79116310584831595],
-                 [-0.77808324306406595, -0.23464650219170399],
-                 [-0.36426477146050001, -0.57405163423686201],
-                 [0.67927568406334604, -0.028436728670094499],
-                 [-0.31501091260284497, 0.60248836290695695],
-                 [0.36426477146050001, -0.57405163423686201],
-                 [0.31501091260284603, 0.60248836290695695],
-                 [-0.67927568406334504, -0.0284367286700942],
-                 [-0.64466682188081703, -0.53196149015755201],
-                 [0.783025575251874, -0.29231709964698899],
-                 [-0.13835875337105699, 0.82427858980454105],
-                 [0.64466682188081703, -0.53196149015755201],
-                 [0.13835875337105699, 0.82427858980454105],
-                 [-0.783025575251874, -0.29231709964698899],
-                 [-0.18326940651609799, -0.41372183327216],
-                 [0.44992832097200902, 0.048144954856642101],
-                 [-0.266658914455911, 0.365576878415518],
-                 [0.18326940651609799, -0.41372183327216],
-                 [0.266658914455912, 0.365576878415518],
-                 [-0.44992832097200902, 0.0481449548566424],
-                 [-0.064024696057757499, -0.41051333470792201],
-                 [0.38752732447820298, 0.149809654098366],
-                 [-0.32350262842044603, 0.26070368060955701],
-                 [0.064024696057757499, -0.41051333470792201],
-                 [0.32350262842044603, 0.26070368060955701],
-                 [-0.38752732447820298, 0.149809654098366],
-                 [-0.46015923358724597, -0.48470232197639102],
-                 [0.64984414089848197, -0.156158425084337],
-                 [-0.189684907311235, 0.64086074706072904],
-                 [0.46015923358724597, -0.48470232197639102],
-                 [0.189684907311236, 0.64086074706072904],
-                 [-0.64984414089848197, -0.156158425084337],
-                 [-0.62850907517187604, -0.43960983180755198],
-                 [0.69496781968468202, -0.32449990970413201],
-                 [-0.066458744512806006, 0.76410974151168398],
-                 [0.62850907517187604, -0.43960983180755198],
-                 [0.066458744512806395, 0.76410974151168398],
-                 [-0.69496781968468202, -0.32449990970413201],
-                 [-0.93449067868256797, -0.55824444146228303],
-                 [0.95069920716907597, -0.53017044660772294],
-                 [-0.0162085284865079, 1.08841488807001],
-                 [0.93449067868256797, -0.55824444146228303],
-                 [0.016208528486508601, 1.08841488807001],
-                 [-0.95069920716907597, -0.53017044660772294],
-                 [-0.49718634910646398, -0.55624309454314402],
-                 [0.73031382510726395, -0.15245446146946501],
-                 [-0.233127476000799, 0.70869755601260898],
-                 [0.49718634910646398, -0.55624309454314402],
-                 [0.2331274760008, 0.70869755601260898],
-                 [-0.73031382510726395, -0.15245446146946401],
-                 [-0.19646045886649299, -0.113426498811687],
-                 [0.19646045886649299, -0.113426498811687],
-                 [0.0, 0.22685299762337499],
-                 [-0.76477834359061703, -0.57369006779153198],
-                 [0.879219344401592, -0.37547243991789198],
-                 [-0.114441000810975, 0.94916250770942401],
-                 [0.76477834359061703, -0.57369006779153198],
-                 [0.114441000810976, 0.94916250770942401],
-                 [-0.879219344401592, -0.37547243991789098],
-                 [-0.86560964360184001, -0.53020559443910398],
-                 [0.89197633581381297, -0.48453714390043501],
-                 [-0.026366692211972999, 1.01474273833954],
-                 [0.86560964360183901, -0.53020559443910398],
-                 [0.026366692211973599, 1.01474273833954],
-                 [-0.89197633581381297, -0.48453714390043501],
-                 [-0.80347270468749399, -0.53187309456333598],
-                 [0.86235196382503898, -0.42989122622509401],
-                 [-0.058879259137544403, 0.96176432078843099],
-                 [0.80347270468749399, -0.53187309456333598],
-                 [0.058879259137545097, 0.96176432078843099],
-                 [-0.86235196382503898, -0.42989122622509401],
-                 [-0.120539650978363, -0.46914022619776702],
-                 [0.466557179313626, 0.13017971318831101],
-                 [-0.346017528335262, 0.33896051300945701],
-                 [0.120539650978363, -0.46914022619776702],
-                 [0.346017528335263, 0.33896051300945701],
-                 [-0.466557179313626, 0.13017971318831201],
-                 [-0.061721699934179003, -0.27636104453730598],
-                 [0.27019653515279901, 0.084727962160894094],
-                 [-0.20847483521862001, 0.19163308237641299],
-                 [0.061721699934179003, -0.27636104453730598],
-                 [0.20847483521862101, 0.19163308237641299],
-                 [-0.27019653515279901, 0.084727962160894205],
-                 [-0.94600280954375204, -0.57380107877191699],
-                 [0.96992771570727199, -0.53236192573038299],
-                 [-0.023924906163518899, 1.1061630045023001],
-                 [0.94600280954375204, -0.57380107877191699],
-                 [0.023924906163519801, 1.1061630045023001],
-                 [-0.96992771570727199, -0.53236192573038299],
-                 [-0.20973158081832899, -0.544631757274742],
-                 [0.576530727916852, 0.090683001672828903],
-                 [-0.36679914709852202, 0.453948755601914],
-                 [0.20973158081832899, -0.544631757274742],
-                 [0.36679914709852302, 0.453948755601914],
-                 [-0.576530727916852, 0.090683001672829402],
-                 [-0.53588808819149503, -0.43425004501953401],
-                 [0.64401561467720003, -0.24696767544954401],
-                 [-0.10812752648570401, 0.68121772046907803],
-                 [0.53588808819149503, -0.43425004501953401],
-                 [0.10812752648570501, 0.68121772046907803],
-                 [-0.64401561467720003, -0.24696767544954301],
-                 [-0.89909074000354305, -0.57340126819590798],
-                 [0.94612543482164202, -0.49193478705246502],
-                 [-0.047034694818098299, 1.0653360552483699],
-                 [0.89909074000354305, -0.57340126819590798],
-                 [0.047034694818099097, 1.0653360552483699],
-                 [-0.94612543482164202, -0.49193478705246402],
-                 [-0.14226265688360401, -0.56908448605073303],
-                 [0.56397295026134797, 0.161339168154296],
-                 [-0.42171029337774402, 0.40774531789643798],
-                 [0.14226265688360401, -0.56908448605073303],
-                 [0.42171029337774402, 0.40774531789643698],
-                 [-0.56397295026134797, 0.161339168154297],
-                 [-0.58106813824728198, -0.37608188392552799],
-                 [0.61623053450625898, -0.31517882708910999],
-                 [-0.035162396258976901, 0.69126071101463904],
-                 [0.58106813824728198, -0.37608188392552799],
-                 [0.035162396258977303, 0.69126071101463904],
-                 [-0.61623053450625898, -0.31517882708910999],
-                 [-0.43230361497566, -0.42921616619109199],
-                 [0.58786391112428005, -0.159777829621222],
-                 [-0.15556029614861899, 0.58899399581231504],
-                 [0.43230361497566, -0.42921616619109199],
-                 [0.15556029614861999, 0.58899399581231504],
-                 [-0.58786391112428005, -0.159777829621222],
-                 [-0.54615078926623395, -0.52577535892830096],
-                 [0.728410212148907, -0.21009277833733001],
-                 [-0.18225942288267299, 0.73586813726563105],
-                 [0.54615078926623395, -0.52577535892830096],
-                 [0.18225942288267299, 0.73586813726563105],
-                 [-0.728410212148907, -0.21009277833732901],
-                 [-0.79506240679562101, -0.49030858978345199],
-                 [0.82215089784400297, -0.44338994698727902],
-                 [-0.0270884910483822, 0.933698536770732],
-                 [0.79506240679562101, -0.49030858978345199],
-                 [0.027088491048382801, 0.933698536770732],
-                 [-0.82215089784400297, -0.44338994698727902],
-                 [-0.25184574558858303, -0.20270732080067699],
-                 [0.30147256214076001, -0.11675115311440699],
-                 [-0.049626816552176899, 0.31945847391508497],
-                 [0.25184574558858303, -0.20270732080067699],
-                 [0.049626816552177197, 0.31945847391508497],
-                 [-0.30147256214076001, -0.11675115311440599],
-                 [-0.36058518255942701, -0.20818395221647601],
-                 [0.36058518255942801, -0.20818395221647601],
-                 [0.0, 0.41636790443295202],
-                 [-0.97712556750745205, -0.57333501569761502],
-                 [0.98508547222701104, -0.55954805629993298],
-                 [-0.0079599047195577591, 1.13288307199755],
-                 [0.97712556750745305, -0.57333501569761502],
-                 [0.0079599047195584305, 1.13288307199755],
-                 [-0.98508547222701104, -0.55954805629993198],
-                 [0.0, -0.34742627962761802],
-                 [0.30087998409983302, 0.17371313981380901],
-                 [-0.30087998409983302, 0.17371313981380901],
-                 [-0.26607245123060802, -0.56621285723554904],
-                 [0.62339094393066197, 0.0526809266048721],
-                 [-0.357318492700053, 0.51353193063067804],
-                 [0.26607245123060802, -0.56621285723554904],
-                 [0.357318492700053, 0.51353193063067804],
-                 [-0.62339094393066097, 0.052680926604872599],
-                 [-0.12724847472110101, -0.34679505484408202],
-                 [0.36395756476234298, 0.063197115720745697],
-                 [-0.23670909004124199, 0.28359793912333697],
-                 [0.12724847472110101, -0.34679505484408202],
-                 [0.23670909004124199, 0.28359793912333697],
-                 [-0.36395756476234298, 0.063197115720745906],
-                 [-0.520297256678383, -0.30039376120188799],
-                 [0.520297256678383, -0.30039376120188799],
-                 [0.0, 0.60078752240377697],
-                 [-0.91580900952196498, -0.528742578173791],
-                 [0.91580900952196498, -0.528742578173791],
-                 [0.0, 1.05748515634758],
-                 [-0.30727380337735399, -0.28592841602633901],
-                 [0.40125817363133298, -0.123142711629083],
-                 [-0.093984370253978503, 0.40907112765542297],
-                 [0.30727380337735399, -0.28592841602633901],
-                 [0.093984370253978697, 0.40907112765542297],
-                 [-0.40125817363133298, -0.123142711629083],
-                 [-0.58589180790116202, -0.57323206949747496],
-                 [0.78937943839932101, -0.220781154762861],
-                 [-0.20348763049815799, 0.79401322426033605],
-                 [0.58589180790116202, -0.57323206949747496],
-                 [0.20348763049815899, 0.79401322426033605],
-                 [-0.78937943839932101, -0.220781154762861],
-                 [-0.17860222460692299, -0.26683655423740599],
-                 [0.32038834693135898, -0.021255786563306199],
-                 [-0.14178612232443599, 0.288092340800713],
-                 [0.17860222460692299, -0.26683655423740599],
-                 [0.14178612232443599, 0.288092340800712],
-                 [-0.32038834693135898, -0.021255786563306001],
-                 [-0.43751879768235902, -0.52805029804391102],
-                 [0.67606437142315101, -0.114877244404191],
-                 [-0.23854557374079199, 0.64292754244810302],
-                 [0.43751879768235902, -0.52805029804391102],
-                 [0.23854557374079199, 0.64292754244810302],
-                 [-0.67606437142315101, -0.114877244404191],
-                 [-0.48056445088740202, -0.57349391506508196],
-                 [0.73694252480585698, -0.12943406509166799],
-                 [-0.25637807391845502, 0.70292798015675095],
-                 [0.48056445088740202, -0.57349391506508196],
-                 [0.25637807391845502, 0.70292798015675095],
-                 [-0.73694252480585698, -0.12943406509166799],
-                 [-0.48038610507302998, -0.36887306566949202],
-                 [0.55964649817814005, -0.23159003778355799],
-                 [-0.079260393105110793, 0.60046310345305098],
-                 [0.48038610507302998, -0.36887306566949202],
-                 [0.079260393105111196, 0.60046310345305098],
-                 [-0.55964649817814105, -0.23159003778355799],
-                 [-0.41788380954447102, -0.29271463211375298],
-                 [0.46244021224216197, -0.215540678838854],
-                 [-0.044556402697690602, 0.50825531095260701],
-                 [0.41788380954447102, -0.29271463211375298],
-                 [0.044556402697690997, 0.50825531095260701],
-                 [-0.46244021224216197, -0.215540678838853],
-                 [-0.67585861227308197, -0.39020715172999099],
-                 [0.67585861227308197, -0.39020715172998999],
-                 [0.0, 0.78041430345998197],
-                 [-0.36944533995870499, -0.362770896062172],
-                 [0.49889148172283798, -0.138563601682931],
-                 [-0.12944614176413199, 0.50133449774510397],
-                 [0.36944533995870499, -0.362770896062172],
-                 [0.12944614176413199, 0.50133449774510297],
-                 [-0.49889148172283798, -0.138563601682931],
-                 [0.0, -0.56756638958566097],
-                 [0.49152691171539797, 0.28378319479283098],
-                 [-0.49152691171539797, 0.28378319479283098],
-                 [-0.072247744117482998, -0.57707312306547298],
-                 [0.53588385647466497, 0.22596817976087899],
-                 [-0.463636112357182, 0.35110494330459502],
-                 [0.072247744117483095, -0.57707312306547298],
-                 [0.463636112357182, 0.35110494330459502],
-                 [-0.53588385647466497, 0.22596817976087899],
-                 [-0.23245589269716299, -0.57716232573911697],
-                 [0.61606518254596598, 0.087268454534425402],
-                 [-0.38360928984880299, 0.48989387120469202],
-                 [0.23245589269716299, -0.57716232573911697],
-                 [0.38360928984880299, 0.48989387120469202],
-                 [-0.61606518254596598, 0.087268454534425902]],
-      'weights': [0.0075606421036395997,
-                  0.0075606421036395997,
-                  0.0075606421036395997,
-                  0.0064431102067693501,
-                  0.0064431102067693501,
-                  0.0064431102067693501,
-                  0.0064431102067693501,
-                  0.0064431102067693501,
-                  0.0064431102067693501,
-                  0.00525263623558504,
-                  0.00525263623558504,
-                  0.00525263623558504,
-                  0.00525263623558504,
-                  0.00525263623558504,
-                  0.00525263623558504,
-                  0.0031991166600233399,
-                  0.0031991166600233399,
-                  0.0031991166600233399,
-                  0.0031991166600233399,
-                  0.0031991166600233399,
-                  0.0031991166600233399,
-                  0.0068748128425985804,
-                  0.0068748128425985804,
-                  0.0068748128425985804,
-                  4.11758846466525e-05,
-                  4.11758846466525e-05,
-                  4.11758846466525e-05,
-                  4.11758846466525e-05,
-                  4.11758846466525e-05,
-                  4.11758846466525e-05,
-                  0.0026759621240144199,
-                  0.0026759621240144199,
-                  0.0026759621240144199,
-                  0.0026759621240144199,
-                  0.0026759621240144199,
-                  0.0026759621240144199,
-                  0.0087154839119798107,
-                  0.0087154839119798107,
-                  0.0087154839119798107,
-                  0.0087154839119798107,
-                  0.0087154839119798107,
-                  0.0087154839119798107,
-                  0.00067331009881855001,
-                  0.00067331009881855001,
-                  0.00067331009881855001,
-                  0.00067331009881855001,
-                  0.00067331009881855001,
-                  0.00067331009881855001,
-                  0.0039715393889707502,
-                  0.0039715393889707502,
-                  0.0039715393889707502,
-                  0.0039715393889707502,
-                  0.0039715393889707502,
-                  0.0039715393889707502,
-                  0.0031559949549206001,
-                  0.0031559949549206001,
-                  0.0031559949549206001,
-                  0.0056447677773586603,
-                  0.0056447677773586603,
-                  0.0056447677773586603,
-                  0.0056447677773586603,
-                  0.0056447677773586603,
-                  0.0056447677773586603,
-                  0.00209828818780214,
-                  0.00209828818780214,
-                  0.00209828818780214,
-                  0.0033445112831373201,
-                  0.0033445112831373201,
-                  0.0033445112831373201,
-                  0.0022506863904738798,
-                  0.0022506863904738798,
-                  0.0022506863904738798,
-                  0.0022506863904738798,
-                  0.0022506863904738798,
-                  0.0022506863904738798,
-                  0.0070048149536987899,
-                  0.0070048149536987899,
-                  0.0070048149536987899,
-                  0.0070048149536987899,
-                  0.0070048149536987899,
-                  0.0070048149536987899,
-                  0.0045726563518306397,
-                  0.0045726563518306397,
-                  0.0045726563518306397,
-                  0.0056883875554709501,
-                  0.0056883875554709501,
-                  0.0056883875554709501,
-                  0.0014973217355694799,
-                  0.0014973217355694799,
-                  0.0014973217355694799,
-                  0.0014973217355694799,
-                  0.0014973217355694799,
-                  0.0014973217355694799,
-                  0.0021927268489069398,
-                  0.0021927268489069398,
-                  0.0021927268489069398,
-                  0.0021927268489069398,
-                  0.0021927268489069398,
-                  0.0021927268489069398,
-                  0.0047503027912172598,
-                  0.0047503027912172598,
-                  0.0047503027912172598,
-                  0.0047503027912172598,
-                  0.0047503027912172598,
-                  0.0047503027912172598,
-                  0.0036639933616640602,
-                  0.0036639933616640602,
-                  0.0036639933616640602,
-                  0.0036639933616640602,
-                  0.0036639933616640602,
-                  0.0036639933616640602,
-                  0.00281138610979425,
-                  0.00281138610979425,
-                  0.00281138610979425,
-                  0.00281138610979425,
-                  0.00281138610979425,
-                  0.00281138610979425,
-                  0.0044016152221982201,
-                  0.0044016152221982201,
-                  0.0044016152221982201,
-                  0.0044016152221982201,
-                  0.0044016152221982201,
-                  0.0044016152221982201,
-                  0.0010784362722929201,
-                  0.0010784362722929201,
-                  0.0010784362722929201,
-                  0.0010784362722929201,
-                  0.0010784362722929201,
-                  0.0010784362722929201,
-                  0.0045758017636059701,
-                  0.0045758017636059701,
-                  0.0045758017636059701,
-                  0.0045758017636059701,
-                  0.0045758017636059701,
-                  0.0045758017636059701,
-                  0.0056556951247993996,
-                  0.0056556951247993996,
-                  0.0056556951247993996,
-                  0.0056556951247993996,
-                  0.0056556951247993996,
-                  0.0056556951247993996,
-                  0.0013259101567526801,
-                  0.0013259101567526801,
-                  0.0013259101567526801,
-                  0.0013259101567526801,
-                  0.0013259101567526801,
-                  0.0013259101567526801,
-                  0.0089445460928250006,
-                  0.0089445460928250006,
-                  0.0089445460928250006,
-                  0.0089445460928250006,
-                  0.0089445460928250006,
-                  0.0089445460928250006,
-                  0.0032137145859135901,
-                  0.0032137145859135901,
-                  0.0032137145859135901,
-                  0.0032137145859135901,
-                  0.0032137145859135901,
-                  0.0032137145859135901,
-                  0.0039487467712836996,
-                  0.0039487467712836996,
-                  0.0039487467712836996,
-                  0.0039487467712836996,
-                  0.0039487467712836996,
-                  0.0039487467712836996,
-                  0.0017784604459218599,
-                  0.0017784604459218599,
-                  0.0017784604459218599,
-                  0.0017784604459218599,
-                  0.0017784604459218599,
-                  0.0017784604459218599,
-                  0.000576501196741112,
-                  0.000576501196741112,
-                  0.000576501196741112,
-                  0.000576501196741112,
-                  0.000576501196741112,
-                  0.000576501196741112,
-                  0.00055935707605731997,
-                  0.00055935707605731997,
-                  0.00055935707605731997,
-                  0.0021057395767012598,
-                  0.0021057395767012598,
-                  0.0021057395767012598,
-                  0.0021057395767012598,
-                  0.0021057395767012598,
-                  0.0021057395767012598,
-                  0.00102071758574364,
-                  0.00102071758574364,
-                  0.00102071758574364,
-                  0.00102071758574364,
-                  0.00102071758574364,
-                  0.00102071758574364,
-                  0.0030038364872144101,
-                  0.0030038364872144101,
-                  0.0030038364872144101,
-                  0.0030038364872144101,
-                  0.0030038364872144101,
-                  0.0030038364872144101,
-                  0.0070145893955239798,
-                  0.0070145893955239798,
-                  0.0070145893955239798,
-                  0.0070145893955239798,
-                  0.0070145893955239798,
-                  0.0070145893955239798,
-                  0.0074031875029905098,
-                  0.0074031875029905098,
-                  0.0074031875029905098,
-                  0.0074031875029905098,
-                  0.0074031875029905098,
-                  0.0074031875029905098,
-                  0.00490778076808968,
-                  0.00490778076808968,
-                  0.00490778076808968,
-                  0.00490778076808968,
-                  0.00490778076808968,
-                  0.00490778076808968,
-                  0.0047524227359155499,
-                  0.0047524227359155499,
-                  0.0047524227359155499,
-                  0.0047524227359155499,
-                  0.0047524227359155499,
-                  0.0047524227359155499,
-                  0.000819297195477175,
-                  0.000819297195477175,
-                  0.000819297195477175,
-                  0.000819297195477175,
-                  0.000819297195477175,
-                  0.000819297195477175,
-                  0.0023786561078227401,
-                  0.0023786561078227401,
-                  0.0023786561078227401,
-                  0.0023786561078227401,
-                  0.0023786561078227401,
-                  0.0023786561078227401,
-                  0.0094068481367786897,
-                  0.0094068481367786897,
-                  0.0094068481367786897,
-                  0.00073317882410406301,
-                  0.00073317882410406301,
-                  0.00073317882410406301,
-                  0.00073317882410406301,
-                  0.00073317882410406301,
-                  0.00073317882410406301,
-                  0.0018471649604679999,
-                  0.0018471649604679999,
-                  0.0018471649604679999,
-                  0.0018471649604679999,
-                  0.0018471649604679999,
-                  0.0018471649604679999,
-                  0.0023943888954136199,
-                  0.0023943888954136199,
-                  0.0023943888954136199,
-                  0.0023943888954136199,
-                  0.0023943888954136199,
-                  0.0023943888954136199,
-                  0.0063367283056126704,
-                  0.0063367283056126704,
-                  0.0063367283056126704,
-                  0.0063367283056126704,
-                  0.0063367283056126704,
-                  0.0063367283056126704,
-                  0.0090239931163094301,
-                  0.0090239931163094301,
-                  0.0090239931163094301,
-                  0.0090239931163094301,
-                  0.0090239931163094301,
-                  0.0090239931163094301,
-                  0.00035907242388879098,
-                  0.00035907242388879098,
-                  0.00035907242388879098,
-                  0.00035907242388879098,
-                  0.00035907242388879098,
-                  0.00035907242388879098,
-                  0.0033919033061366199,
-                  0.0033919033061366199,
-                  0.0033919033061366199,
-                  0.0033919033061366199,
-                  0.0033919033061366199,
-                  0.0033919033061366199,
-                  0.0055580168593717498,
-                  0.0055580168593717498,
-                  0.0055580168593717498,
-                  0.0055580168593717498,
-                  0.0055580168593717498,
-                  0.0055580168593717498,
-                  0.00054458302245966104,
-                  0.00054458302245966104,
-                  0.00054458302245966104,
-                  0.00054458302245966104,
-                  0.00054458302245966104,
-                  0.00054458302245966104,
-                  0.00186804200617109,
-                  0.00186804200617109,
-                  0.00186804200617109,
-                  0.00186804200617109,
-                  0.00186804200617109,
-                  0.00186804200617109,
-                  0.0062361224524391497,
-                  0.0062361224524391497,
-                  0.0062361224524391497,
-                  0.0062361224524391497,
-                  0.0062361224524391497,
-                  0.0062361224524391497,
-                  0.0063413695519385499,
-                  0.0063413695519385499,
-                  0.0063413695519385499,
-                  0.0063413695519385499,
-                  0.0063413695519385499,
-                  0.0063413695519385499,
-                  0.0037441955589789201,
-                  0.0037441955589789201,
-                  0.0037441955589789201,
-                  0.0037441955589789201,
-                  0.0037441955589789201,
-                  0.0037441955589789201,
-                  0.00311952097799168,
-                  0.00311952097799168,
-                  0.00311952097799168,
-                  0.00311952097799168,
-                  0.00311952097799168,
-                  0.00311952097799168,
-                  0.0094354494749298804,
-                  0.0094354494749298804,
-                  0.0094354494749298804,
-                  0.0094354494749298804,
-                  0.0094354494749298804,
-                  0.0094354494749298804,
-                  0.0089244966521207208,
-                  0.0089244966521207208,
-                  0.0089244966521207208,
-                  0.00024211507118646701,
-                  0.00024211507118646701,
-                  0.00024211507118646701,
-                  0.00024211507118646701,
-                  0.00024211507118646701,
-                  0.00024211507118646701,
-                  0.0086481386021523207,
-                  0.0086481386021523207,
-                  0.0086481386021523207,
-                  0.00207188122883237,
-                  0.00207188122883237,
-                  0.00207188122883237,
-                  0.00207188122883237,
-                  0.00207188122883237,
-                  0.00207188122883237,
-                  0.0085780956342759694,
-                  0.0085780956342759694,
-                  0.0085780956342759694,
-                  0.0085780956342759694,
-                  0.0085780956342759694,
-                  0.0085780956342759694,
-                  0.0073499549897333202,
-                  0.0073499549897333202,
-                  0.0073499549897333202,
-                  0.0015373692685212801,
-                  0.0015373692685212801,
-                  0.0015373692685212801,
-                  0.0087558734163092292,
-                  0.0087558734163092292,
-                  0.0087558734163092292,
-                  0.0087558734163092292,
-                  0.0087558734163092292,
-                  0.0087558734163092292,
-                  0.00104891448781901,
-                  0.00104891448781901,
-                  0.00104891448781901,
-                  0.00104891448781901,
-                  0.00104891448781901,
-                  0.00104891448781901,
-                  0.0092799648616150605,
-                  0.0092799648616150605,
-                  0.0092799648616150605,
-                  0.0092799648616150605,
-                  0.0092799648616150605,
-                  0.0092799648616150605,
-                  0.0040972271959283102,
-                  0.0040972271959283102,
-                  0.0040972271959283102,
-                  0.0040972271959283102,
-                  0.0040972271959283102,
-                  0.0040972271959283102,
-                  0.00110188925093586,
-                  0.00110188925093586,
-                  0.00110188925093586,
-                  0.00110188925093586,
-                  0.00110188925093586,
-                  0.00110188925093586,
-                  0.0071304711393600203,
-                  0.0071304711393600203,
-                  0.0071304711393600203,
-                  0.0071304711393600203,
-                  0.0071304711393600203,
-                  0.0071304711393600203,
-                  0.0082160976158036098,
-                  0.0082160976158036098,
-                  0.0082160976158036098,
-                  0.0082160976158036098,
-                  0.0082160976158036098,
-                  0.0082160976158036098,
-                  0.0054974051600025801,
-                  0.0054974051600025801,
-                  0.0054974051600025801,
-                  0.0079713610103758492,
-                  0.0079713610103758492,
-                  0.0079713610103758492,
-                  0.0079713610103758492,
-                  0.0079713610103758492,
-                  0.0079713610103758492,
-                  0.0022431442063885298,
-                  0.0022431442063885298,
-                  0.0022431442063885298,
-                  0.00040704739396837199,
-                  0.00040704739396837199,
-                  0.00040704739396837199,
-                  0.00040704739396837199,
-                  0.00040704739396837199,
-                  0.00040704739396837199,
-                  0.00041547339930714499,
-                  0.00041547339930714499,
-                  0.00041547339930714499,
-                  0.00041547339930714499,
-                  0.00041547339930714499,
-                  0.00041547339930714499]},
- 49: {'points': [[-0.61057213632871798, -0.50805411191391803],
-                 [0.74527383557895399, -0.27474392494664601],
-                 [-0.13470169925023701, 0.78279803686056504],
-                 [0.61057213632871798, -0.50805411191391803],
-                 [0.13470169925023701, 0.78279803686056404],
-                 [-0.74527383557895399, -0.27474392494664501],
-                 [-0.21740746844089601, -0.562346522428391],
-                 [0.59571010837326999, 0.092892870571916294],
-                 [-0.37830263993237401, 0.46945365185647497],
-                 [0.21740746844089601, -0.562346522428391],
-                 [0.37830263993237501, 0.46945365185647497],
-                 [-0.59571010837326999, 0.0928928705719166],
-                 [-0.74657702398083503, -0.57509668203848396],
-                 [0.87133684826788704, -0.359006327629945],
-                 [-0.124759824287051, 0.93410300966842996],
-                 [0.74657702398083503, -0.57509668203848396],
-                 [0.124759824287052, 0.93410300966842996],
-                 [-0.87133684826788704, -0.359006327629945],
-                 [-0.46488095131110502, -0.26839914238059598],
-                 [0.46488095131110502, -0.26839914238059598],
-                 [0.0, 0.53679828476119196],
-                 [-0.18652159062065299, -0.15190921808712499],
-                 [0.22481803724280799, -0.085577826788203998],
-                 [-0.038296446622154597, 0.23748704487533001],
-                 [0.18652159062065299, -0.15190921808712499],
-                 [0.038296446622154701, 0.23748704487533001],
-                 [-0.22481803724280799, -0.085577826788203901],
-                 [-0.088761825157466195, -0.14305301576398399],
-                 [0.16826845831831899, -0.0053434875906459602],
-                 [-0.079506633160852894, 0.148396503354631],
-                 [0.088761825157466195, -0.14305301576398399],
-                 [0.079506633160853199, 0.148396503354631],
-                 [-0.16826845831831899, -0.00534348759064585],
-                 [-0.78147803918196501, -0.45118655628748899],
-                 [0.78147803918196601, -0.45118655628748799],
-                 [0.0, 0.90237311257497799],
-                 [-0.48639838036980398, -0.574735327144133],
-                 [0.74093458394408096, -0.13386569018778999],
-                 [-0.25453620357427698, 0.70860101733192404],
-                 [0.48639838036980398, -0.574735327144133],
-                 [0.25453620357427797, 0.70860101733192404],
-                 [-0.74093458394408196, -0.13386569018778899],
-                 [-0.37022598751812202, -0.388585517480243],
-                 [0.52163792343967297, -0.12633235159175299],
-                 [-0.151411935921551, 0.51491786907199599],
-                 [0.37022598751812202, -0.388585517480243],
-                 [0.151411935921551, 0.51491786907199599],
-                 [-0.52163792343967297, -0.12633235159175299],
-                 [0.0, -0.33135871726650801],
-                 [0.28696506691822099, 0.165679358633254],
-                 [-0.28696506691822099, 0.165679358633254],
-                 [-0.55660589033254004, -0.400735270721018],
-                 [0.62534986980310603, -0.28166720556352598],
-                 [-0.068743979470565694, 0.68240247628454398],
-                 [0.55660589033254004, -0.400735270721018],
-                 [0.068743979470566, 0.68240247628454398],
-                 [-0.62534986980310603, -0.28166720556352498],
-                 [-0.23093959523488999, -0.54310366079605499],
-                 [0.58581136475515505, 0.071552274184916803],
-                 [-0.354871769520265, 0.47155138661113899],
-                 [0.23093959523488999, -0.54310366079605499],
-                 [0.354871769520265, 0.47155138661113799],
-                 [-0.58581136475515505, 0.071552274184917206],
-                 [-0.12830890012394, -0.57500475146778496],
-                 [0.56212317212982998, 0.17638360869492001],
-                 [-0.43381427200588901, 0.39862114277286598],
-                 [0.12830890012394, -0.57500475146778496],
-                 [0.43381427200589001, 0.39862114277286498],
-                 [-0.56212317212982899, 0.17638360869492101],
-                 [-0.63417236502579499, -0.42554839571165198],
-                 [0.68562190373890097, -0.33643518063457001],
-                 [-0.051449538713106202, 0.76198357634622305],
-                 [0.63417236502579499, -0.42554839571165198],
-                 [0.051449538713106903, 0.76198357634622305],
-                 [-0.68562190373890097, -0.33643518063457001],
-                 [-0.36128311243234501, -0.441530502316971],
-                 [0.56301818776837298, -0.092115102166234406],
-                 [-0.201735075336028, 0.53364560448320597],
-                 [0.36128311243234501, -0.441530502316971],
-                 [0.201735075336029, 0.53364560448320597],
-                 [-0.56301818776837298, -0.0921151021662341],
-                 [-0.244589852506789, -0.46866793891867098],
-                 [0.52817326729625702, 0.0225129436805671],
-                 [-0.28358341478946802, 0.44615499523810398],
-                 [0.244589852506789, -0.46866793891867098],
-                 [0.28358341478946802, 0.44615499523810398],
-                 [-0.52817326729625702, 0.022512943680567402],
-                 [0.0, -0.16570704844176901],
-                 [0.14350651353671101, 0.082853524220884905],
-                 [-0.14350651353671101, 0.082853524220885003],
-                 [-0.76440468282859697, -0.56504278301868704],
-                 [0.87154374573353999, -0.379472482592008],
-                 [-0.107139062904942, 0.94451526561069599],
-                 [0.76440468282859697, -0.56504278301868704],
-                 [0.107139062904943, 0.94451526561069599],
-                 [-0.87154374573353999, -0.379472482592008],
-                 [-0.43881396034292203, -0.50652589028067596],
-                 [0.65807126882905598, -0.12676109205189001],
-                 [-0.21925730848613401, 0.63328698233256597],
-                 [0.43881396034292203, -0.50652589028067596],
-                 [0.21925730848613401, 0.63328698233256597],
-                 [-0.65807126882905598, -0.12676109205188901],
-                 [-0.29031421623299503, -0.52106748079988396],
-                 [0.59641478357515698, 0.0091142540623992997],
-                 [-0.30610056734216201, 0.511953226737485],
-                 [0.29031421623299503, -0.52106748079988396],
-                 [0.30610056734216201, 0.511953226737485],
-                 [-0.59641478357515698, 0.0091142540623996293],
-                 [-0.11022106138868, -0.56223112097793704],
-                 [0.54201696425943602, 0.185661321294288],
-                 [-0.43179590287075598, 0.37656979968365001],
-                 [0.11022106138868, -0.56223112097793704],
-                 [0.43179590287075598, 0.37656979968365001],
-                 [-0.54201696425943502, 0.185661321294288],
-                 [-0.82697827385445399, -0.57462270717388497],
-                 [0.91112699893119797, -0.42887283994881897],
-                 [-0.084148725076744105, 1.0034955471227001],
-                 [0.82697827385445399, -0.57462270717388497],
-                 [0.084148725076744799, 1.0034955471227001],
-                 [-0.91112699893119797, -0.42887283994881797],
-                 [-0.39778489720864402, -0.22966121748297799],
-                 [0.39778489720864402, -0.22966121748297799],
-                 [0.0, 0.45932243496595698],
-                 [-0.22649962118473499, -0.228286249840365],
-                 [0.31095150228880503, -0.082011300973349494],
-                 [-0.084451881104070106, 0.31029755081371502],
-                 [0.22649962118473499, -0.228286249840365],
-                 [0.084451881104070203, 0.31029755081371502],
-                 [-0.31095150228880503, -0.082011300973349299],
-                 [-0.344095706780225, -0.48829139755087198],
-                 [0.59492060811857395, -0.053849924629400303],
-                 [-0.250824901338349, 0.542141322180273],
-                 [0.344095706780225, -0.48829139755087198],
-                 [0.250824901338349, 0.542141322180272],
-                 [-0.59492060811857395, -0.053849924629399699],
-                 [-0.75185639971867002, -0.54439150942275605],
-                 [0.84738507662399698, -0.37893098744289699],
-                 [-0.095528676905327098, 0.92332249686565404],
-                 [0.75185639971867002, -0.54439150942275605],
-                 [0.095528676905327597, 0.92332249686565404],
-                 [-0.84738507662399798, -0.37893098744289699],
-                 [-0.53461908075309805, -0.506703278299519],
-                 [0.70612745156478895, -0.209642066130308],
-                 [-0.17150837081168999, 0.716345344429827],
-                 [0.53461908075309805, -0.506703278299519],
-                 [0.17150837081169101, 0.716345344429827],
-                 [-0.70612745156478895, -0.209642066130307],
-                 [-0.86116533047239197, -0.497194035365009],
-                 [0.86116533047239197, -0.497194035365009],
-                 [0.0, 0.994388070730018],
-                 [-0.108570733410256, -0.062683342160526304],
-                 [0.108570733410256, -0.062683342160526206],
-                 [0.0, 0.125366684321053],
-                 [-0.67842852868361903, -0.52796151262664703],
-                 [0.79644234649694501, -0.32355558417879099],
-                 [-0.118013817813325, 0.85151709680543797],
-                 [0.67842852868361903, -0.52796151262664703],
-                 [0.118013817813326, 0.85151709680543797],
-                 [-0.79644234649694501, -0.32355558417878999],
-                 [-0.098128049170705695, -0.311119062911005],
-                 [0.31850103666789298, 0.070578148049863204],
-                 [-0.22037298749718701, 0.24054091486114301],
-                 [0.098128049170705695, -0.311119062911005],
-                 [0.22037298749718701, 0.24054091486114301],
-                 [-0.31850103666789198, 0.070578148049863398],
-                 [-0.81198101881640095, -0.53473260414787405],
-                 [0.86908252883206705, -0.435829887611837],
-                 [-0.057101510015665803, 0.97056249175971099],
-                 [0.81198101881640095, -0.53473260414787405],
-                 [0.0571015100156664, 0.97056249175971099],
-                 [-0.86908252883206705, -0.435829887611836],
-                 [-0.96747363469297798, -0.55857116342385704],
-                 [0.96747363469297798, -0.55857116342385704],
-                 [0.0, 1.1171423268477101],
-                 [-0.38816954030832801, -0.53658558406526102],
-                 [0.65878151725918999, -0.067871890849709293],
-                 [-0.27061197695086198, 0.60445747491497104],
-                 [0.38816954030832801, -0.53658558406526102],
-                 [0.27061197695086198, 0.60445747491497004],
-                 [-0.65878151725918999, -0.067871890849708905],
-                 [-0.51214253977457602, -0.33881791091529601],
-                 [0.54949618799710698, -0.27411949434581701],
-                 [-0.037353648222530497, 0.61293740526111395],
-                 [0.51214253977457602, -0.33881791091529601],
-                 [0.037353648222530997, 0.61293740526111395],
-                 [-0.54949618799710698, -0.27411949434581701],
-                 [-0.691439855010612, -0.39920298641881302],
-                 [0.691439855010613, -0.39920298641881302],
-                 [0.0, 0.79840597283762604],
-                 [-0.89378361429922204, -0.55834047448625301],
-                 [0.93042884201576304, -0.49486907822627202],
-                 [-0.036645227716540801, 1.05320955271253],
-                 [0.89378361429922204, -0.55834047448625301],
-                 [0.036645227716541398, 1.05320955271253],
-                 [-0.93042884201576403, -0.49486907822627202],
-                 [-0.20438937977062099, -0.29941559804457601],
-                 [0.36149620408122402, -0.027298596122815402],
-                 [-0.15710682431060199, 0.326714194167392],
-                 [0.20438937977062099, -0.29941559804457601],
-                 [0.15710682431060199, 0.326714194167391],
-                 [-0.36149620408122402, -0.027298596122815301],
-                 [-0.29077462427214501, -0.34707538263885201],
-                 [0.44596341052952299, -0.078280520076127],
-                 [-0.155188786257378, 0.42535590271498003],
-                 [0.29077462427214501, -0.34707538263885201],
-                 [0.155188786257378, 0.42535590271497897],
-                 [-0.44596341052952299, -0.078280520076126694],
-                 [-0.45530327016209599, -0.56218624883920698],
-                 [0.71451920823408099, -0.113211073966901],
-                 [-0.25921593807198501, 0.67539732280610898],
-                 [0.45530327016209599, -0.56218624883920698],
-                 [0.25921593807198501, 0.67539732280610898],
-                 [-0.71451920823408099, -0.113211073966901],
-                 [0.0, -0.52252588465952299],
-                 [0.45252069025008501, 0.26126294232976199],
-                 [-0.45252069025008401, 0.26126294232976199],
-                 [-0.50049811961058999, -0.54142101949433696],
-                 [0.71913341683026, -0.16273357638194499],
-                 [-0.21863529721967001, 0.70415459587628204],
-                 [0.50049811961058999, -0.54142101949433696],
-                 [0.21863529721967101, 0.70415459587628204],
-                 [-0.71913341683026, -0.162733576381944],
-                 [-0.59653316717651905, -0.54312444348452904],
-                 [0.76862614906214699, -0.24505065523259001],
-                 [-0.17209298188562799, 0.78817509871711999],
-                 [0.59653316717651905, -0.54312444348452904],
-                 [0.17209298188562799, 0.78817509871711999],
-                 [-0.76862614906214699, -0.24505065523259001],
-                 [-0.18241222915476299, -0.50297724458337201],
-                 [0.52679718591208102, 0.093514997882713197],
-                 [-0.34438495675731801, 0.40946224670066],
-                 [0.18241222915476299, -0.50297724458337201],
-                 [0.34438495675731801, 0.40946224670066],
-                 [-0.52679718591208102, 0.093514997882713599],
-                 [-0.17504275018488799, -0.37315461111231102],
-                 [0.41068274785500802, 0.034985837147749499],
-                 [-0.23563999767012, 0.33816877396456202],
-                 [0.17504275018488799, -0.37315461111231102],
-                 [0.23563999767012, 0.33816877396456202],
-                 [-0.41068274785500802, 0.034985837147749797],
-                 [-0.87027029250770405, -0.53339994853211603],
-                 [0.89707305205997601, -0.486976207204528],
-                 [-0.026802759552272001, 1.02037615573664],
-                 [0.87027029250770405, -0.53339994853211603],
-                 [0.026802759552272602, 1.02037615573664],
-                 [-0.89707305205997701, -0.486976207204528],
-                 [-0.25906638561252598, -0.41535262741814999],
-                 [0.48923911967899403, -0.016681757497987799],
-                 [-0.23017273406646799, 0.43203438491613799],
-                 [0.25906638561252598, -0.41535262741814999],
-                 [0.23017273406646799, 0.43203438491613799],
-                 [-0.48923911967899403, -0.0166817574979874],
-                 [-0.25389417516223001, -0.57390850498838597],
-                 [0.62396643234900495, 0.067075446930805999],
-                 [-0.370072257186775, 0.50683305805758005],
-                 [0.25389417516223001, -0.57390850498838597],
-                 [0.370072257186776, 0.50683305805758005],
-                 [-0.62396643234900495, 0.067075446930806498],
-                 [-0.063924734492284196, -0.38909332692463899],
-                 [0.36892707280588299, 0.13918621946182599],
-                 [-0.30500233831359902, 0.249907107462813],
-                 [0.063924734492284196, -0.38909332692463899],
-                 [0.30500233831359902, 0.249907107462813],
-                 [-0.36892707280588299, 0.13918621946182599],
-                 [-0.32336677856616203, -0.27441054007776799],
-                 [0.399329888056636, -0.14283857493935001],
-                 [-0.075963109490473399, 0.41724911501711798],
-                 [0.32336677856616203, -0.27441054007776799],
-                 [0.075963109490473801, 0.41724911501711798],
-                 [-0.399329888056636, -0.14283857493934901],
-                 [-0.459338679550784, -0.46136190485467499],
-                 [0.62922046971791901, -0.16711801300444201],
-                 [-0.16988179016713501, 0.62847991785911606],
-                 [0.459338679550784, -0.46136190485467499],
-                 [0.16988179016713501, 0.62847991785911606],
-                 [-0.62922046971792001, -0.16711801300444101],
-                 [-0.73910550014397103, -0.50637232744855598],
-                 [0.80808404941588696, -0.386897975477204],
-                 [-0.068978549271915698, 0.89327030292576104],
-                 [0.73910550014397103, -0.50637232744855598],
-                 [0.068978549271916406, 0.89327030292576104],
-                 [-0.80808404941588796, -0.386897975477204],
-                 [-0.116069779133791, -0.53497319519919195],
-                 [0.52133526695312704, 0.166967220258084],
-                 [-0.40526548781933602, 0.36800597494110798],
-                 [0.116069779133791, -0.53497319519919195],
-                 [0.40526548781933602, 0.36800597494110798],
-                 [-0.52133526695312704, 0.166967220258084],
-                 [-0.65577583679224705, -0.479163619999046],
-                 [0.74285578588461099, -0.32833672385056001],
-                 [-0.087079949092363704, 0.80750034384960701],
-                 [0.65577583679224705, -0.479163619999046],
-                 [0.087079949092364398, 0.80750034384960701],
-                 [-0.74285578588461099, -0.32833672385056001],
-                 [-0.83552616064107199, -0.56063167758821397],
-                 [0.90328435527821604, -0.44327104184753902],
-                 [-0.067758194637143901, 1.0039027194357499],
-                 [0.83552616064107199, -0.56063167758821397],
-                 [0.067758194637144595, 1.0039027194357499],
-                 [-0.90328435527821704, -0.44327104184753902],
-                 [-0.67748842104198503, -0.55812525411705904],
-                 [0.82209485908001101, -0.30765955633363701],
-                 [-0.144606438038025, 0.865784810450697],
-                 [0.67748842104198503, -0.55812525411705904],
-                 [0.144606438038026, 0.865784810450697],
-                 [-0.82209485908001101, -0.30765955633363701],
-                 [-0.37231932331276102, -0.57393107655513198],
-                 [0.68319855397447604, -0.035472454031117102],
-                 [-0.31087923066171502, 0.60940353058624896],
-                 [0.37231932331276102, -0.57393107655513198],
-                 [0.31087923066171502, 0.60940353058624896],
-                 [-0.68319855397447604, -0.035472454031116499],
-                 [-0.93676060044306697, -0.55819574918551196],
-                 [0.95179199930067304, -0.53216060265530496],
-                 [-0.0150313988576061, 1.0903563518408199],
-                 [0.93676060044306697, -0.55819574918551196],
-                 [0.015031398857607001, 1.0903563518408199],
-                 [-0.95179199930067404, -0.53216060265530396],
-                 [-0.66619173394165099, -0.57308501713419202],
-                 [0.82940205033727599, -0.29039645681757698],
-                 [-0.163210316395625, 0.86348147395177],
-                 [0.66619173394165099, -0.57308501713419202],
-                 [0.163210316395626, 0.86348147395177],
-                 [-0.82940205033727599, -0.29039645681757698],
-                 [0.0, -0.55400636586589203],
-                 [0.47978358669815802, 0.27700318293294601],
-                 [-0.47978358669815802, 0.27700318293294601],
-                 [-0.80515347766473999, -0.49699174948587999],
-                 [0.83298421935841405, -0.44878749086011099],
-                 [-0.027830741693673701, 0.94577924034599203],
-                 [0.80515347766473999, -0.49699174948587999],
-                 [0.027830741693674301, 0.94577924034599203],
-                 [-0.83298421935841405, -0.44878749086011099],
-                 [-0.94025356560109796, -0.57375002851113499],
-                 [0.96700888291323694, -0.52740845955388105],
-                 [-0.026755317312139499, 1.10115848806502],
-                 [0.94025356560109796, -0.57375002851113499],
-                 [0.0267553173121402, 1.10115848806502],
-                 [-0.96700888291323805, -0.52740845955388105],
-                 [-0.55800138185704795, -0.45895888627009701],
-                 [0.67647074573104105, -0.25376392889997601],
-                 [-0.118469363873993, 0.71272281517007297],
-                 [0.55800138185704795, -0.45895888627009701],
-                 [0.118469363873993, 0.71272281517007297],
-                 [-0.67647074573104105, -0.25376392889997601],
-                 [-0.33515583932564502, -0.55885836769979702],
-                 [0.65156346320835201, -0.010824287232805201],
-                 [-0.31640762388270699, 0.56968265493260295],
-                 [0.33515583932564502, -0.55885836769979702],
-                 [0.31640762388270699, 0.56968265493260295],
-                 [-0.65156346320835201, -0.010824287232804699],
-                 [-0.72304850966873302, -0.457545555907514],
-                 [0.75777032963894697, -0.39740559958784399],
-                 [-0.034721819970213202, 0.85495115549535805],
-                 [0.72304850966873302, -0.457545555907514],
-                 [0.034721819970213702, 0.85495115549535805],
-                 [-0.75777032963894697, -0.39740559958784399],
-                 [-0.46826261407944703, -0.40298677651135401],
-                 [0.58312809288775802, -0.204033931179633],
-                 [-0.11486547880831099, 0.60702070769098704],
-                 [0.46826261407944703, -0.40298677651135401],
-                 [0.11486547880831099, 0.60702070769098704],
-                 [-0.58312809288775802, -0.204033931179633],
-                 [0.0, -0.25079797310499002],
-                 [0.21719741592656699, 0.12539898655249501],
-                 [-0.21719741592656699, 0.12539898655249501],
-                 [-0.112478836416776, -0.22883057799614001],
-                 [0.25441251191572201, 0.017005759273028099],
-                 [-0.141933675498946, 0.21182481872311301],
-                 [0.112478836416776, -0.22883057799614001],
-                 [0.141933675498946, 0.21182481872311201],
-                 [-0.25441251191572201, 0.0170057592730283],
-                 [-0.41172923406071199, -0.32888195428957501],
-                 [0.49068474429140102, -0.192126999032498],
-                 [-0.078955510230688405, 0.52100895332207398],
-                 [0.41172923406071199, -0.32888195428957501],
-                 [0.078955510230688697, 0.52100895332207398],
-                 [-0.49068474429140102, -0.192126999032498],
-                 [-0.890912885633517, -0.57366938316409899],
-                 [0.94226870201021695, -0.484718499935477],
-                 [-0.051355816376699399, 1.0583878830995801],
-                 [0.890912885633517, -0.57366938316409899],
-                 [0.051355816376700301, 1.0583878830995801],
-                 [-0.94226870201021695, -0.484718499935476],
-                 [-0.60873506522460497, -0.35145335377259102],
-                 [0.60873506522460497, -0.35145335377259002],
-                 [-1.11022302462516e-16, 0.70290670754518103],
-                 [-0.070999559860544098, -0.48828388229492597],
-                 [0.45836602625616901, 0.182654518650718],
-                 [-0.387366466395625, 0.30562936364420901],
-                 [0.070999559860544001, -0.48828388229492597],
-                 [0.387366466395625, 0.30562936364420801],
-                 [-0.45836602625616901, 0.18265451865071899],
-                 [0.0, -0.44375651708543401],
-                 [0.38430441689088901, 0.22187825854271701],
-                 [-0.38430441689088901, 0.22187825854271701],
-                 [-0.91727811927066605, -0.529590769082673],
-                 [0.91727811927066605, -0.529590769082672],
-                 [0.0, 1.05918153816535],
-                 [-0.30447266387357802, -0.17578737444829301],
-                 [0.30447266387357802, -0.17578737444829201],
-                 [0.0, 0.35157474889658602],
-                 [0.0, -0.063699436116132005],
-                 [0.0551653298833144, 0.031849718058066197],
-                 [-0.0551653298833144, 0.031849718058066398],
-                 [-0.99336273607005399, -0.57351824307298904],
-                 [0.99336273607005399, -0.57351824307298904],
-                 [0.0, 1.1470364861459801],
-                 [-0.13798316432331001, -0.44198593821724402],
-                 [0.45176263277328799, 0.10149604351007301],
-                 [-0.31377946844997801, 0.340489894707172],
-                 [0.13798316432331001, -0.44198593821724402],
-                 [0.31377946844997801, 0.340489894707172],
-                 [-0.45176263277328799, 0.10149604351007301],
-                 [-0.57133871576000905, -0.56609726595635301],
-                 [0.775923971211122, -0.21174520903556801],
-                 [-0.204585255451113, 0.77784247499192105],
-                 [0.57133871576000905, -0.56609726595635301],
-                 [0.204585255451113, 0.77784247499192105],
-                 [-0.775923971211122, -0.21174520903556701],
-                 [-0.97448997895894396, -0.57372975226826595],
-                 [0.98410952985074296, -0.55706820137767599],
-                 [-0.0096195508917984503, 1.13079795364594],
-                 [0.97448997895894396, -0.57372975226826595],
-                 [0.0096195508917991095, 1.13079795364594],
-                 [-0.98410952985074296, -0.55706820137767499],
-                 [0.0, -0.57315719828247602],
-                 [0.49636869407453799, 0.28657859914123801],
-                 [-0.49636869407453799, 0.28657859914123801],
-                 [-0.587093428961873, -0.57710801847006898],
-                 [0.79333691920371496, -0.21988381464086201],
-                 [-0.20624349024184199, 0.79699183311093102],
-                 [0.587093428961873, -0.57710801847006898],
-                 [0.20624349024184199, 0.79699183311093102],
-                 [-0.79333691920371496, -0.21988381464086201]],
-      'weights': [0.0026291654542422399,
-                  0.0026291654542422399,
-                  0.0026291654542422399,
-                  0.0026291654542422399,
-                  0.0026291654542422399,
-                  0.0026291654542422399,
-                  0.00166975986733349,
-                  0.00166975986733349,
-                  0.00166975986733349,
-                  0.00166975986733349,
-                  0.00166975986733349,
-                  0.00166975986733349,
-                  0.00048731312956189698,
-                  0.00048731312956189698,
-                  0.00048731312956189698,
-                  0.00048731312956189698,
-                  0.00048731312956189698,
-                  0.00048731312956189698,
-                  0.0055943122343841203,
-                  0.0055943122343841203,
-                  0.0055943122343841203,
-                  0.0081167734520029705,
-                  0.0081167734520029705,
-                  0.0081167734520029705,
-                  0.0081167734520029705,
-                  0.0081167734520029705,
-                  0.0081167734520029705,
-                  0.0078252306086642794,
-                  0.0078252306086642794,
-                  0.0078252306086642794,
-                  0.0078252306086642794,
-                  0.0078252306086642794,
-                  0.0078252306086642794,
-                  0.00273506720319852,
-                  0.00273506720319852,
-                  0.00273506720319852,
-                  0.00073856981464256902,
-                  0.00073856981464256902,
-                  0.00073856981464256902,
-                  0.00073856981464256902,
-                  0.00073856981464256902,
-                  0.00073856981464256902,
-                  0.0056236860072179599,
-                  0.0056236860072179599,
-                  0.0056236860072179599,
-                  0.0056236860072179599,
-                  0.0056236860072179599,
-                  0.0056236860072179599,
-                  0.0068085280090675196,
-                  0.0068085280090675196,
-                  0.0068085280090675196,
-                  0.0046961957730566597,
-                  0.0046961957730566597,
-                  0.0046961957730566597,
-                  0.0046961957730566597,
-                  0.0046961957730566597,
-                  0.0046961957730566597,
-                  0.0028280202055404199,
-                  0.0028280202055404199,
-                  0.0028280202055404199,
-                  0.0028280202055404199,
-                  0.0028280202055404199,
-                  0.0028280202055404199,
-                  0.00082970460350076099,
-                  0.00082970460350076099,
-                  0.00082970460350076099,
-                  0.00082970460350076099,
-                  0.00082970460350076099,
-                  0.00082970460350076099,
-                  0.0045038029220781303,
-                  0.0045038029220781303,
-                  0.0045038029220781303,
-                  0.0045038029220781303,
-                  0.0045038029220781303,
-                  0.0045038029220781303,
-                  0.0053239910432884598,
-                  0.0053239910432884598,
-                  0.0053239910432884598,
-                  0.0053239910432884598,
-                  0.0053239910432884598,
-                  0.0053239910432884598,
-                  0.0051750557844565098,
-                  0.0051750557844565098,
-                  0.0051750557844565098,
-                  0.0051750557844565098,
-                  0.0051750557844565098,
-                  0.0051750557844565098,
-                  0.0086530820051030806,
-                  0.0086530820051030806,
-                  0.0086530820051030806,
-                  0.00119960340652597,
-                  0.00119960340652597,
-                  0.00119960340652597,
-                  0.00119960340652597,
-                  0.00119960340652597,
-                  0.00119960340652597,
-                  0.0039216912448566598,
-                  0.0039216912448566598,
-                  0.0039216912448566598,
-                  0.0039216912448566598,
-                  0.0039216912448566598,
-                  0.0039216912448566598,
-                  0.00375571304455253,
-                  0.00375571304455253,
-                  0.00375571304455253,
-                  0.00375571304455253,
-                  0.00375571304455253,
-                  0.00375571304455253,
-                  0.00218296335817881,
-                  0.00218296335817881,
-                  0.00218296335817881,
-                  0.00218296335817881,
-                  0.00218296335817881,
-                  0.00218296335817881,
-                  0.00052295464565354295,
-                  0.00052295464565354295,
-                  0.00052295464565354295,
-                  0.00052295464565354295,
-                  0.00052295464565354295,
-                  0.00052295464565354295,
-                  0.0070631627289332302,
-                  0.0070631627289332302,
-                  0.0070631627289332302,
-                  0.0079009628485305003,
-                  0.0079009628485305003,
-                  0.0079009628485305003,
-                  0.0079009628485305003,
-                  0.0079009628485305003,
-                  0.0079009628485305003,
-                  0.0045780575587381503,
-                  0.0045780575587381503,
-                  0.0045780575587381503,
-                  0.0045780575587381503,
-                  0.0045780575587381503,
-                  0.0045780575587381503,
-                  0.0019597460842472199,
-                  0.0019597460842472199,
-                  0.0019597460842472199,
-                  0.0019597460842472199,
-                  0.0019597460842472199,
-                  0.0019597460842472199,
-                  0.0036526755089971901,
-                  0.0036526755089971901,
-                  0.0036526755089971901,
-                  0.0036526755089971901,
-                  0.0036526755089971901,
-                  0.0036526755089971901,
-                  0.0020295938372371799,
-                  0.0020295938372371799,
-                  0.0020295938372371799,
-                  0.0088058394172537205,
-                  0.0088058394172537205,
-                  0.0088058394172537205,
-                  0.0027034172917457999,
-                  0.0027034172917457999,
-                  0.0027034172917457999,
-                  0.0027034172917457999,
-                  0.0027034172917457999,
-                  0.0027034172917457999,
-                  0.0080208694089816002,
-                  0.0080208694089816002,
-                  0.0080208694089816002,
-                  0.0080208694089816002,
-                  0.0080208694089816002,
-                  0.0080208694089816002,
-                  0.0020175582946525199,
-                  0.0020175582946525199,
-                  0.0020175582946525199,
-                  0.0020175582946525199,
-                  0.0020175582946525199,
-                  0.0020175582946525199,
-                  0.00050401542238768604,
-                  0.00050401542238768604,
-                  0.00050401542238768604,
-                  0.00330448895397707,
-                  0.00330448895397707,
-                  0.00330448895397707,
-                  0.00330448895397707,
-                  0.00330448895397707,
-                  0.00330448895397707,
-                  0.0062712985968077003,
-                  0.0062712985968077003,
-                  0.0062712985968077003,
-                  0.0062712985968077003,
-                  0.0062712985968077003,
-                  0.0062712985968077003,
-                  0.0042746713224942499,
-                  0.0042746713224942499,
-                  0.0042746713224942499,
-                  0.0010473813712083399,
-                  0.0010473813712083399,
-                  0.0010473813712083399,
-                  0.0010473813712083399,
-                  0.0010473813712083399,
-                  0.0010473813712083399,
-                  0.0077450003359293904,
-                  0.0077450003359293904,
-                  0.0077450003359293904,
-                  0.0077450003359293904,
-                  0.0077450003359293904,
-                  0.0077450003359293904,
-                  0.0074855538943641,
-                  0.0074855538943641,
-                  0.0074855538943641,
-                  0.0074855538943641,
-                  0.0074855538943641,
-                  0.0074855538943641,
-                  0.0020497885445934999,
-                  0.0020497885445934999,
-                  0.0020497885445934999,
-                  0.0020497885445934999,
-                  0.0020497885445934999,
-                  0.0020497885445934999,
-                  0.0042392894270415196,
-                  0.0042392894270415196,
-                  0.0042392894270415196,
-                  0.0029615403516812799,
-                  0.0029615403516812799,
-                  0.0029615403516812799,
-                  0.0029615403516812799,
-                  0.0029615403516812799,
-                  0.0029615403516812799,
-                  0.0026432251944282798,
-                  0.0026432251944282798,
-                  0.0026432251944282798,
-                  0.0026432251944282798,
-                  0.0026432251944282798,
-                  0.0026432251944282798,
-                  0.0047681662525724498,
-                  0.0047681662525724498,
-                  0.0047681662525724498,
-                  0.0047681662525724498,
-                  0.0047681662525724498,
-                  0.0047681662525724498,
-                  0.0075573312590907996,
-                  0.0075573312590907996,
-                  0.0075573312590907996,
-                  0.0075573312590907996,
-                  0.0075573312590907996,
-                  0.0075573312590907996,
-                  0.00167365533160457,
-                  0.00167365533160457,
-                  0.00167365533160457,
-                  0.00167365533160457,
-                  0.00167365533160457,
-                  0.00167365533160457,
-                  0.0065498413525925401,
-                  0.0065498413525925401,
-                  0.0065498413525925401,
-                  0.0065498413525925401,
-                  0.0065498413525925401,
-                  0.0065498413525925401,
-                  0.00104541271556711,
-                  0.00104541271556711,
-                  0.00104541271556711,
-                  0.00104541271556711,
-                  0.00104541271556711,
-                  0.00104541271556711,
-                  0.0073701601747091098,
-                  0.0073701601747091098,
-                  0.0073701601747091098,
-                  0.0073701601747091098,
-                  0.0073701601747091098,
-                  0.0073701601747091098,
-                  0.0083988067230233408,
-                  0.0083988067230233408,
-                  0.0083988067230233408,
-                  0.0083988067230233408,
-                  0.0083988067230233408,
-                  0.0083988067230233408,
-                  0.0052403055420442999,
-                  0.0052403055420442999,
-                  0.0052403055420442999,
-                  0.0052403055420442999,
-                  0.0052403055420442999,
-                  0.0052403055420442999,
-                  0.0031701135491253498,
-                  0.0031701135491253498,
-                  0.0031701135491253498,
-                  0.0031701135491253498,
-                  0.0031701135491253498,
-                  0.0031701135491253498,
-                  0.0040032736946960003,
-                  0.0040032736946960003,
-                  0.0040032736946960003,
-                  0.0040032736946960003,
-                  0.0040032736946960003,
-                  0.0040032736946960003,
-                  0.00397959133459497,
-                  0.00397959133459497,
-                  0.00397959133459497,
-                  0.00397959133459497,
-                  0.00397959133459497,
-                  0.00397959133459497,
-                  0.00134016149770113,
-                  0.00134016149770113,
-                  0.00134016149770113,
-                  0.00134016149770113,
-                  0.00134016149770113,
-                  0.00134016149770113,
-                  0.0019210362406516699,
-                  0.0019210362406516699,
-                  0.0019210362406516699,
-                  0.0019210362406516699,
-                  0.0019210362406516699,
-                  0.0019210362406516699,
-                  0.00102490297252187,
-                  0.00102490297252187,
-                  0.00102490297252187,
-                  0.00102490297252187,
-                  0.00102490297252187,
-                  0.00102490297252187,
-                  0.00080770565673134501,
-                  0.00080770565673134501,
-                  0.00080770565673134501,
-                  0.00080770565673134501,
-                  0.00080770565673134501,
-                  0.00080770565673134501,
-                  0.000876512130018534,
-                  0.000876512130018534,
-                  0.000876512130018534,
-                  0.000876512130018534,
-                  0.000876512130018534,
-                  0.000876512130018534,
-                  0.0029158576112708499,
-                  0.0029158576112708499,
-                  0.0029158576112708499,
-                  0.0026781060408277201,
-                  0.0026781060408277201,
-                  0.0026781060408277201,
-                  0.0026781060408277201,
-                  0.0026781060408277201,
-                  0.0026781060408277201,
-                  0.00038766202160295899,
-                  0.00038766202160295899,
-                  0.00038766202160295899,
-                  0.00038766202160295899,
-                  0.00038766202160295899,
-                  0.00038766202160295899,
-                  0.0051202629350867099,
-                  0.0051202629350867099,
-                  0.0051202629350867099,
-                  0.0051202629350867099,
-                  0.0051202629350867099,
-                  0.0051202629350867099,
-                  0.0024751730889049999,
-                  0.0024751730889049999,
-                  0.0024751730889049999,
-                  0.0024751730889049999,
-                  0.0024751730889049999,
-                  0.0024751730889049999,
-                  0.0037167547378639801,
-                  0.0037167547378639801,
-                  0.0037167547378639801,
-                  0.0037167547378639801,
-                  0.0037167547378639801,
-                  0.0037167547378639801,
-                  0.0062089993038170902,
-                  0.0062089993038170902,
-                  0.0062089993038170902,
-                  0.0062089993038170902,
-                  0.0062089993038170902,
-                  0.0062089993038170902,
-                  0.0092931844443993501,
-                  0.0092931844443993501,
-                  0.0092931844443993501,
-                  0.0094444154081381893,
-                  0.0094444154081381893,
-                  0.0094444154081381893,
-                  0.0094444154081381893,
-                  0.0094444154081381893,
-                  0.0094444154081381893,
-                  0.0075892677452239002,
-                  0.0075892677452239002,
-                  0.0075892677452239002,
-                  0.0075892677452239002,
-                  0.0075892677452239002,
-                  0.0075892677452239002,
-                  0.00053204190308183102,
-                  0.00053204190308183102,
-                  0.00053204190308183102,
-                  0.00053204190308183102,
-                  0.00053204190308183102,
-                  0.00053204190308183102,
-                  0.0060609100203127498,
-                  0.0060609100203127498,
-                  0.0060609100203127498,
-                  0.0056086871164086503,
-                  0.0056086871164086503,
-                  0.0056086871164086503,
-                  0.0056086871164086503,
-                  0.0056086871164086503,
-                  0.0056086871164086503,
-                  0.0068589554778714801,
-                  0.0068589554778714801,
-                  0.0068589554778714801,
-                  0.0014409812089835,
-                  0.0014409812089835,
-                  0.0014409812089835,
-                  0.0092914290633733694,
-                  0.0092914290633733694,
-                  0.0092914290633733694,
-                  0.0106118831747557,
-                  0.0106118831747557,
-                  0.0106118831747557,
-                  0.000111910279351112,
-                  0.000111910279351112,
-                  0.000111910279351112,
-                  0.0071107316961848896,
-                  0.0071107316961848896,
-                  0.0071107316961848896,
-                  0.0071107316961848896,
-                  0.0071107316961848896,
-                  0.0071107316961848896,
-                  0.0018504516051264101,
-                  0.0018504516051264101,
-                  0.0018504516051264101,
-                  0.0018504516051264101,
-                  0.0018504516051264101,
-                  0.0018504516051264101,
-                  0.000246505283204847,
-                  0.000246505283204847,
-                  0.000246505283204847,
-                  0.000246505283204847,
-                  0.000246505283204847,
-                  0.000246505283204847,
-                  0.0013658176111359501,
-                  0.0013658176111359501,
-                  0.0013658176111359501,
-                  0.000278095428582015,
-                  0.000278095428582015,
-                  0.000278095428582015,
-                  0.000278095428582015,
-                  0.000278095428582015,
-                  0.000278095428582015]},
- 50: {'points': [[-0.23093240984562699, -0.13332888898898199],
-                 [0.23093240984562699, -0.13332888898898199],
-                 [0.0, 0.26665777797796397],
-                 [-0.112431370177245, -0.57575252834615998],
-                 [0.55483200092951701, 0.19050784141729299],
-                 [-0.44240063075227098, 0.38524468692886699],
-                 [0.112431370177245, -0.57575252834615998],
-                 [0.44240063075227198, 0.38524468692886699],
-                 [-0.55483200092951701, 0.19050784141729399],
-                 [-0.92568822098610604, -0.53848652830351296],
-                 [0.929187123599583, -0.53242625120623499],
-                 [-0.00349890261347685, 1.0709127795097499],
-                 [0.92568822098610604, -0.53848652830351296],
-                 [0.0034989026134777399, 1.0709127795097499],
-                 [-0.929187123599584, -0.53242625120623399],
-                 [-0.296921061179728, -0.19146540832960701],
-                 [0.31427443814926498, -0.16140847773547401],
-                 [-0.0173533769695365, 0.35287388606508202],
-                 [0.296921061179728, -0.19146540832960701],
-                 [0.017353376969536899, 0.35287388606508202],
-                 [-0.31427443814926498, -0.16140847773547401],
-                 [-0.70777454997646805, -0.53730488391129505],
-                 [0.81920695403286503, -0.34429829847607302],
-                 [-0.111432404056396, 0.88160318238736901],
-                 [0.70777454997646805, -0.53730488391129505],
-                 [0.111432404056397, 0.88160318238736901],
-                 [-0.81920695403286503, -0.34429829847607202],
-                 [-0.90907207527032796, -0.57586628305377197],
-                 [0.95325086794265101, -0.49934636952825801],
-                 [-0.044178792672322102, 1.07521265258203],
-                 [0.90907207527032796, -0.57586628305377197],
-                 [0.044178792672322699, 1.07521265258203],
-                 [-0.95325086794265101, -0.49934636952825701],
-                 [-0.177762229203584, -0.56902146444580604],
-                 [0.581668158110484, 0.13056412589924701],
-                 [-0.40390592890690002, 0.43845733854655899],
-                 [0.177762229203584, -0.56902146444580604],
-                 [0.40390592890690002, 0.43845733854655899],
-                 [-0.581668158110484, 0.13056412589924801],
-                 [-0.63358007216059498, -0.53665917816023501],
-                 [0.78155051754113902, -0.28036684874253598],
-                 [-0.14797044538054399, 0.81702602690277104],
-                 [0.63358007216059498, -0.53665917816023501],
-                 [0.14797044538054499, 0.81702602690277104],
-                 [-0.78155051754114002, -0.28036684874253498],
-                 [-0.99510826557356102, -0.57452602500171801],
-                 [0.99510826557356102, -0.57452602500171701],
-                 [0.0, 1.14905205000343],
-                 [-0.48639150346056997, -0.415582531104986],
-                 [0.60310078103623999, -0.213436132629267],
-                 [-0.116709277575669, 0.62901866373425397],
-                 [0.48639150346056997, -0.415582531104986],
-                 [0.11670927757567, 0.62901866373425397],
-                 [-0.60310078103623999, -0.213436132629267],
-                 [-0.679609723111682, -0.50495637092434198],
-                 [0.77710990657911905, -0.33608109941145398],
-                 [-0.097500183467436594, 0.84103747033579601],
-                 [0.679609723111682, -0.50495637092434198],
-                 [0.097500183467437204, 0.84103747033579601],
-                 [-0.77710990657911905, -0.33608109941145298],
-                 [-0.80987858028161996, -0.491860897266166],
-                 [0.83090332230151798, -0.45544497587167498],
-                 [-0.021024742019897499, 0.94730587313784198],
-                 [0.80987858028161996, -0.491860897266166],
-                 [0.0210247420198981, 0.94730587313784198],
-                 [-0.83090332230151798, -0.45544497587167398],
-                 [0.0, -0.54384156132974704],
-                 [0.470980607745354, 0.27192078066487402],
-                 [-0.470980607745354, 0.27192078066487402],
-                 [-0.10197291667485101, -0.31266847173129497],
-                 [0.321765297819184, 0.068023099527233205],
-                 [-0.219792381144333, 0.24464537220406299],
-                 [0.10197291667485101, -0.31266847173129497],
-                 [0.219792381144333, 0.24464537220406199],
-                 [-0.321765297819184, 0.068023099527233399],
-                 [-0.63905313551409004, -0.46456703619309803],
-                 [0.72185342286111298, -0.32115273162675301],
-                 [-0.0828002873470223, 0.78571976781985098],
-                 [0.63905313551409004, -0.46456703619309803],
-                 [0.0828002873470228, 0.78571976781985098],
-                 [-0.72185342286111298, -0.32115273162675201],
-                 [-0.54848856966069204, -0.53671264515430195],
-                 [0.73905107006631499, -0.206648712434399],
-                 [-0.190562500405623, 0.74336135758870103],
-                 [0.54848856966069204, -0.53671264515430195],
-                 [0.190562500405623, 0.74336135758870103],
-                 [-0.73905107006631499, -0.206648712434398],
-                 [-0.28743291564930101, -0.48722771965406603],
-                 [0.56566804047303398, -0.0053103470090915001],
-                 [-0.27823512482373303, 0.49253806666315803],
-                 [0.28743291564930101, -0.48722771965406603],
-                 [0.27823512482373303, 0.49253806666315703],
-                 [-0.56566804047303398, -0.0053103470090911696],
-                 [-0.25853575380566002, -0.57476168616596102],
-                 [0.62702609824453104, 0.063482312500720103],
-                 [-0.36849034443887102, 0.51127937366524201],
-                 [0.25853575380566002, -0.57476168616596102],
-                 [0.36849034443887202, 0.51127937366524201],
-                 [-0.62702609824453104, 0.063482312500720506],
-                 [-0.85293311497853497, -0.55648988758506301],
-                 [0.90840093708707903, -0.46041680150787401],
-                 [-0.055467822108543202, 1.0169066890929399],
-                 [0.85293311497853497, -0.55648988758506301],
-                 [0.055467822108543799, 1.0169066890929399],
-                 [-0.90840093708707903, -0.46041680150787301],
-                 [-0.069117532096345302, -0.47916934061220501],
-                 [0.44953158773298102, 0.17972713166378099],
-                 [-0.380414055636635, 0.29944220894842399],
-                 [0.069117532096345302, -0.47916934061220501],
-                 [0.38041405563663599, 0.29944220894842399],
-                 [-0.44953158773298102, 0.17972713166378201],
-                 [0.0, -0.30918435458414101],
-                 [0.267761505522562, 0.154592177292071],
-                 [-0.267761505522562, 0.154592177292071],
-                 [-0.056115415639613801, -0.37840666740342699],
-                 [0.35576749475258401, 0.140605958213886],
-                 [-0.29965207911296998, 0.23780070918954199],
-                 [0.056115415639613801, -0.37840666740342699],
-                 [0.29965207911296998, 0.23780070918954199],
-                 [-0.35576749475258301, 0.140605958213886],
-                 [-0.24397413927543601, -0.52319798442392795],
-                 [0.57508981535765502, 0.050311189732993603],
-                 [-0.33111567608221798, 0.47288679469093498],
-                 [0.24397413927543601, -0.52319798442392795],
-                 [0.33111567608221898, 0.47288679469093498],
-                 [-0.57508981535765502, 0.050311189732993998],
-                 [-0.27325078883205101, -0.40025389355433599],
-                 [0.483255434197713, -0.036515177955525502],
-                 [-0.21000464536566199, 0.43676907150986199],
-                 [0.27325078883205101, -0.40025389355433599],
-                 [0.21000464536566199, 0.43676907150986199],
-                 [-0.483255434197713, -0.036515177955525301],
-                 [0.0, -0.51006243855179101],
-                 [0.44172702930209001, 0.255031219275896],
-                 [-0.44172702930209001, 0.255031219275896],
-                 [-0.166272054719551, -0.493606821834978],
-                 [0.510612074550166, 0.102807587590922],
-                 [-0.34434001983061502, 0.39079923424405699],
-                 [0.166272054719551, -0.493606821834978],
-                 [0.34434001983061502, 0.39079923424405699],
-                 [-0.510612074550166, 0.102807587590922],
-                 [-0.93789271474578095, -0.56006513490944299],
-                 [0.953976991978426, -0.53220634953947699],
-                 [-0.016084277232645099, 1.0922714844489201],
-                 [0.93789271474578095, -0.56006513490944299],
-                 [0.016084277232645699, 1.0922714844489201],
-                 [-0.953976991978427, -0.53220634953947699],
-                 [-0.119305067540161, -0.43200879236359202],
-                 [0.43378312261518798, 0.11268317689179901],
-                 [-0.31447805507502702, 0.319325615471794],
-                 [0.119305067540161, -0.43200879236359202],
-                 [0.31447805507502702, 0.319325615471794],
-                 [-0.43378312261518798, 0.11268317689179901],
-                 [-0.90151108565688598, -0.56569680324298699],
-                 [0.94066334527651696, -0.49788310035065902],
-                 [-0.0391522596196303, 1.06357990359365],
-                 [0.90151108565688598, -0.56569680324298699],
-                 [0.039152259619631001, 1.06357990359365],
-                 [-0.94066334527651696, -0.49788310035065803],
-                 [-0.32049535943729801, -0.27024376159027902],
-                 [0.39428564247009601, -0.142435242272585],
-                 [-0.073790283032798207, 0.41267900386286499],
-                 [0.32049535943729801, -0.27024376159027902],
-                 [0.073790283032798595, 0.41267900386286499],
-                 [-0.39428564247009601, -0.142435242272585],
-                 [-0.59104204439569197, -0.50341926055773001],
-                 [0.73149489059521799, -0.26014779487249401],
-                 [-0.140452846199525, 0.76356705543022496],
-                 [0.59104204439569197, -0.50341926055773001],
-                 [0.140452846199526, 0.76356705543022396],
-                 [-0.73149489059521799, -0.26014779487249401],
-                 [-0.21751462540323699, -0.44849821522859401],
-                 [0.497168160641561, 0.0358759163204374],
-                 [-0.27965353523832398, 0.41262229890815699],
-                 [0.21751462540323699, -0.44849821522859401],
-                 [0.27965353523832398, 0.41262229890815699],
-                 [-0.497168160641561, 0.035875916320437698],
-                 [-0.158009077982629, -0.15547647645906701],
-                 [0.21365111729576, -0.059101637331979602],
-                 [-0.055642039313130803, 0.21457811379104699],
-                 [0.15800907798263, -0.15547647645906701],
-                 [0.0556420393131309, 0.21457811379104699],
-                 [-0.21365111729576, -0.059101637331979498],
-                 [-0.341929964283189, -0.445036189119633],
-                 [0.55637762752261299, -0.073601940824530504],
-                 [-0.21444766323942399, 0.51863812994416403],
-                 [0.341929964283189, -0.445036189119633],
-                 [0.21444766323942399, 0.51863812994416403],
-                 [-0.55637762752261299, -0.073601940824530296],
-                 [-0.5034831466245, -0.36218696833371899],
-                 [0.56540468880892103, -0.25493571118728298],
-                 [-0.061921542184420697, 0.61712267952100197],
-                 [0.5034831466245, -0.36218696833371899],
-                 [0.061921542184421002, 0.61712267952100197],
-                 [-0.56540468880892103, -0.25493571118728198],
-                 [-0.72296664168698499, -0.56041252984416501],
-                 [0.84681480828764399, -0.34590121286756897],
-                 [-0.123848166600659, 0.90631374271173404],
-                 [0.72296664168698499, -0.56041252984416501],
-                 [0.123848166600659, 0.90631374271173404],
-                 [-0.84681480828764499, -0.34590121286756798],
-                 [-0.83410412765541297, -0.52895122351604296],
-                 [0.87513726075545994, -0.45787975219302401],
-                 [-0.041033133100047102, 0.98683097570906797],
-                 [0.83410412765541198, -0.52895122351604296],
-                 [0.041033133100047699, 0.98683097570906797],
-                 [-0.87513726075545994, -0.45787975219302401],
-                 [-0.45220969294953201, -0.534381087681019],
-                 [0.68889244370848801, -0.124434538091346],
-                 [-0.23668275075895601, 0.65881562577236497],
-                 [0.45220969294953201, -0.534381087681019],
-                 [0.23668275075895601, 0.65881562577236497],
-                 [-0.68889244370848801, -0.124434538091345],
-                 [-0.89091508745388304, -0.54075896308780902],
-                 [0.91376854308511501, -0.50117561680599299],
-                 [-0.022853455631232401, 1.0419345798938],
-                 [0.89091508745388204, -0.54075896308780902],
-                 [0.022853455631233199, 1.0419345798938],
-                 [-0.91376854308511601, -0.50117561680599199],
-                 [-0.43793566633133302, -0.45931123138039198],
-                 [0.616743027784599, -0.14960779657600401],
-                 [-0.17880736145326501, 0.60891902795639696],
-                 [0.43793566633133302, -0.45931123138039198],
-                 [0.17880736145326601, 0.60891902795639696],
-                 [-0.616743027784599, -0.14960779657600301],
-                 [-0.54799008713988295, -0.45819330231577898],
-                 [0.67080208321929002, -0.245476685327297],
-                 [-0.122811996079406, 0.70366998764307698],
-                 [0.54799008713988295, -0.45819330231577898],
-                 [0.122811996079407, 0.70366998764307698],
-                 [-0.67080208321929002, -0.245476685327297],
-                 [-0.20885455826291599, -0.30653810287769101],
-                 [0.36989706345142598, -0.027604301713017001],
-                 [-0.16104250518850999, 0.33414240459070799],
-                 [0.20885455826291599, -0.30653810287769101],
-                 [0.16104250518850999, 0.33414240459070799],
-                 [-0.36989706345142598, -0.027604301713016598],
-                 [-0.19653261626464, -0.55000331539355996],
-                 [0.574583151428808, 0.104799419339383],
-                 [-0.37805053516416798, 0.44520389605417698],
-                 [0.19653261626464, -0.55000331539355996],
-                 [0.37805053516416798, 0.44520389605417698],
-                 [-0.574583151428808, 0.104799419339384],
-                 [-0.34026425560719797, -0.53673989933539501],
-                 [0.63496251585275398, -0.026307539687937601],
-                 [-0.29469826024555501, 0.56304743902333299],
-                 [0.34026425560719797, -0.53673989933539501],
-                 [0.29469826024555601, 0.56304743902333299],
-                 [-0.63496251585275398, -0.026307539687937299],
-                 [-0.30334121141261999, -0.341912925993825],
-                 [0.44777588549923097, -0.091744732101162796],
-                 [-0.14443467408661001, 0.43365765809498802],
-                 [0.30334121141261999, -0.341912925993825],
-                 [0.14443467408661101, 0.43365765809498802],
-                 [-0.44777588549923097, -0.091744732101162504],
-                 [-0.495352942818645, -0.49993522428841303],
-                 [0.68063307588975897, -0.17902062017612],
-                 [-0.18528013307111399, 0.67895584446453305],
-                 [0.495352942818645, -0.49993522428841303],
-                 [0.18528013307111499, 0.67895584446453305],
-                 [-0.68063307588975897, -0.17902062017612],
-                 [-0.054967499236570301, -0.15116834147609701],
-                 [0.158399373584546, 0.027980920016676999],
-                 [-0.103431874347976, 0.12318742145941999],
-                 [0.054967499236570301, -0.15116834147609701],
-                 [0.103431874347976, 0.12318742145941999],
-                 [-0.158399373584546, 0.027980920016676999],
-                 [-0.79641981144983798, -0.55870738754201799],
-                 [0.88206469661834397, -0.41036609502176402],
-                 [-0.0856448851685052, 0.96907348256378201],
-                 [0.79641981144983798, -0.55870738754201799],
-                 [0.085644885168505894, 0.96907348256378201],
-                 [-0.88206469661834397, -0.41036609502176302],
-                 [-0.77252621434083102, -0.53093517049471595],
-                 [0.84606645258146096, -0.40355974146122497],
-                 [-0.073540238240629802, 0.93449491195594003],
-                 [0.77252621434083102, -0.53093517049471595],
-                 [0.073540238240630301, 0.93449491195594003],
-                 [-0.84606645258146196, -0.40355974146122398],
-                 [-0.221222657192503, -0.23111044337275499],
-                 [0.31075884363694201, -0.076029219335026002],
-                 [-0.089536186444439503, 0.30713966270778198],
-                 [0.221222657192503, -0.23111044337275499],
-                 [0.089536186444439697, 0.30713966270778198],
-                 [-0.31075884363694301, -0.076029219335025794],
-                 [0.0, -0.43735474019364001],
-                 [0.37876031547323602, 0.21867737009682001],
-                 [-0.37876031547323602, 0.21867737009682101],
-                 [-0.63310729924221099, -0.56061901718698404],
-                 [0.80206396034969796, -0.26797749587162001],
-                 [-0.168956661107487, 0.82859651305860405],
-                 [0.63310729924221099, -0.56061901718698404],
-                 [0.168956661107487, 0.82859651305860405],
-                 [-0.80206396034969796, -0.26797749587161901],
-                 [-0.66000029759477696, -0.38105134948157798],
-                 [0.66000029759477696, -0.38105134948157698],
-                 [0.0, 0.76210269896315497],
-                 [-0.38407586571187402, -0.50180464055963903],
-                 [0.62661349931750299, -0.081717136407163701],
-                 [-0.24253763360562899, 0.58352177696680296],
-                 [0.38407586571187402, -0.50180464055963903],
-                 [0.24253763360562999, 0.58352177696680296],
-                 [-0.62661349931750299, -0.081717136407163202],
-                 [-0.53170841252843504, -0.56066404582769402],
-                 [0.75140351293956298, -0.18014096974167301],
-                 [-0.219695100411128, 0.74080501556936795],
-                 [0.53170841252843504, -0.56066404582769402],
-                 [0.219695100411129, 0.74080501556936795],
-                 [-0.75140351293956298, -0.18014096974167301],
-                 [-0.17511720551530399, -0.37564082456563203],
-                 [0.41287309953002299, 0.036164463666822501],
-                 [-0.237755894014719, 0.339476360898811],
-                 [0.17511720551530399, -0.37564082456563203],
-                 [0.237755894014719, 0.33947636089881],
-                 [-0.41287309953002299, 0.036164463666822702],
-                 [-0.30063413976092501, -0.560935836470288],
-                 [0.63610175415680603, 0.020111115957302],
-                 [-0.33546761439588102, 0.54082472051298702],
-                 [0.30063413976092501, -0.560935836470288],
-                 [0.33546761439588102, 0.54082472051298702],
-                 [-0.63610175415680603, 0.0201111159573025],
-                 [-0.10868692205689499, -0.52891066884917504],
-                 [0.51239353658445197, 0.17032969886417701],
-                 [-0.40370661452755702, 0.358580969984998],
-                 [0.10868692205689499, -0.52891066884917504],
-                 [0.40370661452755702, 0.358580969984998],
-                 [-0.51239353658445197, 0.17032969886417801],
-                 [-0.41113970829952401, -0.32227834482125101],
-                 [0.48467108785456697, -0.19491825948128599],
-                 [-0.073531379555042506, 0.517196604302537],
-                 [0.41113970829952401, -0.32227834482125101],
-                 [0.073531379555043005, 0.517196604302537],
-                 [-0.48467108785456697, -0.19491825948128499],
-                 [-0.96718296080601096, -0.55840334277697001],
-                 [0.96718296080601096, -0.55840334277696901],
-                 [-1.11022302462516e-16, 1.11680668555394],
-                 [-0.691783762893597, -0.57411035226075702],
-                 [0.84308603108024704, -0.31204713646106702],
-                 [-0.15130226818664999, 0.88615748872182498],
-                 [0.691783762893597, -0.57411035226075702],
-                 [0.15130226818664999, 0.88615748872182498],
-                 [-0.84308603108024704, -0.31204713646106702],
-                 [-0.76406091414580002, -0.44113077445935001],
-                 [0.76406091414580102, -0.44113077445934901],
-                 [0.0, 0.88226154891869901],
-                 [-0.97953562628985102, -0.57376987737405105],
-                 [0.98666710287713499, -0.56141779759188704],
-                 [-0.0071314765872836404, 1.13518767496594],
-                 [0.97953562628985102, -0.57376987737405105],
-                 [0.0071314765872845199, 1.13518767496594],
-                 [-0.98666710287713599, -0.56141779759188604],
-                 [-0.950903150643156, -0.57387511563190796],
-                 [0.97244200405854198, -0.53656872717967996],
-                 [-0.021538853415386101, 1.1104438428115899],
-                 [0.950903150643156, -0.57387511563190796],
-                 [0.021538853415386899, 1.1104438428115899],
-                 [-0.97244200405854198, -0.53656872717967896],
-                 [-0.111951048283535, -0.23684295020028701],
-                 [0.26108753572246901, 0.021469023306303799],
-                 [-0.14913648743893401, 0.21537392689398399],
-                 [0.111951048283535, -0.23684295020028701],
-                 [0.14913648743893401, 0.21537392689398399],
-                 [-0.26108753572246901, 0.021469023306304201],
-                 [-0.39218251627345502, -0.39119141236067001],
-                 [0.53487295898338105, -0.14404431583258101],
-                 [-0.14269044270992601, 0.53523572819325105],
-                 [0.39218251627345502, -0.39119141236067001],
-                 [0.14269044270992701, 0.53523572819325105],
-                 [-0.53487295898338105, -0.14404431583258001],
-                 [-0.48703846544346902, -0.57412552079576296],
-                 [0.74072651869183603, -0.13472492329635199],
-                 [-0.25368805324836702, 0.70885044409211495],
-                 [0.48703846544346902, -0.57412552079576296],
-                 [0.25368805324836702, 0.70885044409211495],
-                 [-0.74072651869183603, -0.134724923296351],
-                 [-0.74320583688318997, -0.49038868751056802],
-                 [0.79629197955425601, -0.398440791226433],
-                 [-0.053086142671064998, 0.88882947873700102],
-                 [0.74320583688318997, -0.49038868751056802],
-                 [0.053086142671065602, 0.88882947873700102],
-                 [-0.79629197955425601, -0.398440791226432],
-                 [-0.48922335290760599, -0.28245323449505799],
-                 [0.48922335290760599, -0.28245323449505699],
-                 [0.0, 0.56490646899011498],
-                 [-0.69393567486204499, -0.44034718635067899],
-                 [0.72831968729571095, -0.38079232984749001],
-                 [-0.034384012433665297, 0.82113951619816905],
-                 [0.69393567486204499, -0.44034718635067899],
-                 [0.034384012433665803, 0.82113951619816905],
-                 [-0.72831968729571095, -0.38079232984749001],
-                 [-0.59416809204083898, -0.57418257398341699],
-                 [0.79434074150039702, -0.22747337483378899],
-                 [-0.20017264945955701, 0.80165594881720603],
-                 [0.59416809204083898, -0.57418257398341699],
-                 [0.20017264945955801, 0.80165594881720603],
-                 [-0.79434074150039702, -0.22747337483378799],
-                 [-0.40109962198954802, -0.231574974727523],
-                 [0.40109962198954802, -0.231574974727523],
-                 [0.0, 0.46314994945504601],
-                 [-0.59168695264172799, -0.40847798164087401],
-                 [0.64959578530845496, -0.30817694125509898],
-                 [-0.057908832666726397, 0.71665492289597399],
-                 [0.59168695264172799, -0.40847798164087401],
-                 [0.057908832666727, 0.71665492289597399],
-                 [-0.64959578530845496, -0.30817694125509898],
-                 [-0.42226270556224599, -0.55956030132080803],
-                 [0.69572478867421805, -0.085910079427249306],
-                 [-0.27346208311197201, 0.64547038074805796],
-                 [0.42226270556224599, -0.55956030132080803],
-                 [0.27346208311197201, 0.64547038074805796],
-                 [-0.69572478867421805, -0.085910079427248903],
-                 [0.0, -0.23325735799867101],
-                 [0.20200679764648999, 0.116628678999335],
-                 [-0.20200679764648999, 0.116628678999336],
-                 [-0.578158377830847, -0.33379989507487701],
-                 [0.578158377830847, -0.33379989507487701],
-                 [0.0, 0.66759979014975401],
-                 [-0.77777971180155403, -0.57398131471203695],
-                 [0.88597225573899197, -0.38658633161226702],
-                 [-0.10819254393743701, 0.96056764632430403],
-                 [0.77777971180155403, -0.57398131471203695],
-                 [0.108192543937438, 0.96056764632430403],
-                 [-0.88597225573899197, -0.38658633161226602],
-                 [0.0, -0.061858570316928999],
-                 [0.053571093336246801, 0.030929285158464801],
-                 [-0.053571093336246503, 0.030929285158464801],
-                 [-0.87324891245458502, -0.50417049467520303],
-                 [0.87324891245458602, -0.50417049467520303],
-                 [0.0, 1.0083409893504101],
-                 [-0.37473331227815299, -0.57386414467099101],
-                 [0.68434758374518301, -0.037596495741672002],
-                 [-0.30961427146703002, 0.61146064041266401],
-                 [0.37473331227815299, -0.57386414467099101],
-                 [0.30961427146703002, 0.61146064041266401],
-                 [-0.68434758374518301, -0.0375964957416716],
-                 [0.0, -0.57279115920673995],
-                 [0.49605169493617401, 0.28639557960336998],
-                 [-0.49605169493617401, 0.28639557960337098],
-                 [-0.077988920685466298, -0.56023791168005399],
-                 [0.52417472402080201, 0.21257856931268401],
-                 [-0.44618580333533597, 0.347659342367371],
-                 [0.077988920685466298, -0.56023791168005399],
-                 [0.44618580333533597, 0.347659342367371],
-                 [-0.52417472402080201, 0.21257856931268401],
-                 [-0.11056039746108701, -0.063832075235870506],
-                 [0.11056039746108701, -0.063832075235870395],
-                 [0.0, 0.12766415047174201],
-                 [-0.849655698093288, -0.57349445987280501],
-                 [0.92148862022612898, -0.44907618908258601],
-                 [-0.071832922132840399, 1.0225706489553901],
-                 [0.849655698093288, -0.57349445987280501],
-                 [0.071832922132841107, 1.0225706489553901],
-                 [-0.92148862022612898, -0.44907618908258601]],
-      'weights': [0.00576546916551267,
-                  0.00576546916551267,
-                  0.00576546916551267,
-                  0.00060159001914035699,
-                  0.00060159001914035699,
-                  0.00060159001914035699,
-                  0.00060159001914035699,
-                  0.00060159001914035699,
-                  0.00060159001914035699,
-                  0.00051970202132417998,
-                  0.00051970202132417998,
-                  0.00051970202132417998,
-                  0.00051970202132417998,
-                  0.00051970202132417998,
-                  0.00051970202132417998,
-                  0.0047291950916766804,
-                  0.0047291950916766804,
-                  0.0047291950916766804,
-                  0.0047291950916766804,
-                  0.0047291950916766804,
-                  0.0047291950916766804,
-                  0.0019623641180160399,
-                  0.0019623641180160399,
-                  0.0019623641180160399,
-                  0.0019623641180160399,
-                  0.0019623641180160399,
-                  0.0019623641180160399,
-                  0.00023646276494913301,
-                  0.00023646276494913301,
-                  0.00023646276494913301,
-                  0.00023646276494913301,
-                  0.00023646276494913301,
-                  0.00023646276494913301,
-                  0.00133259843779795,
-                  0.00133259843779795,
-                  0.00133259843779795,
-                  0.00133259843779795,
-                  0.00133259843779795,
-                  0.00133259843779795,
-                  0.0022464234691231401,
-                  0.0022464234691231401,
-                  0.0022464234691231401,
-                  0.0022464234691231401,
-                  0.0022464234691231401,
-                  0.0022464234691231401,
-                  6.3381323607473794e-05,
-                  6.3381323607473794e-05,
-                  6.3381323607473794e-05,
-                  0.0048598836994546797,
-                  0.0048598836994546797,
-                  0.0048598836994546797,
-                  0.0048598836994546797,
-                  0.0048598836994546797,
-                  0.0048598836994546797,
-                  0.00295977037542899,
-                  0.00295977037542899,
-                  0.00295977037542899,
-                  0.00295977037542899,
-                  0.00295977037542899,
-                  0.00295977037542899,
-                  0.0025695440400521001,
-                  0.0025695440400521001,
-                  0.0025695440400521001,
-                  0.0025695440400521001,
-                  0.0025695440400521001,
-                  0.0025695440400521001,
-                  0.0028603023942416301,
-                  0.0028603023942416301,
-                  0.0028603023942416301,
-                  0.0073684809036494098,
-                  0.0073684809036494098,
-                  0.0073684809036494098,
-                  0.0073684809036494098,
-                  0.0073684809036494098,
-                  0.0073684809036494098,
-                  0.0038067005490501102,
-                  0.0038067005490501102,
-                  0.0038067005490501102,
-                  0.0038067005490501102,
-                  0.0038067005490501102,
-                  0.0038067005490501102,
-                  0.0026822226134322999,
-                  0.0026822226134322999,
-                  0.0026822226134322999,
-                  0.0026822226134322999,
-                  0.0026822226134322999,
-                  0.0026822226134322999,
-                  0.0045090141445808304,
-                  0.0045090141445808304,
-                  0.0045090141445808304,
-                  0.0045090141445808304,
-                  0.0045090141445808304,
-                  0.0045090141445808304,
-                  0.00080743058240463899,
-                  0.00080743058240463899,
-                  0.00080743058240463899,
-                  0.00080743058240463899,
-                  0.00080743058240463899,
-                  0.00080743058240463899,
-                  0.0011389570447355899,
-                  0.0011389570447355899,
-                  0.0011389570447355899,
-                  0.0011389570447355899,
-                  0.0011389570447355899,
-                  0.0011389570447355899,
-                  0.0048262996627861298,
-                  0.0048262996627861298,
-                  0.0048262996627861298,
-                  0.0048262996627861298,
-                  0.0048262996627861298,
-                  0.0048262996627861298,
-                  0.0073769718409754598,
-                  0.0073769718409754598,
-                  0.0073769718409754598,
-                  0.0071527756606714898,
-                  0.0071527756606714898,
-                  0.0071527756606714898,
-                  0.0071527756606714898,
-                  0.0071527756606714898,
-                  0.0071527756606714898,
-                  0.0037313274666888698,
-                  0.0037313274666888698,
-                  0.0037313274666888698,
-                  0.0037313274666888698,
-                  0.0037313274666888698,
-                  0.0037313274666888698,
-                  0.0060205258179752297,
-                  0.0060205258179752297,
-                  0.0060205258179752297,
-                  0.0060205258179752297,
-                  0.0060205258179752297,
-                  0.0060205258179752297,
-                  0.0041989760580048502,
-                  0.0041989760580048502,
-                  0.0041989760580048502,
-                  0.0046879934051059198,
-                  0.0046879934051059198,
-                  0.0046879934051059198,
-                  0.0046879934051059198,
-                  0.0046879934051059198,
-                  0.0046879934051059198,
-                  0.00066818932556073898,
-                  0.00066818932556073898,
-                  0.00066818932556073898,
-                  0.00066818932556073898,
-                  0.00066818932556073898,
-                  0.00066818932556073898,
-                  0.0059576770165077897,
-                  0.0059576770165077897,
-                  0.0059576770165077897,
-                  0.0059576770165077897,
-                  0.0059576770165077897,
-                  0.0059576770165077897,
-                  0.00075868491012429898,
-                  0.00075868491012429898,
-                  0.00075868491012429898,
-                  0.00075868491012429898,
-                  0.00075868491012429898,
-                  0.00075868491012429898,
-                  0.0076314410210539798,
-                  0.0076314410210539798,
-                  0.0076314410210539798,
-                  0.0076314410210539798,
-                  0.0076314410210539798,
-                  0.0076314410210539798,
-                  0.003494413904556,
-                  0.003494413904556,
-                  0.003494413904556,
-                  0.003494413904556,
-                  0.003494413904556,
-                  0.003494413904556,
-                  0.0056088630721432501,
-                  0.0056088630721432501,
-                  0.0056088630721432501,
-                  0.0056088630721432501,
-                  0.0056088630721432501,
-                  0.0056088630721432501,
-                  0.00808211418303054,
-                  0.00808211418303054,
-                  0.00808211418303054,
-                  0.00808211418303054,
-                  0.00808211418303054,
-                  0.00808211418303054,
-                  0.0054719396289347796,
-                  0.0054719396289347796,
-                  0.0054719396289347796,
-                  0.0054719396289347796,
-                  0.0054719396289347796,
-                  0.0054719396289347796,
-                  0.0060164248703335702,
-                  0.0060164248703335702,
-                  0.0060164248703335702,
-                  0.0060164248703335702,
-                  0.0060164248703335702,
-                  0.0060164248703335702,
-                  0.00155086596160521,
-                  0.00155086596160521,
-                  0.00155086596160521,
-                  0.00155086596160521,
-                  0.00155086596160521,
-                  0.00155086596160521,
-                  0.0018714436301241299,
-                  0.0018714436301241299,
-                  0.0018714436301241299,
-                  0.0018714436301241299,
-                  0.0018714436301241299,
-                  0.0018714436301241299,
-                  0.0031401638586826199,
-                  0.0031401638586826199,
-                  0.0031401638586826199,
-                  0.0031401638586826199,
-                  0.0031401638586826199,
-                  0.0031401638586826199,
-                  0.0013252910257759399,
-                  0.0013252910257759399,
-                  0.0013252910257759399,
-                  0.0013252910257759399,
-                  0.0013252910257759399,
-                  0.0013252910257759399,
-                  0.0049496499036713196,
-                  0.0049496499036713196,
-                  0.0049496499036713196,
-                  0.0049496499036713196,
-                  0.0049496499036713196,
-                  0.0049496499036713196,
-                  0.0046000014761912499,
-                  0.0046000014761912499,
-                  0.0046000014761912499,
-                  0.0046000014761912499,
-                  0.0046000014761912499,
-                  0.0046000014761912499,
-                  0.0077551494474767096,
-                  0.0077551494474767096,
-                  0.0077551494474767096,
-                  0.0077551494474767096,
-                  0.0077551494474767096,
-                  0.0077551494474767096,
-                  0.0028639759077177299,
-                  0.0028639759077177299,
-                  0.0028639759077177299,
-                  0.0028639759077177299,
-                  0.0028639759077177299,
-                  0.0028639759077177299,
-                  0.0033688208692524702,
-                  0.0033688208692524702,
-                  0.0033688208692524702,
-                  0.0033688208692524702,
-                  0.0033688208692524702,
-                  0.0033688208692524702,
-                  0.0070226304499840199,
-                  0.0070226304499840199,
-                  0.0070226304499840199,
-                  0.0070226304499840199,
-                  0.0070226304499840199,
-                  0.0070226304499840199,
-                  0.0040654644764650102,
-                  0.0040654644764650102,
-                  0.0040654644764650102,
-                  0.0040654644764650102,
-                  0.0040654644764650102,
-                  0.0040654644764650102,
-                  0.0093873632197293503,
-                  0.0093873632197293503,
-                  0.0093873632197293503,
-                  0.0093873632197293503,
-                  0.0093873632197293503,
-                  0.0093873632197293503,
-                  0.0014227396424515799,
-                  0.0014227396424515799,
-                  0.0014227396424515799,
-                  0.0014227396424515799,
-                  0.0014227396424515799,
-                  0.0014227396424515799,
-                  0.0023090368982648102,
-                  0.0023090368982648102,
-                  0.0023090368982648102,
-                  0.0023090368982648102,
-                  0.0023090368982648102,
-                  0.0023090368982648102,
-                  0.0080931845938154497,
-                  0.0080931845938154497,
-                  0.0080931845938154497,
-                  0.0080931845938154497,
-                  0.0080931845938154497,
-                  0.0080931845938154497,
-                  0.0062054378464061902,
-                  0.0062054378464061902,
-                  0.0062054378464061902,
-                  0.00181406210448485,
-                  0.00181406210448485,
-                  0.00181406210448485,
-                  0.00181406210448485,
-                  0.00181406210448485,
-                  0.00181406210448485,
-                  0.0048144063470276603,
-                  0.0048144063470276603,
-                  0.0048144063470276603,
-                  0.0044288761213936599,
-                  0.0044288761213936599,
-                  0.0044288761213936599,
-                  0.0044288761213936599,
-                  0.0044288761213936599,
-                  0.0044288761213936599,
-                  0.0019983812075655299,
-                  0.0019983812075655299,
-                  0.0019983812075655299,
-                  0.0019983812075655299,
-                  0.0019983812075655299,
-                  0.0019983812075655299,
-                  0.0073157627327645703,
-                  0.0073157627327645703,
-                  0.0073157627327645703,
-                  0.0073157627327645703,
-                  0.0073157627327645703,
-                  0.0073157627327645703,
-                  0.0023164750860518498,
-                  0.0023164750860518498,
-                  0.0023164750860518498,
-                  0.0023164750860518498,
-                  0.0023164750860518498,
-                  0.0023164750860518498,
-                  0.0041247461578510997,
-                  0.0041247461578510997,
-                  0.0041247461578510997,
-                  0.0041247461578510997,
-                  0.0041247461578510997,
-                  0.0041247461578510997,
-                  0.0074181180482179301,
-                  0.0074181180482179301,
-                  0.0074181180482179301,
-                  0.0074181180482179301,
-                  0.0074181180482179301,
-                  0.0074181180482179301,
-                  0.00051953242757784201,
-                  0.00051953242757784201,
-                  0.00051953242757784201,
-                  0.00076330432677584805,
-                  0.00076330432677584805,
-                  0.00076330432677584805,
-                  0.00076330432677584805,
-                  0.00076330432677584805,
-                  0.00076330432677584805,
-                  0.0035816587909143199,
-                  0.0035816587909143199,
-                  0.0035816587909143199,
-                  0.00020030346207878399,
-                  0.00020030346207878399,
-                  0.00020030346207878399,
-                  0.00020030346207878399,
-                  0.00020030346207878399,
-                  0.00020030346207878399,
-                  0.00031596954490042202,
-                  0.00031596954490042202,
-                  0.00031596954490042202,
-                  0.00031596954490042202,
-                  0.00031596954490042202,
-                  0.00031596954490042202,
-                  0.00889428155022161,
-                  0.00889428155022161,
-                  0.00889428155022161,
-                  0.00889428155022161,
-                  0.00889428155022161,
-                  0.00889428155022161,
-                  0.0067637548963748201,
-                  0.0067637548963748201,
-                  0.0067637548963748201,
-                  0.0067637548963748201,
-                  0.0067637548963748201,
-                  0.0067637548963748201,
-                  0.00091489965108238001,
-                  0.00091489965108238001,
-                  0.00091489965108238001,
-                  0.00091489965108238001,
-                  0.00091489965108238001,
-                  0.00091489965108238001,
-                  0.00328927442696546,
-                  0.00328927442696546,
-                  0.00328927442696546,
-                  0.00328927442696546,
-                  0.00328927442696546,
-                  0.00328927442696546,
-                  0.0069762000703171801,
-                  0.0069762000703171801,
-                  0.0069762000703171801,
-                  0.0040427093165467899,
-                  0.0040427093165467899,
-                  0.0040427093165467899,
-                  0.0040427093165467899,
-                  0.0040427093165467899,
-                  0.0040427093165467899,
-                  0.00083601013758453902,
-                  0.00083601013758453902,
-                  0.00083601013758453902,
-                  0.00083601013758453902,
-                  0.00083601013758453902,
-                  0.00083601013758453902,
-                  0.0079166394007949802,
-                  0.0079166394007949802,
-                  0.0079166394007949802,
-                  0.0056274667610041202,
-                  0.0056274667610041202,
-                  0.0056274667610041202,
-                  0.0056274667610041202,
-                  0.0056274667610041202,
-                  0.0056274667610041202,
-                  0.0022859033539901,
-                  0.0022859033539901,
-                  0.0022859033539901,
-                  0.0022859033539901,
-                  0.0022859033539901,
-                  0.0022859033539901,
-                  0.0089466589055271703,
-                  0.0089466589055271703,
-                  0.0089466589055271703,
-                  0.0060366532059378903,
-                  0.0060366532059378903,
-                  0.0060366532059378903,
-                  0.00068715523697817998,
-                  0.00068715523697817998,
-                  0.00068715523697817998,
-                  0.00068715523697817998,
-                  0.00068715523697817998,
-                  0.00068715523697817998,
-                  0.010144300204690501,
-                  0.010144300204690501,
-                  0.010144300204690501,
-                  0.0020766402092811101,
-                  0.0020766402092811101,
-                  0.0020766402092811101,
-                  0.0010142775924276901,
-                  0.0010142775924276901,
-                  0.0010142775924276901,
-                  0.0010142775924276901,
-                  0.0010142775924276901,
-                  0.0010142775924276901,
-                  0.0012978638689420999,
-                  0.0012978638689420999,
-                  0.0012978638689420999,
-                  0.0024262132703554901,
-                  0.0024262132703554901,
-                  0.0024262132703554901,
-                  0.0024262132703554901,
-                  0.0024262132703554901,
-                  0.0024262132703554901,
-                  0.0100002359255781,
-                  0.0100002359255781,
-                  0.0100002359255781,
-                  0.00064173443503233701,
-                  0.00064173443503233701,
-                  0.00064173443503233701,
-                  0.00064173443503233701,
-                  0.00064173443503233701,
-                  0.00064173443503233701]}}
-
-
-triangle_table = dict(
-    (order, dict((name, numpy.array(ary)) for name, ary in rule.iteritems()))
-    for order, rule in triangle_table.iteritems())
-
-
-tetrahedron_table = {1: {'points': [[0.0, 0.0, 0.0]], 'weights': [0.94280904158206302]},
- 2: {'points': [[-0.26770285859100701,
-                 0.059390170061994901,
-                 -0.39694269411421501],
-                [0.15109318415331399, 0.435408773247631, 0.215171925430692],
-                [-0.13676991952373899,
-                 -0.328034111559041,
-                 0.29508465199371298],
-                [0.80674493090519594,
-                 -0.340097731428529,
-                 -0.34303789510025501]],
-     'weights': [0.28333385879163597,
-                 0.26283401989043298,
-                 0.300844647504794,
-                 0.095796515395199594]},
- 3: {'points': [[-0.1685037180276,
-                 0.19109149162717101,
-                 -0.38962673145851601],
-                [0.0278379942753442,
-                 -0.0230493283883966,
-                 0.54813506632418296],
-                [-0.35122161773434502,
-                 0.18351440263399901,
-                 0.051478153303435303],
-                [0.43085324635490402,
-                 -0.247471582318045,
-                 -0.16833156410070299],
-                [-0.46767637479673801,
-                 -0.42352508272643802,
-                 -0.15869730778893101],
-                [0.14928312538484301,
-                 0.63978476851645205,
-                 -0.108021925305539]],
-     'weights': [0.124986334616479,
-                 0.21158064843802099,
-                 0.120742171826672,
-                 0.237591631621872,
-                 0.13258196489496801,
-                 0.11532629018405099]},
- 4: {'points': [[-0.0145961228097999,
-                 0.0024265645791997099,
-                 0.709356578010363],
-                [-0.29372448963099901, 0.176439650676461, 0.110886049494113],
-                [0.323087833715827,
-                 -0.19320704109565601,
-                 0.16954263967046501],
-                [-0.088196541793965799,
-                 0.023178842701059799,
-                 -0.201181939132559],
-                [0.12702036633147101,
-                 0.54514106772152204,
-                 0.13095039907593201],
-                [-0.44143076880911802,
-                 -0.38482256315901803,
-                 0.092254296791625306],
-                [0.39394185896334299,
-                 0.20687446706395299,
-                 -0.31115604261982399],
-                [-0.060344697146142101,
-                 -0.45737390749270801,
-                 -0.33022153293223799],
-                [-0.089140598346011804,
-                 0.72680926595994599,
-                 -0.35079317373637398],
-                [0.65452130336037595,
-                 -0.39703562438705697,
-                 -0.29704248339511402],
-                [-0.73076422596778601,
-                 -0.26694200886489799,
-                 -0.38610375702418498]],
-     'weights': [0.10037902524126401,
-                 0.10392983102544601,
-                 0.14611288340938799,
-                 0.182349462340124,
-                 0.071806896564952497,
-                 0.074884192110980102,
-                 0.065496912004400595,
-                 0.0565055488469881,
-                 0.052225774423700501,
-                 0.052112232198920402,
-                 0.037006283415898802]},
- 5: {'points': [[1.6641807215776899e-16,
-                 1.09436232414623e-16,
-                 0.77043678252967196],
-                [0.40899259174870101,
-                 -0.23613198294267501,
-                 0.33394105278758401],
-                [6.3384672754300003e-17,
-                 0.47226396588535002,
-                 0.33394105278758301],
-                [-0.40899259174870101,
-                 -0.23613198294267501,
-                 0.33394105278758301],
-                [3.7239009310357799e-17,
-                 3.5480014893018101e-17,
-                 -0.29827886943075899],
-                [-0.24354367705320201,
-                 0.14061000750609801,
-                 0.099426289810253005],
-                [7.7186576007052593e-18,
-                 -0.28122001501219501,
-                 0.099426289810253102],
-                [0.24354367705320301,
-                 0.14061000750609801,
-                 0.099426289810253005],
-                [0.62905899875643501,
-                 -0.36318738226818398,
-                 -0.25681226084322401],
-                [-0.62905899875643501,
-                 -0.36318738226818398,
-                 -0.25681226084322401],
-                [-1.40776895379933e-16,
-                 0.72637476453636796,
-                 -0.25681226084322401],
-                [0.40899259174870101,
-                 0.23613198294267501,
-                 -0.33394105278758401],
-                [-1.0479652114649001e-16,
-                 -0.47226396588535002,
-                 -0.33394105278758301],
-                [-0.40899259174870101,
-                 0.23613198294267501,
-                 -0.33394105278758401]],
-     'weights': [0.069289905543486505,
-                 0.040112773071970698,
-                 0.040112773071970698,
-                 0.040112773071970802,
-                 0.106243195244073,
-                 0.106243195244073,
-                 0.106243195244073,
-                 0.106243195244073,
-                 0.069289905543486394,
-                 0.069289905543486505,
-                 0.069289905543486394,
-                 0.040112773071970698,
-                 0.040112773071970698,
-                 0.040112773071970698]},
- 6: {'points': [[0.00491994195152311,
-                 -0.0139223850343092,
-                 1.0662282639677201],
-                [0.034150580602195398,
-                 0.25420738305433999,
-                 0.63158869670392304],
-                [-0.45611983286172297,
-                 -0.31103854474453801,
-                 0.23002676551069901],
-                [0.21444992297694901,
-                 -0.123490387324972,
-                 0.56323516363028303],
-                [-0.15406930599959401,
-                 -0.068652144723021696,
-                 0.62062648962826195],
-                [0.30645254032229502,
-                 0.18184955019231799,
-                 0.125468587644291],
-                [-0.013058829595147699,
-                 -0.024888911690734001,
-                 -0.33577059262826597],
-                [0.0153524468983807, -0.326114310053292, 0.1147788985927],
-                [-0.156778448777534,
-                 0.25224543010009198,
-                 0.21405978007055201],
-                [-0.39736169405067601,
-                 -0.19771590833784999,
-                 -0.079633618028823294],
-                [0.0097648846166495506,
-                 0.650418429113368,
-                 0.0058684462815786903],
-                [-0.52280879846474504,
-                 -0.066350553041234203,
-                 0.0019342726884559499],
-                [0.556560570221033,
-                 -0.31866900542201099,
-                 0.013797402514248399],
-                [0.084230819790234598,
-                 0.021380598228645201,
-                 0.031957561269125502],
-                [0.21741660911602401,
-                 0.45995070049980002,
-                 -0.30272323037531601],
-                [0.32121589452256499,
-                 -0.42600524215450503,
-                 -0.299485560260426],
-                [-0.25936480785454002,
-                 0.385198021113758,
-                 -0.282519709925312],
-                [0.563645476720258, -0.11116062278217, -0.30681404953004099],
-                [-0.64109496446257297,
-                 -0.19343183385076099,
-                 -0.36604736051615899],
-                [-0.33441510905821498,
-                 -0.44917586997236503,
-                 -0.31024232927461298],
-                [-0.0189458838689202,
-                 0.90105994599309602,
-                 -0.34739520504368998],
-                [-0.82146558961993499,
-                 -0.51098603593551795,
-                 -0.26356452401013603],
-                [0.85974154756156596,
-                 -0.52080851412257401,
-                 -0.360343258536933]],
-     'weights': [0.0066899795433560602,
-                 0.029707356532330802,
-                 0.0228454763572233,
-                 0.046094005604455798,
-                 0.050000297285772301,
-                 0.040766399876141703,
-                 0.063296254539190397,
-                 0.056400107454819402,
-                 0.059033493429136899,
-                 0.060654697597565997,
-                 0.0410974214177224,
-                 0.0212751151391656,
-                 0.043947284311017701,
-                 0.106159736633763,
-                 0.050850415678197203,
-                 0.046922314437432798,
-                 0.059459536205355101,
-                 0.044451589422034497,
-                 0.024045707518408399,
-                 0.037442810341827698,
-                 0.015014685767148501,
-                 0.0098272151637458505,
-                 0.00682714132625144]},
- 7: {'points': [[-0.30825229135629201,
-                 -0.197843287967888,
-                 0.65537714053414198],
-                [0.323006856476517, -0.116660814480029, 0.59632172682128204],
-                [0.00179003094309949,
-                 0.00276022304167135,
-                 0.91916703424354596],
-                [-0.174985856285022,
-                 0.14925530712725801,
-                 0.51629213873982405],
-                [0.035158182245122301,
-                 0.32225700098319598,
-                 0.54921035994702205],
-                [-0.114891280250506,
-                 0.035981502469979901,
-                 -0.38869176539664602],
-                [0.108024261958047,
-                 -0.21232110827452599,
-                 0.51382146570685705],
-                [0.099608860192095194,
-                 0.33706003461657902,
-                 -0.27325022264021698],
-                [0.255258965717304, 0.0234593138765271, -0.128926642642749],
-                [0.30189720939645398, -0.279744081272853, -0.33681550281556],
-                [-0.036379952516628698,
-                 0.67841581477926305,
-                 0.0496515459049994],
-                [-0.197974843267435,
-                 -0.109926012070685,
-                 0.36881013673108798],
-                [0.17055476085871901,
-                 0.058544811497166803,
-                 0.32453984503362299],
-                [0.53827145753577299,
-                 -0.33262024381560601,
-                 0.065309984633894799],
-                [-0.58262559515596601,
-                 -0.28663942886695998,
-                 0.040500736891942897],
-                [-0.066388274842551401,
-                 0.33966437327451698,
-                 0.043391376211546998],
-                [0.13948654504833599,
-                 -0.30785023183686699,
-                 -0.0085541882281269799],
-                [-0.25254482115614801,
-                 -0.096877078523207594,
-                 -0.121223434312817],
-                [-0.33641794793567797,
-                 -0.42228093056235599,
-                 0.022449369921336601],
-                [0.50881740950913401,
-                 -0.046079600146529502,
-                 -0.053891551497801803],
-                [-0.39976767712995798,
-                 0.169411793400156,
-                 -0.013317691107619401],
-                [0.223357920899763,
-                 0.50702639223184598,
-                 -0.039961730600970802],
-                [-0.28876898323279798,
-                 -0.43204116122417302,
-                 -0.33043707571388498],
-                [0.243005680598846,
-                 0.52621554880824895,
-                 -0.36336975480343903],
-                [-0.24024591846687901,
-                 0.49192396597830401,
-                 -0.31846700755382401],
-                [-0.57371224951689404,
-                 -0.074531823343519099,
-                 -0.33480007414142998],
-                [0.55307405863451797,
-                 -0.0033550265304667401,
-                 -0.35074440354014202],
-                [0.76321608715403599,
-                 -0.434539428837598,
-                 -0.31204798915756199],
-                [0.0011083235253162801,
-                 0.88358150932317503,
-                 -0.31553368840076301],
-                [-0.76665897255192195,
-                 -0.454032742499625,
-                 -0.314870223157801],
-                [0.33143792684370299,
-                 -0.54190340337227705,
-                 -0.310441026876215]],
-     'weights': [0.0072673428936866,
-                 0.0113172838083258,
-                 0.021889017750995301,
-                 0.0211296379289743,
-                 0.021958953090730999,
-                 0.025766890324340201,
-                 0.027149396537548401,
-                 0.040532456207759901,
-                 0.049763031607931899,
-                 0.039445745886162599,
-                 0.0195275383339862,
-                 0.056852814120494297,
-                 0.062895929290706101,
-                 0.0296146949713317,
-                 0.026693552152922701,
-                 0.062922594056576797,
-                 0.0605178177170064,
-                 0.0776291699936313,
-                 0.019678975148812401,
-                 0.023157680979721099,
-                 0.021070529541127599,
-                 0.020911805463565698,
-                 0.034823414788413401,
-                 0.015746797615317599,
-                 0.031863047375523201,
-                 0.0264563326318226,
-                 0.019886450347696399,
-                 0.019412766859840998,
-                 0.018104584585236099,
-                 0.017024375916611899,
-                 0.011798413655263001]},
- 8: {'points': [[-0.016117725516705299,
-                 0.00079986001195006995,
-                 1.1407501204806501],
-                [-0.0071488272368407102,
-                 0.17239145950071399,
-                 0.78606960727934505],
-                [0.45899233720885602,
-                 -0.17447163516512301,
-                 -0.39914309123309899],
-                [-0.45209904924941802,
-                 -0.26329416290713997,
-                 0.35360929602404401],
-                [0.110956035643063,
-                 -0.062957203760056396,
-                 0.81894041423014696],
-                [0.18252242936488899,
-                 0.167838281859336,
-                 0.47649627163617497],
-                [-0.15074898054199701,
-                 -0.078269418732493101,
-                 0.762897429508123],
-                [-0.28773247348786002,
-                 -0.123468697478364,
-                 -0.38800583238177999],
-                [0.36807472123784901,
-                 -0.216987676633974,
-                 0.39975536952744101],
-                [0.47881564248905101,
-                 -0.046294373005942399,
-                 0.11446564649950899],
-                [-0.34787793674008199,
-                 -0.12956303361647301,
-                 0.25091719687786401],
-                [-0.0354828586873474,
-                 -0.226810803130748,
-                 0.41746155783433098],
-                [0.25916504429340398,
-                 0.133007144302729,
-                 -0.27477783451180299],
-                [-0.0013050373789463101,
-                 0.49194091158945402,
-                 0.30319293247532098],
-                [-0.034939960708285998,
-                 0.30019951691221902,
-                 -0.34425035242309199],
-                [-0.16604628597073001,
-                 0.14077364576875101,
-                 0.39705374341808303],
-                [0.101008552242243,
-                 -0.225925757531516,
-                 -0.30708932586014298],
-                [-0.35874681636051398,
-                 -0.108319979557346,
-                 -0.19899043969039201],
-                [-0.34730675639856801,
-                 -0.37423047390301301,
-                 0.0152625895856833],
-                [-0.086357411214011803,
-                 -0.147806248208501,
-                 -0.00015423501898439499],
-                [0.29011682017784901,
-                 -0.34495123737267502,
-                 0.0412102600131449],
-                [0.10420933551501101,
-                 0.028836711416804699,
-                 0.32489138482799301],
-                [-0.064193874519183597,
-                 0.25581255708530398,
-                 -0.069579005153887805],
-                [-0.20169869721189701,
-                 0.44043680790411799,
-                 -0.033409875648792199],
-                [0.18461706773563999,
-                 0.39985686052859598,
-                 -0.0130352743154576],
-                [0.37888939581601599,
-                 -0.099565851628155899,
-                 -0.083903225122125905],
-                [-0.48187161631657999,
-                 -0.0150974738390975,
-                 -0.0450140403133934],
-                [0.682171905077817,
-                 -0.39565186188175899,
-                 -0.074515235227443397],
-                [0.39786422930151399,
-                 0.22566160132483501,
-                 -0.39939390220091397],
-                [-0.69758894701591301,
-                 -0.38996510239184501,
-                 -0.12542104582055799],
-                [0.0027429647493363101,
-                 0.81349982308796198,
-                 -0.14158157952053199],
-                [0.0164568786005099,
-                 -0.44510367002946299,
-                 -0.18582442994108],
-                [-0.46183492147859001,
-                 -0.45356474799379398,
-                 -0.324551242480902],
-                [0.15750905683970901,
-                 0.66501454601714305,
-                 -0.33171210015082297],
-                [0.53991752032152396,
-                 -0.46746244699730299,
-                 -0.31681595057011203],
-                [-0.14039052620897199,
-                 0.70126539837596302,
-                 -0.33721502391500902],
-                [0.044533965700378597,
-                 -0.51072418473091297,
-                 -0.395001367051171],
-                [-0.42343603021043502,
-                 0.22633249976876099,
-                 -0.33364440060358702],
-                [-0.72141763768940304,
-                 -0.272715517063635,
-                 -0.35193929700016602],
-                [0.72781187161903405,
-                 -0.28616278030707298,
-                 -0.32261675829158099],
-                [0.490189077970134,
-                 0.18563065233326301,
-                 -0.27800423257075701],
-                [-0.87588873525077804,
-                 -0.55663746788874202,
-                 -0.37205777991045902],
-                [0.00763237720561976,
-                 1.0560569466691101,
-                 -0.39727510089742202],
-                [0.93174311471691895,
-                 -0.56642471247059101,
-                 -0.38210736167906301]],
-     'weights': [0.0016453748163063201,
-                 0.0142022580708632,
-                 0.0093116693335563005,
-                 0.0095496385366784994,
-                 0.0166052583605351,
-                 0.014723272938188901,
-                 0.0169600880437266,
-                 0.015584036471187101,
-                 0.021217508271530301,
-                 0.0120673743703809,
-                 0.025696200026761099,
-                 0.030446132984005302,
-                 0.0265737195097187,
-                 0.0227767050847918,
-                 0.0303973451645927,
-                 0.034459755989801,
-                 0.039190205799584099,
-                 0.0368286761285683,
-                 0.023701357644460699,
-                 0.049839647148548397,
-                 0.030855570543979301,
-                 0.0526016619480544,
-                 0.050302447350621303,
-                 0.025566660469565398,
-                 0.037805516043883297,
-                 0.048818297619416202,
-                 0.0214429854534266,
-                 0.0138780615762415,
-                 0.0065029577803431202,
-                 0.016004399627384699,
-                 0.016394697401837799,
-                 0.021269054268010502,
-                 0.022154997579725399,
-                 0.018994501144492498,
-                 0.0193700460252858,
-                 0.016875154063019201,
-                 0.0070910085548324901,
-                 0.0206706155183819,
-                 0.0129502105610663,
-                 0.014508365470713,
-                 0.011186825915375599,
-                 0.0024012408376466099,
-                 0.00196017972799913,
-                 0.00142736140697601]},
- 9: {'points': [[0.21080520171032599,
-                 -0.089557760480759696,
-                 0.77358820742610401],
-                [0.0012837293558500499,
-                 0.00061211977549114705,
-                 1.02094083614009],
-                [-0.029187341750184701,
-                 0.212275857965953,
-                 0.77993587233880801],
-                [-0.43579492976892698,
-                 -0.28393554803183402,
-                 0.36443776437833297],
-                [-0.17993416378702001,
-                 -0.095825561520292604,
-                 0.757204434805819],
-                [0.069422221862041597,
-                 -0.139466668070751,
-                 0.70554876049830195],
-                [-0.10056429911352301,
-                 0.48363975282618299,
-                 -0.40716036117457899],
-                [0.190485569675336,
-                 0.32488439517388201,
-                 0.27843378353425402],
-                [0.32312388519965501,
-                 -0.30910970021347201,
-                 0.32200036913513203],
-                [0.068199879433401403,
-                 -0.179954101765636,
-                 -0.39551356831763301],
-                [0.097081316235561405,
-                 0.134669034127363,
-                 0.66322094175076896],
-                [0.42462397880552, -0.19740374513643999, 0.367189752118327],
-                [-0.356966425620311,
-                 0.052406650948855403,
-                 -0.37474813564634701],
-                [-0.21457520611417499,
-                 0.27613873828653102,
-                 0.23259322631861001],
-                [-0.0048186743057816103,
-                 0.484004124635174,
-                 0.34878403068180203],
-                [-0.43149541046214501,
-                 -0.39727522863965198,
-                 -0.40357045419720999],
-                [-0.13124535674170301,
-                 0.0756907618774431,
-                 0.53749001963035503],
-                [-0.408355822291399,
-                 -0.123985974201377,
-                 0.26543181047657599],
-                [-0.124561260584964,
-                 -0.23447903004377099,
-                 0.36988830293557801],
-                [0.113634878033089,
-                 -0.033054769870344301,
-                 0.43698730368953997],
-                [0.335166884632847, 0.017706220728275299, 0.18603932202331],
-                [0.21595893332072899,
-                 0.23852467646065101,
-                 -0.34799111860047199],
-                [-0.122863949389777,
-                 0.053137636788516802,
-                 -0.27314504197534301],
-                [0.138027624345606,
-                 0.0073448592675120598,
-                 -0.081938648726952001],
-                [0.39053197838237302,
-                 -0.24342866340538899,
-                 -0.28129243187282199],
-                [-0.45808678443245399,
-                 -0.25895561742666301,
-                 -0.25463137907529898],
-                [0.23102285643897699,
-                 -0.25783699179727099,
-                 0.086780301458403597],
-                [0.35540688846104002,
-                 0.14583660189636199,
-                 -0.142843849837899],
-                [-0.065052418610409599,
-                 -0.31940646106035597,
-                 -0.21566221160496901],
-                [-0.17865065412882,
-                 -0.083612956592043194,
-                 0.096749032329926599],
-                [0.0126510452153425,
-                 0.27896063239418101,
-                 0.15830367371877699],
-                [-0.457382782386756,
-                 -0.36205443810798499,
-                 -0.0237157888006631],
-                [-0.055427311998770899,
-                 0.45834946506408603,
-                 -0.20836405653505899],
-                [-0.063876300000686698,
-                 -0.41105127254854001,
-                 -0.0132770313096762],
-                [-0.34137497321461802,
-                 0.145358665232317,
-                 -0.086644883031134295],
-                [0.59660778909768297,
-                 -0.281733562310855,
-                 -0.077482724301076306],
-                [0.69173147105180999,
-                 -0.424495189591718,
-                 -0.0096695019471226204],
-                [0.010782830220030201,
-                 0.77406860420967905,
-                 -0.063167453964314099],
-                [0.18339835796290599,
-                 0.50965017378072597,
-                 -0.104199760560026],
-                [-0.15668321006897401,
-                 0.58716277773025205,
-                 -0.075580045478616895],
-                [-0.72154751951562701,
-                 -0.40692881343089798,
-                 -0.079991990410630001],
-                [0.56344181003998295,
-                 -0.087452874480389506,
-                 -0.37510692504863502],
-                [-0.60381753177294095,
-                 -0.16050111666761999,
-                 -0.12992270317055499],
-                [0.44246171554796299,
-                 -0.465894984005083,
-                 -0.18927283103315801],
-                [0.53769545085447401,
-                 -0.48229190516123199,
-                 -0.39106124961710897],
-                [0.58016749514138199,
-                 -0.0263048745975854,
-                 -0.19077652738217399],
-                [0.141863444388837, 0.70931340080506, -0.34771345294203299],
-                [0.038020528051081699,
-                 -0.49813195731097998,
-                 -0.34745435317620199],
-                [-0.67665463382767999,
-                 -0.160810255413913,
-                 -0.36064795881809902],
-                [-0.14837794287408099,
-                 0.74765781148175803,
-                 -0.34404996864916798],
-                [0.75885389849878404,
-                 -0.28638649562902802,
-                 -0.347456341168422],
-                [-0.40093327041092203,
-                 0.31849093413507201,
-                 -0.32768924366832197],
-                [0.42940222817735202,
-                 0.33424512668300399,
-                 -0.35423809177187199],
-                [-0.49118202183870102,
-                 -0.52599068171214802,
-                 -0.30400191294550899],
-                [-0.82304366968193998,
-                 -0.47522987588928001,
-                 -0.34407059570463899],
-                [0.83073852724424502,
-                 -0.48944845564165201,
-                 -0.329816063460246],
-                [0.0028477563544348,
-                 0.98002935469286501,
-                 -0.33780121130847701]],
-     'weights': [0.0055155834438197996,
-                 0.0066879933117571302,
-                 0.0066993937222265603,
-                 0.0067880235466602802,
-                 0.011089825801141,
-                 0.0118538505140399,
-                 0.0074294681632117703,
-                 0.0092634392864162501,
-                 0.0092201091681794398,
-                 0.0134505343605042,
-                 0.0140436576643744,
-                 0.0109601109221468,
-                 0.012526396997327501,
-                 0.0142541215309657,
-                 0.0148184854033573,
-                 0.0077294316331045498,
-                 0.024777486119469401,
-                 0.018751350466188199,
-                 0.024867143237505201,
-                 0.030773012597664299,
-                 0.0238461172482832,
-                 0.023940289342379899,
-                 0.033206076338579402,
-                 0.039480456443481797,
-                 0.030024041118345501,
-                 0.026518596053756002,
-                 0.036035185378760097,
-                 0.024184826266019501,
-                 0.0332617040610486,
-                 0.046293926997705299,
-                 0.042625700749514599,
-                 0.021693554480470102,
-                 0.033673869961857297,
-                 0.0155331473891789,
-                 0.031226848432236099,
-                 0.021100736704114002,
-                 0.0040514480893690903,
-                 0.0122447617845554,
-                 0.0201330268431642,
-                 0.0122331907698306,
-                 0.0066437610102138599,
-                 0.0097217621043499299,
-                 0.012895021207030099,
-                 0.0145039223723267,
-                 0.0067316940016880298,
-                 0.0066295044178633997,
-                 0.0123374761221794,
-                 0.012514768066076499,
-                 0.0086410281437404902,
-                 0.0086234695411917597,
-                 0.0051351628275419399,
-                 0.0124744034495474,
-                 0.0062236150004220097,
-                 0.0078217660883116193,
-                 0.00756246981707266,
-                 0.0063558532704335704,
-                 0.0051864417993646404]}}
-
-
-tetrahedron_table = dict(
-    (order, dict((name, numpy.array(ary)) for name, ary in rule.iteritems()))
-    for order, rule in tetrahedron_table.iteritems())
-
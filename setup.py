@@ -136,6 +136,7 @@ def main():
                     "hedge.discretization",
                     "hedge.tools",
                     ],
+            package_data={"hedge": ["quad_data.npz"]},
 
             ext_package="hedge",
 
@@ -150,6 +151,7 @@ def main():
                 "pymbolic>=0.90",
                 "meshpy>=0.91",
                 "decorator>=3.2.0",
+                "scipy",
                 "pytest>=2"
                 ],
             extras_require = {
@@ -0,0 +1,107 @@
+"""This benchmark compares classical, pipelined and p-multigrid
+preconditioned conjugate gradients on
+:class:`hedge.models.poisson.BoundPoissonOperator`.
+
+Run it under MPI (e.g. ``mpirun -np 4 python cg_performance_test.py``)
+to see the effect of overlapping the reductions with operator
+application.
+"""
+
+from __future__ import division
+import numpy
+
+
+
+
+class CountingOperator(object):
+    def __init__(self, sub_op):
+        self.sub_op = sub_op
+        self.count = 0
+
+    @property
+    def dtype(self):
+        return self.sub_op.dtype
+
+    @property
+    def shape(self):
+        return self.sub_op.shape
+
+    def __call__(self, operand):
+        self.count += 1
+        return self.sub_op(operand)
+
+
+
+
+def main():
+    from time import time
+    from hedge.backends import guess_run_context
+    rcon = guess_run_context()
+
+    if rcon.is_head_rank:
+        from hedge.mesh.generator import make_disk_mesh
+        mesh = make_disk_mesh(r=0.5, max_area=2e-3)
+        mesh_data = rcon.distribute_mesh(mesh)
+    else:
+        mesh_data = rcon.receive_mesh()
+
+    from hedge.data import ConstantGivenFunction
+    from hedge.models.poisson import PoissonOperator
+    from hedge.mesh import TAG_ALL, TAG_NONE
+    from hedge.iterative import parallel_cg, parallel_pipelined_cg
+
+    for order in [2, 4, 6]:
+        discr = rcon.make_discretization(mesh_data, order=order)
+
+        op = PoissonOperator(discr.dimensions,
+                dirichlet_tag=TAG_ALL,
+                dirichlet_bc=ConstantGivenFunction(0),
+                neumann_tag=TAG_NONE)
+        bound_op = op.bind(discr)
+
+        def rhs_c(x, el):
+            return numpy.exp(-10*numpy.dot(x, x))
+
+        rhs = bound_op.prepare_rhs(discr.interpolate_volume_function(rhs_c))
+
+        mg = bound_op.multigrid_preconditioner(
+                make_discretization=lambda order:
+                rcon.make_discretization(mesh_data, order=order))
+
+        results = {}
+        for name, solve, kwargs in [
+                ("classical", parallel_cg,
+                    dict(dot=discr.nodewise_dot_product)),
+                ("pipelined", parallel_pipelined_cg,
+                    dict(dot_products_async=
+                        discr.nodewise_dot_products_async)),
+                ("p-multigrid", parallel_cg,
+                    dict(dot=discr.nodewise_dot_product, precon=mg)),
+                ]:
+            counting_op = CountingOperator(-bound_op)
+
+            start = time()
+            u = -solve(rcon, counting_op, rhs, tol=1e-8,
+                    x=discr.volume_zeros(), **kwargs)
+            elapsed = time()-start
+            results[name] = u
+
+            if rcon.is_head_rank:
+                print "order %d, %s: %d operator applications, %g s, " \
+                        "%g s/application" % (
+                                order, name, counting_op.count, elapsed,
+                                elapsed/counting_op.count)
+
+        if rcon.is_head_rank:
+            print "order %d: relative difference %g" % (order,
+                    discr.norm(results["classical"]-results["pipelined"])
+                    / discr.norm(results["classical"]))
+
+        mg.close()
+        discr.close()
+
+
+
+
+if __name__ == "__main__":
+    main()
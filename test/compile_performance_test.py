@@ -0,0 +1,117 @@
+"""This benchmark measures the time taken to compile the operators in
+:mod:`hedge.models` for the JIT backend, split into the preprocessing of
+the operator template, the :mod:`hedge.compiler` pass that turns it into
+instructions (including assignment aggregation), and the dynamic
+scheduling of the resulting instruction stream.
+
+Compile time is paid by every run, and grows with the number of boundary
+tags and the complexity of the operator, so watch the Navier-Stokes
+numbers in particular.
+"""
+
+from __future__ import division
+import numpy
+
+
+
+
+def get_models():
+    from hedge.models.advection import StrongAdvectionOperator
+    from hedge.models.wave import StrongWaveOperator
+    from hedge.models.em import TEMaxwellOperator
+    from hedge.models.gas_dynamics import GasDynamicsOperator, GammaLawEOS
+    from hedge.data import make_tdep_constant
+    from hedge.mesh import TAG_ALL
+
+    yield "advection", StrongAdvectionOperator(numpy.array([1, 0.5]),
+            inflow_u=make_tdep_constant(0), flux_type="upwind")
+    yield "wave", StrongWaveOperator(1, 2, flux_type="upwind")
+    yield "te maxwell", TEMaxwellOperator(epsilon=1, mu=1,
+            flux_type=1, pec_tag=TAG_ALL)
+
+    for av_mode in [None, "cns"]:
+        yield "navier-stokes, av=%s" % av_mode, GasDynamicsOperator(
+                dimensions=2, mu=1e-3, prandtl=0.72,
+                equation_of_state=GammaLawEOS(1.4),
+                inflow_tag="inflow", outflow_tag="outflow",
+                noslip_tag="noslip", wall_tag="wall",
+                artificial_viscosity_mode=av_mode)
+
+
+
+
+def time_schedule(code):
+    """Run the dynamic scheduler over *code* without executing any
+    instructions.
+    """
+    from hedge.compiler import Code
+
+    insn_dep_names, name_to_consumers, result_names = \
+            code.get_dependency_graph()
+    assigned_names = set()
+    for insn in code.instructions:
+        assigned_names |= insn.get_assignees()
+
+    from time import time
+    start = time()
+
+    scheduler = Code.DynamicScheduler(code,
+            set(name_to_consumers) - assigned_names)
+    while True:
+        try:
+            insn, discardable_vars = scheduler.get_next_step()
+        except Code.NoInstructionAvailable:
+            break
+
+        scheduler.add_available_names(insn.get_assignees())
+
+    return time()-start
+
+
+
+
+def main():
+    from time import time
+    from hedge.backends.jit import Discretization
+    from hedge.mesh.generator import make_regular_rect_mesh
+    from hedge.optemplate import process_optemplate
+    from hedge.backends.jit.compiler import OperatorCompiler
+
+    def boundary_tagger(fvi, el, fn, all_v):
+        x, y = sum(all_v[i] for i in fvi)/len(fvi)
+        if abs(x) < 1e-10:
+            return ["inflow"]
+        elif abs(x-1) < 1e-10:
+            return ["outflow"]
+        elif abs(y) < 1e-10:
+            return ["noslip"]
+        else:
+            return ["wall"]
+
+    mesh = make_regular_rect_mesh(n=(10, 10),
+            boundary_tagger=boundary_tagger)
+    discr = Discretization(mesh, order=3)
+
+    for name, op in get_models():
+        start = time()
+        optemplate = process_optemplate(op.op_template(), mesh=discr.mesh)
+        preprocess_time = time()-start
+
+        start = time()
+        code = OperatorCompiler(discr)(optemplate)
+        compile_time = time()-start
+
+        schedule_time = time_schedule(code)
+
+        print "%-25s %4d insns: preprocess %.3f s, compile %.3f s, " \
+                "schedule %.3f s" % (
+                        name, len(code.instructions),
+                        preprocess_time, compile_time, schedule_time)
+
+    discr.close()
+
+
+
+
+if __name__ == "__main__":
+    main()
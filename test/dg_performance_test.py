@@ -0,0 +1,386 @@
+"""This benchmark tracks the performance of the JIT backend, both kernel by
+kernel and end to end. It measures
+
+- differentiation, lift, flux gather, element-local operators and vector
+  expressions, as seen while evaluating the right-hand sides below,
+- the vector algebra of the Adams-Bashforth and low-storage Runge-Kutta
+  time steppers,
+- mesh construction, discretization setup and operator compilation,
+- the right-hand side rate of the wave, Maxwell, advection and Euler
+  operators,
+
+across dimensions and orders, and reports DOFs per second and the achieved
+memory bandwidth. Byte counts are lower-bound estimates of the memory
+traffic (see :mod:`hedge.tools.flops`), so the bandwidths shown are lower
+bounds as well.
+
+With ``--output``, one JSON record per measurement is appended to the given
+file, so that the results of successive runs can be compared to track
+regressions. Run with ``--help`` for the available options.
+"""
+
+from __future__ import division
+import numpy
+
+
+
+
+# {{{ recording of results
+
+class BenchmarkRecorder(object):
+    def __init__(self, output=None):
+        self.output = output
+
+        import socket
+        from time import time
+        self.run_info = dict(
+                machine=socket.gethostname(),
+                timestamp=time(),
+                numpy_version=numpy.__version__)
+
+    def __call__(self, benchmark, name, seconds, count=1,
+            dimensions=None, order=None, elements=None, dofs=None,
+            flops=None, byte_count=None):
+        """Record *count* repetitions of an operation on *dofs* degrees of
+        freedom (or *elements* elements, if *dofs* is not given) that took
+        *seconds* in total.
+        """
+
+        def rate(amount):
+            if amount is None or not seconds:
+                return None
+            else:
+                return amount*count/seconds
+
+        record = dict(self.run_info,
+                benchmark=benchmark, name=name,
+                dimensions=dimensions, order=order,
+                elements=elements, dofs=dofs,
+                count=count, seconds=seconds,
+                dofs_per_second=rate(dofs),
+                elements_per_second=rate(elements),
+                flops_per_second=None,
+                bytes_per_second=None)
+
+        # flops and byte_count are totals over all repetitions
+        if flops is not None and seconds:
+            record["flops_per_second"] = flops/seconds
+        if byte_count is not None and seconds:
+            record["bytes_per_second"] = byte_count/seconds
+
+        line = "%-14s %-22s" % (benchmark, name)
+        if dimensions is not None:
+            line += " %dD" % dimensions
+        if order is not None:
+            line += " N=%d" % order
+        line += " %9.3g s" % (seconds/count)
+        if record["dofs_per_second"] is not None:
+            line += " %9.3g DOF/s" % record["dofs_per_second"]
+        elif record["elements_per_second"] is not None:
+            line += " %9.3g el/s" % record["elements_per_second"]
+        if record["flops_per_second"] is not None:
+            line += " %7.3f GFlop/s" % (record["flops_per_second"]/1e9)
+        if record["bytes_per_second"] is not None:
+            line += " %7.3f GB/s" % (record["bytes_per_second"]/1e9)
+        print line
+
+        if self.output is not None:
+            import json
+            outf = open(self.output, "a")
+            try:
+                outf.write(json.dumps(record, sort_keys=True)+"\n")
+            finally:
+                outf.close()
+
+# }}}
+
+
+
+
+# {{{ setup
+
+def make_mesh(dimensions, element_count):
+    """Return a mesh of the unit square or cube with about *element_count*
+    elements.
+    """
+    if dimensions == 2:
+        from hedge.mesh.generator import make_regular_rect_mesh
+        # two triangles per cell
+        n = int(round((element_count/2)**(1/2)))+1
+        return make_regular_rect_mesh(n=(n, n))
+    elif dimensions == 3:
+        from hedge.mesh.generator import make_box_mesh
+        return make_box_mesh(max_volume=1/element_count)
+    else:
+        raise ValueError("unsupported number of dimensions: %d" % dimensions)
+
+
+
+
+def make_discretization(mesh, order):
+    from hedge.backends.jit import Discretization
+    return Discretization(mesh, order=order,
+            quad_min_degrees={
+                "gasdyn_vol": 3*order,
+                "gasdyn_face": 3*order,
+                },
+            debug=Discretization.noninteractive_debug_flags())
+
+
+
+
+def get_models(dimensions):
+    """Yield tuples *(name, operator, make_state)*, where *make_state(discr)*
+    returns a valid state to evaluate the right-hand side of *operator* at.
+    """
+    from hedge.models.wave import StrongWaveOperator
+    from hedge.models.em import MaxwellOperator, TEMaxwellOperator
+    from hedge.models.advection import StrongAdvectionOperator
+    from hedge.models.gas_dynamics import GasDynamicsOperator, GammaLawEOS
+    from hedge.data import make_tdep_constant
+    from hedge.mesh import TAG_ALL, TAG_NONE
+    from hedge.tools import join_fields
+
+    def make_linear_state(field_count):
+        def make_state(discr):
+            from math import pi
+            x = discr.nodes[:, 0].copy()
+            return join_fields(*[numpy.sin(pi*(i+1)*x)
+                for i in range(field_count)])
+
+        return make_state
+
+    yield ("wave", StrongWaveOperator(-1, dimensions, flux_type="upwind"),
+            make_linear_state(dimensions+1))
+
+    if dimensions == 2:
+        maxwell_op = TEMaxwellOperator(epsilon=1, mu=1,
+                flux_type=1, pec_tag=TAG_ALL)
+    else:
+        maxwell_op = MaxwellOperator(epsilon=1, mu=1,
+                flux_type=1, pec_tag=TAG_ALL)
+
+    from hedge.tools import count_subset
+    yield ("maxwell", maxwell_op,
+            make_linear_state(count_subset(maxwell_op.get_eh_subset())))
+
+    yield ("advection", StrongAdvectionOperator(
+            numpy.array([1, 0.5, 0.25][:dimensions]),
+            inflow_tag=TAG_ALL, outflow_tag=TAG_NONE,
+            inflow_u=make_tdep_constant(0), flux_type="upwind"),
+            make_linear_state(1))
+
+    def make_gas_state(discr):
+        # fluid at rest with rho=1, p=1
+        gamma = 1.4
+        return join_fields(
+                discr.volume_zeros()+1,
+                discr.volume_zeros()+1/(gamma-1),
+                [discr.volume_zeros() for i in range(dimensions)])
+
+    yield ("euler", GasDynamicsOperator(dimensions, mu=0,
+            equation_of_state=GammaLawEOS(1.4),
+            inflow_tag=TAG_ALL),
+            make_gas_state)
+
+
+
+
+def bind_rhs(op, discr):
+    from hedge.models.gas_dynamics import GasDynamicsOperator
+
+    rhs = op.bind(discr)
+    if isinstance(op, GasDynamicsOperator):
+        # also returns the maximal characteristic speed
+        def rhs_only(t, q):
+            ode_rhs, speed = rhs(t, q)
+            return ode_rhs
+
+        return rhs_only
+    else:
+        return rhs
+
+# }}}
+
+
+
+
+# {{{ benchmarks
+
+def time_setup(record, dimensions, order, element_count):
+    from time import time
+
+    start = time()
+    mesh = make_mesh(dimensions, element_count)
+    record("setup", "mesh", time()-start, dimensions=dimensions,
+            elements=len(mesh.elements))
+
+    start = time()
+    discr = make_discretization(mesh, order)
+    record("setup", "discretization", time()-start,
+            dimensions=dimensions, order=order,
+            elements=len(mesh.elements), dofs=len(discr))
+
+    return discr
+
+
+
+
+def time_rhs(record, discr, order, rhs_count):
+    """Time compilation and evaluation of each model's right-hand side, and
+    the kernels executed during evaluation.
+    """
+    from time import time
+    from pytools.log import LogManager
+    from hedge.log import KERNEL_CLASSES
+
+    dimensions = discr.dimensions
+    element_count = len(discr.mesh.elements)
+
+    logmgr = LogManager(None, "w")
+    discr.add_instrumentation(logmgr)
+
+    def last_value(name):
+        description, unit, table = logmgr.get_expr_dataset(name)
+        return table[-1][1]
+
+    for name, op, make_state in get_models(dimensions):
+        start = time()
+        rhs = bind_rhs(op, discr)
+        record("compile", name, time()-start,
+                dimensions=dimensions, order=order)
+
+        state = make_state(discr)
+        dofs = len(discr)*len(state)
+
+        # warm up caches and allocator, in a tick of its own so that the
+        # kernel timers are reset afterwards
+        logmgr.tick_before()
+        rhs(0, state)
+        logmgr.tick_after()
+
+        logmgr.tick_before()
+        start = time()
+        for i in xrange(rhs_count):
+            rhs(0, state)
+        elapsed = time()-start
+        logmgr.tick_after()
+
+        kernel_flops = 0
+        kernel_bytes = 0
+        for kc in KERNEL_CLASSES:
+            flops = last_value("n_flops_%s" % kc)
+            byte_count = last_value("n_bytes_%s" % kc)
+            kernel_flops += flops
+            kernel_bytes += byte_count
+
+            record("kernel", "%s/%s" % (kc, name),
+                    last_value("t_%s" % kc), count=rhs_count,
+                    dimensions=dimensions, order=order,
+                    elements=element_count, dofs=dofs,
+                    flops=flops, byte_count=byte_count)
+
+        record("rhs", name, elapsed, count=rhs_count,
+                dimensions=dimensions, order=order,
+                elements=element_count, dofs=dofs,
+                flops=kernel_flops, byte_count=kernel_bytes)
+
+        del rhs
+
+    logmgr.close()
+
+
+
+
+def time_timestep_algebra(record, discr, order, step_count,
+        field_count=3):
+    """Time the vector algebra of the time steppers, with a right-hand side
+    that costs nothing.
+    """
+    from hedge.timestep.ab import AdamsBashforthTimeStepper
+    from hedge.timestep.runge_kutta import LSRK4TimeStepper
+    from hedge.tools import join_fields
+
+    dimensions = discr.dimensions
+    scalar_size = numpy.dtype(discr.default_scalar_type).itemsize
+    dof_count = len(discr)*field_count
+
+    state = join_fields(*[discr.volume_zeros()+1 for i in range(field_count)])
+    rhs_value = join_fields(*[discr.volume_zeros()+1e-3
+        for i in range(field_count)])
+
+    def rhs(t, y):
+        return rhs_value
+
+    ab_order = 3
+
+    # The number of vectors read and written per step by each stepper,
+    # assuming perfectly fused linear combinations: RK4 has 5 stages of two
+    # three-vector linear combinations, AB combines its history with
+    # the current state.
+    for name, stepper, vectors_per_step in [
+            ("lsrk4", LSRK4TimeStepper(
+                vector_primitive_factory=discr.get_vector_primitive_factory()),
+                5*2*3),
+            ("ab%d" % ab_order, AdamsBashforthTimeStepper(ab_order),
+                ab_order+2),
+            ]:
+        y = state
+        # fill history and warm up
+        for i in xrange(ab_order):
+            y = stepper(y, 0, 1e-3, rhs)
+
+        stepper.timer.elapsed = 0
+        stepper.flop_counter.events = 0
+
+        for i in xrange(step_count):
+            y = stepper(y, 0, 1e-3, rhs)
+
+        record("timestep", name, stepper.timer.elapsed, count=step_count,
+                dimensions=dimensions, order=order,
+                elements=len(discr.mesh.elements), dofs=dof_count,
+                flops=stepper.flop_counter.events,
+                byte_count=step_count*vectors_per_step*dof_count*scalar_size)
+
+# }}}
+
+
+
+
+def main():
+    from optparse import OptionParser
+
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option("--dimensions", default="2,3",
+            help="comma-separated list of dimensions [default: %default]")
+    parser.add_option("--orders", default="1,3,5",
+            help="comma-separated list of orders [default: %default]")
+    parser.add_option("--elements", type="int", default=2000,
+            help="approximate number of elements [default: %default]")
+    parser.add_option("--rhs-count", type="int", default=10,
+            help="right-hand side evaluations per model [default: %default]")
+    parser.add_option("--step-count", type="int", default=20,
+            help="time steps per stepper [default: %default]")
+    parser.add_option("--output", metavar="FILE",
+            help="append JSON records of the results to FILE")
+    options, args = parser.parse_args()
+
+    record = BenchmarkRecorder(options.output)
+
+    for dimensions in [int(d) for d in options.dimensions.split(",")]:
+        for order in [int(o) for o in options.orders.split(",")]:
+            discr = time_setup(record, dimensions, order, options.elements)
+            time_rhs(record, discr, order, options.rhs_count)
+            time_timestep_algebra(record, discr, order, options.step_count)
+            discr.close()
+
+
+
+
+if __name__ == "__main__":
+    main()
+
+
+
+
+# vim: foldmethod=marker
@@ -0,0 +1,56 @@
+"""This benchmark measures the time taken by ``import hedge`` (and a few
+other common imports) in a fresh interpreter, as well as the time to
+look up quadrature rules.
+
+Startup cost is paid by every short job and every test process, so
+watch these numbers when adding module-level imports.
+"""
+
+from __future__ import division
+import sys
+
+
+
+
+def time_import(statement, repeat=10):
+    from subprocess import Popen, PIPE
+    timings = []
+    for i in xrange(repeat):
+        proc = Popen([sys.executable, "-c",
+            "from time import time; start = time(); %s; "
+            "print time()-start" % statement], stdout=PIPE)
+        timings.append(float(proc.communicate()[0]))
+
+    timings.sort()
+    return timings[0], timings[len(timings)//2]
+
+
+
+
+def main():
+    for statement in [
+            "import numpy",
+            "import hedge",
+            "import hedge.mesh",
+            "import hedge.backends",
+            "from hedge.backends import guess_run_context",
+            "import hedge.mesh.generator",
+            "import hedge.backends.jit",
+            ]:
+        best, median = time_import(statement)
+        print "%-45s best %.3f s, median %.3f s" % (statement, best, median)
+
+    from time import time
+    from hedge.quadrature import XiaoGimbutasSimplexCubature
+    for dim in [2, 3]:
+        start = time()
+        for order in xrange(1, 9+1):
+            XiaoGimbutasSimplexCubature(order, dim)
+        print "XG cubatures of orders 1..9 in %dD: %.3f s" % (
+                dim, time()-start)
+
+
+
+
+if __name__ == "__main__":
+    main()
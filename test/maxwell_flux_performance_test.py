@@ -0,0 +1,78 @@
+"""This benchmark measures the flux gather time of the JIT backend for
+:class:`hedge.models.em.MaxwellOperator` in 3D.
+
+Flux gathers stream through the structure-of-arrays face data of
+:meth:`hedge.discretization.data.StraightFaceGroup.get_flat_face_data`.
+To compare against another face data layout, run this script on both
+revisions and compare the reported times per face node.
+"""
+
+from __future__ import division
+import numpy
+
+
+
+
+def main():
+    from time import time
+    from hedge.backends import guess_run_context
+    rcon = guess_run_context()
+
+    if rcon.is_head_rank:
+        from hedge.mesh.generator import make_box_mesh
+        mesh = make_box_mesh(max_volume=0.0005)
+        mesh_data = rcon.distribute_mesh(mesh)
+    else:
+        mesh_data = rcon.receive_mesh()
+
+    from hedge.models.em import MaxwellOperator
+    from hedge.mesh import TAG_ALL
+    from pytools.log import LogManager
+
+    op = MaxwellOperator(epsilon=1, mu=1, flux_type=1, pec_tag=TAG_ALL)
+
+    for order in [2, 3, 4, 5]:
+        discr = rcon.make_discretization(mesh_data, order=order)
+
+        logmgr = LogManager(None, "w", rcon.communicator)
+        discr.add_instrumentation(logmgr)
+
+        start = time()
+        for fg in discr.face_groups:
+            fg.get_flat_face_data()
+        setup_time = time()-start
+
+        rhs = op.bind(discr)
+        from hedge.tools import to_obj_array
+        fields = to_obj_array(numpy.random.randn(6, len(discr.nodes)))
+
+        # compile and warm up
+        rhs(0, fields)
+        discr.gather_timer.elapsed = 0
+
+        rhs_count = 20
+        start = time()
+        for i in xrange(rhs_count):
+            rhs(0, fields)
+        elapsed = time()-start
+
+        face_node_count = sum(
+                len(fg.face_pairs)*fg.face_length()
+                for fg in discr.face_groups)
+
+        if rcon.is_head_rank:
+            print "order %d: %d elements, face data setup %.3f s" % (
+                    order, len(discr.mesh.elements), setup_time)
+            print "    rhs: %g s, gather: %g s, gather per face node: %g s" % (
+                    elapsed/rhs_count,
+                    discr.gather_timer.elapsed/rhs_count,
+                    discr.gather_timer.elapsed/rhs_count/face_node_count)
+
+        logmgr.close()
+        discr.close()
+
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""This benchmark compares element orderings (see
+:meth:`hedge.mesh.ConformalMesh.reordered_by`) by the locality of face
+neighbors and by the resulting flux gather time of the JIT backend for
+:class:`hedge.models.em.MaxwellOperator` in 3D.
+
+The locality metric is the mean distance between the numbers of two
+elements sharing a face, see
+:func:`hedge.mesh.tools.average_face_neighbor_distance`.
+"""
+
+from __future__ import division
+import numpy
+
+
+
+
+def main():
+    from time import time
+    from pytools.log import LogManager
+    from hedge.backends.jit import Discretization
+    from hedge.mesh.generator import make_box_mesh
+    from hedge.mesh.tools import average_face_neighbor_distance
+    from hedge.models.em import MaxwellOperator
+    from hedge.mesh import TAG_ALL
+
+    mesh = make_box_mesh(max_volume=0.0002)
+
+    # undo any locality the mesh generator may have produced
+    shuffled = mesh.reordered(
+            numpy.random.RandomState(17).permutation(len(mesh.elements)))
+
+    op = MaxwellOperator(epsilon=1, mu=1, flux_type=1, pec_tag=TAG_ALL)
+
+    for method in [None, "cuthill", "rcm", "hilbert", "morton"]:
+        start = time()
+        if method is None:
+            reordered = shuffled
+        else:
+            reordered = shuffled.reordered_by(method)
+        reorder_time = time()-start
+
+        discr = Discretization(reordered, order=3)
+
+        # the kernel timers only exist in instrumented discretizations
+        logmgr = LogManager(None, "w")
+        discr.add_instrumentation(logmgr)
+
+        rhs = op.bind(discr)
+        from hedge.tools import to_obj_array
+        fields = to_obj_array(numpy.random.randn(6, len(discr.nodes)))
+
+        # compile and warm up, in a tick of its own so that the timers
+        # are reset afterwards
+        logmgr.tick_before()
+        rhs(0, fields)
+        logmgr.tick_after()
+
+        rhs_count = 20
+        logmgr.tick_before()
+        start = time()
+        for i in xrange(rhs_count):
+            rhs(0, fields)
+        elapsed = time()-start
+        logmgr.tick_after()
+
+        description, unit, table = logmgr.get_expr_dataset("t_gather")
+        gather_time = table[-1][1]
+
+        print "%-8s: neighbor distance %8.1f, reordering %.3f s" % (
+                method or "random",
+                average_face_neighbor_distance(reordered),
+                reorder_time)
+        print "    rhs: %g s, gather: %g s" % (
+                elapsed/rhs_count,
+                gather_time/rhs_count)
+
+        logmgr.close()
+        discr.close()
+
+
+
+
+if __name__ == "__main__":
+    main()
@@ -320,6 +320,101 @@ def test_imex_timestep_accuracy():
 
 
 
+def test_newton_krylov_imex():
+    """Check the matrix-free implicit stage solver against a direct solve"""
+    from hedge.iterative import gmres
+    from hedge.timestep.imex_rk import (
+            KennedyCarpenterIMEXARK4, NewtonKrylovImplicitRHS)
+
+    # gmres on a nonsymmetric system
+    n = 40
+    a = numpy.eye(n)*4 + numpy.diag(numpy.ones(n-1), 1) \
+            - 2*numpy.diag(numpy.ones(n-1), -1)
+    b = numpy.sin(numpy.arange(n))
+
+    class MatrixOperator:
+        dtype = numpy.float64
+        shape = a.shape
+
+        def __call__(self, x):
+            return numpy.dot(a, x)
+
+    x = gmres(MatrixOperator(), b, tol=1e-12, restart=10)
+    assert la.norm(numpy.dot(a, x) - b) < 1e-10*la.norm(b)
+
+    # stiff, mildly nonlinear implicit part
+    lap = (numpy.diag(-2*numpy.ones(n))
+            + numpy.diag(numpy.ones(n-1), 1)
+            + numpy.diag(numpy.ones(n-1), -1)) * n**2
+
+    def rhs_expl(t, y):
+        return -numpy.cos(t)*y
+
+    def rhs_impl_f(t, y):
+        return numpy.dot(lap, y) - y**3
+
+    def rhs_impl_newton(t, y0, alpha):
+        # reference: plain Newton with the exact Jacobian
+        k = rhs_impl_f(t, y0)
+        for i in range(30):
+            y = y0 + alpha*k
+            res = k - rhs_impl_f(t, y)
+            jac = numpy.eye(n) - alpha*(lap - numpy.diag(3*y**2))
+            k = k - la.solve(jac, res)
+        return k
+
+    def integrate(rhs_impl):
+        stepper = KennedyCarpenterIMEXARK4()
+        y = numpy.sin(numpy.pi*numpy.linspace(0, 1, n+2)[1:-1])
+        t = 0
+        dt = 1e-3
+        for i in range(20):
+            y = stepper(y, t, dt, rhs_expl, rhs_impl)
+            t += dt
+        return y
+
+    y_ref = integrate(rhs_impl_newton)
+    y_nk = integrate(NewtonKrylovImplicitRHS(rhs_impl_f, tol=1e-10))
+
+    assert la.norm(y_nk-y_ref) < 1e-7*la.norm(y_ref)
+
+
+
+
+def test_pipelined_cg():
+    """Check pipelined CG against classical CG"""
+    from hedge.iterative import (
+            OperatorBase, DiagonalPreconditioner,
+            CGStateContainer, PipelinedCGStateContainer)
+
+    n = 100
+    rng = numpy.random.RandomState(17)
+    b_mat = rng.rand(n, n)
+    a = numpy.dot(b_mat, b_mat.T) + n*numpy.diag(rng.rand(n)+0.1)
+    rhs = rng.rand(n)
+
+    class MatrixOperator(OperatorBase):
+        dtype = numpy.dtype(numpy.float64)
+        shape = a.shape
+
+        def __call__(self, x):
+            return numpy.dot(a, x)
+
+    for precon in [None, DiagonalPreconditioner(1/numpy.diag(a))]:
+        cg = CGStateContainer(MatrixOperator(), precon)
+        cg.reset(rhs)
+        x_cg = cg.run(tol=1e-10)
+
+        pcg = PipelinedCGStateContainer(MatrixOperator(), precon)
+        pcg.reset(rhs)
+        x_pcg = pcg.run(tol=1e-10)
+
+        assert la.norm(x_pcg-x_cg) < 1e-8*la.norm(x_cg)
+        assert la.norm(numpy.dot(a, x_pcg)-rhs) < 1e-8*la.norm(rhs)
+
+
+
+
 def test_adaptive_timestep():
     class VanDerPolOscillator:
         def __init__(self, mu=30):
@@ -672,6 +767,92 @@ def test_simp_basis_grad():
 
 
 
+def test_simplex_vandermonde():
+    """Check array-based Vandermonde matrices against the basis
+    function objects."""
+    from hedge.discretization.local import \
+            IntervalDiscretization, \
+            TriangleDiscretization, \
+            TetrahedronDiscretization
+    from hedge.polynomial import \
+            generic_vandermonde, generic_multi_vandermonde
+
+    for el in [
+            IntervalDiscretization(7),
+            TriangleDiscretization(8),
+            TetrahedronDiscretization(6)]:
+        points = list(el.unit_nodes()) \
+                + list(el.get_quadrature_info(2*el.order).volume_nodes)
+
+        vdm = el.vandermonde_at(points)
+        ref_vdm = generic_vandermonde(points, el.basis_functions())
+        assert la.norm(vdm - ref_vdm) < 1e-12*la.norm(ref_vdm)
+
+        for grad_vdm, ref_grad_vdm in zip(
+                el.grad_vandermonde_at(points),
+                generic_multi_vandermonde(points, el.grad_basis_functions())):
+            assert la.norm(grad_vdm - ref_grad_vdm) \
+                    < 1e-12*la.norm(ref_grad_vdm)
+
+        face_points = el.unit_face_nodes()
+        face_vdm = el.face_vandermonde_at(face_points)
+        ref_face_vdm = generic_vandermonde(face_points, el.face_basis())
+        assert la.norm(face_vdm - ref_face_vdm) < 1e-12*la.norm(ref_face_vdm)
+
+
+
+
+def test_reference_matrix_cache():
+    """Check that reference matrices loaded from the on-disk cache match
+    freshly computed ones."""
+    import os
+    from tempfile import mkdtemp
+    from shutil import rmtree
+    from hedge.discretization.local import \
+            TriangleDiscretization, TetrahedronDiscretization
+
+    saved_environ = os.environ.copy()
+    cache_dir = mkdtemp()
+    try:
+        # the cache is off unless a directory is given
+        os.environ.pop("HEDGE_MATRIX_CACHE_DIR", None)
+        refs = [TriangleDiscretization(5), TetrahedronDiscretization(3)]
+
+        os.environ["HEDGE_MATRIX_CACHE_DIR"] = cache_dir
+
+        for ref in refs:
+            for i in range(2):
+                # the first instance fills the cache, the second reads it
+                ldis = type(ref)(ref.order)
+                assert la.norm(ldis.lifting_matrix()
+                        - ref.lifting_matrix()) == 0
+                for dmat, ref_dmat in zip(
+                        ldis.differentiation_matrices(),
+                        ref.differentiation_matrices()):
+                    assert la.norm(dmat - ref_dmat) == 0
+
+                qinfo = ldis.get_quadrature_info(2*ldis.order)
+                ref_qinfo = ref.get_quadrature_info(2*ldis.order)
+                assert la.norm(qinfo.mass_matrix()
+                        - ref_qinfo.mass_matrix()) == 0
+
+                # callers may modify the matrices they get in place
+                assert ldis.unit_nodes()[0].flags.writeable
+                assert ldis.vandermonde().flags.writeable
+
+                if i == 1:
+                    # mapped from the cache, not read into private memory
+                    assert not ldis.vandermonde().flags.owndata
+
+        assert os.listdir(cache_dir)
+    finally:
+        os.environ.clear()
+        os.environ.update(saved_environ)
+        rmtree(cache_dir)
+
+
+
+
 def test_tri_face_node_distribution():
     """Test whether the nodes on the faces of the triangle are distributed
     according to the same proportions on each face.
@@ -895,6 +1076,186 @@ def test_simp_cubature():
 
 
 
+def test_lazy_import():
+    """Check that importing hedge does not pull in the mesh generators,
+    the compute backends or the quadrature tables"""
+    import sys
+    from subprocess import Popen, PIPE
+    proc = Popen([sys.executable, "-c",
+        "import sys, hedge, hedge.backends, hedge.mesh; "
+        "print ' '.join(sys.modules)"], stdout=PIPE)
+    modules = set(proc.communicate()[0].split())
+    assert proc.returncode == 0
+
+    for name in ["hedge.mesh.generator", "hedge.backends.jit",
+            "hedge.backends.mpi", "hedge.backends.cuda", "meshpy"]:
+        assert name not in modules
+
+    from hedge.quadrature import XiaoGimbutasSimplexCubature
+    from hedge.mesh import make_rect_mesh
+    assert make_rect_mesh.__name__ == "make_rect_mesh"
+    assert abs(sum(XiaoGimbutasSimplexCubature(4, 3).weights) - 4/3) < 1e-14
+
+
+
+
+def test_mesh_reordering():
+    """Check that mesh reorderings are permutations and improve locality"""
+    from hedge.mesh.generator import make_rect_mesh
+    from hedge.mesh.tools import average_face_neighbor_distance
+
+    mesh = make_rect_mesh(max_area=0.002)
+    el_count = len(mesh.elements)
+
+    from numpy.random import RandomState
+    shuffled = mesh.reordered(RandomState(17).permutation(el_count))
+    shuffled_distance = average_face_neighbor_distance(shuffled)
+
+    for method in ["cuthill", "rcm", "hilbert", "morton"]:
+        old_numbers = shuffled.get_reorder_oldnumbers(method)
+        assert sorted(old_numbers) == range(el_count)
+
+        reordered = shuffled.reordered_by(method)
+        assert len(reordered.interfaces) == len(mesh.interfaces)
+        assert (sorted(len(faces) for faces in reordered.tag_to_boundary.values())
+                == sorted(len(faces) for faces in mesh.tag_to_boundary.values()))
+
+        el_ids = reordered.interface_element_ids()
+        min_ids = numpy.min(el_ids, axis=1)
+        assert (numpy.diff(min_ids) >= 0).all()
+
+        assert (average_face_neighbor_distance(reordered)
+                < 0.3*shuffled_distance)
+
+
+
+
+def test_element_colors():
+    """Check that elements within the coloring distance get distinct colors"""
+    from hedge.mesh.generator import make_rect_mesh
+
+    mesh = make_rect_mesh(max_area=0.01)
+    adjacency = mesh.element_adjacency_graph()
+
+    for distance in [1, 2]:
+        colors = mesh.element_colors(distance)
+        assert len(colors) == len(mesh.elements)
+        assert (colors >= 0).all()
+
+        for el_id, nearby in enumerate(mesh.element_neighborhoods(distance)):
+            for nb in nearby:
+                if nb != el_id:
+                    assert colors[nb] != colors[el_id]
+
+    # no two face neighbors share a color
+    colors = mesh.element_colors()
+    for el_id, neighbors in adjacency.iteritems():
+        for nb in neighbors:
+            assert colors[nb] != colors[el_id]
+
+
+
+
+def test_async_visualizer():
+    """Check that the asynchronous visualizer writes snapshots of the
+    fields in order"""
+    from hedge.visualization import AsyncVisualizer
+    from hedge.tools import join_fields
+
+    written = []
+
+    class RecordingFile:
+        def __init__(self, pathname):
+            self.pathname = pathname
+            self.variables = []
+
+        def close(self):
+            written.append((self.pathname, self.variables))
+
+    class RecordingVisualizer:
+        def make_file(self, pathname):
+            return RecordingFile(pathname)
+
+        def add_data(self, visf, variables, time=None, step=None):
+            visf.variables.extend(variables)
+
+        def close(self):
+            pass
+
+    vis = AsyncVisualizer(RecordingVisualizer())
+
+    u = numpy.zeros(10)
+    for step in range(5):
+        u[:] = step
+        visf = vis.make_file("fld-%04d" % step)
+        vis.add_data(visf, [("u", u), ("v", join_fields(u, 2*u))],
+                time=0.1*step, step=step)
+        visf.close()
+
+    vis.close()
+
+    assert [pathname for pathname, variables in written] == [
+            "fld-%04d" % step for step in range(5)]
+    for step, (pathname, variables) in enumerate(written):
+        (u_name, u_snap), (v_name, v_snap) = variables
+        assert (u_snap == step).all()
+        assert (v_snap[1] == 2*step).all()
+
+
+
+
+def test_hardware_counters():
+    """Check the perf_event_open attribute layout and, where the hardware
+    counters are available, that they count"""
+    import struct
+    from hedge.tools.perf import (_make_perf_event_attr, HARDWARE_EVENTS,
+            PERF_TYPE_HARDWARE, PerfCounterSet, PerfCountersUnavailable)
+
+    config = HARDWARE_EVENTS["instructions"]
+    attr = _make_perf_event_attr(config)
+
+    # PERF_ATTR_SIZE_VER0
+    assert len(attr) == 64
+    assert struct.unpack("=IIQ", attr[:16]) == (PERF_TYPE_HARDWARE, 64, config)
+
+    read_format, flags = struct.unpack("=QQ", attr[32:48])
+    # total_time_enabled | total_time_running
+    assert read_format == 3
+    # exclude_kernel | exclude_hv, not disabled
+    assert flags == (1 << 5) | (1 << 6)
+
+    try:
+        counters = PerfCounterSet(["instructions", "cycles"])
+    except PerfCountersUnavailable:
+        # no access to the performance monitoring unit here
+        return
+
+    try:
+        before = counters.read()
+        sum(i*i for i in xrange(10**5))
+        after = counters.read()
+    finally:
+        counters.close()
+
+    assert len(before) == len(after) == 2
+    assert after[0] - before[0] > 10**5
+    assert after[1] >= before[1]
+
+    from hedge.log import HardwareCounters
+    hw_counters = HardwareCounters()
+    try:
+        hw_counters.prepare_for_tick()
+        sum(i*i for i in xrange(10**5))
+        cycles, instructions, cache_misses, bandwidth = hw_counters()
+    finally:
+        hw_counters.counters.close()
+
+    assert instructions > 10**5
+    assert cycles >= 0 and cache_misses >= 0
+
+
+
+
 def test_identify_affine_map():
     n = 5
     randn = numpy.random.randn
@@ -1019,6 +1019,268 @@ def test_elliptic():
 
 
 
+def test_sparse_assembly():
+    """Check sparse assembly by colored probing against unit-vector
+    application."""
+
+    from hedge.mesh import TAG_ALL, TAG_NONE
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.discretization.local import TriangleDiscretization
+    from hedge.models.poisson import PoissonOperator
+    from hedge.iterative import assemble_sparse_matrix
+    from hedge.tools import unit_vector
+
+    mesh = make_disk_mesh(r=0.5, max_area=0.1, faces=20)
+    discr = discr_class(mesh, TriangleDiscretization(2),
+            debug=discr_class.noninteractive_debug_flags())
+
+    op = PoissonOperator(discr.dimensions,
+            dirichlet_tag=TAG_ALL, neumann_tag=TAG_NONE)
+    bound_op = op.bind(discr)
+
+    sparse_mat = assemble_sparse_matrix(discr, bound_op, stencil_radius=2)
+
+    n = len(discr)
+    dense_mat = numpy.zeros((n, n))
+    for j in range(n):
+        dense_mat[:, j] = bound_op(unit_vector(n, j))
+
+    assert la.norm(sparse_mat.toarray()-dense_mat) \
+            < 1e-12*la.norm(dense_mat)
+    assert sparse_mat.nnz < n*n
+
+
+
+
+def test_block_jacobi_preconditioner():
+    """Check that the probed element block-Jacobi preconditioner inverts
+    a block-diagonal operator."""
+
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.discretization.local import TriangleDiscretization
+    from hedge.iterative import (make_block_jacobi_preconditioner,
+            _element_dof_indices)
+
+    mesh = make_disk_mesh(r=0.5, max_area=0.1, faces=20)
+    discr = discr_class(mesh, TriangleDiscretization(2),
+            debug=discr_class.noninteractive_debug_flags())
+
+    component_count = 2
+    n = len(discr)*component_count
+
+    from numpy.random import RandomState
+    rng = RandomState(17)
+
+    # a well-conditioned, dense block per element, coupling all components
+    eg, = discr.element_groups
+    dof_idx = _element_dof_indices(discr, eg, component_count)
+    el_count, block_size = dof_idx.shape
+    blocks = (rng.uniform(-1, 1, (el_count, block_size, block_size))
+            + 2*block_size*numpy.eye(block_size))
+
+    class BlockDiagonalOperator:
+        dtype = numpy.float64
+        shape = (n, n)
+
+        def __call__(self, x):
+            result = numpy.empty_like(x)
+            for el in range(el_count):
+                result[dof_idx[el]] = numpy.dot(blocks[el], x[dof_idx[el]])
+            return result
+
+    a = BlockDiagonalOperator()
+    precon = make_block_jacobi_preconditioner(discr, a,
+            component_count=component_count)
+    assert precon.shape == (n, n)
+
+    x = rng.uniform(-1, 1, n)
+    assert la.norm(precon(a(x)) - x) < 1e-12*la.norm(x)
+
+
+
+
+def test_poisson_multigrid():
+    """Check that p-multigrid preconditioning preserves the solution and
+    lowers the CG iteration count."""
+
+    from hedge.mesh import TAG_ALL, TAG_NONE
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.discretization.local import TriangleDiscretization
+    from hedge.data import ConstantGivenFunction
+    from hedge.models.poisson import PoissonOperator
+    from hedge.iterative import parallel_cg
+    from hedge.backends import CPURunContext
+    rcon = CPURunContext()
+
+    mesh = make_disk_mesh(r=0.5, max_area=0.02)
+    discr = rcon.make_discretization(mesh, TriangleDiscretization(4),
+            debug=discr_class.noninteractive_debug_flags())
+
+    op = PoissonOperator(discr.dimensions,
+            dirichlet_tag=TAG_ALL,
+            dirichlet_bc=ConstantGivenFunction(0),
+            neumann_tag=TAG_NONE)
+    bound_op = op.bind(discr)
+
+    rhs = bound_op.prepare_rhs(discr.interpolate_volume_function(
+        lambda x, el: numpy.exp(-10*numpy.dot(x, x))))
+
+    iteration_counts = []
+
+    def debug_callback(what, iterations, x, residual, d, delta):
+        if what == "end":
+            iteration_counts.append(iterations)
+
+    sol_plain = -parallel_cg(rcon, -bound_op, rhs, tol=1e-10,
+            debug_callback=debug_callback)
+
+    mg = bound_op.multigrid_preconditioner()
+    sol_mg = -parallel_cg(rcon, -bound_op, rhs, precon=mg, tol=1e-10,
+            debug_callback=debug_callback)
+    mg.close()
+
+    assert discr.norm(sol_mg-sol_plain) < 1e-7*discr.norm(sol_plain)
+
+    plain_its, mg_its = iteration_counts
+    assert mg_its < plain_its/4
+
+
+
+
+def test_vectorized_interpolation():
+    """Check vectorized interpolation of given functions against the
+    per-node protocol."""
+
+    from hedge.mesh import TAG_ALL
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.data import (vectorized, ConstantGivenFunction,
+            TimeDependentGivenFunction)
+    from hedge.tools import make_obj_array
+
+    mesh = make_disk_mesh(r=0.5, max_area=0.1, faces=20)
+    discr = discr_class(mesh, order=3,
+            debug=discr_class.noninteractive_debug_flags())
+
+    def f_scalar(x, el):
+        return numpy.sin(3*x[0])*x[1] + el.id
+
+    @vectorized
+    def f_vectorized(nodes, el_ids):
+        return numpy.sin(3*nodes[:, 0])*nodes[:, 1] + el_ids
+
+    vol_ref = discr.interpolate_volume_function(f_scalar)
+    assert la.norm(discr.interpolate_volume_function(f_vectorized)
+            - vol_ref) < 1e-13*la.norm(vol_ref)
+
+    @vectorized
+    def f_vector(nodes, el_ids):
+        return make_obj_array([nodes[:, 0], 2])
+
+    vec_vol = discr.interpolate_volume_function(f_vector)
+    assert vec_vol.shape == (2, len(discr))
+    assert la.norm(vec_vol[0] - discr.nodes[:, 0]) == 0
+    assert (vec_vol[1] == 2).all()
+
+    @vectorized
+    def f_tdep(nodes, el_ids, t):
+        return t*nodes.T
+
+    bdry_nodes = discr.get_boundary(TAG_ALL).nodes
+    bdry_vals = TimeDependentGivenFunction(f_tdep).boundary_interpolant(
+            2, discr, TAG_ALL)
+    assert la.norm(bdry_vals - 2*bdry_nodes.T) == 0
+
+    const_vals = ConstantGivenFunction(numpy.array([1., 5.])) \
+            .boundary_interpolant(discr, TAG_ALL)
+    assert const_vals.shape == (2, len(bdry_nodes))
+    assert (const_vals[1] == 5).all()
+
+
+
+
+def test_compiled_boundary_data():
+    """Check that symbolic incident fields and currents compiled into
+    the Maxwell operator agree with their interpolated counterparts."""
+
+    from hedge.mesh import TAG_ALL, TAG_NONE
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.models.em import TEMaxwellOperator
+    from hedge.data import (vectorized, CompiledExpressionData,
+            TimeDependentGivenFunction)
+    from hedge.optemplate.primitives import CFunction
+    from hedge.tools import make_obj_array, join_fields
+
+    mesh = make_disk_mesh(r=0.5, max_area=0.1, faces=20)
+    discr = discr_class(mesh, order=3,
+            debug=discr_class.noninteractive_debug_flags())
+
+    def symbolic_fields(t, x, fields):
+        sin = CFunction("sin")
+        return make_obj_array([
+            sin(x[0]-t), x[1]*t, 0, 0, 0, sin(x[0]+x[1])])
+
+    @vectorized
+    def numeric_fields(nodes, el_ids, t):
+        x = nodes.T
+        return make_obj_array([
+            numpy.sin(x[0]-t), x[1]*t, 0, 0, 0, numpy.sin(x[0]+x[1])])
+
+    def symbolic_current(t, x, fields):
+        return make_obj_array([t*x[0], x[1], 0])
+
+    @vectorized
+    def numeric_current(nodes, el_ids, t):
+        x = nodes.T
+        return make_obj_array([t*x[0], x[1], 0])
+
+    t = 0.3
+    w = join_fields(*[discr.interpolate_volume_function(
+        lambda x, el: numpy.cos(i*x[0]+x[1]))
+        for i in range(3)])
+
+    results = []
+    for incident_bc, current in [
+            (CompiledExpressionData(symbolic_fields),
+                CompiledExpressionData(symbolic_current)),
+            (TimeDependentGivenFunction(numeric_fields),
+                TimeDependentGivenFunction(numeric_current)),
+            ]:
+        op = TEMaxwellOperator(epsilon=1, mu=1, flux_type=1,
+                pec_tag=TAG_NONE, incident_tag=TAG_ALL,
+                incident_bc=incident_bc, current=current)
+        results.append(op.bind(discr)(t, w))
+
+    for symb, num in zip(*results):
+        assert la.norm(symb - num) < 1e-12*la.norm(num)
+
+
+
+def test_scalar_parameter_bc_to_flux():
+    """Check that boundary data depending on a scalar parameter is still
+    substituted into the flux, rather than evaluated as a boundary
+    vector."""
+
+    from hedge.flux import FluxScalarPlaceholder
+    from hedge.optemplate import (Field, ScalarParameter, BoundaryPair,
+            BoundarizeOperator, get_flux_operator)
+    from hedge.optemplate.mappers.bc_to_flux import BCToFluxRewriter
+    from pymbolic.primitives import CommonSubexpression
+    from hedge.mesh import TAG_ALL
+
+    u = Field("u")
+    t = ScalarParameter("t")
+    flux = FluxScalarPlaceholder(0).ext
+
+    bc = CommonSubexpression(t*BoundarizeOperator(TAG_ALL)(u))
+    rewritten = BCToFluxRewriter()(
+            get_flux_operator(flux)(BoundaryPair(u, bc, TAG_ALL)))
+
+    assert isinstance(rewritten.field, BoundaryPair)
+    assert len(rewritten.field.bfield) == 0
+
+
+
+
 def test_projection():
     """Test whether projection between different orders works"""
 
@@ -1097,6 +1359,54 @@ def test_filter():
 
 
 
+def test_elementwise_linear_fusion():
+    """Check that chains of elementwise linear operators are fused into a
+    single operator, and that the result matches applying the operators
+    one by one."""
+
+    from math import sin, cos
+    from hedge.mesh.generator import make_regular_rect_mesh
+    from hedge.discretization import ExponentialFilterResponseFunction
+    from hedge.optemplate import (Field,
+            MassOperator, InverseMassOperator,
+            VandermondeOperator, InverseVandermondeOperator,
+            ElementwiseLinearOperator, FusedElementwiseLinearOperator,
+            BoundOperatorCollector, process_optemplate)
+    from hedge.optemplate.operators import FilterOperator
+
+    mesh = make_regular_rect_mesh(n=(5, 4))
+    discr = discr_class(mesh, order=4,
+            debug=discr_class.noninteractive_debug_flags())
+
+    exp_filter = FilterOperator(ExponentialFilterResponseFunction(0.9, 3))
+    u = discr.interpolate_volume_function(
+            lambda x, el: sin(3*x[0])*cos(2*x[1]))
+
+    for chain in [
+            [VandermondeOperator(), exp_filter, InverseVandermondeOperator()],
+            [InverseMassOperator(), exp_filter],
+            [MassOperator(), exp_filter, InverseMassOperator()],
+            ]:
+        optemplate = Field("f")
+        for op in chain[::-1]:
+            optemplate = op(optemplate)
+
+        elwise_bindings = BoundOperatorCollector(ElementwiseLinearOperator)(
+                process_optemplate(optemplate, mesh=discr.mesh))
+        assert len(elwise_bindings) == 1
+        binding, = elwise_bindings
+        assert isinstance(binding.op, FusedElementwiseLinearOperator)
+
+        ref_result = u
+        for op in chain[::-1]:
+            ref_result = op.apply(discr, ref_result)
+
+        result = discr.compile(optemplate)(f=u)
+        assert la.norm(result - ref_result) < 1e-12*la.norm(ref_result)
+
+
+
+
 def no_test_tri_mass_mat_gauss(self):
     """Check the integral of a Gaussian on a disk using the mass matrix"""
 
@@ -1190,6 +1500,545 @@ def test_mesh_regrid():
 
 
 
+def test_point_interpolation_matrix():
+    """Check batched point interpolation against per-point evaluation."""
+
+    from hedge.mesh.generator import make_disk_mesh
+
+    mesh = make_disk_mesh(r=0.5, max_area=0.02, faces=30)
+    discr = discr_class(mesh, order=4,
+            debug=discr_class.noninteractive_debug_flags())
+
+    fields = numpy.array([
+        discr.interpolate_volume_function(
+            lambda x, el: numpy.sin(3*x[0]+i*x[1]))
+        for i in range(3)]).T
+
+    from numpy.random import RandomState
+    rng = RandomState(17)
+    r = 0.45*numpy.sqrt(rng.rand(200))
+    phi = 2*numpy.pi*rng.rand(200)
+    points = numpy.array([r*numpy.cos(phi), r*numpy.sin(phi)]).T
+
+    interp_mat = discr.get_point_interpolation_matrix(points, thresh=1e-10)
+    batched = interp_mat * fields
+
+    for i, point in enumerate(points[:20]):
+        pe = discr.get_point_evaluator(point, thresh=1e-10)
+        for j in range(fields.shape[1]):
+            assert abs(batched[i, j] - pe(fields[:, j])) < 1e-12
+
+
+
+
+
+def test_boundary_descriptors():
+    """Check boundary nodes and normals against the per-face mesh data."""
+
+    from hedge.mesh.generator import make_rect_mesh
+    from hedge.mesh import TAG_ALL
+
+    mesh = make_rect_mesh(max_area=0.03)
+    discr = discr_class(mesh, order=3,
+            debug=discr_class.noninteractive_debug_flags())
+
+    for tag in ["minus_x", "plus_y", TAG_ALL]:
+        bdry = discr.get_boundary(tag)
+        normals = discr.boundary_normals(tag)
+        ldis = discr.element_groups[0].local_discretization
+        fnc = ldis.face_node_count()
+
+        assert normals.shape == (2, len(bdry.nodes))
+        assert len(bdry.nodes) == fnc*len(mesh.tag_to_boundary[tag])
+        assert la.norm(bdry.nodes - discr.nodes[bdry.vol_indices]) == 0
+
+        for i, (el, face_nr) in enumerate(mesh.tag_to_boundary[tag]):
+            face_slice = slice(i*fnc, (i+1)*fnc)
+            el_range = discr.find_el_range(el.id)
+            assert (bdry.vol_indices[face_slice]
+                    == el_range.start + numpy.array(
+                        ldis.face_indices()[face_nr])).all()
+
+            for j in range(face_slice.start, face_slice.stop):
+                assert la.norm(normals[:, j] - el.face_normals[face_nr]) < 1e-14
+
+            assert bdry.find_facepair_side((el, face_nr)).face_id == face_nr
+
+    assert discr.get_boundary("nonexistent").is_empty()
+    assert discr.boundary_normals("nonexistent").shape == (2, 0)
+
+
+
+def test_ensemble_execution():
+    """Check that stepping an ensemble matches stepping its members
+    one by one."""
+
+    from math import sin, cos, pi
+    from hedge.mesh.generator import make_regular_rect_mesh
+    from hedge.timestep import LSRK4TimeStepper
+    from hedge.models.advection import StrongAdvectionOperator
+    from hedge.data import make_tdep_constant
+    from hedge.tools.ensemble import make_ensemble, split_ensemble
+
+    v = numpy.array([0.27, 0.1])
+
+    mesh = make_regular_rect_mesh(a=(0,0), b=(2*pi,2*pi), n=(5,3),
+            periodicity=(True, True))
+    discr = discr_class(mesh, order=3,
+            debug=discr_class.noninteractive_debug_flags())
+
+    op = StrongAdvectionOperator(v,
+            inflow_u=make_tdep_constant(0),
+            flux_type="upwind")
+    rhs = op.bind(discr)
+
+    base_u = discr.interpolate_volume_function(
+            lambda x, el: sin(x[0])*cos(x[1]))
+    members = [(1+0.5*i)*base_u for i in range(3)]
+    member_dts = [1e-3*(i+1) for i in range(3)]
+
+    u_ens = make_ensemble(members)
+    dt_ens = make_ensemble(member_dts)
+
+    ens_stepper = LSRK4TimeStepper()
+    for step in range(4):
+        u_ens = ens_stepper(u_ens, step*dt_ens, dt_ens, rhs)
+
+    for u, u_from_ens, dt in zip(members, split_ensemble(u_ens), member_dts):
+        stepper = LSRK4TimeStepper()
+        for step in range(4):
+            u = stepper(u, step*dt, dt, rhs)
+
+        assert la.norm(u - u_from_ens) < 1e-12 * la.norm(u)
+
+    # members that vanish are broadcast to the shape of the others
+    from hedge.tools import join_fields
+    zero_ens = make_ensemble([0, base_u, 0])
+    assert zero_ens.shape == (3, len(base_u))
+    assert la.norm(split_ensemble(zero_ens)[0]) == 0
+    assert la.norm(split_ensemble(zero_ens)[1] - base_u) == 0
+
+    vec_ens = make_ensemble([join_fields(base_u, base_u), 0])
+    assert vec_ens.shape == (2,)
+    assert vec_ens[1].shape == (2, len(base_u))
+
+
+
+
+
+def test_compiled_code_schedule():
+    """Check that aggregated instruction streams are consistent and that
+    their dynamic and static schedules agree."""
+
+    from hedge.mesh.generator import make_regular_rect_mesh
+    from hedge.models.gas_dynamics import GasDynamicsOperator, GammaLawEOS
+    from hedge.compiler import Assign
+    from hedge.mesh import TAG_ALL
+
+    mesh = make_regular_rect_mesh(n=(4, 4))
+    discr = discr_class(mesh, order=2,
+            debug=discr_class.noninteractive_debug_flags())
+
+    op = GasDynamicsOperator(dimensions=2, mu=1e-3, prandtl=0.72,
+            equation_of_state=GammaLawEOS(1.4), noslip_tag=TAG_ALL)
+    bound_op = discr.compile(op.op_template())
+    code = bound_op.code
+
+    assignees = []
+    for insn in code.instructions:
+        assignees.extend(insn.get_assignees())
+    assert len(assignees) == len(set(assignees))
+
+    from pymbolic.primitives import Variable
+    max_vectors = 100
+    for insn in code.instructions:
+        if isinstance(insn, Assign) and len(insn.names) > 1:
+            deps = insn.get_dependencies(each_vector=True) \
+                    - set(Variable(name) for name in insn.names)
+            assert len(insn.names) + len(deps) <= max_vectors
+
+    from hedge.tools import join_fields
+    q = join_fields(
+            discr.volume_zeros()+1,
+            discr.volume_zeros()+2.5,
+            discr.interpolate_volume_function(lambda x, el: 0.1*x[0]),
+            discr.interpolate_volume_function(lambda x, el: 0.1*x[1]))
+
+    # the first call records a schedule, the second one replays it
+    rhs = op.bind(discr)
+    dynamic_result, dynamic_speed = rhs(0, q)
+    static_result, static_speed = rhs(0, q)
+
+    assert dynamic_speed == static_speed
+    for dyn_comp, static_comp in zip(dynamic_result, static_result):
+        assert la.norm(dyn_comp - static_comp) == 0
+
+
+
+
+def test_executor_cache():
+    """Check that recompiling structurally equal operator templates reuses
+    the executor built the first time."""
+
+    from hedge.mesh.generator import make_regular_rect_mesh
+    from hedge.optemplate import MassOperator, InverseMassOperator, Field
+    from hedge.tools import join_fields
+
+    mesh = make_regular_rect_mesh(n=(4, 4))
+    discr = discr_class(mesh, order=2,
+            debug=discr_class.noninteractive_debug_flags())
+
+    mass_op = discr.compile(MassOperator()(Field("f")))
+    assert discr.compile(MassOperator()(Field("f"))) is mass_op
+    assert discr.compile(InverseMassOperator()(Field("f"))) is not mass_op
+
+    vec_op = discr.compile(join_fields(
+        MassOperator()(Field("f")), InverseMassOperator()(Field("g"))))
+    assert discr.compile(join_fields(
+        MassOperator()(Field("f")), InverseMassOperator()(Field("g")))) \
+                is vec_op
+
+    cache_size = len(discr.executor_cache)
+    f = discr.interpolate_volume_function(lambda x, el: x[0])
+    for i in range(3):
+        assert la.norm(MassOperator().apply(discr, f) - mass_op(f=f)) == 0
+    assert len(discr.executor_cache) == cache_size
+
+
+
+
+def test_field_archive():
+    """Check that fields read back from an archive match those written,
+    across chunk boundaries and with and without compression."""
+
+    import os
+    import shutil
+    from tempfile import mkdtemp
+    from hedge.mesh.generator import make_regular_rect_mesh
+    from hedge.archive import FieldArchiveWriter, FieldArchive
+    from hedge.tools import join_fields
+
+    mesh = make_regular_rect_mesh(n=(4, 4))
+    discr = discr_class(mesh, order=2,
+            debug=discr_class.noninteractive_debug_flags())
+
+    u = discr.interpolate_volume_function(lambda x, el: x[0])
+    v = join_fields(u, 2*u)
+
+    tmpdir = mkdtemp()
+    try:
+        for compress, dtype in [(False, None), (True, numpy.float32)]:
+            pathname = os.path.join(tmpdir, "archive-%s" % compress)
+
+            archive = FieldArchiveWriter(discr, pathname, chunk_size=2,
+                    dtype=dtype, compress=compress)
+            for step in range(5):
+                archive.add_data([("u", step*u), ("v", step*v)],
+                        time=0.1*step, step=step)
+
+            # a rejected addition must not leave anything behind
+            try:
+                archive.add_data([("u", u), ("v", u)], step=5)
+            except ValueError:
+                pass
+            else:
+                assert False, "mismatched field shape not detected"
+            archive.close()
+
+            def get_open_file_count():
+                return len(os.listdir("/proc/self/fd"))
+
+            check_fds = compress and os.path.isdir("/proc/self/fd")
+            if check_fds:
+                open_file_count = get_open_file_count()
+
+            archive = FieldArchive(pathname)
+            assert archive.steps == range(5)
+            assert len(archive.cells) == len(mesh.elements)*4
+            assert (archive.nodes == discr.nodes).all()
+
+            for step in range(5):
+                assert la.norm(archive.get_field("u", step) - step*u) \
+                        <= 1e-6*la.norm(step*u) + 1e-12
+                assert archive.get_field("v", step).shape == (2, len(u))
+                assert la.norm(archive.get_field("v", step)[1] - 2*step*u) \
+                        <= 1e-6*la.norm(2*step*u) + 1e-12
+
+            # compressed chunks are read into memory and their files closed
+            if check_fds:
+                assert get_open_file_count() == open_file_count
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+
+
+def test_checkpoint_restart():
+    """Check that continuing from a checkpoint reproduces an uninterrupted
+    multistep run bit for bit."""
+
+    import os
+    import shutil
+    from tempfile import mkdtemp
+    from hedge.mesh.generator import make_regular_rect_mesh
+    from hedge.models.wave import StrongWaveOperator
+    from hedge.timestep.ab import AdamsBashforthTimeStepper
+    from hedge.checkpoint import write_checkpoint, read_checkpoint
+    from hedge.tools import join_fields
+
+    mesh = make_regular_rect_mesh(n=(4, 4))
+    discr = discr_class(mesh, order=3,
+            debug=discr_class.noninteractive_debug_flags())
+
+    op = StrongWaveOperator(-1, discr.dimensions, flux_type="upwind")
+    rhs = op.bind(discr)
+
+    u0 = discr.interpolate_volume_function(
+            lambda x, el: numpy.exp(-10*((x[0]-0.5)**2+(x[1]-0.5)**2)))
+    fields = join_fields(u0, [discr.volume_zeros()
+        for i in range(discr.dimensions)])
+
+    dt = 0.1*op.estimate_timestep(discr)
+
+    def run(stepper, fields, first_step, last_step):
+        for step in range(first_step, last_step):
+            fields = stepper(fields, step*dt, dt, rhs)
+        return fields
+
+    ref_fields = run(AdamsBashforthTimeStepper(3), fields, 0, 10)
+
+    tmpdir = mkdtemp()
+    try:
+        # checkpoint both during and after startup
+        for checkpoint_step in [1, 5]:
+            stepper = AdamsBashforthTimeStepper(3)
+            fields_at_checkpoint = run(stepper, fields, 0, checkpoint_step)
+
+            pathname = os.path.join(tmpdir, "checkpoint-%d" % checkpoint_step)
+            write_checkpoint(pathname, fields_at_checkpoint,
+                    checkpoint_step*dt, checkpoint_step, stepper=stepper)
+
+            restarted_stepper = AdamsBashforthTimeStepper(3)
+            checkpoint = read_checkpoint(pathname, stepper=restarted_stepper)
+            assert checkpoint.step == checkpoint_step
+
+            restarted_fields = run(restarted_stepper, checkpoint.fields,
+                    checkpoint.step, 10)
+
+            for ref_component, component in zip(ref_fields, restarted_fields):
+                assert (ref_component == component).all()
+
+        # overwriting a checkpoint leaves mappings of the old one intact
+        old_fields = checkpoint.fields
+        old_copy = [component.copy() for component in old_fields]
+        write_checkpoint(pathname, 2*old_fields, 0, 0)
+
+        for component, component_copy in zip(old_fields, old_copy):
+            assert (component == component_copy).all()
+
+        new_fields = read_checkpoint(pathname).fields
+        for component, component_copy in zip(new_fields, old_copy):
+            assert (component == 2*component_copy).all()
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+
+
+def test_fused_log_reductions():
+    """Check that log quantities computed through fused reductions agree
+    with separately computed integrals."""
+
+    from hedge.mesh.generator import make_regular_rect_mesh
+    from hedge.models.em import TEMaxwellOperator
+    from hedge.models.nd_calculus import DivergenceOperator
+    from hedge.mesh import TAG_ALL
+    from hedge.tools import join_fields
+    from hedge.log import (FusedReductions, Integral, LpNorm,
+            EMFieldGetter, ElectricFieldEnergy, MagneticFieldEnergy,
+            EMFieldMomentum, EMFieldDivergenceD, EMFieldDivergenceB)
+
+    mesh = make_regular_rect_mesh(n=(5, 5))
+    discr = discr_class(mesh, order=3,
+            debug=discr_class.noninteractive_debug_flags())
+
+    u = discr.interpolate_volume_function(
+            lambda x, el: numpy.cos(3*x[0]+x[1]))
+
+    reductions = FusedReductions(discr, lambda: u)
+    int_u = Integral(reductions, discr, name="int_u")
+    l1_u = LpNorm(reductions, discr, p=1, name="l1_u")
+    l2_u = LpNorm(reductions, discr, name="l2_u")
+
+    assert abs(int_u() - discr.integral(u)) < 1e-12
+    assert abs(l1_u() - discr.norm(u, 1)) < 1e-12
+    assert abs(l2_u() - discr.norm(u)) < 1e-12
+
+    # direct calls see fields updated in place
+    u *= 2
+    assert abs(l2_u() - discr.norm(u)) < 1e-12
+    assert abs(int_u() - discr.integral(u)) < 1e-12
+
+    # all quantities logged in one tick share a single evaluation
+    evaluation_count = [0]
+    uncounted_evaluate = reductions.evaluate
+
+    def counted_evaluate():
+        evaluation_count[0] += 1
+        return uncounted_evaluate()
+
+    reductions.evaluate = counted_evaluate
+
+    from pytools.log import LogManager
+    logmgr = LogManager(None, "w")
+    for quantity in [int_u, l1_u, l2_u]:
+        logmgr.add_quantity(quantity)
+
+    for step in range(2):
+        ref_int_u = discr.integral(u)
+        ref_l2_u = discr.norm(u)
+
+        logmgr.tick_before()
+        u *= 2
+        logmgr.tick_after()
+
+        # logged at the beginning of the tick
+        assert abs(logmgr.last_values["int_u"] - ref_int_u) < 1e-12
+        assert abs(logmgr.last_values["l2_u"] - ref_l2_u) < 1e-12
+
+    assert evaluation_count[0] == 2
+    logmgr.close()
+
+    del reductions.evaluate
+
+    # the moduli of complex fields are integrated
+    v = (1+2j)*u
+    complex_reductions = FusedReductions(discr, lambda: v)
+    l1_v = LpNorm(complex_reductions, discr, p=1, name="l1_v")
+    l2_v = LpNorm(complex_reductions, discr, name="l2_v")
+    abs_v = numpy.abs(v)
+    assert abs(l1_v() - discr.integral(abs_v)) < 1e-12
+    assert abs(l2_v() - discr.integral(abs_v**2)**0.5) < 1e-12
+
+    epsilon = 2
+    mu = 3
+    op = TEMaxwellOperator(epsilon=epsilon, mu=mu, flux_type=1)
+    w = join_fields(*[discr.interpolate_volume_function(
+        lambda x, el: numpy.cos(i*x[0]+x[1]))
+        for i in range(3)])
+
+    fields = EMFieldGetter(discr, op, lambda: w)
+    e, h = fields.e, fields.h
+
+    w_el = ElectricFieldEnergy(fields)
+    assert abs(w_el() - discr.integral(epsilon/2*numpy.dot(e, e))) < 1e-12
+
+    w_mag = MagneticFieldEnergy(fields)
+    assert abs(w_mag() - discr.integral(mu/2*numpy.dot(h, h))) < 1e-12
+
+    momentum = EMFieldMomentum(fields, op.c)
+    ref_momentum = discr.integral(
+            join_fields(e[1]*h[0], -e[0]*h[0], 0)/op.c**2)
+    assert la.norm(numpy.array(momentum()) - ref_momentum) < 1e-12
+
+    div_d = EMFieldDivergenceD(op, fields)
+    bound_div_op = DivergenceOperator(2).bind(discr)
+    assert abs(div_d() - discr.integral(bound_div_op(epsilon*e))) < 1e-10
+
+    div_b = EMFieldDivergenceB(op, fields)
+    assert div_b() == [0, 0]
+
+
+
+
+def test_performance_quantities():
+    """Check that kernel rates, allocation counts and peak RSS are logged
+    for an instrumented discretization."""
+
+    from hedge.mesh.generator import make_regular_rect_mesh
+    from hedge.models.wave import StrongWaveOperator
+    from hedge.log import add_performance_quantities
+    from hedge.tools import join_fields
+    from pytools.log import LogManager
+
+    mesh = make_regular_rect_mesh(n=(5, 5))
+    discr = discr_class(mesh, order=3,
+            debug=discr_class.noninteractive_debug_flags())
+
+    logmgr = LogManager(None, "w")
+    discr.add_instrumentation(logmgr)
+    add_performance_quantities(logmgr, discr, hardware_counters=False)
+
+    op = StrongWaveOperator(-1, discr.dimensions, flux_type="upwind")
+    rhs = op.bind(discr)
+    fields = join_fields(discr.volume_zeros(),
+            [discr.volume_zeros() for i in range(discr.dimensions)])
+
+    for step in range(3):
+        logmgr.tick_before()
+        rhs(0, fields)
+        logmgr.tick_after()
+
+    def last_value(name):
+        description, unit, table = logmgr.get_expr_dataset(name)
+        return table[-1][1]
+
+    assert last_value("n_vector_alloc") > 0
+    assert last_value("n_bytes_diff") > 0
+    assert last_value("r_flops_diff") > 0
+    assert last_value("r_bytes_diff") > 0
+    assert last_value("max_rss") > 0
+
+    logmgr.close()
+
+
+
+
+def test_fused_quadrature_kernels():
+    """Check that evaluating quadrature stiffness operators in fused
+    kernels gives the same right-hand side as evaluating them pass by
+    pass."""
+
+    from hedge.mesh.generator import make_regular_rect_mesh
+    from hedge.models.gas_dynamics import GasDynamicsOperator, GammaLawEOS
+    from hedge.backends.jit.compiler import QuadratureKernelAssign
+    from hedge.mesh import TAG_ALL
+    from hedge.tools import join_fields
+
+    mesh = make_regular_rect_mesh(n=(4, 4))
+    order = 2
+    quad_min_degrees = {"gasdyn_vol": 3*order, "gasdyn_face": 3*order}
+
+    op = GasDynamicsOperator(dimensions=2, mu=1e-3, prandtl=0.72,
+            equation_of_state=GammaLawEOS(1.4), noslip_tag=TAG_ALL)
+
+    results = []
+    for extra_debug_flags in [set(), set(["jit_dont_fuse_quadrature"])]:
+        discr = discr_class(mesh, order=order,
+                quad_min_degrees=quad_min_degrees,
+                debug=discr_class.noninteractive_debug_flags()
+                | extra_debug_flags)
+
+        has_fused_kernels = any(
+                isinstance(insn, QuadratureKernelAssign)
+                for insn in discr.compile(op.op_template()).code.instructions)
+        assert has_fused_kernels == (not extra_debug_flags)
+
+        q = join_fields(
+                discr.volume_zeros()+1,
+                discr.volume_zeros()+2.5,
+                discr.interpolate_volume_function(lambda x, el: 0.1*x[0]),
+                discr.interpolate_volume_function(lambda x, el: 0.1*x[1]))
+
+        rhs_result, speed = op.bind(discr)(0, q)
+        results.append(rhs_result)
+
+    fused_result, unfused_result = results
+    for fused_comp, unfused_comp in zip(fused_result, unfused_result):
+        assert la.norm(fused_comp - unfused_comp) \
+                <= 1e-10*la.norm(unfused_comp) + 1e-12
+
+
 if __name__ == "__main__":
     import sys
     if len(sys.argv) > 1: